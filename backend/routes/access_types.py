@@ -20,6 +20,7 @@ from routes.dependencies import (
     get_current_user,
     get_tenant_from_slug,
     clean_mongo_doc,
+    invalider_cache_permissions,
     User
 )
 
@@ -1038,6 +1039,7 @@ async def create_access_type(
     }
     
     await db.access_types.insert_one(new_access_type)
+    invalider_cache_permissions(tenant.id, new_access_type["id"])
     
     # Retourner sans _id
     new_access_type.pop("_id", None)
@@ -1150,6 +1152,7 @@ async def update_access_type(
         {"id": access_type_id, "tenant_id": tenant.id},
         {"$set": update_data}
     )
+    invalider_cache_permissions(tenant.id, access_type_id)
     
     updated = await db.access_types.find_one(
         {"id": access_type_id},
@@ -1223,6 +1226,7 @@ async def delete_access_type(
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Type d'accès non trouvé")
+    invalider_cache_permissions(tenant.id, access_type_id)
     
     logger.info(f"Type d'accès supprimé: {access_type_id} par {current_user.email}")
     
@@ -58,8 +58,10 @@ import asyncio
 from io import BytesIO, StringIO
 
 # Import des dépendances partagées
+from services.notification_dispatcher import soumettre_email
 from routes.dependencies import (
     db,
+    invalidate_tenant_cache,
     get_current_user,
     get_tenant_from_slug,
     clean_mongo_doc,
@@ -255,13 +257,13 @@ async def notifier_vehicule_retour_en_service(
                     </div>
                     """
                     
-                    resend.Emails.send({
+                    soumettre_email({
                         "from": f"ProFireManager <{sender_email}>",
                         "to": emails,
                         "subject": f"✅ Véhicule EN SERVICE: {nom_vehicule}",
                         "html": email_html
                     })
-                    logger.info(f"📧 Email retour en service envoyé à {len(emails)} utilisateurs")
+                    logger.info(f"📧 Email retour en service mis en file pour {len(emails)} utilisateurs")
         except Exception as e:
             logger.error(f"Erreur envoi email retour en service: {e}")
         
@@ -1091,9 +1093,9 @@ async def generate_vehicle_qr_code(
     img_base64 = base64.b64encode(buffer.getvalue()).decode()
     
     # Upload QR code vers Azure Blob Storage
-    from services.azure_storage import put_object, generate_sas_url, generate_storage_path
+    from services.azure_storage import put_object_async, generate_sas_url, generate_storage_path
     blob_path = generate_storage_path(tenant.id, "qr-codes", f"vehicule_{vehicle_id}.png")
-    put_object(blob_path, buffer.getvalue(), "image/png")
+    await put_object_async(blob_path, buffer.getvalue(), "image/png")
     qr_sas_url = generate_sas_url(blob_path)
     
     await db.vehicules.update_one(
@@ -1136,11 +1138,11 @@ async def create_inspection_saaq(
     # Upload des photos vers Azure Blob Storage
     azure_photo_urls = []
     if inspection_data.photo_urls:
-        from services.azure_storage import upload_base64_to_azure, generate_sas_url
+        from services.azure_storage import upload_base64_to_azure_async, generate_sas_url
         for i, photo_url in enumerate(inspection_data.photo_urls):
             if photo_url.startswith('data:'):
                 try:
-                    result = upload_base64_to_azure(
+                    result = await upload_base64_to_azure_async(
                         photo_url, tenant.id, "inspections-saaq", f"inspection_{i}.jpg"
                     )
                     azure_photo_urls.append({
@@ -2578,6 +2580,7 @@ async def update_parametres_actifs(
             "updated_at": datetime.now(timezone.utc).isoformat()
         }}
     )
+    invalidate_tenant_cache(tenant_id=tenant.id)
     
     return {"message": "Paramètres mis à jour avec succès", "parametres": parametres}
 
@@ -2626,6 +2629,7 @@ async def update_configuration_emails_rondes(
         {"id": tenant.id},
         {"$set": {"parametres": current_parametres}}
     )
+    invalidate_tenant_cache(tenant_id=tenant.id)
     
     return {"message": "Configuration mise à jour", "user_ids_rondes_securite": user_ids}
 
@@ -15,6 +15,8 @@ import logging
 
 from routes.dependencies import (
     db,
+    invalidate_tenant_cache,
+    invalidate_user_cache,
     get_super_admin,
     log_super_admin_action,
     SuperAdmin,
@@ -72,6 +74,7 @@ async def emergency_restore_admin(
             update_data["mot_de_passe_hash"] = get_password_hash(password)
         
         await db.users.update_one({"id": existing["id"]}, {"$set": update_data})
+        invalidate_user_cache(existing["id"])
         
         await log_super_admin_action(
             admin=admin,
@@ -387,6 +390,7 @@ async def cleanup_database(
     # 2. Supprimer les tenants indésirables
     for tenant in tenants_a_supprimer:
         await db.tenants.delete_one({"id": tenant['id']})
+        invalidate_tenant_cache(tenant_id=tenant['id'])
         results["tenants_supprimes"].append(tenant.get('slug'))
         
         # Supprimer toutes les données associées
@@ -17,6 +17,7 @@ import uuid
 import logging
 import os
 
+from services.notification_dispatcher import soumettre_email
 from routes.dependencies import (
     db,
     get_current_user,
@@ -1312,33 +1313,36 @@ async def create_inspection_unifiee(
                     
                     logger.info(f"📧 Envoi email à: {dest_emails}")
                     sujet_email = f"⚠️ Alerte inspection: {asset_nom} - {tenant_nom}"
-                    email_response = resend.Emails.send({
+                    # Historique enregistré pour chaque destinataire une fois l'email envoyé
+                    from routes.emails_history import log_email_sent
+                    metadata_email = {
+                        "asset_type": asset_type,
+                        "asset_nom": asset_nom,
+                        "nb_alertes": len(alertes),
+                        "inspecteur": f"{current_user.prenom} {current_user.nom}"
+                    }
+                    
+                    async def historiser(_reponse):
+                        for dest in destinataires:
+                            if dest.get("email"):
+                                await log_email_sent(
+                                    type_email="alerte_inspection",
+                                    destinataire_email=dest.get("email"),
+                                    destinataire_nom=f"{dest.get('prenom', '')} {dest.get('nom', '')}".strip(),
+                                    sujet=sujet_email,
+                                    statut="sent",
+                                    tenant_id=tenant.id,
+                                    tenant_slug=tenant_slug,
+                                    metadata=metadata_email
+                                )
+                    
+                    soumettre_email({
                         "from": f"ProFireManager <{sender_email}>",
                         "to": dest_emails,
                         "subject": sujet_email,
                         "html": email_html
-                    })
-                    logger.info(f"✅ Email d'alerte envoyé à {len(dest_emails)} destinataire(s) - Response: {email_response}")
-                    
-                    # Enregistrer dans l'historique des emails pour chaque destinataire
-                    from routes.emails_history import log_email_sent
-                    for dest in destinataires:
-                        if dest.get("email"):
-                            await log_email_sent(
-                                type_email="alerte_inspection",
-                                destinataire_email=dest.get("email"),
-                                destinataire_nom=f"{dest.get('prenom', '')} {dest.get('nom', '')}".strip(),
-                                sujet=sujet_email,
-                                statut="sent",
-                                tenant_id=tenant.id,
-                                tenant_slug=tenant_slug,
-                                metadata={
-                                    "asset_type": asset_type,
-                                    "asset_nom": asset_nom,
-                                    "nb_alertes": len(alertes),
-                                    "inspecteur": f"{current_user.prenom} {current_user.nom}"
-                                }
-                            )
+                    }, apres_envoi=historiser)
+                    logger.info(f"✅ Email d'alerte mis en file pour {len(dest_emails)} destinataire(s)")
                 else:
                     logger.warning("⚠️ Aucune adresse email destinataire trouvée pour l'envoi")
         except Exception as e:
@@ -17,8 +17,10 @@ import secrets
 import jwt
 import os
 
+from services.notification_dispatcher import soumettre_email
 from routes.dependencies import (
     db,
+    invalidate_user_cache,
     get_current_user,
     get_tenant_from_slug,
     clean_mongo_doc,
@@ -26,7 +28,7 @@ from routes.dependencies import (
     get_password_hash,
     verify_password
 )
-from routes.emails_history import log_email_sent
+from routes.emails_history import historiser_apres_envoi, log_email_sent
 
 router = APIRouter(tags=["Auth"])
 logger = logging.getLogger(__name__)
@@ -156,6 +158,7 @@ async def tenant_login(tenant_slug: str, login: LoginRequest):
         {"id": user["id"]},
         {"$set": {"derniere_connexion": datetime.now(timezone.utc)}}
     )
+    invalidate_user_cache(user["id"])
     
     # Inclure les informations du tenant dans la réponse pour éviter un chargement séparé
     tenant_data = await db.tenants.find_one({"id": tenant.id}, {"_id": 0})
@@ -386,25 +389,22 @@ async def forgot_password(tenant_slug: str, request: ForgotPasswordRequest):
             </html>
             """
             
-            resend.Emails.send({
+            # Envoi en file, historisé par le worker une fois l'email envoyé
+            soumettre_email({
                 "from": "ProFireManager <noreply@profiremanager.ca>",
                 "to": [user["email"]],
                 "subject": "Réinitialisation de votre mot de passe - ProFireManager",
                 "html": html_content
-            })
-            
-            # Logger l'envoi de l'email
-            await log_email_sent(
+            }, apres_envoi=historiser_apres_envoi(
+                user["email"],
                 type_email="password_reset",
-                destinataire_email=user["email"],
                 destinataire_nom=user_name,
                 sujet="Réinitialisation de votre mot de passe - ProFireManager",
                 tenant_id=tenant.id,
-                tenant_slug=tenant_slug,
-                statut="sent"
-            )
+                tenant_slug=tenant_slug
+            ))
             
-            logger.info(f"✅ Email de réinitialisation envoyé à {request.email}")
+            logger.info(f"✅ Email de réinitialisation mis en file pour {request.email}")
         else:
             logger.warning(f"⚠️ RESEND_API_KEY non configuré - email non envoyé pour {request.email}")
             logger.info(f"Token de reset (debug): {reset_token}")
@@ -486,6 +486,7 @@ async def reset_password(tenant_slug: str, request: ResetPasswordRequest):
         {"id": token_data["user_id"]},
         {"$set": {"mot_de_passe_hash": new_hash}}
     )
+    invalidate_user_cache(token_data["user_id"])
     
     # Marquer le token comme utilisé
     await db.password_reset_tokens.update_one(
@@ -36,6 +36,7 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
 from reportlab.lib.units import inch
 from reportlab.platypus import Paragraph, Table, TableStyle, Spacer, Image
 
+from services.notification_dispatcher import soumettre_email
 from routes.dependencies import (
     db,
     get_current_user,
@@ -1558,7 +1559,9 @@ async def generer_avis_pdf(avis: Dict, tenant: Dict) -> BytesIO:
     
     # Créer le PDF avec branding
     tenant_obj = SimpleNamespace(**tenant) if tenant else None
-    buffer, doc, story = create_branded_pdf(tenant_obj, pagesize=letter)
+    from services.azure_storage import get_logo_bytes_async
+    logo_data = await get_logo_bytes_async(tenant_obj)
+    buffer, doc, story = create_branded_pdf(tenant_obj, logo_data=logo_data, pagesize=letter)
     styles = getSampleStyleSheet()
     
     # === STYLES PERSONNALISÉS ===
@@ -1776,8 +1779,8 @@ async def generer_avis_pdf(avis: Dict, tenant: Dict) -> BytesIO:
     signature_data = None
     if avis.get('signature_blob_name'):
         try:
-            from services.azure_storage import get_object
-            signature_data, _ = get_object(avis['signature_blob_name'])
+            from services.azure_storage import get_object_async
+            signature_data, _ = await get_object_async(avis['signature_blob_name'])
         except Exception as e:
             logger.warning(f"Impossible de charger signature Azure: {e}")
     elif avis.get('signature_url') and avis['signature_url'].startswith('data:image'):
@@ -1998,18 +2001,16 @@ async def envoyer_avis_courriel(
             ]
         }
         
-        email_response = resend.Emails.send(params)
-        
-        # Log email
-        from routes.emails_history import log_email_sent
-        await log_email_sent(
+        # Envoi en file (historisé par le worker une fois l'email envoyé)
+        from routes.emails_history import historiser_apres_envoi
+        soumettre_email(params, apres_envoi=historiser_apres_envoi(
+            data.email,
             type_email="avis_non_conformite",
-            destinataire_email=data.email,
             sujet=f"Avis de non-conformité - {avis.get('batiment_adresse', 'N/A')}",
             tenant_id=tenant.id,
             tenant_slug=tenant_slug,
             metadata={"numero_avis": avis.get('numero_avis'), "batiment": avis.get('batiment_adresse')}
-        )
+        ))
         
         # Mettre à jour le statut de l'avis
         await db.avis_non_conformite.update_one(
@@ -2027,7 +2028,7 @@ async def envoyer_avis_courriel(
         
         return {
             "message": f"Avis envoyé avec succès à {data.email}",
-            "email_id": email_response.get("id") if isinstance(email_response, dict) else str(email_response)
+            "email_id": None  # connu après l'envoi par le worker de notifications
         }
         
     except Exception as e:
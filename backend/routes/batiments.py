@@ -660,7 +660,7 @@ async def upload_batiment_photo(
         raise HTTPException(status_code=404, detail="Bâtiment non trouvé")
     
     # Upload vers Azure Blob Storage
-    from services.azure_storage import put_object, generate_sas_url, generate_storage_path
+    from services.azure_storage import put_object_async, generate_sas_url, generate_storage_path
     content = await file.read()
     content_type = file.content_type or "image/jpeg"
     
@@ -669,7 +669,7 @@ async def upload_batiment_photo(
         raise HTTPException(status_code=400, detail="Fichier trop volumineux (max 5MB)")
     
     blob_path = generate_storage_path(tenant.id, "batiments-photos", f"batiment_{batiment_id}.jpg")
-    put_object(blob_path, content, content_type)
+    await put_object_async(blob_path, content, content_type)
     sas_url = generate_sas_url(blob_path)
     
     await db.batiments.update_one(
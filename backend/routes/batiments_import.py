@@ -5,8 +5,6 @@ Supporte les formats CSV, XML (Rôle d'évaluation foncière du Québec) et ZIP
 """
 import csv
 import uuid
-import httpx
-import asyncio
 import xml.etree.ElementTree as ET
 import re
 import zipfile
@@ -38,7 +36,9 @@ from utils.address_utils import (
     generate_address_key,
     is_same_address
 )
-from services.azure_storage import put_object, get_content_type, generate_storage_path
+from utils.address_index import IndexAdresses
+from services.azure_storage import put_object_async, get_content_type, generate_storage_path
+from services.geocoding import geocoder_lot
 
 import logging
 logger = logging.getLogger(__name__)
@@ -260,61 +260,19 @@ def extract_batiment_from_ce_block(ce_block) -> Optional[Dict[str, Any]]:
 
 async def geocode_address(address: str, city: str, province: str = "Québec", country: str = "Canada") -> Tuple[Optional[float], Optional[float]]:
     """
-    Géolocalise une adresse en utilisant l'API Nominatim (OpenStreetMap).
+    Géolocalise une adresse (cache persistant puis Nominatim, voir services/geocoding.py).
     Retourne (latitude, longitude) ou (None, None) si non trouvé.
     """
-    if not address or not city:
-        return None, None
-    
-    try:
-        full_address = f"{address}, {city}, {province}, {country}"
-        
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                "https://nominatim.openstreetmap.org/search",
-                params={
-                    "q": full_address,
-                    "format": "json",
-                    "limit": 1
-                },
-                headers={
-                    "User-Agent": "ProFireManager/1.0"
-                },
-                timeout=10.0
-            )
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data and len(data) > 0:
-                    lat = float(data[0]["lat"])
-                    lon = float(data[0]["lon"])
-                    return lat, lon
-    except Exception as e:
-        print(f"Erreur géocodage pour '{address}, {city}': {e}")
-    
-    return None, None
+    resultats = await geocoder_lot(db, [{"address": address, "city": city, "province": province, "country": country}])
+    return resultats[0]
 
 
-async def geocode_batch(addresses: List[Dict[str, str]], delay: float = 1.0) -> List[Tuple[Optional[float], Optional[float]]]:
+async def geocode_batch(addresses: List[Dict[str, str]]) -> List[Tuple[Optional[float], Optional[float]]]:
     """
-    Géolocalise un lot d'adresses avec un délai entre chaque requête
-    pour respecter les limites de l'API Nominatim (1 req/sec).
+    Géolocalise un lot d'adresses. Les adresses déjà géocodées viennent du
+    cache ; les autres passent par la file limitée en débit du géocodeur.
     """
-    results = []
-    for addr_data in addresses:
-        lat, lon = await geocode_address(
-            addr_data.get("address", ""),
-            addr_data.get("city", ""),
-            addr_data.get("province", "Québec"),
-            addr_data.get("country", "Canada")
-        )
-        results.append((lat, lon))
-        
-        # Respecter la limite de rate de Nominatim
-        if delay > 0:
-            await asyncio.sleep(delay)
-    
-    return results
+    return await geocoder_lot(db, addresses)
 
 
 # ==================== MODÈLES ====================
@@ -457,12 +415,13 @@ async def _process_batiment_zip_from_path(file_path: str, filename: str, tenant,
         csv_text = csv_content.decode("latin-1")
     batiments = parse_profiremanager_csv(csv_text)
     existing_batiments = await db.batiments.find({"tenant_id": tenant.id}, {"_id": 0}).to_list(length=None)
+    index_batiments = IndexAdresses(existing_batiments)
     conflicts = []
     new_batiments = []
     for idx, bat in enumerate(batiments):
         address = bat.get("adresse_civique", "")
         city = bat.get("ville", "")
-        matches = find_matching_address(address, city, existing_batiments, 0.85)
+        matches = find_matching_address(address, city, index_batiments, 0.85)
         if matches:
             best_match, score = matches[0]
             differences = compare_building_fields(bat, best_match)
@@ -535,11 +494,12 @@ async def preview_import_batiments(
         rows = list(csv_reader)
         print(f"📄 Import CSV: {len(rows)} lignes dans le fichier")
     
-    # Charger tous les bâtiments existants
+    # Charger tous les bâtiments existants (indexés par numéro civique)
     existing_batiments = await db.batiments.find(
         {"tenant_id": tenant.id},
         {"_id": 0}
     ).to_list(length=None)
+    index_batiments = IndexAdresses(existing_batiments)
     
     conflicts = []
     new_batiments = []
@@ -604,7 +564,7 @@ async def preview_import_batiments(
             # Chercher les correspondances avec la nouvelle logique stricte
             # (même numéro + même rue + même ville = doublon)
             city = row.get('ville', '')
-            matches = find_matching_address(address, city, existing_batiments, similarity_threshold)
+            matches = find_matching_address(address, city, index_batiments, similarity_threshold)
             
             if matches:
                 # Conflit trouvé - prendre la meilleure correspondance
@@ -737,8 +697,7 @@ async def execute_import_batiments(
         if batiments_to_geocode:
             geocode_results = await geocode_batch(
                 [{"address": b["address"], "city": b["city"], "province": b["province"]} 
-                 for b in batiments_to_geocode],
-                delay=1.0  # 1 seconde entre chaque requête (limite Nominatim)
+                 for b in batiments_to_geocode]
             )
             
             # Insérer les bâtiments avec leurs coordonnées
@@ -1078,6 +1037,7 @@ async def preview_zip_import(
     existing_batiments = await db.batiments.find(
         {"tenant_id": tenant.id}, {"_id": 0}
     ).to_list(length=None)
+    index_batiments = IndexAdresses(existing_batiments)
 
     conflicts = []
     new_batiments = []
@@ -1086,7 +1046,7 @@ async def preview_zip_import(
     for idx, bat in enumerate(batiments):
         address = bat.get("adresse_civique", "")
         city = bat.get("ville", "")
-        matches = find_matching_address(address, city, existing_batiments, 0.85)
+        matches = find_matching_address(address, city, index_batiments, 0.85)
 
         if matches:
             best_match, score = matches[0]
@@ -1189,8 +1149,7 @@ async def execute_zip_import(
         if batiments_to_geocode:
             geocode_results = await geocode_batch(
                 [{"address": b["address"], "city": b["city"], "province": b["province"]}
-                 for b in batiments_to_geocode],
-                delay=1.0,
+                 for b in batiments_to_geocode]
             )
             for i, bat_info in enumerate(batiments_to_geocode):
                 try:
@@ -1287,7 +1246,7 @@ async def execute_zip_import(
                     file_data = zf.read(mf["zip_path"])
                     content_type = get_content_type(mf["filename"])
                     storage_path = generate_storage_path(tenant.id, "batiments", mf["filename"])
-                    result = put_object(storage_path, file_data, content_type)
+                    result = await put_object_async(storage_path, file_data, content_type)
 
                     # Trouver le bâtiment associé
                     associated_bat_id = find_closest_batiment(mf["file_id"])
@@ -20,8 +20,10 @@ import json
 import stripe
 import resend
 
+from services.notification_dispatcher import soumettre_email
 from routes.dependencies import (
     db,
+    invalidate_tenant_cache,
     get_current_user,
     get_super_admin,
     User,
@@ -229,6 +231,7 @@ async def create_stripe_customer_for_tenant(
             {"id": tenant_id},
             {"$set": {"stripe_customer_id": customer.id}}
         )
+        invalidate_tenant_cache(tenant_id=tenant_id)
         
         logger.info(f"✅ Client Stripe créé: {customer.id} pour tenant {tenant_id}")
         return {"success": True, "customer_id": customer.id}
@@ -318,6 +321,7 @@ async def create_subscription_for_tenant(
                 "next_billing_date": datetime.fromtimestamp(subscription.current_period_end).strftime("%Y-%m-%d")
             }}
         )
+        invalidate_tenant_cache(tenant_id=tenant_id)
         
         return {
             "success": True,
@@ -388,9 +392,10 @@ async def send_payment_reminder(
     try:
         resend.api_key = os.environ.get("RESEND_API_KEY")
         if resend.api_key:
-            resend.Emails.send({
+            from routes.emails_history import historiser_apres_envoi
+            soumettre_email({
                 "from": "ProFireManager <noreply@profiremanager.ca>",
-                "to": [tenant.email_contact],
+                "to": [tenant["email_contact"]],
                 "subject": "Rappel de paiement - ProFireManager",
                 "html": f"""
                 <h2>Rappel de paiement</h2>
@@ -399,20 +404,16 @@ async def send_payment_reminder(
                 <p>Veuillez régulariser votre situation dans les plus brefs délais pour éviter toute interruption de service.</p>
                 <p>Cordialement,<br>L'équipe ProFireManager</p>
                 """
-            })
-            
-            # Log email
-            from routes.emails_history import log_email_sent
-            await log_email_sent(
+            }, apres_envoi=historiser_apres_envoi(
+                tenant["email_contact"],
                 type_email="rappel_paiement_manuel",
-                destinataire_email=tenant.email_contact,
                 destinataire_nom=tenant.get("nom"),
                 sujet="Rappel de paiement - ProFireManager",
                 tenant_id=tenant_id,
                 tenant_slug=tenant.get("slug")
-            )
+            ))
             
-            logger.info(f"📧 Rappel envoyé à {tenant['email_contact']} pour tenant {tenant_id}")
+            logger.info(f"📧 Rappel mis en file pour {tenant['email_contact']} (tenant {tenant_id})")
             return {"success": True, "message": f"Rappel envoyé à {tenant['email_contact']}"}
         else:
             return {"success": False, "message": "Clé Resend non configurée"}
@@ -470,6 +471,7 @@ async def stripe_webhook(request: Request):
                     {"id": tenant_id},
                     {"$set": update_data}
                 )
+                invalidate_tenant_cache(tenant_id=tenant_id)
                 logger.info(f"✅ Checkout complété pour tenant {tenant_id}, customer: {customer_id}")
         
         elif event_type == "invoice.paid":
@@ -492,6 +494,7 @@ async def stripe_webhook(request: Request):
                         "actif": True  # Réactiver si était suspendu
                     }}
                 )
+                invalidate_tenant_cache(tenant_id=tenant_id)
                 logger.info(f"✅ Paiement reçu pour tenant {tenant_id}")
                 
         elif event_type == "invoice.payment_failed":
@@ -516,6 +519,7 @@ async def stripe_webhook(request: Request):
                             "payment_failed_date": datetime.now(timezone.utc).strftime("%Y-%m-%d")
                         }}
                     )
+                    invalidate_tenant_cache(tenant_id=tenant_id)
                 logger.warning(f"⚠️ Échec paiement pour tenant {tenant_id}")
                 
         elif event_type == "customer.subscription.deleted":
@@ -535,6 +539,7 @@ async def stripe_webhook(request: Request):
                         "stripe_subscription_id": None
                     }}
                 )
+                invalidate_tenant_cache(tenant_id=tenant_id)
                 logger.info(f"❌ Abonnement annulé pour tenant {tenant_id}")
         
         return {"received": True}
@@ -759,6 +764,7 @@ async def create_checkout_session(
                 {"id": tenant_id},
                 {"$set": {"stripe_customer_id": customer_id}}
             )
+            invalidate_tenant_cache(tenant_id=tenant_id)
         
         checkout_params = {
             "mode": "subscription",
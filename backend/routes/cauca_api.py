@@ -21,7 +21,7 @@ from routes.dependencies import (
     SuperAdmin
 )
 from services.cauca_api_service import get_cauca_service
-from services.azure_storage import put_object
+from services.azure_storage import put_object_async
 
 router = APIRouter(tags=["CAUCA API CAD Transfert"])
 logger = logging.getLogger(__name__)
@@ -163,9 +163,12 @@ async def update_cauca_config(
     )
     
     # Si la config est désactivée, arrêter le polling
+    cauca_service = get_cauca_service()
     if config_data.actif is False:
-        cauca_service = get_cauca_service()
         await cauca_service.stop_polling(tenant.id)
+    else:
+        # Nouveau token / URL pris en compte au prochain cycle
+        await cauca_service.invalider_config(tenant.id)
     
     logger.info(f"Configuration CAUCA mise à jour pour tenant {tenant.slug} par admin {admin.email}")
     
@@ -214,7 +217,7 @@ async def upload_certificate(
     
     # Stocker dans Azure Blob Storage
     blob_name = f"profiremanager/{tenant.id}/cauca/certificate.pem"
-    put_object(blob_name, cert_content, "application/x-pem-file")
+    await put_object_async(blob_name, cert_content, "application/x-pem-file")
     
     # Mettre à jour la config
     await db.cauca_configs.update_one(
@@ -225,6 +228,9 @@ async def upload_certificate(
         }}
     )
     
+    # Nouveau contexte SSL et nouvelle connexion au prochain cycle
+    await get_cauca_service().invalider_config(tenant.id)
+    
     logger.info(f"Certificat CAUCA uploadé pour tenant {tenant.slug}")
     
     return {"success": True, "message": "Certificat SSL uploadé avec succès"}
@@ -248,7 +254,7 @@ async def upload_private_key(
     
     # Stocker dans Azure Blob Storage
     blob_name = f"profiremanager/{tenant.id}/cauca/private_key.pem"
-    put_object(blob_name, key_content, "application/x-pem-file")
+    await put_object_async(blob_name, key_content, "application/x-pem-file")
     
     # Mettre à jour la config
     await db.cauca_configs.update_one(
@@ -259,6 +265,9 @@ async def upload_private_key(
         }}
     )
     
+    # Nouveau contexte SSL et nouvelle connexion au prochain cycle
+    await get_cauca_service().invalider_config(tenant.id)
+    
     logger.info(f"Clé privée CAUCA uploadée pour tenant {tenant.slug}")
     
     return {"success": True, "message": "Clé privée SSL uploadée avec succès"}
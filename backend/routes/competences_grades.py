@@ -36,6 +36,7 @@ import logging
 
 from routes.dependencies import (
     db,
+    invalidate_user_cache,
     get_current_user,
     get_tenant_from_slug,
     clean_mongo_doc,
@@ -241,6 +242,7 @@ async def clean_invalid_competences(
                 {"id": user["id"], "tenant_id": tenant.id},
                 {"$set": {"competences": valid_user_competences}}
             )
+            invalidate_user_cache(user["id"])
             
             logger.info(f"🧹 Nettoyage: {user['prenom']} {user['nom']} - {removed} compétence(s) invalide(s) supprimée(s)")
     
@@ -744,6 +746,7 @@ async def update_echelon_embauche(
         {"id": user_id, "tenant_id": tenant.id},
         {"$set": {"echelon_embauche": echelon_data.echelon_embauche}}
     )
+    invalidate_user_cache(user_id)
     
     return {
         "message": f"Échelon d'embauche mis à jour à {echelon_data.echelon_embauche}",
@@ -34,6 +34,8 @@ from routes.dependencies import (
 
 # Import WebSocket pour synchronisation temps réel
 from routes.websocket import broadcast_conge_update
+from services.hours_ledger import invalider_ledger_heures
+from services.coverage_table import invalider_couverture
 
 router = APIRouter(tags=["Demandes de Congé"])
 logger = logging.getLogger(__name__)
@@ -168,6 +170,8 @@ async def create_demande_conge(
         })
         
         if deleted_assignations.deleted_count > 0:
+            invalider_ledger_heures(tenant.id)
+            await invalider_couverture(db, tenant.id, demande.date_debut, demande.date_fin)
             logger.info(f"🗑️ {deleted_assignations.deleted_count} assignation(s) supprimée(s) pour {demandeur_id} ({demande.date_debut} → {demande.date_fin})")
             
             # Broadcaster la mise à jour du planning
@@ -333,6 +337,8 @@ async def approuver_demande_conge(
         })
         
         if deleted_assignations.deleted_count > 0:
+            invalider_ledger_heures(tenant.id)
+            await invalider_couverture(db, tenant.id, date_debut_str, date_fin_str)
             logger.info(f"🗑️ {deleted_assignations.deleted_count} assignation(s) supprimée(s) pour {demande['demandeur_id']} ({date_debut_str} → {date_fin_str})")
             
             # Broadcaster la mise à jour du planning pour que le frontend se rafraîchisse
@@ -22,6 +22,7 @@ from routes.dependencies import (
     require_permission,
     user_has_module_action
 )
+from services.coverage_table import compter_creneaux, obtenir_couverture, resumer_couverture
 
 router = APIRouter(tags=["Dashboard"])
 logger = logging.getLogger(__name__)
@@ -183,6 +184,7 @@ async def get_dashboard_donnees_completes(tenant_slug: str, current_user: User =
         # Obtenir les jours du mois où chaque type de garde s'applique
         total_creneaux_requis = 0
         total_creneaux_couverts = 0
+        assignes_par_creneau = compter_creneaux(assignations)
         
         for tg in types_garde:
             type_garde_id = tg.get("id")
@@ -199,7 +201,7 @@ async def get_dashboard_donnees_completes(tenant_slug: str, current_user: User =
                     
                     # Compter combien d'assignations couvrent ce créneau
                     date_str = current_date.strftime("%Y-%m-%d")
-                    nb_assignes = sum(1 for a in assignations if a.get("type_garde_id") == type_garde_id and a.get("date") == date_str)
+                    nb_assignes = assignes_par_creneau.get((date_str, type_garde_id), 0)
                     total_creneaux_couverts += min(nb_assignes, personnel_requis)
                 
                 current_date += timedelta(days=1)
@@ -683,17 +685,6 @@ async def get_couverture_precise(
     if not can_view_planning:
         return {"taux_couverture": 0, "message": "Accès réservé aux administrateurs"}
     
-    # Mapping des jours: Python weekday() -> nom anglais utilisé dans jours_application
-    JOURS_MAPPING = {
-        0: "monday",
-        1: "tuesday", 
-        2: "wednesday",
-        3: "thursday",
-        4: "friday",
-        5: "saturday",
-        6: "sunday"
-    }
-    
     # Noms des mois en français
     MOIS_FR = {
         1: "Janvier", 2: "Février", 3: "Mars", 4: "Avril",
@@ -705,53 +696,6 @@ async def get_couverture_precise(
         """Retourne le label du mois en français (ex: 'Avril 2026')"""
         return f"{MOIS_FR[date_obj.month]} {date_obj.year}"
     
-    def calculer_couverture_mois(debut_mois, fin_mois, types_garde, assignations):
-        """Calcule la couverture pour une période donnée"""
-        total_creneaux_requis = 0
-        total_creneaux_couverts = 0
-        
-        for tg in types_garde:
-            type_garde_id = tg.get("id")
-            personnel_requis = tg.get("personnel_requis", 1)
-            jours_application = tg.get("jours_application", [])  # Ex: ["monday", "tuesday", ...]
-            
-            # Compter les jours actifs pour ce type de garde dans le mois
-            current_date = debut_mois
-            while current_date <= fin_mois:
-                jour_semaine = current_date.weekday()
-                jour_nom = JOURS_MAPPING.get(jour_semaine)
-                
-                # Si pas de jours_application définis, la garde s'applique tous les jours
-                is_applicable = (not jours_application) or (jour_nom in jours_application)
-                
-                if is_applicable:
-                    # Ce jour nécessite ce type de garde
-                    total_creneaux_requis += personnel_requis
-                    
-                    # Compter combien d'assignations couvrent ce créneau
-                    date_str = current_date.strftime("%Y-%m-%d")
-                    nb_assignes = sum(1 for a in assignations 
-                                     if a.get("type_garde_id") == type_garde_id 
-                                     and a.get("date", "").startswith(date_str))
-                    total_creneaux_couverts += min(nb_assignes, personnel_requis)
-                
-                current_date += timedelta(days=1)
-        
-        # Calculer le taux
-        if total_creneaux_requis > 0:
-            taux = round((total_creneaux_couverts / total_creneaux_requis) * 100, 1)
-        else:
-            taux = 100.0
-        
-        postes_a_pourvoir = max(0, total_creneaux_requis - total_creneaux_couverts)
-        
-        return {
-            "taux": taux,
-            "creneaux_requis": total_creneaux_requis,
-            "creneaux_couverts": total_creneaux_couverts,
-            "postes_a_pourvoir": postes_a_pourvoir
-        }
-    
     # Dates du mois en cours
     today = datetime.now(timezone.utc)
     debut_mois_courant = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
@@ -762,22 +706,23 @@ async def get_couverture_precise(
     fin_mois_suivant = (debut_mois_suivant + timedelta(days=32)).replace(day=1) - timedelta(days=1)
     
     # Récupérer les types de garde
-    types_garde = await db.types_garde.find({"tenant_id": tenant.id}).to_list(1000)
-    
-    # Récupérer les assignations pour les 2 mois
-    assignations = await db.assignations.find({
-        "tenant_id": tenant.id,
-        "date": {
-            "$gte": debut_mois_courant.strftime("%Y-%m-%d"),
-            "$lte": fin_mois_suivant.strftime("%Y-%m-%d")
-        }
-    }).to_list(20000)
+    types_garde = await db.types_garde.find(
+        {"tenant_id": tenant.id},
+        {"_id": 0, "id": 1, "personnel_requis": 1, "jours_application": 1}
+    ).to_list(1000)
+    
+    # Personnel assigné par créneau pour les 2 mois (table de couverture)
+    assignes = await obtenir_couverture(
+        db, tenant.id,
+        debut_mois_courant.strftime("%Y-%m-%d"),
+        fin_mois_suivant.strftime("%Y-%m-%d")
+    )
     
     # Calculer pour le mois en cours
-    mois_courant = calculer_couverture_mois(debut_mois_courant, fin_mois_courant, types_garde, assignations)
+    mois_courant = resumer_couverture(types_garde, debut_mois_courant.date(), fin_mois_courant.date(), assignes)
     
     # Calculer pour le mois suivant
-    mois_suivant = calculer_couverture_mois(debut_mois_suivant, fin_mois_suivant, types_garde, assignations)
+    mois_suivant = resumer_couverture(types_garde, debut_mois_suivant.date(), fin_mois_suivant.date(), assignes)
     
     return {
         "taux_couverture": mois_courant["taux"],
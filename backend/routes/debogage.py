@@ -22,6 +22,8 @@ from routes.dependencies import (
     SuperAdmin,
     clean_mongo_doc
 )
+from routes.emails_history import historiser_apres_envoi
+from services.notification_dispatcher import soumettre_email
 
 router = APIRouter(tags=["Débogage - Bugs & Features"])
 logger = logging.getLogger(__name__)
@@ -172,19 +174,12 @@ def send_debogage_notification_email(
                     "subject": f"{type_label}: {titre}",
                     "html": html_content
                 }
-                response = resend.Emails.send(params)
-                logger.info(f"Email de notification envoyé à {admin_email} via Resend (ID: {response.get('id', 'N/A')})")
-                # Log email
-                try:
-                    from routes.emails_history import log_email_sent
-                    import asyncio
-                    asyncio.create_task(log_email_sent(
-                        type_email="notification_debogage",
-                        destinataire_email=admin_email,
-                        sujet=f"{type_label}: {titre}"
-                    ))
-                except:
-                    pass
+                soumettre_email(params, apres_envoi=historiser_apres_envoi(
+                    admin_email,
+                    type_email="notification_debogage",
+                    sujet=f"{type_label}: {titre}"
+                ))
+                logger.info(f"Email de notification mis en file pour {admin_email}")
             except Exception as e:
                 logger.error(f"Erreur lors de l'envoi de l'email à {admin_email}: {e}")
                 
@@ -649,9 +644,9 @@ async def upload_debug_image(
         mime_type = file.content_type or 'image/png'
         ext = file.filename.rsplit(".", 1)[-1].lower() if file.filename and "." in file.filename else "png"
         
-        from services.azure_storage import put_object, generate_sas_url, generate_storage_path
+        from services.azure_storage import put_object_async, generate_sas_url, generate_storage_path
         blob_path = generate_storage_path("admin", "debug-images", f"debug.{ext}")
-        put_object(blob_path, contents, mime_type)
+        await put_object_async(blob_path, contents, mime_type)
         sas_url = generate_sas_url(blob_path)
         
         return {"url": sas_url}
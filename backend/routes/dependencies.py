@@ -19,8 +19,10 @@ from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
 from pathlib import Path
+from contextvars import ContextVar
 from dotenv import load_dotenv
 import os
+import copy
 import jwt
 import uuid
 import logging
@@ -28,6 +30,8 @@ import re
 import bcrypt
 from functools import lru_cache
 
+from services.cache_invalidation import TTLCache, get_bus_invalidation
+
 # Charger les variables d'environnement AVANT toute autre configuration
 ROOT_DIR = Path(__file__).parent.parent
 load_dotenv(ROOT_DIR / '.env')
@@ -168,26 +172,184 @@ class ValidationCompetenceCreate(BaseModel):
     duree_heures: float = 0  # Durée de la formation en heures
 
 
-# ==================== CACHE TENANT ====================
+# ==================== CACHE TENANT / UTILISATEUR ====================
+
+# Chaque requête authentifiée résout son tenant (slug) et son utilisateur (JWT).
+# Les documents sont gardés en cache (LRU + TTL) et partagés entre
+# routes/dependencies.py et server.py. Les écritures appellent
+# invalidate_tenant_cache / invalidate_user_cache, qui passent par le bus
+# d'invalidation (services/cache_invalidation.py) pour atteindre tous les workers.
+TENANT_CACHE_DURATION = int(os.environ.get("TENANT_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_DURATION = int(os.environ.get("USER_CACHE_TTL_SECONDS", "15"))
+CANAL_INVALIDATION_TENANTS = "tenants"
+CANAL_INVALIDATION_UTILISATEURS = "utilisateurs"
 
-# Cache simple pour les tenants (évite les requêtes répétées)
-_tenant_cache: Dict[str, Tenant] = {}
-_tenant_cache_ttl: Dict[str, float] = {}
-TENANT_CACHE_DURATION = 300  # 5 minutes
+# Structure: {slug: {"doc": dict, "modeles": {classe_modele: instance}}}
+_tenant_cache = TTLCache(max_entries=512, ttl_seconds=TENANT_CACHE_DURATION)
+# Structure: {user_id: dict} et {("super_admin", id): dict}
+_user_cache = TTLCache(max_entries=4096, ttl_seconds=USER_CACHE_DURATION)
 
 
-def invalidate_tenant_cache(tenant_slug: str = None):
+def _evincer_tenants(cle: Optional[dict]):
+    if not cle:
+        _tenant_cache.clear()
+        return
+    if cle.get("slug"):
+        _tenant_cache.pop(cle["slug"])
+    if cle.get("id"):
+        _tenant_cache.invalider_si(lambda slug, entree: entree["doc"].get("id") == cle["id"])
+
+
+def _evincer_utilisateurs(cle: Optional[dict]):
+    if not cle or not cle.get("id"):
+        _user_cache.clear()
+        return
+    _user_cache.pop(cle["id"])
+    _user_cache.pop(("super_admin", cle["id"]))
+
+
+get_bus_invalidation().abonner(CANAL_INVALIDATION_TENANTS, _evincer_tenants)
+get_bus_invalidation().abonner(CANAL_INVALIDATION_UTILISATEURS, _evincer_utilisateurs)
+
+
+def invalidate_tenant_cache(tenant_slug: str = None, tenant_id: str = None):
     """
-    Invalide le cache tenant.
-    Si tenant_slug est fourni, invalide seulement ce tenant.
+    Invalide le cache tenant (sur tous les workers).
+    Si tenant_slug ou tenant_id est fourni, invalide seulement ce tenant.
     Sinon, invalide tout le cache.
     """
-    if tenant_slug:
-        _tenant_cache.pop(tenant_slug, None)
-        _tenant_cache_ttl.pop(tenant_slug, None)
-    else:
-        _tenant_cache.clear()
-        _tenant_cache_ttl.clear()
+    cle = {"slug": tenant_slug, "id": tenant_id} if (tenant_slug or tenant_id) else None
+    get_bus_invalidation().publier(CANAL_INVALIDATION_TENANTS, cle)
+
+
+def invalidate_user_cache(user_id: str = None):
+    """
+    Invalide le cache utilisateur (sur tous les workers).
+    À appeler après toute modification d'un utilisateur (rôle, statut, mot de passe...).
+    Sans user_id (écritures de masse), invalide tout le cache.
+    """
+    get_bus_invalidation().publier(CANAL_INVALIDATION_UTILISATEURS, {"id": user_id} if user_id else None)
+
+
+# ==================== CACHE PERMISSIONS ====================
+
+# Permissions compilées par type d'accès personnalisé (LRU + TTL) pour que les
+# vérifications RBAC ne fassent pas un find_one access_types à chaque appel.
+# Les modifications de types d'accès passent par le bus d'invalidation
+# (canal "permissions") pour atteindre tous les workers.
+# Un mémo par requête (voir PermissionsMemoMiddleware dans server.py) évite en plus
+# de consulter le cache plusieurs fois pour le même type d'accès pendant une requête.
+PERMISSIONS_CACHE_DURATION = int(os.environ.get("PERMISSIONS_CACHE_TTL_SECONDS", "60"))
+PERMISSIONS_CACHE_MAX_ENTRIES = 1024
+CANAL_INVALIDATION_PERMISSIONS = "permissions"
+
+# Structure: {(tenant_id, access_type_id): PermissionsCompilees ou None}
+_permissions_cache = TTLCache(max_entries=PERMISSIONS_CACHE_MAX_ENTRIES, ttl_seconds=PERMISSIONS_CACHE_DURATION)
+_NON_CALCULEES = object()
+_permissions_requete: ContextVar[Optional[dict]] = ContextVar("permissions_requete", default=None)
+
+
+class PermissionsCompilees:
+    """Permissions d'un type d'accès (ou d'un rôle) précompilées en ensembles"""
+    
+    __slots__ = ("full_access", "modules")
+    
+    def __init__(self, permissions: dict):
+        self.full_access = bool(permissions.get("is_full_access"))
+        # Structure: {module_id: (access, {actions}, {tab_id: (access, {actions})})}
+        self.modules = {}
+        for module_id, module_perms in (permissions.get("modules") or {}).items():
+            tabs = {
+                tab_id: (tab_perms.get("access"), frozenset(tab_perms.get("actions") or ()))
+                for tab_id, tab_perms in (module_perms.get("tabs") or {}).items()
+            }
+            self.modules[module_id] = (
+                bool(module_perms.get("access")),
+                frozenset(module_perms.get("actions") or ()),
+                tabs
+            )
+    
+    def a_acces(self, module_id: str) -> bool:
+        if self.full_access:
+            return True
+        module = self.modules.get(module_id)
+        return bool(module and module[0])
+    
+    def a_action(self, module_id: str, action: str, tab_id: str = None) -> bool:
+        if self.full_access:
+            return True
+        module = self.modules.get(module_id)
+        if not module or not module[0]:
+            return False
+        
+        # Vérifier les permissions de l'onglet si spécifié
+        if tab_id:
+            tab = module[2].get(tab_id)
+            if tab:
+                tab_access, tab_actions = tab
+                if tab_access == False:
+                    return False
+                if tab_actions:
+                    return action in tab_actions
+        
+        return action in module[1]
+
+
+def demarrer_memo_permissions():
+    """Ouvre le mémo de permissions de la requête courante (retourne le jeton de reset)"""
+    return _permissions_requete.set({})
+
+
+def terminer_memo_permissions(jeton):
+    _permissions_requete.reset(jeton)
+
+
+def _evincer_permissions(cle: Optional[dict]):
+    if not cle:
+        _permissions_cache.clear()
+        return
+    tenant_id, access_type_id = cle.get("tenant_id"), cle.get("access_type_id")
+    _permissions_cache.invalider_si(
+        lambda c, _: (tenant_id is None or c[0] == tenant_id) and (access_type_id is None or c[1] == access_type_id)
+    )
+
+
+get_bus_invalidation().abonner(CANAL_INVALIDATION_PERMISSIONS, _evincer_permissions)
+
+
+def invalider_cache_permissions(tenant_id: str = None, access_type_id: str = None):
+    """
+    Invalide les permissions compilées (sur tous les workers).
+    Si access_type_id est fourni, invalide seulement ce type d'accès ;
+    si seul tenant_id est fourni, tous les types d'accès du tenant ;
+    sinon tout le cache.
+    """
+    cle = {"tenant_id": tenant_id, "access_type_id": access_type_id} if (tenant_id or access_type_id) else None
+    get_bus_invalidation().publier(CANAL_INVALIDATION_PERMISSIONS, cle)
+    memo = _permissions_requete.get()
+    if memo is not None:
+        memo.clear()
+
+
+async def get_permissions_type_acces(tenant_id: str, access_type_id: str) -> Optional[PermissionsCompilees]:
+    """Permissions compilées d'un type d'accès personnalisé (None s'il n'existe pas)"""
+    cle = (tenant_id, access_type_id)
+    memo = _permissions_requete.get()
+    if memo is not None and cle in memo:
+        return memo[cle]
+    
+    permissions = _permissions_cache.get(cle, _NON_CALCULEES)
+    if permissions is _NON_CALCULEES:
+        access_type = await db.access_types.find_one(
+            {"id": access_type_id, "tenant_id": tenant_id},
+            {"_id": 0, "permissions": 1}
+        )
+        permissions = PermissionsCompilees(access_type.get("permissions") or {}) if access_type else None
+        _permissions_cache.set(cle, permissions)
+    
+    if memo is not None:
+        memo[cle] = permissions
+    return permissions
 
 
 # ==================== FONCTIONS UTILITAIRES ====================
@@ -219,32 +381,59 @@ def clean_mongo_doc(doc: dict) -> dict:
     return cleaned
 
 
+async def resoudre_tenant(tenant_slug: str, modele=None):
+    """
+    Résout un tenant par son slug (document en cache, partagé par tous les modèles).
+    `modele` permet à server.py d'obtenir son propre modèle Tenant depuis le même cache.
+    Lève une HTTPException 404 si non trouvé.
+    """
+    modele = modele or Tenant
+    entree = _tenant_cache.get(tenant_slug)
+    if entree is None:
+        tenant_doc = await db.tenants.find_one({"slug": tenant_slug}, {"_id": 0})
+        if not tenant_doc:
+            raise HTTPException(status_code=404, detail=f"Caserne '{tenant_slug}' non trouvée")
+        entree = {"doc": clean_mongo_doc(tenant_doc), "modeles": {}}
+        _tenant_cache.set(tenant_slug, entree)
+    
+    instance = entree["modeles"].get(modele)
+    if instance is None:
+        instance = modele(**copy.deepcopy(entree["doc"]))
+        entree["modeles"][modele] = instance
+    return instance
+
+
 async def get_tenant_from_slug(tenant_slug: str) -> Tenant:
     """
     Récupère un tenant par son slug avec mise en cache.
     Lève une HTTPException 404 si non trouvé.
     """
-    import time
-    
-    # Vérifier le cache
-    now = time.time()
-    if tenant_slug in _tenant_cache:
-        if now - _tenant_cache_ttl.get(tenant_slug, 0) < TENANT_CACHE_DURATION:
-            return _tenant_cache[tenant_slug]
-    
-    # Requête DB
-    tenant_doc = await db.tenants.find_one({"slug": tenant_slug})
-    
-    if not tenant_doc:
-        raise HTTPException(status_code=404, detail=f"Caserne '{tenant_slug}' non trouvée")
-    
-    tenant = Tenant(**clean_mongo_doc(tenant_doc))
-    
-    # Mettre en cache
-    _tenant_cache[tenant_slug] = tenant
-    _tenant_cache_ttl[tenant_slug] = now
-    
-    return tenant
+    return await resoudre_tenant(tenant_slug, Tenant)
+
+
+async def charger_utilisateur(user_id: str) -> Optional[dict]:
+    """Document utilisateur (copie) depuis le cache, ou None s'il n'existe pas"""
+    user_doc = _user_cache.get(user_id)
+    if user_doc is None:
+        user_doc = await db.users.find_one({"id": user_id}, {"_id": 0})
+        if not user_doc:
+            return None
+        user_doc = clean_mongo_doc(user_doc)
+        _user_cache.set(user_id, user_doc)
+    return copy.deepcopy(user_doc)
+
+
+async def charger_super_admin(admin_id: str) -> Optional[dict]:
+    """Document super-admin (copie) depuis le cache, ou None s'il n'existe pas"""
+    cle = ("super_admin", admin_id)
+    admin_doc = _user_cache.get(cle)
+    if admin_doc is None:
+        admin_doc = await db.super_admins.find_one({"id": admin_id}, {"_id": 0})
+        if not admin_doc:
+            return None
+        admin_doc = clean_mongo_doc(admin_doc)
+        _user_cache.set(cle, admin_doc)
+    return copy.deepcopy(admin_doc)
 
 
 async def get_current_user(
@@ -268,7 +457,7 @@ async def get_current_user(
         
         if is_super_admin:
             # Super-admin connecté à un tenant - créer un User virtuel
-            super_admin_doc = await db.super_admins.find_one({"id": user_id})
+            super_admin_doc = await charger_super_admin(user_id)
             if not super_admin_doc:
                 raise HTTPException(status_code=401, detail="Super admin non trouvé")
             
@@ -284,12 +473,12 @@ async def get_current_user(
             )
         
         # Utilisateur normal - récupérer depuis la DB
-        user_doc = await db.users.find_one({"id": user_id})
+        user_doc = await charger_utilisateur(user_id)
         
         if not user_doc:
             raise HTTPException(status_code=401, detail="Utilisateur non trouvé")
         
-        return User(**clean_mongo_doc(user_doc))
+        return User(**user_doc)
         
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expiré")
@@ -560,25 +749,20 @@ def send_welcome_email(user_email: str, user_name: str, user_role: str, temp_pas
         <p>Nous vous recommandons de changer votre mot de passe après la première connexion.</p>
         """
         
-        resend.Emails.send({
+        from routes.emails_history import historiser_apres_envoi
+        from services.notification_dispatcher import soumettre_email
+        soumettre_email({
             "from": "ProFireManager <noreply@profiremanager.ca>",
             "to": [user_email],
             "subject": "Bienvenue sur ProFireManager",
             "html": html_content
-        })
-        # Log email
-        try:
-            from routes.emails_history import log_email_sent
-            import asyncio
-            asyncio.create_task(log_email_sent(
-                type_email="bienvenue",
-                destinataire_email=user_email,
-                destinataire_nom=user_name,
-                sujet="Bienvenue sur ProFireManager",
-                tenant_slug=tenant_slug
-            ))
-        except:
-            pass
+        }, apres_envoi=historiser_apres_envoi(
+            user_email,
+            type_email="bienvenue",
+            destinataire_nom=user_name,
+            sujet="Bienvenue sur ProFireManager",
+            tenant_slug=tenant_slug
+        ))
         return True
     except Exception as e:
         logger.error(f"Erreur envoi email de bienvenue: {e}")
@@ -609,24 +793,19 @@ def send_super_admin_welcome_email(user_email: str, user_name: str, temp_passwor
         <p><strong>Important:</strong> Changez votre mot de passe dès votre première connexion.</p>
         """
         
-        resend.Emails.send({
+        from routes.emails_history import historiser_apres_envoi
+        from services.notification_dispatcher import soumettre_email
+        soumettre_email({
             "from": "ProFireManager <noreply@profiremanager.ca>",
             "to": [user_email],
             "subject": "Accès Super Admin - ProFireManager",
             "html": html_content
-        })
-        # Log email
-        try:
-            from routes.emails_history import log_email_sent
-            import asyncio
-            asyncio.create_task(log_email_sent(
-                type_email="bienvenue_super_admin",
-                destinataire_email=user_email,
-                destinataire_nom=user_name,
-                sujet="Accès Super Admin - ProFireManager"
-            ))
-        except:
-            pass
+        }, apres_envoi=historiser_apres_envoi(
+            user_email,
+            type_email="bienvenue_super_admin",
+            destinataire_nom=user_name,
+            sujet="Accès Super Admin - ProFireManager"
+        ))
         return True
     except Exception as e:
         logger.error(f"Erreur envoi email super admin: {e}")
@@ -728,8 +907,6 @@ async def creer_notification(
                     user_prenom=user.get("prenom", ""),
                     tenant_slug=tenant_slug
                 )
-                # Délai pour respecter le rate limit de Resend (2 req/sec)
-                await asyncio.sleep(0.6)
             except Exception as e:
                 logger.warning(f"Erreur envoi email notification à {user.get('email')}: {e}")
     
@@ -1142,6 +1319,27 @@ async def get_delegations_actives(tenant_id: str) -> List[dict]:
 # Import DEFAULT_PERMISSIONS pour la fonction de vérification des permissions
 from routes.access_types import DEFAULT_PERMISSIONS
 
+@lru_cache(maxsize=None)
+def _permissions_role(role: str) -> PermissionsCompilees:
+    """Permissions par défaut d'un rôle système, compilées une seule fois"""
+    return PermissionsCompilees(DEFAULT_PERMISSIONS.get(role, DEFAULT_PERMISSIONS.get("employe", {})))
+
+
+async def _permissions_utilisateur(tenant_id: str, user) -> PermissionsCompilees:
+    """Type d'accès personnalisé de l'utilisateur s'il existe, sinon permissions par défaut du rôle"""
+    if isinstance(user, dict):
+        user_role, access_type_id = user.get("role"), user.get("access_type_id")
+    else:
+        user_role, access_type_id = getattr(user, "role", None), getattr(user, "access_type_id", None)
+    
+    if access_type_id:
+        permissions = await get_permissions_type_acces(tenant_id, access_type_id)
+        if permissions is not None:
+            return permissions
+    
+    return _permissions_role(user_role)
+
+
 async def user_has_module_access(tenant_id: str, user, module_id: str) -> bool:
     """
     Vérifie si un utilisateur a accès à un module.
@@ -1158,33 +1356,17 @@ async def user_has_module_access(tenant_id: str, user, module_id: str) -> bool:
     if user_role == "admin":
         return True
     
-    user_dict = user.model_dump() if hasattr(user, 'model_dump') else (user.dict() if hasattr(user, 'dict') else user)
-    access_type_id = user_dict.get("access_type_id")
-    
-    if access_type_id:
-        access_type = await db.access_types.find_one(
-            {"id": access_type_id, "tenant_id": tenant_id},
-            {"_id": 0}
-        )
-        if access_type:
-            permissions = access_type.get("permissions", {})
-            if permissions.get("is_full_access"):
-                return True
-            module_perms = permissions.get("modules", {}).get(module_id, {})
-            return module_perms.get("access", False)
-    
-    default_perms = DEFAULT_PERMISSIONS.get(user_role, DEFAULT_PERMISSIONS.get("employe", {}))
-    if default_perms.get("is_full_access"):
-        return True
-    
-    module_perms = default_perms.get("modules", {}).get(module_id, {})
-    return module_perms.get("access", False)
+    permissions = await _permissions_utilisateur(tenant_id, user)
+    return permissions.a_acces(module_id)
 
 
 async def user_has_module_action(tenant_id: str, user, module_id: str, action: str, tab_id: str = None) -> bool:
     """
     Vérifie si un utilisateur a une action spécifique sur un module ou un onglet.
     
+    Les permissions sont compilées et mises en cache par type d'accès
+    (voir CACHE PERMISSIONS), sans requête MongoDB dans le cas courant.
+    
     Args:
         tenant_id: ID du tenant
         user: Utilisateur (objet User ou dict avec id, role, access_type_id)
@@ -1200,52 +1382,8 @@ async def user_has_module_action(tenant_id: str, user, module_id: str, action: s
     if user_role == "admin":
         return True
     
-    # Vérifier si l'utilisateur a un type d'accès personnalisé
-    user_dict = user.model_dump() if hasattr(user, 'model_dump') else (user.dict() if hasattr(user, 'dict') else user)
-    access_type_id = user_dict.get("access_type_id")
-    
-    if access_type_id:
-        # Récupérer le type d'accès personnalisé
-        access_type = await db.access_types.find_one(
-            {"id": access_type_id, "tenant_id": tenant_id},
-            {"_id": 0}
-        )
-        if access_type:
-            permissions = access_type.get("permissions", {})
-            if permissions.get("is_full_access"):
-                return True
-            module_perms = permissions.get("modules", {}).get(module_id, {})
-            if not module_perms.get("access"):
-                return False
-            
-            # Vérifier les permissions de l'onglet si spécifié
-            if tab_id:
-                tab_perms = module_perms.get("tabs", {}).get(tab_id, {})
-                if tab_perms.get("access") == False:
-                    return False
-                if tab_perms.get("actions"):
-                    return action in tab_perms.get("actions", [])
-            
-            return action in module_perms.get("actions", [])
-    
-    # Utiliser les permissions par défaut du rôle
-    default_perms = DEFAULT_PERMISSIONS.get(user_role, DEFAULT_PERMISSIONS.get("employe", {}))
-    if default_perms.get("is_full_access"):
-        return True
-    
-    module_perms = default_perms.get("modules", {}).get(module_id, {})
-    if not module_perms.get("access"):
-        return False
-    
-    # Vérifier les permissions de l'onglet si spécifié
-    if tab_id:
-        tab_perms = module_perms.get("tabs", {}).get(tab_id, {})
-        if tab_perms.get("access") == False:
-            return False
-        if tab_perms.get("actions"):
-            return action in tab_perms.get("actions", [])
-    
-    return action in module_perms.get("actions", [])
+    permissions = await _permissions_utilisateur(tenant_id, user)
+    return permissions.a_action(module_id, action, tab_id)
 
 
 async def require_permission(tenant_id: str, user, module_id: str, action: str, tab_id: str = None):
@@ -21,6 +21,8 @@ import logging
 import asyncio
 
 # Import des dépendances partagées
+from services.export_jobs import construire_pdf_hors_boucle
+from services.streaming_xlsx import ClasseurStreaming, StyleCellule, reponse_xlsx
 from routes.dependencies import (
     db,
     get_current_user,
@@ -454,7 +456,9 @@ async def export_disponibilites_pdf(
         users_map = {u['id']: u for u in users_list}
         
         # Créer le PDF avec branding
-        buffer, doc, elements = create_branded_pdf(tenant, pagesize=letter)
+        from services.azure_storage import get_logo_bytes_async
+        logo_data = await get_logo_bytes_async(tenant)
+        buffer, doc, elements = create_branded_pdf(tenant, logo_data=logo_data, pagesize=letter)
         styles = getSampleStyleSheet()
         modern_styles = get_modern_pdf_styles(styles)
         
@@ -509,8 +513,7 @@ async def export_disponibilites_pdf(
         ]))
         
         elements.append(table)
-        doc.build(elements)
-        buffer.seek(0)
+        buffer = await construire_pdf_hors_boucle(doc, elements)
         
         filename = f"disponibilites_{user_id if user_id else 'tous'}.pdf"
         return StreamingResponse(
@@ -523,6 +526,30 @@ async def export_disponibilites_pdf(
         raise HTTPException(status_code=500, detail=f"Erreur export PDF: {str(e)}")
 
 
+async def _curseur_export_disponibilites(tenant_id: str, user_id: Optional[str]):
+    """Noms des pompiers et curseur des disponibilités triées par date, pour l'export Excel en flux"""
+    filtre_users = {"tenant_id": tenant_id}
+    filtre_dispos = {"tenant_id": tenant_id}
+    if user_id:
+        filtre_users["id"] = user_id
+        filtre_dispos["user_id"] = user_id
+    
+    noms_users = {
+        u['id']: (u.get('prenom', ''), u.get('nom', ''))
+        async for u in db.users.find(filtre_users, {"_id": 0, "id": 1, "prenom": 1, "nom": 1})
+    }
+    curseur = db.disponibilites.find(filtre_dispos, {"_id": 0}).sort("date", 1)
+    return noms_users, curseur
+
+
+def _statut_fr(statut: str) -> str:
+    return {
+        'disponible': 'Disponible',
+        'indisponible': 'Indisponible',
+        'conge': 'Congé'
+    }.get(statut, statut)
+
+
 # GET disponibilites/export-excel
 @router.get("/{tenant_slug}/disponibilites/export-excel")
 async def export_disponibilites_excel(
@@ -530,113 +557,39 @@ async def export_disponibilites_excel(
     user_id: str = None,
     current_user: User = Depends(get_current_user)
 ):
-    """Export des disponibilités en Excel"""
+    """Export des disponibilités en Excel (écrit en flux pendant le parcours du curseur)"""
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        from io import BytesIO
-        
         tenant = await get_tenant_from_slug(tenant_slug)
-        
-        # Récupérer les disponibilités
-        if user_id:
-            disponibilites_list = await db.disponibilites.find({
-                "tenant_id": tenant.id,
-                "user_id": user_id
-            }).to_list(length=None)
-            users_list = [await db.users.find_one({"id": user_id, "tenant_id": tenant.id})]
-        else:
-            disponibilites_list = await db.disponibilites.find({
-                "tenant_id": tenant.id
-            }).to_list(length=None)
-            users_list = await db.users.find({"tenant_id": tenant.id}).to_list(length=None)
-        
-        users_map = {u['id']: u for u in users_list}
-        
-        # Créer le workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Disponibilités"
-        
-        # Styles
-        header_font = Font(bold=True, color="FFFFFF")
-        header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # En-têtes
-        headers = ['Date', 'Heure Début', 'Heure Fin', 'Statut', 'Type Garde']
-        if not user_id:
-            headers.append('Pompier')
-        
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = Alignment(horizontal='center')
-            cell.border = border
-        
-        # Données
-        row = 2
-        for dispo in sorted(disponibilites_list, key=lambda x: x.get('date', '')):
-            user = users_map.get(dispo['user_id'], {})
-            pompier_nom = f"{user.get('prenom', '')} {user.get('nom', '')}" if user else "N/A"
-            
-            statut_fr = {
-                'disponible': 'Disponible',
-                'indisponible': 'Indisponible',
-                'conge': 'Congé'
-            }.get(dispo.get('statut', ''), dispo.get('statut', ''))
-            
+        noms_users, curseur = await _curseur_export_disponibilites(tenant.id, user_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur export Excel: {str(e)}")
+    
+    header_style = StyleCellule(gras=True, couleur="FFFFFF", fond="366092", centre=True, bordure=True)
+    cellule_style = StyleCellule(centre=True, bordure=True)
+    
+    headers = ['Date', 'Heure Début', 'Heure Fin', 'Statut', 'Type Garde']
+    if not user_id:
+        headers.append('Pompier')
+    
+    async def lignes():
+        yield headers, header_style
+        async for dispo in curseur:
+            nom = noms_users.get(dispo.get('user_id'))
             data_row = [
                 dispo.get('date', 'N/A'),
                 dispo.get('heure_debut', 'N/A'),
                 dispo.get('heure_fin', 'N/A'),
-                statut_fr,
+                _statut_fr(dispo.get('statut', '')),
                 dispo.get('type_garde_id', 'Tous') if dispo.get('type_garde_id') else 'Tous'
             ]
-            
             if not user_id:
-                data_row.append(pompier_nom)
-            
-            for col, value in enumerate(data_row, 1):
-                cell = ws.cell(row=row, column=col, value=value)
-                cell.border = border
-                cell.alignment = Alignment(horizontal='center')
-            
-            row += 1
-        
-        # Ajuster la largeur des colonnes
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # Sauvegarder dans un buffer
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        filename = f"disponibilites_{user_id if user_id else 'tous'}.xlsx"
-        return StreamingResponse(
-            buffer,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur export Excel: {str(e)}")
+                data_row.append(f"{nom[0]} {nom[1]}" if nom else "N/A")
+            yield data_row, cellule_style
+    
+    # Largeurs fixes: l'écriture en flux ne permet pas d'ajuster après coup
+    classeur = ClasseurStreaming("Disponibilités", largeurs=[12, 13, 11, 14, 38, 25])
+    filename = f"disponibilites_{user_id if user_id else 'tous'}.xlsx"
+    return reponse_xlsx(classeur, lignes(), filename)
 
 
 # POST disponibilites/resolve-conflict
@@ -987,7 +940,9 @@ async def export_disponibilites_pdf(
         users_map = {u['id']: u for u in users_list}
         
         # Créer le PDF avec branding
-        buffer, doc, elements = create_branded_pdf(tenant, pagesize=letter)
+        from services.azure_storage import get_logo_bytes_async
+        logo_data = await get_logo_bytes_async(tenant)
+        buffer, doc, elements = create_branded_pdf(tenant, logo_data=logo_data, pagesize=letter)
         styles = getSampleStyleSheet()
         modern_styles = get_modern_pdf_styles(styles)
         
@@ -1042,8 +997,7 @@ async def export_disponibilites_pdf(
         ]))
         
         elements.append(table)
-        doc.build(elements)
-        buffer.seek(0)
+        buffer = await construire_pdf_hors_boucle(doc, elements)
         
         filename = f"disponibilites_{user_id if user_id else 'tous'}.pdf"
         return StreamingResponse(
@@ -1063,131 +1017,55 @@ async def export_disponibilites_excel(
     user_id: str = None,
     current_user: User = Depends(get_current_user)
 ):
-    """Export des disponibilités en Excel"""
+    """Export des disponibilités en Excel (écrit en flux pendant le parcours du curseur)"""
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        from io import BytesIO
-        
         tenant = await get_tenant_from_slug(tenant_slug)
-        
-        # Récupérer les disponibilités
-        if user_id:
-            disponibilites_list = await db.disponibilites.find({
-                "tenant_id": tenant.id,
-                "user_id": user_id
-            }).to_list(length=None)
-            users_list = [await db.users.find_one({"id": user_id, "tenant_id": tenant.id})]
-        else:
-            disponibilites_list = await db.disponibilites.find({
-                "tenant_id": tenant.id
-            }).to_list(length=None)
-            users_list = await db.users.find({"tenant_id": tenant.id}).to_list(length=None)
-        
-        users_map = {u['id']: u for u in users_list}
-        
-        # Créer le workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "Disponibilités"
-        
-        # Styles
-        header_fill = PatternFill(start_color="FCA5A5", end_color="FCA5A5", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        center_alignment = Alignment(horizontal="center", vertical="center")
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        # Titre
-        ws.merge_cells('A1:F1')
-        titre = "Disponibilités du Personnel Temps Partiel"
-        if user_id and user_id in users_map:
-            titre = f"Disponibilités de {users_map[user_id]['prenom']} {users_map[user_id]['nom']}"
-        ws['A1'] = titre
-        ws['A1'].font = Font(bold=True, size=16, color="EF4444")
-        ws['A1'].alignment = center_alignment
-        
-        # En-têtes
-        row = 3
-        if user_id:
-            headers = ['Date', 'Heure Début', 'Heure Fin', 'Statut', 'Type Garde']
-        else:
-            headers = ['Date', 'Heure Début', 'Heure Fin', 'Statut', 'Type Garde', 'Pompier']
-        
-        for col, header in enumerate(headers, start=1):
-            cell = ws.cell(row=row, column=col, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = center_alignment
-            cell.border = border
-        
-        # Données
-        row += 1
-        for dispo in sorted(disponibilites_list, key=lambda x: x.get('date', '')):
-            user = users_map.get(dispo['user_id'], {})
-            pompier_nom = f"{user.get('prenom', '')} {user.get('nom', '')}" if user else "N/A"
-            
-            statut_fr = {
-                'disponible': 'Disponible',
-                'indisponible': 'Indisponible',
-                'conge': 'Congé'
-            }.get(dispo.get('statut', ''), dispo.get('statut', ''))
-            
-            ws.cell(row=row, column=1, value=dispo.get('date', 'N/A'))
-            ws.cell(row=row, column=2, value=dispo.get('heure_debut', 'N/A'))
-            ws.cell(row=row, column=3, value=dispo.get('heure_fin', 'N/A'))
-            status_cell = ws.cell(row=row, column=4, value=statut_fr)
-            ws.cell(row=row, column=5, value=dispo.get('type_garde_id', 'Tous') if dispo.get('type_garde_id') else 'Tous')
-            
-            if not user_id:
-                ws.cell(row=row, column=6, value=pompier_nom)
-            
-            # Couleur statut
-            if dispo.get('statut') == 'disponible':
-                status_cell.fill = PatternFill(start_color="D1FAE5", end_color="D1FAE5", fill_type="solid")
-            elif dispo.get('statut') == 'indisponible':
-                status_cell.fill = PatternFill(start_color="FEE2E2", end_color="FEE2E2", fill_type="solid")
-            else:
-                status_cell.fill = PatternFill(start_color="FEF3C7", end_color="FEF3C7", fill_type="solid")
-            
-            for col in range(1, len(headers) + 1):
-                ws.cell(row=row, column=col).border = border
-                ws.cell(row=row, column=col).alignment = center_alignment
-            
-            row += 1
-        
-        # Ajuster les largeurs de colonnes
-        column_widths = {
-            'A': 12,  # Date
-            'B': 15,  # Type Garde
-            'C': 20,  # Demandeur
-            'D': 12,  # Statut
-            'E': 10,  # Priorité
-            'F': 20,  # Remplaçant
-            'G': 30,  # Notes
-            'H': 18,  # Créé le
-        }
-        for col_letter, width in column_widths.items():
-            ws.column_dimensions[col_letter].width = width
-        
-        # Sauvegarder dans un buffer
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        filename = f"disponibilites_{user_id if user_id else 'tous'}.xlsx"
-        return StreamingResponse(
-            buffer,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
-        
+        noms_users, curseur = await _curseur_export_disponibilites(tenant.id, user_id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erreur export Excel: {str(e)}")
+    
+    titre_style = StyleCellule(gras=True, taille=16, couleur="EF4444", centre=True)
+    header_style = StyleCellule(gras=True, taille=12, couleur="FFFFFF", fond="FCA5A5", centre=True, bordure=True)
+    cellule_style = StyleCellule(centre=True, bordure=True)
+    statut_styles = {
+        'disponible': StyleCellule(fond="D1FAE5", centre=True, bordure=True),
+        'indisponible': StyleCellule(fond="FEE2E2", centre=True, bordure=True)
+    }
+    autre_statut_style = StyleCellule(fond="FEF3C7", centre=True, bordure=True)
+    
+    titre = "Disponibilités du Personnel Temps Partiel"
+    if user_id and user_id in noms_users:
+        titre = f"Disponibilités de {noms_users[user_id][0]} {noms_users[user_id][1]}"
+    
+    if user_id:
+        headers = ['Date', 'Heure Début', 'Heure Fin', 'Statut', 'Type Garde']
+    else:
+        headers = ['Date', 'Heure Début', 'Heure Fin', 'Statut', 'Type Garde', 'Pompier']
+    
+    async def lignes():
+        yield [titre], titre_style
+        yield [], None
+        yield headers, header_style
+        async for dispo in curseur:
+            nom = noms_users.get(dispo.get('user_id'))
+            data_row = [
+                dispo.get('date', 'N/A'),
+                dispo.get('heure_debut', 'N/A'),
+                dispo.get('heure_fin', 'N/A'),
+                _statut_fr(dispo.get('statut', '')),
+                dispo.get('type_garde_id', 'Tous') if dispo.get('type_garde_id') else 'Tous'
+            ]
+            if not user_id:
+                data_row.append(f"{nom[0]} {nom[1]}" if nom else "N/A")
+            
+            styles = [cellule_style] * len(headers)
+            styles[3] = statut_styles.get(dispo.get('statut'), autre_statut_style)
+            yield data_row, styles
+    
+    classeur = ClasseurStreaming("Disponibilités", largeurs=[12, 15, 20, 12, 10, 20, 30, 18])
+    classeur.fusionner('A1:F1')
+    filename = f"disponibilites_{user_id if user_id else 'tous'}.xlsx"
+    return reponse_xlsx(classeur, lignes(), filename)
 
 
 # DELETE disponibilites/reinitialiser
@@ -96,6 +96,22 @@ async def log_email_sent(
         logger.error(f"Erreur lors de l'enregistrement de l'email: {str(e)}")
 
 
+def historiser_apres_envoi(destinataires, **champs):
+    """
+    Suivi pour soumettre_email (apres_envoi): enregistre l'e-mail dans
+    l'historique pour chaque destinataire une fois accepté par Resend.
+    Les champs sont figés à l'appel (l'envoi a lieu plus tard, dans un worker).
+    """
+    if isinstance(destinataires, str):
+        destinataires = [destinataires]
+    destinataires = list(destinataires)
+
+    async def historiser(_reponse):
+        for destinataire in destinataires:
+            await log_email_sent(destinataire_email=destinataire, **champs)
+    return historiser
+
+
 # ==================== ROUTES ADMIN ====================
 
 @router.get("/{tenant_slug}/admin/emails-history")
@@ -21,6 +21,7 @@ import asyncio
 
 from routes.dependencies import (
     db,
+    invalidate_tenant_cache,
     get_current_user,
     get_tenant_from_slug,
     clean_mongo_doc,
@@ -1523,11 +1524,10 @@ async def get_demandes_remplacement_epi(
             admin = await db.users.find_one({"id": demande["traite_par"], "tenant_id": tenant.id})
             if admin:
                 demande["traite_par_nom"] = f"{admin.get('prenom', '')} {admin.get('nom', '')}"
-        
-        # Résoudre photo_defaut_blob_name en SAS URL
-        if demande.get("photo_defaut_blob_name"):
-            from services.azure_storage import generate_sas_url as _sas
-            demande["photo_defaut"] = _sas(demande["photo_defaut_blob_name"])
+    
+    # Résoudre photo_defaut_blob_name en SAS URLs
+    from services.azure_storage import resolve_blob_urls_batch
+    resolve_blob_urls_batch(demandes, {"photo_defaut_blob_name": "photo_defaut"})
     
     return demandes
 
@@ -1660,6 +1660,7 @@ async def update_epi_parametres(
         {"slug": tenant_slug},
         {"$set": {"parametres": current_parametres}}
     )
+    invalidate_tenant_cache(tenant_slug=tenant_slug)
     
     return {"message": "Paramètres EPI mis à jour avec succès"}
 
@@ -2874,8 +2875,8 @@ async def demander_remplacement_epi(
     # Upload photo vers Azure si présente
     photo_blob_name = None
     if demande.photo_defaut:
-        from services.azure_storage import upload_base64_to_azure
-        azure_result = upload_base64_to_azure(demande.photo_defaut, tenant.id, "epi-photos", f"defaut_{epi_id}.jpg")
+        from services.azure_storage import upload_base64_to_azure_async
+        azure_result = await upload_base64_to_azure_async(demande.photo_defaut, tenant.id, "epi-photos", f"defaut_{epi_id}.jpg")
         photo_blob_name = azure_result["blob_name"]
     
     # Créer la demande avec le blob_name
@@ -44,6 +44,7 @@ import logging
 
 from routes.dependencies import (
     db,
+    invalidate_tenant_cache,
     get_current_user,
     get_tenant_from_slug,
     clean_mongo_doc,
@@ -659,6 +660,7 @@ async def update_parametres_equipements(
         {"id": tenant.id},
         {"$set": {"parametres": current_params}}
     )
+    invalidate_tenant_cache(tenant_id=tenant.id)
     
     return {"message": "Paramètres mis à jour", "parametres": parametres}
 
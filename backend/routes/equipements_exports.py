@@ -184,14 +184,13 @@ async def export_equipements_csv(
     if etat:
         filters["etat"] = etat
     
-    # Récupérer les équipements
-    equipements = await db.equipements.find(filters, {"_id": 0}).to_list(10000)
+    # Parcourir les équipements en flux: chaque ligne CSV part dès qu'elle est écrite
+    curseur = db.equipements.find(filters, {"_id": 0}).limit(10000)
+    premier = await anext(curseur, None)
     
-    if not equipements:
+    if not premier:
         raise HTTPException(status_code=404, detail="Aucun équipement trouvé")
     
-    output = StringIO()
-    
     # En-têtes
     fieldnames = [
         "nom", "code_unique", "categorie_nom", "etat", "emplacement", 
@@ -200,12 +199,10 @@ async def export_equipements_csv(
         "valeur_achat", "notes", "champs_personnalises", "created_at"
     ]
     
-    writer = csv.DictWriter(output, fieldnames=fieldnames)
-    writer.writeheader()
-    
     import json as json_lib
-    for eq in equipements:
-        row = {
+    
+    def ligne_csv(eq):
+        return {
             "nom": eq.get("nom", ""),
             "code_unique": eq.get("code_unique", ""),
             "categorie_nom": eq.get("categorie_nom", ""),
@@ -223,12 +220,22 @@ async def export_equipements_csv(
             "champs_personnalises": json_lib.dumps(eq.get("champs_personnalises", {})),
             "created_at": eq.get("created_at", "")
         }
-        writer.writerow(row)
     
-    csv_content = output.getvalue()
-    
-    return Response(
-        content=csv_content,
+    async def contenu():
+        output = StringIO()
+        writer = csv.DictWriter(output, fieldnames=fieldnames)
+        writer.writeheader()
+        writer.writerow(ligne_csv(premier))
+        async for eq in curseur:
+            writer.writerow(ligne_csv(eq))
+            if output.tell() >= 64 * 1024:
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+        yield output.getvalue()
+    
+    return StreamingResponse(
+        contenu(),
         media_type="text/csv",
         headers={
             "Content-Disposition": f"attachment; filename=equipements_{tenant_slug}_{datetime.now().strftime('%Y%m%d')}.csv"
@@ -282,7 +289,9 @@ async def export_equipements_pdf(
     modern_styles = get_modern_pdf_styles(styles)
     
     # Header personnalisé (logo + nom service)
-    header_elements = create_pdf_header_elements(tenant, styles)
+    from services.azure_storage import get_logo_bytes_async
+    logo_data = await get_logo_bytes_async(tenant)
+    header_elements = create_pdf_header_elements(tenant, styles, logo_data)
     story.extend(header_elements)
     
     # Titre
@@ -3,8 +3,8 @@ Routes pour le stockage et la récupération de fichiers via Azure Blob Storage.
 Gère les uploads/downloads de photos et documents pour tous les modules.
 Retourne des SAS URLs temporaires (15 min) pour l'accès direct depuis le frontend.
 """
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Body, Query, Header
-from fastapi.responses import Response, RedirectResponse
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Body, Query, Header, Request
+from fastapi.responses import Response, RedirectResponse, StreamingResponse
 from typing import Optional
 from datetime import datetime, timezone
 import uuid
@@ -18,7 +18,8 @@ from routes.dependencies import (
     get_tenant_from_slug,
     User,
 )
-from services.azure_storage import put_object, get_object, get_content_type, generate_storage_path, generate_sas_url, delete_object
+from services.azure_storage import put_object_async, get_content_type, generate_storage_path, generate_sas_url, resolve_blob_urls_batch, verifier_url_locale
+from services.object_storage import ObjetIntrouvable, PlageInvalide, get_stockage, lire_fichier_par_blocs
 from utils.chunked_upload import save_upload_to_disk, cleanup_file
 
 router = APIRouter(tags=["File Storage"])
@@ -41,13 +42,14 @@ async def upload_file(
     tenant = await get_tenant_from_slug(tenant_slug)
 
     file_path = await save_upload_to_disk(file)
-    with open(file_path, "rb") as f:
-        data = f.read()
-    cleanup_file(file_path)
     content_type = file.content_type or get_content_type(file.filename)
     path = generate_storage_path(tenant.id, category, file.filename)
 
-    result = put_object(path, data, content_type)
+    # Envoi par blocs depuis le disque (le fichier n'est jamais entièrement en mémoire)
+    try:
+        result = await put_object_async(path, lire_fichier_par_blocs(file_path), content_type)
+    finally:
+        cleanup_file(file_path)
 
     # Résoudre le titre depuis pfm_photo_titles du bâtiment (si import PFM Transfer)
     description = None
@@ -69,7 +71,7 @@ async def upload_file(
         "blob_name": result["path"],
         "original_filename": file.filename,
         "content_type": content_type,
-        "size": result.get("size", len(data)),
+        "size": result["size"],
         "category": category,
         "entity_type": entity_type,
         "entity_id": entity_id,
@@ -96,13 +98,79 @@ async def upload_file(
     }
 
 
+def _plage_demandee(range_header: Optional[str]):
+    """
+    En-tête Range "bytes=a-b" / "bytes=a-" -> (a, longueur ou None),
+    "bytes=-n" -> (None, n). None sans en-tête ou pour une plage multiple
+    (non supportée: fichier complet).
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    debut_txt, _, fin_txt = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if not debut_txt:
+            return None, int(fin_txt)
+        debut = int(debut_txt)
+        if not fin_txt:
+            return debut, None
+        fin = int(fin_txt)
+    except ValueError:
+        return None
+    return (debut, fin - debut + 1) if fin >= debut else None
+
+
+async def _servir_objet(stockage, blob_name: str, request: Request) -> StreamingResponse:
+    """Flux de l'objet, avec support des requêtes Range"""
+    plage = _plage_demandee(request.headers.get("range"))
+    try:
+        if plage is None:
+            flux = await stockage.ouvrir(blob_name)
+        elif plage[0] is None:
+            # Suffixe ("les n derniers octets"): la taille totale est nécessaire
+            flux = await stockage.ouvrir(blob_name, debut=0, longueur=1)
+            fermer = getattr(flux.blocs, "aclose", None)
+            if fermer:
+                await fermer()
+            debut = max(0, flux.taille_totale - plage[1])
+            flux = await stockage.ouvrir(blob_name, debut=debut, longueur=flux.taille_totale - debut)
+        else:
+            flux = await stockage.ouvrir(blob_name, debut=plage[0], longueur=plage[1])
+    except ObjetIntrouvable:
+        raise HTTPException(status_code=404, detail="Fichier introuvable dans le stockage")
+    except PlageInvalide as e:
+        raise HTTPException(
+            status_code=416,
+            detail="Plage demandée invalide",
+            headers={"Content-Range": f"bytes */{e.taille_totale if e.taille_totale is not None else '*'}"},
+        )
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(flux.longueur),
+    }
+    if plage:
+        headers["Content-Range"] = f"bytes {flux.debut}-{flux.fin}/{flux.taille_totale}"
+    return StreamingResponse(
+        flux.blocs,
+        status_code=206 if plage else 200,
+        media_type=flux.content_type,
+        headers=headers,
+    )
+
+
 @router.get("/{tenant_slug}/files/{file_id}/download")
 async def download_file(
     tenant_slug: str,
     file_id: str,
+    request: Request,
     auth: Optional[str] = Query(None),
+    proxy: bool = Query(False, description="Servir le fichier par l'API au lieu d'une redirection SAS"),
 ):
-    """Redirige vers une URL SAS Azure pour téléchargement direct."""
+    """
+    Redirige vers une URL SAS Azure pour téléchargement direct, ou sert le
+    fichier en flux (proxy=true, ou backend sans URL signée) avec support
+    des requêtes Range (lecture partielle: vidéos, gros PDFs).
+    """
     tenant = await get_tenant_from_slug(tenant_slug)
 
     if not auth:
@@ -121,12 +189,35 @@ async def download_file(
 
     blob_name = record.get("blob_name") or record.get("storage_path")
     
+    if not blob_name:
+        raise HTTPException(status_code=404, detail="Fichier introuvable dans le stockage")
+
+    stockage = get_stockage()
     # Fichier Azure : rediriger vers SAS URL
-    if blob_name:
+    if stockage.urls_signees and not proxy:
         sas_url = generate_sas_url(blob_name)
         return RedirectResponse(url=sas_url, status_code=302)
-    
-    raise HTTPException(status_code=404, detail="Fichier introuvable dans le stockage")
+
+    return await _servir_objet(stockage, blob_name, request)
+
+
+@router.get("/storage/local/{blob_name:path}")
+async def download_local_object(
+    blob_name: str,
+    request: Request,
+    expire: int = Query(...),
+    signature: str = Query(...),
+):
+    """
+    Sert un objet du backend filesystem via l'URL signée produite par
+    generate_sas_url (équivalent local d'une URL SAS Azure).
+    """
+    if not verifier_url_locale(blob_name, expire, signature):
+        raise HTTPException(status_code=403, detail="URL expirée ou signature invalide")
+    try:
+        return await _servir_objet(get_stockage(), blob_name, request)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Fichier introuvable dans le stockage")
 
 
 @router.get("/{tenant_slug}/files/{file_id}/sas-url")
@@ -177,11 +268,9 @@ async def list_files_by_entity(
         {"_id": 0},
     ).sort("uploaded_at", -1).to_list(length=500)
 
-    # Ajouter les SAS URLs pour chaque fichier
-    for f in files:
-        blob_name = f.get("blob_name") or f.get("storage_path")
-        if blob_name:
-            f["url"] = generate_sas_url(blob_name)
+    # Ajouter les SAS URLs pour chaque fichier (une passe, signatures en cache)
+    resolve_blob_urls_batch(files, {"blob_name": "url"})
+    resolve_blob_urls_batch([f for f in files if not f.get("blob_name")], {"storage_path": "url"})
 
     return {"files": files}
 
@@ -34,6 +34,7 @@ import logging
 # Import des dépendances partagées
 from routes.dependencies import (
     db,
+    invalidate_tenant_cache,
     get_current_user,
     get_tenant_from_slug,
     clean_mongo_doc,
@@ -1106,7 +1107,9 @@ async def generer_pdf_presence(rapport_data, annee, type_formation, total_pompie
     """Génère un PDF professionnel avec graphiques"""
     
     # Utiliser la fonction helper pour créer un PDF brandé
-    buffer, doc, story = create_branded_pdf(tenant, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    from services.azure_storage import get_logo_bytes_async
+    logo_data = await get_logo_bytes_async(tenant)
+    buffer, doc, story = create_branded_pdf(tenant, logo_data=logo_data, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
     styles = getSampleStyleSheet()
     modern_styles = get_modern_pdf_styles(styles)
     
@@ -1369,7 +1372,9 @@ async def generer_pdf_competences(rapport_data, annee, user_nom, tenant):
     """Génère un PDF pour le rapport par compétences"""
     
     # Utiliser la fonction helper pour créer un PDF brandé
-    buffer, doc, story = create_branded_pdf(tenant, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    from services.azure_storage import get_logo_bytes_async
+    logo_data = await get_logo_bytes_async(tenant)
+    buffer, doc, story = create_branded_pdf(tenant, logo_data=logo_data, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
     styles = getSampleStyleSheet()
     modern_styles = get_modern_pdf_styles(styles)
     
@@ -1721,6 +1726,7 @@ async def update_parametres_formations(tenant_slug: str, parametres: dict, curre
             {"id": tenant.id},
             {"$set": {"parametres": current_parametres}}
         )
+        invalidate_tenant_cache(tenant_id=tenant.id)
         
         return {"message": "Paramètres mis à jour", "parametres": parametres}
         
@@ -25,6 +25,7 @@ from routes.dependencies import (
     creer_activite,
     user_has_module_action
 )
+from services.disponibilites_resolution import charger_resolution_disponibilites
 
 router = APIRouter(tags=["Génération Indisponibilités"])
 logger = logging.getLogger(__name__)
@@ -476,6 +477,18 @@ async def generer_indisponibilites(
                 date_fin=generation_data.date_fin
             )
         
+        # Les disponibilités manuelles conservées ont priorité sur les indisponibilités générées
+        # (mêmes règles que l'attribution automatique et la recherche de remplaçants)
+        if indispos and generation_data.conserver_manuelles:
+            resolution_dispos = await charger_resolution_disponibilites(
+                db, tenant.id, generation_data.date_debut, generation_data.date_fin,
+                user_ids=[generation_data.user_id]
+            )
+            nb_generees = len(indispos)
+            indispos = resolution_dispos.filtrer_indisponibilites_generees(indispos)
+            if len(indispos) < nb_generees:
+                logger.info(f"✅ {nb_generees - len(indispos)} indisponibilité(s) générée(s) ignorée(s) (dispo manuelle existante)")
+        
         # Insérer les indisponibilités dans la base de données
         if indispos:
             await db.disponibilites.insert_many(indispos)
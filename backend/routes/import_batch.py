@@ -16,6 +16,7 @@ from fastapi import APIRouter, Depends, HTTPException
 
 from routes.dependencies import (
     db,
+    invalidate_user_cache,
     get_current_user,
     get_super_admin,
     get_tenant_from_slug,
@@ -862,6 +863,7 @@ async def resolve_duplicate(
 
                 if existing_user:
                     await db.users.update_one({"id": existing_user["id"]}, {"$set": pfm_fields})
+                    invalidate_user_cache(existing_user["id"])
                     logger.info(f"  ✅ Compte existant lié: {existing_user['id']}")
                 else:
                     # Créer le compte pour TOUS les employés (actifs et inactifs)
@@ -1007,6 +1009,7 @@ async def resolve_all_duplicates(
 
                         if existing_user:
                             await db.users.update_one({"id": existing_user["id"]}, {"$set": pfm_fields})
+                            invalidate_user_cache(existing_user["id"])
                             logger.info(f"  [resolve_all] Compte existant lié: {existing_user['id']}")
                         else:
                             adresse_str = " ".join(filter(None, [
@@ -2548,6 +2551,7 @@ async def _handle_employe(record: dict, tenant, user, source: str) -> dict:
             {"id": existing_user["id"]},
             {"$set": pfm_user_fields}
         )
+        invalidate_user_cache(existing_user["id"])
         account_status = "linked"
         account_user_id = existing_user["id"]
     elif pfm_actif:
@@ -24,7 +24,8 @@ from routes.dependencies import (
     require_permission,
 )
 from utils.address_utils import normalize_address, extract_civic_number, extract_street_name, is_same_address
-from services.azure_storage import put_object, MIME_TYPES
+from utils.address_index import IndexAdresses
+from services.azure_storage import put_object_async, MIME_TYPES
 
 router = APIRouter(tags=["Import Interventions Historique"])
 import logging
@@ -36,7 +37,7 @@ import_sessions: Dict[str, dict] = {}
 # Utiliser le module partagé pour les chunks
 from utils.chunked_upload import (
     init_upload, get_upload_session, save_chunk, assemble_chunks,
-    cleanup_file, LOCAL_TMP
+    chunks_manquants, cleanup_file, LOCAL_TMP
 )
 
 
@@ -339,6 +340,13 @@ async def match_interventions_to_batiments(
             bat["_clean_addr"] = addr
             bat["_clean_ville"] = ville
 
+    # Index par numéro civique: chaque intervention n'est comparée qu'aux bâtiments de son bloc
+    index_batiments = IndexAdresses(
+        batiments,
+        adresse=lambda b: b.get("_clean_addr", b.get("adresse_civique", "")),
+        ville=lambda b: b.get("_clean_ville", b.get("ville", ""))
+    )
+
     # Construire un index des dossiers adresse si fourni
     dossier_index = {}
     if dossier_adresses:
@@ -370,34 +378,24 @@ async def match_interventions_to_batiments(
         da_id = intv.get("dossier_adresse_id")
         if da_id and str(da_id) in dossier_index:
             da = dossier_index[str(da_id)]
-            da_addr = da.get("adresse_civique", "")
-            da_ville = da.get("ville", "")
-            for bat in batiments:
-                bat_addr = bat.get("_clean_addr", bat.get("adresse_civique", ""))
-                bat_ville = bat.get("_clean_ville", bat.get("ville", ""))
-                is_match, _ = is_same_address(da_addr, da_ville, bat_addr, bat_ville)
-                if is_match:
-                    match_info["batiment_id"] = bat["id"]
-                    match_info["batiment_adresse"] = bat.get("adresse_civique", "")
-                    match_info["match_method"] = "dossier_adresse"
-                    match_info["match_score"] = 1.0
-                    break
+            bat = index_batiments.premier_doublon(da.get("adresse_civique", ""), da.get("ville", ""))
+            if bat:
+                match_info["batiment_id"] = bat["id"]
+                match_info["batiment_adresse"] = bat.get("adresse_civique", "")
+                match_info["match_method"] = "dossier_adresse"
+                match_info["match_score"] = 1.0
 
         # Méthode 2: Match par adresse de l'intervention
         if not match_info["batiment_id"]:
             intv_addr = intv.get("address_full", "")
             intv_city = intv.get("municipality", "")
             if intv_addr:
-                for bat in batiments:
-                    bat_addr = bat.get("_clean_addr", bat.get("adresse_civique", ""))
-                    bat_ville = bat.get("_clean_ville", bat.get("ville", ""))
-                    is_match, details = is_same_address(intv_addr, intv_city, bat_addr, bat_ville)
-                    if is_match:
-                        match_info["batiment_id"] = bat["id"]
-                        match_info["batiment_adresse"] = bat.get("adresse_civique", "")
-                        match_info["match_method"] = "address_match"
-                        match_info["match_score"] = 1.0
-                        break
+                bat = index_batiments.premier_doublon(intv_addr, intv_city)
+                if bat:
+                    match_info["batiment_id"] = bat["id"]
+                    match_info["batiment_adresse"] = bat.get("adresse_civique", "")
+                    match_info["match_method"] = "address_match"
+                    match_info["match_score"] = 1.0
 
         intv["_match"] = match_info
         matched_interventions.append(intv)
@@ -445,6 +443,27 @@ async def upload_chunk(
     return result
 
 
+@router.get("/{tenant_slug}/interventions/import-history/upload-status/{upload_id}")
+async def upload_status(
+    tenant_slug: str,
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """État d'un upload par chunks — chunks manquants pour reprendre après une interruption."""
+    tenant = await get_tenant_from_slug(tenant_slug)
+    session = await get_upload_session(upload_id)
+    if not session or session["tenant_id"] != tenant.id:
+        raise HTTPException(status_code=404, detail="Session d'upload non trouvée")
+    manquants = chunks_manquants(session)
+    return {
+        "upload_id": upload_id,
+        "received": session.get("received_chunks", 0),
+        "total": session["total_chunks"],
+        "missing": manquants,
+        "complete": not manquants,
+    }
+
+
 # ======================== FINALIZE AVEC BACKGROUND TASK ========================
 
 import asyncio
@@ -1108,7 +1127,7 @@ async def execute_intervention_import(
                     ext = file_name.rsplit(".", 1)[-1].lower() if "." in file_name else ""
                     content_type = MIME_TYPES.get(ext, "application/octet-stream")
                     blob_path = f"profiremanager/{tenant.id}/import-history/{uuid.uuid4()}.{ext}"
-                    put_object(blob_path, file_data, content_type)
+                    await put_object_async(blob_path, file_data, content_type)
                     file_id = file_name.rsplit(".", 1)[0] if "." in file_name else file_name
                     file_blob_map[file_id] = {
                         "blob_name": blob_path,
@@ -1209,7 +1228,7 @@ async def _execute_dossier_adresse_import(session, tenant, current_user, session
                     ext = file_name.rsplit(".", 1)[-1].lower() if "." in file_name else ""
                     content_type = MIME_TYPES.get(ext, "application/octet-stream")
                     blob_path = f"profiremanager/{tenant.id}/dossier-adresse/{uuid.uuid4()}.{ext}"
-                    put_object(blob_path, file_data, content_type)
+                    await put_object_async(blob_path, file_data, content_type)
                     file_id = file_name.rsplit(".", 1)[0] if "." in file_name else file_name
                     file_blob_map[file_id] = {
                         "blob_name": blob_path,
@@ -22,6 +22,7 @@ import re
 import asyncio
 import base64
 
+from services.notification_dispatcher import soumettre_email
 from routes.dependencies import (
     db,
     get_current_user,
@@ -2528,8 +2529,8 @@ async def generer_pdf_remise_propriete(tenant: dict, intervention: dict, remise:
     
     header_data = []
     try:
-        from services.azure_storage import get_logo_bytes
-        logo_data = get_logo_bytes(tenant)
+        from services.azure_storage import get_logo_bytes_async
+        logo_data = await get_logo_bytes_async(tenant)
         if logo_data:
             logo_buffer = BytesIO(logo_data)
             logo_img = Image(logo_buffer, width=1*inch, height=1*inch)
@@ -2754,22 +2755,15 @@ async def envoyer_email_remise_propriete(tenant: dict, intervention: dict, remis
             ]
         }
         
-        response = resend.Emails.send(params)
-        print(f"Email remise propriété envoyé: {response}")
-        
-        # Log email
-        try:
-            from routes.emails_history import log_email_sent
-            import asyncio
-            asyncio.create_task(log_email_sent(
-                type_email="remise_propriete",
-                destinataire_email=recipient_email,
-                sujet=f"Remise de propriété - Intervention {intervention.get('external_call_id', 'NA')}",
-                tenant_id=tenant_id,
-                metadata={"intervention_id": intervention.get('id'), "external_call_id": intervention.get('external_call_id')}
-            ))
-        except Exception as log_err:
-            print(f"Erreur log email: {log_err}")
+        from routes.emails_history import historiser_apres_envoi
+        soumettre_email(params, apres_envoi=historiser_apres_envoi(
+            remise.get("proprietaire_email"),
+            type_email="remise_propriete",
+            sujet=f"Remise de propriété - Intervention {intervention.get('external_call_id', 'NA')}",
+            tenant_id=tenant.get("id"),
+            metadata={"intervention_id": intervention.get('id'), "external_call_id": intervention.get('external_call_id')}
+        ))
+        print(f"Email remise propriété mis en file: {remise.get('proprietaire_email')}")
         
         return True
         
@@ -2832,9 +2826,9 @@ async def get_remise_propriete_pdf(
         if stored_file:
             blob_name = stored_file.get("blob_name") or stored_file.get("storage_path")
             if blob_name:
-                from services.azure_storage import get_object
+                from services.azure_storage import get_object_async
                 try:
-                    data, content_type = get_object(blob_name)
+                    data, content_type = await get_object_async(blob_name)
                     return Response(
                         content=data,
                         media_type=content_type or "application/pdf",
@@ -3217,8 +3211,8 @@ async def add_rcci_photo(
     now = datetime.now(timezone.utc)
     
     # Upload photo vers Azure
-    from services.azure_storage import upload_base64_to_azure, generate_sas_url
-    azure_result = upload_base64_to_azure(data.photo_base64, tenant.id, "rcci-photos", f"rcci_{intervention_id}.jpg")
+    from services.azure_storage import upload_base64_to_azure_async, generate_sas_url
+    azure_result = await upload_base64_to_azure_async(data.photo_base64, tenant.id, "rcci-photos", f"rcci_{intervention_id}.jpg")
     
     photo = {
         "id": str(uuid.uuid4()),
@@ -3259,8 +3253,8 @@ async def delete_rcci_photo(
     if rcci:
         for p in rcci.get("photos", []):
             if p.get("id") == photo_id and p.get("blob_name"):
-                from services.azure_storage import delete_object
-                delete_object(p["blob_name"])
+                from services.azure_storage import delete_object_async
+                await delete_object_async(p["blob_name"])
                 break
     
     await db.rcci.update_one(
@@ -3383,11 +3377,10 @@ async def get_photos_dommages(
     }, {"_id": 0}).sort("timestamp", 1).to_list(100)
     
     # Résoudre blob_names en SAS URLs
-    from services.azure_storage import generate_sas_url as _sas
+    from services.azure_storage import resolve_blob_urls_batch
+    resolve_blob_urls_batch(photos, {"blob_name": "photo_url"})
     for p in photos:
-        if p.get("blob_name"):
-            p["photo_url"] = _sas(p["blob_name"])
-        elif p.get("photo_base64"):
+        if not p.get("blob_name") and p.get("photo_base64"):
             p["photo_url"] = p["photo_base64"]
     
     return {"photos": photos}
@@ -3408,8 +3401,8 @@ async def add_photo_dommage(
     now = datetime.now(timezone.utc)
     
     # Upload photo vers Azure
-    from services.azure_storage import upload_base64_to_azure
-    azure_result = upload_base64_to_azure(data.photo_base64, tenant.id, "photos-dommages", f"dommage_{intervention_id}.jpg")
+    from services.azure_storage import upload_base64_to_azure_async
+    azure_result = await upload_base64_to_azure_async(data.photo_base64, tenant.id, "photos-dommages", f"dommage_{intervention_id}.jpg")
     
     photo = {
         "id": str(uuid.uuid4()),
@@ -3456,8 +3449,8 @@ async def delete_photo_dommage(
         "id": photo_id, "tenant_id": tenant.id, "intervention_id": intervention_id
     })
     if photo_doc and photo_doc.get("blob_name"):
-        from services.azure_storage import delete_object
-        delete_object(photo_doc["blob_name"])
+        from services.azure_storage import delete_object_async
+        await delete_object_async(photo_doc["blob_name"])
     
     result = await db.photos_dommages.delete_one({
         "id": photo_id,
@@ -57,6 +57,12 @@ def is_firebase_enabled():
 # Web Push pour les PWA
 from pywebpush import webpush, WebPushException
 
+from services.notification_dispatcher import (
+    get_notification_dispatcher,
+    envoyer_fcm_multicast,
+    envoyer_web_push
+)
+
 from routes.dependencies import (
     db,
     get_current_user,
@@ -267,9 +273,27 @@ async def register_device_token(
         raise HTTPException(status_code=500, detail=f"Erreur: {str(e)}")
 
 
-async def send_push_notification_to_users(user_ids: List[str], title: str, body: str, data: Optional[dict] = None, tenant_slug: str = None):
+async def _supprimer_device_tokens(tokens: List[str]):
+    await db.device_tokens.delete_many({"device_token": {"$in": tokens}})
+
+
+async def _supprimer_abonnements_web_push(ids: list):
+    await db.web_push_subscriptions.delete_many({"_id": {"$in": ids}})
+
+
+def _dispatcher():
+    """Répartiteur partagé, avec la suppression groupée des destinations mortes"""
+    dispatcher = get_notification_dispatcher()
+    dispatcher.enregistrer_nettoyage("fcm", _supprimer_device_tokens)
+    dispatcher.enregistrer_nettoyage("webpush", _supprimer_abonnements_web_push)
+    return dispatcher
+
+
+async def send_push_notification_to_users(user_ids: List[str], title: str, body: str, data: Optional[dict] = None, tenant_slug: str = None, attendre: bool = False):
     """
-    Helper function pour envoyer des notifications push FCM à plusieurs utilisateurs
+    Helper function pour envoyer des notifications push FCM à plusieurs utilisateurs.
+    L'envoi est mis en file (services/notification_dispatcher.py) et la fonction
+    retourne immédiatement; attendre=True retourne le bilan (success_count / failure_count).
     """
     # Vérifier dynamiquement si Firebase est activé
     if not is_firebase_enabled():
@@ -278,7 +302,7 @@ async def send_push_notification_to_users(user_ids: List[str], title: str, body:
     
     try:
         # Récupérer tous les device tokens pour ces utilisateurs
-        tokens_cursor = db.device_tokens.find({"user_id": {"$in": user_ids}})
+        tokens_cursor = db.device_tokens.find({"user_id": {"$in": user_ids}}, {"_id": 0, "device_token": 1})
         tokens_list = await tokens_cursor.to_list(length=None)
         
         if not tokens_list:
@@ -329,38 +353,21 @@ async def send_push_notification_to_users(user_ids: List[str], title: str, body:
             )
         )
         
-        # Créer les messages individuels pour chaque token (API v7+)
-        messages = [
-            messaging.Message(
+        # Un MulticastMessage par lot de 500 jetons
+        def construire_message(tokens: List[str]):
+            return messaging.MulticastMessage(
                 notification=messaging.Notification(
                     title=title,
                     body=body
                 ),
                 data=string_data,
-                token=token,
+                tokens=tokens,
                 android=android_config,
                 apns=apns_config
             )
-            for token in device_tokens
-        ]
         
-        # Envoyer avec la nouvelle API
-        response = messaging.send_each(messages)
-        logger.info(f"✅ Push notification sent: {response.success_count} success, {response.failure_count} failures")
-        
-        # Supprimer les tokens invalides et logger les erreurs
-        if response.failure_count > 0:
-            failed_tokens = []
-            for idx, resp in enumerate(response.responses):
-                if not resp.success:
-                    failed_tokens.append(device_tokens[idx])
-                    logger.error(f"❌ Push failed for token {device_tokens[idx][:20]}...: {resp.exception}")
-            
-            if failed_tokens:
-                await db.device_tokens.delete_many({"device_token": {"$in": failed_tokens}})
-                logger.info(f"Removed {len(failed_tokens)} invalid tokens")
-        
-        return response
+        futur = _dispatcher().soumettre("fcm", envoyer_fcm_multicast, messaging, device_tokens, construire_message)
+        return await futur if attendre else None
     
     except Exception as e:
         logger.error(f"Error sending push notification: {str(e)}")
@@ -386,7 +393,8 @@ async def send_push_notification(
             user_ids=notification_data.user_ids,
             title=notification_data.title,
             body=notification_data.body,
-            data=notification_data.data
+            data=notification_data.data,
+            attendre=True
         )
         
         return {
@@ -476,10 +484,10 @@ async def unsubscribe_web_push(
     return {"message": f"{result.deleted_count} abonnement(s) supprimé(s)"}
 
 
-async def send_web_push_to_users(tenant_id: str, user_ids: List[str], title: str, body: str, data: Optional[dict] = None):
+async def send_web_push_to_users(tenant_id: str, user_ids: List[str], title: str, body: str, data: Optional[dict] = None, attendre: bool = False):
     """
-    Envoie une notification Web Push à plusieurs utilisateurs
-    Retourne le nombre de succès et d'échecs
+    Envoie une notification Web Push à plusieurs utilisateurs.
+    L'envoi est mis en file; attendre=True retourne le nombre de succès et d'échecs.
     """
     if not VAPID_PRIVATE_KEY:
         logger.warning("Web Push: Clés VAPID non configurées")
@@ -489,15 +497,12 @@ async def send_web_push_to_users(tenant_id: str, user_ids: List[str], title: str
     subscriptions = await db.web_push_subscriptions.find({
         "tenant_id": tenant_id,
         "user_id": {"$in": user_ids}
-    }).to_list(length=None)
+    }, {"_id": 1, "subscription": 1}).to_list(length=None)
     
     if not subscriptions:
         logger.info(f"Web Push: Aucun abonnement trouvé pour {len(user_ids)} utilisateurs")
         return {"success": 0, "failed": 0}
     
-    success_count = 0
-    failed_count = 0
-    
     # Payload de la notification
     payload = json.dumps({
         "title": title,
@@ -508,28 +513,17 @@ async def send_web_push_to_users(tenant_id: str, user_ids: List[str], title: str
         "data": data or {}
     })
     
-    # Envoyer à chaque abonnement
-    for sub in subscriptions:
-        try:
-            webpush(
-                subscription_info=sub["subscription"],
-                data=payload,
-                vapid_private_key=VAPID_PRIVATE_KEY,
-                vapid_claims={"sub": f"mailto:{VAPID_CLAIMS_EMAIL}"}
-            )
-            success_count += 1
-        except WebPushException as e:
-            logger.error(f"Web Push échec: {e}")
-            # Si l'abonnement est expiré/invalide, le supprimer
-            if e.response and e.response.status_code in [404, 410]:
-                await db.web_push_subscriptions.delete_one({"_id": sub["_id"]})
-            failed_count += 1
-        except Exception as e:
-            logger.error(f"Web Push erreur: {e}")
-            failed_count += 1
+    futur = _dispatcher().soumettre(
+        "webpush", envoyer_web_push, webpush, WebPushException, subscriptions, payload,
+        VAPID_PRIVATE_KEY, {"sub": f"mailto:{VAPID_CLAIMS_EMAIL}"}
+    )
+    if not attendre:
+        return {"success": 0, "failed": 0, "en_file": len(subscriptions)}
     
-    logger.info(f"Web Push: {success_count} succès, {failed_count} échecs")
-    return {"success": success_count, "failed": failed_count}
+    resultat = await futur
+    if resultat is None:
+        return {"success": 0, "failed": len(subscriptions)}
+    return {"success": resultat.success_count, "failed": resultat.failure_count}
 
 
 @router.post("/{tenant_slug}/notifications/send-web-push")
@@ -549,7 +543,8 @@ async def send_web_push_notification(
         user_ids=notification_data.user_ids,
         title=notification_data.title,
         body=notification_data.body,
-        data=notification_data.data
+        data=notification_data.data,
+        attendre=True
     )
     
     return {
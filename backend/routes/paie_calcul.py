@@ -0,0 +1,627 @@
+"""
+Calcul des feuilles de temps
+============================
+
+Calcul pur (sans accès à la base de données) des feuilles de temps d'un lot
+d'employés, à partir d'un instantané des données de la période.
+
+Ce module est volontairement découplé de FastAPI et de MongoDB afin de
+pouvoir être exécuté dans un ProcessPoolExecutor : l'instantané est un
+dictionnaire de données Python sérialisables, chargé en quelques requêtes
+pour tous les employés (voir paie_complet.charger_snapshot_paie).
+
+Structure de l'instantané:
+    tenant_id, types_garde, positions, echelle_salariale,
+    intervention_settings, formations, assignations, interventions,
+    inscriptions
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, List
+from datetime import datetime, timezone, timedelta
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Hiérarchie des grades (du plus bas au plus haut)
+GRADES_HIERARCHIE = {
+    "pompier": 1,
+    "lieutenant": 2,
+    "capitaine": 3,
+    "chef": 4,
+    "directeur": 5,
+    "eligible": 2,
+    "éligible": 2
+}
+
+
+class DonneesPaie:
+    """Index par employé de l'instantané d'une période de paie"""
+
+    def __init__(self, snapshot: Dict[str, Any]):
+        self.tenant_id = snapshot["tenant_id"]
+        self.types_garde_map = {tg["id"]: tg for tg in snapshot.get("types_garde", [])}
+        self.positions = snapshot.get("positions", {})
+        self.formations = snapshot.get("formations", {})
+        self.echelle_salariale = snapshot.get("echelle_salariale")
+        self.intervention_settings = snapshot.get("intervention_settings")
+
+        # Structure: {user_id: [documents]} (ordre de l'instantané conservé)
+        self.assignations_par_user: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for assignation in snapshot.get("assignations", []):
+            self.assignations_par_user[assignation.get("user_id")].append(assignation)
+
+        self.inscriptions_par_user: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for inscription in snapshot.get("inscriptions", []):
+            self.inscriptions_par_user[inscription.get("user_id")].append(inscription)
+
+        # Une intervention par employé présent (une seule fois même s'il figure deux fois)
+        self.interventions_par_user: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for intervention in snapshot.get("interventions", []):
+            for user_id in dict.fromkeys(p.get("user_id") for p in intervention.get("personnel_present", []) or []):
+                self.interventions_par_user[user_id].append(intervention)
+
+
+def calculer_feuille(
+    employe: Dict[str, Any],
+    donnees: DonneesPaie,
+    periode_debut: str,
+    periode_fin: str,
+    params_paie: dict,
+    params_planning: dict,
+    current_user_id: str
+) -> dict:
+    """
+    Calcule la feuille de temps pour un employé sur une période donnée.
+    Agrège: gardes planifiées, interventions, formations.
+    """
+    user_id = employe["id"]
+    tenant_id = donnees.tenant_id
+    
+    lignes = []
+    totaux = {
+        "gardes_internes": 0.0,
+        "gardes_externes": 0.0,
+        "rappels": 0.0,
+        "formations": 0.0,
+        "interventions": 0.0,
+        "heures_sup": 0.0,
+        "heures_payees": 0.0,
+        "montant_brut": 0.0,
+        "primes_repas": 0.0
+    }
+    
+    # Taux horaire: utiliser celui de l'employé ou le taux par défaut des paramètres
+    taux_horaire = employe.get("taux_horaire", 0.0) or 0.0
+    if taux_horaire == 0:
+        taux_horaire = params_paie.get("taux_horaire_defaut", 25.0)
+    
+    type_emploi = employe.get("type_emploi", "temps_plein")
+    est_temps_plein = type_emploi == "temps_plein"
+    
+    # Prime fonction supérieure: vérifier si l'employé peut occuper un poste supérieur
+    a_fonction_superieur = employe.get("fonction_superieur", False)
+    
+    # Lire la prime FS depuis l'échelle salariale (prioritaire) ou les params paie (fallback)
+    echelle_salariale = donnees.echelle_salariale
+    prime_fonction_superieure_pct = (
+        echelle_salariale.get("prime_fonction_superieure_pct", 10) if echelle_salariale 
+        else params_paie.get("prime_fonction_superieure_pct", 10)
+    ) / 100  # Convertir % en décimal
+    
+    grade_employe = (employe.get("grade", "") or "").lower()
+    
+    grades_hierarchie = GRADES_HIERARCHIE
+    niveau_grade_employe = grades_hierarchie.get(grade_employe, 1)
+    
+    # Autorisation heures supplémentaires (depuis paramètres planning)
+    heures_sup_autorisees = params_planning.get("activer_gestion_heures_sup", False)
+    
+    # 1. GARDES PLANIFIÉES (du module Planning)
+    assignations = donnees.assignations_par_user.get(user_id, [])
+    types_garde_map = donnees.types_garde_map
+    
+    for assignation in assignations:
+        type_garde = types_garde_map.get(assignation.get("type_garde_id"))
+        if not type_garde:
+            continue
+        
+        duree_heures = type_garde.get("duree_heures", 0)
+        est_garde_externe = type_garde.get("est_garde_externe", False)
+        
+        # Vérifier si fonction supérieure s'applique
+        # La position assignée (poste) peut avoir un grade_requis ou on utilise la logique existante
+        position_id = assignation.get("position_id")
+        applique_fonction_superieure = False
+        taux_horaire_effectif = taux_horaire
+        
+        if a_fonction_superieur and position_id:
+            # Récupérer la configuration de position pour voir le grade requis
+            position = donnees.positions.get(position_id)
+            if position:
+                grade_requis = (position.get("grade_requis", "") or "").lower()
+                niveau_grade_requis = grades_hierarchie.get(grade_requis, 1)
+                
+                # Si le grade requis est supérieur au grade de l'employé, appliquer la prime
+                if niveau_grade_requis > niveau_grade_employe:
+                    applique_fonction_superieure = True
+                    taux_horaire_effectif = taux_horaire * (1 + prime_fonction_superieure_pct)
+        
+        if est_garde_externe:
+            # Garde externe: rémunérée
+            taux = params_paie.get("garde_externe_taux", 1.0)
+            minimum = params_paie.get("garde_externe_minimum_heures", 0)
+            heures_payees = max(duree_heures, minimum) if duree_heures > 0 else 0
+            montant = heures_payees * taux_horaire_effectif * taux
+            
+            # Ajouter le montant fixe de garde si configuré
+            montant_fixe = type_garde.get("montant_garde", 0) or params_paie.get("garde_externe_montant_fixe", 0)
+            montant += montant_fixe
+            
+            totaux["gardes_externes"] += duree_heures
+            totaux["heures_payees"] += heures_payees
+            totaux["montant_brut"] += montant
+            
+            description = f"Garde externe - {type_garde.get('nom')}"
+            if applique_fonction_superieure:
+                description += f" (Fonction supérieure +{int(prime_fonction_superieure_pct*100)}%)"
+            
+            lignes.append({
+                "date": assignation.get("date"),
+                "type": "garde_externe",
+                "description": description,
+                "heures_brutes": duree_heures,
+                "heures_payees": heures_payees,
+                "taux": taux,
+                "montant": montant,
+                "source_id": assignation.get("id"),
+                "source_type": "assignation",
+                "fonction_superieure": applique_fonction_superieure
+            })
+        else:
+            # Garde interne: comptabilisée mais pas forcément payée en plus
+            # Pour temps plein: déjà inclus dans le salaire
+            # Pour temps partiel: payé
+            if est_temps_plein:
+                taux = params_paie.get("garde_interne_taux", 0.0)
+            else:
+                taux = 1.0  # Temps partiel payé normalement
+            
+            heures_payees = duree_heures
+            montant = heures_payees * taux_horaire_effectif * taux
+            
+            totaux["gardes_internes"] += duree_heures
+            if taux > 0:
+                totaux["heures_payees"] += heures_payees
+                totaux["montant_brut"] += montant
+            
+            description = f"Garde interne - {type_garde.get('nom')}"
+            if applique_fonction_superieure and taux > 0:
+                description += f" (Fonction supérieure +{int(prime_fonction_superieure_pct*100)}%)"
+            
+            lignes.append({
+                "date": assignation.get("date"),
+                "type": "garde_interne",
+                "description": description,
+                "heures_brutes": duree_heures,
+                "heures_payees": heures_payees if taux > 0 else 0,
+                "taux": taux,
+                "montant": montant,
+                "source_id": assignation.get("id"),
+                "source_type": "assignation",
+                "note": "Inclus dans salaire" if taux == 0 else None
+            })
+    
+    # 2. INTERVENTIONS (présence aux interventions)
+    interventions = donnees.interventions_par_user.get(user_id, [])
+    
+    for intervention in interventions:
+        personnel_present = intervention.get("personnel_present", [])
+        # Récupérer aussi les données de manual_personnel pour les heures partielles
+        manual_personnel = intervention.get("manual_personnel", [])
+        
+        for p in personnel_present:
+            if p.get("user_id") != user_id:
+                continue
+            
+            # Récupérer les données de la personne dans manual_personnel (heures partielles)
+            manual_data = next((mp for mp in manual_personnel if mp.get("id") == user_id or mp.get("user_id") == user_id), None)
+            
+            # Calculer la durée de présence
+            time_start = intervention.get("xml_time_call_received")
+            time_end = intervention.get("xml_time_terminated") or intervention.get("xml_time_call_closed")
+            
+            if not time_start or not time_end:
+                continue
+            
+            try:
+                if isinstance(time_start, str):
+                    start_dt = datetime.fromisoformat(time_start.replace('Z', '+00:00'))
+                else:
+                    start_dt = time_start
+                if isinstance(time_end, str):
+                    end_dt = datetime.fromisoformat(time_end.replace('Z', '+00:00'))
+                else:
+                    end_dt = time_end
+                
+                # Utiliser les heures partielles si disponibles
+                heure_arrivee = manual_data.get("heure_arrivee") if manual_data else p.get("heure_arrivee")
+                heure_depart = manual_data.get("heure_depart") if manual_data else p.get("heure_depart")
+                
+                if heure_arrivee and heure_depart:
+                    # Calculer la durée à partir des heures partielles
+                    date_str = start_dt.strftime("%Y-%m-%d")
+                    arrivee_dt = datetime.fromisoformat(f"{date_str}T{heure_arrivee}:00")
+                    depart_dt = datetime.fromisoformat(f"{date_str}T{heure_depart}:00")
+                    # Gérer le cas où l'intervention passe minuit
+                    if depart_dt < arrivee_dt:
+                        depart_dt += timedelta(days=1)
+                    duree_heures = (depart_dt - arrivee_dt).total_seconds() / 3600
+                    heures_partielles = True
+                else:
+                    # Utiliser la durée totale de l'intervention
+                    duree_heures = (end_dt - start_dt).total_seconds() / 3600
+                    heures_partielles = False
+            except:
+                continue
+            
+            # Vérifier si l'employé était en garde interne ce jour-là
+            date_intervention = start_dt.strftime("%Y-%m-%d")
+            assignation_jour = next(
+                (a for a in assignations 
+                 if a.get("date") == date_intervention 
+                 and not types_garde_map.get(a.get("type_garde_id"), {}).get("est_garde_externe", False)),
+                None
+            )
+            
+            statut_presence = p.get("statut", "present")
+            
+            # Vérifier si l'employé a été utilisé en fonction supérieure pour cette intervention
+            utilise_fonction_superieure = p.get("utilise_fonction_superieure", False)
+            taux_horaire_intervention = taux_horaire
+            
+            if utilise_fonction_superieure and a_fonction_superieur:
+                # Appliquer la prime de fonction supérieure
+                taux_horaire_intervention = taux_horaire * (1 + prime_fonction_superieure_pct)
+            
+            if assignation_jour and statut_presence == "present":
+                # Était en garde interne - intervention comptée dans stats mais pas payée en plus
+                # SAUF si l'intervention se termine APRÈS la fin du quart (heures supplémentaires)
+                totaux["interventions"] += duree_heures
+                
+                # Vérifier si l'intervention dépasse la fin du quart de garde
+                type_garde_assignation = types_garde_map.get(assignation_jour.get("type_garde_id"), {})
+                heure_fin_quart = type_garde_assignation.get("heure_fin")  # Format "HH:MM"
+                
+                heures_depassement = 0
+                montant_depassement = 0
+                
+                if heure_fin_quart and end_dt:
+                    try:
+                        # Construire le datetime de fin de quart pour cette date
+                        heure_fin_parts = heure_fin_quart.split(":")
+                        fin_quart_dt = datetime(
+                            start_dt.year, start_dt.month, start_dt.day,
+                            int(heure_fin_parts[0]), int(heure_fin_parts[1])
+                        )
+                        
+                        # Gérer le cas où le quart traverse minuit
+                        heure_debut_quart = type_garde_assignation.get("heure_debut", "00:00")
+                        if heure_debut_quart and heure_fin_quart:
+                            heure_debut_parts = heure_debut_quart.split(":")
+                            debut_quart_h = int(heure_debut_parts[0])
+                            fin_quart_h = int(heure_fin_parts[0])
+                            # Si heure fin < heure début, le quart traverse minuit
+                            if fin_quart_h < debut_quart_h:
+                                fin_quart_dt += timedelta(days=1)
+                        
+                        # Normaliser end_dt pour comparaison (enlever timezone si nécessaire)
+                        end_dt_naive = end_dt.replace(tzinfo=None) if hasattr(end_dt, 'tzinfo') and end_dt.tzinfo else end_dt
+                        
+                        # Si l'intervention se termine après la fin du quart
+                        if end_dt_naive > fin_quart_dt:
+                            # Calculer le dépassement en heures
+                            delta_depassement = end_dt_naive - fin_quart_dt
+                            heures_depassement = delta_depassement.total_seconds() / 3600
+                            
+                            # Appliquer le taux des heures supplémentaires (toujours applicable pour dépassement intervention)
+                            taux_sup = params_paie.get("heures_sup_taux", 1.5)
+                            montant_depassement = heures_depassement * taux_horaire_intervention * taux_sup
+                            
+                            # Ajouter aux totaux
+                            totaux["heures_sup"] += heures_depassement
+                            totaux["heures_payees"] += heures_depassement
+                            totaux["montant_brut"] += montant_depassement
+                    except Exception as e:
+                        logger.warning(f"Erreur calcul dépassement quart: {e}")
+                
+                description = f"Intervention #{intervention.get('external_call_id')} - {intervention.get('type_intervention', 'N/A')}"
+                if utilise_fonction_superieure:
+                    description += f" (Fonction supérieure +{int(prime_fonction_superieure_pct*100)}%)"
+                if heures_partielles:
+                    description += f" (présence partielle: {heure_arrivee}-{heure_depart})"
+                
+                lignes.append({
+                    "date": date_intervention,
+                    "type": "intervention_garde_interne",
+                    "description": description,
+                    "heures_brutes": round(duree_heures, 2),
+                    "heures_payees": 0,
+                    "taux": 0,
+                    "montant": 0,
+                    "source_id": intervention.get("id"),
+                    "source_type": "intervention",
+                    "fonction_superieure": utilise_fonction_superieure,
+                    "heures_partielles": heures_partielles,
+                    "heure_arrivee": heure_arrivee if heures_partielles else None,
+                    "heure_depart": heure_depart if heures_partielles else None,
+                    "note": "Déjà en garde interne - comptabilisé dans statistiques"
+                })
+                
+                # Ajouter une ligne séparée pour le dépassement d'intervention (heures supplémentaires)
+                if heures_depassement > 0:
+                    taux_sup = params_paie.get("heures_sup_taux", 1.5)
+                    description_depassement = f"Dépassement intervention #{intervention.get('external_call_id')} (fin quart: {heure_fin_quart})"
+                    if utilise_fonction_superieure:
+                        description_depassement += f" (Fonction supérieure +{int(prime_fonction_superieure_pct*100)}%)"
+                    
+                    lignes.append({
+                        "date": date_intervention,
+                        "type": "depassement_intervention",
+                        "description": description_depassement,
+                        "heures_brutes": round(heures_depassement, 2),
+                        "heures_payees": round(heures_depassement, 2),
+                        "taux": taux_sup,
+                        "montant": round(montant_depassement, 2),
+                        "source_id": intervention.get("id"),
+                        "source_type": "intervention",
+                        "fonction_superieure": utilise_fonction_superieure,
+                        "heure_fin_quart": heure_fin_quart,
+                        "note": "Heures supplémentaires - intervention après fin de quart"
+                    })
+            elif statut_presence in ["rappele", "present"]:
+                # Rappel ou garde externe - payé
+                taux = params_paie.get("rappel_taux", 1.0)
+                
+                # Déterminer le minimum selon la source de l'appel
+                # Utiliser type_carte si disponible, sinon source_appel legacy
+                type_carte = intervention.get("type_carte")
+                if type_carte == "alerte_sante":
+                    source_appel = "premier_repondant"
+                else:
+                    source_appel = intervention.get("source_appel", "cauca")
+                
+                # Vérifier si la source est activée et déterminer le minimum
+                if source_appel == "premier_repondant":
+                    if params_paie.get("activer_premier_repondant", False):
+                        minimum = params_paie.get("minimum_heures_premier_repondant", 2.0)
+                    else:
+                        # Premier répondant pas activé, utiliser le minimum CAUCA par défaut
+                        minimum = params_paie.get("minimum_heures_cauca", 3.0)
+                else:
+                    # CAUCA (pompiers) - toujours activé par défaut
+                    if params_paie.get("activer_cauca", True):
+                        minimum = params_paie.get("minimum_heures_cauca", 3.0)
+                    else:
+                        # Si CAUCA désactivé (rare), pas de minimum
+                        minimum = 0
+                
+                heures_payees = max(duree_heures, minimum)
+                montant = heures_payees * taux_horaire_intervention * taux
+                
+                totaux["rappels"] += duree_heures
+                totaux["heures_payees"] += heures_payees
+                totaux["montant_brut"] += montant
+                
+                # Description avec info sur la source
+                source_label = "PR" if source_appel == "premier_repondant" else "CAUCA"
+                description = f"Intervention #{intervention.get('external_call_id')} [{source_label}] - {intervention.get('type_intervention', 'N/A')}"
+                if utilise_fonction_superieure:
+                    description += f" (Fonction supérieure +{int(prime_fonction_superieure_pct*100)}%)"
+                if heures_partielles:
+                    description += f" (présence: {heure_arrivee}-{heure_depart})"
+                if heures_payees > duree_heures:
+                    description += f" (min {minimum}h)"
+                
+                lignes.append({
+                    "date": date_intervention,
+                    "type": "rappel" if statut_presence == "rappele" else "intervention",
+                    "description": description,
+                    "heures_brutes": round(duree_heures, 2),
+                    "heures_payees": round(heures_payees, 2),
+                    "taux": taux,
+                    "montant": round(montant, 2),
+                    "source_id": intervention.get("id"),
+                    "source_type": "intervention",
+                    "source_appel": source_appel,
+                    "minimum_applique": minimum if heures_payees > duree_heures else None,
+                    "fonction_superieure": utilise_fonction_superieure
+                })
+            
+            # Primes de repas
+            if params_paie.get("inclure_primes_repas", True):
+                primes_repas_montant = 0
+                params_interventions = donnees.intervention_settings
+                if params_interventions:
+                    if p.get("prime_dejeuner"):
+                        primes_repas_montant += params_interventions.get("repas_dejeuner", {}).get("montant", 0)
+                    if p.get("prime_diner"):
+                        primes_repas_montant += params_interventions.get("repas_diner", {}).get("montant", 0)
+                    if p.get("prime_souper"):
+                        primes_repas_montant += params_interventions.get("repas_souper", {}).get("montant", 0)
+                
+                if primes_repas_montant > 0:
+                    totaux["primes_repas"] += primes_repas_montant
+                    lignes.append({
+                        "date": date_intervention,
+                        "type": "prime_repas",
+                        "description": f"Primes repas - Intervention #{intervention.get('external_call_id')}",
+                        "heures_brutes": 0,
+                        "heures_payees": 0,
+                        "taux": 0,
+                        "montant": primes_repas_montant,
+                        "source_id": intervention.get("id"),
+                        "source_type": "intervention"
+                    })
+    
+    # 3. FORMATIONS
+    inscriptions = donnees.inscriptions_par_user.get(user_id, [])
+    
+    for inscription in inscriptions:
+        formation = donnees.formations.get(inscription.get("formation_id"))
+        if not formation:
+            continue
+        
+        # Vérifier si la formation est dans la période
+        date_formation = formation.get("date_debut", "")
+        if not (periode_debut <= date_formation <= periode_fin):
+            continue
+        
+        duree_heures = inscription.get("heures_creditees", 0) or formation.get("duree_heures", 0)
+        
+        # Taux pour formations
+        if params_paie.get("formation_taux_specifique", False):
+            taux_formation = params_paie.get("formation_taux_horaire", taux_horaire)
+            montant = duree_heures * taux_formation
+        else:
+            taux = params_paie.get("formation_taux", 1.0)
+            montant = duree_heures * taux_horaire * taux
+        
+        totaux["formations"] += duree_heures
+        totaux["heures_payees"] += duree_heures
+        totaux["montant_brut"] += montant
+        
+        lignes.append({
+            "date": date_formation,
+            "type": "formation",
+            "description": f"Formation - {formation.get('nom')}",
+            "heures_brutes": duree_heures,
+            "heures_payees": duree_heures,
+            "taux": params_paie.get("formation_taux", 1.0),
+            "montant": round(montant, 2),
+            "source_id": formation.get("id"),
+            "source_type": "formation"
+        })
+    
+    # 4. CALCUL HEURES SUPPLÉMENTAIRES (si autorisées)
+    if heures_sup_autorisees:
+        seuil = params_paie.get("heures_sup_seuil_hebdo", 40)
+        taux_sup = params_paie.get("heures_sup_taux", 1.5)
+        
+        # Regrouper par semaine pour calculer les heures sup
+        heures_par_semaine = {}
+        for ligne in lignes:
+            if ligne.get("heures_payees", 0) > 0:
+                date_str = ligne.get("date", "")
+                if date_str:
+                    try:
+                        dt = datetime.strptime(date_str, "%Y-%m-%d")
+                        # Trouver le lundi de la semaine
+                        lundi = dt - timedelta(days=dt.weekday())
+                        semaine_key = lundi.strftime("%Y-%m-%d")
+                        heures_par_semaine[semaine_key] = heures_par_semaine.get(semaine_key, 0) + ligne.get("heures_payees", 0)
+                    except:
+                        pass
+        
+        for semaine, heures in heures_par_semaine.items():
+            if heures > seuil:
+                heures_sup = heures - seuil
+                montant_sup = heures_sup * taux_horaire * (taux_sup - 1)  # Différentiel seulement
+                totaux["heures_sup"] += heures_sup
+                totaux["montant_brut"] += montant_sup
+                
+                lignes.append({
+                    "date": semaine,
+                    "type": "heures_supplementaires",
+                    "description": f"Heures supplémentaires semaine du {semaine}",
+                    "heures_brutes": heures_sup,
+                    "heures_payees": heures_sup,
+                    "taux": taux_sup - 1,  # Différentiel
+                    "montant": round(montant_sup, 2),
+                    "source_id": None,
+                    "source_type": "calcul"
+                })
+    
+    # Trier les lignes par date
+    lignes.sort(key=lambda x: x.get("date", ""))
+    
+    # Calculer le numéro de période
+    try:
+        debut_dt = datetime.strptime(periode_debut, "%Y-%m-%d")
+        debut_annee = datetime(debut_dt.year, 1, 1)
+        jours_depuis_debut = (debut_dt - debut_annee).days
+        numero_periode = (jours_depuis_debut // params_paie.get("periode_paie_jours", 14)) + 1
+    except:
+        numero_periode = 1
+    
+    # Construire la feuille de temps
+    maintenant = datetime.now(timezone.utc)
+    feuille = {
+        "id": str(uuid.uuid4()),
+        "tenant_id": tenant_id,
+        "user_id": user_id,
+        "annee": datetime.strptime(periode_debut, "%Y-%m-%d").year,
+        "periode_debut": periode_debut,
+        "periode_fin": periode_fin,
+        "numero_periode": numero_periode,
+        
+        "employe_nom": employe.get("nom", ""),
+        "employe_prenom": employe.get("prenom", ""),
+        "employe_numero": employe.get("numero_employe", ""),
+        "employe_grade": employe.get("grade", ""),
+        "employe_type_emploi": type_emploi,
+        "employe_taux_horaire": taux_horaire,
+        
+        "lignes": lignes,
+        
+        "total_heures_gardes_internes": round(totaux["gardes_internes"], 2),
+        "total_heures_gardes_externes": round(totaux["gardes_externes"], 2),
+        "total_heures_rappels": round(totaux["rappels"], 2),
+        "total_heures_formations": round(totaux["formations"], 2),
+        "total_heures_interventions": round(totaux["interventions"], 2),
+        "total_heures_supplementaires": round(totaux["heures_sup"], 2),
+        
+        "total_heures_payees": round(totaux["heures_payees"], 2),
+        "total_montant_brut": round(totaux["montant_brut"], 2),
+        "total_primes_repas": round(totaux["primes_repas"], 2),
+        "total_montant_final": round(totaux["montant_brut"] + totaux["primes_repas"], 2),
+        
+        "statut": "brouillon",
+        "genere_par": current_user_id,
+        "genere_le": maintenant,
+        
+        "created_at": maintenant,
+        "updated_at": maintenant
+    }
+    
+    return feuille
+
+
+def calculer_lot_feuilles(
+    snapshot: Dict[str, Any],
+    employes: List[Dict[str, Any]],
+    periode_debut: str,
+    periode_fin: str,
+    params_paie: dict,
+    params_planning: dict,
+    current_user_id: str
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Calcule les feuilles d'un lot d'employés (point d'entrée du pool de processus).
+    Une erreur sur un employé n'interrompt pas le lot.
+    """
+    donnees = DonneesPaie(snapshot)
+    resultat = {"feuilles": [], "erreurs": []}
+    for employe in employes:
+        try:
+            resultat["feuilles"].append(calculer_feuille(
+                employe, donnees, periode_debut, periode_fin,
+                params_paie, params_planning, current_user_id
+            ))
+        except Exception as e:
+            resultat["erreurs"].append({
+                "employe": f"{employe.get('prenom')} {employe.get('nom')}",
+                "erreur": str(e)
+            })
+    return resultat
@@ -13,15 +13,25 @@ from fastapi import APIRouter, Depends, HTTPException, Response, UploadFile, Fil
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import os
+import time
 import uuid
 import logging
 import io
 import json
 import csv
 import httpx
+from pymongo import DeleteOne, InsertOne
 
+from services.export_jobs import construire_pdf_hors_boucle
+from services.process_pools import get_process_pool
+from services.streaming_xlsx import MEDIA_TYPE_XLSX, ClasseurStreaming, StyleCellule
+from routes.paie_calcul import DonneesPaie, calculer_feuille, calculer_lot_feuilles
 from routes.dependencies import (
     db,
+    invalidate_user_cache,
     get_current_user,
     get_super_admin,
     get_tenant_from_slug,
@@ -599,565 +609,110 @@ async def update_parametres_paie(
 
 # ==================== GÉNÉRATION FEUILLES DE TEMPS ====================
 
-async def calculer_feuille_temps(
+async def charger_snapshot_paie(
     tenant_id: str,
-    user_id: str,
+    user_ids: List[str],
     periode_debut: str,
-    periode_fin: str,
-    params_paie: dict,
-    params_planning: dict,
-    current_user_id: str
-) -> dict:
+    periode_fin: str
+) -> Dict[str, Any]:
     """
-    Calcule la feuille de temps pour un employé sur une période donnée.
-    Agrège: gardes planifiées, interventions, formations.
+    Charge en une fois les données de la période pour tous les employés
+    demandés (assignations, positions, interventions, formations, échelle
+    salariale). Le résultat ne contient que des données Python simples
+    (sérialisables) pour pouvoir être envoyé au pool de calcul.
     """
-    # Récupérer l'employé
-    employe = await db.users.find_one({"id": user_id}, {"_id": 0, "mot_de_passe_hash": 0})
-    if not employe:
-        raise HTTPException(status_code=404, detail="Employé non trouvé")
+    types_garde = await db.types_garde.find({"tenant_id": tenant_id}, {"_id": 0}).to_list(None)
+    echelle_salariale = await db.echelles_salariales.find_one({"tenant_id": tenant_id}, {"_id": 0})
+    intervention_settings = await db.intervention_settings.find_one({"tenant_id": tenant_id}, {"_id": 0})
     
-    lignes = []
-    totaux = {
-        "gardes_internes": 0.0,
-        "gardes_externes": 0.0,
-        "rappels": 0.0,
-        "formations": 0.0,
-        "interventions": 0.0,
-        "heures_sup": 0.0,
-        "heures_payees": 0.0,
-        "montant_brut": 0.0,
-        "primes_repas": 0.0
-    }
-    
-    # Taux horaire: utiliser celui de l'employé ou le taux par défaut des paramètres
-    taux_horaire = employe.get("taux_horaire", 0.0) or 0.0
-    if taux_horaire == 0:
-        taux_horaire = params_paie.get("taux_horaire_defaut", 25.0)
-    
-    type_emploi = employe.get("type_emploi", "temps_plein")
-    est_temps_plein = type_emploi == "temps_plein"
-    
-    # Prime fonction supérieure: vérifier si l'employé peut occuper un poste supérieur
-    a_fonction_superieur = employe.get("fonction_superieur", False)
-    
-    # Lire la prime FS depuis l'échelle salariale (prioritaire) ou les params paie (fallback)
-    echelle_salariale = await db.echelles_salariales.find_one({"tenant_id": tenant.id})
-    prime_fonction_superieure_pct = (
-        echelle_salariale.get("prime_fonction_superieure_pct", 10) if echelle_salariale 
-        else params_paie.get("prime_fonction_superieure_pct", 10)
-    ) / 100  # Convertir % en décimal
-    
-    grade_employe = (employe.get("grade", "") or "").lower()
-    
-    # Hiérarchie des grades (du plus bas au plus haut)
-    grades_hierarchie = {
-        "pompier": 1,
-        "lieutenant": 2,
-        "capitaine": 3,
-        "chef": 4,
-        "directeur": 5,
-        "eligible": 2,
-        "éligible": 2
-    }
-    niveau_grade_employe = grades_hierarchie.get(grade_employe, 1)
-    
-    # Autorisation heures supplémentaires (depuis paramètres planning)
-    heures_sup_autorisees = params_planning.get("activer_gestion_heures_sup", False)
-    
-    # 1. GARDES PLANIFIÉES (du module Planning)
     assignations = await db.assignations.find({
         "tenant_id": tenant_id,
-        "user_id": user_id,
+        "user_id": {"$in": user_ids},
         "date": {"$gte": periode_debut, "$lte": periode_fin}
-    }).to_list(1000)
+    }, {"_id": 0}).to_list(None)
     
-    types_garde_map = {}
-    types_garde = await db.types_garde.find({"tenant_id": tenant_id}).to_list(100)
-    for tg in types_garde:
-        types_garde_map[tg["id"]] = tg
+    position_ids = list({a["position_id"] for a in assignations if a.get("position_id")})
+    positions = {}
+    if position_ids:
+        async for position in db.positions.find({"id": {"$in": position_ids}, "tenant_id": tenant_id}, {"_id": 0}):
+            positions[position["id"]] = position
     
-    for assignation in assignations:
-        type_garde = types_garde_map.get(assignation.get("type_garde_id"))
-        if not type_garde:
-            continue
-        
-        duree_heures = type_garde.get("duree_heures", 0)
-        est_garde_externe = type_garde.get("est_garde_externe", False)
-        
-        # Vérifier si fonction supérieure s'applique
-        # La position assignée (poste) peut avoir un grade_requis ou on utilise la logique existante
-        position_id = assignation.get("position_id")
-        applique_fonction_superieure = False
-        taux_horaire_effectif = taux_horaire
-        
-        if a_fonction_superieur and position_id:
-            # Récupérer la configuration de position pour voir le grade requis
-            position = await db.positions.find_one({"id": position_id, "tenant_id": tenant_id})
-            if position:
-                grade_requis = (position.get("grade_requis", "") or "").lower()
-                niveau_grade_requis = grades_hierarchie.get(grade_requis, 1)
-                
-                # Si le grade requis est supérieur au grade de l'employé, appliquer la prime
-                if niveau_grade_requis > niveau_grade_employe:
-                    applique_fonction_superieure = True
-                    taux_horaire_effectif = taux_horaire * (1 + prime_fonction_superieure_pct)
-        
-        if est_garde_externe:
-            # Garde externe: rémunérée
-            taux = params_paie.get("garde_externe_taux", 1.0)
-            minimum = params_paie.get("garde_externe_minimum_heures", 0)
-            heures_payees = max(duree_heures, minimum) if duree_heures > 0 else 0
-            montant = heures_payees * taux_horaire_effectif * taux
-            
-            # Ajouter le montant fixe de garde si configuré
-            montant_fixe = type_garde.get("montant_garde", 0) or params_paie.get("garde_externe_montant_fixe", 0)
-            montant += montant_fixe
-            
-            totaux["gardes_externes"] += duree_heures
-            totaux["heures_payees"] += heures_payees
-            totaux["montant_brut"] += montant
-            
-            description = f"Garde externe - {type_garde.get('nom')}"
-            if applique_fonction_superieure:
-                description += f" (Fonction supérieure +{int(prime_fonction_superieure_pct*100)}%)"
-            
-            lignes.append({
-                "date": assignation.get("date"),
-                "type": "garde_externe",
-                "description": description,
-                "heures_brutes": duree_heures,
-                "heures_payees": heures_payees,
-                "taux": taux,
-                "montant": montant,
-                "source_id": assignation.get("id"),
-                "source_type": "assignation",
-                "fonction_superieure": applique_fonction_superieure
-            })
-        else:
-            # Garde interne: comptabilisée mais pas forcément payée en plus
-            # Pour temps plein: déjà inclus dans le salaire
-            # Pour temps partiel: payé
-            if est_temps_plein:
-                taux = params_paie.get("garde_interne_taux", 0.0)
-            else:
-                taux = 1.0  # Temps partiel payé normalement
-            
-            heures_payees = duree_heures
-            montant = heures_payees * taux_horaire_effectif * taux
-            
-            totaux["gardes_internes"] += duree_heures
-            if taux > 0:
-                totaux["heures_payees"] += heures_payees
-                totaux["montant_brut"] += montant
-            
-            description = f"Garde interne - {type_garde.get('nom')}"
-            if applique_fonction_superieure and taux > 0:
-                description += f" (Fonction supérieure +{int(prime_fonction_superieure_pct*100)}%)"
-            
-            lignes.append({
-                "date": assignation.get("date"),
-                "type": "garde_interne",
-                "description": description,
-                "heures_brutes": duree_heures,
-                "heures_payees": heures_payees if taux > 0 else 0,
-                "taux": taux,
-                "montant": montant,
-                "source_id": assignation.get("id"),
-                "source_type": "assignation",
-                "note": "Inclus dans salaire" if taux == 0 else None
-            })
-    
-    # 2. INTERVENTIONS (présence aux interventions)
     interventions = await db.interventions.find({
         "tenant_id": tenant_id,
         "status": "signed",
-        "xml_time_call_received": {"$gte": periode_debut, "$lte": periode_fin + "T23:59:59"}
-    }).to_list(1000)
+        "xml_time_call_received": {"$gte": periode_debut, "$lte": periode_fin + "T23:59:59"},
+        "personnel_present.user_id": {"$in": user_ids}
+    }, {"_id": 0}).to_list(None)
     
-    for intervention in interventions:
-        personnel_present = intervention.get("personnel_present", [])
-        # Récupérer aussi les données de manual_personnel pour les heures partielles
-        manual_personnel = intervention.get("manual_personnel", [])
-        
-        for p in personnel_present:
-            if p.get("user_id") != user_id:
-                continue
-            
-            # Récupérer les données de la personne dans manual_personnel (heures partielles)
-            manual_data = next((mp for mp in manual_personnel if mp.get("id") == user_id or mp.get("user_id") == user_id), None)
-            
-            # Calculer la durée de présence
-            time_start = intervention.get("xml_time_call_received")
-            time_end = intervention.get("xml_time_terminated") or intervention.get("xml_time_call_closed")
-            
-            if not time_start or not time_end:
-                continue
-            
-            try:
-                if isinstance(time_start, str):
-                    start_dt = datetime.fromisoformat(time_start.replace('Z', '+00:00'))
-                else:
-                    start_dt = time_start
-                if isinstance(time_end, str):
-                    end_dt = datetime.fromisoformat(time_end.replace('Z', '+00:00'))
-                else:
-                    end_dt = time_end
-                
-                # Utiliser les heures partielles si disponibles
-                heure_arrivee = manual_data.get("heure_arrivee") if manual_data else p.get("heure_arrivee")
-                heure_depart = manual_data.get("heure_depart") if manual_data else p.get("heure_depart")
-                
-                if heure_arrivee and heure_depart:
-                    # Calculer la durée à partir des heures partielles
-                    date_str = start_dt.strftime("%Y-%m-%d")
-                    arrivee_dt = datetime.fromisoformat(f"{date_str}T{heure_arrivee}:00")
-                    depart_dt = datetime.fromisoformat(f"{date_str}T{heure_depart}:00")
-                    # Gérer le cas où l'intervention passe minuit
-                    if depart_dt < arrivee_dt:
-                        depart_dt += timedelta(days=1)
-                    duree_heures = (depart_dt - arrivee_dt).total_seconds() / 3600
-                    heures_partielles = True
-                else:
-                    # Utiliser la durée totale de l'intervention
-                    duree_heures = (end_dt - start_dt).total_seconds() / 3600
-                    heures_partielles = False
-            except:
-                continue
-            
-            # Vérifier si l'employé était en garde interne ce jour-là
-            date_intervention = start_dt.strftime("%Y-%m-%d")
-            assignation_jour = next(
-                (a for a in assignations 
-                 if a.get("date") == date_intervention 
-                 and not types_garde_map.get(a.get("type_garde_id"), {}).get("est_garde_externe", False)),
-                None
-            )
-            
-            statut_presence = p.get("statut", "present")
-            
-            # Vérifier si l'employé a été utilisé en fonction supérieure pour cette intervention
-            utilise_fonction_superieure = p.get("utilise_fonction_superieure", False)
-            taux_horaire_intervention = taux_horaire
-            
-            if utilise_fonction_superieure and a_fonction_superieur:
-                # Appliquer la prime de fonction supérieure
-                taux_horaire_intervention = taux_horaire * (1 + prime_fonction_superieure_pct)
-            
-            if assignation_jour and statut_presence == "present":
-                # Était en garde interne - intervention comptée dans stats mais pas payée en plus
-                # SAUF si l'intervention se termine APRÈS la fin du quart (heures supplémentaires)
-                totaux["interventions"] += duree_heures
-                
-                # Vérifier si l'intervention dépasse la fin du quart de garde
-                type_garde_assignation = types_garde_map.get(assignation_jour.get("type_garde_id"), {})
-                heure_fin_quart = type_garde_assignation.get("heure_fin")  # Format "HH:MM"
-                
-                heures_depassement = 0
-                montant_depassement = 0
-                
-                if heure_fin_quart and end_dt:
-                    try:
-                        # Construire le datetime de fin de quart pour cette date
-                        heure_fin_parts = heure_fin_quart.split(":")
-                        fin_quart_dt = datetime(
-                            start_dt.year, start_dt.month, start_dt.day,
-                            int(heure_fin_parts[0]), int(heure_fin_parts[1])
-                        )
-                        
-                        # Gérer le cas où le quart traverse minuit
-                        heure_debut_quart = type_garde_assignation.get("heure_debut", "00:00")
-                        if heure_debut_quart and heure_fin_quart:
-                            heure_debut_parts = heure_debut_quart.split(":")
-                            debut_quart_h = int(heure_debut_parts[0])
-                            fin_quart_h = int(heure_fin_parts[0])
-                            # Si heure fin < heure début, le quart traverse minuit
-                            if fin_quart_h < debut_quart_h:
-                                fin_quart_dt += timedelta(days=1)
-                        
-                        # Normaliser end_dt pour comparaison (enlever timezone si nécessaire)
-                        end_dt_naive = end_dt.replace(tzinfo=None) if hasattr(end_dt, 'tzinfo') and end_dt.tzinfo else end_dt
-                        
-                        # Si l'intervention se termine après la fin du quart
-                        if end_dt_naive > fin_quart_dt:
-                            # Calculer le dépassement en heures
-                            delta_depassement = end_dt_naive - fin_quart_dt
-                            heures_depassement = delta_depassement.total_seconds() / 3600
-                            
-                            # Appliquer le taux des heures supplémentaires (toujours applicable pour dépassement intervention)
-                            taux_sup = params_paie.get("heures_sup_taux", 1.5)
-                            montant_depassement = heures_depassement * taux_horaire_intervention * taux_sup
-                            
-                            # Ajouter aux totaux
-                            totaux["heures_sup"] += heures_depassement
-                            totaux["heures_payees"] += heures_depassement
-                            totaux["montant_brut"] += montant_depassement
-                    except Exception as e:
-                        logger.warning(f"Erreur calcul dépassement quart: {e}")
-                
-                description = f"Intervention #{intervention.get('external_call_id')} - {intervention.get('type_intervention', 'N/A')}"
-                if utilise_fonction_superieure:
-                    description += f" (Fonction supérieure +{int(prime_fonction_superieure_pct*100)}%)"
-                if heures_partielles:
-                    description += f" (présence partielle: {heure_arrivee}-{heure_depart})"
-                
-                lignes.append({
-                    "date": date_intervention,
-                    "type": "intervention_garde_interne",
-                    "description": description,
-                    "heures_brutes": round(duree_heures, 2),
-                    "heures_payees": 0,
-                    "taux": 0,
-                    "montant": 0,
-                    "source_id": intervention.get("id"),
-                    "source_type": "intervention",
-                    "fonction_superieure": utilise_fonction_superieure,
-                    "heures_partielles": heures_partielles,
-                    "heure_arrivee": heure_arrivee if heures_partielles else None,
-                    "heure_depart": heure_depart if heures_partielles else None,
-                    "note": "Déjà en garde interne - comptabilisé dans statistiques"
-                })
-                
-                # Ajouter une ligne séparée pour le dépassement d'intervention (heures supplémentaires)
-                if heures_depassement > 0:
-                    taux_sup = params_paie.get("heures_sup_taux", 1.5)
-                    description_depassement = f"Dépassement intervention #{intervention.get('external_call_id')} (fin quart: {heure_fin_quart})"
-                    if utilise_fonction_superieure:
-                        description_depassement += f" (Fonction supérieure +{int(prime_fonction_superieure_pct*100)}%)"
-                    
-                    lignes.append({
-                        "date": date_intervention,
-                        "type": "depassement_intervention",
-                        "description": description_depassement,
-                        "heures_brutes": round(heures_depassement, 2),
-                        "heures_payees": round(heures_depassement, 2),
-                        "taux": taux_sup,
-                        "montant": round(montant_depassement, 2),
-                        "source_id": intervention.get("id"),
-                        "source_type": "intervention",
-                        "fonction_superieure": utilise_fonction_superieure,
-                        "heure_fin_quart": heure_fin_quart,
-                        "note": "Heures supplémentaires - intervention après fin de quart"
-                    })
-            elif statut_presence in ["rappele", "present"]:
-                # Rappel ou garde externe - payé
-                taux = params_paie.get("rappel_taux", 1.0)
-                
-                # Déterminer le minimum selon la source de l'appel
-                # Utiliser type_carte si disponible, sinon source_appel legacy
-                type_carte = intervention.get("type_carte")
-                if type_carte == "alerte_sante":
-                    source_appel = "premier_repondant"
-                else:
-                    source_appel = intervention.get("source_appel", "cauca")
-                
-                # Vérifier si la source est activée et déterminer le minimum
-                if source_appel == "premier_repondant":
-                    if params_paie.get("activer_premier_repondant", False):
-                        minimum = params_paie.get("minimum_heures_premier_repondant", 2.0)
-                    else:
-                        # Premier répondant pas activé, utiliser le minimum CAUCA par défaut
-                        minimum = params_paie.get("minimum_heures_cauca", 3.0)
-                else:
-                    # CAUCA (pompiers) - toujours activé par défaut
-                    if params_paie.get("activer_cauca", True):
-                        minimum = params_paie.get("minimum_heures_cauca", 3.0)
-                    else:
-                        # Si CAUCA désactivé (rare), pas de minimum
-                        minimum = 0
-                
-                heures_payees = max(duree_heures, minimum)
-                montant = heures_payees * taux_horaire_intervention * taux
-                
-                totaux["rappels"] += duree_heures
-                totaux["heures_payees"] += heures_payees
-                totaux["montant_brut"] += montant
-                
-                # Description avec info sur la source
-                source_label = "PR" if source_appel == "premier_repondant" else "CAUCA"
-                description = f"Intervention #{intervention.get('external_call_id')} [{source_label}] - {intervention.get('type_intervention', 'N/A')}"
-                if utilise_fonction_superieure:
-                    description += f" (Fonction supérieure +{int(prime_fonction_superieure_pct*100)}%)"
-                if heures_partielles:
-                    description += f" (présence: {heure_arrivee}-{heure_depart})"
-                if heures_payees > duree_heures:
-                    description += f" (min {minimum}h)"
-                
-                lignes.append({
-                    "date": date_intervention,
-                    "type": "rappel" if statut_presence == "rappele" else "intervention",
-                    "description": description,
-                    "heures_brutes": round(duree_heures, 2),
-                    "heures_payees": round(heures_payees, 2),
-                    "taux": taux,
-                    "montant": round(montant, 2),
-                    "source_id": intervention.get("id"),
-                    "source_type": "intervention",
-                    "source_appel": source_appel,
-                    "minimum_applique": minimum if heures_payees > duree_heures else None,
-                    "fonction_superieure": utilise_fonction_superieure
-                })
-            
-            # Primes de repas
-            if params_paie.get("inclure_primes_repas", True):
-                primes_repas_montant = 0
-                params_interventions = await db.intervention_settings.find_one({"tenant_id": tenant_id})
-                if params_interventions:
-                    if p.get("prime_dejeuner"):
-                        primes_repas_montant += params_interventions.get("repas_dejeuner", {}).get("montant", 0)
-                    if p.get("prime_diner"):
-                        primes_repas_montant += params_interventions.get("repas_diner", {}).get("montant", 0)
-                    if p.get("prime_souper"):
-                        primes_repas_montant += params_interventions.get("repas_souper", {}).get("montant", 0)
-                
-                if primes_repas_montant > 0:
-                    totaux["primes_repas"] += primes_repas_montant
-                    lignes.append({
-                        "date": date_intervention,
-                        "type": "prime_repas",
-                        "description": f"Primes repas - Intervention #{intervention.get('external_call_id')}",
-                        "heures_brutes": 0,
-                        "heures_payees": 0,
-                        "taux": 0,
-                        "montant": primes_repas_montant,
-                        "source_id": intervention.get("id"),
-                        "source_type": "intervention"
-                    })
-    
-    # 3. FORMATIONS
     inscriptions = await db.inscriptions_formations.find({
         "tenant_id": tenant_id,
-        "user_id": user_id,
+        "user_id": {"$in": user_ids},
         "statut": {"$in": ["present", "complete"]}
-    }).to_list(500)
-    
-    for inscription in inscriptions:
-        formation = await db.formations.find_one({"id": inscription.get("formation_id")})
-        if not formation:
-            continue
-        
-        # Vérifier si la formation est dans la période
-        date_formation = formation.get("date_debut", "")
-        if not (periode_debut <= date_formation <= periode_fin):
-            continue
-        
-        duree_heures = inscription.get("heures_creditees", 0) or formation.get("duree_heures", 0)
-        
-        # Taux pour formations
-        if params_paie.get("formation_taux_specifique", False):
-            taux_formation = params_paie.get("formation_taux_horaire", taux_horaire)
-            montant = duree_heures * taux_formation
-        else:
-            taux = params_paie.get("formation_taux", 1.0)
-            montant = duree_heures * taux_horaire * taux
-        
-        totaux["formations"] += duree_heures
-        totaux["heures_payees"] += duree_heures
-        totaux["montant_brut"] += montant
-        
-        lignes.append({
-            "date": date_formation,
-            "type": "formation",
-            "description": f"Formation - {formation.get('nom')}",
-            "heures_brutes": duree_heures,
-            "heures_payees": duree_heures,
-            "taux": params_paie.get("formation_taux", 1.0),
-            "montant": round(montant, 2),
-            "source_id": formation.get("id"),
-            "source_type": "formation"
-        })
-    
-    # 4. CALCUL HEURES SUPPLÉMENTAIRES (si autorisées)
-    if heures_sup_autorisees:
-        seuil = params_paie.get("heures_sup_seuil_hebdo", 40)
-        taux_sup = params_paie.get("heures_sup_taux", 1.5)
-        
-        # Regrouper par semaine pour calculer les heures sup
-        heures_par_semaine = {}
-        for ligne in lignes:
-            if ligne.get("heures_payees", 0) > 0:
-                date_str = ligne.get("date", "")
-                if date_str:
-                    try:
-                        dt = datetime.strptime(date_str, "%Y-%m-%d")
-                        # Trouver le lundi de la semaine
-                        lundi = dt - timedelta(days=dt.weekday())
-                        semaine_key = lundi.strftime("%Y-%m-%d")
-                        heures_par_semaine[semaine_key] = heures_par_semaine.get(semaine_key, 0) + ligne.get("heures_payees", 0)
-                    except:
-                        pass
-        
-        for semaine, heures in heures_par_semaine.items():
-            if heures > seuil:
-                heures_sup = heures - seuil
-                montant_sup = heures_sup * taux_horaire * (taux_sup - 1)  # Différentiel seulement
-                totaux["heures_sup"] += heures_sup
-                totaux["montant_brut"] += montant_sup
-                
-                lignes.append({
-                    "date": semaine,
-                    "type": "heures_supplementaires",
-                    "description": f"Heures supplémentaires semaine du {semaine}",
-                    "heures_brutes": heures_sup,
-                    "heures_payees": heures_sup,
-                    "taux": taux_sup - 1,  # Différentiel
-                    "montant": round(montant_sup, 2),
-                    "source_id": None,
-                    "source_type": "calcul"
-                })
-    
-    # Trier les lignes par date
-    lignes.sort(key=lambda x: x.get("date", ""))
+    }, {"_id": 0}).to_list(None)
     
-    # Calculer le numéro de période
-    try:
-        debut_dt = datetime.strptime(periode_debut, "%Y-%m-%d")
-        debut_annee = datetime(debut_dt.year, 1, 1)
-        jours_depuis_debut = (debut_dt - debut_annee).days
-        numero_periode = (jours_depuis_debut // params_paie.get("periode_paie_jours", 14)) + 1
-    except:
-        numero_periode = 1
+    formation_ids = list({i["formation_id"] for i in inscriptions if i.get("formation_id")})
+    formations = {}
+    if formation_ids:
+        async for formation in db.formations.find({"id": {"$in": formation_ids}}, {"_id": 0}):
+            formations[formation["id"]] = formation
     
-    # Construire la feuille de temps
-    feuille = {
-        "id": str(uuid.uuid4()),
+    return {
         "tenant_id": tenant_id,
-        "user_id": user_id,
-        "annee": datetime.strptime(periode_debut, "%Y-%m-%d").year,
-        "periode_debut": periode_debut,
-        "periode_fin": periode_fin,
-        "numero_periode": numero_periode,
-        
-        "employe_nom": employe.get("nom", ""),
-        "employe_prenom": employe.get("prenom", ""),
-        "employe_numero": employe.get("numero_employe", ""),
-        "employe_grade": employe.get("grade", ""),
-        "employe_type_emploi": type_emploi,
-        "employe_taux_horaire": taux_horaire,
-        
-        "lignes": lignes,
-        
-        "total_heures_gardes_internes": round(totaux["gardes_internes"], 2),
-        "total_heures_gardes_externes": round(totaux["gardes_externes"], 2),
-        "total_heures_rappels": round(totaux["rappels"], 2),
-        "total_heures_formations": round(totaux["formations"], 2),
-        "total_heures_interventions": round(totaux["interventions"], 2),
-        "total_heures_supplementaires": round(totaux["heures_sup"], 2),
-        
-        "total_heures_payees": round(totaux["heures_payees"], 2),
-        "total_montant_brut": round(totaux["montant_brut"], 2),
-        "total_primes_repas": round(totaux["primes_repas"], 2),
-        "total_montant_final": round(totaux["montant_brut"] + totaux["primes_repas"], 2),
-        
-        "statut": "brouillon",
-        "genere_par": current_user_id,
-        "genere_le": datetime.now(timezone.utc),
-        
-        "created_at": datetime.now(timezone.utc),
-        "updated_at": datetime.now(timezone.utc)
+        "types_garde": types_garde,
+        "positions": positions,
+        "echelle_salariale": echelle_salariale,
+        "intervention_settings": intervention_settings,
+        "formations": formations,
+        "assignations": assignations,
+        "interventions": interventions,
+        "inscriptions": inscriptions
     }
+
+
+async def calculer_feuille_temps(
+    tenant_id: str,
+    user_id: str,
+    periode_debut: str,
+    periode_fin: str,
+    params_paie: dict,
+    params_planning: dict,
+    current_user_id: str
+) -> dict:
+    """
+    Calcule la feuille de temps pour un employé sur une période donnée.
+    Agrège: gardes planifiées, interventions, formations.
+    """
+    employe = await db.users.find_one({"id": user_id}, {"_id": 0, "mot_de_passe_hash": 0})
+    if not employe:
+        raise HTTPException(status_code=404, detail="Employé non trouvé")
     
-    return feuille
+    snapshot = await charger_snapshot_paie(tenant_id, [user_id], periode_debut, periode_fin)
+    return calculer_feuille(
+        employe, DonneesPaie(snapshot), periode_debut, periode_fin,
+        params_paie, params_planning, current_user_id
+    )
+
+
+# ==================== POOL DE CALCUL DE LA PAIE ====================
+
+PAIE_CALCUL_WORKERS = int(os.environ.get("PAIE_CALCUL_WORKERS", "2"))
+
+def get_paie_pool() -> ProcessPoolExecutor:
+    """Pool de processus partagé pour le calcul des feuilles de temps en lot"""
+    return get_process_pool("paie", PAIE_CALCUL_WORKERS)
+
+
+def _snapshot_du_lot(snapshot: Dict[str, Any], user_ids: set) -> Dict[str, Any]:
+    """Restreint l'instantané aux employés d'un lot (moins de données à transférer)"""
+    return {
+        **snapshot,
+        "assignations": [a for a in snapshot["assignations"] if a.get("user_id") in user_ids],
+        "inscriptions": [i for i in snapshot["inscriptions"] if i.get("user_id") in user_ids],
+        "interventions": [
+            i for i in snapshot["interventions"]
+            if any(p.get("user_id") in user_ids for p in i.get("personnel_present", []) or [])
+        ]
+    }
 
 
 @router.post("/{tenant_slug}/paie/feuilles-temps/generer")
@@ -1755,8 +1310,7 @@ async def export_feuilles_pdf(
         elements.append(sig_table)
     
     # Construire le PDF
-    doc.build(elements)
-    buffer.seek(0)
+    buffer = await construire_pdf_hors_boucle(doc, elements)
     
     # Nom du fichier
     if feuille_id and len(feuilles) == 1:
@@ -1783,11 +1337,11 @@ async def export_feuilles_temps(
     params: dict = Body(...),
     current_user: User = Depends(get_current_user)
 ):
-    """Exporte les feuilles de temps au format Excel"""
-    from fastapi.responses import StreamingResponse
-    import pandas as pd
-    from io import BytesIO
-    
+    """
+    Exporte les feuilles de temps au format Excel.
+    Le fichier est entièrement produit avant la réponse ; les feuilles ne
+    sont marquées exportées qu'une fois le fichier généré.
+    """
     tenant = await get_tenant_from_slug(tenant_slug)
     await require_permission(tenant.id, current_user, "paie", "exporter", "feuilles_temps")
     
@@ -1797,26 +1351,16 @@ async def export_feuilles_temps(
     
     feuille_ids = params.get("feuille_ids", [])
     
-    # Récupérer les feuilles à exporter (validées OU déjà exportées)
+    # Feuilles à exporter (validées OU déjà exportées)
+    filtre = {
+        "tenant_id": tenant.id,
+        "statut": {"$in": ["valide", "exporte"]}  # Inclure validées ET exportées
+    }
     if feuille_ids:
-        feuilles = await db.feuilles_temps.find({
-            "id": {"$in": feuille_ids},
-            "tenant_id": tenant.id,
-            "statut": {"$in": ["valide", "exporte"]}  # Inclure validées ET exportées
-        }, {"_id": 0}).to_list(500)
-    else:
-        # Exporter toutes les feuilles validées ou exportées si aucun ID spécifié
-        feuilles = await db.feuilles_temps.find({
-            "tenant_id": tenant.id,
-            "statut": {"$in": ["valide", "exporte"]}  # Inclure validées ET exportées
-        }, {"_id": 0}).to_list(500)
-    
-    if not feuilles:
-        raise HTTPException(status_code=400, detail="Aucune feuille validée ou exportée à exporter")
+        filtre["id"] = {"$in": feuille_ids}
     
     # Récupérer la config du tenant (optionnelle)
     config = await db.tenant_payroll_config.find_one({"tenant_id": tenant.id})
-    company_number = config.get("company_number", "") if config else ""
     
     # Récupérer le fournisseur de paie sélectionné pour le nom du fichier
     provider_name = "paie"
@@ -1833,87 +1377,97 @@ async def export_feuilles_temps(
     # Créer un mapping interne -> code externe
     type_to_code = {m["internal_event_type"]: m["external_pay_code"] for m in code_mappings}
     
-    # Préparer les données pour le format Nethris
-    export_rows = []
+    # Convertir le type interne vers le code Nethris
+    type_mapping = {
+        "GARDE_INTERNE": "H_GARDE_INTERNE",
+        "GARDE_EXTERNE": "H_GARDE_EXTERNE",
+        "RAPPEL": "H_INTERVENTION",
+        "FORMATION": "H_PRATIQUE",
+        "INTERVENTION": "H_INTERVENTION",
+        "PRIME_REPAS": "PR_REPAS",
+        "AUTRE": "H_AUTRE"
+    }
+    
+    feuilles = await db.feuilles_temps.find(filtre, {"_id": 0}).to_list(500)
+    if not feuilles:
+        raise HTTPException(status_code=400, detail="Aucune feuille validée ou exportée à exporter")
+    
+    # Employés des feuilles, en une requête
+    user_ids = list({f.get("user_id") for f in feuilles if f.get("user_id")})
+    employes = {
+        u["id"]: u
+        for u in await db.users.find(
+            {"id": {"$in": user_ids}},
+            {"_id": 0, "id": 1, "matricule_paie": 1, "numero_employe": 1}
+        ).to_list(None)
+    }
     
+    # Lignes au format Nethris
+    lignes_nethris = []
     for feuille in feuilles:
-        employe = await db.users.find_one({"id": feuille.get("user_id")}, {"_id": 0})
+        employe = employes.get(feuille.get("user_id"))
         if not employe:
             continue
         
         matricule = employe.get("matricule_paie") or employe.get("numero_employe") or ""
         
-        # Grouper les lignes par semaine (Nethris importe par semaine)
-        lignes = feuille.get("lignes", []) or []
-        
-        for ligne in lignes:
-            # Déterminer le code de gain
-            type_ligne = ligne.get("type", "").upper()
-            # Convertir le type interne vers le code Nethris
-            type_mapping = {
-                "GARDE_INTERNE": "H_GARDE_INTERNE",
-                "GARDE_EXTERNE": "H_GARDE_EXTERNE",
-                "RAPPEL": "H_INTERVENTION",
-                "FORMATION": "H_PRATIQUE",
-                "INTERVENTION": "H_INTERVENTION",
-                "PRIME_REPAS": "PR_REPAS",
-                "AUTRE": "H_AUTRE"
-            }
-            internal_type = type_mapping.get(type_ligne, type_ligne)
+        for ligne in feuille.get("lignes", []) or []:
+            internal_type = type_mapping.get(ligne.get("type", "").upper(), ligne.get("type", "").upper())
             code_gain = type_to_code.get(internal_type, "")
             
             heures = ligne.get("heures_payees", 0) or 0
             montant = ligne.get("montant", 0) or 0
             
             if heures > 0 or montant > 0:
-                row = {
-                    "Matricule": matricule,
-                    "Code de gain": code_gain,
-                    "Heures": round(heures, 2) if heures > 0 else "",
-                    "Montant": round(montant, 2) if montant > 0 else "",
-                    "Date": ligne.get("date", ""),
-                    "Description": ligne.get("description", ""),
-                    "Division": "",  # À remplir si mapping configuré
-                    "Département": ""
-                }
-                export_rows.append(row)
+                lignes_nethris.append([
+                    matricule,
+                    code_gain,
+                    round(heures, 2) if heures > 0 else "",
+                    round(montant, 2) if montant > 0 else "",
+                    ligne.get("date", ""),
+                    ligne.get("description", ""),
+                    "",  # Division: à remplir si mapping configuré
+                    ""   # Département
+                ])
     
-    if not export_rows:
+    if not lignes_nethris:
         raise HTTPException(status_code=400, detail="Aucune donnée à exporter")
     
-    # Créer le fichier Excel
-    df = pd.DataFrame(export_rows)
-    
-    # Réordonner les colonnes pour Nethris
+    header_style = StyleCellule(gras=True, centre=True, bordure=True)
     column_order = ["Matricule", "Code de gain", "Heures", "Montant", "Date", "Description", "Division", "Département"]
-    df = df[[col for col in column_order if col in df.columns]]
-    
-    file_buffer = BytesIO()
-    with pd.ExcelWriter(file_buffer, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='Import Paie')
     
-    file_buffer.seek(0)
+    # Classeur produit entièrement avant la réponse : une erreur renvoie un 500
+    # au lieu d'un fichier tronqué, et les feuilles restent non exportées
+    try:
+        classeur = ClasseurStreaming("Import Paie", largeurs=[12, 14, 10, 10, 12, 40, 10, 12])
+        blocs = [classeur.ouvrir()]
+        classeur.ajouter_ligne(column_order, header_style)
+        for ligne in lignes_nethris:
+            classeur.ajouter_ligne(ligne)
+        blocs.append(classeur.terminer())
+        contenu = b"".join(blocs)
+    except Exception as e:
+        logger.error(f"❌ Erreur génération export paie: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Erreur lors de la génération du fichier d'export")
     
     # Marquer les feuilles comme exportées
-    for feuille in feuilles:
-        await db.feuilles_temps.update_one(
-            {"id": feuille["id"]},
-            {"$set": {
-                "statut": "exporte",
-                "exporte_le": datetime.now(timezone.utc),
-                "format_export": f"Excel {provider_name.title()}",
-                "exporte_par": current_user.id
-            }}
-        )
+    await db.feuilles_temps.update_many(
+        {"id": {"$in": [f["id"] for f in feuilles]}},
+        {"$set": {
+            "statut": "exporte",
+            "exporte_le": datetime.now(timezone.utc),
+            "format_export": f"Excel {provider_name.title()}",
+            "exporte_par": current_user.id
+        }}
+    )
     
     # Générer le nom du fichier avec l'heure locale (UTC-5 pour Québec approximatif)
-    from datetime import timedelta
     local_time = datetime.now(timezone.utc) - timedelta(hours=5)
     filename = f"export_paie_{provider_name}_{tenant_slug}_{local_time.strftime('%Y%m%d_%H%M%S')}.xlsx"
     
-    return StreamingResponse(
-        file_buffer,
-        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    return Response(
+        content=contenu,
+        media_type=MEDIA_TYPE_XLSX,
         headers={"Content-Disposition": f"attachment; filename={filename}"}
     )
 
@@ -1961,44 +1515,62 @@ async def generer_feuilles_temps_lot(
         "feuilles_ids": []
     }
     
-    for employe in employes:
-        try:
-            # Vérifier si une feuille existe déjà
-            existing = await db.feuilles_temps.find_one({
-                "tenant_id": tenant.id,
-                "user_id": employe["id"],
-                "periode_debut": periode_debut,
-                "periode_fin": periode_fin
-            })
-            
-            if existing and existing.get("statut") != "brouillon":
-                continue  # Ne pas écraser les feuilles validées
-            
-            # Calculer la feuille
-            feuille = await calculer_feuille_temps(
-                tenant_id=tenant.id,
-                user_id=employe["id"],
-                periode_debut=periode_debut,
-                periode_fin=periode_fin,
-                params_paie=params_paie,
-                params_planning=params_planning,
-                current_user_id=current_user.id
-            )
-            
+    # Feuilles existantes de la période, en une requête
+    existantes = {}
+    async for feuille in db.feuilles_temps.find({
+        "tenant_id": tenant.id,
+        "user_id": {"$in": [e["id"] for e in employes]},
+        "periode_debut": periode_debut,
+        "periode_fin": periode_fin
+    }, {"_id": 0, "id": 1, "user_id": 1, "statut": 1}):
+        existantes.setdefault(feuille["user_id"], feuille)
+    
+    # Ne pas écraser les feuilles validées
+    a_calculer = [
+        e for e in employes
+        if e["id"] not in existantes or existantes[e["id"]].get("statut") == "brouillon"
+    ]
+    if not a_calculer:
+        return {"success": True, "message": "0 feuilles générées, 0 mises à jour", **results}
+    
+    # Toutes les données de la période en quelques requêtes, puis calcul par lots dans le pool
+    debut = time.time()
+    snapshot = await charger_snapshot_paie(tenant.id, [e["id"] for e in a_calculer], periode_debut, periode_fin)
+    
+    pool = get_paie_pool()
+    nb_lots = min(PAIE_CALCUL_WORKERS, len(a_calculer))
+    lots = [a_calculer[i::nb_lots] for i in range(nb_lots)]
+    loop = asyncio.get_running_loop()
+    resultats_lots = await asyncio.gather(*[
+        loop.run_in_executor(
+            pool, calculer_lot_feuilles,
+            _snapshot_du_lot(snapshot, {e["id"] for e in lot}), lot,
+            periode_debut, periode_fin, params_paie, params_planning, current_user.id
+        )
+        for lot in lots
+    ])
+    
+    # Écriture groupée: remplacement des brouillons et nouvelles feuilles en un seul bulk_write
+    operations = []
+    for resultat in resultats_lots:
+        results["erreurs"].extend(resultat["erreurs"])
+        for feuille in resultat["feuilles"]:
+            existing = existantes.get(feuille["user_id"])
             if existing:
-                await db.feuilles_temps.delete_one({"id": existing["id"]})
+                operations.append(DeleteOne({"id": existing["id"]}))
                 results["mises_a_jour"] += 1
             else:
                 results["generees"] += 1
-            
-            await db.feuilles_temps.insert_one(feuille)
+            operations.append(InsertOne(feuille))
             results["feuilles_ids"].append(feuille["id"])
-            
-        except Exception as e:
-            results["erreurs"].append({
-                "employe": f"{employe.get('prenom')} {employe.get('nom')}",
-                "erreur": str(e)
-            })
+    
+    if operations:
+        await db.feuilles_temps.bulk_write(operations, ordered=True)
+    
+    logger.info(
+        f"⏱️ [PAIE] {len(results['feuilles_ids'])} feuilles calculées en {time.time() - debut:.2f}s "
+        f"({len(lots)} lots, {len(results['erreurs'])} erreurs)"
+    )
     
     return {
         "success": True,
@@ -2410,6 +1982,7 @@ async def update_employee_matricules(
             {"id": user_id, "tenant_id": tenant.id},
             {"$set": {"matricule_paie": matricule}}
         )
+        invalidate_user_cache(user_id)
         if result.modified_count > 0:
             updated_count += 1
     
@@ -2437,6 +2010,7 @@ async def update_single_employee_matricule(
         {"id": user_id, "tenant_id": tenant.id},
         {"$set": {"matricule_paie": matricule_paie}}
     )
+    invalidate_user_cache(user_id)
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
@@ -15,6 +15,7 @@ import logging
 
 from routes.dependencies import (
     db,
+    invalidate_tenant_cache,
     get_current_user,
     get_tenant_from_slug,
     User
@@ -58,6 +59,7 @@ async def update_niveaux_attribution(
             {"id": tenant.id},
             {"$set": update_fields}
         )
+        invalidate_tenant_cache(tenant_id=tenant.id)
         logger.info(f"✅ Niveaux d'attribution mis à jour pour {tenant.slug}: {update_fields}")
     
     return {"message": "Niveaux d'attribution mis à jour avec succès"}
@@ -92,6 +94,7 @@ async def update_parametres_systeme(
             {"id": tenant.id},
             {"$set": update_fields}
         )
+        invalidate_tenant_cache(tenant_id=tenant.id)
         logger.info(f"✅ Paramètres système mis à jour pour {tenant.slug}: {list(systeme_data.keys())}")
     
     return {"message": "Paramètres système mis à jour avec succès"}
@@ -21,6 +21,7 @@ import uuid
 import logging
 import os
 
+from services.notification_dispatcher import soumettre_email
 from routes.dependencies import (
     db,
     get_current_user,
@@ -354,27 +355,21 @@ async def trigger_rappels_disponibilites(
                 </html>
                 """
                 
-                resend.Emails.send({
+                from routes.emails_history import historiser_apres_envoi
+                soumettre_email({
                     "from": f"{tenant.nom} <{sender_email}>",
                     "to": [user_email],
                     "subject": f"Rappel - Saisissez vos disponibilités pour {mois_suivant_texte}",
                     "html": html_content
-                })
+                }, apres_envoi=historiser_apres_envoi(
+                    user_email,
+                    type_email="rappel_disponibilites_manuel",
+                    destinataire_nom=f"{user.get('prenom', '')} {user.get('nom', '')}".strip(),
+                    sujet=f"Rappel - Saisissez vos disponibilités pour {mois_suivant_texte}",
+                    tenant_id=tenant.id,
+                    tenant_slug=tenant_slug
+                ))
                 emails_envoyes += 1
-                # Log email
-                try:
-                    from routes.emails_history import log_email_sent
-                    import asyncio
-                    asyncio.create_task(log_email_sent(
-                        type_email="rappel_disponibilites_manuel",
-                        destinataire_email=user_email,
-                        destinataire_nom=f"{user.get('prenom', '')} {user.get('nom', '')}".strip(),
-                        sujet=f"Rappel - Saisissez vos disponibilités pour {mois_suivant_texte}",
-                        tenant_id=tenant.id,
-                        tenant_slug=tenant_slug
-                    ))
-                except:
-                    pass
             except:
                 pass
     
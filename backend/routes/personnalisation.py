@@ -137,8 +137,8 @@ async def upload_logo(
         raise HTTPException(status_code=400, detail="Format d'image invalide")
     
     # Upload vers Azure
-    from services.azure_storage import upload_base64_to_azure, generate_sas_url
-    result = upload_base64_to_azure(logo_base64, tenant.id, "logos", f"logo_{tenant.id}.png")
+    from services.azure_storage import upload_base64_to_azure_async, generate_sas_url
+    result = await upload_base64_to_azure_async(logo_base64, tenant.id, "logos", f"logo_{tenant.id}.png")
     sas_url = generate_sas_url(result["blob_name"])
     
     # Stocker le blob_name dans MongoDB
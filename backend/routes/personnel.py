@@ -29,6 +29,7 @@ from io import BytesIO
 # Import des dépendances partagées
 from routes.dependencies import (
     db,
+    invalidate_user_cache,
     get_current_user,
     get_tenant_from_slug,
     clean_mongo_doc,
@@ -40,6 +41,8 @@ from routes.dependencies import (
 
 # Import WebSocket pour synchronisation temps réel
 from routes.websocket import broadcast_user_update
+from services.hours_ledger import invalider_ledger_heures
+from services.coverage_table import invalider_couverture
 
 router = APIRouter(tags=["Personnel"])
 
@@ -145,13 +148,9 @@ async def get_users(
     
     users = await db.users.find({"tenant_id": tenant.id}).to_list(1000)
     
-    # Résoudre photo_profil blob_names en SAS URLs
-    from services.azure_storage import generate_sas_url as _sas
-    for u in users:
-        if u.get("photo_profil_blob_name"):
-            u["photo_profil"] = _sas(u["photo_profil_blob_name"])
-        if u.get("signature_blob_name"):
-            u["signature_url"] = _sas(u["signature_blob_name"])
+    # Résoudre photo_profil blob_names en SAS URLs (une passe pour toute la liste)
+    from services.azure_storage import resolve_blob_urls_batch
+    resolve_blob_urls_batch(users, {"photo_profil_blob_name": "photo_profil", "signature_blob_name": "signature_url"})
     
     cleaned_users = [clean_mongo_doc(user) for user in users]
     return [User(**user) for user in cleaned_users]
@@ -313,6 +312,7 @@ async def update_user(
         {"id": user_id, "tenant_id": tenant.id},
         {"$set": update_data}
     )
+    invalidate_user_cache(user_id)
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
@@ -364,6 +364,7 @@ async def delete_user(
     
     # Supprimer l'utilisateur
     result = await db.users.delete_one({"id": user_id, "tenant_id": tenant.id})
+    invalidate_user_cache(user_id)
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
@@ -372,6 +373,8 @@ async def delete_user(
     await db.disponibilites.delete_many({"user_id": user_id, "tenant_id": tenant.id})
     await db.assignations.delete_many({"user_id": user_id, "tenant_id": tenant.id})
     await db.demandes_remplacement.delete_many({"demandeur_id": user_id, "tenant_id": tenant.id})
+    invalider_ledger_heures(tenant.id)
+    await invalider_couverture(db, tenant.id)
     
     # Créer activité
     await creer_activite(
@@ -437,12 +440,15 @@ async def end_employment(
             "statut": "Ancien"
         }}
     )
+    invalidate_user_cache(user_id)
     
     # 2. Supprimer les assignations de planning (gardes)
     deleted_assignations = await db.assignations.delete_many({
         "tenant_id": tenant.id,
         "user_id": user_id
     })
+    invalider_ledger_heures(tenant.id)
+    await invalider_couverture(db, tenant.id)
     
     # 3. Supprimer les demandes de remplacement
     deleted_remplacements = await db.remplacements.delete_many({
@@ -567,6 +573,7 @@ async def reactivate_employee(
             "updated_at": datetime.now(timezone.utc)
         }}
     )
+    invalidate_user_cache(user_id)
     
     # Créer une activité pour tracer cette action
     await creer_activite(
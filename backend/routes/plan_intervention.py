@@ -13,7 +13,7 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from pydantic import BaseModel, Field
 
 from routes.dependencies import get_db, get_current_user, Tenant, get_tenant_from_slug, require_permission
-from services.azure_storage import put_object, generate_sas_url, get_content_type
+from services.azure_storage import put_object_async, generate_sas_url, get_content_type
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -328,7 +328,7 @@ async def upload_plan_media(
         blob_path = f"profiremanager/{tenant.id}/plans-intervention/{plan_id}/{media_id or str(uuid4())}.{ext}"
         
         # Upload vers Azure
-        result = put_object(blob_path, file_data, content_type)
+        result = await put_object_async(blob_path, file_data, content_type)
         sas_url = generate_sas_url(blob_path)
         
         # Mettre à jour le plan dans MongoDB
@@ -8,6 +8,7 @@ Ce module gère le planning des gardes : assignations, exports, rapports d'heure
 Routes Assignations:
 - GET    /{tenant_slug}/planning/{semaine_debut}                - Obtenir planning d'une semaine
 - GET    /{tenant_slug}/planning/assignations/{semaine_debut}   - Liste assignations semaine
+- GET    /{tenant_slug}/planning/couverture/{date_debut}        - Couverture par créneau
 - POST   /{tenant_slug}/planning/assignation                    - Créer assignation
 - DELETE /{tenant_slug}/planning/assignation/{assignation_id}   - Supprimer assignation
 
@@ -29,14 +30,13 @@ from io import BytesIO
 import uuid
 import logging
 
-# Import des fonctions de calcul d'équipe de garde
-from routes.equipes_garde import get_equipe_garde_du_jour_sync, get_equipe_garde_rotation_standard, get_equipe_from_horaire_personnalise
 import json
 import asyncio
 import time
 
 from routes.dependencies import (
     db,
+    invalidate_tenant_cache,
     get_current_user,
     get_tenant_from_slug,
     clean_mongo_doc,
@@ -69,6 +69,16 @@ logger = logging.getLogger(__name__)
 import os
 import resend
 from services.email_builder import build_email, email_card, email_alert_card, email_detail_row
+from services.notification_dispatcher import soumettre_email
+from services.hours_ledger import enregistrer_assignations, retirer_assignations, invalider_ledger_heures
+from services.coverage_table import (
+    enregistrer_couverture,
+    retirer_couverture,
+    invalider_couverture,
+    obtenir_couverture,
+    creneaux_couverture,
+    resumer_couverture
+)
 
 
 def send_planning_notification_email(user_email: str, user_name: str, gardes_list: list, tenant_slug: str, periode: str, tenant_nom: str = None, stats: dict = None):
@@ -265,23 +275,16 @@ def send_planning_notification_email(user_email: str, user_name: str, gardes_lis
             "html": html_content
         }
         
-        response = resend.Emails.send(params)
-        logger.info(f"✅ Email de planning envoyé à {user_email} (ID: {response.get('id', 'N/A')})")
-        
-        # Log email (synchrone via create_task)
-        try:
-            from routes.emails_history import log_email_sent
-            import asyncio
-            asyncio.create_task(log_email_sent(
-                type_email="planning_gardes",
-                destinataire_email=user_email,
-                destinataire_nom=user_name,
-                sujet=subject,
-                tenant_slug=tenant_slug,
-                metadata={"nb_gardes": len(gardes_list), "periode": periode}
-            ))
-        except Exception as log_err:
-            logger.warning(f"Erreur log email: {log_err}")
+        from routes.emails_history import historiser_apres_envoi
+        soumettre_email(params, apres_envoi=historiser_apres_envoi(
+            user_email,
+            type_email="planning_gardes",
+            destinataire_nom=user_name,
+            sujet=subject,
+            tenant_slug=tenant_slug,
+            metadata={"nb_gardes": len(gardes_list), "periode": periode}
+        ))
+        logger.info(f"📧 Email de planning mis en file pour {user_email}")
         
         return True
             
@@ -421,6 +424,40 @@ async def get_assignations_periode(
     return assignations
 
 
+@router.get("/{tenant_slug}/planning/couverture/{date_debut}")
+async def get_couverture_periode(
+    tenant_slug: str,
+    date_debut: str,
+    mode: str = Query(default="semaine", description="Mode d'affichage: 'semaine' ou 'mois'"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Couverture par créneau (date × type de garde) lue dans la table de couverture:
+    personnel requis, personnel assigné et statut (complete, partielle, vacante).
+    """
+    tenant = await get_tenant_from_slug(tenant_slug)
+    await require_permission(tenant.id, current_user, "planning", "voir")
+    
+    if mode == "mois":
+        date_obj = datetime.strptime(date_debut, "%Y-%m-%d")
+        debut = date_obj.replace(day=1)
+        fin = (debut + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    else:
+        debut, fin = get_semaine_range(date_debut)
+    
+    types_garde = await db.types_garde.find(
+        {"tenant_id": tenant.id},
+        {"_id": 0, "id": 1, "personnel_requis": 1, "jours_application": 1}
+    ).to_list(1000)
+    assignes = await obtenir_couverture(db, tenant.id, debut.strftime("%Y-%m-%d"), fin.strftime("%Y-%m-%d"))
+    
+    return {
+        "periode": {"debut": debut.strftime("%Y-%m-%d"), "fin": fin.strftime("%Y-%m-%d")},
+        **resumer_couverture(types_garde, debut.date(), fin.date(), assignes),
+        "creneaux": creneaux_couverture(types_garde, debut.date(), fin.date(), assignes)
+    }
+
+
 @router.post("/{tenant_slug}/planning/assignation")
 async def create_assignation(
     tenant_slug: str,
@@ -501,6 +538,8 @@ async def create_assignation(
     )
     
     await db.assignations.insert_one(assignation.dict())
+    enregistrer_assignations(tenant.id, [assignation.dict()])
+    await enregistrer_couverture(db, tenant.id, [assignation.dict()])
     
     # Notifier l'employé UNIQUEMENT si le planning de cette période est déjà publié
     # (pas de notification pendant la phase brouillon/pré-publication)
@@ -575,6 +614,8 @@ async def delete_assignation(
     
     # SUPPRIMER L'ASSIGNATION D'ABORD (action principale)
     await db.assignations.delete_one({"id": assignation_id})
+    retirer_assignations(tenant.id, [assignation])
+    await retirer_couverture(db, tenant.id, [assignation])
     
     # Notifier l'employé UNIQUEMENT si l'assignation était publiée
     # (pas de notification pour les brouillons/pré-publication)
@@ -939,6 +980,8 @@ async def supprimer_brouillons(
         },
         "publication_status": "brouillon"
     })
+    invalider_ledger_heures(tenant.id)
+    await invalider_couverture(db, tenant.id, date_debut, date_fin)
     
     return {
         "message": f"{result.deleted_count} brouillon(s) supprimé(s)",
@@ -1490,6 +1533,8 @@ async def formater_planning_mois(
             "$lte": date_fin.isoformat()
         }
     })
+    invalider_ledger_heures(tenant.id)
+    await invalider_couverture(db, tenant.id, date_debut.isoformat(), date_fin.isoformat())
     
     # 6. Supprimer les demandes de remplacement du mois
     result_remplacements = await db.demandes_remplacement.delete_many({
@@ -1663,6 +1708,9 @@ async def supprimer_assignations_invalides(
             "id": {"$in": ids_to_delete},
             "tenant_id": tenant.id
         })
+        invalider_ledger_heures(tenant.id)
+        ids_supprimes = set(ids_to_delete)
+        await retirer_couverture(db, tenant.id, [a for a in assignations if a["id"] in ids_supprimes])
         deleted_count = result.deleted_count
     else:
         deleted_count = 0
@@ -1987,6 +2035,9 @@ async def assignation_manuelle_avancee(
                             # Jour invalide (29 février)
                             break
         
+        enregistrer_assignations(tenant.id, assignations_creees)
+        await enregistrer_couverture(db, tenant.id, assignations_creees)
+        
         return {
             "message": "Assignation avancée créée avec succès",
             "assignations_creees": len(assignations_creees),
@@ -2129,6 +2180,7 @@ async def envoyer_notifications_planning(tenant_slug: str, periode_debut: str, p
             {"id": tenant.id},
             {"$set": {"parametres": current_parametres}}
         )
+        invalidate_tenant_cache(tenant_id=tenant.id)
         
         return {
             "message": "Notifications envoyées",
@@ -105,7 +105,9 @@ async def generer_pdf_audit(assignations, user_map, type_garde_map, tenant, mois
     from reportlab.lib.enums import TA_CENTER, TA_LEFT
     
     # Utiliser la fonction helper pour créer un PDF brandé
-    buffer, doc, elements = create_branded_pdf(tenant, pagesize=A4)
+    from services.azure_storage import get_logo_bytes_async
+    logo_data = await get_logo_bytes_async(tenant)
+    buffer, doc, elements = create_branded_pdf(tenant, logo_data=logo_data, pagesize=A4)
     styles = getSampleStyleSheet()
     
     # Style titre
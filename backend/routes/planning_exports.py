@@ -19,6 +19,8 @@ from io import BytesIO
 import uuid
 import logging
 
+from services.export_jobs import construire_pdf_hors_boucle, enregistrer_classeur_hors_boucle
+from services.streaming_xlsx import ClasseurStreaming, StyleCellule, reponse_xlsx
 from routes.dependencies import (
     db,
     get_current_user,
@@ -31,7 +33,8 @@ from routes.dependencies import (
 from utils.pdf_helpers import (
     create_branded_pdf,
     get_modern_pdf_styles,
-    create_pdf_footer_text
+    create_pdf_footer_text,
+    draw_profiremanager_footer
 )
 
 router = APIRouter(tags=["Planning Exports"])
@@ -85,8 +88,11 @@ async def export_planning_pdf(
         users_map = {u['id']: u for u in users_list}
         
         # Créer le PDF avec branding
+        from services.azure_storage import get_logo_bytes_async
+        logo_data = await get_logo_bytes_async(tenant)
         buffer, doc, elements = create_branded_pdf(
             tenant,
+            logo_data=logo_data,
             pagesize=landscape(letter),
             leftMargin=0.5*inch,
             rightMargin=0.5*inch,
@@ -403,21 +409,9 @@ async def export_planning_pdf(
                     elements.append(PageBreak())
         
         # Footer
-        def add_footer(canvas, doc_obj):
-            canvas.saveState()
-            canvas.setStrokeColor(colors.HexColor('#e2e8f0'))
-            canvas.setLineWidth(1)
-            canvas.line(0.5*inch, 0.5*inch, landscape(letter)[0] - 0.5*inch, 0.5*inch)
-            canvas.setFont('Helvetica', 9)
-            canvas.setFillColor(colors.HexColor('#64748b'))
-            footer_text = f"ProFireManager - {datetime.now().strftime('%d/%m/%Y %H:%M')}"
-            canvas.drawCentredString(landscape(letter)[0] / 2, 0.35*inch, footer_text)
-            canvas.setFont('Helvetica', 8)
-            canvas.drawRightString(landscape(letter)[0] - 0.5*inch, 0.35*inch, f"Page {doc_obj.page}")
-            canvas.restoreState()
-        
-        doc.build(elements, onFirstPage=add_footer, onLaterPages=add_footer)
-        buffer.seek(0)
+        buffer = await construire_pdf_hors_boucle(
+            doc, elements, onFirstPage=draw_profiremanager_footer, onLaterPages=draw_profiremanager_footer
+        )
         
         return StreamingResponse(
             buffer,
@@ -439,12 +433,8 @@ async def export_planning_excel(
     type: str,
     current_user: User = Depends(get_current_user)
 ):
-    """Export du planning en Excel"""
+    """Export du planning en Excel (écrit en flux pendant le parcours des assignations)"""
     try:
-        from openpyxl import Workbook
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
-        from io import BytesIO
-        
         tenant = await get_tenant_from_slug(tenant_slug)
         
         # Calculer la période
@@ -459,143 +449,106 @@ async def export_planning_excel(
             else:
                 date_fin = datetime(year, month + 1, 1) - timedelta(days=1)
         
-        assignations_list = await db.assignations.find({
+        types_garde_list = await db.types_garde.find({"tenant_id": tenant.id}, {"_id": 0}).to_list(length=None)
+        noms_users = {
+            u['id']: f"{u.get('prenom', '')} {u.get('nom', '')}"
+            async for u in db.users.find({"tenant_id": tenant.id}, {"_id": 0, "id": 1, "prenom": 1, "nom": 1})
+        }
+        
+        # Assignations triées par date: le classeur est écrit jour par jour
+        curseur = db.assignations.find({
             "tenant_id": tenant.id,
             "date": {
                 "$gte": date_debut.strftime('%Y-%m-%d'),
                 "$lte": date_fin.strftime('%Y-%m-%d')
             }
-        }).to_list(length=None)
-        
-        types_garde_list = await db.types_garde.find({"tenant_id": tenant.id}).to_list(length=None)
-        users_list = await db.users.find({"tenant_id": tenant.id}).to_list(length=None)
-        
-        types_map = {t['id']: t for t in types_garde_list}
-        users_map = {u['id']: u for u in users_list}
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = f"Planning {type}"
-        
-        header_fill = PatternFill(start_color="FCA5A5", end_color="FCA5A5", fill_type="solid")
-        header_font = Font(bold=True, color="FFFFFF", size=12)
-        center_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-        
-        ws.merge_cells('A1:H1')
-        ws['A1'] = f"Planning des Gardes - {type.capitalize()}"
-        ws['A1'].font = Font(bold=True, size=16, color="EF4444")
-        ws['A1'].alignment = center_alignment
-        
-        ws.merge_cells('A2:H2')
-        ws['A2'] = f"Du {date_debut.strftime('%d/%m/%Y')} au {date_fin.strftime('%d/%m/%Y')}"
-        ws['A2'].alignment = center_alignment
+        }, {"_id": 0, "date": 1, "type_garde_id": 1, "user_id": 1}).sort("date", 1)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erreur export Excel: {str(e)}")
+    
+    titre_style = StyleCellule(gras=True, taille=16, couleur="EF4444", centre=True, retour_ligne=True)
+    centre_style = StyleCellule(centre=True, retour_ligne=True)
+    header_style = StyleCellule(gras=True, taille=12, couleur="FFFFFF", fond="FCA5A5", centre=True, retour_ligne=True, bordure=True)
+    cellule_style = StyleCellule(centre=True, retour_ligne=True, bordure=True)
+    statut_styles = {
+        'Complet': StyleCellule(fond="D1FAE5", centre=True, retour_ligne=True, bordure=True),
+        'Partiel': StyleCellule(fond="FEF3C7", centre=True, retour_ligne=True, bordure=True),
+        'Vacant': StyleCellule(fond="FEE2E2", centre=True, retour_ligne=True, bordure=True)
+    }
+    
+    def statut_case(noms, requis):
+        return 'Complet' if len(noms) >= requis else 'Partiel' if noms else 'Vacant'
+    
+    async def noms_par_jour():
+        """Regroupe le curseur trié en {type_garde_id: [noms]} par date"""
+        jour, noms = None, {}
+        async for a in curseur:
+            if a.get('date') != jour:
+                if jour is not None:
+                    yield jour, noms
+                jour, noms = a.get('date'), {}
+            if a.get('user_id') in noms_users:
+                noms.setdefault(a.get('type_garde_id'), []).append(noms_users[a['user_id']])
+        if jour is not None:
+            yield jour, noms
+    
+    async def lignes():
+        yield [f"Planning des Gardes - {type.capitalize()}"], titre_style
+        yield [f"Du {date_debut.strftime('%d/%m/%Y')} au {date_fin.strftime('%d/%m/%Y')}"], centre_style
+        yield [], None
         
-        row = 4
         if type == 'semaine':
             headers = ['Type de Garde', 'Horaires'] + [(date_debut + timedelta(days=i)).strftime('%a %d/%m') for i in range(7)]
         else:
             headers = ['Date', 'Jour', 'Type de Garde', 'Horaires', 'Personnel', 'Requis', 'Assignés', 'Statut']
-        
-        for col, header in enumerate(headers, start=1):
-            cell = ws.cell(row=row, column=col, value=header)
-            cell.fill = header_fill
-            cell.font = header_font
-            cell.alignment = center_alignment
-            cell.border = border
-        
-        row += 1
+        yield headers, header_style
         
         if type == 'semaine':
+            semaine = {jour: noms async for jour, noms in noms_par_jour()}
             for type_garde in sorted(types_garde_list, key=lambda x: x.get('heure_debut', '')):
-                ws.cell(row=row, column=1, value=type_garde['nom'])
-                ws.cell(row=row, column=2, value=f"{type_garde.get('heure_debut', '')} - {type_garde.get('heure_fin', '')}")
-                
+                valeurs = [type_garde['nom'], f"{type_garde.get('heure_debut', '')} - {type_garde.get('heure_fin', '')}"]
+                styles = [None, None]
                 for i in range(7):
                     current_date = (date_debut + timedelta(days=i)).strftime('%Y-%m-%d')
-                    assignations_jour = [a for a in assignations_list if a['date'] == current_date and a['type_garde_id'] == type_garde['id']]
-                    
-                    noms = [f"{users_map[a['user_id']]['prenom']} {users_map[a['user_id']]['nom']}" 
-                           for a in assignations_jour if a['user_id'] in users_map]
-                    
-                    cell_text = '\n'.join(noms) if noms else 'Vacant'
-                    cell = ws.cell(row=row, column=3+i, value=cell_text)
-                    cell.alignment = center_alignment
-                    cell.border = border
-                    
-                    if len(noms) >= type_garde.get('personnel_requis', 1):
-                        cell.fill = PatternFill(start_color="D1FAE5", end_color="D1FAE5", fill_type="solid")
-                    elif noms:
-                        cell.fill = PatternFill(start_color="FEF3C7", end_color="FEF3C7", fill_type="solid")
-                    else:
-                        cell.fill = PatternFill(start_color="FEE2E2", end_color="FEE2E2", fill_type="solid")
-                
-                row += 1
+                    noms = semaine.get(current_date, {}).get(type_garde['id'], [])
+                    valeurs.append('\n'.join(noms) if noms else 'Vacant')
+                    styles.append(statut_styles[statut_case(noms, type_garde.get('personnel_requis', 1))])
+                yield valeurs, styles
         else:
+            groupes = noms_par_jour()
+            prochain = await anext(groupes, None)
             current = date_debut
             while current <= date_fin:
                 date_str = current.strftime('%Y-%m-%d')
                 jour_fr = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche'][current.weekday()]
                 
+                while prochain is not None and (prochain[0] or '') < date_str:
+                    prochain = await anext(groupes, None)
+                noms_jour = {}
+                if prochain is not None and prochain[0] == date_str:
+                    noms_jour = prochain[1]
+                
                 for type_garde in types_garde_list:
-                    assignations_jour = [a for a in assignations_list if a['date'] == date_str and a['type_garde_id'] == type_garde['id']]
-                    
-                    noms = [f"{users_map[a['user_id']]['prenom']} {users_map[a['user_id']]['nom']}" 
-                           for a in assignations_jour if a['user_id'] in users_map]
-                    
-                    personnel_str = ', '.join(noms) if noms else 'Aucun'
+                    noms = noms_jour.get(type_garde['id'], [])
                     requis = type_garde.get('personnel_requis', 1)
-                    assignes = len(noms)
-                    statut = 'Complet' if assignes >= requis else 'Partiel' if noms else 'Vacant'
-                    
-                    ws.cell(row=row, column=1, value=current.strftime('%d/%m/%Y'))
-                    ws.cell(row=row, column=2, value=jour_fr)
-                    ws.cell(row=row, column=3, value=type_garde['nom'])
-                    ws.cell(row=row, column=4, value=f"{type_garde.get('heure_debut', '')} - {type_garde.get('heure_fin', '')}")
-                    ws.cell(row=row, column=5, value=personnel_str)
-                    ws.cell(row=row, column=6, value=requis)
-                    ws.cell(row=row, column=7, value=assignes)
-                    status_cell = ws.cell(row=row, column=8, value=statut)
-                    
-                    if statut == 'Complet':
-                        status_cell.fill = PatternFill(start_color="D1FAE5", end_color="D1FAE5", fill_type="solid")
-                    elif statut == 'Partiel':
-                        status_cell.fill = PatternFill(start_color="FEF3C7", end_color="FEF3C7", fill_type="solid")
-                    else:
-                        status_cell.fill = PatternFill(start_color="FEE2E2", end_color="FEE2E2", fill_type="solid")
-                    
-                    for col in range(1, 9):
-                        ws.cell(row=row, column=col).border = border
-                        ws.cell(row=row, column=col).alignment = center_alignment
-                    
-                    row += 1
+                    statut = statut_case(noms, requis)
+                    yield [
+                        current.strftime('%d/%m/%Y'),
+                        jour_fr,
+                        type_garde['nom'],
+                        f"{type_garde.get('heure_debut', '')} - {type_garde.get('heure_fin', '')}",
+                        ', '.join(noms) if noms else 'Aucun',
+                        requis,
+                        len(noms),
+                        statut
+                    ], [cellule_style] * 7 + [statut_styles[statut]]
                 
                 current += timedelta(days=1)
-        
-        # Définir les largeurs de colonnes fixes pour éviter les erreurs avec MergedCell
-        column_widths = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I']
-        default_widths = [12, 12, 18, 15, 25, 10, 10, 12, 12]
-        for i, col_letter in enumerate(column_widths):
-            if i < len(default_widths):
-                ws.column_dimensions[col_letter].width = default_widths[i]
-        
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
-        
-        return StreamingResponse(
-            buffer,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": f"attachment; filename=planning_{type}_{periode}.xlsx"}
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur export Excel: {str(e)}")
+    
+    classeur = ClasseurStreaming(f"Planning {type}", largeurs=[12, 12, 18, 15, 25, 10, 10, 12, 12])
+    classeur.fusionner('A1:H1')
+    classeur.fusionner('A2:H2')
+    return reponse_xlsx(classeur, lignes(), f"planning_{type}_{periode}.xlsx")
 
 
 
@@ -827,7 +780,9 @@ async def export_rapport_heures_pdf(
     from reportlab.lib.enums import TA_CENTER, TA_LEFT
     
     # Utiliser la fonction helper pour créer un PDF brandé
-    buffer, doc, elements = create_branded_pdf(tenant, pagesize=A4)
+    from services.azure_storage import get_logo_bytes_async
+    logo_data = await get_logo_bytes_async(tenant)
+    buffer, doc, elements = create_branded_pdf(tenant, logo_data=logo_data, pagesize=A4)
     styles = getSampleStyleSheet()
     modern_styles = get_modern_pdf_styles(styles)
     
@@ -904,8 +859,7 @@ async def export_rapport_heures_pdf(
     if footer_text:
         elements.append(Paragraph(footer_text, footer_style))
     
-    doc.build(elements)
-    buffer.seek(0)
+    buffer = await construire_pdf_hors_boucle(doc, elements)
     
     return StreamingResponse(
         buffer,
@@ -992,7 +946,6 @@ async def export_rapport_heures_excel(
     
     from openpyxl import Workbook
     from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-    from io import BytesIO
     
     wb = Workbook()
     ws = wb.active
@@ -1089,9 +1042,7 @@ async def export_rapport_heures_excel(
     ws.column_dimensions['E'].width = 12
     ws.column_dimensions['F'].width = 10
     
-    buffer = BytesIO()
-    wb.save(buffer)
-    buffer.seek(0)
+    buffer = await enregistrer_classeur_hors_boucle(wb)
     
     return StreamingResponse(
         buffer,
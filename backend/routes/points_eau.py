@@ -25,6 +25,7 @@ from datetime import datetime, timezone, timedelta
 import uuid
 import logging
 
+from services.notification_dispatcher import soumettre_email
 from routes.dependencies import (
     db,
     get_current_user,
@@ -140,13 +141,13 @@ async def notifier_equipement_changement_statut(
                     
                     sujet = f"{icon} {type_equipement} {'HORS SERVICE' if nouveau_statut == 'hors_service' else 'EN SERVICE'}: {nom_equipement}"
                     
-                    email_response = resend.Emails.send({
+                    soumettre_email({
                         "from": f"ProFireManager <{sender_email}>",
                         "to": emails,
                         "subject": sujet,
                         "html": email_html
                     })
-                    logger.info(f"📧 Email envoyé à {len(emails)} utilisateurs pour {nom_equipement}")
+                    logger.info(f"📧 Email mis en file pour {len(emails)} utilisateurs ({nom_equipement})")
             else:
                 logger.warning("RESEND_API_KEY non configurée - Emails non envoyés")
                 
@@ -225,6 +226,31 @@ class InspectionPointEauCreate(BaseModel):
     has_defaut: bool = False
 
 
+# ==================== HELPERS ====================
+
+async def compter_inspections_par_point(tenant_id: str, point_ids: List[str]) -> Dict[str, int]:
+    """
+    Nombre d'inspections (bornes sèches + formulaires unifiés) par point d'eau.
+    Deux agrégations $group au lieu de deux count_documents par point.
+    """
+    if not point_ids:
+        return {}
+    
+    comptes: Dict[str, int] = {}
+    for collection, champ in (
+        (db.inspections_bornes_seches, "point_eau_id"),
+        (db.inspections_unifiees, "asset_id"),
+    ):
+        pipeline = [
+            {"$match": {"tenant_id": tenant_id, champ: {"$in": point_ids}}},
+            {"$group": {"_id": f"${champ}", "count": {"$sum": 1}}}
+        ]
+        async for groupe in collection.aggregate(pipeline):
+            comptes[groupe["_id"]] = comptes.get(groupe["_id"], 0) + groupe["count"]
+    
+    return comptes
+
+
 # ==================== ROUTES ====================
 
 @router.get("/{tenant_slug}/points-eau")
@@ -259,18 +285,13 @@ async def get_points_eau(
             date_remise_zero = dates_passees[0]["date"]
     
     # Ajouter le nombre d'inspections et calculer le statut dynamique
+    comptes_inspections = await compter_inspections_par_point(
+        tenant.id, [p["id"] for p in points if p.get("id")]
+    )
     for point in points:
         point_id = point.get("id")
         if point_id:
-            count_bornes_seches = await db.inspections_bornes_seches.count_documents({
-                "point_eau_id": point_id,
-                "tenant_id": tenant.id
-            })
-            count_unifiees = await db.inspections_unifiees.count_documents({
-                "asset_id": point_id,
-                "tenant_id": tenant.id
-            })
-            point["nombre_inspections"] = count_bornes_seches + count_unifiees
+            point["nombre_inspections"] = comptes_inspections.get(point_id, 0)
         
         # Calculer le statut_couleur dynamique selon la date de remise à zéro
         if date_remise_zero:
@@ -542,12 +563,12 @@ async def create_inspection_point_eau(
     raw_photos = inspection_data.get("photos", [])
     azure_photos = []
     if raw_photos:
-        from services.azure_storage import upload_base64_to_azure
+        from services.azure_storage import upload_base64_to_azure_async
         for i, photo in enumerate(raw_photos):
             photo_data = photo if isinstance(photo, str) else photo.get("data", photo.get("url", ""))
             if isinstance(photo_data, str) and photo_data.startswith("data:"):
                 try:
-                    result = upload_base64_to_azure(
+                    result = await upload_base64_to_azure_async(
                         photo_data, tenant.id, "inspections-bornes", f"borne_{point_id}_{i}.jpg"
                     )
                     azure_photos.append({
@@ -896,8 +896,8 @@ async def upload_batiment_photo(
         raise HTTPException(status_code=400, detail="Format de photo invalide (doit être base64 data URL)")
     
     try:
-        from services.azure_storage import upload_base64_to_azure
-        azure_result = upload_base64_to_azure(
+        from services.azure_storage import upload_base64_to_azure_async
+        azure_result = await upload_base64_to_azure_async(
             photo_data.photo_base64, tenant.id, "batiments-photos", f"batiment_{batiment_id}.jpg"
         )
         
@@ -25,6 +25,8 @@ import logging
 
 from routes.dependencies import (
     db,
+    invalidate_tenant_cache,
+    invalidate_user_cache,
     get_current_user,
     get_tenant_from_slug,
     User,
@@ -211,6 +213,7 @@ async def toggle_preventionniste(
         {"id": user_id, "tenant_id": tenant.id},
         {"$set": {"est_preventionniste": new_status}}
     )
+    invalidate_user_cache(user_id)
     
     return {
         "message": "Statut de préventionniste mis à jour",
@@ -621,6 +624,7 @@ async def update_parametres_prevention(
         {"id": tenant.id},
         {"$set": parametres_update}
     )
+    invalidate_tenant_cache(tenant_id=tenant.id)
     
     logging.info(f"Paramètres prévention mis à jour pour {tenant_slug} par {current_user.prenom} {current_user.nom}")
     
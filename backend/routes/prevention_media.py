@@ -37,9 +37,9 @@ from routes.prevention_models import (
 )
 
 from services.azure_storage import (
-    upload_base64_to_azure,
+    upload_base64_to_azure_async,
     generate_sas_url,
-    delete_object,
+    delete_object_async,
 )
 
 router = APIRouter(tags=["Prévention - Photos & Icônes"])
@@ -66,7 +66,7 @@ async def upload_photo(
         photo_id = str(uuid.uuid4())
         
         # Upload vers Azure Blob Storage
-        azure_result = upload_base64_to_azure(photo_base64, tenant.id, "prevention-photos", filename)
+        azure_result = await upload_base64_to_azure_async(photo_base64, tenant.id, "prevention-photos", filename)
         
         # Stocker uniquement les métadonnées dans MongoDB
         photo_doc = {
@@ -105,7 +105,7 @@ async def upload_inventaire_photo(
         photo_id = str(uuid.uuid4())
         
         # Upload vers Azure Blob Storage
-        azure_result = upload_base64_to_azure(photo_base64, tenant.id, "inventaires-photos", filename)
+        azure_result = await upload_base64_to_azure_async(photo_base64, tenant.id, "inventaires-photos", filename)
         
         photo_doc = {
             "id": photo_id,
@@ -222,7 +222,7 @@ async def delete_photo(
     
     # Supprimer le blob Azure si applicable
     if photo.get("storage") == "azure" and photo.get("blob_name"):
-        delete_object(photo["blob_name"])
+        await delete_object_async(photo["blob_name"])
     
     # Supprimer le document MongoDB
     await db.photos_prevention.delete_one({"id": photo_id, "tenant_id": tenant.id})
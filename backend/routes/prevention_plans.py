@@ -422,8 +422,11 @@ async def export_plan_intervention_pdf(
         batiment = await db.batiments.find_one({"id": plan["batiment_id"], "tenant_id": tenant.id})
     
     # Créer le buffer PDF avec branding
+    from services.azure_storage import get_logo_bytes_async
+    logo_data = await get_logo_bytes_async(tenant)
     buffer, doc, elements = create_branded_pdf(
         tenant, 
+        logo_data=logo_data,
         pagesize=A4, 
         rightMargin=40, 
         leftMargin=40, 
@@ -20,6 +20,7 @@ from starlette.responses import StreamingResponse, Response
 import logging
 import httpx
 
+from services.export_jobs import construire_pdf_hors_boucle, enregistrer_classeur_hors_boucle
 from routes.dependencies import (
     db,
     get_current_user,
@@ -74,7 +75,9 @@ async def generer_rapport_inspection_pdf(inspection_id: str, tenant_id: str) ->
     # Créer le PDF avec branding
     from types import SimpleNamespace
     tenant_obj = SimpleNamespace(**tenant) if tenant else None
-    buffer, doc, story = create_branded_pdf(tenant_obj, pagesize=letter)
+    from services.azure_storage import get_logo_bytes_async
+    logo_data = await get_logo_bytes_async(tenant_obj)
+    buffer, doc, story = create_branded_pdf(tenant_obj, logo_data=logo_data, pagesize=letter)
     styles = getSampleStyleSheet()
     
     # Style personnalisé
@@ -248,8 +251,7 @@ async def generer_rapport_inspection_pdf(inspection_id: str, tenant_id: str) ->
     story.append(sig_table)
     
     # Générer le PDF
-    doc.build(story)
-    buffer.seek(0)
+    buffer = await construire_pdf_hors_boucle(doc, story)
     return buffer
 
 
@@ -419,8 +421,11 @@ async def export_rapport_batiment_pdf(
     from PIL import Image as PILImage
     import base64
     
+    from services.azure_storage import get_logo_bytes_async
+    logo_data = await get_logo_bytes_async(tenant)
     buffer, doc, story = create_branded_pdf(
         tenant, 
+        logo_data=logo_data,
         pagesize=letter, 
         topMargin=0.5*inch, 
         bottomMargin=0.5*inch
@@ -482,8 +487,8 @@ async def export_rapport_batiment_pdf(
     photo_loaded = False
     if batiment.get('photo_blob_name'):
         try:
-            from services.azure_storage import get_object
-            img_data, _ = get_object(batiment['photo_blob_name'])
+            from services.azure_storage import get_object_async
+            img_data, _ = await get_object_async(batiment['photo_blob_name'])
             img = PILImage.open(io.BytesIO(img_data))
             
             max_width = 4 * inch
@@ -683,8 +688,7 @@ async def export_rapport_batiment_pdf(
     story.append(Paragraph(footer_text, styles['Normal']))
     
     # Construire le PDF
-    doc.build(story)
-    buffer.seek(0)
+    buffer = await construire_pdf_hors_boucle(doc, story)
     
     # Nom du fichier
     filename = f"rapport_{batiment.get('nom_etablissement', 'batiment').replace(' ', '_')}_{datetime.now().strftime('%Y%m%d')}.pdf"
@@ -823,9 +827,7 @@ async def export_excel_prevention(
             ws.column_dimensions[column_letter].width = adjusted_width
         
         # Sauvegarder dans un buffer
-        buffer = BytesIO()
-        wb.save(buffer)
-        buffer.seek(0)
+        buffer = await enregistrer_classeur_hors_boucle(wb)
         
         return StreamingResponse(
             buffer,
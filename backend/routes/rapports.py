@@ -37,11 +37,19 @@ from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone, timedelta, date
 from io import BytesIO
+import asyncio
 import uuid
 import logging
 import csv
 import io
 
+from services.export_jobs import (
+    EXPORT_ARTIFACT_TTL_SECONDS,
+    lire_artefact,
+    nettoyer_artefacts,
+    soumettre_export
+)
+from routes.rapports_rendu import logo_pour_rendu, rendre_export_personnel
 from routes.dependencies import (
     db,
     get_current_user,
@@ -52,47 +60,26 @@ from routes.dependencies import (
     user_has_module_action
 )
 
-# Import des helpers PDF partagés
-from utils.pdf_helpers import (
-    create_branded_pdf,
-    get_modern_pdf_styles,
-    create_pdf_footer_text
-)
-
 # Imports pour PDF
 from reportlab.lib.pagesizes import letter, A4, landscape
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch, cm
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image, PageBreak
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
+from reportlab.lib.enums import TA_LEFT, TA_RIGHT
 
 # Imports pour Excel
 from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+from openpyxl.styles import Font, PatternFill, Border, Side
 from utils.chunked_upload import save_upload_to_disk, cleanup_file
 from openpyxl.utils import get_column_letter
 
 router = APIRouter(tags=["Rapports"])
 logger = logging.getLogger(__name__)
 
-# Stockage temporaire des fichiers pour téléchargement (compatible iframe sandbox)
-# Les fichiers sont stockés pendant 5 minutes max
+# Les exports à télécharger (compatible iframe sandbox) sont produits par le
+# service de jobs d'export (services/export_jobs.py) et servis par file_id
 import os
-import time
-TEMP_EXPORT_DIR = "/tmp/exports"
-os.makedirs(TEMP_EXPORT_DIR, exist_ok=True)
-
-def cleanup_old_exports():
-    """Nettoie les fichiers d'export de plus de 5 minutes"""
-    try:
-        now = time.time()
-        for filename in os.listdir(TEMP_EXPORT_DIR):
-            filepath = os.path.join(TEMP_EXPORT_DIR, filename)
-            if os.path.isfile(filepath) and now - os.path.getmtime(filepath) > 300:
-                os.remove(filepath)
-    except Exception as e:
-        logger.warning(f"Erreur nettoyage exports: {e}")
 
 
 # ==================== MODÈLES PYDANTIC ====================
@@ -1372,42 +1359,60 @@ async def export_personnel_excel(
 
 @router.get("/{tenant_slug}/exports/download/{file_id}")
 async def download_temp_export(tenant_slug: str, file_id: str):
-    """Télécharge un fichier d'export temporaire (accès public avec ID unique)"""
+    """Télécharge un fichier d'export (accès public avec ID unique = sha256 du contenu)"""
     from fastapi.responses import FileResponse
     
-    # Nettoyer les vieux fichiers
-    cleanup_old_exports()
-    
-    # Chercher le fichier
-    for filename in os.listdir(TEMP_EXPORT_DIR):
-        if filename.startswith(file_id):
-            filepath = os.path.join(TEMP_EXPORT_DIR, filename)
-            
-            # Déterminer le type MIME
-            if filename.endswith('.pdf'):
-                media_type = "application/pdf"
-            elif filename.endswith('.xlsx'):
-                media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-            else:
-                media_type = "application/octet-stream"
-            
-            # Extraire le nom original du fichier
-            original_name = filename.split('_', 1)[1] if '_' in filename else filename
-            
-            # FileResponse avec filename= gère automatiquement Content-Disposition: attachment
-            # NE PAS ajouter de header Content-Disposition en plus, cela corrompt le fichier
-            return FileResponse(
-                path=filepath,
-                media_type=media_type,
-                filename=original_name,
-                headers={
-                    "Access-Control-Allow-Origin": "*",
-                    "Access-Control-Expose-Headers": "Content-Disposition",
-                    "Cache-Control": "no-cache"
-                }
-            )
-    
-    raise HTTPException(status_code=404, detail="Fichier non trouvé ou expiré")
+    artefact = lire_artefact(file_id)
+    if not artefact:
+        raise HTTPException(status_code=404, detail="Fichier non trouvé ou expiré")
+    
+    filepath, meta = artefact
+    
+    # FileResponse avec filename= gère automatiquement Content-Disposition: attachment
+    # NE PAS ajouter de header Content-Disposition en plus, cela corrompt le fichier
+    return FileResponse(
+        path=filepath,
+        media_type=meta.get("media_type", "application/octet-stream"),
+        filename=meta.get("filename", file_id),
+        headers={
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Expose-Headers": "Content-Disposition",
+            "Cache-Control": "no-cache"
+        }
+    )
+
+
+def _reponse_job_export(tenant_slug: str, job: dict) -> dict:
+    """Réponse commune aux endpoints d'export (URL de téléchargement si terminé)"""
+    reponse = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "progress": job.get("progress", 0),
+        "filename": job.get("filename"),
+        "expires_in": EXPORT_ARTIFACT_TTL_SECONDS
+    }
+    if job["status"] == "termine":
+        frontend_url = os.environ.get("FRONTEND_URL", "")
+        reponse["success"] = True
+        reponse["download_url"] = f"{frontend_url}/api/{tenant_slug}/exports/download/{job['file_id']}"
+    elif job["status"] == "erreur":
+        reponse["success"] = False
+        reponse["error"] = job.get("error")
+    return reponse
+
+
+@router.get("/{tenant_slug}/exports/jobs/{job_id}")
+async def get_export_job(
+    tenant_slug: str,
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """Statut et progression d'un job d'export"""
+    tenant = await get_tenant_from_slug(tenant_slug)
+    job = await db.export_jobs.find_one({"id": job_id, "tenant_id": tenant.id}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Export non trouvé")
+    return _reponse_job_export(tenant_slug, job)
 
 
 @router.post("/{tenant_slug}/personnel/generate-export")
@@ -1415,9 +1420,14 @@ async def generate_personnel_export(
     tenant_slug: str,
     export_type: str = "pdf",
     user_id: Optional[str] = None,
+    asynchrone: bool = False,
     current_user: User = Depends(get_current_user)
 ):
-    """Génère un export et retourne une URL de téléchargement direct"""
+    """
+    Génère un export et retourne une URL de téléchargement direct.
+    Le rendu s'exécute dans le pool de processus d'export; avec asynchrone=true,
+    retourne immédiatement le job (suivi via /exports/jobs/{job_id}).
+    """
     tenant = await get_tenant_from_slug(tenant_slug)
     
     # RBAC: Vérifier permission d'export sur le module personnel
@@ -1425,350 +1435,36 @@ async def generate_personnel_export(
     
     try:
         # Nettoyer les vieux fichiers
-        cleanup_old_exports()
+        await asyncio.to_thread(nettoyer_artefacts)
         
         # Récupérer les utilisateurs avec toutes leurs informations
         if user_id:
-            users_data = await db.users.find({"id": user_id, "tenant_id": tenant.id}).to_list(1)
+            users_data = await db.users.find({"id": user_id, "tenant_id": tenant.id}, {"_id": 0}).to_list(1)
         else:
-            users_data = await db.users.find({"tenant_id": tenant.id}).sort("nom", 1).to_list(1000)
-        
-        # Générer un ID unique pour le fichier
-        file_id = str(uuid.uuid4())[:8]
-        
-        if export_type == "pdf":
-            # Utiliser les helpers de branding
-            buffer, doc, elements = create_branded_pdf(tenant, pagesize=A4)
-            styles = getSampleStyleSheet()
-            modern_styles = get_modern_pdf_styles(styles)
-            
-            # Date de génération
-            from datetime import datetime
-            date_generation = datetime.now().strftime("%d/%m/%Y à %H:%M")
-            
-            if user_id and users_data:
-                # FICHE INDIVIDUELLE
-                user = users_data[0]
-                
-                # Titre
-                elements.append(Paragraph("Fiche Employé", modern_styles['title']))
-                elements.append(Spacer(1, 10))
-                
-                # Sous-titre avec nom
-                nom_complet = f"{user.get('prenom', '')} {user.get('nom', '')}"
-                elements.append(Paragraph(nom_complet, modern_styles['subheading']))
-                elements.append(Spacer(1, 20))
-                
-                # Section: Informations générales
-                elements.append(Paragraph("📋 Informations générales", modern_styles['heading']))
-                
-                info_generales = [
-                    ["Champ", "Valeur"],
-                    ["Nom complet", nom_complet],
-                    ["Email", user.get("email", "-")],
-                    ["Téléphone", user.get("telephone", "-")],
-                    ["Adresse", user.get("adresse", "-")],
-                    ["Contact d'urgence", user.get("contact_urgence", "-")],
-                ]
-                table1 = Table(info_generales, colWidths=[150, 300])
-                table1.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#DC2626")),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#e5e7eb")),
-                    ('BACKGROUND', (0, 1), (0, -1), colors.HexColor("#f9fafb")),
-                    ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                    ('PADDING', (0, 0), (-1, -1), 8),
-                ]))
-                elements.append(table1)
-                elements.append(Spacer(1, 20))
-                
-                # Section: Informations professionnelles
-                elements.append(Paragraph("👷 Informations professionnelles", modern_styles['heading']))
-                
-                info_pro = [
-                    ["Champ", "Valeur"],
-                    ["Grade", user.get("grade", "-")],
-                    ["Matricule", user.get("matricule", user.get("numero_employe", "-"))],
-                    ["Statut", user.get("statut", "-")],
-                    ["Type d'emploi", user.get("type_emploi", "-")],
-                    ["Date d'embauche", user.get("date_embauche", "-")],
-                    ["Taux horaire", f"{user.get('taux_horaire', 0):.2f} $" if user.get('taux_horaire') else "-"],
-                    ["Heures max/semaine", str(user.get("heures_max_semaine", 40))],
-                ]
-                table2 = Table(info_pro, colWidths=[150, 300])
-                table2.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#DC2626")),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#e5e7eb")),
-                    ('BACKGROUND', (0, 1), (0, -1), colors.HexColor("#f9fafb")),
-                    ('FONTNAME', (0, 1), (0, -1), 'Helvetica-Bold'),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                    ('PADDING', (0, 0), (-1, -1), 8),
-                ]))
-                elements.append(table2)
-                elements.append(Spacer(1, 20))
-                
-                # Section: Tailles EPI (si disponibles)
-                tailles_epi = user.get("tailles_epi", {})
-                if tailles_epi:
-                    elements.append(Paragraph("🛡️ Tailles EPI", modern_styles['heading']))
-                    
-                    epi_noms = {
-                        'casque': 'Casque', 'bottes': 'Bottes', 'veste_bunker': 'Veste Bunker',
-                        'pantalon_bunker': 'Pantalon Bunker', 'gants': 'Gants',
-                        'masque_apria': 'Facial APRIA', 'cagoule': 'Cagoule'
-                    }
-                    
-                    epi_data = [["Équipement", "Taille"]]
-                    for key, nom in epi_noms.items():
-                        if tailles_epi.get(key):
-                            epi_data.append([nom, tailles_epi[key]])
-                    
-                    if len(epi_data) > 1:
-                        table3 = Table(epi_data, colWidths=[200, 100])
-                        table3.setStyle(TableStyle([
-                            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#DC2626")),
-                            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                            ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#e5e7eb")),
-                            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                            ('PADDING', (0, 0), (-1, -1), 6),
-                        ]))
-                        elements.append(table3)
-                    elements.append(Spacer(1, 20))
-                
-                # Section: Compétences (si disponibles)
-                competences = user.get("competences_validees", [])
-                if competences:
-                    elements.append(Paragraph("🎓 Compétences validées", modern_styles['heading']))
-                    comp_text = ", ".join(competences) if isinstance(competences, list) else str(competences)
-                    elements.append(Paragraph(comp_text, styles['Normal']))
-                    elements.append(Spacer(1, 20))
-                
-            else:
-                # LISTE DU PERSONNEL
-                elements.append(Paragraph("Liste du Personnel", modern_styles['title']))
-                elements.append(Spacer(1, 10))
-                
-                # Statistiques
-                total = len(users_data)
-                actifs = len([u for u in users_data if u.get("statut") == "Actif"])
-                temps_plein = len([u for u in users_data if u.get("type_emploi") == "temps_plein"])
-                temps_partiel = len([u for u in users_data if u.get("type_emploi") == "temps_partiel"])
-                
-                stats_text = f"Total: {total} employés | Actifs: {actifs} | Temps plein: {temps_plein} | Temps partiel: {temps_partiel}"
-                elements.append(Paragraph(stats_text, modern_styles['subheading']))
-                elements.append(Spacer(1, 20))
-                
-                # Tableau avec plus de colonnes
-                data = [["Nom", "Prénom", "Grade", "Email", "Téléphone", "Statut", "Type"]]
-                for u in users_data:
-                    data.append([
-                        u.get("nom", ""),
-                        u.get("prenom", ""),
-                        u.get("grade", "-"),
-                        u.get("email", "-"),
-                        u.get("telephone", "-"),
-                        u.get("statut", "-"),
-                        "TP" if u.get("type_emploi") == "temps_plein" else "TPa"
-                    ])
-                
-                table = Table(data, colWidths=[70, 70, 60, 120, 80, 50, 35])
-                table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor("#DC2626")),
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 9),
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor("#e5e7eb")),
-                    ('FONTSIZE', (0, 1), (-1, -1), 8),
-                    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                    ('PADDING', (0, 0), (-1, -1), 5),
-                    ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.HexColor("#f9fafb")]),
-                ]))
-                elements.append(table)
-            
-            # Footer avec date de génération
-            elements.append(Spacer(1, 30))
-            footer_style = ParagraphStyle(
-                'Footer',
-                parent=styles['Normal'],
-                fontSize=8,
-                textColor=colors.HexColor("#9ca3af"),
-                alignment=TA_CENTER
-            )
-            footer_text = create_pdf_footer_text(tenant)
-            elements.append(Paragraph(f"Document généré le {date_generation}", footer_style))
-            if footer_text:
-                elements.append(Paragraph(footer_text, footer_style))
-            
-            doc.build(elements)
-            buffer.seek(0)
-            
-            original_name = f"fiche_{users_data[0].get('nom', 'employe')}_{users_data[0].get('prenom', '')}.pdf" if user_id and users_data else "liste_personnel.pdf"
-            filepath = os.path.join(TEMP_EXPORT_DIR, f"{file_id}_{original_name}")
-            
-            with open(filepath, 'wb') as f:
-                f.write(buffer.read())
-        
-        else:  # Excel
-            from datetime import datetime
-            wb = Workbook()
-            ws = wb.active
-            ws.title = "Personnel"
-            
-            # Style pour le titre
-            titre = "Fiche Employé" if user_id else "Liste du Personnel"
-            ws['A1'] = titre
-            ws['A1'].font = Font(size=16, bold=True, color="DC2626")
-            ws.merge_cells('A1:H1')
-            
-            # Nom du service
-            ws['A2'] = tenant.nom if hasattr(tenant, 'nom') else tenant_slug
-            ws['A2'].font = Font(size=12, italic=True, color="666666")
-            ws.merge_cells('A2:H2')
-            
-            if not user_id:
-                # LISTE DU PERSONNEL
-                total = len(users_data)
-                actifs = len([u for u in users_data if u.get("statut") == "Actif"])
-                temps_plein = len([u for u in users_data if u.get("type_emploi") == "temps_plein"])
-                temps_partiel = len([u for u in users_data if u.get("type_emploi") == "temps_partiel"])
-                
-                # Statistiques
-                ws['A4'] = "Statistiques"
-                ws['A4'].font = Font(bold=True)
-                ws['A5'] = "Total personnel"
-                ws['B5'] = total
-                ws['A6'] = "Personnel actif"
-                ws['B6'] = actifs
-                ws['A7'] = "Temps plein"
-                ws['B7'] = temps_plein
-                ws['A8'] = "Temps partiel"
-                ws['B8'] = temps_partiel
-                
-                # En-têtes du tableau (plus de colonnes)
-                headers = ["Nom", "Prénom", "Grade", "Email", "Téléphone", "Matricule", "Statut", "Type d'emploi"]
-                for col, header in enumerate(headers, 1):
-                    cell = ws.cell(row=10, column=col, value=header)
-                    cell.font = Font(bold=True, color="FFFFFF")
-                    cell.fill = PatternFill(start_color="DC2626", end_color="DC2626", fill_type="solid")
-                    cell.alignment = Alignment(horizontal='center')
-                
-                # Données
-                for row, u in enumerate(users_data, 11):
-                    ws.cell(row=row, column=1, value=u.get("nom", ""))
-                    ws.cell(row=row, column=2, value=u.get("prenom", ""))
-                    ws.cell(row=row, column=3, value=u.get("grade", ""))
-                    ws.cell(row=row, column=4, value=u.get("email", ""))
-                    ws.cell(row=row, column=5, value=u.get("telephone", ""))
-                    ws.cell(row=row, column=6, value=u.get("matricule", u.get("numero_employe", "")))
-                    ws.cell(row=row, column=7, value=u.get("statut", ""))
-                    ws.cell(row=row, column=8, value=u.get("type_emploi", ""))
-                
-                # Largeur des colonnes
-                ws.column_dimensions['A'].width = 15
-                ws.column_dimensions['B'].width = 15
-                ws.column_dimensions['C'].width = 12
-                ws.column_dimensions['D'].width = 25
-                ws.column_dimensions['E'].width = 15
-                ws.column_dimensions['F'].width = 12
-                ws.column_dimensions['G'].width = 10
-                ws.column_dimensions['H'].width = 15
-                
-            else:
-                # FICHE INDIVIDUELLE
-                if users_data:
-                    u = users_data[0]
-                    row = 4
-                    
-                    # Informations générales
-                    ws[f'A{row}'] = "INFORMATIONS GÉNÉRALES"
-                    ws[f'A{row}'].font = Font(bold=True, color="DC2626")
-                    ws.merge_cells(f'A{row}:B{row}')
-                    row += 1
-                    
-                    infos = [
-                        ("Nom", u.get("nom", "")),
-                        ("Prénom", u.get("prenom", "")),
-                        ("Email", u.get("email", "")),
-                        ("Téléphone", u.get("telephone", "")),
-                        ("Adresse", u.get("adresse", "")),
-                        ("Contact d'urgence", u.get("contact_urgence", "")),
-                    ]
-                    for label, value in infos:
-                        ws[f'A{row}'] = label
-                        ws[f'A{row}'].font = Font(bold=True)
-                        ws[f'B{row}'] = value
-                        row += 1
-                    
-                    row += 1
-                    ws[f'A{row}'] = "INFORMATIONS PROFESSIONNELLES"
-                    ws[f'A{row}'].font = Font(bold=True, color="DC2626")
-                    ws.merge_cells(f'A{row}:B{row}')
-                    row += 1
-                    
-                    infos_pro = [
-                        ("Grade", u.get("grade", "")),
-                        ("Matricule", u.get("matricule", u.get("numero_employe", ""))),
-                        ("Statut", u.get("statut", "")),
-                        ("Type d'emploi", u.get("type_emploi", "")),
-                        ("Date d'embauche", u.get("date_embauche", "")),
-                        ("Taux horaire", f"{u.get('taux_horaire', 0):.2f} $" if u.get('taux_horaire') else ""),
-                        ("Heures max/semaine", str(u.get("heures_max_semaine", 40))),
-                    ]
-                    for label, value in infos_pro:
-                        ws[f'A{row}'] = label
-                        ws[f'A{row}'].font = Font(bold=True)
-                        ws[f'B{row}'] = value
-                        row += 1
-                    
-                    # Tailles EPI
-                    tailles_epi = u.get("tailles_epi", {})
-                    if tailles_epi:
-                        row += 1
-                        ws[f'A{row}'] = "TAILLES EPI"
-                        ws[f'A{row}'].font = Font(bold=True, color="DC2626")
-                        ws.merge_cells(f'A{row}:B{row}')
-                        row += 1
-                        
-                        epi_noms = {
-                            'casque': 'Casque', 'bottes': 'Bottes', 'veste_bunker': 'Veste Bunker',
-                            'pantalon_bunker': 'Pantalon Bunker', 'gants': 'Gants',
-                            'masque_apria': 'Facial APRIA', 'cagoule': 'Cagoule'
-                        }
-                        for key, nom in epi_noms.items():
-                            if tailles_epi.get(key):
-                                ws[f'A{row}'] = nom
-                                ws[f'A{row}'].font = Font(bold=True)
-                                ws[f'B{row}'] = tailles_epi[key]
-                                row += 1
-            
-            # Footer
-            ws[f'A{ws.max_row + 2}'] = f"Généré le {datetime.now().strftime('%d/%m/%Y à %H:%M')} par ProFireManager"
-            ws[f'A{ws.max_row}'].font = Font(size=8, italic=True, color="999999")
-            
-            # Largeur colonnes pour fiche individuelle
-            if user_id:
-                ws.column_dimensions['A'].width = 25
-                ws.column_dimensions['B'].width = 35
-            
-            original_name = f"fiche_{users_data[0].get('nom', 'employe')}_{users_data[0].get('prenom', '')}.xlsx" if user_id and users_data else "liste_personnel.xlsx"
-            filepath = os.path.join(TEMP_EXPORT_DIR, f"{file_id}_{original_name}")
-            wb.save(filepath)
-        
-        # Construire l'URL de téléchargement
-        frontend_url = os.environ.get("FRONTEND_URL", "")
-        download_url = f"{frontend_url}/api/{tenant_slug}/exports/download/{file_id}"
-        
-        return {
-            "success": True,
-            "download_url": download_url,
-            "filename": original_name,
-            "expires_in": 300  # 5 minutes
+            users_data = await db.users.find({"tenant_id": tenant.id}, {"_id": 0}).sort("nom", 1).to_list(1000)
+        
+        payload = {
+            "tenant": tenant.model_dump(),
+            "tenant_slug": tenant_slug,
+            "export_type": export_type,
+            "user_id": user_id,
+            "users": users_data,
+            "logo": await logo_pour_rendu(tenant) if export_type == "pdf" else None
         }
+        job, termine = await soumettre_export(
+            db,
+            tenant_id=tenant.id,
+            demandeur_id=current_user.id,
+            type_export=f"personnel_{export_type}",
+            rendu=rendre_export_personnel,
+            payload=payload
+        )
+        if not asynchrone:
+            job = await termine
+            if job["status"] == "erreur":
+                raise Exception(job.get("error"))
+        
+        return _reponse_job_export(tenant_slug, job)
         
     except Exception as e:
         logger.error(f"Erreur génération export: {str(e)}")
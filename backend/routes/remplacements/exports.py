@@ -72,7 +72,9 @@ async def export_remplacements_to_pdf(
         types_map = {t['id']: t for t in types_garde_list}
         
         # Créer le PDF
-        buffer, doc, elements = create_branded_pdf(tenant, pagesize=landscape(letter))
+        from services.azure_storage import get_logo_bytes_async
+        logo_data = await get_logo_bytes_async(tenant)
+        buffer, doc, elements = create_branded_pdf(tenant, logo_data=logo_data, pagesize=landscape(letter))
         styles = getSampleStyleSheet()
         modern_styles = get_modern_pdf_styles(styles)
         
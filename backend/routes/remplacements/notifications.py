@@ -18,6 +18,7 @@ import re
 logger = logging.getLogger(__name__)
 
 from services.email_builder import build_email, email_card, email_detail_row, email_alert_card
+from services.notification_dispatcher import soumettre_email
 
 
 def formater_numero_telephone(numero: str) -> Optional[str]:
@@ -76,7 +77,7 @@ async def envoyer_email_remplacement(
     """Envoie un email au remplaçant potentiel avec les boutons Accepter/Refuser"""
     try:
         import resend
-        from routes.emails_history import log_email_sent
+        from routes.emails_history import historiser_apres_envoi
         
         resend_api_key = os.environ.get('RESEND_API_KEY')
         if not resend_api_key:
@@ -165,25 +166,18 @@ async def envoyer_email_remplacement(
             "html": html_content
         }
         
-        response = resend.Emails.send(params)
-        logger.info(f"✅ Email remplacement envoyé à {remplacant_user['email']} (ID: {response.get('id', 'N/A')})")
-        
-        # Logger l'email
-        try:
-            await log_email_sent(
-                tenant_id=tenant_id,
-                destinataire=remplacant_user["email"],
-                sujet=f"🚒 Demande de remplacement le {date_garde}",
-                type_email="demande_remplacement",
-                statut="sent",
-                metadata={
-                    "demande_id": demande_data.get("id"),
-                    "remplacant_id": remplacant.get("user_id"),
-                    "token": token
-                }
-            )
-        except Exception as log_error:
-            logger.warning(f"⚠️ Erreur log email: {log_error}")
+        soumettre_email(params, apres_envoi=historiser_apres_envoi(
+            remplacant_user["email"],
+            tenant_id=tenant_id,
+            sujet=f"🚒 Demande de remplacement le {date_garde}",
+            type_email="demande_remplacement",
+            metadata={
+                "demande_id": demande_data.get("id"),
+                "remplacant_id": remplacant.get("user_id"),
+                "token": token
+            }
+        ))
+        logger.info(f"✅ Email remplacement mis en file pour {remplacant_user['email']}")
         
         return True
         
@@ -203,7 +197,7 @@ async def envoyer_email_remplacement_trouve(
     """Envoie un email au demandeur pour l'informer qu'un remplaçant a été trouvé"""
     try:
         import resend
-        from routes.emails_history import log_email_sent
+        from routes.emails_history import historiser_apres_envoi
         
         resend_api_key = os.environ.get('RESEND_API_KEY')
         if not resend_api_key:
@@ -272,26 +266,19 @@ async def envoyer_email_remplacement_trouve(
             "html": html_content
         }
         
-        response = resend.Emails.send(params)
-        logger.info(f"✅ Email 'remplacement trouvé' envoyé à {demandeur_email} (ID: {response.get('id', 'N/A')})")
-        
-        # Logger l'email
-        try:
-            await log_email_sent(
-                tenant_id=tenant.get("id"),
-                destinataire=demandeur_email,
-                sujet=f"✅ Remplaçant trouvé pour le {date_garde}",
-                type_email="remplacement_trouve",
-                statut="sent",
-                metadata={
-                    "demande_id": demande_data.get("id"),
-                    "remplacant_id": remplacant.get("id"),
-                    "demandeur_id": demandeur.get("id"),
-                    "date_garde": date_garde
-                }
-            )
-        except Exception as log_error:
-            logger.warning(f"⚠️ Erreur log email: {log_error}")
+        soumettre_email(params, apres_envoi=historiser_apres_envoi(
+            demandeur_email,
+            tenant_id=tenant.get("id"),
+            sujet=f"✅ Remplaçant trouvé pour le {date_garde}",
+            type_email="remplacement_trouve",
+            metadata={
+                "demande_id": demande_data.get("id"),
+                "remplacant_id": remplacant.get("id"),
+                "demandeur_id": demandeur.get("id"),
+                "date_garde": date_garde
+            }
+        ))
+        logger.info(f"✅ Email 'remplacement trouvé' mis en file pour {demandeur_email}")
         
         return True
         
@@ -310,7 +297,7 @@ async def envoyer_email_remplacement_non_trouve(
     """Envoie un email au demandeur pour l'informer qu'aucun remplaçant n'a été trouvé"""
     try:
         import resend
-        from routes.emails_history import log_email_sent
+        from routes.emails_history import historiser_apres_envoi
         
         resend_api_key = os.environ.get('RESEND_API_KEY')
         if not resend_api_key:
@@ -380,25 +367,18 @@ async def envoyer_email_remplacement_non_trouve(
             "html": html_content
         }
         
-        response = resend.Emails.send(params)
-        logger.info(f"✅ Email 'remplacement non trouvé' envoyé à {demandeur_email} (ID: {response.get('id', 'N/A')})")
-        
-        # Logger l'email
-        try:
-            await log_email_sent(
-                tenant_id=tenant.get("id"),
-                destinataire=demandeur_email,
-                sujet=f"❌ Aucun remplaçant trouvé pour le {date_garde}",
-                type_email="remplacement_non_trouve",
-                statut="sent",
-                metadata={
-                    "demande_id": demande_data.get("id"),
-                    "demandeur_id": demandeur.get("id"),
-                    "date_garde": date_garde
-                }
-            )
-        except Exception as log_error:
-            logger.warning(f"⚠️ Erreur log email: {log_error}")
+        soumettre_email(params, apres_envoi=historiser_apres_envoi(
+            demandeur_email,
+            tenant_id=tenant.get("id"),
+            sujet=f"❌ Aucun remplaçant trouvé pour le {date_garde}",
+            type_email="remplacement_non_trouve",
+            metadata={
+                "demande_id": demande_data.get("id"),
+                "demandeur_id": demandeur.get("id"),
+                "date_garde": date_garde
+            }
+        ))
+        logger.info(f"✅ Email 'remplacement non trouvé' mis en file pour {demandeur_email}")
         
         return True
         
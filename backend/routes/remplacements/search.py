@@ -9,9 +9,13 @@ Algorithme de tri multi-niveaux pour trouver les meilleurs remplaçants:
 """
 
 from typing import List, Dict, Any
+from collections import defaultdict
 from datetime import datetime, timedelta
 import logging
 
+from services.disponibilites_resolution import charger_resolution_disponibilites
+from services.hours_ledger import obtenir_ledger_heures, plage_mois_complet
+
 logger = logging.getLogger(__name__)
 
 
@@ -154,10 +158,17 @@ async def trouver_remplacants_potentiels(
                 "user_id": {"$ne": demandeur_id}  # Exclure le demandeur
             }).to_list(100)
             
-            # Vérifier si au moins un des autres assignés est officier
+            # Vérifier si au moins un des autres assignés est officier (une seule requête $in)
+            autres_user_ids = list({a["user_id"] for a in autres_assignations if a.get("user_id")})
+            autres_users = await db.users.find(
+                {"id": {"$in": autres_user_ids}, "tenant_id": tenant_id},
+                {"_id": 0, "id": 1, "prenom": 1, "nom": 1, "grade": 1}
+            ).to_list(length=None) if autres_user_ids else []
+            autres_users_map = {u["id"]: u for u in autres_users}
+            
             autre_officier_present = False
             for assignation in autres_assignations:
-                autre_user = await db.users.find_one({"id": assignation["user_id"], "tenant_id": tenant_id})
+                autre_user = autres_users_map.get(assignation["user_id"])
                 if autre_user:
                     autre_grade = autre_user.get("grade", "")
                     if est_officier_grade(autre_grade):
@@ -249,28 +260,38 @@ async def trouver_remplacants_potentiels(
         if exclus_ids:
             logger.info(f"🔍 IDs exclus (déjà contactés): {exclus_ids}")
         
-        # Calculer les heures mensuelles pour l'équitabilité
+        # ==================== HEURES (ÉQUITÉ ET MAXIMUM HEBDOMADAIRE) ====================
+        # Registre des heures partagé avec l'attribution automatique (durée du type de garde,
+        # heures internes / externes séparées), en cache par tenant pour le mois de la garde
         debut_mois = datetime.strptime(date_garde, "%Y-%m-%d").replace(day=1)
         fin_mois = (debut_mois + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        debut_mois_str, fin_mois_str = debut_mois.strftime("%Y-%m-%d"), fin_mois.strftime("%Y-%m-%d")
         
-        user_monthly_hours = {}
-        for user in users_list:
-            assignations_mois = await db.assignations.find({
-                "user_id": user["id"],
-                "tenant_id": tenant_id,
-                "date": {
-                    "$gte": debut_mois.strftime("%Y-%m-%d"),
-                    "$lte": fin_mois.strftime("%Y-%m-%d")
-                }
-            }).to_list(1000)
-            user_monthly_hours[user["id"]] = sum(8 for _ in assignations_mois)
+        ledger_debut, ledger_fin = plage_mois_complet(date_garde)
+        ledger_heures = await obtenir_ledger_heures(db, tenant_id, ledger_debut, ledger_fin)
+        
+        # Équité: heures du même type (interne / externe) que la garde à remplacer
+        user_monthly_hours = ledger_heures.totaux_periode(debut_mois_str, fin_mois_str, externe=est_garde_externe)
+        
+        # ==================== CONFLITS DU JOUR ====================
+        # Assignations du jour de tous les candidats en UNE requête, indexées par user
+        candidats_ids = [u["id"] for u in users_list]
+        assignations_jour = await db.assignations.find({
+            "tenant_id": tenant_id,
+            "user_id": {"$in": candidats_ids},
+            "date": date_garde
+        }, {"_id": 0, "user_id": 1, "date": 1, "type_garde_id": 1}).to_list(length=None) if candidats_ids else []
+        
+        assignations_jour_par_user = defaultdict(list)
+        for assignation in assignations_jour:
+            assignations_jour_par_user[assignation.get("user_id")].append(assignation)
         
         # Calculer l'équipe de garde du jour si actif
         equipe_garde_du_jour = None
         if privilegier_equipe_garde and params_equipes_garde:
             config_tp = params_equipes_garde.get("temps_partiel", {})
             if config_tp.get("rotation_active"):
-                from routes.equipes_garde import get_equipe_garde_du_jour_sync
+                from services.equipes_garde_rotation import get_equipe_garde_du_jour_sync
                 equipe_garde_du_jour = get_equipe_garde_du_jour_sync(
                     type_rotation=config_tp.get("type_rotation", "hebdomadaire"),
                     date_reference=config_tp.get("date_reference", date_garde),
@@ -285,6 +306,13 @@ async def trouver_remplacants_potentiels(
                 )
                 logger.info(f"📊 Équipe de garde du jour: {equipe_garde_du_jour}")
         
+        # Disponibilités/indisponibilités du jour pour tous les candidats en UNE requête
+        # (mêmes règles de priorité que l'attribution automatique)
+        resolution_dispos = await charger_resolution_disponibilites(
+            db, tenant_id, date_garde, date_garde,
+            user_ids=candidats_ids
+        )
+        
         # ==================== CLASSIFICATION DES CANDIDATS ====================
         
         # Structure: niveau -> liste de candidats
@@ -324,13 +352,7 @@ async def trouver_remplacants_potentiels(
                     continue
             
             # ========== N0: FILTRE INDISPONIBILITÉ ==========
-            indispo = await db.disponibilites.find_one({
-                "user_id": user_id,
-                "tenant_id": tenant_id,
-                "date": date_garde,
-                "statut": "indisponible"
-            })
-            if indispo:
+            if resolution_dispos.est_indisponible(user_id, date_garde):
                 logger.info(f"❌ {user_name} - N0: Indisponible déclaré pour {date_garde}")
                 continue
             
@@ -349,20 +371,13 @@ async def trouver_remplacants_potentiels(
             
             # ========== N1: FILTRE ASSIGNATION EN CONFLIT (avec chevauchement horaire) ==========
             # On vérifie si le candidat a une assignation qui CHEVAUCHE les horaires de la garde demandée
-            assignations_ce_jour = await db.assignations.find({
-                "user_id": user_id,
-                "tenant_id": tenant_id,
-                "date": date_garde
-            }).to_list(10)
+            assignations_ce_jour = assignations_jour_par_user.get(user_id, [])
             
             conflit_horaire = False
             garde_en_conflit = None
             for assignation in assignations_ce_jour:
-                # Récupérer le type de garde de cette assignation
-                type_garde_assignation = await db.types_garde.find_one({
-                    "id": assignation.get("type_garde_id"),
-                    "tenant_id": tenant_id
-                })
+                # Type de garde de cette assignation (préchargé)
+                type_garde_assignation = ledger_heures.get_type_garde(assignation.get("type_garde_id"))
                 if type_garde_assignation:
                     heure_debut_existante = type_garde_assignation.get("heure_debut", "00:00")
                     heure_fin_existante = type_garde_assignation.get("heure_fin", "23:59")
@@ -382,31 +397,12 @@ async def trouver_remplacants_potentiels(
             # ========== CALCULS COMMUNS ==========
             
             # Disponibilité déclarée
-            dispo = await db.disponibilites.find_one({
-                "user_id": user_id,
-                "tenant_id": tenant_id,
-                "date": date_garde,
-                "statut": "disponible"
-            })
-            has_disponibilite = dispo is not None
-            
-            # Heures de la semaine
-            semaine_debut = datetime.strptime(date_garde, "%Y-%m-%d")
-            while semaine_debut.weekday() != 0:
-                semaine_debut -= timedelta(days=1)
-            semaine_fin = semaine_debut + timedelta(days=6)
-            
-            assignations_semaine = await db.assignations.find({
-                "user_id": user_id,
-                "tenant_id": tenant_id,
-                "date": {
-                    "$gte": semaine_debut.strftime("%Y-%m-%d"),
-                    "$lte": semaine_fin.strftime("%Y-%m-%d")
-                }
-            }).to_list(1000)
+            has_disponibilite = resolution_dispos.est_disponible(user_id, date_garde)
             
-            heures_travaillees = sum(8 for _ in assignations_semaine)
-            depasserait_max = (heures_travaillees + duree_garde) > user_heures_max
+            # Heures de la semaine: seules les gardes INTERNES comptent vers le max
+            # (une garde externe ne peut pas faire dépasser le max, comme dans le planning)
+            heures_travaillees = ledger_heures.heures_semaine(user_id, date_garde, externe=False)
+            depasserait_max = not est_garde_externe and (heures_travaillees + duree_garde) > user_heures_max
             
             # Grade équivalent ou fonction supérieure
             est_grade_equivalent = user_grade_niveau == demandeur_grade_niveau
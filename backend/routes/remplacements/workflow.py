@@ -13,6 +13,7 @@ import uuid
 import logging
 
 from routes.remplacements.utils import est_dans_heures_silencieuses, calculer_prochaine_heure_active
+from services.hours_ledger import reaffecter_assignation
 
 logger = logging.getLogger(__name__)
 
@@ -110,6 +111,7 @@ async def accepter_remplacement_workflow(
                     }
                 }
             )
+            reaffecter_assignation(tenant_id, assignation, remplacant_id)
             logger.info(f"✅ Planning mis à jour: {remplacant['prenom']} {remplacant['nom']} remplace assignation {assignation['id']}")
         else:
             logger.warning(f"⚠️ Aucune assignation trouvée pour le demandeur {demande_data['demandeur_id']} le {demande_data['date']}")
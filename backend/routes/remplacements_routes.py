@@ -69,6 +69,9 @@ from routes.remplacements.utils import (
 # Import de la fonction de recherche depuis le nouveau module
 from routes.remplacements.search import trouver_remplacants_potentiels
 
+# Registre des heures (mis à jour quand une assignation change de titulaire)
+from services.hours_ledger import reaffecter_assignation
+
 # Import des fonctions d'export
 from routes.remplacements.exports import export_remplacements_to_pdf, export_remplacements_to_excel
 
@@ -908,6 +911,7 @@ async def prendre_quart_ouvert(
                 }
             }
         )
+        reaffecter_assignation(tenant.id, assignation, current_user.id)
         logger.info(f"Planning mis a jour: {remplacant_nom} prend l'assignation {assignation['id']}")
     
     # Notifier le demandeur
@@ -1038,6 +1042,7 @@ async def approuver_quart_ouvert(
                 }
             }
         )
+        reaffecter_assignation(tenant.id, assignation, volontaire_id)
     
     volontaire = await db.users.find_one({"id": volontaire_id})
     volontaire_nom = demande_data.get("volontaire_nom", f"{volontaire.get('prenom', '')} {volontaire.get('nom', '')}" if volontaire else "Volontaire")
@@ -24,6 +24,7 @@ import base64
 import asyncio
 from io import BytesIO
 
+from services.notification_dispatcher import soumettre_email
 from routes.dependencies import (
     db,
     get_current_user,
@@ -484,23 +485,15 @@ async def send_ronde_email_background(tenant, ronde_id: str, vehicle: dict, reci
             "html": html_content
         }
         
-        response = resend.Emails.send(params)
-        logger.info(f"✅ Email ronde envoyé avec succès - ID: {response.get('id', 'N/A')}")
-        
-        # Log email pour chaque destinataire
-        try:
-            from routes.emails_history import log_email_sent
-            import asyncio
-            for email in recipient_emails:
-                asyncio.create_task(log_email_sent(
-                    type_email="ronde_securite",
-                    destinataire_email=email,
-                    sujet=f"🔧 Ronde de Sécurité - {vehicle.get('nom', 'Véhicule')} - {date_ronde_str}",
-                    tenant_id=tenant.id,
-                    metadata={"vehicule": vehicle.get('nom'), "date": date_ronde_str}
-                ))
-        except Exception as log_err:
-            logger.warning(f"Erreur log email: {log_err}")
+        from routes.emails_history import historiser_apres_envoi
+        soumettre_email(params, apres_envoi=historiser_apres_envoi(
+            recipient_emails,
+            type_email="ronde_securite",
+            sujet=f"🔧 Ronde de Sécurité - {vehicle.get('nom', 'Véhicule')} - {date_ronde_str}",
+            tenant_id=tenant.id,
+            metadata={"vehicule": vehicle.get('nom'), "date": date_ronde_str}
+        ))
+        logger.info(f"✅ Email ronde mis en file pour {len(recipient_emails)} destinataire(s)")
         
     except Exception as e:
         logger.error(f"❌ Erreur envoi email ronde: {e}", exc_info=True)
@@ -843,8 +836,8 @@ async def send_ronde_email_hors_service(tenant, ronde_id: str, vehicle: dict, re
             "html": html_content
         }
         
-        response = resend.Emails.send(params)
-        logger.info(f"✅ Email HORS SERVICE envoyé - ID: {response.get('id', 'N/A')}")
+        soumettre_email(params)
+        logger.info(f"✅ Email HORS SERVICE mis en file pour {len(recipient_emails)} destinataire(s)")
         
     except Exception as e:
         logger.error(f"❌ Erreur envoi email hors service: {e}", exc_info=True)
@@ -958,8 +951,8 @@ async def get_ronde_pdf(
         
         # Header avec logo (Azure ou legacy base64)
         try:
-            from services.azure_storage import get_logo_bytes
-            logo_data = get_logo_bytes(tenant)
+            from services.azure_storage import get_logo_bytes_async
+            logo_data = await get_logo_bytes_async(tenant)
             if logo_data:
                 logo_buffer = BytesIO(logo_data)
                 
@@ -18,7 +18,7 @@ from routes.dependencies import (
     get_tenant_from_slug,
     SuperAdmin
 )
-from services.sftp_service import get_sftp_service, init_sftp_service
+from services.sftp_service import SFTP_POLL_MIN_SECONDS, get_sftp_service, init_sftp_service
 from services.websocket_manager import get_websocket_manager
 
 router = APIRouter(tags=["SFTP Cartes d'appel"])
@@ -246,8 +246,8 @@ async def start_sftp_polling(
     
     sftp_service = get_sftp_service()
     
-    # Récupérer l'intervalle configuré (minimum 60 secondes)
-    interval = max(60, config.get("polling_interval", 300))
+    # Récupérer l'intervalle configuré (minimum SFTP_POLL_MIN_SECONDS, connexion persistante)
+    interval = max(SFTP_POLL_MIN_SECONDS, config.get("polling_interval", 300))
     
     # Démarrer le polling
     await sftp_service.start_polling(
@@ -362,11 +362,11 @@ async def websocket_interventions(
     import uuid
     user_id = str(uuid.uuid4())
     
-    await ws_manager.connect(websocket, tenant.id, user_id)
+    connexion = await ws_manager.connect(websocket, tenant.id, user_id)
     
     try:
         # Envoyer un message de confirmation
-        await websocket.send_json({
+        await connexion.envoyer({
             "type": "connected",
             "message": "WebSocket connecté pour les interventions"
         })
@@ -379,14 +379,14 @@ async def websocket_interventions(
                 if data.get("type") == "auth":
                     # Authentification (à implémenter)
                     # Pour l'instant, juste confirmer
-                    await websocket.send_json({"type": "auth_ok"})
+                    await connexion.envoyer({"type": "auth_ok"})
                 
                 elif data.get("type") == "pong":
                     # Réponse au ping
                     pass
                 
                 elif data.get("type") == "ping":
-                    await websocket.send_json({"type": "pong"})
+                    await connexion.envoyer({"type": "pong"})
                     
             except Exception as e:
                 logger.error(f"Erreur réception WebSocket: {e}")
@@ -395,7 +395,7 @@ async def websocket_interventions(
     except WebSocketDisconnect:
         logger.info(f"WebSocket déconnecté: {user_id}")
     finally:
-        await ws_manager.disconnect(tenant.id, user_id)
+        await ws_manager.disconnect(connexion)
 
 
 
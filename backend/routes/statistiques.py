@@ -12,6 +12,7 @@ Routes:
 from fastapi import APIRouter, Depends
 from pydantic import BaseModel
 from datetime import datetime, timezone, timedelta
+import asyncio
 import logging
 
 from routes.dependencies import (
@@ -34,80 +35,101 @@ class Statistiques(BaseModel):
     remplacements_effectues: int
 
 
+def pipeline_assignations(tenant_id: str, start_week, end_week, start_month, end_month) -> list:
+    """
+    Assignations de la semaine et du mois en une seule agrégation:
+    - semaine: nombre d'assignations par (date, type de garde) pour la couverture
+    - mois: nombre d'assignations par type de garde pour les heures travaillées
+    """
+    debut = min(start_week, start_month).strftime("%Y-%m-%d")
+    fin = max(end_week, end_month).strftime("%Y-%m-%d")
+    return [
+        {"$match": {"tenant_id": tenant_id, "date": {"$gte": debut, "$lte": fin}}},
+        {"$facet": {
+            "semaine": [
+                {"$match": {"date": {
+                    "$gte": start_week.strftime("%Y-%m-%d"),
+                    "$lte": end_week.strftime("%Y-%m-%d")
+                }}},
+                {"$group": {"_id": {"date": "$date", "type_garde_id": "$type_garde_id"}, "n": {"$sum": 1}}}
+            ],
+            "mois": [
+                {"$match": {"date": {
+                    "$gte": start_month.strftime("%Y-%m-%d"),
+                    "$lte": end_month.strftime("%Y-%m-%d")
+                }}},
+                {"$group": {"_id": "$type_garde_id", "n": {"$sum": 1}}}
+            ]
+        }}
+    ]
+
+
+def calculer_couverture(types_garde: list, start_week, assignations_par_jour: dict) -> float:
+    """Taux de couverture de la semaine (personnel assigné plafonné au personnel requis)"""
+    total_personnel_requis = 0
+    total_personnel_assigne = 0
+    
+    for day_offset in range(7):
+        current_day = start_week + timedelta(days=day_offset)
+        day_name = current_day.strftime("%A").lower()
+        date_str = current_day.strftime("%Y-%m-%d")
+        
+        for type_garde in types_garde:
+            jours_app = type_garde.get("jours_application", [])
+            
+            if not jours_app or day_name in jours_app:
+                personnel_requis = type_garde.get("personnel_requis", 1)
+                total_personnel_requis += personnel_requis
+                assignations_jour = assignations_par_jour.get((date_str, type_garde["id"]), 0)
+                total_personnel_assigne += min(assignations_jour, personnel_requis)
+    
+    taux_couverture = (total_personnel_assigne / total_personnel_requis * 100) if total_personnel_requis > 0 else 0
+    return min(taux_couverture, 100.0)
+
+
 @router.get("/{tenant_slug}/statistiques", response_model=Statistiques)
 async def get_statistiques(tenant_slug: str, current_user: User = Depends(get_current_user)):
     """Récupère les statistiques générales pour le dashboard"""
     tenant = await get_tenant_from_slug(tenant_slug)
     
     try:
-        # 1. Personnel actif
-        personnel_count = await db.users.count_documents({"statut": "Actif", "tenant_id": tenant.id})
-        
-        # 2. Gardes cette semaine
         today = datetime.now(timezone.utc).date()
         start_week = today - timedelta(days=today.weekday())
         end_week = start_week + timedelta(days=6)
-        
-        gardes_count = await db.assignations.count_documents({
-            "tenant_id": tenant.id,
-            "date": {
-                "$gte": start_week.strftime("%Y-%m-%d"),
-                "$lte": end_week.strftime("%Y-%m-%d")
-            }
-        })
-        
-        # 3. Formations planifiées
-        formations_count = await db.sessions_formation.count_documents({"statut": "planifie", "tenant_id": tenant.id})
-        
-        # 4. Taux de couverture
-        total_assignations_required = await db.types_garde.find({"tenant_id": tenant.id}).to_list(1000)
-        total_personnel_requis = 0
-        total_personnel_assigne = 0
-        
-        for day_offset in range(7):
-            current_day = start_week + timedelta(days=day_offset)
-            day_name = current_day.strftime("%A").lower()
-            
-            for type_garde in total_assignations_required:
-                jours_app = type_garde.get("jours_application", [])
-                
-                if not jours_app or day_name in jours_app:
-                    personnel_requis = type_garde.get("personnel_requis", 1)
-                    total_personnel_requis += personnel_requis
-                    
-                    assignations_jour = await db.assignations.count_documents({
-                        "tenant_id": tenant.id,
-                        "date": current_day.strftime("%Y-%m-%d"),
-                        "type_garde_id": type_garde["id"]
-                    })
-                    
-                    total_personnel_assigne += min(assignations_jour, personnel_requis)
-        
-        taux_couverture = (total_personnel_assigne / total_personnel_requis * 100) if total_personnel_requis > 0 else 0
-        taux_couverture = min(taux_couverture, 100.0)
-        
-        # 5. Heures travaillées ce mois
         start_month = today.replace(day=1)
         end_month = (start_month + timedelta(days=32)).replace(day=1) - timedelta(days=1)
         
-        assignations_mois = await db.assignations.find({
-            "tenant_id": tenant.id,
-            "date": {
-                "$gte": start_month.strftime("%Y-%m-%d"),
-                "$lte": end_month.strftime("%Y-%m-%d")
-            }
-        }).to_list(1000)
+        # Requêtes indépendantes lancées ensemble: un nombre fixe d'allers-retours,
+        # quel que soit le nombre de types de garde
+        personnel_count, formations_count, remplacements_count, types_garde, facettes = await asyncio.gather(
+            db.users.count_documents({"statut": "Actif", "tenant_id": tenant.id}),
+            db.sessions_formation.count_documents({"statut": "planifie", "tenant_id": tenant.id}),
+            db.demandes_remplacement.count_documents({"statut": "approuve", "tenant_id": tenant.id}),
+            db.types_garde.find(
+                {"tenant_id": tenant.id},
+                {"_id": 0, "id": 1, "jours_application": 1, "personnel_requis": 1, "duree_heures": 1}
+            ).to_list(1000),
+            db.assignations.aggregate(
+                pipeline_assignations(tenant.id, start_week, end_week, start_month, end_month)
+            ).to_list(1)
+        )
+        facettes = facettes[0] if facettes else {}
         
-        heures_totales = 0
-        types_garde_dict = {tg["id"]: tg for tg in total_assignations_required}
+        # Gardes cette semaine et taux de couverture
+        assignations_par_jour = {
+            (g["_id"].get("date"), g["_id"].get("type_garde_id")): g["n"]
+            for g in facettes.get("semaine", [])
+        }
+        gardes_count = sum(assignations_par_jour.values())
+        taux_couverture = calculer_couverture(types_garde, start_week, assignations_par_jour)
         
-        for assignation in assignations_mois:
-            type_garde = types_garde_dict.get(assignation.get("type_garde_id"))
+        # Heures travaillées ce mois
+        types_garde_dict = {tg["id"]: tg for tg in types_garde}
+        heures_totales = 0
+        for groupe in facettes.get("mois", []):
+            type_garde = types_garde_dict.get(groupe["_id"])
             if type_garde:
-                heures_totales += type_garde.get("duree_heures", 8)
-        
-        # 6. Remplacements effectués
-        remplacements_count = await db.demandes_remplacement.count_documents({"statut": "approuve", "tenant_id": tenant.id})
+                heures_totales += type_garde.get("duree_heures", 8) * groupe["n"]
         
         return Statistiques(
             personnel_actif=personnel_count,
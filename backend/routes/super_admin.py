@@ -32,6 +32,8 @@ import jwt
 
 from routes.dependencies import (
     db,
+    invalidate_tenant_cache,
+    invalidate_user_cache,
     get_super_admin,
     log_super_admin_action,
     SuperAdmin,
@@ -50,6 +52,7 @@ from routes.dependencies import (
     send_welcome_email,
     send_super_admin_welcome_email
 )
+from services.hours_ledger import invalider_ledger_heures
 
 router = APIRouter(tags=["Super Admin - Tenants"])
 logger = logging.getLogger(__name__)
@@ -548,6 +551,7 @@ async def update_tenant(
         {"id": tenant_id},
         {"$set": update_data}
     )
+    invalidate_tenant_cache(tenant_id=tenant_id)
     
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Caserne non trouvée")
@@ -665,7 +669,11 @@ async def delete_tenant_permanently(tenant_id: str, admin: SuperAdmin = Depends(
     
     # Supprimer toutes les données associées
     users_result = await db.users.delete_many({"tenant_id": tenant_id})
+    invalidate_user_cache()
     await db.assignations.delete_many({"tenant_id": tenant_id})
+    invalider_ledger_heures(tenant_id)
+    await db.couverture_planning.delete_many({"tenant_id": tenant_id})
+    await db.couverture_planning_mois.delete_many({"tenant_id": tenant_id})
     await db.formations.delete_many({"tenant_id": tenant_id})
     await db.epi_employes.delete_many({"tenant_id": tenant_id})
     await db.types_garde.delete_many({"tenant_id": tenant_id})
@@ -678,6 +686,7 @@ async def delete_tenant_permanently(tenant_id: str, admin: SuperAdmin = Depends(
     
     # Supprimer le tenant
     await db.tenants.delete_one({"id": tenant_id})
+    invalidate_tenant_cache(tenant_id=tenant_id)
     
     return {
         "message": f"Caserne '{tenant['nom']}' et toutes ses données ont été supprimées définitivement",
@@ -765,6 +774,7 @@ async def delete_super_admin_route(
     
     # Supprimer
     result = await db.super_admins.delete_one({"id": super_admin_id})
+    invalidate_user_cache(super_admin_id)
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Super admin non trouvé")
@@ -801,6 +811,7 @@ async def update_super_admin_route(
         {"id": super_admin_id},
         {"$set": update_fields}
     )
+    invalidate_user_cache(super_admin_id)
     
     logger.info(f"✅ Super admin modifié: {super_admin_id}")
     
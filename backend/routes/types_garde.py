@@ -19,6 +19,8 @@ from datetime import datetime, timezone
 import uuid
 import logging
 
+from services.hours_ledger import invalider_ledger_heures
+from services.coverage_table import invalider_couverture
 from routes.dependencies import (
     db,
     get_current_user,
@@ -186,6 +188,9 @@ async def update_type_garde(
     if result.modified_count == 0:
         raise HTTPException(status_code=400, detail="Impossible de mettre à jour le type de garde")
     
+    # La durée ou le caractère externe a pu changer: les heures cumulées sont à recalculer
+    invalider_ledger_heures(tenant.id)
+    
     updated_type = await db.types_garde.find_one({"id": type_garde_id, "tenant_id": tenant.id})
     updated_type = clean_mongo_doc(updated_type)
     return TypeGarde(**updated_type)
@@ -215,6 +220,8 @@ async def delete_type_garde(
     
     # Also delete related assignations
     deleted_assignations = await db.assignations.delete_many({"type_garde_id": type_garde_id})
+    invalider_ledger_heures(tenant.id)
+    await invalider_couverture(db, tenant.id)
     
     logger.info(f"🗑️ Type de garde '{existing_type.get('nom')}' supprimé avec {deleted_assignations.deleted_count} assignations")
     
@@ -16,8 +16,12 @@ import base64
 import csv
 from io import StringIO
 
+from services.hours_ledger import invalider_ledger_heures
+from services.coverage_table import invalider_couverture
+from services.notification_dispatcher import soumettre_email
 from routes.dependencies import (
     db,
+    invalidate_user_cache,
     get_current_user,
     get_tenant_from_slug,
     clean_mongo_doc,
@@ -202,20 +206,14 @@ async def create_user(tenant_slug: str, user_create: UserCreate, current_user: U
                     <p><strong>Action requise:</strong> Contacter le client pour upgrade vers palier supérieur.</p>
                     """
                 }
-                resend.Emails.send(params)
-                # Log email
-                try:
-                    from routes.emails_history import log_email_sent
-                    import asyncio
-                    asyncio.create_task(log_email_sent(
-                        type_email="alerte_limite_palier",
-                        destinataire_email=super_admin_email,
-                        sujet=f"⚠️ Limite palier atteinte - {tenant.nom}",
-                        tenant_id=tenant.id,
-                        tenant_slug=tenant_slug
-                    ))
-                except:
-                    pass
+                from routes.emails_history import historiser_apres_envoi
+                soumettre_email(params, apres_envoi=historiser_apres_envoi(
+                    super_admin_email,
+                    type_email="alerte_limite_palier",
+                    sujet=f"⚠️ Limite palier atteinte - {tenant.nom}",
+                    tenant_id=tenant.id,
+                    tenant_slug=tenant_slug
+                ))
         except Exception as e:
             print(f"Erreur envoi email super admin: {str(e)}")
         
@@ -410,6 +408,7 @@ async def import_users_csv(
                         {"id": existing_user["id"], "tenant_id": tenant.id},
                         {"$set": update_data}
                     )
+                    invalidate_user_cache(existing_user["id"])
                     results["updated"] += 1
                 else:
                     # skip par défaut
@@ -550,6 +549,7 @@ async def update_mon_profil(
                 
                 if sa_update:
                     await db.super_admins.update_one({"id": user_id}, {"$set": sa_update})
+                    invalidate_user_cache(user_id)
             
             # Retourner un objet User compatible
             updated = await db.super_admins.find_one({"id": user_id})
@@ -575,6 +575,7 @@ async def update_mon_profil(
             
             if update_data:
                 await db.users.update_one({"id": user_id}, {"$set": update_data})
+                invalidate_user_cache(user_id)
             
             updated_user = await db.users.find_one({"id": user_id})
             return User(**clean_mongo_doc(updated_user))
@@ -604,17 +605,18 @@ async def upload_photo_profil(
     tenant = await get_tenant_from_slug(tenant_slug)
     
     try:
-        from services.azure_storage import put_object, generate_sas_url, generate_storage_path
+        from services.azure_storage import put_object_async, generate_sas_url, generate_storage_path
         
         image_bytes = resize_and_compress_image_bytes(photo_data.photo_base64)
         blob_path = generate_storage_path(tenant.id, "profils", f"user_{current_user.id}.jpg")
-        put_object(blob_path, image_bytes, "image/jpeg")
+        await put_object_async(blob_path, image_bytes, "image/jpeg")
         sas_url = generate_sas_url(blob_path)
         
         result = await db.users.update_one(
             {"id": current_user.id, "tenant_id": tenant.id},
             {"$set": {"photo_profil_blob_name": blob_path, "photo_profil": None}}
         )
+        invalidate_user_cache(current_user.id)
         
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
@@ -699,6 +701,7 @@ async def update_user(
             {"id": user_id, "tenant_id": tenant.id},
             {"$set": update_data}
         )
+        invalidate_user_cache(user_id)
     
     # Retourner l'utilisateur mis à jour
     updated_user = await db.users.find_one({"id": user_id, "tenant_id": tenant.id})
@@ -727,17 +730,18 @@ async def upload_photo_profil_admin(
         if not user:
             raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
         
-        from services.azure_storage import put_object, generate_sas_url, generate_storage_path
+        from services.azure_storage import put_object_async, generate_sas_url, generate_storage_path
         
         image_bytes = resize_and_compress_image_bytes(photo_data.photo_base64)
         blob_path = generate_storage_path(tenant.id, "profils", f"user_{user_id}.jpg")
-        put_object(blob_path, image_bytes, "image/jpeg")
+        await put_object_async(blob_path, image_bytes, "image/jpeg")
         sas_url = generate_sas_url(blob_path)
         
         await db.users.update_one(
             {"id": user_id, "tenant_id": tenant.id},
             {"$set": {"photo_profil_blob_name": blob_path, "photo_profil": None}}
         )
+        invalidate_user_cache(user_id)
         
         return {"message": "Photo de profil mise à jour", "photo_profil": sas_url}
         
@@ -764,13 +768,14 @@ async def delete_photo_profil(
     
     blob_name = user.get("photo_profil_blob_name")
     if blob_name:
-        from services.azure_storage import delete_object
-        delete_object(blob_name)
+        from services.azure_storage import delete_object_async
+        await delete_object_async(blob_name)
     
     await db.users.update_one(
         {"id": current_user.id, "tenant_id": tenant.id},
         {"$set": {"photo_profil": None}, "$unset": {"photo_profil_blob_name": ""}}
     )
+    invalidate_user_cache(current_user.id)
     
     return {"message": "Photo de profil supprimée"}
 
@@ -795,13 +800,14 @@ async def delete_photo_profil_admin(
     
     blob_name = user.get("photo_profil_blob_name")
     if blob_name:
-        from services.azure_storage import delete_object
-        delete_object(blob_name)
+        from services.azure_storage import delete_object_async
+        await delete_object_async(blob_name)
     
     await db.users.update_one(
         {"id": user_id, "tenant_id": tenant.id},
         {"$set": {"photo_profil": None}, "$unset": {"photo_profil_blob_name": ""}}
     )
+    invalidate_user_cache(user_id)
     
     return {"message": "Photo de profil supprimée"}
 
@@ -1016,6 +1022,7 @@ async def change_user_password(
             {"id": user_id, "tenant_id": tenant.id},
             {"$set": {"mot_de_passe_hash": new_password_hash}}
         )
+        invalidate_user_cache(user_id)
         
         if result.modified_count == 0:
             logging.error(f"❌ Impossible de mettre à jour le mot de passe pour {user_id}")
@@ -1128,6 +1135,7 @@ async def update_user_access(
         {"id": user_id, "tenant_id": tenant.id}, 
         {"$set": update_fields}
     )
+    invalidate_user_cache(user_id)
     
     if result.modified_count == 0:
         # Peut-être que les valeurs sont identiques, ce n'est pas forcément une erreur
@@ -1177,10 +1185,10 @@ async def upload_signature(
         raise HTTPException(status_code=400, detail="Le fichier ne doit pas dépasser 500KB")
     
     # Upload vers Azure
-    from services.azure_storage import put_object, generate_sas_url, generate_storage_path
+    from services.azure_storage import put_object_async, generate_sas_url, generate_storage_path
     ext = file.filename.rsplit(".", 1)[-1].lower() if file.filename and "." in file.filename else "png"
     blob_path = generate_storage_path(tenant.id, "signatures", f"sig_{user_id}.{ext}")
-    put_object(blob_path, content, file.content_type or "image/png")
+    await put_object_async(blob_path, content, file.content_type or "image/png")
     sas_url = generate_sas_url(blob_path)
     
     # Stocker le blob_name dans MongoDB
@@ -1188,6 +1196,7 @@ async def upload_signature(
         {"id": user_id, "tenant_id": tenant.id},
         {"$set": {"signature_blob_name": blob_path, "signature_url": None, "updated_at": datetime.now(timezone.utc)}}
     )
+    invalidate_user_cache(user_id)
     
     logger.info(f"Signature uploadée vers Azure pour {user_id} par {current_user.email}")
     
@@ -1210,13 +1219,14 @@ async def delete_signature(
     
     user = await db.users.find_one({"id": user_id, "tenant_id": tenant.id})
     if user and user.get("signature_blob_name"):
-        from services.azure_storage import delete_object
-        delete_object(user["signature_blob_name"])
+        from services.azure_storage import delete_object_async
+        await delete_object_async(user["signature_blob_name"])
     
     await db.users.update_one(
         {"id": user_id, "tenant_id": tenant.id},
         {"$set": {"signature_url": None, "updated_at": datetime.now(timezone.utc)}, "$unset": {"signature_blob_name": ""}}
     )
+    invalidate_user_cache(user_id)
     
     return {"message": "Signature supprimée"}
 
@@ -1241,10 +1251,13 @@ async def revoke_user_completely(tenant_slug: str, user_id: str, current_user: U
     
     # Delete user and all related data (only for this tenant)
     await db.users.delete_one({"id": user_id, "tenant_id": tenant.id})
+    invalidate_user_cache(user_id)
     await db.disponibilites.delete_many({"user_id": user_id, "tenant_id": tenant.id})
     await db.assignations.delete_many({"user_id": user_id, "tenant_id": tenant.id})
     await db.demandes_remplacement.delete_many({"demandeur_id": user_id, "tenant_id": tenant.id})
     await db.demandes_remplacement.delete_many({"remplacant_id": user_id, "tenant_id": tenant.id})
+    invalider_ledger_heures(tenant.id)
+    await invalider_couverture(db, tenant.id)
     
     return {"message": "Utilisateur et toutes ses données ont été supprimés définitivement"}
 
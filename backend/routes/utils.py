@@ -11,6 +11,10 @@ from datetime import datetime, timezone, timedelta
 import uuid
 import logging
 
+from routes.dependencies import invalidate_user_cache
+from services.coverage_table import invalider_couverture
+from services.hours_ledger import invalider_ledger_heures
+
 router = APIRouter(tags=["Utils"])
 
 
@@ -55,6 +59,7 @@ async def repair_demo_passwords():
                     {"email": email},
                     {"$set": {"mot_de_passe_hash": new_hash}}
                 )
+                invalidate_user_cache()
                 fixed_count += 1
                 print(f"Fixed password for {email}")
         
@@ -84,6 +89,7 @@ async def fix_all_passwords():
                     {"email": email},
                     {"$set": {"mot_de_passe_hash": new_hash}}
                 )
+                invalidate_user_cache()
                 fixed_count += 1
                 print(f"Fixed password for {email}")
         
@@ -104,6 +110,7 @@ async def fix_admin_password():
                 {"email": "admin@firemanager.ca"},
                 {"$set": {"mot_de_passe_hash": new_password_hash}}
             )
+            invalidate_user_cache()
             return {"message": "Mot de passe admin réparé"}
         else:
             return {"message": "Compte admin non trouvé"}
@@ -180,8 +187,11 @@ async def init_demo_data_realiste():
     try:
         # Clear existing data
         await db.users.delete_many({})
+        invalidate_user_cache()
         await db.types_garde.delete_many({})
         await db.assignations.delete_many({})
+        await invalider_couverture(db)
+        invalider_ledger_heures()
         await db.planning.delete_many({})
         await db.demandes_remplacement.delete_many({})
         await db.formations.delete_many({})
@@ -287,6 +297,7 @@ async def init_demo_data_realiste():
                     )
                     await db.assignations.insert_one(assignation_obj.dict())
                     assignations_created += 1
+        invalider_ledger_heures()
         
         return {"message": f"Données de démonstration réalistes créées : {len(demo_users)} utilisateurs, {len(demo_formations)} formations, {assignations_created} assignations historiques"}
         
@@ -302,8 +313,11 @@ async def init_demo_data():
     
     # Clear existing data
     await db.users.delete_many({})
+    invalidate_user_cache()
     await db.types_garde.delete_many({})
     await db.assignations.delete_many({})
+    await invalider_couverture(db)
+    invalider_ledger_heures()
     await db.planning.delete_many({})
     await db.demandes_remplacement.delete_many({})
     
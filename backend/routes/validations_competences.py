@@ -16,6 +16,7 @@ import logging
 
 from routes.dependencies import (
     db,
+    invalidate_user_cache,
     get_current_user,
     get_tenant_from_slug,
     clean_mongo_doc,
@@ -72,6 +73,7 @@ async def creer_validation_competence(
                 {"id": validation.user_id, "tenant_id": tenant.id},
                 {"$set": {"competences": user_competences}}
             )
+            invalidate_user_cache(validation.user_id)
             logger.info(f"✅ Compétence '{competence['nom']}' ajoutée à {user['prenom']} {user['nom']}")
         
         # Créer une présence fictive pour comptabiliser les heures de formation
@@ -22,17 +22,18 @@ import stripe
 from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_LEFT
 import base64
-from io import BytesIO as IOBytesIO
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment
 from io import BytesIO
 import base64
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
+from services.alertes_equipements import selectionner_alertes_equipements
+from services.tenant_fanout import executer_par_tenant
 import resend
 # Firebase imports for push notifications (optional - loaded conditionally below)
 import qrcode
@@ -97,7 +98,7 @@ from routes.super_admin import router as super_admin_router
 from routes.access_types import router as access_types_router
 from routes.plan_intervention import router as plan_intervention_router
 from routes.utils import router as utils_router
-from routes.emails_history import router as emails_history_router, log_email_sent
+from routes.emails_history import router as emails_history_router, historiser_apres_envoi
 from routes.horaires_personnalises import router as horaires_personnalises_router
 from routes.avis_non_conformite import router as avis_non_conformite_router
 from routes.broadcast import router as broadcast_router
@@ -109,11 +110,13 @@ from routes.import_interventions import router as import_interventions_router
 from routes.import_batch import router as import_batch_router
 from routes.batiments import router as batiments_router
 from routes.casernes import router as casernes_router
+from routes.dependencies import resoudre_tenant, charger_utilisateur, charger_super_admin, invalidate_tenant_cache
 from io import BytesIO
 import base64
 from PIL import Image as PILImage
 from services.email_service import get_email_template as build_email_template
 from services.email_builder import build_email, email_card, email_alert_card, email_detail_row
+from services.notification_dispatcher import soumettre_email
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -306,6 +309,14 @@ async def create_database_indexes():
         await safe_create_index(db.batiments, [("tenant_id", 1)])
         await safe_create_index(db.batiments, [("tenant_id", 1), ("niveau_risque", 1)])
         
+        # Cache de géocodage (une entrée par adresse normalisée)
+        await safe_create_index(db.geocodage_cache, [("cle", 1)], unique=True)
+        
+        # Coordination des workers (services/job_coordination): purge automatique
+        await safe_create_index(db.job_workers, [("expires_at", 1)], expireAfterSeconds=0)
+        await safe_create_index(db.job_executions, [("expire_at", 1)], expireAfterSeconds=0)
+        await safe_create_index(db.job_executions, [("job", 1), ("echeance", -1)])
+        
         # Index pour les formations
         await safe_create_index(db.formations, [("tenant_id", 1)])
         
@@ -323,6 +334,15 @@ async def create_database_indexes():
         
         # Index pour dashboard - CRITIQUE pour performance
         await safe_create_index(db.assignations, [("tenant_id", 1), ("user_id", 1), ("date", 1)])
+        # Statistiques dashboard: assignations de la semaine et du mois ($facet)
+        await safe_create_index(db.assignations, [("tenant_id", 1), ("date", 1), ("type_garde_id", 1)])
+        # Table de couverture du planning (services/coverage_table)
+        await safe_create_index(db.couverture_planning, [("tenant_id", 1), ("date", 1)])
+        await safe_create_index(db.couverture_planning_mois, [("tenant_id", 1), ("mois", 1)])
+        await safe_create_index(db.couverture_planning_mois, [("expire_at", 1)], expireAfterSeconds=0)
+        # Messages temps réel relayés entre workers (services/websocket_manager): purge automatique
+        from services.websocket_manager import REALTIME_MESSAGE_TTL_SECONDS
+        await safe_create_index(db.realtime_messages, [("created_at", 1)], expireAfterSeconds=REALTIME_MESSAGE_TTL_SECONDS)
         await safe_create_index(db.inscriptions_formations, [("tenant_id", 1), ("user_id", 1)])
         await safe_create_index(db.inscriptions_formations, [("formation_id", 1)])
         await safe_create_index(db.formations, [("tenant_id", 1), ("date_debut", 1)])
@@ -425,16 +445,30 @@ async def startup_event():
     """Événement de démarrage de l'application"""
     logger.info("🚀 Démarrage de l'application ProFireManager...")
     
+    # Bus d'invalidation des caches tenant / utilisateur (CACHE_INVALIDATION_BUS)
+    from services.cache_invalidation import configurer_bus_invalidation
+    await configurer_bus_invalidation().demarrer()
+    
+    # Répartiteur des notifications push / web push / email
+    from services.notification_dispatcher import get_notification_dispatcher
+    await get_notification_dispatcher().demarrer()
+    
     await initialize_multi_tenant()
     
     # Initialiser les grades par défaut
     await initialize_default_grades()
     
+    # Coordination entre workers: leader, baux de polling, exécutions uniques des jobs
+    from services.job_coordination import init_coordinateur
+    await init_coordinateur(db).demarrer()
+    
     # Initialiser le service SFTP
     from services.sftp_service import init_sftp_service
     from services.cauca_api_service import init_cauca_service
     from services.websocket_manager import get_websocket_manager
     ws_manager = get_websocket_manager()
+    # Diffusion temps réel entre workers (REALTIME_BUS)
+    await ws_manager.demarrer(db)
     sftp_service = init_sftp_service(db, ws_manager)
     cauca_service = init_cauca_service(db, ws_manager)
     
@@ -452,17 +486,20 @@ async def startup_event():
     # Démarrer le job périodique pour vérifier les timeouts de remplacement
     asyncio.create_task(job_verifier_timeouts_remplacements())
     
-    # Démarrer le nettoyage automatique des anciennes demandes de remplacement
-    asyncio.create_task(job_archivage_automatique_remplacements())
+    # Démarrer le scheduler APScheduler (notifications, alertes, archivage...)
+    asyncio.create_task(start_notification_scheduler())
     
     # Démarrer le nettoyage périodique des tâches SSE expirées
     asyncio.create_task(cleanup_expired_tasks())
     
-    # Initialiser Azure Blob Storage
+    # Initialiser le stockage d'objets (Azure Blob Storage ou filesystem)
     try:
-        from services.azure_storage import _get_client
-        _get_client()
-        logger.info("Azure Blob Storage initialisé")
+        from services.object_storage import get_stockage
+        stockage = get_stockage()
+        if stockage.nom == "azure":
+            from services.azure_storage import _get_client
+            _get_client()
+        logger.info(f"Stockage d'objets initialisé (backend {stockage.nom})")
     except Exception as e:
         logger.warning(f"Azure Blob Storage init échoué (non bloquant): {e}")
     
@@ -635,77 +672,48 @@ async def cleanup_expired_tasks():
             logging.error(f"Erreur nettoyage tâches: {e}")
         
         await asyncio.sleep(300)  # Nettoyer toutes les 5 minutes
-    
-    # Démarrer le scheduler APScheduler pour les notifications automatiques
-    asyncio.create_task(start_notification_scheduler())
-    
-    print("🚀 ProFireManager API Multi-Tenant démarré")
 
 # ==================== SCHEDULER NOTIFICATIONS AUTOMATIQUES ====================
 
 async def start_notification_scheduler():
     """Démarre le scheduler pour les notifications automatiques de planning, équipements et disponibilités"""
+    from services.job_coordination import get_coordinateur
+    
     scheduler = AsyncIOScheduler()
+    coordinateur = get_coordinateur()
+    
+    def planifier(job, trigger, job_id):
+        # Chaque worker a son scheduler; une seule exécution par échéance dans le cluster
+        fonction = coordinateur.tache_planifiee(job_id, job) if coordinateur else job
+        scheduler.add_job(fonction, trigger, id=job_id, replace_existing=True)
     
     # Créer un job qui vérifie toutes les heures si une notification doit être envoyée
     # On vérifie à chaque heure au lieu de programmer des jobs dynamiques
-    scheduler.add_job(
-        job_verifier_notifications_planning,
-        CronTrigger(minute=0),  # Toutes les heures à la minute 0
-        id='check_planning_notifications',
-        replace_existing=True
-    )
+    planifier(job_verifier_notifications_planning, CronTrigger(minute=0), 'check_planning_notifications')  # Toutes les heures à la minute 0
     
     # Job pour vérifier les alertes d'équipements (une fois par jour à 8h00 du matin)
-    scheduler.add_job(
-        job_verifier_alertes_equipements,
-        CronTrigger(hour=8, minute=0),  # Tous les jours à 8h00
-        id='check_equipment_alerts',
-        replace_existing=True
-    )
+    planifier(job_verifier_alertes_equipements, CronTrigger(hour=8, minute=0), 'check_equipment_alerts')  # Tous les jours à 8h00
     
     # Job pour vérifier les rappels de disponibilités (une fois par jour à 9h00 du matin)
-    scheduler.add_job(
-        job_verifier_rappels_disponibilites,
-        CronTrigger(hour=9, minute=0),  # Tous les jours à 9h00
-        id='check_availability_reminders',
-        replace_existing=True
-    )
+    planifier(job_verifier_rappels_disponibilites, CronTrigger(hour=9, minute=0), 'check_availability_reminders')  # Tous les jours à 9h00
     
     # Job pour vérifier les paiements en retard et suspendre après 5 jours
-    scheduler.add_job(
-        job_check_overdue_payments,
-        CronTrigger(hour=8, minute=0),  # Tous les jours à 8h00
-        id='check_overdue_payments',
-        replace_existing=True
-    )
+    planifier(job_check_overdue_payments, CronTrigger(hour=8, minute=0), 'check_overdue_payments')  # Tous les jours à 8h00
     
     # Job pour rappeler aux pompiers de faire leur inspection EPI mensuelle
-    scheduler.add_job(
-        job_rappel_inspection_epi_mensuelle,
-        CronTrigger(hour=9, minute=30),  # Tous les jours à 9h30
-        id='rappel_inspection_epi',
-        replace_existing=True
-    )
+    planifier(job_rappel_inspection_epi_mensuelle, CronTrigger(hour=9, minute=30), 'rappel_inspection_epi')  # Tous les jours à 9h30
     
     # Job pour alertes EPI basées sur fréquence d'inspection (7 jours avant échéance)
-    scheduler.add_job(
-        job_alertes_epi_frequence,
-        CronTrigger(hour=8, minute=0),  # Tous les jours à 8h00
-        id='alertes_epi_frequence',
-        replace_existing=True
-    )
+    planifier(job_alertes_epi_frequence, CronTrigger(hour=8, minute=0), 'alertes_epi_frequence')  # Tous les jours à 8h00
     
     # Job pour vérifier les délégations de responsabilités (début/fin de congés)
-    scheduler.add_job(
-        job_verifier_delegations,
-        CronTrigger(hour=7, minute=0),  # Tous les jours à 7h00
-        id='check_delegations',
-        replace_existing=True
-    )
+    planifier(job_verifier_delegations, CronTrigger(hour=7, minute=0), 'check_delegations')  # Tous les jours à 7h00
+    
+    # Archivage des anciennes demandes de remplacement
+    planifier(job_archivage_automatique_remplacements, CronTrigger(hour=3, minute=0), 'archivage_remplacements')  # Tous les jours à 3h00
     
     scheduler.start()
-    logging.info("✅ Scheduler de notifications automatiques démarré (planning + équipements + disponibilités + paiements + inspections EPI + alertes EPI fréquence + délégations)")
+    logging.info("✅ Scheduler de notifications automatiques démarré (planning + équipements + disponibilités + paiements + inspections EPI + alertes EPI fréquence + délégations + archivage remplacements)")
 
 
 async def job_check_overdue_payments():
@@ -740,6 +748,7 @@ async def job_check_overdue_payments():
                         {"id": tenant["id"]},
                         {"$set": {"actif": False, "billing_status": "suspended"}}
                     )
+                    invalidate_tenant_cache(tenant_id=tenant["id"])
                     logging.warning(f"⛔ Tenant {tenant['slug']} suspendu (impayé depuis {days_overdue} jours)")
                     suspended_count += 1
                     
@@ -748,7 +757,7 @@ async def job_check_overdue_payments():
                         try:
                             resend.api_key = os.environ.get("RESEND_API_KEY")
                             sujet_suspension = "⚠️ Compte suspendu - ProFireManager"
-                            resend.Emails.send({
+                            soumettre_email({
                                 "from": "ProFireManager <noreply@profiremanager.ca>",
                                 "to": [tenant["email_contact"]],
                                 "subject": sujet_suspension,
@@ -759,16 +768,14 @@ async def job_check_overdue_payments():
                                 <p>Pour réactiver votre compte, veuillez régulariser votre paiement dans votre espace de facturation.</p>
                                 <p>Cordialement,<br>L'équipe ProFireManager</p>
                                 """
-                            })
-                            # Log email
-                            await log_email_sent(
+                            }, apres_envoi=historiser_apres_envoi(
+                                tenant["email_contact"],
                                 type_email="compte_suspendu",
-                                destinataire_email=tenant["email_contact"],
                                 destinataire_nom=tenant.get("nom"),
                                 sujet=sujet_suspension,
                                 tenant_id=tenant.get("id"),
                                 tenant_slug=tenant.get("slug")
-                            )
+                            ))
                         except Exception as e:
                             logging.error(f"Erreur envoi email suspension: {e}")
                             
@@ -778,7 +785,7 @@ async def job_check_overdue_payments():
                         try:
                             resend.api_key = os.environ.get("RESEND_API_KEY")
                             sujet_rappel = "Dernier rappel de paiement - ProFireManager"
-                            resend.Emails.send({
+                            soumettre_email({
                                 "from": "ProFireManager <noreply@profiremanager.ca>",
                                 "to": [tenant["email_contact"]],
                                 "subject": sujet_rappel,
@@ -789,16 +796,14 @@ async def job_check_overdue_payments():
                                 <p><strong>Attention:</strong> Sans règlement dans les 2 prochains jours, votre compte sera automatiquement suspendu.</p>
                                 <p>Cordialement,<br>L'équipe ProFireManager</p>
                                 """
-                            })
-                            # Log email
-                            await log_email_sent(
+                            }, apres_envoi=historiser_apres_envoi(
+                                tenant["email_contact"],
                                 type_email="rappel_paiement",
-                                destinataire_email=tenant["email_contact"],
                                 destinataire_nom=tenant.get("nom"),
                                 sujet=sujet_rappel,
                                 tenant_id=tenant.get("id"),
                                 tenant_slug=tenant.get("slug")
-                            )
+                            ))
                             reminder_count += 1
                         except Exception as e:
                             logging.error(f"Erreur envoi rappel: {e}")
@@ -910,6 +915,7 @@ async def job_verifier_notifications_planning():
                     {"id": tenant["id"]},
                     {"$set": {"parametres.validation_planning": params}}
                 )
+                invalidate_tenant_cache(tenant_id=tenant["id"])
                 
                 logging.info(f"✅ Notifications envoyées avec succès pour {tenant['nom']}")
                 
@@ -920,37 +926,6 @@ async def job_verifier_notifications_planning():
         logging.error(f"❌ Erreur dans job_verifier_notifications_planning: {str(e)}", exc_info=True)
 
 
-def parse_frequence_inspection_to_days(frequence: str) -> int:
-    """
-    Convertit une fréquence d'inspection en nombre de jours
-    Ex: "1 an" -> 365, "6 mois" -> 180, "5 ans" -> 1825
-    """
-    if not frequence:
-        return 365  # Par défaut: 1 an
-    
-    frequence = frequence.lower().strip()
-    
-    # Extraire le nombre
-    import re
-    match = re.search(r'(\d+)', frequence)
-    if not match:
-        return 365
-    
-    nombre = int(match.group(1))
-    
-    # Déterminer l'unité
-    if 'an' in frequence or 'year' in frequence:
-        return nombre * 365
-    elif 'mois' in frequence or 'month' in frequence:
-        return nombre * 30
-    elif 'semaine' in frequence or 'week' in frequence:
-        return nombre * 7
-    elif 'jour' in frequence or 'day' in frequence:
-        return nombre
-    else:
-        return nombre * 365  # Par défaut en années
-
-
 async def job_verifier_alertes_equipements():
     """
     Job qui vérifie les alertes d'équipements et envoie des notifications par email
@@ -962,389 +937,230 @@ async def job_verifier_alertes_equipements():
         # Récupérer tous les tenants
         tenants = await db.tenants.find({"actif": True}).to_list(None)
         
-        for tenant in tenants:
-            try:
-                tenant_id = tenant.get("id")
-                tenant_nom = tenant.get("nom", "Unknown")
-                
-                # Récupérer les paramètres d'alertes pour ce tenant depuis tenant.parametres.equipements
-                tenant_parametres = tenant.get("parametres", {})
-                parametres = tenant_parametres.get("equipements", {})
-                
-                # Si pas de paramètres ou alertes email désactivées, passer au suivant
-                if not parametres or not parametres.get("activer_alertes_email", True):
-                    logging.info(f"⏭️ Alertes email désactivées pour {tenant_nom}")
-                    continue
-                
-                # Récupérer la liste des emails destinataires
-                emails_destinataires = parametres.get("emails_notifications_equipements", [])
-                if not emails_destinataires:
-                    logging.info(f"⏭️ Aucun destinataire configuré pour {tenant_nom}")
-                    continue
-                
-                # Récupérer les seuils d'alertes
-                jours_maintenance = parametres.get("jours_alerte_maintenance", 30)
-                jours_expiration = parametres.get("jours_alerte_expiration", 30)
-                jours_fin_vie = parametres.get("jours_alerte_fin_vie", 90)
-                
-                today = datetime.now(timezone.utc).date()
-                date_limite_maintenance = (today + timedelta(days=jours_maintenance)).isoformat()
-                date_limite_expiration = (today + timedelta(days=jours_expiration)).isoformat()
-                date_limite_fin_vie = (today + timedelta(days=jours_fin_vie)).isoformat()
-                
-                # Compter les alertes
-                alertes_count = {
-                    "maintenance": 0,
-                    "expiration": 0,
-                    "fin_vie": 0,
-                    "reparation": 0
-                }
-                
-                # Alertes maintenance
-                equipements_maintenance = await db.equipements.find({
-                    "tenant_id": tenant_id,
-                    "date_prochaine_maintenance": {"$lte": date_limite_maintenance, "$ne": ""}
-                }).to_list(1000)
-                alertes_count["maintenance"] = len(equipements_maintenance)
-                
-                # Alertes fin de vie
-                equipements_fin_vie = await db.equipements.find({
-                    "tenant_id": tenant_id,
-                    "date_fin_vie": {"$lte": date_limite_fin_vie, "$ne": ""}
-                }).to_list(1000)
-                alertes_count["fin_vie"] = len(equipements_fin_vie)
-                
-                # Alertes réparation
-                equipements_reparation = await db.equipements.find({
-                    "tenant_id": tenant_id,
-                    "etat": {"$in": ["a_reparer", "en_reparation"]}
-                }).to_list(1000)
-                alertes_count["reparation"] = len(equipements_reparation)
-                
-                # Alertes expiration (champs personnalisés)
-                all_equipements = await db.equipements.find(
-                    {"tenant_id": tenant_id}
-                ).to_list(10000)
-                
-                expiration_count = 0
-                for eq in all_equipements:
-                    champs = eq.get("champs_personnalises", {})
-                    for key, value in champs.items():
-                        if value and ("expiration" in key.lower() or "expir" in key.lower()):
-                            try:
-                                date_exp = datetime.fromisoformat(str(value)).date()
-                                if date_exp <= (today + timedelta(days=jours_expiration)):
-                                    expiration_count += 1
-                                    break  # Compter chaque équipement une seule fois
-                            except:
-                                pass
-                
-                alertes_count["expiration"] = expiration_count
-                
-                # =============================================
-                # NOUVEAU: Alertes inspections dues par catégorie
-                # =============================================
-                alertes_count["inspections_dues"] = 0
-                alertes_par_categorie = {}  # {categorie_id: {nom, count, personne_ressource_email, equipements}}
-                
-                # Récupérer toutes les catégories avec leur fréquence d'inspection
-                categories = await db.categories_equipements.find(
-                    {"tenant_id": tenant_id},
-                    {"_id": 0}
-                ).to_list(1000)
-                
-                categories_map = {cat.get("id"): cat for cat in categories}
-                
-                for eq in all_equipements:
-                    categorie_id = eq.get("categorie_id")
-                    if not categorie_id or categorie_id not in categories_map:
-                        continue
+        async def traiter_tenant(tenant):
+            tenant_id = tenant.get("id")
+            tenant_nom = tenant.get("nom", "Unknown")
+            
+            # Récupérer les paramètres d'alertes pour ce tenant depuis tenant.parametres.equipements
+            tenant_parametres = tenant.get("parametres", {})
+            parametres = tenant_parametres.get("equipements", {})
+            
+            # Si pas de paramètres ou alertes email désactivées, passer au suivant
+            if not parametres or not parametres.get("activer_alertes_email", True):
+                logging.info(f"⏭️ Alertes email désactivées pour {tenant_nom}")
+                return
+            
+            # Récupérer la liste des emails destinataires
+            emails_destinataires = parametres.get("emails_notifications_equipements", [])
+            if not emails_destinataires:
+                logging.info(f"⏭️ Aucun destinataire configuré pour {tenant_nom}")
+                return
+            
+            # Récupérer les seuils d'alertes
+            jours_maintenance = parametres.get("jours_alerte_maintenance", 30)
+            jours_expiration = parametres.get("jours_alerte_expiration", 30)
+            jours_fin_vie = parametres.get("jours_alerte_fin_vie", 90)
+            
+            today = datetime.now(timezone.utc).date()
+            
+            # Compteurs et inspections dues calculés par MongoDB (services/alertes_equipements)
+            alertes_count, alertes_par_categorie = await selectionner_alertes_equipements(
+                db, tenant_id, parametres, today
+            )
+            
+            # Calculer le total des alertes
+            total_alertes = sum(alertes_count.values())
+            
+            # Si aucune alerte, ne pas envoyer d'email
+            if total_alertes == 0:
+                logging.info(f"✅ Aucune alerte pour {tenant_nom}")
+                return
+            
+            logging.info(f"📊 {tenant_nom}: {total_alertes} alertes trouvées - Maintenance: {alertes_count['maintenance']}, Expiration: {alertes_count['expiration']}, Fin de vie: {alertes_count['fin_vie']}, Réparation: {alertes_count['reparation']}, Inspections dues: {alertes_count['inspections_dues']}")
+            
+            # Générer le HTML pour les inspections dues par catégorie
+            inspections_dues_html = ""
+            if alertes_count["inspections_dues"] > 0:
+                inspections_dues_html = f'''
+                    <div class="alert-box" style="border-left-color: #F59E0B; background-color: #FEF3C7;">
+                        <div class="alert-title" style="color: #B45309;">📋 Inspections à effectuer</div>
+                        <div class="alert-count" style="color: #92400E;">{alertes_count["inspections_dues"]} équipement(s)</div>
+                        <p>Selon la fréquence d'inspection de leur catégorie</p>
+                        <div style="margin-top: 15px;">
+                '''
+                for cat_id, cat_data in alertes_par_categorie.items():
+                    inspections_dues_html += f'''
+                            <div style="background: white; padding: 10px; border-radius: 8px; margin: 8px 0;">
+                                <strong>{cat_data["icone"]} {cat_data["nom"]}</strong> - {cat_data["count"]} équipement(s)
+                                <br><small style="color: #666;">Fréquence: {cat_data["frequence"]}</small>
+                                <ul style="margin: 5px 0; padding-left: 20px; font-size: 0.9em;">
+                    '''
+                    for eq in cat_data["equipements"][:5]:  # Limiter à 5 équipements par catégorie
+                        retard_text = f" ({eq['jours_retard']} jours de retard)" if eq.get('jours_retard') else ""
+                        inspections_dues_html += f"<li>{eq['nom']}{retard_text}</li>"
+                    if len(cat_data["equipements"]) > 5:
+                        inspections_dues_html += f"<li><em>... et {len(cat_data['equipements']) - 5} autre(s)</em></li>"
+                    inspections_dues_html += "</ul></div>"
+                inspections_dues_html += "</div></div>"
+            
+            # Préparer le contenu de l'email
+            subject = f"⚠️ Alertes Équipements - {tenant_nom}"
+            
+            html_content = build_email(
+                title=f"Rapport d'Alertes Equipements",
+                body_html=f"""
+                    <p style="font-size: 15px; color: #374151;">Bonjour,</p>
+                    <p style="font-size: 15px; color: #374151;">Voici le rapport quotidien des alertes pour vos equipements ({today.strftime("%d/%m/%Y")}) :</p>
                     
-                    categorie = categories_map[categorie_id]
-                    frequence = categorie.get("frequence_inspection", "")
-                    if not frequence:
-                        continue  # Pas de fréquence définie, pas d'alerte
+                    {f'''
+                    {email_alert_card(
+                        f"Maintenance a venir — {alertes_count['maintenance']} equipement(s)",
+                        f"Maintenance requise dans les {jours_maintenance} prochains jours",
+                        "#EF4444", "#FEE2E2", "#991B1B"
+                    )}
+                    ''' if alertes_count["maintenance"] > 0 else ''}
                     
-                    jours_frequence = parse_frequence_inspection_to_days(frequence)
+                    {f'''
+                    {email_alert_card(
+                        f"Expirations a venir — {alertes_count['expiration']} equipement(s)",
+                        f"Expiration dans les {jours_expiration} prochains jours",
+                        "#EF4444", "#FEE2E2", "#991B1B"
+                    )}
+                    ''' if alertes_count["expiration"] > 0 else ''}
                     
-                    # Trouver la dernière inspection unifiée pour cet équipement
-                    derniere_inspection = await db.inspections_unifiees.find_one(
-                        {
-                            "tenant_id": tenant_id,
-                            "asset_id": eq.get("id"),
-                            "asset_type": "equipement"
-                        },
-                        {"_id": 0},
-                        sort=[("date_inspection", -1)]
-                    )
+                    {f'''
+                    {email_alert_card(
+                        f"Fin de vie approche — {alertes_count['fin_vie']} equipement(s)",
+                        f"Fin de vie dans les {jours_fin_vie} prochains jours",
+                        "#EF4444", "#FEE2E2", "#991B1B"
+                    )}
+                    ''' if alertes_count["fin_vie"] > 0 else ''}
                     
-                    # Si pas d'inspection unifiée, chercher dans les anciennes collections
-                    if not derniere_inspection:
-                        derniere_inspection = await db.inspections_equipements.find_one(
-                            {
-                                "tenant_id": tenant_id,
-                                "equipement_id": eq.get("id")
-                            },
-                            {"_id": 0},
-                            sort=[("date_inspection", -1)]
-                        )
+                    {f'''
+                    {email_alert_card(
+                        f"Reparations necessaires — {alertes_count['reparation']} equipement(s)",
+                        "Equipements en attente de reparation",
+                        "#EF4444", "#FEE2E2", "#991B1B"
+                    )}
+                    ''' if alertes_count["reparation"] > 0 else ''}
                     
-                    # Calculer si l'inspection est due
-                    inspection_due = False
-                    jours_depuis_derniere = None
+                    {inspections_dues_html}
                     
-                    if derniere_inspection:
-                        date_derniere = derniere_inspection.get("date_inspection") or derniere_inspection.get("created_at")
-                        if date_derniere:
-                            try:
-                                if isinstance(date_derniere, str):
-                                    date_derniere = datetime.fromisoformat(date_derniere.replace("Z", "+00:00"))
-                                elif isinstance(date_derniere, datetime):
-                                    pass
-                                else:
-                                    date_derniere = None
-                                
-                                if date_derniere:
-                                    jours_depuis_derniere = (datetime.now(timezone.utc) - date_derniere).days
-                                    if jours_depuis_derniere >= jours_frequence:
-                                        inspection_due = True
-                            except:
-                                pass
-                    else:
-                        # Aucune inspection jamais faite - vérifier la date de création de l'équipement
-                        date_creation = eq.get("created_at") or eq.get("date_ajout")
-                        if date_creation:
-                            try:
-                                if isinstance(date_creation, str):
-                                    date_creation = datetime.fromisoformat(date_creation.replace("Z", "+00:00"))
-                                if isinstance(date_creation, datetime):
-                                    jours_depuis_creation = (datetime.now(timezone.utc) - date_creation).days
-                                    if jours_depuis_creation >= jours_frequence:
-                                        inspection_due = True
-                                        jours_depuis_derniere = jours_depuis_creation
-                            except:
-                                pass
+                    <p style="font-size: 15px; color: #374151; margin-top: 20px;"><strong>Total des alertes : {total_alertes}</strong></p>
+                """,
+                accent_color="#EF4444",
+                footer_text="Pour modifier vos preferences de notifications, accedez aux parametres du module Materiel & Equipements."
+            )
+            
+            # Envoyer l'email au résumé général (si des destinataires configurés)
+            resend.api_key = os.environ.get("RESEND_API_KEY")
+            sender_email = os.environ.get("SENDER_EMAIL", "noreply@profiremanager.ca")
+            
+            for email in emails_destinataires:
+                try:
+                    params = {
+                        "from": sender_email,
+                        "to": [email],
+                        "subject": subject,
+                        "html": html_content
+                    }
                     
-                    if inspection_due:
-                        alertes_count["inspections_dues"] += 1
-                        
-                        if categorie_id not in alertes_par_categorie:
-                            alertes_par_categorie[categorie_id] = {
-                                "nom": categorie.get("nom", "Catégorie inconnue"),
-                                "icone": categorie.get("icone", "📦"),
-                                "frequence": frequence,
-                                "count": 0,
-                                # Support pour plusieurs personnes ressources
-                                "personnes_ressources": categorie.get("personnes_ressources", []),
-                                # Anciens champs pour compatibilité
-                                "personne_ressource_email": categorie.get("personne_ressource_email", ""),
-                                "personne_ressource_id": categorie.get("personne_ressource_id", ""),
-                                "equipements": []
-                            }
-                        
-                        alertes_par_categorie[categorie_id]["count"] += 1
-                        alertes_par_categorie[categorie_id]["equipements"].append({
-                            "nom": eq.get("nom", eq.get("numero_serie", "Équipement")),
-                            "jours_retard": jours_depuis_derniere
-                        })
+                    soumettre_email(params, apres_envoi=historiser_apres_envoi(
+                        email,
+                        type_email="alerte_equipement_due",
+                        sujet=subject,
+                        tenant_id=tenant.get("id"),
+                        tenant_slug=tenant.get("slug"),
+                        metadata={"nb_alertes": total_alertes}
+                    ))
+                    logging.info(f"📧 Email mis en file pour {email} ({tenant_nom})")
                 
-                # Calculer le total des alertes
-                total_alertes = sum(alertes_count.values())
+                except Exception as e:
+                    logging.error(f"❌ Erreur envoi email à {email} pour {tenant_nom}: {str(e)}")
+            
+            # =============================================
+            # Envoyer emails à TOUTES les personnes ressources de chaque catégorie
+            # =============================================
+            emails_deja_envoyes = set(emails_destinataires)  # Éviter les doublons
+            
+            for cat_id, cat_data in alertes_par_categorie.items():
+                # Collecter tous les emails des personnes ressources
+                emails_pr = []
                 
-                # Si aucune alerte, ne pas envoyer d'email
-                if total_alertes == 0:
-                    logging.info(f"✅ Aucune alerte pour {tenant_nom}")
-                    continue
+                # Nouveau format: tableau personnes_ressources
+                for pr in cat_data.get("personnes_ressources", []):
+                    if pr.get("email") and pr.get("email") not in emails_deja_envoyes:
+                        emails_pr.append(pr.get("email"))
                 
-                logging.info(f"📊 {tenant_nom}: {total_alertes} alertes trouvées - Maintenance: {alertes_count['maintenance']}, Expiration: {alertes_count['expiration']}, Fin de vie: {alertes_count['fin_vie']}, Réparation: {alertes_count['reparation']}, Inspections dues: {alertes_count['inspections_dues']}")
+                # Ancien format: personne_ressource_email (pour compatibilité)
+                ancien_email = cat_data.get("personne_ressource_email", "")
+                if ancien_email and ancien_email not in emails_deja_envoyes and ancien_email not in emails_pr:
+                    emails_pr.append(ancien_email)
                 
-                # Générer le HTML pour les inspections dues par catégorie
-                inspections_dues_html = ""
-                if alertes_count["inspections_dues"] > 0:
-                    inspections_dues_html = f'''
-                        <div class="alert-box" style="border-left-color: #F59E0B; background-color: #FEF3C7;">
-                            <div class="alert-title" style="color: #B45309;">📋 Inspections à effectuer</div>
-                            <div class="alert-count" style="color: #92400E;">{alertes_count["inspections_dues"]} équipement(s)</div>
-                            <p>Selon la fréquence d'inspection de leur catégorie</p>
-                            <div style="margin-top: 15px;">
-                    '''
-                    for cat_id, cat_data in alertes_par_categorie.items():
-                        inspections_dues_html += f'''
-                                <div style="background: white; padding: 10px; border-radius: 8px; margin: 8px 0;">
-                                    <strong>{cat_data["icone"]} {cat_data["nom"]}</strong> - {cat_data["count"]} équipement(s)
-                                    <br><small style="color: #666;">Fréquence: {cat_data["frequence"]}</small>
-                                    <ul style="margin: 5px 0; padding-left: 20px; font-size: 0.9em;">
-                        '''
-                        for eq in cat_data["equipements"][:5]:  # Limiter à 5 équipements par catégorie
-                            retard_text = f" ({eq['jours_retard']} jours de retard)" if eq.get('jours_retard') else ""
-                            inspections_dues_html += f"<li>{eq['nom']}{retard_text}</li>"
-                        if len(cat_data["equipements"]) > 5:
-                            inspections_dues_html += f"<li><em>... et {len(cat_data['equipements']) - 5} autre(s)</em></li>"
-                        inspections_dues_html += "</ul></div>"
-                    inspections_dues_html += "</div></div>"
+                if not emails_pr:
+                    continue
                 
-                # Préparer le contenu de l'email
-                subject = f"⚠️ Alertes Équipements - {tenant_nom}"
+                # Préparer l'email pour les personnes ressources
+                subject_pr = f"📋 Inspections dues - {cat_data['nom']} - {tenant_nom}"
                 
-                html_content = build_email(
-                    title=f"Rapport d'Alertes Equipements",
+                equipements_list_html = "".join([
+                    f"<li><strong>{eq['nom']}</strong> - {eq.get('jours_retard', 'N/A')} jours depuis dernière inspection</li>"
+                    for eq in cat_data["equipements"]
+                ])
+                
+                html_pr = build_email(
+                    title=f"Inspections dues - {cat_data['nom']}",
                     body_html=f"""
                         <p style="font-size: 15px; color: #374151;">Bonjour,</p>
-                        <p style="font-size: 15px; color: #374151;">Voici le rapport quotidien des alertes pour vos equipements ({today.strftime("%d/%m/%Y")}) :</p>
-                        
-                        {f'''
-                        {email_alert_card(
-                            f"Maintenance a venir — {alertes_count['maintenance']} equipement(s)",
-                            f"Maintenance requise dans les {jours_maintenance} prochains jours",
-                            "#EF4444", "#FEE2E2", "#991B1B"
-                        )}
-                        ''' if alertes_count["maintenance"] > 0 else ''}
-                        
-                        {f'''
-                        {email_alert_card(
-                            f"Expirations a venir — {alertes_count['expiration']} equipement(s)",
-                            f"Expiration dans les {jours_expiration} prochains jours",
-                            "#EF4444", "#FEE2E2", "#991B1B"
-                        )}
-                        ''' if alertes_count["expiration"] > 0 else ''}
-                        
-                        {f'''
-                        {email_alert_card(
-                            f"Fin de vie approche — {alertes_count['fin_vie']} equipement(s)",
-                            f"Fin de vie dans les {jours_fin_vie} prochains jours",
-                            "#EF4444", "#FEE2E2", "#991B1B"
-                        )}
-                        ''' if alertes_count["fin_vie"] > 0 else ''}
-                        
-                        {f'''
-                        {email_alert_card(
-                            f"Reparations necessaires — {alertes_count['reparation']} equipement(s)",
-                            "Equipements en attente de reparation",
-                            "#EF4444", "#FEE2E2", "#991B1B"
-                        )}
-                        ''' if alertes_count["reparation"] > 0 else ''}
+                        <p style="font-size: 15px; color: #374151;">
+                            En tant que personne ressource pour la categorie <strong>{cat_data['nom']}</strong>, 
+                            vous etes notifie(e) que <strong>{cat_data['count']} equipement(s)</strong> necessitent une inspection.
+                        </p>
+                        <p style="font-size: 14px; color: #374151;"><strong>Frequence d'inspection :</strong> {cat_data['frequence']}</p>
                         
-                        {inspections_dues_html}
+                        {email_card(f'''
+                            <h4 style="color: #1e293b; margin: 0 0 12px; font-size: 15px;">Equipements concernes :</h4>
+                            <ul style="margin: 0; padding-left: 20px; line-height: 2; color: #374151;">
+                                {equipements_list_html}
+                            </ul>
+                        ''')}
                         
-                        <p style="font-size: 15px; color: #374151; margin-top: 20px;"><strong>Total des alertes : {total_alertes}</strong></p>
+                        <p style="font-size: 14px; color: #374151; margin-top: 16px;">
+                            Connectez-vous a ProFireManager pour effectuer ces inspections.
+                        </p>
                     """,
-                    accent_color="#EF4444",
-                    footer_text="Pour modifier vos preferences de notifications, accedez aux parametres du module Materiel & Equipements."
+                    accent_color="#F59E0B",
+                    footer_text="Vous recevez ce message car vous etes designe comme personne ressource."
                 )
                 
-                # Envoyer l'email au résumé général (si des destinataires configurés)
-                resend.api_key = os.environ.get("RESEND_API_KEY")
-                sender_email = os.environ.get("SENDER_EMAIL", "noreply@profiremanager.ca")
-                
-                for email in emails_destinataires:
+                # Envoyer à chaque personne ressource
+                for email_pr in emails_pr:
                     try:
-                        params = {
+                        params_pr = {
                             "from": sender_email,
-                            "to": [email],
-                            "subject": subject,
-                            "html": html_content
+                            "to": [email_pr],
+                            "subject": subject_pr,
+                            "html": html_pr
                         }
                         
-                        email_response = resend.Emails.send(params)
-                        logging.info(f"📧 Email envoyé à {email} pour {tenant_nom} - ID: {email_response.get('id', 'N/A')}")
-                        # Log email
-                        await log_email_sent(
-                            type_email="alerte_equipement_due",
-                            destinataire_email=email,
-                            sujet=subject,
+                        soumettre_email(params_pr, apres_envoi=historiser_apres_envoi(
+                            email_pr,
+                            type_email="alerte_inspection_due",
+                            sujet=subject_pr,
                             tenant_id=tenant.get("id"),
                             tenant_slug=tenant.get("slug"),
-                            metadata={"nb_alertes": total_alertes}
-                        )
+                            metadata={"categorie": cat_data['nom'], "nb_equipements": cat_data['count']}
+                        ))
+                        logging.info(f"📧 Email personne ressource mis en file pour {email_pr} ({cat_data['nom']})")
+                        emails_deja_envoyes.add(email_pr)  # Marquer comme envoyé
                     
                     except Exception as e:
-                        logging.error(f"❌ Erreur envoi email à {email} pour {tenant_nom}: {str(e)}")
-                
-                # =============================================
-                # Envoyer emails à TOUTES les personnes ressources de chaque catégorie
-                # =============================================
-                emails_deja_envoyes = set(emails_destinataires)  # Éviter les doublons
-                
-                for cat_id, cat_data in alertes_par_categorie.items():
-                    # Collecter tous les emails des personnes ressources
-                    emails_pr = []
-                    
-                    # Nouveau format: tableau personnes_ressources
-                    for pr in cat_data.get("personnes_ressources", []):
-                        if pr.get("email") and pr.get("email") not in emails_deja_envoyes:
-                            emails_pr.append(pr.get("email"))
-                    
-                    # Ancien format: personne_ressource_email (pour compatibilité)
-                    ancien_email = cat_data.get("personne_ressource_email", "")
-                    if ancien_email and ancien_email not in emails_deja_envoyes and ancien_email not in emails_pr:
-                        emails_pr.append(ancien_email)
-                    
-                    if not emails_pr:
-                        continue
-                    
-                    # Préparer l'email pour les personnes ressources
-                    subject_pr = f"📋 Inspections dues - {cat_data['nom']} - {tenant_nom}"
-                    
-                    equipements_list_html = "".join([
-                        f"<li><strong>{eq['nom']}</strong> - {eq.get('jours_retard', 'N/A')} jours depuis dernière inspection</li>"
-                        for eq in cat_data["equipements"]
-                    ])
-                    
-                    html_pr = build_email(
-                        title=f"Inspections dues - {cat_data['nom']}",
-                        body_html=f"""
-                            <p style="font-size: 15px; color: #374151;">Bonjour,</p>
-                            <p style="font-size: 15px; color: #374151;">
-                                En tant que personne ressource pour la categorie <strong>{cat_data['nom']}</strong>, 
-                                vous etes notifie(e) que <strong>{cat_data['count']} equipement(s)</strong> necessitent une inspection.
-                            </p>
-                            <p style="font-size: 14px; color: #374151;"><strong>Frequence d'inspection :</strong> {cat_data['frequence']}</p>
-                            
-                            {email_card(f'''
-                                <h4 style="color: #1e293b; margin: 0 0 12px; font-size: 15px;">Equipements concernes :</h4>
-                                <ul style="margin: 0; padding-left: 20px; line-height: 2; color: #374151;">
-                                    {equipements_list_html}
-                                </ul>
-                            ''')}
-                            
-                            <p style="font-size: 14px; color: #374151; margin-top: 16px;">
-                                Connectez-vous a ProFireManager pour effectuer ces inspections.
-                            </p>
-                        """,
-                        accent_color="#F59E0B",
-                        footer_text="Vous recevez ce message car vous etes designe comme personne ressource."
-                    )
-                    
-                    # Envoyer à chaque personne ressource
-                    for email_pr in emails_pr:
-                        try:
-                            params_pr = {
-                                "from": sender_email,
-                                "to": [email_pr],
-                                "subject": subject_pr,
-                                "html": html_pr
-                            }
-                            
-                            email_response_pr = resend.Emails.send(params_pr)
-                            logging.info(f"📧 Email personne ressource envoyé à {email_pr} pour {cat_data['nom']} - ID: {email_response_pr.get('id', 'N/A')}")
-                            emails_deja_envoyes.add(email_pr)  # Marquer comme envoyé
-                            # Log email
-                            await log_email_sent(
-                                type_email="alerte_inspection_due",
-                                destinataire_email=email_pr,
-                                sujet=subject_pr,
-                                tenant_id=tenant.get("id"),
-                                tenant_slug=tenant.get("slug"),
-                                metadata={"categorie": cat_data['nom'], "nb_equipements": cat_data['count']}
-                            )
-                        
-                        except Exception as e:
-                            logging.error(f"❌ Erreur envoi email personne ressource {email_pr}: {str(e)}")
-                
-                logging.info(f"✅ Notifications d'alertes envoyées pour {tenant_nom}")
-                
-            except Exception as e:
-                logging.error(f"❌ Erreur traitement alertes pour {tenant.get('nom', 'Unknown')}: {str(e)}", exc_info=True)
+                        logging.error(f"❌ Erreur envoi email personne ressource {email_pr}: {str(e)}")
+            
+            logging.info(f"✅ Notifications d'alertes envoyées pour {tenant_nom}")
+            
+
+        await executer_par_tenant("check_equipment_alerts", tenants, traiter_tenant)
         
         logging.info("✅ Vérification des alertes d'équipements terminée")
         
@@ -1374,161 +1190,158 @@ async def job_rappel_inspection_epi_mensuelle():
         # Récupérer tous les tenants actifs
         tenants = await db.tenants.find({"actif": True}).to_list(None)
         
-        for tenant in tenants:
-            try:
-                tenant_id = tenant.get("id")
-                tenant_nom = tenant.get("nom", "Unknown")
-                tenant_slug = tenant.get("slug", "")
-                
-                # Récupérer les paramètres EPI pour ce tenant
-                # Les paramètres EPI sont stockés directement dans tenant.parametres
-                parametres = tenant.get("parametres", {})
-                
-                if not parametres:
-                    continue
-                
-                # Vérifier si les alertes sont activées
-                alerte_activee = parametres.get("epi_alerte_inspection_mensuelle", False)
-                jour_alerte = parametres.get("epi_jour_alerte_inspection_mensuelle", 20)
-                
-                if not alerte_activee:
-                    continue
+        async def traiter_tenant(tenant):
+            tenant_id = tenant.get("id")
+            tenant_nom = tenant.get("nom", "Unknown")
+            tenant_slug = tenant.get("slug", "")
+            
+            # Récupérer les paramètres EPI pour ce tenant
+            # Les paramètres EPI sont stockés directement dans tenant.parametres
+            parametres = tenant.get("parametres", {})
+            
+            if not parametres:
+                return
+            
+            # Vérifier si les alertes sont activées
+            alerte_activee = parametres.get("epi_alerte_inspection_mensuelle", False)
+            jour_alerte = parametres.get("epi_jour_alerte_inspection_mensuelle", 20)
+            
+            if not alerte_activee:
+                return
+            
+            # Vérifier si c'est le bon jour
+            if jour_actuel != jour_alerte:
+                return
+            
+            logging.info(f"📅 {tenant_nom}: Jour d'alerte inspection EPI (jour {jour_alerte})")
+            
+            # Récupérer tous les pompiers actifs du tenant
+            pompiers = await db.users.find({
+                "tenant_id": tenant_id,
+                "statut": "actif"
+            }).to_list(None)
+            
+            if not pompiers:
+                return
+            
+            # Récupérer tous les EPI assignés à des pompiers
+            epis_assignes = await db.epis.find({
+                "tenant_id": tenant_id,
+                "user_id": {"$ne": None, "$ne": ""}
+            }).to_list(None)
+            
+            # Grouper les EPI par user_id
+            epis_par_user = {}
+            for epi in epis_assignes:
+                user_id = epi.get("user_id")
+                if user_id:
+                    if user_id not in epis_par_user:
+                        epis_par_user[user_id] = []
+                    epis_par_user[user_id].append(epi)
+            
+            # Début et fin du mois courant
+            debut_mois = datetime(annee_actuelle, mois_actuel, 1, tzinfo=timezone.utc)
+            if mois_actuel == 12:
+                fin_mois = datetime(annee_actuelle + 1, 1, 1, tzinfo=timezone.utc)
+            else:
+                fin_mois = datetime(annee_actuelle, mois_actuel + 1, 1, tzinfo=timezone.utc)
+            
+            notifications_envoyees = 0
+            
+            for pompier in pompiers:
+                pompier_id = pompier.get("id")
+                pompier_nom = f"{pompier.get('prenom', '')} {pompier.get('nom', '')}"
                 
-                # Vérifier si c'est le bon jour
-                if jour_actuel != jour_alerte:
+                # Vérifier si ce pompier a des EPI assignés
+                if pompier_id not in epis_par_user:
                     continue
                 
-                logging.info(f"📅 {tenant_nom}: Jour d'alerte inspection EPI (jour {jour_alerte})")
+                epis_pompier = epis_par_user[pompier_id]
                 
-                # Récupérer tous les pompiers actifs du tenant
-                pompiers = await db.users.find({
+                # Vérifier si le pompier a fait au moins une inspection ce mois-ci
+                inspection_ce_mois = await db.inspections_epi.find_one({
                     "tenant_id": tenant_id,
-                    "statut": "actif"
-                }).to_list(None)
+                    "inspecteur_id": pompier_id,
+                    "date_inspection": {
+                        "$gte": debut_mois.isoformat(),
+                        "$lt": fin_mois.isoformat()
+                    }
+                })
                 
-                if not pompiers:
+                if inspection_ce_mois:
+                    # Le pompier a déjà fait son inspection ce mois-ci
                     continue
                 
-                # Récupérer tous les EPI assignés à des pompiers
-                epis_assignes = await db.epis.find({
-                    "tenant_id": tenant_id,
-                    "user_id": {"$ne": None, "$ne": ""}
-                }).to_list(None)
-                
-                # Grouper les EPI par user_id
-                epis_par_user = {}
-                for epi in epis_assignes:
-                    user_id = epi.get("user_id")
-                    if user_id:
-                        if user_id not in epis_par_user:
-                            epis_par_user[user_id] = []
-                        epis_par_user[user_id].append(epi)
+                # Le pompier n'a pas fait son inspection - envoyer notification
+                nb_epi = len(epis_pompier)
                 
-                # Début et fin du mois courant
-                debut_mois = datetime(annee_actuelle, mois_actuel, 1, tzinfo=timezone.utc)
-                if mois_actuel == 12:
-                    fin_mois = datetime(annee_actuelle + 1, 1, 1, tzinfo=timezone.utc)
-                else:
-                    fin_mois = datetime(annee_actuelle, mois_actuel + 1, 1, tzinfo=timezone.utc)
+                # Créer notification dans l'app
+                await creer_notification(
+                    tenant_id=tenant_id,
+                    destinataire_id=pompier_id,
+                    type="rappel_inspection_epi",
+                    titre="🔔 Rappel: Inspection EPI mensuelle",
+                    message=f"Vous n'avez pas encore effectué votre inspection mensuelle des EPI ce mois-ci. Vous avez {nb_epi} EPI à inspecter.",
+                    lien="/mes-epi",
+                    data={"nb_epi": nb_epi, "mois": mois_actuel, "annee": annee_actuelle}
+                )
                 
-                notifications_envoyees = 0
+                notifications_envoyees += 1
+                logging.info(f"📩 Rappel inspection EPI envoyé à {pompier_nom} ({nb_epi} EPI)")
                 
-                for pompier in pompiers:
-                    pompier_id = pompier.get("id")
-                    pompier_nom = f"{pompier.get('prenom', '')} {pompier.get('nom', '')}"
-                    
-                    # Vérifier si ce pompier a des EPI assignés
-                    if pompier_id not in epis_par_user:
-                        continue
-                    
-                    epis_pompier = epis_par_user[pompier_id]
-                    
-                    # Vérifier si le pompier a fait au moins une inspection ce mois-ci
-                    inspection_ce_mois = await db.inspections_epi.find_one({
-                        "tenant_id": tenant_id,
-                        "inspecteur_id": pompier_id,
-                        "date_inspection": {
-                            "$gte": debut_mois.isoformat(),
-                            "$lt": fin_mois.isoformat()
+                # Optionnel: Envoyer aussi par email si l'email est disponible
+                email_pompier = pompier.get("email")
+                if email_pompier and parametres.get("epi_envoyer_rappel_email", False):
+                    try:
+                        mois_noms = ["", "janvier", "février", "mars", "avril", "mai", "juin", 
+                                    "juillet", "août", "septembre", "octobre", "novembre", "décembre"]
+                        mois_nom = mois_noms[mois_actuel]
+                        
+                        html_content = build_email(
+                            title="Rappel d'inspection EPI",
+                            body_html=f"""
+                                <p style="font-size: 15px; color: #374151;">Bonjour {pompier.get('prenom', '')},</p>
+                                <p style="font-size: 15px; color: #374151;">
+                                    Ceci est un rappel automatique: <strong>vous n'avez pas encore effectue votre inspection mensuelle des EPI pour le mois de {mois_nom} {annee_actuelle}</strong>.
+                                </p>
+                                
+                                {email_alert_card(
+                                    f"Vous avez {nb_epi} EPI a inspecter",
+                                    "Veuillez vous connecter a l'application pour effectuer votre inspection dans la section Mes EPI.",
+                                    "#F59E0B", "#FEF3C7", "#92400E"
+                                )}
+                            """,
+                            accent_color="#1e3a5f",
+                            footer_text=f"Cet email a ete envoye automatiquement par ProFireManager. {tenant_nom}"
+                        )
+                        
+                        params = {
+                            "from": "ProFireManager <notifications@profiremanager.ca>",
+                            "to": [email_pompier],
+                            "subject": f"🔔 Rappel: Inspection EPI mensuelle - {mois_nom} {annee_actuelle}",
+                            "html": html_content
                         }
-                    })
-                    
-                    if inspection_ce_mois:
-                        # Le pompier a déjà fait son inspection ce mois-ci
-                        continue
-                    
-                    # Le pompier n'a pas fait son inspection - envoyer notification
-                    nb_epi = len(epis_pompier)
-                    
-                    # Créer notification dans l'app
-                    await creer_notification(
-                        tenant_id=tenant_id,
-                        destinataire_id=pompier_id,
-                        type="rappel_inspection_epi",
-                        titre="🔔 Rappel: Inspection EPI mensuelle",
-                        message=f"Vous n'avez pas encore effectué votre inspection mensuelle des EPI ce mois-ci. Vous avez {nb_epi} EPI à inspecter.",
-                        lien="/mes-epi",
-                        data={"nb_epi": nb_epi, "mois": mois_actuel, "annee": annee_actuelle}
-                    )
-                    
-                    notifications_envoyees += 1
-                    logging.info(f"📩 Rappel inspection EPI envoyé à {pompier_nom} ({nb_epi} EPI)")
-                    
-                    # Optionnel: Envoyer aussi par email si l'email est disponible
-                    email_pompier = pompier.get("email")
-                    if email_pompier and parametres.get("epi_envoyer_rappel_email", False):
-                        try:
-                            mois_noms = ["", "janvier", "février", "mars", "avril", "mai", "juin", 
-                                        "juillet", "août", "septembre", "octobre", "novembre", "décembre"]
-                            mois_nom = mois_noms[mois_actuel]
-                            
-                            html_content = build_email(
-                                title="Rappel d'inspection EPI",
-                                body_html=f"""
-                                    <p style="font-size: 15px; color: #374151;">Bonjour {pompier.get('prenom', '')},</p>
-                                    <p style="font-size: 15px; color: #374151;">
-                                        Ceci est un rappel automatique: <strong>vous n'avez pas encore effectue votre inspection mensuelle des EPI pour le mois de {mois_nom} {annee_actuelle}</strong>.
-                                    </p>
-                                    
-                                    {email_alert_card(
-                                        f"Vous avez {nb_epi} EPI a inspecter",
-                                        "Veuillez vous connecter a l'application pour effectuer votre inspection dans la section Mes EPI.",
-                                        "#F59E0B", "#FEF3C7", "#92400E"
-                                    )}
-                                """,
-                                accent_color="#1e3a5f",
-                                footer_text=f"Cet email a ete envoye automatiquement par ProFireManager. {tenant_nom}"
-                            )
-                            
-                            params = {
-                                "from": "ProFireManager <notifications@profiremanager.ca>",
-                                "to": [email_pompier],
-                                "subject": f"🔔 Rappel: Inspection EPI mensuelle - {mois_nom} {annee_actuelle}",
-                                "html": html_content
-                            }
-                            
-                            resend.Emails.send(params)
-                            logging.info(f"📧 Email rappel inspection envoyé à {email_pompier}")
-                            # Log email
-                            await log_email_sent(
-                                type_email="rappel_inspection_epi",
-                                destinataire_email=email_pompier,
-                                destinataire_nom=f"{pompier.get('prenom', '')} {pompier.get('nom', '')}".strip(),
-                                sujet=f"🔔 Rappel: Inspection EPI mensuelle - {mois_nom} {annee_actuelle}",
-                                tenant_id=tenant.get("id"),
-                                tenant_slug=tenant.get("slug")
-                            )
-                            
-                        except Exception as e:
-                            logging.error(f"❌ Erreur envoi email rappel à {email_pompier}: {str(e)}")
+                        
+                        soumettre_email(params, apres_envoi=historiser_apres_envoi(
+                            email_pompier,
+                            type_email="rappel_inspection_epi",
+                            destinataire_nom=f"{pompier.get('prenom', '')} {pompier.get('nom', '')}".strip(),
+                            sujet=f"🔔 Rappel: Inspection EPI mensuelle - {mois_nom} {annee_actuelle}",
+                            tenant_id=tenant.get("id"),
+                            tenant_slug=tenant.get("slug")
+                        ))
+                        logging.info(f"📧 Email rappel inspection mis en file pour {email_pompier}")
+                        
+                    except Exception as e:
+                        logging.error(f"❌ Erreur envoi email rappel à {email_pompier}: {str(e)}")
+            
+            if notifications_envoyees > 0:
+                logging.info(f"✅ {tenant_nom}: {notifications_envoyees} rappel(s) d'inspection EPI envoyé(s)")
+            else:
+                logging.info(f"✅ {tenant_nom}: Tous les pompiers ont fait leur inspection ce mois")
                 
-                if notifications_envoyees > 0:
-                    logging.info(f"✅ {tenant_nom}: {notifications_envoyees} rappel(s) d'inspection EPI envoyé(s)")
-                else:
-                    logging.info(f"✅ {tenant_nom}: Tous les pompiers ont fait leur inspection ce mois")
-                    
-            except Exception as e:
-                logging.error(f"❌ Erreur rappel inspection EPI pour {tenant.get('nom', 'Unknown')}: {str(e)}", exc_info=True)
+
+        await executer_par_tenant("rappel_inspection_epi", tenants, traiter_tenant)
         
         logging.info("✅ Vérification des rappels d'inspection EPI terminée")
         
@@ -1562,204 +1375,203 @@ async def job_alertes_epi_frequence():
         # Récupérer tous les tenants actifs
         tenants = await db.tenants.find({"actif": True}).to_list(None)
         
-        for tenant in tenants:
-            try:
-                tenant_id = tenant.get("id")
-                tenant_nom = tenant.get("nom", "Unknown")
-                tenant_slug = tenant.get("slug", "")
-                parametres = tenant.get("parametres", {})
-                
-                # Paramètres d'alertes EPI
-                jours_avance_expiration = parametres.get("epi_jours_avance_expiration", 30)
-                jours_avant_inspection = 7  # 7 jours avant l'échéance d'inspection
-                
-                # Récupérer tous les types d'EPI pour ce tenant
-                types_epi = await db.types_epi.find({"tenant_id": tenant_id}).to_list(None)
-                types_map = {t["id"]: t for t in types_epi}
+        async def traiter_tenant(tenant):
+            tenant_id = tenant.get("id")
+            tenant_nom = tenant.get("nom", "Unknown")
+            tenant_slug = tenant.get("slug", "")
+            parametres = tenant.get("parametres", {})
+            
+            # Paramètres d'alertes EPI
+            jours_avance_expiration = parametres.get("epi_jours_avance_expiration", 30)
+            jours_avant_inspection = 7  # 7 jours avant l'échéance d'inspection
+            
+            # Récupérer tous les types d'EPI pour ce tenant
+            types_epi = await db.types_epi.find({"tenant_id": tenant_id}).to_list(None)
+            types_map = {t["id"]: t for t in types_epi}
+            
+            # Récupérer tous les EPI assignés à des utilisateurs
+            epis = await db.epis.find({
+                "tenant_id": tenant_id,
+                "user_id": {"$ne": None, "$ne": ""},
+                "statut": {"$in": ["En service", "en_service", "actif"]}
+            }).to_list(None)
+            
+            if not epis:
+                return
+            
+            # Récupérer les admins/superviseurs (ceux avec permission RBAC)
+            admins_superviseurs = await db.users.find({
+                "tenant_id": tenant_id,
+                "statut": "actif",
+                "role": {"$in": ["admin", "superviseur"]}
+            }).to_list(None)
+            admin_ids = [u["id"] for u in admins_superviseurs]
+            
+            alertes_envoyees = 0
+            alertes_fin_vie = 0
+            
+            for epi in epis:
+                epi_id = epi.get("id")
+                user_id = epi.get("user_id")
+                epi_nom = epi.get("numero_serie") or epi.get("nom") or epi_id[:8]
+                type_epi = types_map.get(epi.get("type_id"), {})
+                type_nom = type_epi.get("nom", "EPI")
                 
-                # Récupérer tous les EPI assignés à des utilisateurs
-                epis = await db.epis.find({
-                    "tenant_id": tenant_id,
-                    "user_id": {"$ne": None, "$ne": ""},
-                    "statut": {"$in": ["En service", "en_service", "actif"]}
-                }).to_list(None)
+                # Fréquences du type d'EPI
+                frequence_routine = type_epi.get("frequence_routine", "mensuelle")
+                frequence_avancee = type_epi.get("frequence_avancee", "annuelle")
                 
-                if not epis:
-                    continue
+                # Convertir en jours
+                jours_routine = frequence_to_jours(frequence_routine)
+                jours_avancee = frequence_to_jours(frequence_avancee)
                 
-                # Récupérer les admins/superviseurs (ceux avec permission RBAC)
-                admins_superviseurs = await db.users.find({
-                    "tenant_id": tenant_id,
-                    "statut": "actif",
-                    "role": {"$in": ["admin", "superviseur"]}
-                }).to_list(None)
-                admin_ids = [u["id"] for u in admins_superviseurs]
+                # Récupérer la dernière inspection
+                derniere_inspection = await db.inspections_epi.find_one(
+                    {"epi_id": epi_id, "tenant_id": tenant_id},
+                    sort=[("date_inspection", -1)]
+                )
                 
-                alertes_envoyees = 0
-                alertes_fin_vie = 0
+                prochaine_echeance = None
+                type_inspection_due = None
                 
-                for epi in epis:
-                    epi_id = epi.get("id")
-                    user_id = epi.get("user_id")
-                    epi_nom = epi.get("numero_serie") or epi.get("nom") or epi_id[:8]
-                    type_epi = types_map.get(epi.get("type_id"), {})
-                    type_nom = type_epi.get("nom", "EPI")
+                if derniere_inspection:
+                    date_inspection = datetime.fromisoformat(derniere_inspection["date_inspection"].replace('Z', '+00:00')).date()
+                    type_inspection = derniere_inspection.get("type_inspection", "routine_mensuelle")
                     
-                    # Fréquences du type d'EPI
-                    frequence_routine = type_epi.get("frequence_routine", "mensuelle")
-                    frequence_avancee = type_epi.get("frequence_avancee", "annuelle")
-                    
-                    # Convertir en jours
-                    jours_routine = frequence_to_jours(frequence_routine)
-                    jours_avancee = frequence_to_jours(frequence_avancee)
-                    
-                    # Récupérer la dernière inspection
-                    derniere_inspection = await db.inspections_epi.find_one(
-                        {"epi_id": epi_id, "tenant_id": tenant_id},
-                        sort=[("date_inspection", -1)]
-                    )
-                    
-                    prochaine_echeance = None
-                    type_inspection_due = None
-                    
-                    if derniere_inspection:
-                        date_inspection = datetime.fromisoformat(derniere_inspection["date_inspection"].replace('Z', '+00:00')).date()
-                        type_inspection = derniere_inspection.get("type_inspection", "routine_mensuelle")
-                        
-                        if type_inspection == "avancee_annuelle":
-                            prochaine_echeance = date_inspection + timedelta(days=jours_avancee)
-                            type_inspection_due = "avancee_annuelle"
-                        else:
-                            prochaine_echeance = date_inspection + timedelta(days=jours_routine)
-                            type_inspection_due = "routine"
+                    if type_inspection == "avancee_annuelle":
+                        prochaine_echeance = date_inspection + timedelta(days=jours_avancee)
+                        type_inspection_due = "avancee_annuelle"
                     else:
-                        # Jamais inspecté - échéance immédiate
-                        prochaine_echeance = today
+                        prochaine_echeance = date_inspection + timedelta(days=jours_routine)
                         type_inspection_due = "routine"
+                else:
+                    # Jamais inspecté - échéance immédiate
+                    prochaine_echeance = today
+                    type_inspection_due = "routine"
+                
+                # Vérifier si dans la fenêtre de 7 jours
+                if prochaine_echeance:
+                    jours_restants = (prochaine_echeance - today).days
                     
-                    # Vérifier si dans la fenêtre de 7 jours
-                    if prochaine_echeance:
-                        jours_restants = (prochaine_echeance - today).days
+                    if 0 <= jours_restants <= jours_avant_inspection:
+                        # Envoyer alerte à l'employé
+                        destinataires = [user_id] if user_id else []
+                        
+                        # Ajouter les admins/superviseurs
+                        destinataires.extend(admin_ids)
+                        destinataires = list(set(destinataires))  # Dédupliquer
+                        
+                        titre = f"🔔 Inspection EPI à venir"
+                        if jours_restants == 0:
+                            message = f"L'inspection {type_inspection_due} de votre {type_nom} ({epi_nom}) est due aujourd'hui."
+                        else:
+                            message = f"L'inspection {type_inspection_due} de votre {type_nom} ({epi_nom}) est due dans {jours_restants} jour(s)."
+                        
+                        # Notification in-app pour chaque destinataire
+                        for dest_id in destinataires:
+                            await creer_notification(
+                                tenant_id=tenant_id,
+                                destinataire_id=dest_id,
+                                type="alerte_inspection_epi",
+                                titre=titre,
+                                message=message,
+                                lien="/mes-epi" if dest_id == user_id else "/gestion-epi",
+                                data={
+                                    "epi_id": epi_id,
+                                    "epi_nom": epi_nom,
+                                    "type_inspection": type_inspection_due,
+                                    "jours_restants": jours_restants
+                                }
+                            )
+                        
+                        # Notification push (iOS/Android)
+                        try:
+                            await send_push_notification_to_users(
+                                user_ids=destinataires,
+                                title=titre,
+                                body=message,
+                                data={
+                                    "type": "alerte_inspection_epi",
+                                    "epi_id": epi_id,
+                                    "lien": "/mes-epi"
+                                },
+                                tenant_slug=tenant_slug
+                            )
+                        except Exception as push_err:
+                            logging.warning(f"⚠️ Erreur push notification EPI: {str(push_err)}")
+                        
+                        # Web Push
+                        try:
+                            await send_web_push_to_users(
+                                tenant_id=tenant_id,
+                                user_ids=destinataires,
+                                title=titre,
+                                body=message,
+                                data={"url": f"/{tenant_slug}/mes-epi"}
+                            )
+                        except Exception as web_err:
+                            logging.warning(f"⚠️ Erreur web push EPI: {str(web_err)}")
+                        
+                        alertes_envoyees += 1
+                
+                # Vérifier la fin de vie EPI
+                date_fin_vie = epi.get("date_fin_vie") or epi.get("date_expiration")
+                if date_fin_vie:
+                    try:
+                        if isinstance(date_fin_vie, str):
+                            fin_vie = datetime.fromisoformat(date_fin_vie.replace('Z', '+00:00')).date()
+                        else:
+                            fin_vie = date_fin_vie
+                        
+                        jours_avant_fin = (fin_vie - today).days
                         
-                        if 0 <= jours_restants <= jours_avant_inspection:
-                            # Envoyer alerte à l'employé
+                        if 0 <= jours_avant_fin <= jours_avance_expiration:
                             destinataires = [user_id] if user_id else []
-                            
-                            # Ajouter les admins/superviseurs
                             destinataires.extend(admin_ids)
-                            destinataires = list(set(destinataires))  # Dédupliquer
+                            destinataires = list(set(destinataires))
                             
-                            titre = f"🔔 Inspection EPI à venir"
-                            if jours_restants == 0:
-                                message = f"L'inspection {type_inspection_due} de votre {type_nom} ({epi_nom}) est due aujourd'hui."
+                            titre = "⚠️ Fin de vie EPI"
+                            if jours_avant_fin == 0:
+                                message = f"Votre {type_nom} ({epi_nom}) arrive à fin de vie aujourd'hui!"
                             else:
-                                message = f"L'inspection {type_inspection_due} de votre {type_nom} ({epi_nom}) est due dans {jours_restants} jour(s)."
+                                message = f"Votre {type_nom} ({epi_nom}) arrive à fin de vie dans {jours_avant_fin} jour(s)."
                             
-                            # Notification in-app pour chaque destinataire
                             for dest_id in destinataires:
                                 await creer_notification(
                                     tenant_id=tenant_id,
                                     destinataire_id=dest_id,
-                                    type="alerte_inspection_epi",
+                                    type="alerte_fin_vie_epi",
                                     titre=titre,
                                     message=message,
                                     lien="/mes-epi" if dest_id == user_id else "/gestion-epi",
                                     data={
                                         "epi_id": epi_id,
                                         "epi_nom": epi_nom,
-                                        "type_inspection": type_inspection_due,
-                                        "jours_restants": jours_restants
+                                        "jours_avant_fin": jours_avant_fin
                                     }
                                 )
                             
-                            # Notification push (iOS/Android)
+                            # Push notification
                             try:
                                 await send_push_notification_to_users(
                                     user_ids=destinataires,
                                     title=titre,
                                     body=message,
-                                    data={
-                                        "type": "alerte_inspection_epi",
-                                        "epi_id": epi_id,
-                                        "lien": "/mes-epi"
-                                    },
+                                    data={"type": "alerte_fin_vie_epi", "epi_id": epi_id},
                                     tenant_slug=tenant_slug
                                 )
                             except Exception as push_err:
-                                logging.warning(f"⚠️ Erreur push notification EPI: {str(push_err)}")
+                                logging.warning(f"⚠️ Erreur push fin vie EPI: {str(push_err)}")
                             
-                            # Web Push
-                            try:
-                                await send_web_push_to_users(
-                                    tenant_id=tenant_id,
-                                    user_ids=destinataires,
-                                    title=titre,
-                                    body=message,
-                                    data={"url": f"/{tenant_slug}/mes-epi"}
-                                )
-                            except Exception as web_err:
-                                logging.warning(f"⚠️ Erreur web push EPI: {str(web_err)}")
-                            
-                            alertes_envoyees += 1
-                    
-                    # Vérifier la fin de vie EPI
-                    date_fin_vie = epi.get("date_fin_vie") or epi.get("date_expiration")
-                    if date_fin_vie:
-                        try:
-                            if isinstance(date_fin_vie, str):
-                                fin_vie = datetime.fromisoformat(date_fin_vie.replace('Z', '+00:00')).date()
-                            else:
-                                fin_vie = date_fin_vie
-                            
-                            jours_avant_fin = (fin_vie - today).days
-                            
-                            if 0 <= jours_avant_fin <= jours_avance_expiration:
-                                destinataires = [user_id] if user_id else []
-                                destinataires.extend(admin_ids)
-                                destinataires = list(set(destinataires))
-                                
-                                titre = "⚠️ Fin de vie EPI"
-                                if jours_avant_fin == 0:
-                                    message = f"Votre {type_nom} ({epi_nom}) arrive à fin de vie aujourd'hui!"
-                                else:
-                                    message = f"Votre {type_nom} ({epi_nom}) arrive à fin de vie dans {jours_avant_fin} jour(s)."
-                                
-                                for dest_id in destinataires:
-                                    await creer_notification(
-                                        tenant_id=tenant_id,
-                                        destinataire_id=dest_id,
-                                        type="alerte_fin_vie_epi",
-                                        titre=titre,
-                                        message=message,
-                                        lien="/mes-epi" if dest_id == user_id else "/gestion-epi",
-                                        data={
-                                            "epi_id": epi_id,
-                                            "epi_nom": epi_nom,
-                                            "jours_avant_fin": jours_avant_fin
-                                        }
-                                    )
-                                
-                                # Push notification
-                                try:
-                                    await send_push_notification_to_users(
-                                        user_ids=destinataires,
-                                        title=titre,
-                                        body=message,
-                                        data={"type": "alerte_fin_vie_epi", "epi_id": epi_id},
-                                        tenant_slug=tenant_slug
-                                    )
-                                except Exception as push_err:
-                                    logging.warning(f"⚠️ Erreur push fin vie EPI: {str(push_err)}")
-                                
-                                alertes_fin_vie += 1
-                        except Exception as date_err:
-                            logging.warning(f"⚠️ Erreur parsing date fin vie EPI {epi_id}: {str(date_err)}")
+                            alertes_fin_vie += 1
+                    except Exception as date_err:
+                        logging.warning(f"⚠️ Erreur parsing date fin vie EPI {epi_id}: {str(date_err)}")
+            
+            if alertes_envoyees > 0 or alertes_fin_vie > 0:
+                logging.info(f"✅ {tenant_nom}: {alertes_envoyees} alerte(s) inspection + {alertes_fin_vie} alerte(s) fin de vie EPI")
                 
-                if alertes_envoyees > 0 or alertes_fin_vie > 0:
-                    logging.info(f"✅ {tenant_nom}: {alertes_envoyees} alerte(s) inspection + {alertes_fin_vie} alerte(s) fin de vie EPI")
-                    
-            except Exception as tenant_err:
-                logging.error(f"❌ Erreur alertes EPI pour {tenant.get('nom', 'Unknown')}: {str(tenant_err)}", exc_info=True)
+
+        await executer_par_tenant("alertes_epi_frequence", tenants, traiter_tenant)
         
         logging.info("✅ Vérification des alertes EPI basées sur fréquence terminée")
         
@@ -1822,222 +1634,219 @@ async def job_verifier_rappels_disponibilites():
         # Récupérer tous les tenants actifs
         tenants = await db.tenants.find({"actif": True}).to_list(None)
         
-        for tenant in tenants:
-            try:
-                tenant_id = tenant.get("id")
-                tenant_nom = tenant.get("nom", "Unknown")
-                
-                # Récupérer les paramètres de disponibilités
-                params = await db.parametres_disponibilites.find_one({"tenant_id": tenant_id})
-                
-                if not params:
-                    logging.info(f"⏭️ Pas de paramètres de disponibilités pour {tenant_nom}")
-                    continue
-                
-                # Vérifier si le blocage et les notifications sont actifs
-                blocage_actif = params.get("blocage_dispos_active", False)
-                notifications_actives = params.get("notifications_dispos_actives", True)
-                
-                if not blocage_actif:
-                    logging.info(f"⏭️ Blocage des disponibilités désactivé pour {tenant_nom}")
-                    continue
-                
-                if not notifications_actives:
-                    logging.info(f"⏭️ Notifications de disponibilités désactivées pour {tenant_nom}")
-                    continue
-                
-                # Récupérer les seuils
-                jour_blocage = params.get("jour_blocage_dispos", 15)
-                jours_avance = params.get("jours_avance_notification", 3)
-                
-                # Calculer la date de blocage (jour X du mois courant pour le mois suivant)
-                date_blocage = date(current_year, current_month, jour_blocage)
-                
-                # Calculer si on est dans la période de rappel (X jours avant le blocage)
-                jours_restants = (date_blocage - today).days
-                
-                if jours_restants > jours_avance or jours_restants < 0:
-                    logging.info(f"⏭️ Pas dans la période de rappel pour {tenant_nom} (jours restants: {jours_restants})")
-                    continue
-                
-                logging.info(f"📧 Période de rappel active pour {tenant_nom} - {jours_restants} jour(s) avant blocage")
-                
-                # Vérifier si un rappel a déjà été envoyé aujourd'hui
-                dernier_rappel = params.get("dernier_rappel_disponibilites")
-                if dernier_rappel:
-                    try:
-                        derniere_date = datetime.fromisoformat(dernier_rappel).date()
-                        if derniere_date == today:
-                            logging.info(f"⏭️ Rappel déjà envoyé aujourd'hui pour {tenant_nom}")
-                            continue
-                    except:
-                        pass
+        async def traiter_tenant(tenant):
+            tenant_id = tenant.get("id")
+            tenant_nom = tenant.get("nom", "Unknown")
+            
+            # Récupérer les paramètres de disponibilités
+            params = await db.parametres_disponibilites.find_one({"tenant_id": tenant_id})
+            
+            if not params:
+                logging.info(f"⏭️ Pas de paramètres de disponibilités pour {tenant_nom}")
+                return
+            
+            # Vérifier si le blocage et les notifications sont actifs
+            blocage_actif = params.get("blocage_dispos_active", False)
+            notifications_actives = params.get("notifications_dispos_actives", True)
+            
+            if not blocage_actif:
+                logging.info(f"⏭️ Blocage des disponibilités désactivé pour {tenant_nom}")
+                return
+            
+            if not notifications_actives:
+                logging.info(f"⏭️ Notifications de disponibilités désactivées pour {tenant_nom}")
+                return
+            
+            # Récupérer les seuils
+            jour_blocage = params.get("jour_blocage_dispos", 15)
+            jours_avance = params.get("jours_avance_notification", 3)
+            
+            # Calculer la date de blocage (jour X du mois courant pour le mois suivant)
+            date_blocage = date(current_year, current_month, jour_blocage)
+            
+            # Calculer si on est dans la période de rappel (X jours avant le blocage)
+            jours_restants = (date_blocage - today).days
+            
+            if jours_restants > jours_avance or jours_restants < 0:
+                logging.info(f"⏭️ Pas dans la période de rappel pour {tenant_nom} (jours restants: {jours_restants})")
+                return
+            
+            logging.info(f"📧 Période de rappel active pour {tenant_nom} - {jours_restants} jour(s) avant blocage")
+            
+            # Vérifier si un rappel a déjà été envoyé aujourd'hui
+            dernier_rappel = params.get("dernier_rappel_disponibilites")
+            if dernier_rappel:
+                try:
+                    derniere_date = datetime.fromisoformat(dernier_rappel).date()
+                    if derniere_date == today:
+                        logging.info(f"⏭️ Rappel déjà envoyé aujourd'hui pour {tenant_nom}")
+                        return
+                except:
+                    pass
+            
+            # Récupérer les employés temps partiel actifs (insensible à la casse pour statut)
+            users_temps_partiel = await db.users.find({
+                "tenant_id": tenant_id,
+                "type_emploi": "temps_partiel",
+                "statut": {"$regex": "^actif$", "$options": "i"}
+            }).to_list(None)
+            
+            if not users_temps_partiel:
+                logging.info(f"⏭️ Aucun employé temps partiel pour {tenant_nom}")
+                return
+            
+            # Période du mois suivant pour vérifier les disponibilités
+            periode_debut = f"{next_month_year}-{str(next_month).zfill(2)}-01"
+            # Dernier jour du mois suivant
+            if next_month == 12:
+                dernier_jour = date(next_month_year + 1, 1, 1) - timedelta(days=1)
+            else:
+                dernier_jour = date(next_month_year, next_month + 1, 1) - timedelta(days=1)
+            periode_fin = dernier_jour.isoformat()
+            
+            # Identifier les employés qui n'ont pas soumis de disponibilités pour le mois suivant
+            users_a_notifier = []
+            
+            for user in users_temps_partiel:
+                user_id = user.get("id")
                 
-                # Récupérer les employés temps partiel actifs (insensible à la casse pour statut)
-                users_temps_partiel = await db.users.find({
+                # Vérifier s'il a des disponibilités pour le mois suivant
+                disponibilites_count = await db.disponibilites.count_documents({
+                    "user_id": user_id,
                     "tenant_id": tenant_id,
-                    "type_emploi": "temps_partiel",
-                    "statut": {"$regex": "^actif$", "$options": "i"}
-                }).to_list(None)
-                
-                if not users_temps_partiel:
-                    logging.info(f"⏭️ Aucun employé temps partiel pour {tenant_nom}")
-                    continue
+                    "date": {
+                        "$gte": periode_debut,
+                        "$lte": periode_fin
+                    }
+                })
                 
-                # Période du mois suivant pour vérifier les disponibilités
-                periode_debut = f"{next_month_year}-{str(next_month).zfill(2)}-01"
-                # Dernier jour du mois suivant
-                if next_month == 12:
-                    dernier_jour = date(next_month_year + 1, 1, 1) - timedelta(days=1)
-                else:
-                    dernier_jour = date(next_month_year, next_month + 1, 1) - timedelta(days=1)
-                periode_fin = dernier_jour.isoformat()
+                if disponibilites_count == 0:
+                    users_a_notifier.append(user)
+            
+            if not users_a_notifier:
+                logging.info(f"✅ Tous les employés de {tenant_nom} ont soumis leurs disponibilités")
+                # Mettre à jour la date du dernier rappel
+                await db.parametres_disponibilites.update_one(
+                    {"tenant_id": tenant_id},
+                    {"$set": {"dernier_rappel_disponibilites": datetime.now(timezone.utc).isoformat()}}
+                )
+                return
+            
+            logging.info(f"📤 {len(users_a_notifier)} employé(s) à notifier pour {tenant_nom}")
+            
+            # Préparer le message de rappel
+            mois_suivant_texte = ["janvier", "février", "mars", "avril", "mai", "juin", 
+                                  "juillet", "août", "septembre", "octobre", "novembre", "décembre"][next_month - 1]
+            
+            titre_notification = "📅 Rappel: Saisissez vos disponibilités"
+            message_notification = f"Vous avez jusqu'au {jour_blocage} {['janvier', 'février', 'mars', 'avril', 'mai', 'juin', 'juillet', 'août', 'septembre', 'octobre', 'novembre', 'décembre'][current_month - 1]} pour saisir vos disponibilités de {mois_suivant_texte}. Il vous reste {jours_restants} jour(s)."
+            
+            # Récupérer la config Resend pour les emails
+            resend_api_key = os.environ.get("RESEND_API_KEY")
+            sender_email = os.environ.get("SENDER_EMAIL", "noreply@profiremanager.ca")
+            app_url = os.environ.get("FRONTEND_URL", os.environ.get("REACT_APP_BACKEND_URL", ""))
+            
+            for user in users_a_notifier:
+                user_id = user.get("id")
+                user_email = user.get("email")
+                user_prenom = user.get("prenom", "")
+                user_nom = user.get("nom", "")
                 
-                # Identifier les employés qui n'ont pas soumis de disponibilités pour le mois suivant
-                users_a_notifier = []
+                # 1. Créer notification in-app
+                await db.notifications.insert_one({
+                    "id": str(uuid.uuid4()),
+                    "tenant_id": tenant_id,
+                    "user_id": user_id,
+                    "type": "rappel_disponibilites",
+                    "titre": titre_notification,
+                    "message": message_notification,
+                    "lu": False,
+                    "urgent": jours_restants <= 1,  # Urgent si dernier jour
+                    "data": {
+                        "lien": "/disponibilites",
+                        "mois_cible": f"{next_month_year}-{str(next_month).zfill(2)}"
+                    },
+                    "created_at": datetime.now(timezone.utc).isoformat()
+                })
                 
-                for user in users_temps_partiel:
-                    user_id = user.get("id")
-                    
-                    # Vérifier s'il a des disponibilités pour le mois suivant
-                    disponibilites_count = await db.disponibilites.count_documents({
-                        "user_id": user_id,
-                        "tenant_id": tenant_id,
-                        "date": {
-                            "$gte": periode_debut,
-                            "$lte": periode_fin
+                # 2. Envoyer notification push
+                try:
+                    await send_push_notification_to_users(
+                        user_ids=[user_id],
+                        title=titre_notification,
+                        body=message_notification,
+                        data={
+                            "type": "rappel_disponibilites",
+                            "lien": "/disponibilites",
+                            "sound": "default" if jours_restants > 1 else "urgent"
                         }
-                    })
-                    
-                    if disponibilites_count == 0:
-                        users_a_notifier.append(user)
-                
-                if not users_a_notifier:
-                    logging.info(f"✅ Tous les employés de {tenant_nom} ont soumis leurs disponibilités")
-                    # Mettre à jour la date du dernier rappel
-                    await db.parametres_disponibilites.update_one(
-                        {"tenant_id": tenant_id},
-                        {"$set": {"dernier_rappel_disponibilites": datetime.now(timezone.utc).isoformat()}}
                     )
-                    continue
-                
-                logging.info(f"📤 {len(users_a_notifier)} employé(s) à notifier pour {tenant_nom}")
-                
-                # Préparer le message de rappel
-                mois_suivant_texte = ["janvier", "février", "mars", "avril", "mai", "juin", 
-                                      "juillet", "août", "septembre", "octobre", "novembre", "décembre"][next_month - 1]
-                
-                titre_notification = "📅 Rappel: Saisissez vos disponibilités"
-                message_notification = f"Vous avez jusqu'au {jour_blocage} {['janvier', 'février', 'mars', 'avril', 'mai', 'juin', 'juillet', 'août', 'septembre', 'octobre', 'novembre', 'décembre'][current_month - 1]} pour saisir vos disponibilités de {mois_suivant_texte}. Il vous reste {jours_restants} jour(s)."
+                except Exception as e:
+                    logging.warning(f"⚠️ Erreur push pour {user_prenom} {user_nom}: {str(e)}")
                 
-                # Récupérer la config Resend pour les emails
-                resend_api_key = os.environ.get("RESEND_API_KEY")
-                sender_email = os.environ.get("SENDER_EMAIL", "noreply@profiremanager.ca")
-                app_url = os.environ.get("FRONTEND_URL", os.environ.get("REACT_APP_BACKEND_URL", ""))
-                
-                for user in users_a_notifier:
-                    user_id = user.get("id")
-                    user_email = user.get("email")
-                    user_prenom = user.get("prenom", "")
-                    user_nom = user.get("nom", "")
-                    
-                    # 1. Créer notification in-app
-                    await db.notifications.insert_one({
-                        "id": str(uuid.uuid4()),
-                        "tenant_id": tenant_id,
-                        "user_id": user_id,
-                        "type": "rappel_disponibilites",
-                        "titre": titre_notification,
-                        "message": message_notification,
-                        "lu": False,
-                        "urgent": jours_restants <= 1,  # Urgent si dernier jour
-                        "data": {
-                            "lien": "/disponibilites",
-                            "mois_cible": f"{next_month_year}-{str(next_month).zfill(2)}"
-                        },
-                        "created_at": datetime.now(timezone.utc).isoformat()
-                    })
-                    
-                    # 2. Envoyer notification push
+                # 3. Envoyer email si configuré
+                if resend_api_key and user_email:
                     try:
-                        await send_push_notification_to_users(
-                            user_ids=[user_id],
-                            title=titre_notification,
-                            body=message_notification,
-                            data={
-                                "type": "rappel_disponibilites",
-                                "lien": "/disponibilites",
-                                "sound": "default" if jours_restants > 1 else "urgent"
-                            }
+                        resend.api_key = resend_api_key
+                        
+                        html_content = build_email(
+                            title="Rappel Disponibilites",
+                            body_html=f"""
+                                <p style="font-size: 15px; color: #374151;">Bonjour {user_prenom},</p>
+                                
+                                {email_alert_card(
+                                    "{'Attention' if jours_restants <= 1 else 'Rappel'}",
+                                    f"Vous n'avez pas encore saisi vos disponibilites pour le mois de {mois_suivant_texte} {next_month_year}.",
+                                    "{'#EF4444' if jours_restants <= 1 else '#F59E0B'}",
+                                    "{'#FEE2E2' if jours_restants <= 1 else '#FEF3C7'}",
+                                    "{'#991B1B' if jours_restants <= 1 else '#92400E'}"
+                                )}
+                                
+                                <p style="font-size: 15px; color: #374151;">
+                                    La date limite de saisie est le <strong>{jour_blocage} {['janvier', 'fevrier', 'mars', 'avril', 'mai', 'juin', 'juillet', 'aout', 'septembre', 'octobre', 'novembre', 'decembre'][current_month - 1]}</strong>.
+                                </p>
+                                <p style="font-size: 15px; color: #374151;">
+                                    Il vous reste <strong>{jours_restants} jour(s)</strong> pour soumettre vos disponibilites.
+                                </p>
+                                
+                                <p style="color: #64748b; margin-top: 24px;">Cordialement,<br><strong>L'equipe {tenant_nom}</strong></p>
+                            """,
+                            accent_color="#1E40AF",
+                            cta_text="Saisir mes disponibilites",
+                            cta_url=f"{app_url}/disponibilites",
+                            footer_text="Ceci est un message automatique. Merci de ne pas y repondre."
                         )
+                        
+                        params = {
+                            "from": f"{tenant_nom} <{sender_email}>",
+                            "to": [user_email],
+                            "subject": f"{'⚠️ URGENT: ' if jours_restants <= 1 else ''}Rappel - Saisissez vos disponibilités pour {mois_suivant_texte}",
+                            "html": html_content
+                        }
+                        
+                        soumettre_email(params, apres_envoi=historiser_apres_envoi(
+                            user_email,
+                            type_email="rappel_disponibilites",
+                            destinataire_nom=f"{user.get('prenom', '')} {user.get('nom', '')}".strip(),
+                            sujet=f"Rappel - Saisissez vos disponibilités pour {mois_suivant_texte}",
+                            tenant_id=tenant_id,
+                            tenant_slug=tenant.get("slug")
+                        ))
+                        logging.info(f"✅ Email de rappel mis en file pour {user_email}")
+                        
                     except Exception as e:
-                        logging.warning(f"⚠️ Erreur push pour {user_prenom} {user_nom}: {str(e)}")
-                    
-                    # 3. Envoyer email si configuré
-                    if resend_api_key and user_email:
-                        try:
-                            resend.api_key = resend_api_key
-                            
-                            html_content = build_email(
-                                title="Rappel Disponibilites",
-                                body_html=f"""
-                                    <p style="font-size: 15px; color: #374151;">Bonjour {user_prenom},</p>
-                                    
-                                    {email_alert_card(
-                                        "{'Attention' if jours_restants <= 1 else 'Rappel'}",
-                                        f"Vous n'avez pas encore saisi vos disponibilites pour le mois de {mois_suivant_texte} {next_month_year}.",
-                                        "{'#EF4444' if jours_restants <= 1 else '#F59E0B'}",
-                                        "{'#FEE2E2' if jours_restants <= 1 else '#FEF3C7'}",
-                                        "{'#991B1B' if jours_restants <= 1 else '#92400E'}"
-                                    )}
-                                    
-                                    <p style="font-size: 15px; color: #374151;">
-                                        La date limite de saisie est le <strong>{jour_blocage} {['janvier', 'fevrier', 'mars', 'avril', 'mai', 'juin', 'juillet', 'aout', 'septembre', 'octobre', 'novembre', 'decembre'][current_month - 1]}</strong>.
-                                    </p>
-                                    <p style="font-size: 15px; color: #374151;">
-                                        Il vous reste <strong>{jours_restants} jour(s)</strong> pour soumettre vos disponibilites.
-                                    </p>
-                                    
-                                    <p style="color: #64748b; margin-top: 24px;">Cordialement,<br><strong>L'equipe {tenant_nom}</strong></p>
-                                """,
-                                accent_color="#1E40AF",
-                                cta_text="Saisir mes disponibilites",
-                                cta_url=f"{app_url}/disponibilites",
-                                footer_text="Ceci est un message automatique. Merci de ne pas y repondre."
-                            )
-                            
-                            params = {
-                                "from": f"{tenant_nom} <{sender_email}>",
-                                "to": [user_email],
-                                "subject": f"{'⚠️ URGENT: ' if jours_restants <= 1 else ''}Rappel - Saisissez vos disponibilités pour {mois_suivant_texte}",
-                                "html": html_content
-                            }
-                            
-                            resend.Emails.send(params)
-                            logging.info(f"✅ Email de rappel envoyé à {user_email}")
-                            # Log email
-                            await log_email_sent(
-                                type_email="rappel_disponibilites",
-                                destinataire_email=user_email,
-                                destinataire_nom=f"{user.get('prenom', '')} {user.get('nom', '')}".strip(),
-                                sujet=f"Rappel - Saisissez vos disponibilités pour {mois_suivant_texte}",
-                                tenant_id=tenant_id,
-                                tenant_slug=tenant.get("slug")
-                            )
-                            
-                        except Exception as e:
-                            logging.warning(f"⚠️ Erreur email pour {user_email}: {str(e)}")
-                
-                # Mettre à jour la date du dernier rappel
-                await db.parametres_disponibilites.update_one(
-                    {"tenant_id": tenant_id},
-                    {"$set": {"dernier_rappel_disponibilites": datetime.now(timezone.utc).isoformat()}}
-                )
-                
-                logging.info(f"✅ Rappels de disponibilités envoyés pour {tenant_nom} ({len(users_a_notifier)} employé(s))")
-                
-            except Exception as e:
-                logging.error(f"❌ Erreur traitement rappels pour {tenant.get('nom', 'Unknown')}: {str(e)}", exc_info=True)
+                        logging.warning(f"⚠️ Erreur email pour {user_email}: {str(e)}")
+            
+            # Mettre à jour la date du dernier rappel
+            await db.parametres_disponibilites.update_one(
+                {"tenant_id": tenant_id},
+                {"$set": {"dernier_rappel_disponibilites": datetime.now(timezone.utc).isoformat()}}
+            )
+            
+            logging.info(f"✅ Rappels de disponibilités envoyés pour {tenant_nom} ({len(users_a_notifier)} employé(s))")
+            
+
+        await executer_par_tenant("check_availability_reminders", tenants, traiter_tenant)
         
         logging.info("✅ Vérification des rappels de disponibilités terminée")
         
@@ -2219,10 +2028,15 @@ async def job_verifier_timeouts_remplacements():
     """
     from routes.remplacements_routes import verifier_et_traiter_timeouts
     
+    from services.job_coordination import get_coordinateur
+    
     while True:
         try:
             await asyncio.sleep(60)  # Attendre 60 secondes
-            await verifier_et_traiter_timeouts()
+            # Un seul worker (le leader) traite les timeouts
+            coordinateur = get_coordinateur()
+            if coordinateur is None or coordinateur.est_leader:
+                await verifier_et_traiter_timeouts()
         except Exception as e:
             logging.error(f"❌ Erreur dans le job de vérification des timeouts: {e}", exc_info=True)
             await asyncio.sleep(60)  # Attendre avant de réessayer même en cas d'erreur
@@ -2231,63 +2045,55 @@ async def job_verifier_timeouts_remplacements():
 async def job_archivage_automatique_remplacements():
     """
     Job quotidien qui archive/supprime les anciennes demandes de remplacement
-    S'exécute une fois par jour (toutes les 24h)
+    S'exécute tous les jours à 3h00.
     """
     from datetime import datetime, timezone, timedelta
     
-    # Attendre 5 minutes au démarrage pour laisser l'app se stabiliser
-    await asyncio.sleep(300)
-    
-    while True:
-        try:
-            logging.info("🗑️ Début du job d'archivage automatique des remplacements...")
+    try:
+        logging.info("🗑️ Début du job d'archivage automatique des remplacements...")
+        
+        # Récupérer tous les tenants
+        tenants = await db.tenants.find({}, {"_id": 0}).to_list(100)
+        total_supprimees = 0
+        
+        for tenant in tenants:
+            tenant_id = tenant.get("id")
+            if not tenant_id:
+                continue
             
-            # Récupérer tous les tenants
-            tenants = await db.tenants.find({}, {"_id": 0}).to_list(100)
-            total_supprimees = 0
+            # Récupérer les paramètres de remplacement du tenant
+            parametres = await db.parametres_remplacements.find_one({"tenant_id": tenant_id})
             
-            for tenant in tenants:
-                tenant_id = tenant.get("id")
-                if not tenant_id:
-                    continue
-                
-                # Récupérer les paramètres de remplacement du tenant
-                parametres = await db.parametres_remplacements.find_one({"tenant_id": tenant_id})
-                
-                if not parametres:
-                    continue
-                
-                archivage_actif = parametres.get("archivage_auto_actif", True)
-                delai_jours = parametres.get("delai_archivage_jours", 365)
-                
-                if not archivage_actif or delai_jours <= 0:
-                    continue
-                
-                # Calculer la date limite
-                date_limite = datetime.now(timezone.utc) - timedelta(days=delai_jours)
-                
-                # Supprimer les demandes terminées plus anciennes que le délai
-                result = await db.demandes_remplacement.delete_many({
-                    "tenant_id": tenant_id,
-                    "statut": {"$in": ["accepte", "expiree", "annulee", "refusee", "approuve_manuellement"]},
-                    "created_at": {"$lt": date_limite.isoformat()}
-                })
-                
-                if result.deleted_count > 0:
-                    logging.info(f"🗑️ Tenant {tenant.get('nom', tenant_id)}: {result.deleted_count} demande(s) archivée(s)")
-                    total_supprimees += result.deleted_count
+            if not parametres:
+                continue
             
-            if total_supprimees > 0:
-                logging.info(f"✅ Archivage automatique terminé: {total_supprimees} demande(s) supprimée(s)")
-            else:
-                logging.info("✅ Archivage automatique terminé: aucune demande à supprimer")
+            archivage_actif = parametres.get("archivage_auto_actif", True)
+            delai_jours = parametres.get("delai_archivage_jours", 365)
+            
+            if not archivage_actif or delai_jours <= 0:
+                continue
             
-            # Attendre 24 heures avant la prochaine exécution
-            await asyncio.sleep(86400)
+            # Calculer la date limite
+            date_limite = datetime.now(timezone.utc) - timedelta(days=delai_jours)
             
-        except Exception as e:
-            logging.error(f"❌ Erreur dans le job d'archivage automatique: {e}", exc_info=True)
-            await asyncio.sleep(3600)  # Attendre 1h avant de réessayer en cas d'erreur
+            # Supprimer les demandes terminées plus anciennes que le délai
+            result = await db.demandes_remplacement.delete_many({
+                "tenant_id": tenant_id,
+                "statut": {"$in": ["accepte", "expiree", "annulee", "refusee", "approuve_manuellement"]},
+                "created_at": {"$lt": date_limite.isoformat()}
+            })
+            
+            if result.deleted_count > 0:
+                logging.info(f"🗑️ Tenant {tenant.get('nom', tenant_id)}: {result.deleted_count} demande(s) archivée(s)")
+                total_supprimees += result.deleted_count
+        
+        if total_supprimees > 0:
+            logging.info(f"✅ Archivage automatique terminé: {total_supprimees} demande(s) supprimée(s)")
+        else:
+            logging.info("✅ Archivage automatique terminé: aucune demande à supprimer")
+        
+    except Exception as e:
+        logging.error(f"❌ Erreur dans le job d'archivage automatique: {e}", exc_info=True)
 
 # JWT and Password configuration
 SECRET_KEY = os.environ.get("JWT_SECRET", "your-secret-key-here")
@@ -2630,8 +2436,8 @@ def send_welcome_email(user_email: str, user_name: str, user_role: str, temp_pas
                 "html": html_content
             }
             
-            response = resend.Emails.send(params)
-            print(f"✅ Email de bienvenue envoyé avec succès à {user_email} via Resend (ID: {response.get('id', 'N/A')})")
+            soumettre_email(params)
+            print(f"📧 Email de bienvenue mis en file pour {user_email}")
             return True
         except Exception as resend_error:
             print(f"⚠️ Erreur Resend pour {user_email}: {str(resend_error)}")
@@ -2708,8 +2514,8 @@ def send_temporary_password_email(user_email: str, user_name: str, temp_password
                 "html": html_content
             }
             
-            response = resend.Emails.send(params)
-            print(f"✅ Email de réinitialisation envoyé avec succès à {user_email} via Resend (ID: {response.get('id', 'N/A')})")
+            soumettre_email(params)
+            print(f"📧 Email de réinitialisation mis en file pour {user_email}")
             return True
         except Exception as resend_error:
             print(f"⚠️ Erreur Resend pour {user_email}: {str(resend_error)}")
@@ -2776,8 +2582,8 @@ def send_password_reset_email(user_email: str, user_name: str, reset_token: str,
                 "html": html_content
             }
             
-            response = resend.Emails.send(params)
-            print(f"✅ Email de réinitialisation de mot de passe envoyé avec succès à {user_email} via Resend (ID: {response.get('id', 'N/A')})")
+            soumettre_email(params)
+            print(f"📧 Email de réinitialisation de mot de passe mis en file pour {user_email}")
             return True
         except Exception as resend_error:
             print(f"⚠️ Erreur Resend pour {user_email}: {str(resend_error)}")
@@ -2856,8 +2662,8 @@ def send_super_admin_welcome_email(user_email: str, user_name: str, temp_passwor
                 "html": html_content
             }
             
-            response = resend.Emails.send(params)
-            print(f"✅ Email de bienvenue super admin envoyé avec succès à {user_email} via Resend (ID: {response.get('id', 'N/A')})")
+            soumettre_email(params)
+            print(f"📧 Email de bienvenue super admin mis en file pour {user_email}")
             return True
         except Exception as resend_error:
             print(f"⚠️ Erreur Resend pour {user_email}: {str(resend_error)}")
@@ -3062,8 +2868,8 @@ def send_gardes_notification_email(user_email: str, user_name: str, gardes_list:
             "html": html_content
         }
         
-        response = resend.Emails.send(params)
-        print(f"✅ Email de planning envoyé avec succès à {user_email} via Resend (ID: {response.get('id', 'N/A')})")
+        soumettre_email(params)
+        print(f"📧 Email de planning mis en file pour {user_email}")
         
         return True
             
@@ -3073,61 +2879,16 @@ def send_gardes_notification_email(user_email: str, user_name: str, gardes_list:
 
 # ==================== HELPERS PDF PERSONNALISÉS ====================
 
-def create_pdf_header_elements(tenant, styles):
+def create_pdf_header_elements(tenant, styles, logo_data: bytes = None):
     """
     Crée les éléments de header personnalisés pour les PDFs
     Retourne une liste d'éléments à ajouter au document
-    """
-    elements = []
     
-    # Logo (Azure ou legacy base64)
-    try:
-        from services.azure_storage import get_logo_bytes
-        logo_data = get_logo_bytes(tenant)
-        if logo_data:
-            logo_buffer = IOBytesIO(logo_data)
-            
-            from PIL import Image as PILImage
-            pil_image = PILImage.open(logo_buffer)
-            img_width, img_height = pil_image.size
-            
-            max_width = 1.2 * inch
-            max_height = 1.0 * inch
-            
-            aspect_ratio = img_height / img_width
-            
-            target_width = max_width
-            target_height = target_width * aspect_ratio
-            
-            if target_height > max_height:
-                target_height = max_height
-                target_width = target_height / aspect_ratio
-            
-            logo_buffer.seek(0)
-            
-            logo = Image(logo_buffer, width=target_width, height=target_height)
-            logo.hAlign = 'LEFT'
-            elements.append(logo)
-            elements.append(Spacer(1, 0.1 * inch))
-    except Exception as e:
-        print(f"Erreur chargement logo PDF: {e}")
-    
-    # Nom du service
-    nom_service = tenant.nom_service if hasattr(tenant, 'nom_service') and tenant.nom_service else tenant.nom
-    
-    header_style = ParagraphStyle(
-        'ServiceHeader',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=colors.HexColor('#1f2937'),
-        spaceAfter=10,
-        alignment=TA_CENTER
-    )
-    
-    elements.append(Paragraph(nom_service, header_style))
-    elements.append(Spacer(1, 0.2 * inch))
-    
-    return elements
+    Le logo Azure est lu par le handler (await get_logo_bytes_async(tenant))
+    et passé dans logo_data : pas de lecture bloquante ici.
+    """
+    from utils.pdf_helpers import create_pdf_header_elements as creer_header
+    return creer_header(tenant, styles, logo_data)
 
 def create_pdf_footer_text(tenant):
     """
@@ -3169,13 +2930,14 @@ class BrandedDocTemplate(SimpleDocTemplate):
 
 
 
-def create_branded_pdf(tenant, pagesize=A4, **kwargs):
+def create_branded_pdf(tenant, pagesize=A4, logo_data: bytes = None, **kwargs):
     """
     Fonction helper pour créer un PDF brandé avec logo et footer
     
     Args:
         tenant: L'objet tenant
         pagesize: Taille de la page (A4, letter, etc.)
+        logo_data: bytes du logo (get_logo_bytes_async), legacy base64 à défaut
         **kwargs: Arguments additionnels pour SimpleDocTemplate
         
     Returns:
@@ -3200,7 +2962,7 @@ def create_branded_pdf(tenant, pagesize=A4, **kwargs):
     styles = getSampleStyleSheet()
     
     # Créer les éléments de base avec logo et header
-    elements = create_pdf_header_elements(tenant, styles)
+    elements = create_pdf_header_elements(tenant, styles, logo_data)
     
     # Ajouter le footer à la fin du document
     footer_text = create_pdf_footer_text(tenant)
@@ -3389,8 +3151,8 @@ def send_debogage_notification_email(super_admins_emails: List[str], type_notifi
                     "html": html_content
                 }
                 
-                response = resend.Emails.send(params)
-                print(f"[INFO] Email de notification envoyé à {admin_email} via Resend (ID: {response.get('id', 'N/A')})")
+                soumettre_email(params)
+                print(f"[INFO] Email de notification mis en file pour {admin_email}")
             except Exception as e:
                 print(f"[ERROR] Erreur lors de l'envoi de l'email à {admin_email}: {e}")
                 
@@ -4155,7 +3917,7 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     
     # Si c'est un super-admin, créer un User virtuel avec droits admin
     if is_super_admin:
-        super_admin_data = await db.super_admins.find_one({"id": user_id})
+        super_admin_data = await charger_super_admin(user_id)
         if super_admin_data is None:
             raise HTTPException(status_code=401, detail="Super-admin non trouvé")
         
@@ -4179,8 +3941,8 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         }
         return User(**virtual_user)
     
-    # Sinon, chercher l'utilisateur normal
-    user = await db.users.find_one({"id": user_id})
+    # Sinon, chercher l'utilisateur normal (cache court, invalidé à chaque modification)
+    user = await charger_utilisateur(user_id)
     if user is None:
         raise HTTPException(status_code=401, detail="Utilisateur non trouvé")
     
@@ -4219,7 +3981,7 @@ async def get_current_user_optional(credentials: HTTPAuthorizationCredentials =
     
     # Si c'est un super-admin, créer un User virtuel
     if is_super_admin:
-        super_admin_data = await db.super_admins.find_one({"id": user_id})
+        super_admin_data = await charger_super_admin(user_id)
         if super_admin_data is None:
             return None
         
@@ -4242,7 +4004,7 @@ async def get_current_user_optional(credentials: HTTPAuthorizationCredentials =
         }
         return User(**virtual_user)
     
-    user = await db.users.find_one({"id": user_id})
+    user = await charger_utilisateur(user_id)
     if user is None:
         return None
     
@@ -4694,7 +4456,7 @@ from reportlab.lib.pagesizes import letter, A4
 from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, PageBreak
 from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
@@ -5836,52 +5598,9 @@ class EquipementUpdate(BaseModel):
 
 # ==================== MULTI-TENANT DEPENDENCIES ====================
 
-# Cache simple pour les tenants (60 secondes)
-_tenant_cache = {}
-_tenant_cache_time = {}
-
 async def get_tenant_from_slug(slug: str) -> Tenant:
-    """Récupère le tenant depuis son slug avec cache"""
-    # Vérifier le cache (60 secondes)
-    cache_key = f"tenant_{slug}"
-    now = time.time()
-    if cache_key in _tenant_cache and (now - _tenant_cache_time.get(cache_key, 0)) < 60:
-        logging.warning(f"🗄️ Cache hit pour tenant {slug}: {_tenant_cache[cache_key].id}")
-        return _tenant_cache[cache_key]
-    
-    logging.warning(f"🔍 Cache miss pour tenant {slug}, requête DB...")
-    
-    # Requête simplifiée avec index
-    tenant_data = await db.tenants.find_one({"slug": slug}, {"_id": 0})
-    logging.warning(f"🔍 Résultat DB pour slug={slug}: id={tenant_data.get('id') if tenant_data else 'None'}, nom={tenant_data.get('nom') if tenant_data else 'None'}")
-    
-    # Fallback pour ancienne structure
-    if not tenant_data:
-        tenant_data = await db.tenants.find_one({"slug": slug, "actif": True}, {"_id": 0})
-    
-    if not tenant_data:
-        tenant_data = await db.tenants.find_one({"slug": slug, "is_active": True}, {"_id": 0})
-    
-    # Si toujours pas trouvé
-    if not tenant_data:
-        tenant_data = await db.tenants.find_one({"slug": slug}, {"_id": 0})
-        if tenant_data:
-            # Vérifier manuellement le statut
-            is_active = tenant_data.get('actif', tenant_data.get('is_active', True))
-            if not is_active:
-                raise HTTPException(status_code=403, detail=f"Caserne '{slug}' inactive")
-    
-    if not tenant_data:
-        raise HTTPException(status_code=404, detail=f"Caserne '{slug}' non trouvée")
-    
-    logging.info(f"🔍 Tenant data for {slug}: {tenant_data}")
-    tenant = Tenant(**tenant_data)
-    
-    # Mettre en cache
-    _tenant_cache[cache_key] = tenant
-    _tenant_cache_time[cache_key] = now
-    
-    return tenant
+    """Récupère le tenant depuis son slug (cache partagé avec routes/dependencies.py)"""
+    return await resoudre_tenant(slug, Tenant)
 
 async def get_current_tenant(tenant_slug: str) -> Tenant:
     """Dépendance FastAPI pour obtenir le tenant actuel"""
@@ -6125,7 +5844,7 @@ async def detect_conflicts(tenant_id: str, user_id: str, date: str, heure_debut:
 # - GET    /{tenant_slug}/equipes-garde/equipe-du-jour - Équipe de garde pour une date
 # - GET    /{tenant_slug}/equipes-garde/calendrier     - Calendrier des rotations
 # - GET    /{tenant_slug}/equipes-garde/employes       - Employés par équipe
-# Fonctions helper: get_equipe_garde_du_jour_sync, get_equipe_garde_rotation_standard
+# Fonctions helper (services/equipes_garde_rotation.py): get_equipe_garde_du_jour_sync, get_equipe_garde_rotation_standard
 # ============================================================================
 
 
@@ -6656,6 +6375,26 @@ class CustomCORSMiddleware(BaseHTTPMiddleware):
 app.add_middleware(CustomCORSMiddleware)
 
 
+# Mémo des permissions RBAC par requête (voir CACHE PERMISSIONS dans routes/dependencies.py)
+from routes.dependencies import demarrer_memo_permissions, terminer_memo_permissions
+
+class PermissionsMemoMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        jeton = demarrer_memo_permissions()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            terminer_memo_permissions(jeton)
+
+app.add_middleware(PermissionsMemoMiddleware)
+
+
 # Exception handler pour garantir les headers CORS sur les erreurs 500
 from starlette.requests import Request
 from starlette.responses import JSONResponse
@@ -6716,6 +6455,11 @@ async def shutdown_db_client():
             logger.info("✅ Connexions SFTP fermées")
     except Exception as e:
         logger.error(f"Erreur fermeture SFTP: {e}")
+    try:
+        from services.sftp_sources import arreter_sftp_pool
+        arreter_sftp_pool()
+    except Exception as e:
+        logger.error(f"Erreur arrêt pool SFTP: {e}")
     
     # Arrêter tous les pollings CAUCA actifs
     try:
@@ -6727,6 +6471,59 @@ async def shutdown_db_client():
     except Exception as e:
         logger.error(f"Erreur arrêt CAUCA: {e}")
     
+    # Envoyer les notifications encore en file
+    try:
+        from services.notification_dispatcher import get_notification_dispatcher
+        await get_notification_dispatcher().arreter()
+        logger.info("✅ File de notifications vidée")
+    except Exception as e:
+        logger.error(f"Erreur arrêt notifications: {e}")
+    
+    # Rendre les baux (leader, pollings) aux autres workers
+    try:
+        from services.job_coordination import get_coordinateur
+        coordinateur = get_coordinateur()
+        if coordinateur:
+            await coordinateur.arreter()
+            logger.info("✅ Coordinateur de tâches arrêté")
+    except Exception as e:
+        logger.error(f"Erreur arrêt coordinateur: {e}")
+    
+    # Arrêter les pools de processus (exports, paie, solveur d'attribution)
+    try:
+        from services.process_pools import arreter_process_pools
+        arreter_process_pools()
+    except Exception as e:
+        logger.error(f"Erreur arrêt pools de processus: {e}")
+    
+    # Fermer le client HTTP partagé du géocodage
+    try:
+        from services.geocoding import get_geocodeur
+        await get_geocodeur().fermer()
+    except Exception as e:
+        logger.error(f"Erreur fermeture géocodeur: {e}")
+    
+    # Fermer le client du stockage d'objets (pool de connexions Azure aio)
+    try:
+        from services.object_storage import fermer_stockage
+        await fermer_stockage()
+    except Exception as e:
+        logger.error(f"Erreur fermeture stockage: {e}")
+    
+    # Fermer les WebSockets et le transport temps réel
+    try:
+        from services.websocket_manager import get_websocket_manager
+        await get_websocket_manager().arreter()
+    except Exception as e:
+        logger.error(f"Erreur arrêt hub WebSocket: {e}")
+    
+    # Arrêter le bus d'invalidation des caches
+    try:
+        from services.cache_invalidation import get_bus_invalidation
+        await get_bus_invalidation().arreter()
+    except Exception as e:
+        logger.error(f"Erreur arrêt bus d'invalidation: {e}")
+    
     # Fermer la connexion MongoDB
     client.close()
     logger.info("✅ Connexion MongoDB fermée")
\ No newline at end of file
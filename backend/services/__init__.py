@@ -1,59 +1,45 @@
 """
 Services ProFireManager
 Modules utilitaires partagés entre les routes
-"""
-
-from .auth import (
-    create_access_token,
-    verify_password,
-    hash_password,
-    decode_token,
-    SECRET_KEY,
-    ALGORITHM,
-    ACCESS_TOKEN_EXPIRE_MINUTES,
-    SUPER_ADMIN_TOKEN_EXPIRE_MINUTES,
-    security,
-    security_optional
-)
 
-from .database import (
-    client,
-    db,
-    is_temps_partiel,
-    is_temps_plein
-)
+Les ré-exportations ci-dessous sont chargées à la demande : importer un
+module de calcul pur (services.attribution_solver, exécuté dans des
+processus spawn) ne doit pas charger FastAPI ni Motor.
+"""
 
-from .helpers import (
-    get_password_hash,
-    clean_mongo_doc,
-    validate_complex_password,
-    normalize_string_for_matching,
-    create_user_matching_index,
-    calculate_name_similarity
-)
+import importlib
 
-__all__ = [
+_REEXPORTS = {
     # Auth
-    'create_access_token',
-    'verify_password', 
-    'hash_password',
-    'decode_token',
-    'SECRET_KEY',
-    'ALGORITHM',
-    'ACCESS_TOKEN_EXPIRE_MINUTES',
-    'SUPER_ADMIN_TOKEN_EXPIRE_MINUTES',
-    'security',
-    'security_optional',
+    'create_access_token': '.auth',
+    'verify_password': '.auth',
+    'hash_password': '.auth',
+    'decode_token': '.auth',
+    'SECRET_KEY': '.auth',
+    'ALGORITHM': '.auth',
+    'ACCESS_TOKEN_EXPIRE_MINUTES': '.auth',
+    'SUPER_ADMIN_TOKEN_EXPIRE_MINUTES': '.auth',
+    'security': '.auth',
+    'security_optional': '.auth',
     # Database
-    'client',
-    'db',
-    'is_temps_partiel',
-    'is_temps_plein',
+    'client': '.database',
+    'db': '.database',
+    'is_temps_partiel': '.database',
+    'is_temps_plein': '.database',
     # Helpers
-    'get_password_hash',
-    'clean_mongo_doc',
-    'validate_complex_password',
-    'normalize_string_for_matching',
-    'create_user_matching_index',
-    'calculate_name_similarity'
-]
+    'get_password_hash': '.helpers',
+    'clean_mongo_doc': '.helpers',
+    'validate_complex_password': '.helpers',
+    'normalize_string_for_matching': '.helpers',
+    'create_user_matching_index': '.helpers',
+    'calculate_name_similarity': '.helpers'
+}
+
+__all__ = list(_REEXPORTS)
+
+
+def __getattr__(name):
+    module = _REEXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(module, __name__), name)
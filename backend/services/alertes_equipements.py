@@ -0,0 +1,234 @@
+"""
+Sélection des alertes d'équipements (job quotidien de 8h00)
+===========================================================
+
+Les alertes sont calculées par MongoDB plutôt qu'en chargeant tous les
+équipements du tenant :
+
+- maintenance, fin de vie, réparation et expiration (champs personnalisés
+  dont le nom contient "expir") : une seule agrégation $facet de comptage
+- inspections dues : seuls les équipements des catégories ayant une
+  fréquence d'inspection sont lus, et la dernière inspection de chacun vient
+  de deux agrégations ($sort + $group) au lieu de deux find_one par
+  équipement
+
+Usage:
+    alertes_count, alertes_par_categorie = await selectionner_alertes_equipements(
+        db, tenant_id, parametres, today
+    )
+"""
+
+import re
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+ETATS_REPARATION = ["a_reparer", "en_reparation"]
+
+
+def parse_frequence_inspection_to_days(frequence: str) -> int:
+    """
+    Convertit une fréquence d'inspection en nombre de jours
+    Ex: "1 an" -> 365, "6 mois" -> 180, "5 ans" -> 1825
+    """
+    if not frequence:
+        return 365  # Par défaut: 1 an
+    
+    frequence = frequence.lower().strip()
+    
+    # Extraire le nombre
+    match = re.search(r'(\d+)', frequence)
+    if not match:
+        return 365
+    
+    nombre = int(match.group(1))
+    
+    # Déterminer l'unité
+    if 'an' in frequence or 'year' in frequence:
+        return nombre * 365
+    elif 'mois' in frequence or 'month' in frequence:
+        return nombre * 30
+    elif 'semaine' in frequence or 'week' in frequence:
+        return nombre * 7
+    elif 'jour' in frequence or 'day' in frequence:
+        return nombre
+    else:
+        return nombre * 365  # Par défaut en années
+
+
+def _filtre_expirations(limite: datetime) -> Dict[str, Any]:
+    """Champs personnalisés "expir*" dont la date est antérieure à `limite`"""
+    return {"$filter": {
+        "input": {"$objectToArray": "$champs_personnalises"},
+        "as": "champ",
+        "cond": {"$let": {
+            "vars": {"date": {"$dateFromString": {
+                "dateString": {"$convert": {"input": "$$champ.v", "to": "string", "onError": None, "onNull": None}},
+                "onError": None,
+                "onNull": None
+            }}},
+            "in": {"$and": [
+                {"$regexMatch": {"input": "$$champ.k", "regex": "expir", "options": "i"}},
+                {"$ne": ["$$date", None]},
+                {"$lt": ["$$date", limite]}
+            ]}
+        }}
+    }}
+
+
+def pipeline_compteurs_alertes(tenant_id: str, today: date, jours_maintenance: int,
+                               jours_expiration: int, jours_fin_vie: int) -> List[Dict[str, Any]]:
+    """Un comptage par type d'alerte, en une seule passe sur les équipements du tenant"""
+    date_limite_maintenance = (today + timedelta(days=jours_maintenance)).isoformat()
+    date_limite_fin_vie = (today + timedelta(days=jours_fin_vie)).isoformat()
+    # Expiration le jour limite inclus
+    limite_expiration = datetime.combine(today + timedelta(days=jours_expiration + 1), dt_time(), tzinfo=timezone.utc)
+
+    return [
+        {"$match": {"tenant_id": tenant_id}},
+        {"$facet": {
+            "maintenance": [
+                {"$match": {"date_prochaine_maintenance": {"$lte": date_limite_maintenance, "$ne": ""}}},
+                {"$count": "n"}
+            ],
+            "fin_vie": [
+                {"$match": {"date_fin_vie": {"$lte": date_limite_fin_vie, "$ne": ""}}},
+                {"$count": "n"}
+            ],
+            "reparation": [
+                {"$match": {"etat": {"$in": ETATS_REPARATION}}},
+                {"$count": "n"}
+            ],
+            "expiration": [
+                {"$match": {"champs_personnalises": {"$type": "object"}}},
+                {"$match": {"$expr": {"$gt": [{"$size": _filtre_expirations(limite_expiration)}, 0]}}},
+                {"$count": "n"}
+            ]
+        }}
+    ]
+
+
+def pipeline_dernieres_inspections(tenant_id: str, champ_equipement: str, equipement_ids: List[str],
+                                   filtre: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+    """Dernière inspection (date_inspection décroissante) de chaque équipement"""
+    return [
+        {"$match": {"tenant_id": tenant_id, champ_equipement: {"$in": equipement_ids}, **(filtre or {})}},
+        {"$sort": {"date_inspection": -1}},
+        {"$group": {
+            "_id": f"${champ_equipement}",
+            "date_inspection": {"$first": "$date_inspection"},
+            "created_at": {"$first": "$created_at"}
+        }}
+    ]
+
+
+def _jours_depuis(valeur, maintenant: datetime):
+    """Jours écoulés depuis une date ISO (str) ou datetime, None si illisible"""
+    try:
+        if isinstance(valeur, str):
+            valeur = datetime.fromisoformat(valeur.replace("Z", "+00:00"))
+        if isinstance(valeur, datetime):
+            return (maintenant - valeur).days
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+async def _dernieres_inspections(db, tenant_id: str, equipement_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Inspections unifiées d'abord, anciennes inspections_equipements pour les équipements restants"""
+    dernieres = {}
+    if not equipement_ids:
+        return dernieres
+    async for doc in db.inspections_unifiees.aggregate(
+        pipeline_dernieres_inspections(tenant_id, "asset_id", equipement_ids, {"asset_type": "equipement"}),
+        allowDiskUse=True
+    ):
+        dernieres[doc["_id"]] = doc
+
+    restants = [eq_id for eq_id in equipement_ids if eq_id not in dernieres]
+    if restants:
+        async for doc in db.inspections_equipements.aggregate(
+            pipeline_dernieres_inspections(tenant_id, "equipement_id", restants),
+            allowDiskUse=True
+        ):
+            dernieres[doc["_id"]] = doc
+    return dernieres
+
+
+async def inspections_dues_par_categorie(db, tenant_id: str, maintenant: datetime) -> Tuple[int, Dict[str, Dict]]:
+    """Équipements dont l'inspection est due selon la fréquence de leur catégorie"""
+    categories = await db.categories_equipements.find(
+        {"tenant_id": tenant_id},
+        {"_id": 0}
+    ).to_list(1000)
+    categories_map = {cat.get("id"): cat for cat in categories if cat.get("frequence_inspection")}
+    if not categories_map:
+        return 0, {}
+
+    equipements = await db.equipements.find(
+        {"tenant_id": tenant_id, "categorie_id": {"$in": list(categories_map)}},
+        {"_id": 0, "id": 1, "nom": 1, "numero_serie": 1, "categorie_id": 1, "created_at": 1, "date_ajout": 1}
+    ).to_list(None)
+    dernieres = await _dernieres_inspections(db, tenant_id, [eq["id"] for eq in equipements if eq.get("id")])
+
+    total = 0
+    alertes_par_categorie: Dict[str, Dict] = {}
+    for eq in equipements:
+        categorie_id = eq["categorie_id"]
+        categorie = categories_map[categorie_id]
+        frequence = categorie["frequence_inspection"]
+        jours_frequence = parse_frequence_inspection_to_days(frequence)
+
+        derniere_inspection = dernieres.get(eq.get("id"))
+        if derniere_inspection:
+            jours_depuis_derniere = _jours_depuis(
+                derniere_inspection.get("date_inspection") or derniere_inspection.get("created_at"), maintenant
+            )
+        else:
+            # Aucune inspection jamais faite - date de création de l'équipement
+            jours_depuis_derniere = _jours_depuis(eq.get("created_at") or eq.get("date_ajout"), maintenant)
+
+        if jours_depuis_derniere is None or jours_depuis_derniere < jours_frequence:
+            continue
+
+        total += 1
+        if categorie_id not in alertes_par_categorie:
+            alertes_par_categorie[categorie_id] = {
+                "nom": categorie.get("nom", "Catégorie inconnue"),
+                "icone": categorie.get("icone", "📦"),
+                "frequence": frequence,
+                "count": 0,
+                # Support pour plusieurs personnes ressources
+                "personnes_ressources": categorie.get("personnes_ressources", []),
+                # Anciens champs pour compatibilité
+                "personne_ressource_email": categorie.get("personne_ressource_email", ""),
+                "personne_ressource_id": categorie.get("personne_ressource_id", ""),
+                "equipements": []
+            }
+        alertes_par_categorie[categorie_id]["count"] += 1
+        alertes_par_categorie[categorie_id]["equipements"].append({
+            "nom": eq.get("nom", eq.get("numero_serie", "Équipement")),
+            "jours_retard": jours_depuis_derniere
+        })
+
+    return total, alertes_par_categorie
+
+
+async def selectionner_alertes_equipements(db, tenant_id: str, parametres: Dict[str, Any],
+                                           today: date) -> Tuple[Dict[str, int], Dict[str, Dict]]:
+    """Compteurs d'alertes du tenant et inspections dues groupées par catégorie"""
+    facettes = await db.equipements.aggregate(pipeline_compteurs_alertes(
+        tenant_id, today,
+        parametres.get("jours_alerte_maintenance", 30),
+        parametres.get("jours_alerte_expiration", 30),
+        parametres.get("jours_alerte_fin_vie", 90)
+    )).to_list(1)
+    facettes = facettes[0] if facettes else {}
+
+    alertes_count = {
+        type_alerte: (facettes.get(type_alerte) or [{"n": 0}])[0]["n"]
+        for type_alerte in ("maintenance", "expiration", "fin_vie", "reparation")
+    }
+    alertes_count["inspections_dues"], alertes_par_categorie = await inspections_dues_par_categorie(
+        db, tenant_id, datetime.now(timezone.utc)
+    )
+    return alertes_count, alertes_par_categorie
@@ -3,23 +3,43 @@ Service Azure Blob Storage — Stockage hybride pour ProFireManager
 =================================================================
 Remplace l'ancien Emergent Object Storage.
 - Upload de fichiers (photos, PDFs) vers Azure Blob Storage
-- Génération de SAS URLs temporaires (15 min) pour accès sécurisé
+- Génération de SAS URLs temporaires pour accès sécurisé, en cache par
+  fenêtre d'expiration (une signature par blob et par fenêtre)
 - Suppression de blobs
 - Rétrocompatibilité avec les anciennes fonctions (put_object, get_object)
+- Versions asynchrones (put_object_async, get_object_async, ...) pour les
+  routes async, déléguées à services/object_storage (client aio ou backend
+  filesystem selon STORAGE_BACKEND)
 """
+import hashlib
+import hmac
 import os
+import threading
+import time
 import uuid
 import logging
+from collections import OrderedDict
 from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote
 
 from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions, ContentSettings
 
+from services.object_storage import STORAGE_BACKEND, Donnees, get_stockage
+
 logger = logging.getLogger(__name__)
 
 ACCOUNT_NAME = os.environ.get("AZURE_STORAGE_ACCOUNT_NAME")
 ACCOUNT_KEY = os.environ.get("AZURE_STORAGE_ACCOUNT_KEY")
 CONTAINER_NAME = os.environ.get("AZURE_STORAGE_CONTAINER_NAME")
 SAS_EXPIRY_MINUTES = 240  # 4 heures au lieu de 15 minutes pour éviter les erreurs 403 fréquentes
+# Fenêtre de réutilisation des SAS URLs: une URL servie reste valide au moins
+# SAS_EXPIRY_MINUTES - SAS_CACHE_WINDOW_MINUTES (renouvellement anticipé)
+SAS_CACHE_WINDOW_MINUTES = int(os.environ.get("SAS_CACHE_WINDOW_MINUTES", "60"))
+SAS_CACHE_MAX_ENTRIES = int(os.environ.get("SAS_CACHE_MAX_ENTRIES", "20000"))
+# Mode filesystem: URLs signées servies par /api/storage/local (équivalent local des SAS)
+LOCAL_URL_BASE = os.environ.get("REACT_APP_BACKEND_URL", "").rstrip("/")
+LOCAL_URL_SECRET = os.environ.get("LOCAL_URL_SECRET") or os.environ.get("JWT_SECRET", "your-secret-key-here")
 
 APP_NAME = "profiremanager"
 
@@ -69,6 +89,9 @@ def put_object(path: str, data: bytes, content_type: str) -> dict:
     Returns:
         {"path": "...", "size": 123, "url": "https://..."}
     """
+    if STORAGE_BACKEND == "filesystem":
+        return {"path": path, "size": get_stockage().ecrire(path, data, content_type), "url": generate_sas_url(path)}
+
     client = _get_client()
     container = client.get_container_client(CONTAINER_NAME)
     blob_client = container.get_blob_client(path)
@@ -95,14 +118,17 @@ def get_object(path: str) -> tuple:
     Returns:
         (content_bytes, content_type)
     """
+    if STORAGE_BACKEND == "filesystem":
+        return get_stockage().lire_sync(path)
+
     client = _get_client()
     container = client.get_container_client(CONTAINER_NAME)
     blob_client = container.get_blob_client(path)
 
     download = blob_client.download_blob()
     data = download.readall()
-    props = blob_client.get_blob_properties()
-    ct = props.content_settings.content_type or "application/octet-stream"
+    # Content type de la réponse de download (pas de get_blob_properties)
+    ct = download.properties.content_settings.content_type or "application/octet-stream"
 
     return data, ct
 
@@ -110,6 +136,8 @@ def get_object(path: str) -> tuple:
 def delete_object(path: str) -> bool:
     """Supprime un blob. Retourne True si supprimé, False si introuvable."""
     try:
+        if STORAGE_BACKEND == "filesystem":
+            return get_stockage().supprimer_sync(path)
         client = _get_client()
         container = client.get_container_client(CONTAINER_NAME)
         blob_client = container.get_blob_client(path)
@@ -121,20 +149,19 @@ def delete_object(path: str) -> bool:
         return False
 
 
-def generate_sas_url(blob_name: str, expiry_minutes: int = SAS_EXPIRY_MINUTES) -> str:
-    """
-    Génère une URL présignée (SAS) pour un accès temporaire en lecture seule.
-    
-    Args:
-        blob_name: Chemin complet du blob
-        expiry_minutes: Durée de validité en minutes (défaut: 15)
-    
-    Returns:
-        URL complète avec jeton SAS
-    """
-    start_time = datetime.now(timezone.utc)
-    expiry_time = start_time + timedelta(minutes=expiry_minutes)
+# Structure: {(blob_name, expiry_minutes, fenetre): url}
+_sas_cache: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_sas_lock = threading.Lock()
 
+
+def _fenetre_sas(expiry_minutes: int, maintenant: float) -> Tuple[int, int]:
+    """(durée de la fenêtre en secondes, numéro de fenêtre) pour une validité donnée"""
+    # Au plus le quart de la validité, pour qu'une URL en cache ne soit jamais presque expirée
+    duree = max(60, min(SAS_CACHE_WINDOW_MINUTES * 60, expiry_minutes * 60 // 4))
+    return duree, int(maintenant // duree)
+
+
+def _signer_sas(blob_name: str, start_time: datetime, expiry_time: datetime) -> str:
     sas_token = generate_blob_sas(
         account_name=ACCOUNT_NAME,
         container_name=CONTAINER_NAME,
@@ -144,10 +171,71 @@ def generate_sas_url(blob_name: str, expiry_minutes: int = SAS_EXPIRY_MINUTES) -
         expiry=expiry_time,
         start=start_time,
     )
-
     return f"https://{ACCOUNT_NAME}.blob.core.windows.net/{CONTAINER_NAME}/{blob_name}?{sas_token}"
 
 
+def _signature_locale(blob_name: str, expire: int) -> str:
+    message = f"{blob_name}\n{expire}".encode("utf-8")
+    return hmac.new(LOCAL_URL_SECRET.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+
+def _signer_local(blob_name: str, start_time: datetime, expiry_time: datetime) -> str:
+    expire = int(expiry_time.timestamp())
+    return (
+        f"{LOCAL_URL_BASE}/api/storage/local/{quote(blob_name)}"
+        f"?expire={expire}&signature={_signature_locale(blob_name, expire)}"
+    )
+
+
+def verifier_url_locale(blob_name: str, expire: int, signature: str) -> bool:
+    """Vérifie une URL signée du mode filesystem (signature et expiration)"""
+    if expire < time.time():
+        return False
+    return hmac.compare_digest(_signature_locale(blob_name, expire), signature)
+
+
+def generate_sas_url(blob_name: str, expiry_minutes: int = SAS_EXPIRY_MINUTES) -> str:
+    """
+    Génère une URL présignée (SAS) pour un accès temporaire en lecture seule.
+    
+    Les URLs sont en cache par (blob, fenêtre d'expiration): le jeton démarre
+    au début de la fenêtre courante et expire expiry_minutes plus tard. Tous
+    les appels (et tous les workers) d'une même fenêtre obtiennent la même
+    URL, ce qui permet aussi au navigateur de garder l'image en cache.
+    
+    Args:
+        blob_name: Chemin complet du blob
+        expiry_minutes: Durée de validité en minutes (défaut: 240)
+    
+    Returns:
+        URL complète avec jeton SAS (en mode filesystem: URL locale signée
+        de /api/storage/local, même expiration)
+    """
+    duree, fenetre = _fenetre_sas(expiry_minutes, time.time())
+    cle = (blob_name, expiry_minutes, fenetre)
+    with _sas_lock:
+        url = _sas_cache.get(cle)
+        if url is not None:
+            _sas_cache.move_to_end(cle)
+            return url
+
+    start_time = datetime.fromtimestamp(fenetre * duree, tz=timezone.utc)
+    signer = _signer_local if STORAGE_BACKEND == "filesystem" else _signer_sas
+    url = signer(blob_name, start_time, start_time + timedelta(minutes=expiry_minutes))
+
+    with _sas_lock:
+        _sas_cache[cle] = url
+        while len(_sas_cache) > SAS_CACHE_MAX_ENTRIES:
+            _sas_cache.popitem(last=False)
+    return url
+
+
+def vider_cache_sas():
+    """Vide le cache des SAS URLs (rotation de la clé du compte, tests)"""
+    with _sas_lock:
+        _sas_cache.clear()
+
+
 def get_content_type(filename: str) -> str:
     """Détermine le content-type à partir de l'extension du fichier."""
     ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else "bin"
@@ -161,9 +249,17 @@ def generate_storage_path(tenant_id: str, category: str, filename: str) -> str:
     return f"{APP_NAME}/{tenant_id}/{category}/{unique_name}"
 
 
+def _mappings_auto(doc: dict) -> Dict[str, str]:
+    return {
+        key: key.replace("_blob_name", "")
+        for key in doc
+        if key.endswith("_blob_name") and doc.get(key)
+    }
+
+
 def resolve_blob_urls(doc: dict, mappings: dict = None) -> dict:
     """
-    Résout les champs *_blob_name en SAS URLs fraîches (15 min).
+    Résout les champs *_blob_name en SAS URLs fraîches.
     
     Args:
         doc: Document MongoDB
@@ -174,23 +270,60 @@ def resolve_blob_urls(doc: dict, mappings: dict = None) -> dict:
     """
     if not doc:
         return doc
+    resolve_blob_urls_batch([doc], mappings)
+    return doc
+
+
+def resolve_blob_urls_batch(docs: Iterable[dict], mappings: Optional[Dict[str, str]] = None) -> List[dict]:
+    """
+    Résout en une passe les champs *_blob_name de toute une page de résultats.
+    Chaque blob distinct de la page est signé au plus une fois (et servi du
+    cache SAS s'il l'a déjà été dans la fenêtre courante).
     
-    if mappings is None:
-        mappings = {}
-        for key in list(doc.keys()):
-            if key.endswith("_blob_name") and doc.get(key):
-                display_field = key.replace("_blob_name", "")
-                mappings[key] = display_field
-    
-    for blob_field, display_field in mappings.items():
-        blob_name = doc.get(blob_field)
-        if blob_name:
-            try:
-                doc[display_field] = generate_sas_url(blob_name)
-            except Exception as e:
-                logger.warning("SAS URL generation failed for %s: %s", blob_name, e)
+    Args:
+        docs: Documents MongoDB (modifiés en place)
+        mappings: {"blob_field": "display_field"} commun à tous les documents,
+            ou None pour l'auto-détection par document
     
-    return doc
+    Returns:
+        La liste des documents enrichis
+    """
+    docs = [doc for doc in docs if doc]
+    urls: Dict[str, Optional[str]] = {}
+    for doc in docs:
+        for blob_field, display_field in (mappings or _mappings_auto(doc)).items():
+            blob_name = doc.get(blob_field)
+            if not blob_name:
+                continue
+            if blob_name not in urls:
+                try:
+                    urls[blob_name] = generate_sas_url(blob_name)
+                except Exception as e:
+                    logger.warning("SAS URL generation failed for %s: %s", blob_name, e)
+                    urls[blob_name] = None
+            if urls[blob_name] is not None:
+                doc[display_field] = urls[blob_name]
+    return docs
+
+
+def _attribut(tenant_dict_or_obj, nom: str):
+    if isinstance(tenant_dict_or_obj, dict):
+        return tenant_dict_or_obj.get(nom)
+    return getattr(tenant_dict_or_obj, nom, None)
+
+
+def _decoder_logo_base64(tenant_dict_or_obj) -> bytes:
+    """Logo legacy en base64 dans logo_url, ou None"""
+    import base64 as b64
+
+    logo_url = _attribut(tenant_dict_or_obj, "logo_url")
+    if logo_url and isinstance(logo_url, str) and logo_url.startswith("data:image/"):
+        try:
+            _, encoded = logo_url.split(",", 1)
+            return b64.b64decode(encoded)
+        except Exception as e:
+            logger.warning("Impossible de décoder logo base64: %s", e)
+    return None
 
 
 def get_logo_bytes(tenant_dict_or_obj) -> bytes:
@@ -201,15 +334,8 @@ def get_logo_bytes(tenant_dict_or_obj) -> bytes:
     Returns:
         bytes du logo ou None
     """
-    import base64 as b64
-    
     # Cas 1: Azure blob_name
-    blob_name = None
-    if isinstance(tenant_dict_or_obj, dict):
-        blob_name = tenant_dict_or_obj.get("logo_blob_name")
-    elif hasattr(tenant_dict_or_obj, "logo_blob_name"):
-        blob_name = getattr(tenant_dict_or_obj, "logo_blob_name", None)
-    
+    blob_name = _attribut(tenant_dict_or_obj, "logo_blob_name")
     if blob_name:
         try:
             data, _ = get_object(blob_name)
@@ -218,20 +344,16 @@ def get_logo_bytes(tenant_dict_or_obj) -> bytes:
             logger.warning("Impossible de charger logo Azure %s: %s", blob_name, e)
     
     # Cas 2: legacy base64 dans logo_url
-    logo_url = None
-    if isinstance(tenant_dict_or_obj, dict):
-        logo_url = tenant_dict_or_obj.get("logo_url")
-    elif hasattr(tenant_dict_or_obj, "logo_url"):
-        logo_url = getattr(tenant_dict_or_obj, "logo_url", None)
-    
-    if logo_url and isinstance(logo_url, str) and logo_url.startswith("data:image/"):
-        try:
-            _, encoded = logo_url.split(",", 1)
-            return b64.b64decode(encoded)
-        except Exception as e:
-            logger.warning("Impossible de décoder logo base64: %s", e)
-    
-    return None
+    return _decoder_logo_base64(tenant_dict_or_obj)
+
+
+def _decoder_base64(base64_data: str) -> bytes:
+    import base64 as b64
+
+    # Nettoyer le prefix data URI si présent
+    if "," in base64_data:
+        base64_data = base64_data.split(",", 1)[1]
+    return b64.b64decode(base64_data)
 
 
 def upload_base64_to_azure(base64_data: str, tenant_id: str, category: str, filename: str) -> dict:
@@ -242,17 +364,72 @@ def upload_base64_to_azure(base64_data: str, tenant_id: str, category: str, file
     Returns:
         {"blob_name": "...", "url": "...", "size": 123, "content_type": "..."}
     """
-    import base64 as b64
+    data = _decoder_base64(base64_data)
+    content_type = get_content_type(filename)
+    path = generate_storage_path(tenant_id, category, filename)
 
-    # Nettoyer le prefix data URI si présent
-    if "," in base64_data:
-        base64_data = base64_data.split(",", 1)[1]
+    put_object(path, data, content_type)
 
-    data = b64.b64decode(base64_data)
+    return {
+        "blob_name": path,
+        "url": generate_sas_url(path),
+        "size": len(data),
+        "content_type": content_type,
+    }
+
+
+# ======================== API ASYNCHRONE ========================
+
+async def put_object_async(path: str, data: Donnees, content_type: str) -> dict:
+    """
+    put_object sans bloquer la boucle d'événements. `data` peut être un flux
+    de blocs (async iterable), envoyé par blocs sans tout charger en mémoire.
+    """
+    taille = await get_stockage().envoyer(path, data, content_type)
+    logger.info("Blob uploadé: %s (%d bytes, %s)", path, taille, content_type)
+    return {
+        "path": path,
+        "size": taille,
+        "url": generate_sas_url(path),
+    }
+
+
+async def get_object_async(path: str) -> tuple:
+    """(content_bytes, content_type), le content type venant de la réponse de download"""
+    return await get_stockage().lire(path)
+
+
+async def delete_object_async(path: str) -> bool:
+    """Supprime un blob. Retourne True si supprimé, False si introuvable ou en erreur."""
+    try:
+        supprime = await get_stockage().supprimer(path)
+        if supprime:
+            logger.info("Blob supprimé: %s", path)
+        return supprime
+    except Exception as e:
+        logger.warning("Impossible de supprimer le blob %s: %s", path, e)
+        return False
+
+
+async def get_logo_bytes_async(tenant_dict_or_obj) -> bytes:
+    """get_logo_bytes pour les routes async (génération PDF)"""
+    blob_name = _attribut(tenant_dict_or_obj, "logo_blob_name")
+    if blob_name:
+        try:
+            data, _ = await get_object_async(blob_name)
+            return data
+        except Exception as e:
+            logger.warning("Impossible de charger logo Azure %s: %s", blob_name, e)
+    return _decoder_logo_base64(tenant_dict_or_obj)
+
+
+async def upload_base64_to_azure_async(base64_data: str, tenant_id: str, category: str, filename: str) -> dict:
+    """upload_base64_to_azure pour les routes async"""
+    data = _decoder_base64(base64_data)
     content_type = get_content_type(filename)
     path = generate_storage_path(tenant_id, category, filename)
 
-    put_object(path, data, content_type)
+    await put_object_async(path, data, content_type)
 
     return {
         "blob_name": path,
@@ -0,0 +1,63 @@
+"""
+Écritures groupées MongoDB
+==========================
+
+Tampon d'insertion utilisé par les traitements de masse (attribution
+automatique, etc.) : les documents sont accumulés en mémoire puis écrits
+par lots ordonnés avec insert_many, au lieu d'un insert_one par document.
+
+Si un lot échoue en cours d'écriture, les documents de ce lot déjà insérés
+sont supprimés (compensation) avant de relancer l'exception, de sorte
+qu'aucun lot partiel ne reste en base.
+"""
+
+import logging
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class BulkInsertBuffer:
+    """Accumule des documents et les insère par lots ordonnés"""
+
+    def __init__(self, collection, id_field: str = "id", max_batch_size: int = 1000):
+        self.collection = collection
+        self.id_field = id_field
+        self.max_batch_size = max_batch_size
+        self.pending: List[Dict[str, Any]] = []
+        self.total_inserted = 0
+        self.round_trips = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, document: Dict[str, Any]):
+        self.pending.append(document)
+
+    async def flush(self) -> int:
+        """Écrit les documents en attente. Retourne le nombre de documents insérés."""
+        inserted = 0
+        while self.pending:
+            batch = self.pending[:self.max_batch_size]
+            self.pending = self.pending[self.max_batch_size:]
+            try:
+                self.round_trips += 1
+                await self.collection.insert_many(batch, ordered=True)
+            except Exception:
+                await self._rollback(batch)
+                self.pending = []
+                raise
+            inserted += len(batch)
+        self.total_inserted += inserted
+        return inserted
+
+    async def _rollback(self, batch: List[Dict[str, Any]]):
+        """Supprime les documents du lot qui ont pu être insérés avant l'échec"""
+        ids = [d.get(self.id_field) for d in batch if d.get(self.id_field)]
+        if not ids:
+            return
+        try:
+            result = await self.collection.delete_many({self.id_field: {"$in": ids}})
+            logger.warning(f"↩️ Lot annulé: {result.deleted_count}/{len(batch)} document(s) supprimé(s)")
+        except Exception as e:
+            logger.error(f"❌ Échec de l'annulation du lot ({len(ids)} documents): {e}")
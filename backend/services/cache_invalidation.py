@@ -0,0 +1,205 @@
+"""
+Caches en mémoire et bus d'invalidation
+=======================================
+
+TTLCache: cache borné (LRU) avec durée de vie, utilisé pour les lookups
+répétés à chaque requête (tenant par slug, utilisateur du JWT...).
+
+Chaque processus uvicorn a ses propres caches. Les invalidations passent par
+un bus pour atteindre tous les workers :
+
+- BusInvalidationLocal (défaut) : notifie les abonnés du processus courant
+  (suffisant avec un seul worker).
+- BusInvalidationUnix : plusieurs workers sur un même hôte. Chaque worker
+  écoute un socket datagramme Unix dans un répertoire partagé et une
+  invalidation est diffusée à tous les sockets du répertoire.
+
+Configuration: CACHE_INVALIDATION_BUS=local|unix, CACHE_INVALIDATION_DIR
+(défaut /tmp/profiremanager-cache-bus). Un autre transport (Redis pub/sub...)
+peut être branché avec set_bus_invalidation().
+
+Usage:
+    cache = TTLCache(max_entries=512, ttl_seconds=60)
+    get_bus_invalidation().abonner("tenants", lambda cle: cache.clear())
+    get_bus_invalidation().publier("tenants", {"slug": "shefford"})
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_ABSENT = object()
+
+
+class TTLCache:
+    """Cache LRU borné avec expiration des entrées"""
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # Structure: {cle: (expiration, valeur)}
+        self._entrees: "OrderedDict[Any, tuple]" = OrderedDict()
+
+    def __len__(self):
+        return len(self._entrees)
+
+    def get(self, cle, defaut=None):
+        entree = self._entrees.get(cle, _ABSENT)
+        if entree is _ABSENT:
+            return defaut
+        expiration, valeur = entree
+        if expiration <= time.monotonic():
+            del self._entrees[cle]
+            return defaut
+        self._entrees.move_to_end(cle)
+        return valeur
+
+    def set(self, cle, valeur):
+        self._entrees[cle] = (time.monotonic() + self.ttl_seconds, valeur)
+        self._entrees.move_to_end(cle)
+        while len(self._entrees) > self.max_entries:
+            self._entrees.popitem(last=False)
+
+    def pop(self, cle):
+        self._entrees.pop(cle, None)
+
+    def clear(self):
+        self._entrees.clear()
+
+    def invalider_si(self, predicat: Callable[[Any, Any], bool]):
+        """Supprime les entrées pour lesquelles predicat(cle, valeur) est vrai"""
+        for cle, (_, valeur) in list(self._entrees.items()):
+            if predicat(cle, valeur):
+                del self._entrees[cle]
+
+
+# ==================== BUS D'INVALIDATION ====================
+
+class BusInvalidationLocal:
+    """Bus en processus : notifie les abonnés du worker courant"""
+
+    def __init__(self):
+        self._abonnes: Dict[str, List[Callable[[Any], None]]] = defaultdict(list)
+
+    def abonner(self, canal: str, callback: Callable[[Any], None]):
+        self._abonnes[canal].append(callback)
+
+    def _notifier(self, canal: str, cle: Any):
+        for callback in self._abonnes.get(canal, []):
+            try:
+                callback(cle)
+            except Exception as e:
+                logger.error(f"❌ Invalidation '{canal}' échouée: {e}")
+
+    def publier(self, canal: str, cle: Any = None):
+        self._notifier(canal, cle)
+
+    async def demarrer(self):
+        pass
+
+    async def arreter(self):
+        pass
+
+
+class BusInvalidationUnix(BusInvalidationLocal):
+    """
+    Bus multi-workers sur un même hôte : un socket datagramme Unix par worker
+    dans un répertoire partagé, chaque invalidation est envoyée à tous.
+    """
+
+    def __init__(self, repertoire: str):
+        super().__init__()
+        self.repertoire = repertoire
+        self.chemin = os.path.join(repertoire, f"worker-{os.getpid()}.sock")
+        self._socket: Optional[socket.socket] = None
+
+    async def demarrer(self):
+        os.makedirs(self.repertoire, exist_ok=True)
+        if os.path.exists(self.chemin):
+            os.unlink(self.chemin)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.chemin)
+        self._socket.setblocking(False)
+        asyncio.get_running_loop().add_reader(self._socket.fileno(), self._recevoir)
+        logger.info(f"📡 Bus d'invalidation Unix démarré: {self.chemin}")
+
+    async def arreter(self):
+        if self._socket is None:
+            return
+        asyncio.get_running_loop().remove_reader(self._socket.fileno())
+        self._socket.close()
+        self._socket = None
+        try:
+            os.unlink(self.chemin)
+        except FileNotFoundError:
+            pass
+
+    def _recevoir(self):
+        while True:
+            try:
+                donnees = self._socket.recv(65536)
+            except (BlockingIOError, OSError):
+                return
+            try:
+                message = json.loads(donnees)
+            except ValueError:
+                continue
+            self._notifier(message.get("canal"), message.get("cle"))
+
+    def publier(self, canal: str, cle: Any = None):
+        # Toujours appliquer localement, même si le socket n'est pas (encore) ouvert
+        self._notifier(canal, cle)
+        if self._socket is None:
+            return
+
+        donnees = json.dumps({"canal": canal, "cle": cle}).encode()
+        try:
+            noms = os.listdir(self.repertoire)
+        except FileNotFoundError:
+            return
+        for nom in noms:
+            chemin = os.path.join(self.repertoire, nom)
+            if chemin == self.chemin or not nom.endswith(".sock"):
+                continue
+            try:
+                self._socket.sendto(donnees, chemin)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Worker arrêté sans nettoyage: retirer son socket
+                try:
+                    os.unlink(chemin)
+                except OSError:
+                    pass
+            except OSError as e:
+                logger.warning(f"⚠️ Invalidation non transmise à {nom}: {e}")
+
+
+_bus: BusInvalidationLocal = BusInvalidationLocal()
+
+
+def get_bus_invalidation() -> BusInvalidationLocal:
+    return _bus
+
+
+def set_bus_invalidation(bus: BusInvalidationLocal):
+    """Remplace le bus en conservant les abonnements déjà enregistrés"""
+    global _bus
+    for canal, callbacks in _bus._abonnes.items():
+        for callback in callbacks:
+            bus.abonner(canal, callback)
+    _bus = bus
+
+
+def configurer_bus_invalidation() -> BusInvalidationLocal:
+    """Choisit le transport selon CACHE_INVALIDATION_BUS (local par défaut)"""
+    transport = os.environ.get("CACHE_INVALIDATION_BUS", "local").lower()
+    if transport == "unix" and not isinstance(_bus, BusInvalidationUnix):
+        repertoire = os.environ.get("CACHE_INVALIDATION_DIR", "/tmp/profiremanager-cache-bus")
+        set_bus_invalidation(BusInvalidationUnix(repertoire))
+    return _bus
@@ -14,30 +14,96 @@ Architecture:
 Authentification:
 - Certificat SSL client (fourni par CAUCA après envoi du CSR)
 - Header "ssi-token" spécifique par service incendie
+
+Performance:
+- un client HTTP/2 par tenant, gardé ouvert entre les cycles (keep-alive),
+  avec un contexte SSL construit une fois par certificat
+- événements traités en parallèle (CAUCA_EVENT_CONCURRENCY), dans l'ordre
+  pour une même carte; cartes existantes vérifiées en une requête
+- configurations des tenants lues en une requête pour tous les pollings
+  (rafraîchies toutes les CAUCA_CONFIG_REFRESH_SECONDS)
+- intervalle adaptatif : CAUCA_ACTIVE_POLL_SECONDS pendant les appels en
+  cours, puis doublé à chaque cycle sans événement jusqu'au polling_interval
+  configuré. Un appel dont la fermeture n'a jamais été reçue cesse de compter
+  après CAUCA_ACTIVE_CARD_TTL_SECONDS
 """
 
 import asyncio
 import logging
 import httpx
 import ssl
+import time
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any, Set
+from typing import Dict, List, Optional, Any, Set, Tuple
 from pathlib import Path
 import os
 import tempfile
 
+from services.job_coordination import liberer_polling, posseder_polling
+
 logger = logging.getLogger(__name__)
 
+CAUCA_HTTP_TIMEOUT_SECONDS = float(os.environ.get("CAUCA_HTTP_TIMEOUT_SECONDS", "30"))
+CAUCA_EVENT_CONCURRENCY = int(os.environ.get("CAUCA_EVENT_CONCURRENCY", "4"))
+CAUCA_ACTIVE_POLL_SECONDS = float(os.environ.get("CAUCA_ACTIVE_POLL_SECONDS", "10"))
+CAUCA_CONFIG_REFRESH_SECONDS = float(os.environ.get("CAUCA_CONFIG_REFRESH_SECONDS", "60"))
+CAUCA_ACTIVE_CARD_TTL_SECONDS = float(os.environ.get("CAUCA_ACTIVE_CARD_TTL_SECONDS", "14400"))
+
+# eventType CAUCA
+EVENEMENT_CREATION = 0
+EVENEMENT_ANNULATION = 1
+EVENEMENT_FERMETURE = 2
+
+
+class IntervalleAdaptatif:
+    """Intervalle de polling: minimal pendant l'activité, doublé à chaque cycle calme jusqu'au maximum"""
+
+    def __init__(self, minimum: float, maximum: float):
+        self.maximum = max(1.0, maximum)
+        self.minimum = min(minimum, self.maximum)
+        self.courant = self.maximum
+
+    def prochain(self, actif: bool) -> float:
+        if actif:
+            self.courant = self.minimum
+        else:
+            self.courant = min(self.maximum, self.courant * 2)
+        return self.courant
+
+
+def _empreinte_client(config: Dict) -> Tuple:
+    """Change quand l'URL, le token ou les certificats changent (uploads: updated_at)"""
+    return (
+        config.get("api_url"),
+        config.get("ssi_token"),
+        config.get("certificate_blob_name"),
+        config.get("private_key_blob_name"),
+        str(config.get("updated_at"))
+    )
+
 
 class CAUCAAPIService:
     """Service de gestion de l'API CAUCA CAD Transfert"""
     
-    def __init__(self, db, websocket_manager=None):
+    def __init__(self, db, websocket_manager=None, transport: Optional[httpx.AsyncBaseTransport] = None):
         self.db = db
         self.websocket_manager = websocket_manager
+        self.transport = transport
         self.polling_tasks: Dict[str, asyncio.Task] = {}
         self.processed_events: Dict[str, Set[str]] = {}  # Cache des événements déjà traités par tenant
         self.last_event_timestamps: Dict[str, datetime] = {}  # Dernière heure de vérification par tenant
+        # Cartes importées non fermées/annulées: {tenant_id: {card_number: time.monotonic() à la création}}
+        self.cartes_actives: Dict[str, Dict[str, float]] = {}
+        # Structure: {tenant_id: (empreinte, client)}
+        self._clients: Dict[str, Tuple[Tuple, httpx.AsyncClient]] = {}
+        # Structure: {(certificat, clé, updated_at): SSLContext}
+        self._ssl_contexts: Dict[Tuple, ssl.SSLContext] = {}
+        self._configs: Dict[str, Dict] = {}
+        self._configs_lues_a = 0.0
+        # Incrémentée à chaque invalidation: une lecture lancée avant reste périmée
+        self._generation_configs = 0
+        self._generation_lue = -1
+        self._verrou_configs: Optional[asyncio.Lock] = None
         
     async def get_cauca_config(self, tenant_id: str) -> Optional[Dict]:
         """Récupère la configuration CAUCA API d'un tenant"""
@@ -47,48 +113,144 @@ class CAUCAAPIService:
         )
         return config
     
+    async def get_configs_polling(self) -> Dict[str, Dict]:
+        """
+        Configurations actives de tous les tenants en polling, lues en une
+        requête et partagées par les boucles pendant CAUCA_CONFIG_REFRESH_SECONDS
+        """
+        if self._verrou_configs is None:
+            self._verrou_configs = asyncio.Lock()
+        async with self._verrou_configs:
+            perimees = (
+                self._generation_lue != self._generation_configs
+                or time.monotonic() - self._configs_lues_a >= CAUCA_CONFIG_REFRESH_SECONDS
+            )
+            if perimees:
+                generation = self._generation_configs
+                configs = await self.db.cauca_configs.find(
+                    {"tenant_id": {"$in": list(self.polling_tasks)}, "actif": True},
+                    {"_id": 0}
+                ).to_list(None)
+                self._configs = {c["tenant_id"]: c for c in configs}
+                self._configs_lues_a = time.monotonic()
+                self._generation_lue = generation
+            return self._configs
+    
+    async def get_config_polling(self, tenant_id: str) -> Optional[Dict]:
+        """
+        Configuration d'un tenant en polling depuis la lecture groupée; un
+        tenant absent (polling démarré pendant une lecture) est relu seul
+        """
+        config = (await self.get_configs_polling()).get(tenant_id)
+        if config is None:
+            config = await self.get_cauca_config(tenant_id)
+            if config is not None:
+                self._configs[tenant_id] = config
+        return config
+    
+    def invalider_configs_polling(self):
+        """Force la relecture des configurations au prochain cycle"""
+        self._generation_configs += 1
+    
+    async def invalider_config(self, tenant_id: str):
+        """À appeler après une modification de configuration ou de certificat"""
+        self.invalider_configs_polling()
+        await self.fermer_client(tenant_id)
+    
     async def get_ssl_context(self, config: Dict) -> Optional[ssl.SSLContext]:
         """
         Crée un contexte SSL avec le certificat client et la clé privée.
-        Les fichiers sont stockés dans Azure Blob Storage.
+        Les fichiers sont stockés dans Azure Blob Storage. Le contexte est
+        conservé par certificat (rechargé après un nouvel upload).
         """
+        cert_blob = config.get("certificate_blob_name")
+        key_blob = config.get("private_key_blob_name")
+        
+        if not cert_blob or not key_blob:
+            logger.error("Certificat ou clé privée manquant dans la configuration CAUCA")
+            return None
+        
+        cle = (cert_blob, key_blob, str(config.get("updated_at")))
+        if cle in self._ssl_contexts:
+            return self._ssl_contexts[cle]
+        
         try:
-            from services.azure_storage import get_object
-            
-            cert_blob = config.get("certificate_blob_name")
-            key_blob = config.get("private_key_blob_name")
-            
-            if not cert_blob or not key_blob:
-                logger.error("Certificat ou clé privée manquant dans la configuration CAUCA")
-                return None
+            from services.azure_storage import get_object_async
             
             # Télécharger les fichiers depuis Azure Blob Storage
-            cert_content = get_object(cert_blob)
-            key_content = get_object(key_blob)
-            
-            # Créer des fichiers temporaires (httpx nécessite des chemins de fichiers)
-            with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.pem') as cert_file:
-                cert_file.write(cert_content)
-                cert_path = cert_file.name
+            cert_content, _ = await get_object_async(cert_blob)
+            key_content, _ = await get_object_async(key_blob)
             
-            with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.pem') as key_file:
-                key_file.write(key_content)
-                key_path = key_file.name
-            
-            # Créer le contexte SSL
-            ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
-            ssl_context.load_cert_chain(certfile=cert_path, keyfile=key_path)
-            
-            # Nettoyer les fichiers temporaires après création du contexte
-            # Note: On les garde tant que la connexion est active
-            # TODO: Implémenter un nettoyage approprié
+            # Contexte client: vérification du serveur CAUCA + certificat client
+            ssl_context = await asyncio.to_thread(self._charger_certificat, cert_content, key_content)
             
+            # Remplace les contextes des anciens certificats de ce tenant
+            for ancienne in [c for c in self._ssl_contexts if c[:2] == cle[:2]]:
+                del self._ssl_contexts[ancienne]
+            self._ssl_contexts[cle] = ssl_context
             return ssl_context
             
         except Exception as e:
             logger.error(f"Erreur création contexte SSL CAUCA: {e}")
             return None
     
+    @staticmethod
+    def _charger_certificat(cert_content: bytes, key_content: bytes) -> ssl.SSLContext:
+        # load_cert_chain exige des chemins de fichiers: supprimés dès le chargement
+        chemins = []
+        try:
+            for contenu in (cert_content, key_content):
+                with tempfile.NamedTemporaryFile(mode='wb', delete=False, suffix='.pem') as fichier:
+                    fichier.write(contenu)
+                    chemins.append(fichier.name)
+            ssl_context = ssl.create_default_context()
+            ssl_context.load_cert_chain(certfile=chemins[0], keyfile=chemins[1])
+            return ssl_context
+        finally:
+            for chemin in chemins:
+                try:
+                    os.unlink(chemin)
+                except OSError:
+                    pass
+    
+    async def get_client(self, config: Dict, ssl_context: Optional[ssl.SSLContext] = None) -> Optional[httpx.AsyncClient]:
+        """
+        Client HTTP/2 du tenant, réutilisé tant que sa configuration ne change pas.
+        None si le certificat client n'a pas pu être chargé : aucun client n'est
+        conservé, le chargement est retenté au prochain cycle.
+        """
+        tenant_id = config.get("tenant_id")
+        empreinte = _empreinte_client(config)
+        existant = self._clients.get(tenant_id)
+        if existant is not None and existant[0] == empreinte:
+            return existant[1]
+        await self.fermer_client(tenant_id)
+        
+        if ssl_context is None:
+            ssl_context = await self.get_ssl_context(config)
+        if ssl_context is None:
+            logger.error(f"CAUCA - Certificat client indisponible pour tenant {tenant_id}, cycle ignoré")
+            return None
+        client = httpx.AsyncClient(
+            http2=True,
+            verify=ssl_context,
+            timeout=CAUCA_HTTP_TIMEOUT_SECONDS,
+            transport=self.transport,
+            headers={"Accept": "application/json"},
+            limits=httpx.Limits(
+                max_connections=CAUCA_EVENT_CONCURRENCY + 1,
+                max_keepalive_connections=CAUCA_EVENT_CONCURRENCY + 1,
+                keepalive_expiry=max(CAUCA_CONFIG_REFRESH_SECONDS, 300)
+            )
+        )
+        self._clients[tenant_id] = (empreinte, client)
+        return client
+    
+    async def fermer_client(self, tenant_id: str):
+        existant = self._clients.pop(tenant_id, None)
+        if existant is not None:
+            await existant[1].aclose()
+    
     async def call_cauca_api(
         self,
         endpoint: str,
@@ -101,7 +263,7 @@ class CAUCAAPIService:
         Args:
             endpoint: Endpoint à appeler (ex: "/CallingCardEvents")
             config: Configuration CAUCA du tenant
-            ssl_context: Contexte SSL (certificat client)
+            ssl_context: Contexte SSL (certificat client), sinon celui du tenant
         
         Returns:
             Réponse JSON de l'API ou None en cas d'erreur
@@ -114,31 +276,28 @@ class CAUCAAPIService:
             return None
         
         url = f"{api_url}{endpoint}"
-        headers = {
-            "ssi-token": ssi_token,
-            "Accept": "application/json"
-        }
+        headers = {"ssi-token": ssi_token}
         
         try:
-            # TODO: Une fois les certificats disponibles, utiliser ssl_context
-            # Pour le moment, on prépare la structure
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(url, headers=headers)
-                
-                if response.status_code == 200:
-                    return response.json()
-                elif response.status_code == 400:
-                    logger.error(f"CAUCA API - Certificat manquant: {url}")
-                    return None
-                elif response.status_code == 401:
-                    logger.error(f"CAUCA API - Non authentifié: {url}")
-                    return None
-                elif response.status_code == 403:
-                    logger.error(f"CAUCA API - Non autorisé (token SSI invalide?): {url}")
-                    return None
-                else:
-                    logger.error(f"CAUCA API - Erreur {response.status_code}: {url}")
-                    return None
+            client = await self.get_client(config, ssl_context)
+            if client is None:
+                return None
+            response = await client.get(url, headers=headers)
+            
+            if response.status_code == 200:
+                return response.json()
+            elif response.status_code == 400:
+                logger.error(f"CAUCA API - Certificat manquant: {url}")
+                return None
+            elif response.status_code == 401:
+                logger.error(f"CAUCA API - Non authentifié: {url}")
+                return None
+            elif response.status_code == 403:
+                logger.error(f"CAUCA API - Non autorisé (token SSI invalide?): {url}")
+                return None
+            else:
+                logger.error(f"CAUCA API - Erreur {response.status_code}: {url}")
+                return None
                     
         except Exception as e:
             logger.error(f"Erreur appel CAUCA API {url}: {e}")
@@ -157,8 +316,7 @@ class CAUCAAPIService:
             }
         ]
         """
-        ssl_context = await self.get_ssl_context(config)
-        events = await self.call_cauca_api("/CallingCardEvents", config, ssl_context)
+        events = await self.call_cauca_api("/CallingCardEvents", config)
         
         if not events or not isinstance(events, list):
             return []
@@ -193,11 +351,9 @@ class CAUCAAPIService:
         
         Retourne le JSON complet de la carte selon le schéma CAUCA.
         """
-        ssl_context = await self.get_ssl_context(config)
         card_data = await self.call_cauca_api(
             f"/CallingCards/{card_number}",
-            config,
-            ssl_context
+            config
         )
         
         return card_data
@@ -206,13 +362,17 @@ class CAUCAAPIService:
         self,
         event: Dict,
         tenant_id: str,
-        config: Dict
+        config: Dict,
+        cartes_existantes: Optional[Set[str]] = None
     ):
         """
         Traite un événement CAUCA:
         - eventType 0: Création → Récupérer et importer la carte
         - eventType 1: Annulation → Marquer comme annulée
         - eventType 2: Fermeture → Mettre à jour le statut
+        
+        cartes_existantes: numéros de cartes déjà en base (vérifiés en lot par
+        process_events); sinon vérification individuelle
         """
         card_number = event.get("cardNumber")
         event_type = event.get("eventType")
@@ -221,7 +381,20 @@ class CAUCAAPIService:
         logger.info(f"Traitement événement CAUCA - Carte {card_number}, Type {event_type}, Tenant {tenant_id}")
         
         try:
-            if event_type == 0:  # Création
+            if event_type == EVENEMENT_CREATION:  # Création
+                # Vérifier si la carte existe déjà
+                if cartes_existantes is not None:
+                    existing = card_number in cartes_existantes
+                else:
+                    existing = await self.db.interventions.find_one({
+                        "tenant_id": tenant_id,
+                        "external_call_id": card_number
+                    }, {"_id": 0, "id": 1})
+                
+                if existing:
+                    logger.info(f"Carte CAUCA {card_number} déjà existante, ignorée")
+                    return
+                
                 # Récupérer les détails de la carte
                 card_data = await self.fetch_calling_card(card_number, tenant_id, config)
                 
@@ -230,33 +403,28 @@ class CAUCAAPIService:
                     from services.cauca_api_parser import parse_cauca_calling_card
                     intervention_data = parse_cauca_calling_card(card_data, tenant_id)
                     
-                    # Vérifier si la carte existe déjà
-                    existing = await self.db.interventions.find_one({
-                        "tenant_id": tenant_id,
-                        "external_call_id": card_number
-                    })
+                    await self.db.interventions.insert_one(intervention_data)
+                    if cartes_existantes is not None:
+                        cartes_existantes.add(card_number)
+                    self.cartes_actives.setdefault(tenant_id, {})[card_number] = time.monotonic()
+                    logger.info(f"Carte CAUCA {card_number} importée avec succès")
                     
-                    if not existing:
-                        await self.db.interventions.insert_one(intervention_data)
-                        logger.info(f"Carte CAUCA {card_number} importée avec succès")
-                        
-                        # Notifier le frontend via WebSocket
-                        if self.websocket_manager:
-                            await self.websocket_manager.broadcast_to_tenant(
-                                tenant_id,
-                                {
-                                    "type": "new_intervention",
-                                    "source": "cauca_api",
-                                    "data": {
-                                        "card_number": card_number,
-                                        "intervention_id": intervention_data["id"]
-                                    }
+                    # Notifier le frontend via WebSocket
+                    if self.websocket_manager:
+                        await self.websocket_manager.broadcast_to_tenant(
+                            tenant_id,
+                            {
+                                "type": "new_intervention",
+                                "source": "cauca_api",
+                                "data": {
+                                    "card_number": card_number,
+                                    "intervention_id": intervention_data["id"]
                                 }
-                            )
-                    else:
-                        logger.info(f"Carte CAUCA {card_number} déjà existante, ignorée")
+                            }
+                        )
             
-            elif event_type == 1:  # Annulation
+            elif event_type == EVENEMENT_ANNULATION:  # Annulation
+                self.cartes_actives.get(tenant_id, {}).pop(card_number, None)
                 # Marquer l'intervention comme annulée
                 result = await self.db.interventions.update_one(
                     {"tenant_id": tenant_id, "external_call_id": card_number},
@@ -270,7 +438,8 @@ class CAUCAAPIService:
                 if result.modified_count > 0:
                     logger.info(f"Carte CAUCA {card_number} marquée comme annulée")
             
-            elif event_type == 2:  # Fermeture
+            elif event_type == EVENEMENT_FERMETURE:  # Fermeture
+                self.cartes_actives.get(tenant_id, {}).pop(card_number, None)
                 # Mettre à jour le statut
                 result = await self.db.interventions.update_one(
                     {"tenant_id": tenant_id, "external_call_id": card_number},
@@ -287,22 +456,68 @@ class CAUCAAPIService:
         except Exception as e:
             logger.error(f"Erreur traitement événement CAUCA {card_number}: {e}")
     
+    async def process_events(self, events: List[Dict], tenant_id: str, config: Dict):
+        """
+        Traite un lot d'événements: cartes en parallèle (CAUCA_EVENT_CONCURRENCY),
+        événements d'une même carte dans l'ordre reçu
+        """
+        par_carte: Dict[Any, List[Dict]] = {}
+        for event in events:
+            par_carte.setdefault(event.get("cardNumber"), []).append(event)
+        
+        # Cartes déjà importées, en une requête
+        creations = [c for c, evs in par_carte.items() if any(e.get("eventType") == EVENEMENT_CREATION for e in evs)]
+        cartes_existantes: Set[str] = set()
+        if creations:
+            existantes = await self.db.interventions.find(
+                {"tenant_id": tenant_id, "external_call_id": {"$in": creations}},
+                {"_id": 0, "external_call_id": 1}
+            ).to_list(None)
+            cartes_existantes = {i["external_call_id"] for i in existantes}
+        
+        semaphore = asyncio.Semaphore(CAUCA_EVENT_CONCURRENCY)
+        
+        async def traiter_carte(events_carte: List[Dict]):
+            async with semaphore:
+                for event in events_carte:
+                    await self.process_event(event, tenant_id, config, cartes_existantes)
+        
+        await asyncio.gather(*(traiter_carte(evs) for evs in par_carte.values()))
+    
     async def polling_loop(self, tenant_id: str):
         """
         Boucle de polling pour un tenant.
-        Vérifie périodiquement les nouveaux événements CAUCA.
+        Vérifie les nouveaux événements CAUCA, plus souvent pendant les appels en cours.
         """
         logger.info(f"Démarrage polling CAUCA pour tenant {tenant_id}")
         
+        try:
+            await self._boucle_polling(tenant_id)
+        finally:
+            # Boucle terminée (config désactivée, annulation): le polling peut être redémarré
+            if self.polling_tasks.get(tenant_id) is asyncio.current_task():
+                del self.polling_tasks[tenant_id]
+    
+    async def _boucle_polling(self, tenant_id: str):
+        intervalle: Optional[IntervalleAdaptatif] = None
+        
         while True:
             try:
-                config = await self.get_cauca_config(tenant_id)
+                config = await self.get_config_polling(tenant_id)
                 
                 if not config or not config.get("actif"):
                     logger.warning(f"Config CAUCA inactive ou inexistante pour tenant {tenant_id}, arrêt du polling")
                     break
                 
                 polling_interval = config.get("polling_interval", 300)
+                if intervalle is None or intervalle.maximum != max(1.0, polling_interval):
+                    intervalle = IntervalleAdaptatif(CAUCA_ACTIVE_POLL_SECONDS, polling_interval)
+                
+                # Un seul worker interroge l'API CAUCA d'un tenant (services/job_coordination)
+                if not await posseder_polling(f"cauca:{tenant_id}"):
+                    await self.fermer_client(tenant_id)
+                    await asyncio.sleep(polling_interval)
+                    continue
                 
                 # Récupérer les nouveaux événements
                 events = await self.fetch_events(tenant_id, config)
@@ -310,9 +525,7 @@ class CAUCAAPIService:
                 if events:
                     logger.info(f"CAUCA - {len(events)} nouveaux événements pour tenant {tenant_id}")
                     
-                    # Traiter chaque événement
-                    for event in events:
-                        await self.process_event(event, tenant_id, config)
+                    await self.process_events(events, tenant_id, config)
                     
                     # Mettre à jour les stats
                     await self.db.cauca_configs.update_one(
@@ -329,8 +542,9 @@ class CAUCAAPIService:
                         {"$set": {"last_check": datetime.now(timezone.utc)}}
                     )
                 
-                # Attendre avant la prochaine vérification
-                await asyncio.sleep(polling_interval)
+                # Attendre avant la prochaine vérification: rapide pendant les appels en cours
+                actif = bool(events) or self.appels_en_cours(tenant_id)
+                await asyncio.sleep(intervalle.prochain(actif))
                 
             except asyncio.CancelledError:
                 logger.info(f"Polling CAUCA annulé pour tenant {tenant_id}")
@@ -339,6 +553,16 @@ class CAUCAAPIService:
                 logger.error(f"Erreur dans polling CAUCA pour tenant {tenant_id}: {e}")
                 await asyncio.sleep(60)  # Attendre 1 minute avant de réessayer
     
+    def appels_en_cours(self, tenant_id: str) -> bool:
+        """Vrai si une carte importée n'est ni fermée ni annulée (cartes expirées retirées)"""
+        cartes = self.cartes_actives.get(tenant_id)
+        if not cartes:
+            return False
+        limite = time.monotonic() - CAUCA_ACTIVE_CARD_TTL_SECONDS
+        for card_number in [c for c, creee_a in cartes.items() if creee_a < limite]:
+            del cartes[card_number]
+        return bool(cartes)
+    
     async def start_polling(self, tenant_id: str) -> Dict:
         """Démarre le polling pour un tenant"""
         if tenant_id in self.polling_tasks:
@@ -352,7 +576,8 @@ class CAUCAAPIService:
         if not config.get("certificate_blob_name") or not config.get("private_key_blob_name"):
             return {"success": False, "error": "Certificat SSL ou clé privée manquant"}
         
-        # Créer et démarrer la tâche
+        # Créer et démarrer la tâche (configurations relues pour inclure ce tenant)
+        self.invalider_configs_polling()
         task = asyncio.create_task(self.polling_loop(tenant_id))
         self.polling_tasks[tenant_id] = task
         
@@ -368,13 +593,18 @@ class CAUCAAPIService:
                 await task
             except asyncio.CancelledError:
                 pass
-            del self.polling_tasks[tenant_id]
+            self.polling_tasks.pop(tenant_id, None)
+            await liberer_polling(f"cauca:{tenant_id}")
             logger.info(f"Polling CAUCA arrêté pour tenant {tenant_id}")
+        self.cartes_actives.pop(tenant_id, None)
+        await self.fermer_client(tenant_id)
     
     async def stop_all_polling(self):
-        """Arrête tous les pollings actifs (appelé au shutdown)"""
+        """Arrête tous les pollings actifs et ferme les clients HTTP (appelé au shutdown)"""
         for tenant_id in list(self.polling_tasks.keys()):
             await self.stop_polling(tenant_id)
+        for tenant_id in list(self._clients):
+            await self.fermer_client(tenant_id)
 
 
 # ==================== SINGLETON ====================
@@ -0,0 +1,309 @@
+"""
+Table de couverture du planning
+===============================
+
+Nombre d'assignations par (tenant, date, type de garde), tenu à jour dans la
+collection couverture_planning pour que le dashboard et le planning lisent
+la couverture en O(jours × types de garde) au lieu de parcourir toutes les
+assignations pour chaque créneau.
+
+- personnel requis : calculé à la lecture depuis les types de garde
+  (personnel_requis, jours_application), pour qu'une modification de type de
+  garde s'applique sans reconstruction
+- personnel assigné : compteur "assignes" par créneau, incrémenté /
+  décrémenté par les routes qui créent ou suppriment des assignations
+  (enregistrer_couverture / retirer_couverture)
+- les écritures de masse invalident les mois concernés
+  (invalider_couverture) : un mois invalidé est reconstruit par agrégation à
+  la prochaine lecture ; la reconstruction remplace les compteurs par upsert
+  et ne supprime que les créneaux périmés (sûre si deux lectures
+  reconstruisent le même mois en parallèle)
+- chaque mois construit expire après COVERAGE_TABLE_TTL_SECONDS (filet de
+  sécurité pour les écritures non suivies, comme le registre des heures)
+
+Les marqueurs d'attribution automatique (assignation_type "marqueur",
+garde non remplie) ne comptent pas comme du personnel assigné.
+
+Usage:
+    await enregistrer_couverture(db, tenant.id, [assignation])
+    assignes = await obtenir_couverture(db, tenant.id, "2026-04-01", "2026-05-31")
+    resume = resumer_couverture(types_garde, debut, fin, assignes)
+"""
+
+import logging
+import os
+import uuid
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReplaceOne, UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COVERAGE_TABLE_TTL_SECONDS = int(os.environ.get("COVERAGE_TABLE_TTL_SECONDS", "3600"))
+
+# Python weekday() -> nom anglais utilisé dans jours_application
+JOURS_MAPPING = {
+    0: "monday",
+    1: "tuesday",
+    2: "wednesday",
+    3: "thursday",
+    4: "friday",
+    5: "saturday",
+    6: "sunday"
+}
+
+Creneau = Tuple[str, str]  # (date YYYY-MM-DD, type_garde_id)
+
+
+def _cle(tenant_id: str, date_str: str, type_garde_id: str) -> str:
+    return f"{tenant_id}|{date_str}|{type_garde_id}"
+
+
+def _mois(date_str: str) -> str:
+    return date_str[:7]
+
+
+def _mois_suivant(mois: str) -> str:
+    annee, numero = int(mois[:4]), int(mois[5:7])
+    return f"{annee + numero // 12:04d}-{numero % 12 + 1:02d}"
+
+
+def _mois_de_la_plage(debut: str, fin: str) -> List[str]:
+    mois, dernier, resultat = _mois(debut), _mois(fin), []
+    while mois <= dernier:
+        resultat.append(mois)
+        mois = _mois_suivant(mois)
+    return resultat
+
+
+def compter_creneaux(assignations: Iterable[Dict[str, Any]]) -> Counter:
+    """Nombre d'assignations par créneau (marqueurs et assignations incomplètes exclus)"""
+    compteur: Counter = Counter()
+    for assignation in assignations:
+        date_str = assignation.get("date")
+        type_garde_id = assignation.get("type_garde_id")
+        if not isinstance(date_str, str) or not type_garde_id or assignation.get("assignation_type") == "marqueur":
+            continue
+        compteur[(date_str[:10], type_garde_id)] += 1
+    return compteur
+
+
+# ======================== ÉCRITURES ========================
+
+async def _interrompre_reconstructions(db, tenant_id: str, mois: List[str]):
+    """
+    Une reconstruction en cours de ces mois a pu agréger les assignations
+    avant l'écriture, ou remplacer le compteur après le $inc : elle ne doit
+    pas marquer le mois comme construit (appelé avant et après le $inc).
+    """
+    await db.couverture_planning_mois.update_many(
+        {"tenant_id": tenant_id, "mois": {"$in": mois}, "reconstruction": {"$ne": None}},
+        {"$set": {"reconstruction": None}}
+    )
+
+
+async def _ajuster(db, tenant_id: str, assignations: List[Dict[str, Any]], signe: int):
+    compteur = compter_creneaux(assignations)
+    if not compteur:
+        return
+    mois = sorted({_mois(date_str) for date_str, _ in compteur})
+    try:
+        await _interrompre_reconstructions(db, tenant_id, mois)
+        await db.couverture_planning.bulk_write([
+            UpdateOne(
+                {"_id": _cle(tenant_id, date_str, type_garde_id)},
+                {
+                    "$inc": {"assignes": signe * n},
+                    "$setOnInsert": {"tenant_id": tenant_id, "date": date_str, "type_garde_id": type_garde_id}
+                },
+                upsert=True
+            )
+            for (date_str, type_garde_id), n in compteur.items()
+        ], ordered=False)
+        await _interrompre_reconstructions(db, tenant_id, mois)
+    except Exception as e:
+        # Le compteur n'est plus fiable pour ces mois: reconstruction à la prochaine lecture
+        logger.warning(f"⚠️ Couverture non mise à jour ({tenant_id}): {e}")
+        dates = sorted(date_str for date_str, _ in compteur)
+        await invalider_couverture(db, tenant_id, dates[0], dates[-1])
+
+
+async def enregistrer_couverture(db, tenant_id: str, assignations: List[Dict[str, Any]]):
+    """À appeler après l'insertion d'assignations"""
+    await _ajuster(db, tenant_id, assignations, 1)
+
+
+async def retirer_couverture(db, tenant_id: str, assignations: List[Dict[str, Any]]):
+    """À appeler après la suppression d'assignations connues"""
+    await _ajuster(db, tenant_id, assignations, -1)
+
+
+async def invalider_couverture(db, tenant_id: Optional[str] = None,
+                               date_debut: Optional[str] = None, date_fin: Optional[str] = None):
+    """
+    Marque les mois de [date_debut, date_fin] à reconstruire après une écriture
+    de masse (tout le tenant sans bornes, tous les tenants sans tenant_id)
+    """
+    filtre: Dict[str, Any] = {}
+    if tenant_id is not None:
+        filtre["tenant_id"] = tenant_id
+        if date_debut and date_fin:
+            filtre["mois"] = {"$in": _mois_de_la_plage(date_debut[:10], date_fin[:10])}
+    try:
+        await db.couverture_planning_mois.delete_many(filtre)
+    except Exception as e:
+        logger.error(f"❌ Invalidation de la couverture ({tenant_id}): {e}")
+
+
+# ======================== LECTURE ========================
+
+def pipeline_comptes_mois(tenant_id: str, mois: str) -> List[Dict[str, Any]]:
+    """Assignations du mois groupées par créneau (dates 'YYYY-MM-DD' ou ISO complètes)"""
+    return [
+        {"$match": {
+            "tenant_id": tenant_id,
+            "date": {"$gte": f"{mois}-01", "$lt": f"{_mois_suivant(mois)}-01"},
+            "type_garde_id": {"$nin": [None, ""]},
+            "assignation_type": {"$ne": "marqueur"}
+        }},
+        {"$group": {
+            "_id": {"date": {"$substrCP": ["$date", 0, 10]}, "type_garde_id": "$type_garde_id"},
+            "assignes": {"$sum": 1}
+        }}
+    ]
+
+
+async def reconstruire_mois(db, tenant_id: str, mois: str) -> bool:
+    """
+    Recalcule les compteurs d'un mois depuis les assignations.
+
+    Idempotente et sûre en concurrence: les compteurs sont remplacés par
+    upsert (pas d'insertion en double si deux lectures reconstruisent le même
+    mois) et seuls les créneaux absents de l'agrégation sont supprimés. Le
+    mois n'est marqué construit que si aucune écriture d'assignation
+    (_ajuster) ni invalidation n'est survenue pendant la reconstruction ;
+    sinon il sera reconstruit à la prochaine lecture. Retourne True si le
+    mois a été marqué construit.
+    """
+    marqueur = f"{tenant_id}|{mois}"
+    jeton = uuid.uuid4().hex
+    await db.couverture_planning_mois.update_one(
+        {"_id": marqueur},
+        {"$set": {
+            "tenant_id": tenant_id,
+            "mois": mois,
+            "reconstruction": jeton,
+            "expire_at": datetime.now(timezone.utc)
+        }},
+        upsert=True
+    )
+
+    groupes = await db.assignations.aggregate(pipeline_comptes_mois(tenant_id, mois)).to_list(length=None)
+    cles = [_cle(tenant_id, g["_id"]["date"], g["_id"]["type_garde_id"]) for g in groupes]
+    if groupes:
+        await db.couverture_planning.bulk_write([
+            ReplaceOne(
+                {"_id": cle},
+                {
+                    "tenant_id": tenant_id,
+                    "date": g["_id"]["date"],
+                    "type_garde_id": g["_id"]["type_garde_id"],
+                    "assignes": g["assignes"]
+                },
+                upsert=True
+            )
+            for cle, g in zip(cles, groupes)
+        ], ordered=False)
+    await db.couverture_planning.delete_many({
+        "tenant_id": tenant_id,
+        "date": {"$gte": f"{mois}-01", "$lt": f"{_mois_suivant(mois)}-01"},
+        "_id": {"$nin": cles}
+    })
+
+    maintenant = datetime.now(timezone.utc)
+    resultat = await db.couverture_planning_mois.update_one(
+        {"_id": marqueur, "reconstruction": jeton},
+        {"$set": {
+            "reconstruction": None,
+            "construit_le": maintenant,
+            "expire_at": maintenant + timedelta(seconds=COVERAGE_TABLE_TTL_SECONDS)
+        }}
+    )
+    construit = resultat.matched_count > 0
+    logger.debug(f"📊 Couverture reconstruite: tenant={tenant_id}, {mois}, {len(groupes)} créneau(x), marqué={construit}")
+    return construit
+
+
+async def obtenir_couverture(db, tenant_id: str, date_debut: str, date_fin: str) -> Dict[Creneau, int]:
+    """Personnel assigné par créneau sur [date_debut, date_fin] (mois manquants reconstruits)"""
+    mois_requis = _mois_de_la_plage(date_debut, date_fin)
+    maintenant = datetime.now(timezone.utc)
+    construits = await db.couverture_planning_mois.find(
+        {"tenant_id": tenant_id, "mois": {"$in": mois_requis}, "expire_at": {"$gt": maintenant}},
+        {"_id": 0, "mois": 1}
+    ).to_list(length=None)
+    construits = {m["mois"] for m in construits}
+    for mois in mois_requis:
+        if mois not in construits:
+            await reconstruire_mois(db, tenant_id, mois)
+
+    lignes = await db.couverture_planning.find(
+        {"tenant_id": tenant_id, "date": {"$gte": date_debut, "$lte": date_fin}, "assignes": {"$gt": 0}},
+        {"_id": 0, "date": 1, "type_garde_id": 1, "assignes": 1}
+    ).to_list(length=None)
+    return {(l["date"], l["type_garde_id"]): l["assignes"] for l in lignes}
+
+
+def type_garde_applicable(type_garde: Dict[str, Any], jour: date) -> bool:
+    """Sans jours_application, la garde s'applique tous les jours"""
+    jours_application = type_garde.get("jours_application", [])
+    return (not jours_application) or (JOURS_MAPPING[jour.weekday()] in jours_application)
+
+
+def creneaux_couverture(types_garde: List[Dict[str, Any]], debut: date, fin: date,
+                        assignes: Dict[Creneau, int]) -> List[Dict[str, Any]]:
+    """Personnel requis et assigné par (date, type de garde) applicable"""
+    creneaux = []
+    jour = debut
+    while jour <= fin:
+        date_str = jour.strftime("%Y-%m-%d")
+        for type_garde in types_garde:
+            if not type_garde_applicable(type_garde, jour):
+                continue
+            requis = type_garde.get("personnel_requis", 1)
+            nb_assignes = assignes.get((date_str, type_garde.get("id")), 0)
+            if nb_assignes >= requis:
+                statut = "complete"
+            elif nb_assignes > 0:
+                statut = "partielle"
+            else:
+                statut = "vacante"
+            creneaux.append({
+                "date": date_str,
+                "type_garde_id": type_garde.get("id"),
+                "personnel_requis": requis,
+                "personnel_assigne": nb_assignes,
+                "statut": statut
+            })
+        jour += timedelta(days=1)
+    return creneaux
+
+
+def resumer_couverture(types_garde: List[Dict[str, Any]], debut: date, fin: date,
+                       assignes: Dict[Creneau, int]) -> Dict[str, Any]:
+    """Taux de couverture d'une période (créneaux couverts plafonnés au personnel requis)"""
+    creneaux_requis = 0
+    creneaux_couverts = 0
+    for creneau in creneaux_couverture(types_garde, debut, fin, assignes):
+        creneaux_requis += creneau["personnel_requis"]
+        creneaux_couverts += min(creneau["personnel_assigne"], creneau["personnel_requis"])
+
+    taux = round((creneaux_couverts / creneaux_requis) * 100, 1) if creneaux_requis > 0 else 100.0
+    return {
+        "taux": taux,
+        "creneaux_requis": creneaux_requis,
+        "creneaux_couverts": creneaux_couverts,
+        "postes_a_pourvoir": max(0, creneaux_requis - creneaux_couverts)
+    }
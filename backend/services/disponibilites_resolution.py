@@ -0,0 +1,125 @@
+"""
+Résolution des disponibilités / indisponibilités
+================================================
+
+Vue unique des disponibilités d'une période, partagée par l'attribution
+automatique (planning_auto), la recherche de remplaçants et la génération
+d'indisponibilités, pour que les trois appliquent les mêmes règles de
+priorité :
+
+1. Une indisponibilité saisie manuellement bloque toujours.
+2. Une indisponibilité générée automatiquement (horaire, import...) est
+   ignorée si une disponibilité manuelle existe pour le même (user, date).
+
+Les documents sont indexés une seule fois par (user_id, date), ce qui rend
+la réconciliation linéaire au lieu de O(indispos × dispos).
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def est_statut_disponible(statut: Optional[str]) -> bool:
+    """Accepte 'disponible', 'Disponible', 'dispo'... (même règle que la requête ^dispo)"""
+    return bool(statut) and statut.lower().startswith("dispo")
+
+
+def est_saisie_manuelle(dispo: Dict[str, Any]) -> bool:
+    """
+    Vrai si l'entrée a été saisie manuellement.
+
+    Le champ historique 'source' ('manuel') est prioritaire s'il est présent,
+    sinon on se base sur 'origine' ('manuelle' par défaut, 'montreal_7_24',
+    'horaire_{id}', 'import_csv'... pour les entrées générées).
+    """
+    source = dispo.get("source")
+    if source is not None:
+        return source == "manuel"
+    return (dispo.get("origine") or "manuelle") == "manuelle"
+
+
+class ResolutionDisponibilites:
+    """Index (user_id, date) des disponibilités et indisponibilités effectives"""
+
+    def __init__(self, documents: Iterable[Dict[str, Any]]):
+        # Structure: {(user_id, date): [documents]}
+        self._disponibilites: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        self._indisponibilites: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        self._dispos_manuelles: set = set()
+        self.indisponibilites_ignorees: List[Dict[str, Any]] = []
+
+        indispos_brutes = []
+        for doc in documents:
+            cle = (doc.get("user_id"), doc.get("date"))
+            statut = doc.get("statut")
+            if statut == "indisponible":
+                indispos_brutes.append((cle, doc))
+            elif est_statut_disponible(statut):
+                self._disponibilites[cle].append(doc)
+                if est_saisie_manuelle(doc):
+                    self._dispos_manuelles.add(cle)
+
+        for cle, indispo in indispos_brutes:
+            if est_saisie_manuelle(indispo) or cle not in self._dispos_manuelles:
+                self._indisponibilites[cle].append(indispo)
+            else:
+                self.indisponibilites_ignorees.append(indispo)
+
+    def a_dispo_manuelle(self, user_id: str, date: str) -> bool:
+        return (user_id, date) in self._dispos_manuelles
+
+    def disponibilites(self, user_id: str, date: str) -> List[Dict[str, Any]]:
+        return self._disponibilites.get((user_id, date), [])
+
+    def indisponibilites(self, user_id: str, date: str) -> List[Dict[str, Any]]:
+        """Indisponibilités effectives (après application des règles de priorité)"""
+        return self._indisponibilites.get((user_id, date), [])
+
+    def est_disponible(self, user_id: str, date: str) -> bool:
+        return (user_id, date) in self._disponibilites
+
+    def est_indisponible(self, user_id: str, date: str) -> bool:
+        return (user_id, date) in self._indisponibilites
+
+    def toutes_disponibilites(self) -> List[Dict[str, Any]]:
+        return [d for docs in self._disponibilites.values() for d in docs]
+
+    def toutes_indisponibilites(self) -> List[Dict[str, Any]]:
+        return [d for docs in self._indisponibilites.values() for d in docs]
+
+    def filtrer_indisponibilites_generees(self, indispos: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Retire les indisponibilités générées contredites par une dispo manuelle"""
+        return [
+            i for i in indispos
+            if est_saisie_manuelle(i) or not self.a_dispo_manuelle(i.get("user_id"), i.get("date"))
+        ]
+
+
+async def charger_disponibilites_periode(
+    db,
+    tenant_id: str,
+    date_debut: str,
+    date_fin: str,
+    user_ids: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """Charge en UNE requête les disponibilités et indisponibilités d'une période"""
+    query = {
+        "tenant_id": tenant_id,
+        "date": {"$gte": date_debut, "$lte": date_fin}
+    }
+    if user_ids is not None:
+        query["user_id"] = {"$in": list(user_ids)}
+
+    return await db.disponibilites.find(query, {"_id": 0}).to_list(length=None)
+
+
+async def charger_resolution_disponibilites(
+    db,
+    tenant_id: str,
+    date_debut: str,
+    date_fin: str,
+    user_ids: Optional[List[str]] = None
+) -> ResolutionDisponibilites:
+    """Charge et indexe les disponibilités et indisponibilités d'une période"""
+    documents = await charger_disponibilites_periode(db, tenant_id, date_debut, date_fin, user_ids)
+    return ResolutionDisponibilites(documents)
@@ -10,6 +10,8 @@ import logging
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timezone
 
+from services.notification_dispatcher import soumettre_email
+
 logger = logging.getLogger(__name__)
 
 # Configuration
@@ -194,7 +196,7 @@ class EmailService:
         tags: Optional[List[Dict[str, str]]] = None
     ) -> Dict[str, Any]:
         """
-        Envoie un email via Resend
+        Envoie un email via Resend (mis en file, retourne sans attendre l'envoi)
         
         Args:
             to: Liste des destinataires
@@ -205,7 +207,7 @@ class EmailService:
             tags: Tags pour le tracking (optionnel)
         
         Returns:
-            Dict avec success, email_id ou error
+            Dict avec success (email mis en file), email_id (None) ou error
         """
         if not self.is_configured:
             logger.error("EmailService non configuré - email non envoyé")
@@ -228,26 +230,18 @@ class EmailService:
             if tags:
                 params["tags"] = tags
             
-            response = self._resend.Emails.send(params)
-            
-            email_id = response.get('id') if isinstance(response, dict) else getattr(response, 'id', None)
+            from routes.emails_history import historiser_apres_envoi
             
-            logger.info(f"✅ Email envoyé: {subject} -> {to}")
+            # Envoi en file: l'identifiant Resend n'est connu qu'après l'envoi par le worker
+            soumettre_email(params, apres_envoi=historiser_apres_envoi(
+                params["to"],
+                type_email="email_service",
+                sujet=subject
+            ))
             
-            # Log email pour chaque destinataire
-            try:
-                from routes.emails_history import log_email_sent
-                import asyncio
-                for recipient in to:
-                    asyncio.create_task(log_email_sent(
-                        type_email="email_service",
-                        destinataire_email=recipient,
-                        sujet=subject
-                    ))
-            except Exception as log_err:
-                logger.warning(f"Erreur log email: {log_err}")
+            logger.info(f"📨 Email mis en file: {subject} -> {to}")
             
-            return {"success": True, "email_id": email_id}
+            return {"success": True, "email_id": None}
             
         except Exception as e:
             logger.error(f"❌ Erreur envoi email: {str(e)}")
@@ -0,0 +1,239 @@
+"""
+Rotation des équipes de garde
+=============================
+
+Calcul pur (sans FastAPI ni MongoDB) de l'équipe de garde d'une date :
+rotations standard (Montréal, Québec, Longueuil), patterns configurés et
+horaires personnalisés. Utilisé par les routes equipes_garde / planning, la
+recherche de remplaçants et le solveur d'attribution automatique
+(services/attribution_solver, exécuté dans des processus spawn).
+"""
+
+from typing import List
+from datetime import datetime, timedelta
+
+
+def get_equipe_garde_du_jour_sync(
+    type_rotation: str, 
+    date_reference: str, 
+    date_cible: str, 
+    nombre_equipes: int, 
+    pattern_mode: str, 
+    pattern_personnalise: List[int],
+    duree_cycle: int,
+    jour_rotation: str = None,
+    heure_rotation: str = None,
+    heure_actuelle: str = None
+) -> int:
+    """
+    Calcule quelle équipe est de garde pour une date donnée.
+    Retourne le numéro de l'équipe (1, 2, 3, 4, 5).
+    
+    Prend en compte le jour et l'heure de rotation si spécifiés.
+    Par exemple, si jour_rotation="monday" et heure_rotation="18:00",
+    la rotation change chaque lundi à 18h.
+    
+    LOGIQUE CLÉ pour rotation hebdomadaire avec jour/heure:
+    - La date de référence est le PREMIER jour où l'équipe 1 est de garde
+    - On calcule le nombre de SEMAINES complètes depuis la référence
+    - Une "semaine de rotation" commence le jour_rotation à heure_rotation
+    - Exemple: si rotation lundi 18h, alors dimanche 23h59 = même semaine que lundi 00h00
+    """
+    date_ref = datetime.strptime(date_reference, "%Y-%m-%d").date()
+    date_obj = datetime.strptime(date_cible, "%Y-%m-%d").date()
+    
+    # Pour les rotations hebdomadaires avec jour/heure personnalisés
+    if jour_rotation and heure_rotation and pattern_mode == "hebdomadaire":
+        # Convertir le jour de rotation en numéro (monday=0, ..., sunday=6)
+        jours_semaine = {
+            "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3,
+            "friday": 4, "saturday": 5, "sunday": 6
+        }
+        jour_rot_num = jours_semaine.get(jour_rotation, 0)
+        
+        # Parser l'heure de rotation
+        heure_rot_parts = heure_rotation.split(":")
+        heure_rot_h = int(heure_rot_parts[0])
+        heure_rot_m = int(heure_rot_parts[1]) if len(heure_rot_parts) > 1 else 0
+        
+        # Créer le datetime de référence (on suppose que la référence est au moment de la rotation)
+        datetime_ref = datetime.combine(date_ref, datetime.min.time().replace(hour=heure_rot_h, minute=heure_rot_m))
+        
+        # Créer le datetime cible
+        if heure_actuelle:
+            heure_act_parts = heure_actuelle.split(":")
+            heure_act_h = int(heure_act_parts[0])
+            heure_act_m = int(heure_act_parts[1]) if len(heure_act_parts) > 1 else 0
+            datetime_cible = datetime.combine(date_obj, datetime.min.time().replace(hour=heure_act_h, minute=heure_act_m))
+        else:
+            # Si pas d'heure fournie, utiliser minuit (début de journée = période précédente si rotation > 00:00)
+            datetime_cible = datetime.combine(date_obj, datetime.min.time())
+        
+        # Calculer le début de la période de rotation actuelle pour la date cible
+        # On doit trouver le dernier moment où la rotation a eu lieu AVANT datetime_cible
+        jour_cible = date_obj.weekday()
+        
+        # Calculer combien de jours depuis le dernier jour de rotation
+        if jour_cible > jour_rot_num:
+            # Le jour de rotation est passé cette semaine
+            jours_depuis = jour_cible - jour_rot_num
+        elif jour_cible < jour_rot_num:
+            # Le jour de rotation n'est pas encore arrivé cette semaine
+            # Donc on est dans la période qui a commencé la semaine dernière
+            jours_depuis = 7 - (jour_rot_num - jour_cible)
+        else:
+            # C'est le jour de rotation - vérifier l'heure
+            heure_cible = datetime_cible.time()
+            heure_rot_time = datetime.min.time().replace(hour=heure_rot_h, minute=heure_rot_m)
+            if heure_cible >= heure_rot_time:
+                # Après l'heure de rotation = nouvelle période (0 jours depuis)
+                jours_depuis = 0
+            else:
+                # Avant l'heure de rotation = encore dans la période précédente (7 jours depuis)
+                jours_depuis = 7
+        
+        # Calculer le datetime du début de la période actuelle
+        debut_periode_actuelle = datetime_cible - timedelta(days=jours_depuis)
+        debut_periode_actuelle = debut_periode_actuelle.replace(hour=heure_rot_h, minute=heure_rot_m)
+        
+        # Calculer le nombre de semaines entre la référence et le début de la période actuelle
+        delta = debut_periode_actuelle - datetime_ref
+        semaines_depuis_ref = delta.days // 7
+        
+        # L'équipe est basée sur le nombre de semaines modulo le nombre d'équipes
+        if semaines_depuis_ref < 0:
+            # Pour les dates avant la référence
+            equipe = nombre_equipes - ((-semaines_depuis_ref - 1) % nombre_equipes) - 1
+            if equipe <= 0:
+                equipe = nombre_equipes
+        else:
+            equipe = (semaines_depuis_ref % nombre_equipes) + 1
+        
+        return equipe
+    
+    # Logique standard pour les autres cas
+    # Calculer le jour dans le cycle
+    jours_depuis_ref = (date_obj - date_ref).days
+    
+    # Pour les dates avant la référence
+    if jours_depuis_ref < 0:
+        jour_cycle = duree_cycle - ((-jours_depuis_ref - 1) % duree_cycle) - 1
+    else:
+        jour_cycle = jours_depuis_ref % duree_cycle
+    
+    # Si pattern personnalisé défini
+    if pattern_personnalise and len(pattern_personnalise) >= duree_cycle:
+        return pattern_personnalise[jour_cycle]
+    
+    # Sinon, utiliser le mode de pattern
+    if pattern_mode == "hebdomadaire":
+        # Alternance hebdomadaire: équipe change chaque semaine
+        semaine = jour_cycle // 7
+        return (semaine % nombre_equipes) + 1
+    
+    elif pattern_mode == "quotidien":
+        # Alternance quotidienne: équipe change chaque jour
+        return (jour_cycle % nombre_equipes) + 1
+    
+    elif pattern_mode == "deux_jours":
+        # 2 jours chacun: 1,1,2,2,3,3,4,4...
+        return ((jour_cycle // 2) % nombre_equipes) + 1
+    
+    else:
+        # Par défaut: hebdomadaire
+        semaine = jour_cycle // 7
+        return (semaine % nombre_equipes) + 1
+
+
+def get_equipe_garde_rotation_standard(type_rotation: str, date_reference: str, date_cible: str) -> int:
+    """
+    Calcule quelle équipe (1=Vert, 2=Bleu, 3=Jaune, 4=Rouge) est de garde pour une rotation standard.
+    Utilise les mêmes patterns que les fonctions de génération d'indisponibilités.
+    
+    IMPORTANT: Cette fonction N'APPELLE PAS et NE MODIFIE PAS les fonctions existantes.
+    Elle utilise simplement la même logique de calcul de jour dans le cycle.
+    """
+    date_obj = datetime.strptime(date_cible, "%Y-%m-%d").date()
+    
+    # Définir les dates de référence et les patterns pour chaque type de rotation
+    # Ces valeurs sont copiées des fonctions existantes (lecture seule)
+    if type_rotation == "montreal":
+        # Date ref: 27 janvier 2025 (premier lundi rouge = jour 1)
+        jour_1_cycle = datetime(2025, 1, 27).date()
+        # Pattern: équipe qui travaille chaque jour du cycle
+        # Rouge=4 travaille jours 1, 4, 12, 14, 17, 20, 23
+        # Vert=1 travaille jours 2, 8, 11, 19, 21, 24, 27
+        # Bleu=2 travaille jours 3, 6, 9, 15, 18, 26, 28
+        # Jaune=3 travaille jours 5, 7, 10, 13, 16, 22, 25
+        equipes_jours = {
+            1: [2, 8, 11, 19, 21, 24, 27],   # Vert
+            2: [3, 6, 9, 15, 18, 26, 28],    # Bleu
+            3: [5, 7, 10, 13, 16, 22, 25],   # Jaune
+            4: [1, 4, 12, 14, 17, 20, 23]    # Rouge
+        }
+    elif type_rotation == "quebec":
+        jour_1_cycle = datetime(2026, 2, 1).date()
+        equipes_jours = {
+            1: [2, 3, 4, 5, 12, 13, 14, 20, 21, 22, 23, 24, 25],  # Vert
+            2: [6, 7, 8, 9, 10, 11, 16, 17, 18, 19, 26, 27, 28],  # Bleu
+            3: [1, 2, 3, 4, 9, 10, 11, 12, 19, 20, 21, 27, 28],   # Jaune
+            4: [5, 6, 7, 13, 14, 15, 16, 17, 18, 23, 24, 25, 26]  # Rouge
+        }
+    elif type_rotation == "longueuil":
+        # Date ref: 25 janvier 2026 (premier dimanche rouge = jour 1)
+        jour_1_cycle = datetime(2026, 1, 25).date()
+        equipes_jours = {
+            1: [2, 6, 8, 12, 18, 21, 24],    # Vert
+            2: [3, 9, 13, 15, 19, 25, 28],   # Bleu
+            3: [4, 7, 10, 16, 20, 22, 26],   # Jaune
+            4: [1, 5, 11, 14, 17, 23, 27]    # Rouge
+        }
+    else:
+        return 1  # Par défaut équipe 1
+    
+    # Calculer le jour dans le cycle (1-28)
+    jours_depuis_jour1 = (date_obj - jour_1_cycle).days
+    jour_cycle = (jours_depuis_jour1 % 28) + 1
+    
+    if jours_depuis_jour1 < 0:
+        jour_cycle = 28 - ((-jours_depuis_jour1 - 1) % 28)
+    
+    # Trouver quelle équipe travaille ce jour
+    for equipe, jours in equipes_jours.items():
+        if jour_cycle in jours:
+            return equipe
+    
+    return 1  # Par défaut
+
+
+def get_equipe_from_horaire_personnalise(horaire: dict, date_cible: str) -> int:
+    """
+    Calcule quelle équipe est de garde selon un horaire personnalisé.
+    Utilise les jours_travail définis pour chaque équipe.
+    """
+    date_ref = datetime.strptime(horaire.get("date_reference"), "%Y-%m-%d").date()
+    date_obj = datetime.strptime(date_cible, "%Y-%m-%d").date()
+    duree_cycle = horaire.get("duree_cycle", 28)
+    
+    # Calculer le jour dans le cycle (1-based)
+    jours_depuis_ref = (date_obj - date_ref).days
+    
+    if jours_depuis_ref < 0:
+        jour_cycle = duree_cycle - ((-jours_depuis_ref - 1) % duree_cycle)
+    else:
+        jour_cycle = (jours_depuis_ref % duree_cycle) + 1
+    
+    # Chercher quelle équipe travaille ce jour
+    equipes = horaire.get("equipes", [])
+    for eq in equipes:
+        jours_travail = eq.get("jours_travail", [])
+        for jt in jours_travail:
+            if isinstance(jt, int):
+                if jt == jour_cycle:
+                    return eq.get("numero", 1)
+            elif isinstance(jt, dict):
+                if jt.get("jour") == jour_cycle:
+                    return eq.get("numero", 1)
+    
+    # Par défaut, retourner équipe 1
+    return 1
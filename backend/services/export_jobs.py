@@ -0,0 +1,247 @@
+"""
+Service de jobs d'export (PDF / Excel)
+======================================
+
+Le rendu ReportLab / openpyxl est purement CPU : exécuté dans une route
+async, il gèle le worker pour tous les tenants. Ce service :
+
+- exécute le rendu dans un pool de processus (EXPORT_WORKERS, défaut 2)
+- suit chaque export dans un job (collection export_jobs: statut, progression)
+- range les fichiers produits dans un stockage adressé par contenu
+  (EXPORT_STORE_DIR, file_id = sha256 du contenu), servi par
+  /exports/download/{file_id} sans parcourir le répertoire
+- déduplique les demandes identiques : la clé de requête est le hash du
+  payload de rendu (paramètres + données), donc le même fichier est
+  réutilisé tant que les données sous-jacentes ne changent pas
+
+Usage:
+    job, termine = await soumettre_export(db, tenant_id=..., demandeur_id=...,
+                                          type_export="personnel", rendu=rendre_export_personnel,
+                                          payload={...})
+    job = await termine  # ou retourner job["id"] et laisser le client suivre le statut
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from io import BytesIO
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from services.process_pools import get_process_pool
+
+logger = logging.getLogger(__name__)
+
+EXPORT_STORE_DIR = os.environ.get("EXPORT_STORE_DIR", "/tmp/exports/store")
+EXPORT_ARTIFACT_TTL_SECONDS = int(os.environ.get("EXPORT_ARTIFACT_TTL_SECONDS", "900"))
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", "2"))
+
+_FILE_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Structure: {cle_requete: Future du job en cours} (déduplication des demandes simultanées)
+_en_cours: Dict[str, asyncio.Future] = {}
+
+
+def get_export_pool() -> ProcessPoolExecutor:
+    """Pool de processus partagé pour le rendu des exports (démarré au premier usage)"""
+    return get_process_pool("export", EXPORT_WORKERS)
+
+
+# ==================== STOCKAGE ADRESSÉ PAR CONTENU ====================
+
+def cle_requete(type_export: str, payload: Dict[str, Any]) -> str:
+    """Hash stable du type d'export et de son payload complet (paramètres + données)"""
+    brut = json.dumps({"type": type_export, "payload": payload}, sort_keys=True, default=str)
+    return hashlib.sha256(brut.encode()).hexdigest()
+
+
+def _chemin(nom: str) -> str:
+    return os.path.join(EXPORT_STORE_DIR, nom)
+
+
+def _ecrire_atomique(chemin: str, contenu: bytes):
+    temporaire = f"{chemin}.{uuid.uuid4().hex}.tmp"
+    with open(temporaire, "wb") as f:
+        f.write(contenu)
+    os.replace(temporaire, chemin)
+
+
+def enregistrer_artefact(contenu: bytes, filename: str, media_type: str, cle: Optional[str] = None) -> str:
+    """Range le fichier sous son sha256 et retourne le file_id"""
+    os.makedirs(EXPORT_STORE_DIR, exist_ok=True)
+    file_id = hashlib.sha256(contenu).hexdigest()
+    if not os.path.exists(_chemin(f"{file_id}.bin")):
+        _ecrire_atomique(_chemin(f"{file_id}.bin"), contenu)
+    meta = {"filename": filename, "media_type": media_type, "taille": len(contenu)}
+    _ecrire_atomique(_chemin(f"{file_id}.json"), json.dumps(meta).encode())
+    if cle:
+        _ecrire_atomique(_chemin(f"req-{cle}"), file_id.encode())
+    return file_id
+
+
+def _expire(chemin: str) -> bool:
+    try:
+        return time.time() - os.path.getmtime(chemin) > EXPORT_ARTIFACT_TTL_SECONDS
+    except FileNotFoundError:
+        return True
+
+
+def lire_artefact(file_id: str) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """Retourne (chemin du fichier, métadonnées) ou None si inconnu / expiré"""
+    if not _FILE_ID_RE.match(file_id or ""):
+        return None
+    chemin = _chemin(f"{file_id}.bin")
+    if _expire(chemin):
+        return None
+    try:
+        with open(_chemin(f"{file_id}.json")) as f:
+            return chemin, json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def artefact_pour_requete(cle: str) -> Optional[str]:
+    """file_id déjà produit pour cette requête (mêmes paramètres, mêmes données)"""
+    chemin = _chemin(f"req-{cle}")
+    if _expire(chemin):
+        return None
+    try:
+        with open(chemin) as f:
+            file_id = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return file_id if lire_artefact(file_id) else None
+
+
+def nettoyer_artefacts():
+    """Supprime les fichiers et index expirés"""
+    try:
+        noms = os.listdir(EXPORT_STORE_DIR)
+    except FileNotFoundError:
+        return
+    for nom in noms:
+        chemin = _chemin(nom)
+        if _expire(chemin):
+            try:
+                os.remove(chemin)
+            except OSError:
+                pass
+
+
+# ==================== JOBS ====================
+
+async def _maj_job(db, job: Dict[str, Any], **champs):
+    champs["updated_at"] = datetime.now(timezone.utc).isoformat()
+    job.update(champs)
+    await db.export_jobs.update_one({"id": job["id"]}, {"$set": champs})
+
+
+async def _executer_job(db, job: Dict[str, Any], cle: str, rendu: Callable, payload: Dict[str, Any]):
+    try:
+        await _maj_job(db, job, status="en_cours", progress=10)
+        loop = asyncio.get_running_loop()
+        contenu, filename, media_type = await loop.run_in_executor(get_export_pool(), rendu, payload)
+        file_id = await asyncio.to_thread(enregistrer_artefact, contenu, filename, media_type, cle)
+        await _maj_job(db, job, status="termine", progress=100, file_id=file_id, filename=filename)
+        logger.info(f"📄 Export {job['type']} terminé: {filename} ({len(contenu)} octets)")
+    except Exception as e:
+        logger.error(f"❌ Export {job['type']} échoué: {e}")
+        await _maj_job(db, job, status="erreur", error=str(e))
+    finally:
+        _en_cours.pop(cle, None)
+    return job
+
+
+async def soumettre_export(
+    db,
+    tenant_id: str,
+    demandeur_id: str,
+    type_export: str,
+    rendu: Callable[[Dict[str, Any]], Tuple[bytes, str, str]],
+    payload: Dict[str, Any]
+) -> Tuple[Dict[str, Any], asyncio.Future]:
+    """
+    Crée le job d'export et lance le rendu en arrière-plan.
+    `rendu` doit être une fonction de module (exécutée dans un autre processus).
+    Retourne (job, futur) ; le futur se résout avec le job terminé (ou en erreur).
+    """
+    cle = cle_requete(type_export, payload)
+    maintenant = datetime.now(timezone.utc).isoformat()
+    job = {
+        "id": str(uuid.uuid4()),
+        "tenant_id": tenant_id,
+        "demandeur_id": demandeur_id,
+        "type": type_export,
+        "cle_requete": cle,
+        "status": "en_attente",
+        "progress": 0,
+        "file_id": None,
+        "filename": None,
+        "error": None,
+        "created_at": maintenant,
+        "updated_at": maintenant
+    }
+
+    loop = asyncio.get_running_loop()
+    file_id = await asyncio.to_thread(artefact_pour_requete, cle)
+    if file_id:
+        meta = lire_artefact(file_id)
+        job.update(status="termine", progress=100, file_id=file_id,
+                   filename=meta[1]["filename"] if meta else None, deduplique=True)
+        await db.export_jobs.insert_one(dict(job))
+        futur = loop.create_future()
+        futur.set_result(job)
+        return job, futur
+
+    await db.export_jobs.insert_one(dict(job))
+
+    en_cours = _en_cours.get(cle)
+    if en_cours is not None and not en_cours.done():
+        # Même demande déjà en rendu: partager son résultat
+        async def suivre():
+            resultat = await asyncio.shield(en_cours)
+            champs = {k: resultat.get(k) for k in ("status", "progress", "file_id", "filename", "error")}
+            await _maj_job(db, job, deduplique=True, **champs)
+            return job
+        return job, asyncio.ensure_future(suivre())
+
+    futur = asyncio.ensure_future(_executer_job(db, job, cle, rendu, payload))
+    _en_cours[cle] = futur
+    return job, futur
+
+
+# ==================== RENDUS CONSTRUITS DANS LA ROUTE ====================
+
+def _construire_pdf(doc, elements, options: Dict[str, Any]) -> bytes:
+    doc.build(elements, **options)
+    return doc.filename.getvalue()
+
+
+def _enregistrer_classeur(wb) -> bytes:
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+async def construire_pdf_hors_boucle(doc, elements, **options) -> BytesIO:
+    """
+    Pour les exports dont le document est construit dans la route : le
+    document (écrit dans un BytesIO) et ses flowables sont transférés au pool
+    d'export, où s'exécute la mise en page (doc.build). Les callbacks de page
+    (onFirstPage / onLaterPages) doivent être des fonctions de module.
+    Retourne le PDF dans un buffer positionné au début.
+    """
+    loop = asyncio.get_running_loop()
+    return BytesIO(await loop.run_in_executor(get_export_pool(), _construire_pdf, doc, elements, options))
+
+
+async def enregistrer_classeur_hors_boucle(wb) -> BytesIO:
+    """Sérialise un classeur openpyxl dans le pool d'export (wb.save)"""
+    loop = asyncio.get_running_loop()
+    return BytesIO(await loop.run_in_executor(get_export_pool(), _enregistrer_classeur, wb))
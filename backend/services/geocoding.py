@@ -0,0 +1,241 @@
+"""
+Service de géocodage (Nominatim)
+================================
+
+Géocodage des adresses de bâtiments avec :
+
+- un cache persistant (collection geocodage_cache) indexé par adresse
+  normalisée (utils/address_utils.generate_address_key + ville + province) :
+  une adresse déjà vue n'est jamais regéocodée. Les adresses introuvables
+  sont aussi mises en cache, et retentées après GEOCODING_NEGATIVE_TTL_DAYS.
+- un client HTTP partagé (keep-alive) au lieu d'un client par adresse
+- une file limitée en débit : GEOCODING_MIN_INTERVAL_SECONDS entre deux
+  requêtes (1 s pour le service public) et GEOCODING_CONCURRENCY requêtes
+  simultanées. Une instance Nominatim locale (GEOCODING_URL) peut être
+  ciblée avec un intervalle nul et une concurrence plus élevée.
+- une écriture du cache par paquets de GEOCODING_CACHE_BATCH résultats, au
+  fil des réponses : un import interrompu conserve ce qui a été résolu.
+
+Usage:
+    resultats = await geocoder_lot(db, [{"address": "...", "city": "..."}])
+    # -> [(lat, lon) ou (None, None)], dans l'ordre des adresses
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+from pymongo import UpdateOne
+
+from utils.address_utils import generate_address_key, normalize_address
+
+logger = logging.getLogger(__name__)
+
+GEOCODING_URL = os.environ.get("GEOCODING_URL", "https://nominatim.openstreetmap.org").rstrip("/")
+GEOCODING_CONCURRENCY = int(os.environ.get("GEOCODING_CONCURRENCY", "1"))
+GEOCODING_MIN_INTERVAL_SECONDS = float(os.environ.get("GEOCODING_MIN_INTERVAL_SECONDS", "1.0"))
+GEOCODING_NEGATIVE_TTL_DAYS = int(os.environ.get("GEOCODING_NEGATIVE_TTL_DAYS", "30"))
+GEOCODING_USER_AGENT = os.environ.get("GEOCODING_USER_AGENT", "ProFireManager/1.0")
+GEOCODING_CACHE_BATCH = int(os.environ.get("GEOCODING_CACHE_BATCH", "50"))
+
+Coordonnees = Tuple[Optional[float], Optional[float]]
+
+
+def cle_geocodage(address: str, city: str, province: str = "Québec") -> str:
+    """Clé de cache: adresse normalisée + ville + province"""
+    return "|".join([
+        generate_address_key(address),
+        normalize_address(city or ""),
+        normalize_address(province or "")
+    ])
+
+
+class LimiteurDebit:
+    """Espace les départs de requêtes d'au moins `intervalle` secondes (toutes tâches confondues)"""
+
+    def __init__(self, intervalle: float):
+        self.intervalle = intervalle
+        self._prochain = 0.0
+        self._verrou: Optional[asyncio.Lock] = None
+
+    async def attendre(self):
+        if self.intervalle <= 0:
+            return
+        if self._verrou is None:
+            self._verrou = asyncio.Lock()
+        async with self._verrou:
+            attente = self._prochain - time.monotonic()
+            if attente > 0:
+                await asyncio.sleep(attente)
+            self._prochain = time.monotonic() + self.intervalle
+
+
+class Geocodeur:
+    """Client Nominatim partagé avec limite de débit et de concurrence"""
+
+    def __init__(self, url: str = GEOCODING_URL, concurrence: int = GEOCODING_CONCURRENCY,
+                 intervalle: float = GEOCODING_MIN_INTERVAL_SECONDS,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.url = url
+        self.transport = transport
+        self.concurrence = max(1, concurrence)
+        self.limiteur = LimiteurDebit(intervalle)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._boucle = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _preparer(self):
+        # Client et sémaphore liés à la boucle courante (recréés si elle change)
+        boucle = asyncio.get_running_loop()
+        if self._client is None or self._boucle is not boucle:
+            self._client = httpx.AsyncClient(
+                base_url=self.url,
+                headers={"User-Agent": GEOCODING_USER_AGENT},
+                timeout=10.0,
+                transport=self.transport,
+                limits=httpx.Limits(max_connections=self.concurrence, max_keepalive_connections=self.concurrence)
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrence)
+            self.limiteur = LimiteurDebit(self.limiteur.intervalle)
+            self._boucle = boucle
+
+    async def geocoder(self, address: str, city: str, province: str = "Québec",
+                       country: str = "Canada") -> Tuple[Coordonnees, bool]:
+        """
+        Retourne ((lat, lon), definitif). `definitif` est faux pour une erreur
+        réseau / HTTP ou une réponse illisible (page de limitation HTML,
+        coordonnées absentes), auquel cas le résultat ne doit pas être mis en cache.
+        """
+        self._preparer()
+        async with self._semaphore:
+            await self.limiteur.attendre()
+            try:
+                response = await self._client.get("/search", params={
+                    "q": f"{address}, {city}, {province}, {country}",
+                    "format": "json",
+                    "limit": 1
+                })
+            except httpx.HTTPError as e:
+                logger.warning(f"⚠️ Géocodage '{address}, {city}': {e}")
+                return (None, None), False
+
+        if response.status_code != 200:
+            logger.warning(f"⚠️ Géocodage '{address}, {city}': HTTP {response.status_code}")
+            return (None, None), False
+        try:
+            data = response.json()
+            if data:
+                return (float(data[0]["lat"]), float(data[0]["lon"])), True
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            logger.warning(f"⚠️ Géocodage '{address}, {city}': réponse illisible ({e})")
+            return (None, None), False
+        return (None, None), True
+
+    async def fermer(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+_geocodeur: Optional[Geocodeur] = None
+
+
+def get_geocodeur() -> Geocodeur:
+    global _geocodeur
+    if _geocodeur is None:
+        _geocodeur = Geocodeur()
+    return _geocodeur
+
+
+def _entree_valide(entree: Dict[str, Any]) -> bool:
+    if entree.get("latitude") is not None:
+        return True
+    try:
+        date = datetime.fromisoformat(entree.get("updated_at", ""))
+    except (TypeError, ValueError):
+        return False
+    return datetime.now(timezone.utc) - date < timedelta(days=GEOCODING_NEGATIVE_TTL_DAYS)
+
+
+async def geocoder_lot(db, adresses: List[Dict[str, str]], geocodeur: Optional[Geocodeur] = None) -> List[Coordonnees]:
+    """
+    Géocode un lot d'adresses ({address, city, province?, country?}).
+    Seules les adresses jamais vues (ou dont l'échec a expiré) sont envoyées
+    au géocodeur, une seule fois chacune même si elles se répètent dans le lot.
+    """
+    geocodeur = geocodeur or get_geocodeur()
+
+    cles = []
+    a_geocoder: Dict[str, Dict[str, str]] = {}
+    for adresse in adresses:
+        if not adresse.get("address") or not adresse.get("city"):
+            cles.append(None)
+            continue
+        cle = cle_geocodage(adresse["address"], adresse["city"], adresse.get("province", "Québec"))
+        cles.append(cle)
+        a_geocoder.setdefault(cle, adresse)
+
+    connues: Dict[str, Coordonnees] = {}
+    if a_geocoder:
+        async for entree in db.geocodage_cache.find({"cle": {"$in": list(a_geocoder)}}, {"_id": 0}):
+            if _entree_valide(entree):
+                connues[entree["cle"]] = (entree.get("latitude"), entree.get("longitude"))
+
+    nouvelles = [cle for cle in a_geocoder if cle not in connues]
+    if nouvelles:
+        debut = time.time()
+
+        async def geocoder_cle(cle: str) -> Tuple[str, Coordonnees, bool]:
+            adresse = a_geocoder[cle]
+            try:
+                coordonnees, definitif = await geocodeur.geocoder(
+                    adresse["address"], adresse["city"],
+                    adresse.get("province", "Québec"), adresse.get("country", "Canada")
+                )
+            except Exception as e:
+                logger.warning(f"⚠️ Géocodage '{adresse['address']}, {adresse['city']}': {e}")
+                return cle, (None, None), False
+            return cle, coordonnees, definitif
+
+        taches = [asyncio.ensure_future(geocoder_cle(cle)) for cle in nouvelles]
+        operations = []
+        try:
+            for prochaine in asyncio.as_completed(taches):
+                cle, coordonnees, definitif = await prochaine
+                connues[cle] = coordonnees
+                if definitif:
+                    operations.append(UpdateOne({"cle": cle}, {"$set": {
+                        "cle": cle,
+                        "adresse": a_geocoder[cle]["address"],
+                        "ville": a_geocoder[cle]["city"],
+                        "latitude": coordonnees[0],
+                        "longitude": coordonnees[1],
+                        "updated_at": datetime.now(timezone.utc).isoformat()
+                    }}, upsert=True))
+                if len(operations) >= GEOCODING_CACHE_BATCH:
+                    await _ecrire_cache(db, operations)
+                    operations = []
+            if operations:
+                await _ecrire_cache(db, operations)
+        finally:
+            for tache in taches:
+                tache.cancel()
+
+        logger.info(
+            f"🌍 Géocodage: {len(nouvelles)} nouvelles adresses en {time.time() - debut:.1f}s, "
+            f"{len(a_geocoder) - len(nouvelles)} depuis le cache"
+        )
+
+    return [connues.get(cle, (None, None)) if cle else (None, None) for cle in cles]
+
+
+async def _ecrire_cache(db, operations: List[UpdateOne]):
+    """Upsert d'un paquet d'entrées du cache (une erreur n'interrompt pas le géocodage)"""
+    try:
+        await db.geocodage_cache.bulk_write(operations, ordered=False)
+    except Exception as e:
+        logger.warning(f"⚠️ Écriture du cache de géocodage ({len(operations)} entrées): {e}")
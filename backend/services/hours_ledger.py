@@ -0,0 +1,229 @@
+"""
+Registre des heures
+===================
+
+Cumul d'heures par utilisateur partagé par l'attribution automatique
+(planning_auto) et la recherche de remplaçants, pour que les deux comptent
+les heures de la même façon :
+
+- durée = duree_heures du type de garde (8h par défaut)
+- heures internes et externes séparées (les gardes externes ne comptent pas
+  vers le maximum hebdomadaire)
+- cumul par jour, par semaine ISO et par période d'équité
+
+Le registre est mis à jour de façon incrémentale (ajout / retrait
+d'assignation). Un cache par tenant, à durée de vie limitée, évite de
+recalculer les heures à chaque recherche de remplaçant ; les routes qui
+écrivent des assignations le tiennent à jour via enregistrer_assignations /
+retirer_assignations, ou l'invalident (invalider_ledger_heures) pour les
+écritures de masse.
+
+Chaque worker uvicorn a son propre cache : les écritures sont signalées sur
+le bus d'invalidation (services/cache_invalidation.py, canal
+"ledger_heures"). Le worker qui écrit met son registre à jour de façon
+incrémentale, les autres évincent le registre du tenant.
+"""
+
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from services.cache_invalidation import get_bus_invalidation
+
+logger = logging.getLogger(__name__)
+
+# Durée de vie d'un registre en cache (filet de sécurité pour les écritures non suivies)
+LEDGER_TTL_SECONDES = int(os.environ.get("HOURS_LEDGER_TTL_SECONDS", "300"))
+# Nombre maximum de plages en cache par tenant
+LEDGER_MAX_PLAGES = 12
+CANAL_INVALIDATION_LEDGER = "ledger_heures"
+# Identifie les écritures de ce worker (déjà appliquées localement)
+_ORIGINE = str(os.getpid())
+
+
+@lru_cache(maxsize=4096)
+def semaine_iso(date_str: str) -> Optional[Tuple[int, int]]:
+    """Retourne (année ISO, numéro de semaine ISO) pour une date 'YYYY-MM-DD'."""
+    try:
+        iso = datetime.strptime(date_str, "%Y-%m-%d").isocalendar()
+    except (TypeError, ValueError):
+        return None
+    return (iso[0], iso[1])
+
+
+class HoursLedger:
+    """Cumul incrémental des heures internes / externes par utilisateur"""
+
+    def __init__(self, types_garde: Iterable[Dict[str, Any]], assignations: Iterable[Dict[str, Any]] = ()):
+        self.types_garde_map: Dict[str, Dict[str, Any]] = {t["id"]: t for t in types_garde}
+        # Structure: {(user_id, est_externe): {date: heures}}
+        self.heures_par_jour: Dict[Tuple[str, bool], Dict[str, float]] = defaultdict(lambda: defaultdict(int))
+        # Structure: {(user_id, semaine_iso, est_externe): heures}
+        self.heures_par_semaine: Dict[Tuple[str, Tuple[int, int], bool], float] = defaultdict(int)
+
+        for assignation in assignations:
+            self.ajouter_assignation(assignation)
+
+    def get_type_garde(self, type_garde_id: str) -> Optional[Dict[str, Any]]:
+        return self.types_garde_map.get(type_garde_id)
+
+    def duree_assignation(self, assignation: Dict[str, Any]) -> Optional[Tuple[float, bool]]:
+        """Retourne (heures, est_externe), ou None si le type de garde est inconnu"""
+        type_garde = self.types_garde_map.get(assignation.get("type_garde_id"))
+        if type_garde is None:
+            return None
+        duree = type_garde.get("duree_heures", 8) or 0
+        return duree, bool(type_garde.get("est_garde_externe", False))
+
+    def _appliquer(self, assignation: Dict[str, Any], signe: int):
+        date_str = assignation.get("date")
+        semaine = semaine_iso(date_str)
+        duree = self.duree_assignation(assignation)
+        if semaine is None or duree is None:
+            return
+
+        heures, est_externe = duree
+        user_id = assignation.get("user_id")
+        self.heures_par_jour[(user_id, est_externe)][date_str] += signe * heures
+        self.heures_par_semaine[(user_id, semaine, est_externe)] += signe * heures
+
+    def ajouter_assignation(self, assignation: Dict[str, Any]):
+        self._appliquer(assignation, 1)
+
+    def retirer_assignation(self, assignation: Dict[str, Any]):
+        self._appliquer(assignation, -1)
+
+    def heures_semaine(self, user_id: str, date_str: str, externe: bool = False) -> float:
+        """Heures (internes ou externes) dans la semaine ISO contenant date_str"""
+        semaine = semaine_iso(date_str)
+        if semaine is None:
+            return 0
+        return self.heures_par_semaine.get((user_id, semaine, bool(externe)), 0)
+
+    def heures_periode(self, user_id: str, debut: str, fin: str, externe: bool = False,
+                       fin_incluse: bool = True) -> float:
+        """Heures (internes ou externes) d'un utilisateur entre deux dates 'YYYY-MM-DD'"""
+        jours = self.heures_par_jour.get((user_id, bool(externe)), {})
+        return sum(
+            heures for date_str, heures in jours.items()
+            if debut <= date_str and (date_str <= fin if fin_incluse else date_str < fin)
+        )
+
+    def totaux_periode(self, debut: str, fin: str, externe: bool = False,
+                       fin_incluse: bool = True) -> Dict[str, float]:
+        """Retourne {user_id: heures} pour la période (une seule passe)"""
+        totaux: Dict[str, float] = defaultdict(int)
+        for (user_id, est_externe), jours in self.heures_par_jour.items():
+            if est_externe != bool(externe):
+                continue
+            for date_str, heures in jours.items():
+                if debut <= date_str and (date_str <= fin if fin_incluse else date_str < fin):
+                    totaux[user_id] += heures
+        return totaux
+
+
+# ==================== CACHE PAR TENANT ====================
+
+class _LedgerEnCache:
+    def __init__(self, ledger: HoursLedger, debut: str, fin: str):
+        self.ledger = ledger
+        self.debut = debut
+        self.fin = fin
+        self.expire_a = time.monotonic() + LEDGER_TTL_SECONDES
+
+
+# Structure: {tenant_id: {(debut, fin): _LedgerEnCache}}
+_ledgers: Dict[str, Dict[Tuple[str, str], _LedgerEnCache]] = defaultdict(dict)
+# Incrémenté à chaque écriture signalée, pour ne pas mettre en cache un registre
+# dont le chargement a croisé une écriture
+_generations: Dict[str, int] = defaultdict(int)
+
+
+def plage_mois_complet(date_str: str) -> Tuple[str, str]:
+    """
+    Mois de date_str étendu aux semaines ISO complètes (lundi → dimanche),
+    de sorte qu'une seule plage couvre l'équité mensuelle ET la semaine de
+    n'importe quelle date du mois.
+    """
+    debut_mois = datetime.strptime(date_str, "%Y-%m-%d").replace(day=1)
+    fin_mois = (debut_mois + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    debut = debut_mois - timedelta(days=debut_mois.weekday())
+    fin = fin_mois + timedelta(days=6 - fin_mois.weekday())
+    return debut.strftime("%Y-%m-%d"), fin.strftime("%Y-%m-%d")
+
+
+async def obtenir_ledger_heures(db, tenant_id: str, date_debut: str, date_fin: str) -> HoursLedger:
+    """Registre des heures du tenant couvrant [date_debut, date_fin] (en cache si possible)"""
+    maintenant = time.monotonic()
+    plages = _ledgers[tenant_id]
+    for cle, entree in list(plages.items()):
+        if entree.expire_a <= maintenant:
+            del plages[cle]
+        elif entree.debut <= date_debut and date_fin <= entree.fin:
+            return entree.ledger
+
+    generation = _generations[tenant_id]
+    types_garde = await db.types_garde.find({"tenant_id": tenant_id}, {"_id": 0}).to_list(length=None)
+    assignations = await db.assignations.find({
+        "tenant_id": tenant_id,
+        "date": {"$gte": date_debut, "$lte": date_fin}
+    }, {"_id": 0, "user_id": 1, "date": 1, "type_garde_id": 1}).to_list(length=None)
+    ledger = HoursLedger(types_garde, assignations)
+
+    if _generations[tenant_id] == generation:
+        if len(plages) >= LEDGER_MAX_PLAGES:
+            plus_ancienne = min(plages, key=lambda c: plages[c].expire_a)
+            del plages[plus_ancienne]
+        plages[(date_debut, date_fin)] = _LedgerEnCache(ledger, date_debut, date_fin)
+    logger.debug(f"📒 Registre des heures chargé: tenant={tenant_id}, {date_debut} → {date_fin}, {len(assignations)} assignations")
+    return ledger
+
+
+def _evincer_ledgers(cle: Optional[dict]):
+    if not cle or not cle.get("tenant_id"):
+        for tid in list(_ledgers):
+            _generations[tid] += 1
+        _ledgers.clear()
+        return
+    if cle.get("origine") == _ORIGINE:
+        # Écriture de ce worker: registre déjà mis à jour de façon incrémentale
+        return
+    _generations[cle["tenant_id"]] += 1
+    _ledgers.pop(cle["tenant_id"], None)
+
+
+get_bus_invalidation().abonner(CANAL_INVALIDATION_LEDGER, _evincer_ledgers)
+
+
+def _appliquer_aux_ledgers(tenant_id: str, assignations: List[Dict[str, Any]], signe: int):
+    _generations[tenant_id] += 1
+    for entree in _ledgers.get(tenant_id, {}).values():
+        for assignation in assignations:
+            if entree.debut <= (assignation.get("date") or "") <= entree.fin:
+                entree.ledger._appliquer(assignation, signe)
+    get_bus_invalidation().publier(CANAL_INVALIDATION_LEDGER, {"tenant_id": tenant_id, "origine": _ORIGINE})
+
+
+def enregistrer_assignations(tenant_id: str, assignations: List[Dict[str, Any]]):
+    """À appeler après l'insertion d'assignations (mise à jour incrémentale du cache)"""
+    _appliquer_aux_ledgers(tenant_id, assignations, 1)
+
+
+def retirer_assignations(tenant_id: str, assignations: List[Dict[str, Any]]):
+    """À appeler après la suppression (ou la réaffectation) d'assignations connues"""
+    _appliquer_aux_ledgers(tenant_id, assignations, -1)
+
+
+def reaffecter_assignation(tenant_id: str, assignation: Dict[str, Any], nouveau_user_id: str):
+    """À appeler quand une assignation change de titulaire (remplacement accepté)"""
+    retirer_assignations(tenant_id, [assignation])
+    enregistrer_assignations(tenant_id, [{**assignation, "user_id": nouveau_user_id}])
+
+
+def invalider_ledger_heures(tenant_id: Optional[str] = None):
+    """Vide le cache d'un tenant (ou de tous) sur tous les workers après une écriture de masse"""
+    get_bus_invalidation().publier(CANAL_INVALIDATION_LEDGER, {"tenant_id": tenant_id} if tenant_id else None)
@@ -0,0 +1,287 @@
+"""
+Coordination des tâches entre workers
+=====================================
+
+Chaque processus uvicorn démarre le scheduler et les pollings. Sans
+coordination, avec N workers, les jobs quotidiens s'exécutent N fois et les
+répertoires SFTP sont lus en parallèle. Ce module s'appuie sur MongoDB :
+
+- job_workers : chaque worker s'enregistre et renouvelle son inscription
+  (battement toutes les JOB_HEARTBEAT_SECONDS). Un worker qui ne bat plus
+  disparaît après JOB_LEASE_TTL_SECONDS.
+- job_leases : baux exclusifs à durée limitée (propriétaire + expiration),
+  renouvelés à chaque battement. Le bail "leader" élit un worker pour les
+  boucles périodiques (timeouts de remplacements).
+- job_executions : un enregistrement par (job, échéance). Le premier worker
+  qui l'insère exécute le job, les autres l'ignorent : un job planifié
+  s'exécute une seule fois par échéance, quel que soit le nombre de workers.
+- pollings : chaque clé (sftp:{tenant}, cauca:{tenant}...) est attribuée à un
+  worker par hachage de rendez-vous sur les workers vivants, qui prend le
+  bail correspondant. Les tenants sont répartis entre les workers et un
+  worker arrêté voit ses tenants repris au battement suivant.
+
+Usage:
+    coordinateur = init_coordinateur(db)
+    await coordinateur.demarrer()
+    scheduler.add_job(coordinateur.tache_planifiee("check_equipment_alerts", job), CronTrigger(...))
+    if await coordinateur.posseder(f"sftp:{tenant_id}"):
+        ...  # ce worker est le seul à interroger ce SFTP
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import logging
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, List, Optional, Set
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+JOB_HEARTBEAT_SECONDS = float(os.environ.get("JOB_HEARTBEAT_SECONDS", "10"))
+JOB_LEASE_TTL_SECONDS = float(os.environ.get("JOB_LEASE_TTL_SECONDS", "30"))
+# Conservation des enregistrements d'exécution (index TTL sur expire_at)
+JOB_EXECUTIONS_RETENTION_DAYS = int(os.environ.get("JOB_EXECUTIONS_RETENTION_DAYS", "30"))
+
+BAIL_LEADER = "leader"
+
+# Enregistrement job_executions du job en cours (pour y joindre des métriques)
+_execution_courante: contextvars.ContextVar = contextvars.ContextVar("execution_courante", default=None)
+
+
+def _maintenant() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _poids(worker_id: str, cle: str) -> int:
+    return int.from_bytes(hashlib.sha1(f"{worker_id}|{cle}".encode()).digest()[:8], "big")
+
+
+def attribuer(cle: str, workers: List[str]) -> Optional[str]:
+    """Worker responsable d'une clé (hachage de rendez-vous: peu de réattributions quand un worker part)"""
+    if not workers:
+        return None
+    return max(workers, key=lambda worker_id: _poids(worker_id, cle))
+
+
+class CoordinateurTaches:
+    """Baux, élection du leader et exécutions uniques pour un worker"""
+
+    def __init__(self, db, worker_id: Optional[str] = None):
+        self.db = db
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.baux: Set[str] = set()
+        self.workers: List[str] = [self.worker_id]
+        self._tache: Optional[asyncio.Task] = None
+
+    @property
+    def est_leader(self) -> bool:
+        return BAIL_LEADER in self.baux
+
+    # ======================== BAUX ========================
+
+    async def acquerir_bail(self, nom: str) -> bool:
+        """Prend (ou prolonge) le bail `nom` s'il est libre, expiré ou déjà à ce worker"""
+        maintenant = _maintenant()
+        try:
+            await self.db.job_leases.find_one_and_update(
+                {"_id": nom, "$or": [{"owner": self.worker_id}, {"expires_at": {"$lt": maintenant}}]},
+                {"$set": {
+                    "owner": self.worker_id,
+                    "expires_at": maintenant + timedelta(seconds=JOB_LEASE_TTL_SECONDS),
+                    "heartbeat_at": maintenant
+                }},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            # Bail valide détenu par un autre worker
+            self.baux.discard(nom)
+            return False
+        if nom not in self.baux:
+            logger.info(f"🔒 Bail '{nom}' acquis par {self.worker_id}")
+        self.baux.add(nom)
+        return True
+
+    async def liberer_bail(self, nom: str):
+        self.baux.discard(nom)
+        await self.db.job_leases.delete_one({"_id": nom, "owner": self.worker_id})
+
+    async def _renouveler_baux(self):
+        maintenant = _maintenant()
+        for nom in list(self.baux):
+            resultat = await self.db.job_leases.update_one(
+                {"_id": nom, "owner": self.worker_id},
+                {"$set": {
+                    "expires_at": maintenant + timedelta(seconds=JOB_LEASE_TTL_SECONDS),
+                    "heartbeat_at": maintenant
+                }}
+            )
+            if resultat.matched_count == 0:
+                logger.warning(f"⚠️ Bail '{nom}' perdu par {self.worker_id}")
+                self.baux.discard(nom)
+
+    # ======================== WORKERS ========================
+
+    async def battement(self):
+        """Inscription du worker, renouvellement des baux, élection du leader"""
+        maintenant = _maintenant()
+        await self.db.job_workers.update_one(
+            {"_id": self.worker_id},
+            {"$set": {
+                "host": socket.gethostname(),
+                "pid": os.getpid(),
+                "heartbeat_at": maintenant,
+                "expires_at": maintenant + timedelta(seconds=JOB_LEASE_TTL_SECONDS)
+            }},
+            upsert=True
+        )
+        vivants = await self.db.job_workers.find(
+            {"expires_at": {"$gt": maintenant}}, {"_id": 1}
+        ).to_list(length=None)
+        self.workers = sorted({w["_id"] for w in vivants} | {self.worker_id})
+
+        await self._renouveler_baux()
+        await self.acquerir_bail(BAIL_LEADER)
+
+    async def _boucle(self):
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                await self.battement()
+            except Exception as e:
+                logger.error(f"❌ Battement du coordinateur {self.worker_id}: {e}")
+
+    async def demarrer(self):
+        if self._tache is None:
+            await self.battement()
+            self._tache = asyncio.create_task(self._boucle())
+            logger.info(f"🤝 Coordinateur de tâches démarré ({self.worker_id}, {len(self.workers)} worker(s))")
+
+    async def arreter(self):
+        """Libère les baux tout de suite pour que les autres workers reprennent sans attendre l'expiration"""
+        if self._tache is not None:
+            self._tache.cancel()
+            try:
+                await self._tache
+            except asyncio.CancelledError:
+                pass
+            self._tache = None
+        for nom in list(self.baux):
+            await self.liberer_bail(nom)
+        await self.db.job_workers.delete_one({"_id": self.worker_id})
+
+    # ======================== POLLINGS ========================
+
+    def est_attribue(self, cle: str) -> bool:
+        return attribuer(cle, self.workers) == self.worker_id
+
+    async def posseder(self, cle: str) -> bool:
+        """
+        Vrai si ce worker doit traiter `cle` maintenant: la clé lui est attribuée
+        et il détient son bail. Un worker qui n'est plus responsable rend le bail.
+        """
+        nom = f"poll:{cle}"
+        if not self.est_attribue(cle):
+            if nom in self.baux:
+                await self.liberer_bail(nom)
+                logger.info(f"↪️ Polling '{cle}' cédé par {self.worker_id}")
+            return False
+        if nom in self.baux:
+            return True
+        return await self.acquerir_bail(nom)
+
+    # ======================== JOBS PLANIFIÉS ========================
+
+    async def executer_une_fois(self, nom: str, echeance: datetime, job: Callable[[], Awaitable]) -> bool:
+        """
+        Exécute `job` si aucun worker ne l'a déjà fait pour cette échéance.
+        Retourne False si l'exécution a été prise par un autre worker.
+        """
+        debut = _maintenant()
+        execution_id = f"{nom}@{echeance.isoformat()}"
+        try:
+            await self.db.job_executions.insert_one({
+                "_id": execution_id,
+                "job": nom,
+                "echeance": echeance,
+                "worker": self.worker_id,
+                "statut": "en_cours",
+                "debut": debut,
+                "expire_at": debut + timedelta(days=JOB_EXECUTIONS_RETENTION_DAYS)
+            })
+        except DuplicateKeyError:
+            logger.debug(f"Job {execution_id} déjà pris par un autre worker")
+            return False
+
+        statut, erreur = "termine", None
+        jeton = _execution_courante.set((self.db, execution_id))
+        try:
+            await job()
+        except Exception as e:
+            statut, erreur = "erreur", str(e)
+            logger.error(f"❌ Job {execution_id}: {e}", exc_info=True)
+        finally:
+            _execution_courante.reset(jeton)
+            await self.db.job_executions.update_one(
+                {"_id": execution_id},
+                {"$set": {"statut": statut, "erreur": erreur, "fin": _maintenant()}}
+            )
+        return True
+
+    def tache_planifiee(self, nom: str, job: Callable[[], Awaitable]) -> Callable[[], Awaitable]:
+        """Enveloppe un job cron: l'échéance est la minute de déclenchement, commune à tous les workers"""
+        async def executer():
+            echeance = _maintenant().replace(second=0, microsecond=0)
+            await self.executer_une_fois(nom, echeance, job)
+        executer.__name__ = f"{nom}_coordonne"
+        return executer
+
+
+coordinateur: Optional[CoordinateurTaches] = None
+
+
+def get_coordinateur() -> Optional[CoordinateurTaches]:
+    """Coordinateur du worker, None s'il n'est pas initialisé (scripts, tests)"""
+    return coordinateur
+
+
+def init_coordinateur(db) -> CoordinateurTaches:
+    global coordinateur
+    coordinateur = CoordinateurTaches(db)
+    return coordinateur
+
+
+async def posseder_polling(cle: str) -> bool:
+    """Garde des boucles de polling: sans coordinateur, le worker traite toutes les clés"""
+    if coordinateur is None:
+        return True
+    try:
+        return await coordinateur.posseder(cle)
+    except Exception as e:
+        logger.error(f"❌ Attribution du polling '{cle}': {e}")
+        return False
+
+
+async def liberer_polling(cle: str):
+    """Rend le bail d'un polling arrêté (reprise immédiate possible par un autre worker)"""
+    if coordinateur is None or f"poll:{cle}" not in coordinateur.baux:
+        return
+    try:
+        await coordinateur.liberer_bail(f"poll:{cle}")
+    except Exception as e:
+        logger.error(f"❌ Libération du polling '{cle}': {e}")
+
+
+async def enregistrer_metriques_execution(metriques: dict):
+    """Ajoute des champs à l'enregistrement du job en cours (sans effet hors d'un job coordonné)"""
+    courante = _execution_courante.get()
+    if courante is None:
+        return
+    db, execution_id = courante
+    await db.job_executions.update_one({"_id": execution_id}, {"$set": metriques})
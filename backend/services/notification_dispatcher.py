@@ -0,0 +1,354 @@
+"""
+Répartiteur de notifications (FCM, Web Push, Resend)
+====================================================
+
+Les SDK d'envoi (firebase_admin, pywebpush, resend) sont synchrones ou lents.
+Appelés directement depuis une route, ils bloquent la boucle asyncio pendant
+les diffusions de remplacements. Ce module les sort du chemin de la requête :
+
+- file bornée + pool de workers asyncio (NOTIFICATION_WORKERS, défaut 4)
+- limite de concurrence par canal (fcm, webpush, email)
+- FCM en multicast par lots de 500 jetons (limite de l'API)
+- appels bloquants exécutés dans un thread (asyncio.to_thread)
+- réessais avec backoff exponentiel pour les erreurs temporaires
+- jetons / abonnements morts supprimés en masse (un delete_many par lot)
+
+Usage:
+    dispatcher = get_notification_dispatcher()
+    dispatcher.soumettre("fcm", envoyer_fcm_multicast, tokens, construire_message)  # retourne immédiatement
+    soumettre_email(params, apres_envoi=historiser)  # retourne immédiatement, historise après l'envoi
+"""
+
+import asyncio
+import logging
+import os
+import random
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_WORKERS = int(os.environ.get("NOTIFICATION_WORKERS", "4"))
+NOTIFICATION_QUEUE_SIZE = int(os.environ.get("NOTIFICATION_QUEUE_SIZE", "10000"))
+NOTIFICATION_MAX_TENTATIVES = int(os.environ.get("NOTIFICATION_MAX_TENTATIVES", "3"))
+NOTIFICATION_DELAI_BASE_SECONDES = float(os.environ.get("NOTIFICATION_DELAI_BASE_SECONDES", "0.5"))
+
+# Appels simultanés maximum par canal
+LIMITES_CANAUX = {
+    "fcm": int(os.environ.get("NOTIFICATION_FCM_CONCURRENCE", "4")),
+    "webpush": int(os.environ.get("NOTIFICATION_WEBPUSH_CONCURRENCE", "16")),
+    "email": int(os.environ.get("NOTIFICATION_EMAIL_CONCURRENCE", "4")),
+}
+
+FCM_TAILLE_LOT = 500  # Maximum de jetons par MulticastMessage
+SEUIL_NETTOYAGE_MORTS = 500
+
+
+class EchecTemporaire(Exception):
+    """Levée par un envoi pour demander un nouvel essai (quota, indisponibilité...)"""
+
+
+@dataclass
+class ResultatEnvoi:
+    """Bilan d'un envoi (même attributs que le BatchResponse FCM utilisé par les routes)"""
+    success_count: int = 0
+    failure_count: int = 0
+    morts: List[Any] = field(default_factory=list)
+
+
+class NotificationDispatcher:
+    """File d'envoi avec pool de workers, limites par canal et réessais"""
+
+    def __init__(
+        self,
+        workers: int = NOTIFICATION_WORKERS,
+        taille_file: int = NOTIFICATION_QUEUE_SIZE,
+        limites: Optional[Dict[str, int]] = None,
+        max_tentatives: int = NOTIFICATION_MAX_TENTATIVES,
+        delai_base: float = NOTIFICATION_DELAI_BASE_SECONDES
+    ):
+        self.nb_workers = workers
+        self.taille_file = taille_file
+        self.limites = {**LIMITES_CANAUX, **(limites or {})}
+        self.max_tentatives = max_tentatives
+        self.delai_base = delai_base
+
+        self._file: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._boucle = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        # Structure: {canal: fonction async(liste d'identifiants morts)}
+        self._nettoyages: Dict[str, Callable[[List[Any]], Awaitable[Any]]] = {}
+        # Structure: {canal: set(identifiants morts en attente de suppression)}
+        self._morts: Dict[str, Set[Any]] = defaultdict(set)
+
+    # ==================== CYCLE DE VIE ====================
+
+    def _assurer_demarre(self):
+        boucle = asyncio.get_running_loop()
+        if self._boucle is boucle and self._workers:
+            return
+        self._boucle = boucle
+        self._file = asyncio.Queue(maxsize=self.taille_file)
+        self._semaphores = {canal: asyncio.Semaphore(limite) for canal, limite in self.limites.items()}
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"notifications-worker-{i}")
+            for i in range(self.nb_workers)
+        ]
+        logger.info(f"📨 Répartiteur de notifications démarré ({self.nb_workers} workers)")
+
+    async def demarrer(self):
+        self._assurer_demarre()
+
+    async def arreter(self, delai: float = 10.0):
+        """Vide la file (au plus `delai` secondes), supprime les morts puis arrête les workers"""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._file.join(), timeout=delai)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ {self._file.qsize()} notification(s) non envoyée(s) à l'arrêt")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self.nettoyer_morts()
+
+    # ==================== SOUMISSION ====================
+
+    def soumettre(self, canal: str, fonction: Callable[..., Awaitable[Any]], *args, **kwargs) -> asyncio.Future:
+        """
+        Met un envoi en file et retourne immédiatement.
+        Le Future retourné peut être attendu pour obtenir le résultat (None en cas
+        d'échec, ou si la file est pleine : l'envoi est alors abandonné).
+        """
+        self._assurer_demarre()
+        futur = self._boucle.create_future()
+        travail = (canal, fonction, args, kwargs, futur)
+        try:
+            self._file.put_nowait(travail)
+        except asyncio.QueueFull:
+            # File pleine: l'envoi est abandonné plutôt que de dépasser la borne
+            logger.error(f"❌ File de notifications pleine ({self.taille_file}), envoi {canal} abandonné")
+            futur.set_result(None)
+        return futur
+
+    async def _executer_avec_reessais(self, canal, fonction, args, kwargs):
+        semaphore = self._semaphores.setdefault(canal, asyncio.Semaphore(4))
+        tentative = 1
+        while True:
+            try:
+                async with semaphore:
+                    return await fonction(*args, **kwargs)
+            except EchecTemporaire as e:
+                if tentative >= self.max_tentatives:
+                    raise
+                delai = self.delai_base * (2 ** (tentative - 1)) * (1 + random.random() / 2)
+                logger.warning(f"🔁 Envoi {canal} en échec temporaire ({e}), nouvel essai dans {delai:.1f}s")
+                await asyncio.sleep(delai)
+                tentative += 1
+
+    async def _worker(self):
+        while True:
+            canal, fonction, args, kwargs, futur = await self._file.get()
+            try:
+                resultat = await self._executer_avec_reessais(canal, fonction, args, kwargs)
+                if isinstance(resultat, ResultatEnvoi) and resultat.morts:
+                    self.signaler_morts(canal, resultat.morts)
+                if not futur.done():
+                    futur.set_result(resultat)
+            except asyncio.CancelledError:
+                if not futur.done():
+                    futur.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"❌ Envoi {canal} échoué: {e}")
+                if not futur.done():
+                    futur.set_result(None)
+            finally:
+                self._file.task_done()
+
+            if self._file.empty() or sum(len(m) for m in self._morts.values()) >= SEUIL_NETTOYAGE_MORTS:
+                await self.nettoyer_morts()
+
+    # ==================== JETONS MORTS ====================
+
+    def enregistrer_nettoyage(self, canal: str, fonction: Callable[[List[Any]], Awaitable[Any]]):
+        """Déclare la suppression en masse des identifiants morts d'un canal"""
+        self._nettoyages[canal] = fonction
+
+    def signaler_morts(self, canal: str, identifiants: List[Any]):
+        self._morts[canal].update(identifiants)
+
+    async def nettoyer_morts(self):
+        for canal, identifiants in list(self._morts.items()):
+            if not identifiants or canal not in self._nettoyages:
+                continue
+            lot = list(identifiants)
+            identifiants.clear()
+            try:
+                await self._nettoyages[canal](lot)
+                logger.info(f"🧹 {len(lot)} destination(s) {canal} invalide(s) supprimée(s)")
+            except Exception as e:
+                logger.error(f"❌ Nettoyage {canal} échoué: {e}")
+
+
+_dispatcher: Optional[NotificationDispatcher] = None
+
+
+def get_notification_dispatcher() -> NotificationDispatcher:
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = NotificationDispatcher()
+    return _dispatcher
+
+
+# ==================== CANAUX ====================
+
+# Erreurs FCM définitives: le jeton ne sera plus jamais valide
+_FCM_ERREURS_MORTES = ("UnregisteredError", "SenderIdMismatchError", "InvalidArgumentError")
+# Erreurs FCM temporaires: le jeton peut être réessayé
+_FCM_ERREURS_TEMPORAIRES = ("UnavailableError", "InternalError", "QuotaExceededError",
+                            "ResourceExhaustedError", "DeadlineExceededError", "UnknownError")
+
+
+async def envoyer_fcm_multicast(
+    messaging,
+    tokens: List[str],
+    construire_message: Callable[[List[str]], Any],
+    max_tentatives: int = NOTIFICATION_MAX_TENTATIVES,
+    delai_base: float = NOTIFICATION_DELAI_BASE_SECONDES
+) -> ResultatEnvoi:
+    """
+    Envoie un MulticastMessage par lot de 500 jetons. Les jetons en erreur
+    temporaire sont réessayés (backoff), les jetons morts sont retournés dans
+    ResultatEnvoi.morts pour une suppression groupée.
+    """
+    resultat = ResultatEnvoi()
+    envoyer_async = getattr(messaging, "send_each_for_multicast_async", None)
+
+    for debut in range(0, len(tokens), FCM_TAILLE_LOT):
+        a_envoyer = tokens[debut:debut + FCM_TAILLE_LOT]
+        for tentative in range(1, max_tentatives + 1):
+            message = construire_message(a_envoyer)
+            if envoyer_async is not None:
+                response = await envoyer_async(message)
+            else:
+                response = await asyncio.to_thread(messaging.send_each_for_multicast, message)
+
+            a_reessayer = []
+            for token, reponse in zip(a_envoyer, response.responses):
+                if reponse.success:
+                    resultat.success_count += 1
+                    continue
+                nom_erreur = type(reponse.exception).__name__
+                if nom_erreur in _FCM_ERREURS_TEMPORAIRES and tentative < max_tentatives:
+                    a_reessayer.append(token)
+                    continue
+                resultat.failure_count += 1
+                logger.error(f"❌ Push failed for token {token[:20]}...: {reponse.exception}")
+                if nom_erreur in _FCM_ERREURS_MORTES:
+                    resultat.morts.append(token)
+
+            if not a_reessayer:
+                break
+            a_envoyer = a_reessayer
+            await asyncio.sleep(delai_base * (2 ** (tentative - 1)))
+
+    logger.info(f"✅ Push notification sent: {resultat.success_count} success, {resultat.failure_count} failures")
+    return resultat
+
+
+async def envoyer_web_push(
+    webpush,
+    WebPushException,
+    subscriptions: List[Dict[str, Any]],
+    payload: str,
+    vapid_private_key: str,
+    vapid_claims: Dict[str, str],
+    concurrence: int = LIMITES_CANAUX["webpush"]
+) -> ResultatEnvoi:
+    """
+    Envoie un Web Push à chaque abonnement (appels pywebpush dans des threads,
+    `concurrence` à la fois). Les abonnements expirés (404/410) sont retournés
+    dans ResultatEnvoi.morts (leur _id) pour une suppression groupée.
+    """
+    resultat = ResultatEnvoi()
+    semaphore = asyncio.Semaphore(concurrence)
+
+    async def envoyer(sub):
+        async with semaphore:
+            for tentative in range(1, NOTIFICATION_MAX_TENTATIVES + 1):
+                try:
+                    await asyncio.to_thread(
+                        webpush,
+                        subscription_info=sub["subscription"],
+                        data=payload,
+                        vapid_private_key=vapid_private_key,
+                        vapid_claims=vapid_claims
+                    )
+                    resultat.success_count += 1
+                    return
+                except WebPushException as e:
+                    statut = e.response.status_code if e.response is not None else None
+                    if statut in (429, 500, 502, 503, 504) and tentative < NOTIFICATION_MAX_TENTATIVES:
+                        await asyncio.sleep(NOTIFICATION_DELAI_BASE_SECONDES * (2 ** (tentative - 1)))
+                        continue
+                    logger.error(f"Web Push échec: {e}")
+                    if statut in (404, 410):
+                        resultat.morts.append(sub["_id"])
+                except Exception as e:
+                    logger.error(f"Web Push erreur: {e}")
+                resultat.failure_count += 1
+                return
+
+    await asyncio.gather(*(envoyer(sub) for sub in subscriptions))
+    logger.info(f"Web Push: {resultat.success_count} succès, {resultat.failure_count} échecs")
+    return resultat
+
+
+def _erreur_email_temporaire(erreur: Exception) -> bool:
+    code = str(getattr(erreur, "code", "") or "")
+    if code in ("429", "500", "502", "503", "504"):
+        return True
+    return type(erreur).__name__ in ("ApplicationError", "ConnectionError", "Timeout",
+                                     "ReadTimeout", "ConnectTimeout")
+
+
+async def _envoyer_resend(params: Dict[str, Any]):
+    import resend
+    try:
+        return await asyncio.to_thread(resend.Emails.send, params)
+    except Exception as e:
+        if _erreur_email_temporaire(e):
+            raise EchecTemporaire(str(e)) from e
+        raise
+
+
+def _id_email(reponse) -> Optional[str]:
+    return reponse.get("id") if isinstance(reponse, dict) else getattr(reponse, "id", None)
+
+
+async def _envoyer_email_puis(params: Dict[str, Any], apres_envoi: Optional[Callable[[Any], Awaitable[Any]]]):
+    reponse = await _envoyer_resend(params)
+    logger.info(f"📧 Email envoyé: {params.get('subject')} -> {params.get('to')} (ID: {_id_email(reponse) or 'N/A'})")
+    if apres_envoi is not None:
+        try:
+            await apres_envoi(reponse)
+        except Exception as e:
+            logger.warning(f"⚠️ Suivi de l'email '{params.get('subject')}' échoué: {e}")
+    return reponse
+
+
+def soumettre_email(
+    params: Dict[str, Any],
+    apres_envoi: Optional[Callable[[Any], Awaitable[Any]]] = None
+) -> asyncio.Future:
+    """
+    Met un email (paramètres de resend.Emails.send) en file et retourne
+    immédiatement. `apres_envoi(reponse)` est exécuté par le worker une fois
+    l'email accepté par Resend (historique des emails). Le Future se résout
+    avec la réponse Resend, ou None si l'envoi a échoué après réessais.
+    """
+    return get_notification_dispatcher().soumettre("email", _envoyer_email_puis, params, apres_envoi)
@@ -0,0 +1,313 @@
+"""
+Stockage d'objets asynchrone (photos, PDFs, certificats)
+========================================================
+
+Les routes async appelaient le BlobServiceClient synchrone : chaque upload de
+photo ou lecture de logo bloquait la boucle d'événements pendant l'aller-retour
+Azure. Ce module expose le même stockage sans blocage, avec deux backends
+(STORAGE_BACKEND) :
+
+- "azure" (défaut) : client aio d'Azure Blob Storage, créé une fois par
+  processus (pool de connexions aiohttp partagé). Upload et download par blocs
+  (STORAGE_CHUNK_SIZE), lectures partielles (offset / longueur) et content type
+  lu dans la réponse de download (pas de get_blob_properties séparé).
+- "filesystem" : arborescence locale sous STORAGE_LOCAL_ROOT, pour le
+  développement hors ligne et les tests. Le content type est conservé dans un
+  fichier .meta.json à côté de l'objet.
+
+Usage:
+    stockage = get_stockage()
+    taille = await stockage.envoyer("profiremanager/t-1/photos/x.jpg", data, "image/jpeg")
+    data, content_type = await stockage.lire(path)
+    flux = await stockage.ouvrir(path, debut=0, longueur=1024)
+    async for bloc in flux.blocs:
+        ...
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import AsyncIterable, AsyncIterator, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "azure")
+STORAGE_LOCAL_ROOT = os.environ.get("STORAGE_LOCAL_ROOT", os.path.join(tempfile.gettempdir(), "pfm_storage"))
+STORAGE_CHUNK_SIZE = int(os.environ.get("STORAGE_CHUNK_SIZE", str(4 * 1024 * 1024)))
+STORAGE_MAX_CONCURRENCY = int(os.environ.get("STORAGE_MAX_CONCURRENCY", "4"))
+
+CONTENT_TYPE_DEFAUT = "application/octet-stream"
+
+Donnees = Union[bytes, AsyncIterable[bytes]]
+
+
+class ObjetIntrouvable(FileNotFoundError):
+    """Objet absent du stockage"""
+
+
+class PlageInvalide(ValueError):
+    """Lecture partielle commençant au-delà de la fin de l'objet"""
+
+    def __init__(self, taille_totale: Optional[int] = None):
+        super().__init__(f"Plage invalide (taille {taille_totale})")
+        self.taille_totale = taille_totale
+
+
+@dataclass
+class FluxObjet:
+    """Lecture (éventuellement partielle) d'un objet: octets [debut, fin] sur `taille_totale`"""
+    content_type: str
+    taille_totale: int
+    debut: int
+    fin: int
+    blocs: AsyncIterator[bytes]
+
+    @property
+    def longueur(self) -> int:
+        return self.fin - self.debut + 1 if self.taille_totale else 0
+
+
+async def lire_fichier_par_blocs(chemin: str, debut: int = 0, longueur: Optional[int] = None,
+                                 taille_bloc: int = STORAGE_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    """Lit un fichier local par blocs sans bloquer la boucle d'événements"""
+    restant = longueur
+    with open(chemin, "rb") as fichier:
+        await asyncio.to_thread(fichier.seek, debut)
+        while restant is None or restant > 0:
+            taille = taille_bloc if restant is None else min(taille_bloc, restant)
+            bloc = await asyncio.to_thread(fichier.read, taille)
+            if not bloc:
+                break
+            if restant is not None:
+                restant -= len(bloc)
+            yield bloc
+
+
+# ======================== AZURE (aio) ========================
+
+class StockageAzure:
+    """Azure Blob Storage via le client asynchrone, partagé par tout le processus"""
+
+    nom = "azure"
+    urls_signees = True
+
+    def __init__(self):
+        self._client = None
+
+    def _get_client(self):
+        if self._client is None:
+            from azure.storage.blob.aio import BlobServiceClient
+            from services.azure_storage import ACCOUNT_NAME, ACCOUNT_KEY, CONTAINER_NAME
+            if not ACCOUNT_NAME or not ACCOUNT_KEY:
+                raise RuntimeError("Azure Storage credentials manquantes (AZURE_STORAGE_ACCOUNT_NAME / AZURE_STORAGE_ACCOUNT_KEY)")
+            self._client = BlobServiceClient(
+                account_url=f"https://{ACCOUNT_NAME}.blob.core.windows.net",
+                credential={"account_name": ACCOUNT_NAME, "account_key": ACCOUNT_KEY},
+                max_block_size=STORAGE_CHUNK_SIZE,
+                max_single_put_size=STORAGE_CHUNK_SIZE,
+                max_chunk_get_size=STORAGE_CHUNK_SIZE
+            )
+            logger.info("Azure Blob Storage (aio) connecté (compte: %s, conteneur: %s)", ACCOUNT_NAME, CONTAINER_NAME)
+        return self._client
+
+    def _blob(self, path: str):
+        from services.azure_storage import CONTAINER_NAME
+        return self._get_client().get_blob_client(CONTAINER_NAME, path)
+
+    async def envoyer(self, path: str, data: Donnees, content_type: str) -> int:
+        from azure.storage.blob import ContentSettings
+        taille = 0
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            taille = len(data)
+            source = data
+        else:
+            async def compter(flux):
+                nonlocal taille
+                async for bloc in flux:
+                    taille += len(bloc)
+                    yield bloc
+            source = compter(data)
+
+        await self._blob(path).upload_blob(
+            source,
+            overwrite=True,
+            content_settings=ContentSettings(content_type=content_type),
+            max_concurrency=STORAGE_MAX_CONCURRENCY
+        )
+        return taille
+
+    async def _download(self, path: str, debut: Optional[int] = None, longueur: Optional[int] = None):
+        from azure.core.exceptions import HttpResponseError, ResourceNotFoundError
+        try:
+            return await self._blob(path).download_blob(
+                offset=debut, length=longueur, max_concurrency=STORAGE_MAX_CONCURRENCY
+            )
+        except ResourceNotFoundError:
+            raise ObjetIntrouvable(path)
+        except HttpResponseError as e:
+            if e.status_code == 416:
+                raise PlageInvalide()
+            raise
+
+    async def lire(self, path: str) -> Tuple[bytes, str]:
+        downloader = await self._download(path)
+        data = await downloader.readall()
+        return data, downloader.properties.content_settings.content_type or CONTENT_TYPE_DEFAUT
+
+    async def ouvrir(self, path: str, debut: int = 0, longueur: Optional[int] = None) -> FluxObjet:
+        # Azure exige un offset dès qu'une longueur est donnée
+        downloader = await self._download(path, debut if (debut or longueur is not None) else None, longueur)
+        proprietes = downloader.properties
+        # properties.size est la taille lue; la taille totale est dans content_range ("bytes 0-99/1234")
+        plage = getattr(proprietes, "content_range", None) or ""
+        taille_totale = int(plage.rsplit("/", 1)[1]) if "/" in plage else proprietes.size
+        return FluxObjet(
+            content_type=proprietes.content_settings.content_type or CONTENT_TYPE_DEFAUT,
+            taille_totale=taille_totale,
+            debut=debut,
+            fin=debut + downloader.size - 1,
+            blocs=downloader.chunks()
+        )
+
+    async def supprimer(self, path: str) -> bool:
+        from azure.core.exceptions import ResourceNotFoundError
+        try:
+            await self._blob(path).delete_blob()
+            return True
+        except ResourceNotFoundError:
+            return False
+
+    async def fermer(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+# ======================== SYSTÈME DE FICHIERS ========================
+
+class StockageFichiers:
+    """Objets stockés sous un répertoire racine (développement local, tests)"""
+
+    nom = "filesystem"
+    urls_signees = False
+
+    def __init__(self, racine: str = STORAGE_LOCAL_ROOT):
+        self.racine = os.path.abspath(racine)
+
+    def _chemin(self, path: str) -> str:
+        chemin = os.path.abspath(os.path.join(self.racine, path.lstrip("/")))
+        if not chemin.startswith(self.racine + os.sep):
+            raise ValueError(f"Chemin de stockage invalide: {path}")
+        return chemin
+
+    def _meta(self, chemin: str) -> dict:
+        try:
+            with open(f"{chemin}.meta.json", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _ecrire_meta(self, chemin: str, content_type: str):
+        with open(f"{chemin}.meta.json", "w", encoding="utf-8") as f:
+            json.dump({"content_type": content_type}, f)
+
+    def ecrire(self, path: str, data: bytes, content_type: str) -> int:
+        """Écriture synchrone (API de compatibilité put_object)"""
+        chemin = self._chemin(path)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        temporaire = f"{chemin}.part"
+        with open(temporaire, "wb") as f:
+            f.write(data)
+        os.replace(temporaire, chemin)
+        self._ecrire_meta(chemin, content_type)
+        return len(data)
+
+    def lire_sync(self, path: str) -> Tuple[bytes, str]:
+        chemin = self._chemin(path)
+        try:
+            with open(chemin, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            raise ObjetIntrouvable(path)
+        return data, self._meta(chemin).get("content_type") or CONTENT_TYPE_DEFAUT
+
+    def supprimer_sync(self, path: str) -> bool:
+        chemin = self._chemin(path)
+        try:
+            os.remove(chemin)
+        except FileNotFoundError:
+            return False
+        try:
+            os.remove(f"{chemin}.meta.json")
+        except FileNotFoundError:
+            pass
+        return True
+
+    async def envoyer(self, path: str, data: Donnees, content_type: str) -> int:
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            return await asyncio.to_thread(self.ecrire, path, bytes(data), content_type)
+
+        chemin = self._chemin(path)
+        await asyncio.to_thread(os.makedirs, os.path.dirname(chemin), exist_ok=True)
+        temporaire = f"{chemin}.part"
+        taille = 0
+        with open(temporaire, "wb") as f:
+            async for bloc in data:
+                await asyncio.to_thread(f.write, bloc)
+                taille += len(bloc)
+        await asyncio.to_thread(os.replace, temporaire, chemin)
+        await asyncio.to_thread(self._ecrire_meta, chemin, content_type)
+        return taille
+
+    async def lire(self, path: str) -> Tuple[bytes, str]:
+        return await asyncio.to_thread(self.lire_sync, path)
+
+    async def ouvrir(self, path: str, debut: int = 0, longueur: Optional[int] = None) -> FluxObjet:
+        chemin = self._chemin(path)
+        try:
+            taille_totale = (await asyncio.to_thread(os.stat, chemin)).st_size
+        except FileNotFoundError:
+            raise ObjetIntrouvable(path)
+        if debut and debut >= taille_totale:
+            raise PlageInvalide(taille_totale)
+        fin = taille_totale - 1 if longueur is None else min(taille_totale, debut + longueur) - 1
+        return FluxObjet(
+            content_type=(await asyncio.to_thread(self._meta, chemin)).get("content_type") or CONTENT_TYPE_DEFAUT,
+            taille_totale=taille_totale,
+            debut=debut,
+            fin=fin,
+            blocs=lire_fichier_par_blocs(chemin, debut, max(0, fin - debut + 1))
+        )
+
+    async def supprimer(self, path: str) -> bool:
+        return await asyncio.to_thread(self.supprimer_sync, path)
+
+    async def fermer(self):
+        pass
+
+
+_stockage = None
+
+
+def get_stockage():
+    """Backend configuré (STORAGE_BACKEND), créé au premier appel"""
+    global _stockage
+    if _stockage is None:
+        if STORAGE_BACKEND == "filesystem":
+            _stockage = StockageFichiers()
+        elif STORAGE_BACKEND == "azure":
+            _stockage = StockageAzure()
+        else:
+            raise ValueError(f"Backend de stockage inconnu: {STORAGE_BACKEND}")
+    return _stockage
+
+
+async def fermer_stockage():
+    """Ferme le client (pool de connexions) à l'arrêt du serveur"""
+    global _stockage
+    if _stockage is not None:
+        await _stockage.fermer()
+        _stockage = None
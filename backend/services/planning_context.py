@@ -0,0 +1,75 @@
+"""
+Contexte de planification indexé
+================================
+
+Index en mémoire utilisés par l'attribution automatique pour éviter de
+rebalayer la liste des assignations et des types de garde à chaque
+vérification de candidat :
+
+- map des types de garde par id
+- cumul d'heures par utilisateur et par semaine ISO (interne / externe),
+  délégué au registre des heures (services/hours_ledger.py)
+- occupation par jour : {date: {type_garde_id: {user_ids}}}
+
+Les index sont mis à jour de façon incrémentale à chaque assignation créée,
+de sorte que chaque vérification coûte O(1).
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Set
+
+from services.hours_ledger import HoursLedger
+
+
+class PlanningContext:
+    """Index incrémental des assignations d'une période de planification"""
+
+    def __init__(self, types_garde: List[Dict[str, Any]], assignations: List[Dict[str, Any]] = None):
+        # Heures par semaine ISO (interne / externe)
+        self.heures = HoursLedger(types_garde)
+        self.types_garde_map: Dict[str, Dict[str, Any]] = self.heures.types_garde_map
+        # Structure: {date: [assignations]} (ordre d'insertion conservé)
+        self.assignations_par_jour: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        # Structure: {date: {type_garde_id: {user_ids}}}
+        self.occupation_par_jour: Dict[str, Dict[str, Set[str]]] = defaultdict(lambda: defaultdict(set))
+
+        for assignation in assignations or []:
+            self.ajouter_assignation(assignation)
+
+    def get_type_garde(self, type_garde_id: str) -> Optional[Dict[str, Any]]:
+        return self.types_garde_map.get(type_garde_id)
+
+    def ajouter_assignation(self, assignation: Dict[str, Any]):
+        """Indexe une assignation (existante ou nouvellement créée)"""
+        date_str = assignation.get("date")
+        user_id = assignation.get("user_id")
+        type_garde_id = assignation.get("type_garde_id")
+
+        self.assignations_par_jour[date_str].append(assignation)
+        self.occupation_par_jour[date_str][type_garde_id].add(user_id)
+        self.heures.ajouter_assignation(assignation)
+
+    def assignations_du_jour(self, date_str: str) -> List[Dict[str, Any]]:
+        return self.assignations_par_jour.get(date_str, [])
+
+    def assignations_garde(self, date_str: str, type_garde_id: str, caserne_id: str = None) -> List[Dict[str, Any]]:
+        """Assignations d'une garde pour un jour (filtrées par caserne si fournie)"""
+        return [
+            a for a in self.assignations_du_jour(date_str)
+            if a.get("type_garde_id") == type_garde_id
+            and (not caserne_id or a.get("caserne_id") == caserne_id)
+        ]
+
+    def users_assignes_garde(self, date_str: str, type_garde_id: str) -> Set[str]:
+        occupation = self.occupation_par_jour.get(date_str)
+        if not occupation:
+            return set()
+        return set(occupation.get(type_garde_id, ()))
+
+    def gardes_occupees_du_jour(self, date_str: str) -> Dict[str, Set[str]]:
+        """Retourne {type_garde_id: {user_ids}} pour un jour"""
+        return self.occupation_par_jour.get(date_str, {})
+
+    def heures_semaine(self, user_id: str, date_str: str, externe: bool = False) -> float:
+        """Heures (internes ou externes) dans la semaine ISO contenant date_str"""
+        return self.heures.heures_semaine(user_id, date_str, externe)
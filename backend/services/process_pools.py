@@ -0,0 +1,46 @@
+"""
+Pools de processus partagés
+===========================
+
+Pools ProcessPoolExecutor nommés pour les calculs CPU sortis de la boucle
+asyncio (rendu des exports, calcul de la paie en lot, solveur d'attribution
+automatique). Chaque pool est démarré au premier usage et tous sont arrêtés
+par le handler de shutdown (arreter_process_pools).
+
+Les processus sont créés en mode spawn : pas de fork d'un processus qui
+détient des threads (Motor, APScheduler). Les fonctions exécutées doivent
+donc être importables au niveau module et leurs arguments sérialisables.
+
+Usage:
+    pool = get_process_pool("export", EXPORT_WORKERS)
+    resultat = await asyncio.get_running_loop().run_in_executor(pool, rendu, payload)
+"""
+
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+# Structure: {nom: ProcessPoolExecutor}
+_pools: Dict[str, ProcessPoolExecutor] = {}
+
+
+def get_process_pool(nom: str, max_workers: int) -> ProcessPoolExecutor:
+    """Pool de processus partagé `nom` (démarré au premier usage)"""
+    pool = _pools.get(nom)
+    if pool is None:
+        pool = _pools[nom] = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        logger.info(f"⚙️ Pool de processus '{nom}' démarré ({max_workers} processus)")
+    return pool
+
+
+def arreter_process_pools():
+    """Arrête tous les pools (shutdown de l'application)"""
+    for nom in list(_pools):
+        _pools.pop(nom).shutdown(wait=False, cancel_futures=True)
+        logger.info(f"✅ Pool de processus '{nom}' arrêté")
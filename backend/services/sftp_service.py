@@ -3,24 +3,53 @@ Service SFTP pour la récupération automatique des cartes d'appel 911
 ====================================================================
 
 Ce service :
-1. Se connecte au serveur SFTP configuré pour chaque tenant
+1. Garde une connexion SFTP ouverte par tenant (services/sftp_sources)
 2. Vérifie périodiquement les nouveaux fichiers XML
 3. Parse les cartes d'appel et les importe dans la base
 4. Supprime les fichiers traités du SFTP
 5. Notifie le frontend via WebSocket en temps réel
+
+Les E/S SFTP s'exécutent dans un pool de threads dédié. Les téléchargements
+alimentent une file asyncio consommée par le parsing et l'enregistrement :
+chaque carte est notifiée dès qu'elle est en base.
 """
 
 import paramiko
 import asyncio
 import logging
 from datetime import datetime, timezone
-from typing import Dict, List, Optional, Any, Set
+from typing import Awaitable, Callable, Dict, List, Optional, Any, Set, Tuple
 from pathlib import Path
+from functools import lru_cache
 import os
 import re
+import time
+import unicodedata
+
+from services.job_coordination import liberer_polling, posseder_polling
+from services.sftp_sources import decoder_contenu, executer_io, get_sftp_pool, nettoyer_hote, ouvrir_source
+from utils.address_index import IndexAdresses
 
 logger = logging.getLogger(__name__)
 
+# Durée de vie de l'index des bâtiments (les cartes d'appel arrivent en rafales)
+BATIMENTS_INDEX_TTL = 60  # secondes
+
+# Intervalle minimal de polling (connexion persistante: un cycle vide = un listage)
+SFTP_POLL_MIN_SECONDS = int(os.environ.get("SFTP_POLL_MIN_SECONDS", "10"))
+# Lots téléchargés d'avance pendant le parsing / l'enregistrement des précédents
+SFTP_PIPELINE_DEPTH = int(os.environ.get("SFTP_PIPELINE_DEPTH", "4"))
+
+
+@lru_cache(maxsize=16384)
+def _normaliser_adresse(text) -> str:
+    """Minuscules, sans accents ni ponctuation (comparaison des adresses de cartes d'appel)"""
+    if not text:
+        return ''
+    text = unicodedata.normalize('NFD', str(text))
+    text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
+    return text.lower().replace(',', ' ').replace('.', ' ').replace('-', ' ').strip()
+
 
 class SFTPService:
     """Service de gestion SFTP pour les cartes d'appel 911"""
@@ -28,9 +57,10 @@ class SFTPService:
     def __init__(self, db, websocket_manager=None):
         self.db = db
         self.websocket_manager = websocket_manager
-        self.active_connections: Dict[str, paramiko.SFTPClient] = {}
+        self.active_connections: Dict[str, Any] = {}  # Sources persistantes par clé de polling (services/sftp_sources)
         self.polling_tasks: Dict[str, asyncio.Task] = {}
         self.processed_files: Dict[str, Set[str]] = {}  # Cache des fichiers déjà traités par tenant
+        self._batiments_index: Dict[str, Tuple[float, IndexAdresses]] = {}  # Index d'adresses par tenant
         
     async def get_sftp_config(self, tenant_id: str) -> Optional[Dict]:
         """Récupère la configuration SFTP d'un tenant"""
@@ -40,6 +70,20 @@ class SFTPService:
         )
         return config
     
+    async def _index_batiments(self, tenant_id: str) -> IndexAdresses:
+        """Index des bâtiments du tenant par numéro civique (cache de BATIMENTS_INDEX_TTL secondes)"""
+        maintenant = time.monotonic()
+        cache = self._batiments_index.get(tenant_id)
+        if cache and maintenant - cache[0] < BATIMENTS_INDEX_TTL:
+            return cache[1]
+        batiments = await self.db.batiments.find(
+            {"tenant_id": tenant_id},
+            {"_id": 0, "id": 1, "adresse_civique": 1, "ville": 1, "nom_etablissement": 1}
+        ).to_list(length=None)
+        index = IndexAdresses(batiments, adresse=lambda b: b.get('adresse_civique', ''))
+        self._batiments_index[tenant_id] = (maintenant, index)
+        return index
+
     async def auto_link_batiment(self, tenant_id: str, intervention_data: Dict) -> Optional[str]:
         """
         Recherche automatiquement un bâtiment correspondant à l'adresse de l'intervention.
@@ -50,17 +94,11 @@ class SFTPService:
         - Correspondance partielle adresse: 30 pts
         - Correspondance ville: 30 pts
         - Numéro civique identique: 20 pts
-        """
-        import unicodedata
-        
-        def normalize(text):
-            if not text:
-                return ''
-            # Enlever accents et normaliser
-            text = unicodedata.normalize('NFD', str(text))
-            text = ''.join(c for c in text if unicodedata.category(c) != 'Mn')
-            return text.lower().replace(',', ' ').replace('.', ' ').replace('-', ' ').strip()
         
+        Le seuil de 70 n'est atteignable qu'avec le même numéro civique ou la
+        même adresse exacte : seuls les bâtiments du même bloc de numéro
+        civique (IndexAdresses) sont évalués.
+        """
         # Extraire l'adresse de l'intervention
         address = intervention_data.get('address_street') or intervention_data.get('address_full') or intervention_data.get('address') or ''
         city = intervention_data.get('address_city') or intervention_data.get('municipalite') or ''
@@ -68,8 +106,8 @@ class SFTPService:
         if not address or len(address) < 3:
             return None
         
-        normalized_address = normalize(address)
-        normalized_city = normalize(city)
+        normalized_address = _normaliser_adresse(address)
+        normalized_city = _normaliser_adresse(city)
         
         # Extraire le numéro civique
         address_num = None
@@ -78,19 +116,15 @@ class SFTPService:
             address_num = num_match.group(1)
         
         try:
-            # Rechercher les bâtiments correspondants
-            batiments = await self.db.batiments.find(
-                {"tenant_id": tenant_id},
-                {"_id": 0, "id": 1, "adresse_civique": 1, "ville": 1, "nom_etablissement": 1}
-            ).to_list(500)
+            index = await self._index_batiments(tenant_id)
             
             best_match = None
             best_score = 0
             
-            for bat in batiments:
+            for bat in index.candidats(address):
                 score = 0
-                bat_address = normalize(bat.get('adresse_civique', ''))
-                bat_city = normalize(bat.get('ville', ''))
+                bat_address = _normaliser_adresse(bat.get('adresse_civique', ''))
+                bat_city = _normaliser_adresse(bat.get('ville', ''))
                 
                 # Correspondance adresse
                 if bat_address == normalized_address:
@@ -130,64 +164,27 @@ class SFTPService:
     
     def _clean_host(self, host: str) -> str:
         """Nettoie le hostname en enlevant les protocoles et trailing slashes"""
-        if not host:
-            return host
-        # Enlever les protocoles courants
-        for prefix in ['http://', 'https://', 'sftp://', 'ftp://']:
-            if host.lower().startswith(prefix):
-                host = host[len(prefix):]
-        # Enlever le trailing slash et le path
-        host = host.split('/')[0]
-        # Enlever le port si présent dans l'URL
-        if ':' in host:
-            host = host.split(':')[0]
-        return host.strip()
-    
-    def connect_sftp(self, config: Dict) -> tuple:
-        """
-        Établit une connexion SFTP
-        
-        Returns:
-            tuple: (sftp_client, transport) - Les deux doivent être fermés après usage
-        """
-        host = self._clean_host(config["host"])
-        port = config.get("port", 22)
-        
-        transport = paramiko.Transport((host, port))
-        transport.connect(
-            username=config["username"],
-            password=config["password"]
-        )
-        sftp = paramiko.SFTPClient.from_transport(transport)
-        return sftp, transport
+        return nettoyer_hote(host)
     
-    def close_sftp_connection(self, sftp: paramiko.SFTPClient, transport: paramiko.Transport):
+    def _source(self, cle: str, config: Dict):
         """
-        Ferme proprement une connexion SFTP (client ET transport)
-        
-        IMPORTANT: Toujours appeler cette méthode pour éviter les connexions orphelines
+        Source persistante d'une clé de polling (tenant ou tenant_type).
+        Rouverte si la configuration (hôte, identifiants) a changé.
         """
-        try:
-            if sftp:
-                sftp.close()
-        except Exception as e:
-            logger.warning(f"Erreur fermeture SFTP client: {e}")
-        
-        try:
-            if transport:
-                transport.close()
-        except Exception as e:
-            logger.warning(f"Erreur fermeture transport: {e}")
+        source = ouvrir_source(config)
+        existante = self.active_connections.get(cle)
+        if existante is not None and existante.empreinte == source.empreinte:
+            return existante
+        if existante is not None:
+            get_sftp_pool().submit(existante.fermer)
+        self.active_connections[cle] = source
+        return source
     
-    def disconnect_sftp(self, tenant_id: str):
-        """Ferme une connexion SFTP stockée pour un tenant"""
-        if tenant_id in self.active_connections:
-            try:
-                sftp, transport = self.active_connections[tenant_id]
-                self.close_sftp_connection(sftp, transport)
-            except:
-                pass
-            del self.active_connections[tenant_id]
+    async def disconnect_sftp(self, cle: str):
+        """Ferme la connexion persistante d'une clé de polling"""
+        source = self.active_connections.pop(cle, None)
+        if source is not None:
+            await executer_io(source.fermer)
     
     async def cleanup_all_connections(self):
         """
@@ -209,7 +206,7 @@ class SFTPService:
         connection_tenant_ids = list(self.active_connections.keys())
         for tenant_id in connection_tenant_ids:
             try:
-                self.disconnect_sftp(tenant_id)
+                await self.disconnect_sftp(tenant_id)
                 logger.info(f"  - Connexion fermée pour tenant {tenant_id}")
             except Exception as e:
                 logger.warning(f"  - Erreur fermeture connexion {tenant_id}: {e}")
@@ -220,46 +217,6 @@ class SFTPService:
         
         logger.info(f"✅ Nettoyage SFTP terminé: {len(polling_tenant_ids)} polling(s) arrêté(s), {len(connection_tenant_ids)} connexion(s) fermée(s)")
     
-    def list_xml_files(self, sftp: paramiko.SFTPClient, remote_path: str) -> List[str]:
-        """Liste les fichiers XML dans le répertoire distant"""
-        try:
-            files = sftp.listdir(remote_path)
-            xml_files = [f for f in files if f.lower().endswith('.xml')]
-            return xml_files
-        except Exception as e:
-            logger.error(f"Erreur listdir SFTP: {e}")
-            return []
-    
-    def download_file(self, sftp: paramiko.SFTPClient, remote_path: str, filename: str) -> str:
-        """Télécharge un fichier et retourne son contenu"""
-        try:
-            full_path = f"{remote_path.rstrip('/')}/{filename}"
-            with sftp.open(full_path, 'r') as f:
-                content = f.read()
-                if isinstance(content, bytes):
-                    # Essayer différents encodages
-                    for encoding in ['utf-8', 'iso-8859-1', 'cp1252']:
-                        try:
-                            return content.decode(encoding)
-                        except:
-                            continue
-                    return content.decode('utf-8', errors='replace')
-                return content
-        except Exception as e:
-            logger.error(f"Erreur téléchargement SFTP {filename}: {e}")
-            return None
-    
-    def delete_file(self, sftp: paramiko.SFTPClient, remote_path: str, filename: str) -> bool:
-        """Supprime un fichier du serveur SFTP"""
-        try:
-            full_path = f"{remote_path.rstrip('/')}/{filename}"
-            sftp.remove(full_path)
-            logger.info(f"Fichier supprimé du SFTP: {full_path}")
-            return True
-        except Exception as e:
-            logger.error(f"Erreur suppression SFTP {filename}: {e}")
-            return False
-    
     def group_files_by_intervention(self, filenames: List[str]) -> Dict[str, List[str]]:
         """
         Groupe les fichiers par intervention (basé sur le numéro de carte).
@@ -325,35 +282,36 @@ class SFTPService:
             # Par défaut, considérer comme CAUCA
             return "cauca"
 
+    def _contenus_par_type(self, filenames: List[str], contenus: Dict[str, bytes]) -> Dict[str, str]:
+        """Contenus téléchargés indexés par type de fichier CAUCA (details, ressources...)"""
+        files_content = {}
+        for filename in filenames:
+            file_type = self.identify_file_type(filename)
+            if file_type and contenus.get(filename):
+                files_content[file_type] = decoder_contenu(contenus[filename])
+        return files_content
+
     async def process_intervention_files(
         self, 
         tenant_id: str, 
-        sftp: paramiko.SFTPClient, 
         remote_path: str,
         card_number: str, 
-        filenames: List[str]
+        filenames: List[str],
+        contenus: Dict[str, bytes]
     ) -> Optional[Dict]:
         """
-        Traite les fichiers d'une intervention et crée l'entrée en base
+        Traite les fichiers téléchargés d'une intervention et crée l'entrée en base
         """
         from services.cauca_parser import parse_cauca_intervention
         
-        # Télécharger tous les fichiers
-        files_content = {}
-        for filename in filenames:
-            file_type = self.identify_file_type(filename)
-            if file_type:
-                content = self.download_file(sftp, remote_path, filename)
-                if content:
-                    files_content[file_type] = content
-        
+        files_content = self._contenus_par_type(filenames, contenus)
         if not files_content:
             logger.warning(f"Aucun contenu valide pour la carte {card_number}")
             return None
         
-        # Parser l'intervention
+        # Parser l'intervention (hors de la boucle d'événements)
         try:
-            intervention_data = parse_cauca_intervention(files_content)
+            intervention_data = await asyncio.to_thread(parse_cauca_intervention, files_content)
         except Exception as e:
             logger.error(f"Erreur parsing carte {card_number}: {e}")
             return None
@@ -403,12 +361,101 @@ class SFTPService:
             intervention_data["_action"] = "created"
             logger.info(f"Nouvelle intervention créée: {external_id}")
         
-        # Supprimer les fichiers du SFTP
-        for filename in filenames:
-            self.delete_file(sftp, remote_path, filename)
-        
         return intervention_data
     
+    def _lots_cauca(self, xml_files: List[str]) -> List[Tuple[str, List[str]]]:
+        """Fichiers groupés par carte d'appel; les cartes sans fichier Details attendent le cycle suivant"""
+        lots = []
+        for card_number, filenames in self.group_files_by_intervention(xml_files).items():
+            # Vérifier si on a au moins le fichier Details
+            if not any(self.identify_file_type(f) == "details" for f in filenames):
+                logger.warning(f"Pas de fichier Details pour carte {card_number}, attente...")
+                continue
+            lots.append((card_number, filenames))
+        return lots
+    
+    async def _notifier_intervention(self, tenant_id: str, intervention: Dict, type_carte: Optional[str] = None):
+        """Notifie le frontend via WebSocket dès qu'une carte est enregistrée"""
+        if not self.websocket_manager:
+            return
+        data = {
+            "id": intervention.get("id"),
+            "external_call_id": intervention.get("external_call_id"),
+            "address": intervention.get("address_full"),
+            "type_intervention": intervention.get("type_intervention"),
+            "time_received": intervention.get("xml_time_call_received").isoformat() if intervention.get("xml_time_call_received") else None,
+            "action": intervention.get("_action", "created")
+        }
+        if type_carte:
+            data["type_carte"] = type_carte
+        try:
+            await self.websocket_manager.broadcast_to_tenant(tenant_id, {"type": "new_intervention", "data": data})
+        except Exception as e:
+            logger.error(f"Erreur notification WebSocket intervention: {e}")
+    
+    async def _ingerer(
+        self,
+        cle: str,
+        tenant_id: str,
+        config: Dict,
+        lots: Callable[[List[str]], List[Tuple[str, List[str]]]],
+        traiter: Callable[[str, List[str], Dict[str, bytes]], Awaitable[List[Dict]]],
+        type_carte: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Pipeline d'ingestion d'un cycle de polling:
+        
+        1. listage et téléchargement des lots sur la connexion persistante
+           (pool de threads SFTP), jusqu'à SFTP_PIPELINE_DEPTH lots d'avance
+        2. file asyncio -> parsing et upsert en base, lot par lot
+        3. suppression des fichiers traités et notification WebSocket
+           immédiate de chaque carte
+        """
+        source = self._source(cle, config)
+        remote_path = config.get("remote_path", "/")
+        
+        xml_files = await executer_io(source.lister, remote_path)
+        a_traiter = lots(xml_files) if xml_files else []
+        if not a_traiter:
+            return []
+        
+        file_lots: asyncio.Queue = asyncio.Queue(maxsize=SFTP_PIPELINE_DEPTH)
+        
+        async def telecharger():
+            try:
+                for identifiant, filenames in a_traiter:
+                    contenus = await executer_io(source.telecharger, remote_path, filenames)
+                    await file_lots.put((identifiant, filenames, contenus))
+            finally:
+                await file_lots.put(None)
+        
+        telechargement = asyncio.create_task(telecharger())
+        nouvelles = []
+        try:
+            while True:
+                lot = await file_lots.get()
+                if lot is None:
+                    break
+                identifiant, filenames, contenus = lot
+                try:
+                    interventions = await traiter(identifiant, filenames, contenus)
+                except Exception as e:
+                    logger.error(f"Erreur traitement lot {identifiant} ({tenant_id}): {e}")
+                    continue
+                if not interventions:
+                    continue
+                # Supprimer les fichiers du SFTP une fois la carte enregistrée
+                await executer_io(source.supprimer, remote_path, filenames)
+                for intervention in interventions:
+                    await self._notifier_intervention(tenant_id, intervention, type_carte)
+                nouvelles.extend(interventions)
+            # Propager une erreur de téléchargement (connexion perdue...)
+            await telechargement
+        finally:
+            if not telechargement.done():
+                telechargement.cancel()
+        return nouvelles
+    
     async def check_sftp_for_tenant(self, tenant_id: str, tenant_slug: str) -> List[Dict]:
         """
         Vérifie le SFTP d'un tenant et traite les nouveaux fichiers
@@ -417,64 +464,21 @@ class SFTPService:
         if not config:
             return []
         
-        sftp = None
-        transport = None
+        remote_path = config.get("remote_path", "/")
+        
+        async def traiter(card_number, filenames, contenus):
+            intervention = await self.process_intervention_files(
+                tenant_id, remote_path, card_number, filenames, contenus
+            )
+            return [intervention] if intervention else []
         
         try:
-            # Connexion SFTP
-            sftp, transport = self.connect_sftp(config)
-            remote_path = config.get("remote_path", "/")
-            
-            # Lister les fichiers XML
-            xml_files = self.list_xml_files(sftp, remote_path)
-            if not xml_files:
-                return []
-            
-            # Grouper par intervention
-            groups = self.group_files_by_intervention(xml_files)
-            
-            # Traiter chaque intervention
-            new_interventions = []
-            for card_number, filenames in groups.items():
-                # Vérifier si on a au moins le fichier Details
-                has_details = any(self.identify_file_type(f) == "details" for f in filenames)
-                if not has_details:
-                    logger.warning(f"Pas de fichier Details pour carte {card_number}, attente...")
-                    continue
-                
-                intervention = await self.process_intervention_files(
-                    tenant_id, sftp, remote_path, card_number, filenames
-                )
-                if intervention:
-                    new_interventions.append(intervention)
-            
-            # Notifier via WebSocket
-            if new_interventions and self.websocket_manager:
-                for intervention in new_interventions:
-                    await self.websocket_manager.broadcast_to_tenant(
-                        tenant_id,
-                        {
-                            "type": "new_intervention",
-                            "data": {
-                                "id": intervention.get("id"),
-                                "external_call_id": intervention.get("external_call_id"),
-                                "address": intervention.get("address_full"),
-                                "type_intervention": intervention.get("type_intervention"),
-                                "time_received": intervention.get("xml_time_call_received").isoformat() if intervention.get("xml_time_call_received") else None,
-                                "action": intervention.get("_action", "created")
-                            }
-                        }
-                    )
-            
-            return new_interventions
-            
+            return await self._ingerer(tenant_id, tenant_id, config, self._lots_cauca, traiter)
         except Exception as e:
             logger.error(f"Erreur SFTP pour tenant {tenant_id}: {e}")
+            # Connexion rouverte au prochain cycle
+            await self.disconnect_sftp(tenant_id)
             return []
-        
-        finally:
-            # TOUJOURS fermer la connexion, même en cas d'erreur
-            self.close_sftp_connection(sftp, transport)
     
     async def start_polling(self, tenant_id: str, tenant_slug: str, interval: int = 300):
         """
@@ -484,18 +488,23 @@ class SFTPService:
             tenant_id: ID du tenant
             tenant_slug: Slug du tenant (pour les logs)
             interval: Intervalle en secondes entre chaque vérification (défaut: 300 = 5 minutes)
-                      Minimum recommandé: 120 secondes (2 minutes)
+                      La connexion est persistante: un cycle sans fichier ne coûte qu'un listage,
+                      l'intervalle peut descendre à SFTP_POLL_MIN_SECONDS
         """
-        # Forcer un minimum de 60 secondes pour éviter de surcharger le serveur SFTP
-        interval = max(60, interval)
+        interval = max(SFTP_POLL_MIN_SECONDS, interval)
         
         async def poll_loop():
-            logger.info(f"Démarrage polling SFTP pour tenant {tenant_slug} (intervalle: {interval}s = {interval//60} min)")
+            logger.info(f"Démarrage polling SFTP pour tenant {tenant_slug} (intervalle: {interval}s)")
             while True:
                 try:
-                    new_interventions = await self.check_sftp_for_tenant(tenant_id, tenant_slug)
-                    if new_interventions:
-                        logger.info(f"[{tenant_slug}] {len(new_interventions)} nouvelle(s) intervention(s) importée(s)")
+                    # Un seul worker interroge le SFTP d'un tenant (services/job_coordination)
+                    if await posseder_polling(f"sftp:{tenant_id}"):
+                        new_interventions = await self.check_sftp_for_tenant(tenant_id, tenant_slug)
+                        if new_interventions:
+                            logger.info(f"[{tenant_slug}] {len(new_interventions)} nouvelle(s) intervention(s) importée(s)")
+                    else:
+                        # Polling attribué à un autre worker: libérer la connexion
+                        await self.disconnect_sftp(tenant_id)
                 except Exception as e:
                     logger.error(f"Erreur polling SFTP {tenant_slug}: {e}")
                 
@@ -526,17 +535,20 @@ class SFTPService:
             polling_key: Clé unique pour ce polling (par défaut: tenant_id)
         """
         polling_key = polling_key or tenant_id
-        interval = max(60, config.get("polling_interval", 300))
+        interval = max(SFTP_POLL_MIN_SECONDS, config.get("polling_interval", 300))
         
         async def poll_loop():
             logger.info(f"Démarrage polling SFTP {type_carte} pour tenant {tenant_id} (intervalle: {interval}s)")
             while True:
                 try:
-                    new_interventions = await self.check_sftp_for_tenant_with_config(
-                        tenant_id, config, type_carte
-                    )
-                    if new_interventions:
-                        logger.info(f"[{tenant_id}/{type_carte}] {len(new_interventions)} nouvelle(s) intervention(s) importée(s)")
+                    if await posseder_polling(f"sftp:{polling_key}"):
+                        new_interventions = await self.check_sftp_for_tenant_with_config(
+                            tenant_id, config, type_carte, polling_key
+                        )
+                        if new_interventions:
+                            logger.info(f"[{tenant_id}/{type_carte}] {len(new_interventions)} nouvelle(s) intervention(s) importée(s)")
+                    else:
+                        await self.disconnect_sftp(polling_key)
                 except Exception as e:
                     logger.error(f"Erreur polling SFTP {type_carte} {tenant_id}: {e}")
                 
@@ -554,105 +566,62 @@ class SFTPService:
         self, 
         tenant_id: str, 
         config: Dict,
-        type_carte: str = "incendie"
+        type_carte: str = "incendie",
+        polling_key: Optional[str] = None
     ) -> List[Dict]:
         """
         Vérifie le SFTP d'un tenant avec une configuration spécifique et traite les nouveaux fichiers
         """
-        sftp = None
-        transport = None
+        cle = polling_key or f"{tenant_id}_{type_carte}"
+        remote_path = config.get("remote_path", "/")
         
-        try:
-            # Connexion SFTP
-            sftp, transport = self.connect_sftp(config)
-            remote_path = config.get("remote_path", "/")
-            
-            # Lister les fichiers XML
-            xml_files = self.list_xml_files(sftp, remote_path)
-            if not xml_files:
-                return []
-            
-            new_interventions = []
-            
+        if type_carte == "alerte_sante":
             # Pour Alerte Santé, traiter chaque fichier XML individuellement
             # (format: un fichier = une ou plusieurs cartes)
-            if type_carte == "alerte_sante":
-                for filename in xml_files:
-                    logger.info(f"[{tenant_id}/alerte_sante] Traitement du fichier: {filename}")
-                    intervention = await self.process_alerte_sante_file(
-                        tenant_id, sftp, remote_path, filename
-                    )
-                    if intervention:
-                        if isinstance(intervention, list):
-                            new_interventions.extend(intervention)
-                        else:
-                            new_interventions.append(intervention)
-            else:
-                # Pour CAUCA (incendie), grouper par intervention (ancien comportement)
-                groups = self.group_files_by_intervention(xml_files)
-                
-                for card_number, filenames in groups.items():
-                    # Vérifier si on a au moins le fichier Details
-                    has_details = any(self.identify_file_type(f) == "details" for f in filenames)
-                    if not has_details:
-                        logger.warning(f"Pas de fichier Details pour carte {card_number}, attente...")
-                        continue
-                    
-                    intervention = await self.process_intervention_files_with_type(
-                        tenant_id, sftp, remote_path, card_number, filenames, type_carte
-                    )
-                    if intervention:
-                        new_interventions.append(intervention)
-            
-            # Notifier via WebSocket
-            if new_interventions and self.websocket_manager:
-                for intervention in new_interventions:
-                    await self.websocket_manager.broadcast_to_tenant(
-                        tenant_id,
-                        {
-                            "type": "new_intervention",
-                            "data": {
-                                "id": intervention.get("id"),
-                                "external_call_id": intervention.get("external_call_id"),
-                                "address": intervention.get("address_full"),
-                                "type_intervention": intervention.get("type_intervention"),
-                                "type_carte": type_carte,
-                                "time_received": intervention.get("xml_time_call_received").isoformat() if intervention.get("xml_time_call_received") else None,
-                                "action": intervention.get("_action", "created")
-                            }
-                        }
-                    )
+            def lots(xml_files):
+                return [(filename, [filename]) for filename in xml_files]
             
-            return new_interventions
+            async def traiter(filename, filenames, contenus):
+                logger.info(f"[{tenant_id}/alerte_sante] Traitement du fichier: {filename}")
+                return await self.process_alerte_sante_file(
+                    tenant_id, remote_path, filename, contenus.get(filename)
+                )
+        else:
+            # Pour CAUCA (incendie), grouper par intervention (ancien comportement)
+            lots = self._lots_cauca
             
+            async def traiter(card_number, filenames, contenus):
+                intervention = await self.process_intervention_files_with_type(
+                    tenant_id, remote_path, card_number, filenames, contenus, type_carte
+                )
+                return [intervention] if intervention else []
+        
+        try:
+            return await self._ingerer(cle, tenant_id, config, lots, traiter, type_carte)
         except Exception as e:
             logger.error(f"Erreur SFTP pour tenant {tenant_id}: {e}")
+            await self.disconnect_sftp(cle)
             return []
-        
-        finally:
-            self.close_sftp_connection(sftp, transport)
     
     async def process_alerte_sante_file(
         self,
         tenant_id: str,
-        sftp: paramiko.SFTPClient,
         remote_path: str,
-        filename: str
+        filename: str,
+        contenu: Optional[bytes]
     ) -> List[Dict]:
         """
-        Traite un fichier XML Alerte Santé (peut contenir plusieurs cartes)
+        Traite un fichier XML Alerte Santé téléchargé (peut contenir plusieurs cartes)
         """
         from services.alerte_sante_parser import parse_pr_xml_file
         
         try:
-            # Télécharger le fichier
-            content = self.download_file(sftp, remote_path, filename)
-            if not content:
+            if not contenu:
                 logger.warning(f"Fichier vide ou non téléchargé: {filename}")
                 return []
             
-            # Parser toutes les cartes du fichier
-            cartes = parse_pr_xml_file(content)
+            # Parser toutes les cartes du fichier (hors de la boucle d'événements)
+            cartes = await asyncio.to_thread(parse_pr_xml_file, decoder_contenu(contenu))
             if not cartes:
                 logger.warning(f"Aucune carte parsée dans {filename}")
                 return []
@@ -699,11 +668,7 @@ class SFTPService:
                 
                 saved_interventions.append(carte)
             
-            # Supprimer le fichier du SFTP après traitement
-            if saved_interventions:
-                self.delete_file(sftp, remote_path, filename)
-                logger.info(f"Fichier supprimé du SFTP: {filename}")
-            
+            # Le fichier est supprimé du SFTP par le pipeline si au moins une carte est enregistrée
             return saved_interventions
             
         except Exception as e:
@@ -715,24 +680,16 @@ class SFTPService:
     async def process_intervention_files_with_type(
         self, 
         tenant_id: str, 
-        sftp: paramiko.SFTPClient, 
         remote_path: str,
         card_number: str, 
         filenames: List[str],
+        contenus: Dict[str, bytes],
         type_carte: str = "incendie"
     ) -> Optional[Dict]:
         """
-        Traite les fichiers d'une intervention avec un type de carte spécifique
+        Traite les fichiers téléchargés d'une intervention avec un type de carte spécifique
         """
-        # Télécharger tous les fichiers
-        files_content = {}
-        for filename in filenames:
-            file_type = self.identify_file_type(filename)
-            if file_type:
-                content = self.download_file(sftp, remote_path, filename)
-                if content:
-                    files_content[file_type] = content
-        
+        files_content = self._contenus_par_type(filenames, contenus)
         if not files_content:
             logger.warning(f"Aucun contenu valide pour la carte {card_number}")
             return None
@@ -741,10 +698,10 @@ class SFTPService:
         try:
             if type_carte == "alerte_sante":
                 from services.alerte_sante_parser import parse_pr_intervention
-                intervention_data = parse_pr_intervention(files_content)
+                intervention_data = await asyncio.to_thread(parse_pr_intervention, files_content)
             else:
                 from services.cauca_parser import parse_cauca_intervention
-                intervention_data = parse_cauca_intervention(files_content)
+                intervention_data = await asyncio.to_thread(parse_cauca_intervention, files_content)
         except Exception as e:
             logger.error(f"Erreur parsing carte {type_carte} {card_number}: {e}")
             return None
@@ -785,18 +742,16 @@ class SFTPService:
             intervention_data["_action"] = "created"
             logger.info(f"Nouvelle intervention {type_carte} créée: {external_id}")
         
-        # Supprimer les fichiers du SFTP
-        for filename in filenames:
-            self.delete_file(sftp, remote_path, filename)
-        
         return intervention_data
     
     async def stop_polling(self, tenant_id: str):
-        """Arrête le polling SFTP pour un tenant"""
+        """Arrête le polling SFTP pour un tenant et ferme sa connexion persistante"""
         if tenant_id in self.polling_tasks:
             self.polling_tasks[tenant_id].cancel()
             del self.polling_tasks[tenant_id]
+            await liberer_polling(f"sftp:{tenant_id}")
             logger.info(f"Polling SFTP arrêté pour tenant {tenant_id}")
+        await self.disconnect_sftp(tenant_id)
     
     async def test_connection(self, config: Dict) -> Dict[str, Any]:
         """
@@ -805,17 +760,15 @@ class SFTPService:
         Returns:
             Dict avec success, message, et éventuellement files_count
         """
-        sftp = None
-        transport = None
+        source = None
         
         try:
-            sftp, transport = self.connect_sftp(config)
+            source = ouvrir_source(config)
             remote_path = config.get("remote_path", "/")
             
             # Tester l'accès au répertoire
             try:
-                files = sftp.listdir(remote_path)
-                xml_count = len([f for f in files if f.lower().endswith('.xml')])
+                comptes = await executer_io(source.compter, remote_path)
             except FileNotFoundError:
                 return {
                     "success": False,
@@ -824,9 +777,9 @@ class SFTPService:
             
             return {
                 "success": True,
-                "message": f"Connexion réussie. {xml_count} fichier(s) XML trouvé(s) dans {remote_path}",
-                "files_count": xml_count,
-                "total_files": len(files)
+                "message": f"Connexion réussie. {comptes['xml']} fichier(s) XML trouvé(s) dans {remote_path}",
+                "files_count": comptes["xml"],
+                "total_files": comptes["total"]
             }
             
         except paramiko.AuthenticationException:
@@ -846,8 +799,9 @@ class SFTPService:
             }
         
         finally:
-            # TOUJOURS fermer la connexion, même en cas d'erreur
-            self.close_sftp_connection(sftp, transport)
+            # TOUJOURS fermer la connexion de test, même en cas d'erreur
+            if source is not None:
+                await executer_io(source.fermer)
 
 
 # Instance globale du service (sera initialisée dans server.py)
@@ -0,0 +1,241 @@
+"""
+Sources des cartes d'appel 911 (SFTP persistant, répertoire local)
+=================================================================
+
+Les appels paramiko sont bloquants. Ils s'exécutent dans un pool de threads
+dédié (SFTP_IO_THREADS) pour ne jamais bloquer la boucle d'événements.
+
+- SourceSFTP : une connexion par tenant (ou clé de polling), ouverte une
+  fois puis réutilisée d'un cycle à l'autre (keepalive SSH, reconnexion
+  automatique si le transport est tombé). Les fichiers d'un lot sont
+  téléchargés en pipeline : toutes les lectures sont lancées (prefetch)
+  avant d'attendre la première réponse.
+- SourceRepertoire : même interface sur un répertoire local
+  (config "backend": "local", remote_path = répertoire), pour les tests et
+  le développement hors ligne.
+
+Les opérations d'une même source sont sérialisées (un client SFTP n'est pas
+partagé entre threads), les sources de tenants différents travaillent en
+parallèle.
+
+Usage:
+    source = ouvrir_source(config)
+    fichiers = await executer_io(source.lister, remote_path)
+    contenus = await executer_io(source.telecharger, remote_path, fichiers)
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import paramiko
+
+logger = logging.getLogger(__name__)
+
+SFTP_IO_THREADS = int(os.environ.get("SFTP_IO_THREADS", "8"))
+SFTP_KEEPALIVE_SECONDS = int(os.environ.get("SFTP_KEEPALIVE_SECONDS", "30"))
+SFTP_TIMEOUT_SECONDS = float(os.environ.get("SFTP_TIMEOUT_SECONDS", "30"))
+
+_sftp_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_sftp_pool() -> ThreadPoolExecutor:
+    global _sftp_pool
+    if _sftp_pool is None:
+        _sftp_pool = ThreadPoolExecutor(max_workers=SFTP_IO_THREADS, thread_name_prefix="sftp-io")
+    return _sftp_pool
+
+
+def arreter_sftp_pool():
+    global _sftp_pool
+    if _sftp_pool is not None:
+        _sftp_pool.shutdown(wait=False, cancel_futures=True)
+        _sftp_pool = None
+
+
+async def executer_io(fonction: Callable, *args):
+    """Exécute une opération bloquante de source dans le pool SFTP"""
+    return await asyncio.get_running_loop().run_in_executor(get_sftp_pool(), fonction, *args)
+
+
+def decoder_contenu(contenu) -> str:
+    """Décode un fichier XML (utf-8, puis iso-8859-1 / cp1252)"""
+    if not isinstance(contenu, bytes):
+        return contenu
+    for encoding in ['utf-8', 'iso-8859-1', 'cp1252']:
+        try:
+            return contenu.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return contenu.decode('utf-8', errors='replace')
+
+
+def nettoyer_hote(host: str) -> str:
+    """Nettoie le hostname en enlevant les protocoles et trailing slashes"""
+    if not host:
+        return host
+    # Enlever les protocoles courants
+    for prefix in ['http://', 'https://', 'sftp://', 'ftp://']:
+        if host.lower().startswith(prefix):
+            host = host[len(prefix):]
+    # Enlever le trailing slash et le path
+    host = host.split('/')[0]
+    # Enlever le port si présent dans l'URL
+    if ':' in host:
+        host = host.split(':')[0]
+    return host.strip()
+
+
+def _chemin_distant(remote_path: str, filename: str) -> str:
+    return f"{remote_path.rstrip('/')}/{filename}"
+
+
+def _est_xml(filename: str) -> bool:
+    return filename.lower().endswith('.xml')
+
+
+# ======================== SFTP ========================
+
+class SourceSFTP:
+    """Connexion SFTP persistante (opérations bloquantes, à appeler via executer_io)"""
+
+    def __init__(self, config: Dict):
+        self.host = nettoyer_hote(config["host"])
+        self.port = config.get("port", 22)
+        self.username = config["username"]
+        self.password = config["password"]
+        self.empreinte = (self.host, self.port, self.username, self.password)
+        self._lock = threading.Lock()
+        self._transport: Optional[paramiko.Transport] = None
+        self._sftp: Optional[paramiko.SFTPClient] = None
+
+    def _client(self) -> paramiko.SFTPClient:
+        if self._sftp is not None and self._transport is not None and self._transport.is_active():
+            return self._sftp
+        self._fermer()
+        transport = paramiko.Transport((self.host, self.port))
+        try:
+            transport.connect(username=self.username, password=self.password)
+            transport.set_keepalive(SFTP_KEEPALIVE_SECONDS)
+            sftp = paramiko.SFTPClient.from_transport(transport)
+            sftp.get_channel().settimeout(SFTP_TIMEOUT_SECONDS)
+        except Exception:
+            transport.close()
+            raise
+        self._transport, self._sftp = transport, sftp
+        logger.info(f"🔌 Connexion SFTP ouverte: {self.username}@{self.host}:{self.port}")
+        return sftp
+
+    def _executer(self, operation: Callable[[paramiko.SFTPClient], object]):
+        """Une tentative sur la connexion existante, une seconde après reconnexion"""
+        with self._lock:
+            try:
+                return operation(self._client())
+            except (EOFError, OSError, paramiko.SSHException) as e:
+                if isinstance(e, FileNotFoundError):
+                    raise
+                logger.warning(f"⚠️ Connexion SFTP {self.host} perdue ({e}), reconnexion")
+                self._fermer()
+                return operation(self._client())
+
+    def lister(self, remote_path: str) -> List[str]:
+        return [f for f in self._executer(lambda sftp: sftp.listdir(remote_path)) if _est_xml(f)]
+
+    def compter(self, remote_path: str) -> Dict[str, int]:
+        fichiers = self._executer(lambda sftp: sftp.listdir(remote_path))
+        return {"total": len(fichiers), "xml": len([f for f in fichiers if _est_xml(f)])}
+
+    def telecharger(self, remote_path: str, filenames: List[str]) -> Dict[str, bytes]:
+        """Télécharge un lot de fichiers en pipeline (fichiers illisibles absents du résultat)"""
+        def operation(sftp: paramiko.SFTPClient) -> Dict[str, bytes]:
+            ouverts = []
+            for filename in filenames:
+                try:
+                    fichier = sftp.open(_chemin_distant(remote_path, filename), 'rb')
+                    fichier.prefetch()
+                    ouverts.append((filename, fichier))
+                except IOError as e:
+                    logger.error(f"Erreur téléchargement SFTP {filename}: {e}")
+            contenus = {}
+            for filename, fichier in ouverts:
+                try:
+                    with fichier:
+                        contenus[filename] = fichier.read()
+                except IOError as e:
+                    logger.error(f"Erreur téléchargement SFTP {filename}: {e}")
+            return contenus
+        return self._executer(operation)
+
+    def supprimer(self, remote_path: str, filenames: List[str]) -> int:
+        def operation(sftp: paramiko.SFTPClient) -> int:
+            supprimes = 0
+            for filename in filenames:
+                try:
+                    sftp.remove(_chemin_distant(remote_path, filename))
+                    supprimes += 1
+                except IOError as e:
+                    logger.error(f"Erreur suppression SFTP {filename}: {e}")
+            return supprimes
+        return self._executer(operation)
+
+    def _fermer(self):
+        for ressource in (self._sftp, self._transport):
+            try:
+                if ressource is not None:
+                    ressource.close()
+            except Exception as e:
+                logger.warning(f"Erreur fermeture SFTP: {e}")
+        self._sftp = self._transport = None
+
+    def fermer(self):
+        with self._lock:
+            self._fermer()
+
+
+# ======================== RÉPERTOIRE LOCAL ========================
+
+class SourceRepertoire:
+    """Cartes d'appel déposées dans un répertoire local (tests, développement)"""
+
+    def __init__(self, config: Dict):
+        self.empreinte = ("local",)
+
+    def lister(self, remote_path: str) -> List[str]:
+        return sorted(f for f in os.listdir(remote_path) if _est_xml(f))
+
+    def compter(self, remote_path: str) -> Dict[str, int]:
+        fichiers = os.listdir(remote_path)
+        return {"total": len(fichiers), "xml": len([f for f in fichiers if _est_xml(f)])}
+
+    def telecharger(self, remote_path: str, filenames: List[str]) -> Dict[str, bytes]:
+        contenus = {}
+        for filename in filenames:
+            try:
+                with open(os.path.join(remote_path, filename), 'rb') as f:
+                    contenus[filename] = f.read()
+            except OSError as e:
+                logger.error(f"Erreur lecture {filename}: {e}")
+        return contenus
+
+    def supprimer(self, remote_path: str, filenames: List[str]) -> int:
+        supprimes = 0
+        for filename in filenames:
+            try:
+                os.remove(os.path.join(remote_path, filename))
+                supprimes += 1
+            except OSError as e:
+                logger.error(f"Erreur suppression {filename}: {e}")
+        return supprimes
+
+    def fermer(self):
+        pass
+
+
+def ouvrir_source(config: Dict):
+    """Source correspondant à la configuration (SFTP par défaut)"""
+    if config.get("backend") == "local":
+        return SourceRepertoire(config)
+    return SourceSFTP(config)
@@ -0,0 +1,299 @@
+"""
+Écriture Excel (xlsx) en flux
+=============================
+
+openpyxl construit tout le classeur en mémoire puis le sérialise d'un bloc :
+pour une année de disponibilités, la mémoire grimpe avec le nombre de lignes
+et le client n'obtient le premier octet qu'à la toute fin.
+
+Ce module écrit un classeur d'une feuille directement dans une archive zip
+non positionnable (descripteurs de données) : chaque ligne est sérialisée et
+compressée dès qu'elle est ajoutée, et les octets produits sont remis au
+client par blocs via StreamingResponse. Les parties fixes du paquet partent
+avant même la première ligne ; styles.xml est écrit en dernier, ce qui permet
+de déclarer les styles au fil de l'eau.
+
+Limites assumées (mode écriture seule) : pas de largeur automatique (les
+largeurs sont fixées à l'ouverture), les fusions et styles sont ceux déclarés
+avant terminer().
+
+Usage:
+    async def lignes():
+        yield ["Date", "Statut"], STYLE_ENTETE
+        async for dispo in db.disponibilites.find(filtre).sort("date", 1):
+            yield [dispo["date"], dispo["statut"]], None
+
+    classeur = ClasseurStreaming("Disponibilités", largeurs=[12, 15])
+    return reponse_xlsx(classeur, lignes(), "disponibilites.xlsx")
+"""
+
+import math
+import re
+import zipfile
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple, Union
+from xml.sax.saxutils import escape, quoteattr
+
+from fastapi.responses import StreamingResponse
+
+MEDIA_TYPE_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# Taille des blocs remis au client
+TAILLE_BLOC = 64 * 1024
+
+_CARACTERES_INTERDITS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_CARACTERES_TITRE_INTERDITS = re.compile(r"[\[\]:*?/\\]")
+
+_NS_MAIN = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_NS_REL = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_ENTETE_XML = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+
+_CONTENT_TYPES = (
+    _ENTETE_XML
+    + '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+
+_RELS_RACINE = (
+    _ENTETE_XML
+    + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    f'<Relationship Id="rId1" Type="{_NS_REL}/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+_RELS_CLASSEUR = (
+    _ENTETE_XML
+    + '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    f'<Relationship Id="rId1" Type="{_NS_REL}/worksheet" Target="worksheets/sheet1.xml"/>'
+    f'<Relationship Id="rId2" Type="{_NS_REL}/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+
+
+@dataclass(frozen=True)
+class StyleCellule:
+    """Style de cellule (couleurs RGB sans '#', ex: "FCA5A5")"""
+    gras: bool = False
+    taille: int = 11
+    couleur: Optional[str] = None
+    fond: Optional[str] = None
+    centre: bool = False
+    retour_ligne: bool = False
+    bordure: bool = False
+
+
+# Une ligne produite par la route: (valeurs, style commun ou liste de styles par cellule)
+Ligne = Tuple[Sequence[Any], Union[None, StyleCellule, Sequence[Optional[StyleCellule]]]]
+
+
+def lettre_colonne(numero: int) -> str:
+    """1 -> A, 27 -> AA"""
+    lettres = ""
+    while numero > 0:
+        numero, reste = divmod(numero - 1, 26)
+        lettres = chr(65 + reste) + lettres
+    return lettres
+
+
+def _texte(valeur: Any) -> str:
+    return escape(_CARACTERES_INTERDITS.sub("", str(valeur)))
+
+
+class _Tampon:
+    """Destination non positionnable de l'archive: accumule les octets jusqu'au prochain envoi"""
+
+    def __init__(self):
+        self._morceaux: List[bytes] = []
+        self.taille = 0
+
+    def write(self, donnees) -> int:
+        self._morceaux.append(bytes(donnees))
+        self.taille += len(donnees)
+        return len(donnees)
+
+    def flush(self):
+        pass
+
+    def vider(self) -> bytes:
+        contenu = b"".join(self._morceaux)
+        self._morceaux = []
+        self.taille = 0
+        return contenu
+
+
+class ClasseurStreaming:
+    """Classeur xlsx d'une seule feuille, écrit ligne par ligne"""
+
+    def __init__(self, titre_feuille: str, largeurs: Sequence[float] = (), taille_bloc: int = TAILLE_BLOC):
+        self.titre_feuille = (_CARACTERES_TITRE_INTERDITS.sub("", titre_feuille) or "Feuille1")[:31]
+        self.largeurs = list(largeurs)
+        self.taille_bloc = taille_bloc
+        self.nb_lignes = 0
+        self._styles: Dict[StyleCellule, int] = {}
+        self._fusions: List[str] = []
+        self._tampon = _Tampon()
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._feuille = None
+
+    # ---------- Styles et fusions ----------
+
+    def _index_style(self, style: Optional[StyleCellule]) -> int:
+        if style is None:
+            return 0
+        if style not in self._styles:
+            self._styles[style] = len(self._styles) + 1
+        return self._styles[style]
+
+    def fusionner(self, plage: str):
+        """Fusionne une plage (ex: "A1:H1"), écrite à la fin de la feuille"""
+        self._fusions.append(plage)
+
+    # ---------- Écriture ----------
+
+    def ouvrir(self) -> bytes:
+        """Écrit les parties fixes du paquet et l'en-tête de la feuille"""
+        self._zip = zipfile.ZipFile(self._tampon, "w", compression=zipfile.ZIP_DEFLATED)
+        self._zip.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        self._zip.writestr("_rels/.rels", _RELS_RACINE)
+        self._zip.writestr(
+            "xl/workbook.xml",
+            _ENTETE_XML
+            + f'<workbook xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}"><sheets>'
+            f'<sheet name={quoteattr(self.titre_feuille)} sheetId="1" r:id="rId1"/>'
+            '</sheets></workbook>'
+        )
+        self._zip.writestr("xl/_rels/workbook.xml.rels", _RELS_CLASSEUR)
+
+        self._feuille = self._zip.open("xl/worksheets/sheet1.xml", "w")
+        entete = [_ENTETE_XML, f'<worksheet xmlns="{_NS_MAIN}" xmlns:r="{_NS_REL}">']
+        if self.largeurs:
+            entete.append("<cols>")
+            for i, largeur in enumerate(self.largeurs, start=1):
+                entete.append(f'<col min="{i}" max="{i}" width="{largeur}" customWidth="1"/>')
+            entete.append("</cols>")
+        entete.append("<sheetData>")
+        self._feuille.write("".join(entete).encode("utf-8"))
+        return self._tampon.vider()
+
+    def _cellule(self, reference: str, valeur: Any, style: int) -> str:
+        attribut_style = f' s="{style}"' if style else ""
+        if valeur is None or valeur == "":
+            return f'<c r="{reference}"{attribut_style}/>' if style else ""
+        if isinstance(valeur, bool):
+            return f'<c r="{reference}"{attribut_style} t="b"><v>{int(valeur)}</v></c>'
+        if isinstance(valeur, (int, float)) and not (isinstance(valeur, float) and not math.isfinite(valeur)):
+            return f'<c r="{reference}"{attribut_style}><v>{valeur}</v></c>'
+        return (
+            f'<c r="{reference}"{attribut_style} t="inlineStr">'
+            f'<is><t xml:space="preserve">{_texte(valeur)}</t></is></c>'
+        )
+
+    def ajouter_ligne(self, valeurs: Sequence[Any], style=None):
+        """
+        Ajoute une ligne. `style` est un StyleCellule appliqué à toutes les
+        cellules, ou une liste de styles par cellule (None = style par défaut).
+        """
+        self.nb_lignes += 1
+        if isinstance(style, StyleCellule) or style is None:
+            styles = [style] * len(valeurs)
+        else:
+            styles = list(style) + [None] * (len(valeurs) - len(style))
+
+        cellules = [
+            self._cellule(f"{lettre_colonne(col)}{self.nb_lignes}", valeur, self._index_style(styles[col - 1]))
+            for col, valeur in enumerate(valeurs, start=1)
+        ]
+        self._feuille.write(f'<row r="{self.nb_lignes}">{"".join(cellules)}</row>'.encode("utf-8"))
+
+    def bloc_pret(self) -> bytes:
+        """Octets accumulés si un bloc complet est disponible, sinon b''"""
+        if self._tampon.taille >= self.taille_bloc:
+            return self._tampon.vider()
+        return b""
+
+    def _styles_xml(self) -> str:
+        styles = sorted(self._styles, key=self._styles.get)
+        polices = ['<font><sz val="11"/><name val="Calibri"/></font>']
+        fonds = ['<fill><patternFill patternType="none"/></fill>', '<fill><patternFill patternType="gray125"/></fill>']
+        formats = ['<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>']
+
+        for i, style in enumerate(styles, start=1):
+            police = "<b/>" if style.gras else ""
+            police += f'<sz val="{style.taille}"/>'
+            if style.couleur:
+                police += f'<color rgb="FF{style.couleur}"/>'
+            polices.append(f'<font>{police}<name val="Calibri"/></font>')
+
+            fond_id = 0
+            if style.fond:
+                fond_id = len(fonds)
+                fonds.append(
+                    f'<fill><patternFill patternType="solid"><fgColor rgb="FF{style.fond}"/>'
+                    f'<bgColor rgb="FF{style.fond}"/></patternFill></fill>'
+                )
+
+            alignement = ""
+            if style.centre or style.retour_ligne:
+                attributs = ' horizontal="center" vertical="center"' if style.centre else ""
+                attributs += ' wrapText="1"' if style.retour_ligne else ""
+                alignement = f"<alignment{attributs}/>"
+
+            formats.append(
+                f'<xf numFmtId="0" fontId="{i}" fillId="{fond_id}" borderId="{1 if style.bordure else 0}" xfId="0" '
+                f'applyFont="1" applyFill="1" applyBorder="1" applyAlignment="1">{alignement}</xf>'
+            )
+
+        bordure_fine = "".join(f'<{cote} style="thin"><color auto="1"/></{cote}>' for cote in ("left", "right", "top", "bottom"))
+        return (
+            _ENTETE_XML
+            + f'<styleSheet xmlns="{_NS_MAIN}">'
+            f'<fonts count="{len(polices)}">{"".join(polices)}</fonts>'
+            f'<fills count="{len(fonds)}">{"".join(fonds)}</fills>'
+            '<borders count="2"><border><left/><right/><top/><bottom/><diagonal/></border>'
+            f'<border>{bordure_fine}<diagonal/></border></borders>'
+            '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+            f'<cellXfs count="{len(formats)}">{"".join(formats)}</cellXfs>'
+            '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+            '</styleSheet>'
+        )
+
+    def terminer(self) -> bytes:
+        """Ferme la feuille, écrit les styles et le répertoire central, retourne les derniers octets"""
+        fin = ["</sheetData>"]
+        if self._fusions:
+            fin.append(f'<mergeCells count="{len(self._fusions)}">')
+            fin.extend(f'<mergeCell ref="{plage}"/>' for plage in self._fusions)
+            fin.append("</mergeCells>")
+        fin.append("</worksheet>")
+        self._feuille.write("".join(fin).encode("utf-8"))
+        self._feuille.close()
+        self._zip.writestr("xl/styles.xml", self._styles_xml())
+        self._zip.close()
+        return self._tampon.vider()
+
+    async def diffuser(self, lignes: AsyncIterator[Ligne]) -> AsyncIterator[bytes]:
+        """Écrit les lignes au fur et à mesure et produit les blocs de l'archive"""
+        yield self.ouvrir()
+        async for valeurs, style in lignes:
+            self.ajouter_ligne(valeurs, style)
+            bloc = self.bloc_pret()
+            if bloc:
+                yield bloc
+        yield self.terminer()
+
+
+def reponse_xlsx(classeur: ClasseurStreaming, lignes: AsyncIterator[Ligne], filename: str) -> StreamingResponse:
+    """StreamingResponse qui produit le classeur pendant le parcours du curseur"""
+    return StreamingResponse(
+        classeur.diffuser(lignes),
+        media_type=MEDIA_TYPE_XLSX,
+        headers={"Content-Disposition": f"attachment; filename={filename}"}
+    )
@@ -0,0 +1,121 @@
+"""
+Exécution des jobs quotidiens par tenant
+========================================
+
+Les jobs du scheduler (alertes équipements, EPI, rappels de disponibilités)
+traitaient les tenants un par un : la durée du lot croissait avec chaque
+municipalité ajoutée et une exception pouvait interrompre le reste du lot.
+
+executer_par_tenant répartit le traitement :
+
+- concurrence bornée (TENANT_JOB_CONCURRENCY tenants à la fois, défaut 8)
+- délai maximum par tenant (TENANT_JOB_TIMEOUT_SECONDS, défaut 600 s)
+- isolation des échecs : l'erreur d'un tenant est journalisée, les autres
+  continuent
+- durée par tenant journalisée et ajoutée à l'enregistrement d'exécution du
+  job (job_executions, voir services/job_coordination)
+
+Usage:
+    async def traiter_tenant(tenant):
+        ...
+    bilan = await executer_par_tenant("check_equipment_alerts", tenants, traiter_tenant)
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from services.job_coordination import enregistrer_metriques_execution
+
+logger = logging.getLogger(__name__)
+
+TENANT_JOB_CONCURRENCY = int(os.environ.get("TENANT_JOB_CONCURRENCY", "8"))
+TENANT_JOB_TIMEOUT_SECONDS = float(os.environ.get("TENANT_JOB_TIMEOUT_SECONDS", "600"))
+
+
+@dataclass
+class ResultatTenant:
+    tenant_id: str
+    slug: str
+    duree: float
+    statut: str = "ok"  # ok, erreur, delai_depasse
+    erreur: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "tenant_id": self.tenant_id,
+            "slug": self.slug,
+            "duree": round(self.duree, 3),
+            "statut": self.statut,
+            "erreur": self.erreur
+        }
+
+
+@dataclass
+class BilanFanOut:
+    job: str
+    duree: float = 0.0
+    resultats: List[ResultatTenant] = field(default_factory=list)
+
+    @property
+    def echecs(self) -> List[ResultatTenant]:
+        return [r for r in self.resultats if r.statut != "ok"]
+
+    def plus_lents(self, n: int = 3) -> List[ResultatTenant]:
+        return sorted(self.resultats, key=lambda r: r.duree, reverse=True)[:n]
+
+
+async def executer_par_tenant(
+    job: str,
+    tenants: List[Dict[str, Any]],
+    traiter: Callable[[Dict[str, Any]], Awaitable[Any]],
+    concurrence: Optional[int] = None,
+    delai: Optional[float] = None
+) -> BilanFanOut:
+    """Exécute traiter(tenant) pour chaque tenant, au plus `concurrence` à la fois"""
+    concurrence = max(1, concurrence or TENANT_JOB_CONCURRENCY)
+    delai = delai or TENANT_JOB_TIMEOUT_SECONDS
+    semaphore = asyncio.Semaphore(concurrence)
+    bilan = BilanFanOut(job=job)
+
+    async def executer(tenant: Dict[str, Any]) -> ResultatTenant:
+        tenant_id = tenant.get("id", "")
+        slug = tenant.get("slug") or tenant.get("nom") or tenant_id
+        async with semaphore:
+            debut = time.perf_counter()
+            resultat = ResultatTenant(tenant_id=tenant_id, slug=slug, duree=0.0)
+            try:
+                await asyncio.wait_for(traiter(tenant), timeout=delai)
+            except asyncio.TimeoutError:
+                resultat.statut, resultat.erreur = "delai_depasse", f"> {delai:.0f}s"
+                logger.error(f"⏱️ {job}: délai dépassé pour {slug} ({delai:.0f}s)")
+            except Exception as e:
+                resultat.statut, resultat.erreur = "erreur", str(e)
+                logger.error(f"❌ {job}: erreur pour {slug}: {e}", exc_info=True)
+            resultat.duree = time.perf_counter() - debut
+            logger.debug(f"⏱️ {job}/{slug}: {resultat.duree:.2f}s")
+            return resultat
+
+    debut = time.perf_counter()
+    bilan.resultats = list(await asyncio.gather(*[executer(tenant) for tenant in tenants]))
+    bilan.duree = time.perf_counter() - debut
+
+    lents = ", ".join(f"{r.slug} {r.duree:.1f}s" for r in bilan.plus_lents())
+    logger.info(
+        f"📊 {job}: {len(tenants)} tenant(s) en {bilan.duree:.1f}s "
+        f"(concurrence {concurrence}, {len(bilan.echecs)} échec(s)){' - plus lents: ' + lents if lents else ''}"
+    )
+
+    try:
+        await enregistrer_metriques_execution({
+            "tenants": [r.to_dict() for r in bilan.resultats],
+            "duree_tenants": round(bilan.duree, 3),
+            "echecs_tenants": len(bilan.echecs)
+        })
+    except Exception as e:
+        logger.warning(f"⚠️ {job}: métriques non enregistrées: {e}")
+
+    return bilan
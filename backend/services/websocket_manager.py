@@ -1,148 +1,318 @@
 """
-Gestionnaire WebSocket pour les notifications temps réel
-========================================================
+Hub WebSocket temps réel
+========================
 
-Gère les connexions WebSocket par tenant pour :
-- Nouvelles interventions (cartes d'appel 911)
-- Mises à jour de statut
-- Notifications diverses
+Point d'entrée unique pour toutes les connexions WebSocket :
+- synchronisation des clients (routes/websocket : planning, remplacements...)
+- nouvelles interventions (cartes d'appel 911, SFTP / CAUCA)
+
+Chaque connexion a sa propre file d'envoi bornée (REALTIME_QUEUE_SIZE) et sa
+tâche d'écriture : une diffusion ne fait que déposer le message dans les
+files, un client mobile lent ne retarde plus les autres. Le message est
+encodé en JSON une seule fois par diffusion.
+
+Politique de déconnexion :
+- file pleine (le client ne suit plus) : connexion fermée (code 1013), le
+  client se reconnecte et recharge son état
+- envoi plus long que REALTIME_SEND_TIMEOUT_SECONDS ou en erreur : connexion
+  fermée et retirée
+
+Les diffusions passent par un transport pub/sub pour atteindre les clients
+connectés aux autres workers uvicorn (REALTIME_BUS) :
+- "local" (défaut) : en mémoire, suffisant avec un seul worker
+- "mongo" : collection realtime_messages suivie par change stream (nécessite
+  un replica set, comme MongoDB Atlas)
+
+Les canaux sont les clés passées par les appelants (slug du tenant pour la
+synchronisation, id du tenant pour les interventions).
+
+Usage:
+    hub = get_websocket_manager()
+    connexion = await hub.connect(websocket, tenant_slug, user_id)
+    await hub.broadcast_to_tenant(tenant_slug, {"type": "planning_update", ...})
+    await hub.disconnect(connexion)
 """
 
 from fastapi import WebSocket
-from typing import Dict, List, Set
+from typing import Any, Callable, Dict, List, Optional, Set
+from datetime import datetime, timezone
 import asyncio
 import json
 import logging
+import os
+import uuid
 
 logger = logging.getLogger(__name__)
 
+REALTIME_BUS = os.environ.get("REALTIME_BUS", "local").lower()
+REALTIME_QUEUE_SIZE = int(os.environ.get("REALTIME_QUEUE_SIZE", "100"))
+REALTIME_SEND_TIMEOUT_SECONDS = float(os.environ.get("REALTIME_SEND_TIMEOUT_SECONDS", "10"))
+REALTIME_MESSAGE_TTL_SECONDS = int(os.environ.get("REALTIME_MESSAGE_TTL_SECONDS", "60"))
+
+# Code de fermeture WebSocket "Try Again Later"
+CODE_CLIENT_LENT = 1013
+
+
+def encoder_message(message: dict) -> str:
+    return json.dumps(message, default=str)
+
+
+class Connexion:
+    """Une connexion WebSocket et sa file d'envoi"""
+
+    def __init__(self, websocket: WebSocket, canal: str, user_id: str, taille_file: int):
+        self.websocket = websocket
+        self.canal = canal
+        self.user_id = user_id
+        self.file: asyncio.Queue = asyncio.Queue(maxsize=taille_file)
+        self.tache: Optional[asyncio.Task] = None
+
+    def deposer(self, texte: str) -> bool:
+        """Ajoute un message déjà encodé; False si la file est pleine"""
+        try:
+            self.file.put_nowait(texte)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    async def envoyer(self, message: Any) -> bool:
+        """Envoie un message à ce seul client (réponses ping, confirmations)"""
+        return self.deposer(message if isinstance(message, str) else encoder_message(message))
+
+
+# ==================== TRANSPORTS PUB/SUB ====================
+
+class TransportMemoire:
+    """Transport en processus : les diffusions n'atteignent que le worker courant"""
 
-class WebSocketManager:
-    """Gestionnaire des connexions WebSocket par tenant"""
-    
     def __init__(self):
-        # Structure: { tenant_id: { user_id: WebSocket } }
-        self.active_connections: Dict[str, Dict[str, WebSocket]] = {}
-        # Lock pour thread-safety
-        self.lock = asyncio.Lock()
-    
-    async def connect(self, websocket: WebSocket, tenant_id: str, user_id: str):
-        """Accepte une nouvelle connexion WebSocket"""
-        await websocket.accept()
-        
-        async with self.lock:
-            if tenant_id not in self.active_connections:
-                self.active_connections[tenant_id] = {}
-            
-            # Fermer l'ancienne connexion si existe
-            if user_id in self.active_connections[tenant_id]:
-                try:
-                    await self.active_connections[tenant_id][user_id].close()
-                except:
-                    pass
-            
-            self.active_connections[tenant_id][user_id] = websocket
-        
-        logger.info(f"WebSocket connecté: tenant={tenant_id}, user={user_id}")
-    
-    async def disconnect(self, tenant_id: str, user_id: str):
-        """Déconnecte un WebSocket"""
-        async with self.lock:
-            if tenant_id in self.active_connections:
-                if user_id in self.active_connections[tenant_id]:
-                    del self.active_connections[tenant_id][user_id]
-                    logger.info(f"WebSocket déconnecté: tenant={tenant_id}, user={user_id}")
-                
-                # Nettoyer le tenant si vide
-                if not self.active_connections[tenant_id]:
-                    del self.active_connections[tenant_id]
-    
-    async def send_to_user(self, tenant_id: str, user_id: str, message: dict):
-        """Envoie un message à un utilisateur spécifique"""
-        async with self.lock:
-            if tenant_id in self.active_connections:
-                if user_id in self.active_connections[tenant_id]:
-                    try:
-                        await self.active_connections[tenant_id][user_id].send_json(message)
-                        return True
-                    except Exception as e:
-                        logger.error(f"Erreur envoi WebSocket à {user_id}: {e}")
-                        # Nettoyer la connexion morte
-                        del self.active_connections[tenant_id][user_id]
-        return False
-    
-    async def broadcast_to_tenant(self, tenant_id: str, message: dict):
-        """Diffuse un message à tous les utilisateurs d'un tenant"""
-        if tenant_id not in self.active_connections:
-            return 0
-        
-        sent_count = 0
-        dead_connections = []
-        
-        async with self.lock:
-            connections = list(self.active_connections.get(tenant_id, {}).items())
-        
-        for user_id, websocket in connections:
+        self._abonnes: List[Callable[[dict], Any]] = []
+
+    def abonner(self, callback: Callable[[dict], Any]):
+        self._abonnes.append(callback)
+
+    def _notifier(self, message: dict):
+        for callback in self._abonnes:
             try:
-                await websocket.send_json(message)
-                sent_count += 1
+                callback(message)
             except Exception as e:
-                logger.error(f"Erreur broadcast à {user_id}: {e}")
-                dead_connections.append(user_id)
-        
-        # Nettoyer les connexions mortes
-        async with self.lock:
-            for user_id in dead_connections:
-                if tenant_id in self.active_connections:
-                    if user_id in self.active_connections[tenant_id]:
-                        del self.active_connections[tenant_id][user_id]
-        
-        logger.info(f"Broadcast tenant {tenant_id}: {sent_count} destinataire(s)")
-        return sent_count
-    
-    async def broadcast_to_role(self, tenant_id: str, role: str, message: dict, db):
+                logger.error(f"❌ Livraison temps réel échouée: {e}")
+
+    async def publier(self, message: dict):
+        self._notifier(message)
+
+    async def demarrer(self):
+        pass
+
+    async def arreter(self):
+        pass
+
+
+class TransportMongo(TransportMemoire):
+    """
+    Transport multi-workers : chaque diffusion est livrée localement puis
+    insérée dans realtime_messages; les autres workers la reçoivent par change
+    stream (messages purgés par index TTL sur created_at).
+    """
+
+    def __init__(self, db):
+        super().__init__()
+        self.collection = db.realtime_messages
+        self.origine = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._tache: Optional[asyncio.Task] = None
+
+    async def publier(self, message: dict):
+        self._notifier(message)
+        try:
+            await self.collection.insert_one({
+                **message,
+                "origine": self.origine,
+                "created_at": datetime.now(timezone.utc)
+            })
+        except Exception as e:
+            logger.warning(f"⚠️ Message temps réel non relayé aux autres workers: {e}")
+
+    async def demarrer(self):
+        if self._tache is None:
+            self._tache = asyncio.create_task(self._suivre())
+            logger.info(f"📡 Transport temps réel Mongo démarré ({self.origine})")
+
+    async def arreter(self):
+        if self._tache is not None:
+            self._tache.cancel()
+            try:
+                await self._tache
+            except asyncio.CancelledError:
+                pass
+            self._tache = None
+
+    async def _suivre(self):
+        from pymongo.errors import OperationFailure
+        pipeline = [{"$match": {"operationType": "insert", "fullDocument.origine": {"$ne": self.origine}}}]
+        delai = 1
+        while True:
+            try:
+                async with self.collection.watch(pipeline) as flux:
+                    delai = 1
+                    async for changement in flux:
+                        self._notifier(changement["fullDocument"])
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                # Change streams indisponibles (MongoDB autonome): diffusion locale uniquement
+                logger.error(f"❌ Change stream realtime_messages indisponible, diffusion limitée à ce worker: {e}")
+                return
+            except Exception as e:
+                logger.warning(f"⚠️ Change stream realtime_messages interrompu, reprise dans {delai}s: {e}")
+                await asyncio.sleep(delai)
+                delai = min(delai * 2, 30)
+
+
+# ==================== HUB ====================
+
+class WebSocketManager:
+    """Connexions WebSocket par canal (tenant) et par utilisateur"""
+
+    def __init__(self, taille_file: int = REALTIME_QUEUE_SIZE,
+                 delai_envoi: float = REALTIME_SEND_TIMEOUT_SECONDS):
+        self.taille_file = taille_file
+        self.delai_envoi = delai_envoi
+        # Structure: { canal: { user_id: {Connexion, ...} } }
+        self.active_connections: Dict[str, Dict[str, Set[Connexion]]] = {}
+        self.connexions_abandonnees = 0
+        self.transport = None
+        self.set_transport(TransportMemoire())
+
+    def set_transport(self, transport):
+        self.transport = transport
+        transport.abonner(self._recevoir)
+
+    async def connect(self, websocket: WebSocket, canal: str, user_id: str) -> Connexion:
+        """Accepte la connexion et démarre sa tâche d'écriture"""
+        await websocket.accept()
+        connexion = Connexion(websocket, canal, user_id, self.taille_file)
+        self.active_connections.setdefault(canal, {}).setdefault(user_id, set()).add(connexion)
+        connexion.tache = asyncio.create_task(self._ecrire(connexion))
+        logger.info(f"🔌 WebSocket connecté: canal={canal}, user={user_id[:8]}...")
+        return connexion
+
+    async def disconnect(self, connexion: Connexion):
+        """Retire la connexion et arrête sa tâche d'écriture"""
+        if self._retirer(connexion):
+            logger.info(f"🔌 WebSocket déconnecté: canal={connexion.canal}, user={connexion.user_id[:8]}...")
+        if connexion.tache is not None and connexion.tache is not asyncio.current_task():
+            connexion.tache.cancel()
+
+    def _retirer(self, connexion: Connexion) -> bool:
+        utilisateurs = self.active_connections.get(connexion.canal, {})
+        connexions = utilisateurs.get(connexion.user_id)
+        if not connexions or connexion not in connexions:
+            return False
+        connexions.discard(connexion)
+        if not connexions:
+            del utilisateurs[connexion.user_id]
+        if not utilisateurs:
+            self.active_connections.pop(connexion.canal, None)
+        return True
+
+    async def _abandonner(self, connexion: Connexion, raison: str):
+        """Politique client lent / mort: retrait puis fermeture de la socket"""
+        if self._retirer(connexion):
+            self.connexions_abandonnees += 1
+            logger.warning(f"⚠️ WebSocket fermé ({raison}): canal={connexion.canal}, user={connexion.user_id[:8]}...")
+        if connexion.tache is not None and connexion.tache is not asyncio.current_task():
+            connexion.tache.cancel()
+        try:
+            await asyncio.wait_for(connexion.websocket.close(code=CODE_CLIENT_LENT), self.delai_envoi)
+        except Exception:
+            pass
+
+    async def _ecrire(self, connexion: Connexion):
+        try:
+            while True:
+                texte = await connexion.file.get()
+                await asyncio.wait_for(connexion.websocket.send_text(texte), self.delai_envoi)
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            await self._abandonner(connexion, "envoi trop lent")
+        except Exception as e:
+            await self._abandonner(connexion, f"envoi en erreur: {e}")
+
+    def _recevoir(self, message: dict):
+        """Livraison locale d'un message publié (ce worker ou un autre)"""
+        self._livrer(message["canal"], message["texte"], message.get("user_ids"))
+
+    def _livrer(self, canal: str, texte: str, user_ids: Optional[List[str]] = None) -> int:
+        utilisateurs = self.active_connections.get(canal)
+        if not utilisateurs:
+            return 0
+        if user_ids is None:
+            cibles = [c for connexions in utilisateurs.values() for c in connexions]
+        else:
+            cibles = [c for user_id in user_ids for c in utilisateurs.get(user_id, ())]
+
+        livres = 0
+        for connexion in cibles:
+            if connexion.deposer(texte):
+                livres += 1
+            else:
+                asyncio.get_running_loop().create_task(self._abandonner(connexion, "file d'envoi pleine"))
+        return livres
+
+    async def _publier(self, canal: str, message: dict, user_ids: Optional[List[str]] = None) -> int:
+        connectes_localement = self.get_connected_count(canal)
+        await self.transport.publier({"canal": canal, "texte": encoder_message(message), "user_ids": user_ids})
+        return connectes_localement
+
+    async def broadcast_to_tenant(self, canal: str, message: dict) -> int:
+        """Diffuse un message à tous les clients du canal (tous workers); retourne les destinataires locaux"""
+        return await self._publier(canal, message)
+
+    async def send_to_user(self, canal: str, user_id: str, message: dict) -> int:
+        """Envoie un message aux connexions d'un utilisateur"""
+        return await self._publier(canal, message, [user_id])
+
+    async def broadcast_to_users(self, canal: str, user_ids: List[str], message: dict) -> int:
+        """Envoie un message à plusieurs utilisateurs (une seule publication)"""
+        return await self._publier(canal, message, list(user_ids))
+
+    async def broadcast_to_role(self, canal: str, role: str, message: dict, db) -> int:
         """
-        Diffuse un message aux utilisateurs d'un rôle spécifique
-        Nécessite l'accès à la DB pour vérifier les rôles
+        Diffuse un message aux utilisateurs actifs d'un rôle
+        (canal = id du tenant, nécessaire pour la requête des utilisateurs)
         """
-        if tenant_id not in self.active_connections:
-            return 0
-        
-        # Récupérer les IDs des utilisateurs du rôle
         users = await db.users.find(
-            {"tenant_id": tenant_id, "role": role, "statut": "Actif"},
-            {"id": 1}
-        ).to_list(1000)
-        
-        target_ids = set(u["id"] for u in users)
-        
-        sent_count = 0
-        async with self.lock:
-            connections = list(self.active_connections.get(tenant_id, {}).items())
-        
-        for user_id, websocket in connections:
-            if user_id in target_ids:
-                try:
-                    await websocket.send_json(message)
-                    sent_count += 1
-                except:
-                    pass
-        
-        return sent_count
-    
-    def get_connected_count(self, tenant_id: str = None) -> int:
-        """Retourne le nombre de connexions actives"""
-        if tenant_id:
-            return len(self.active_connections.get(tenant_id, {}))
-        
-        total = 0
-        for tenant_connections in self.active_connections.values():
-            total += len(tenant_connections)
-        return total
-    
-    def get_connected_users(self, tenant_id: str) -> List[str]:
-        """Retourne la liste des user_id connectés pour un tenant"""
-        return list(self.active_connections.get(tenant_id, {}).keys())
+            {"tenant_id": canal, "role": role, "statut": "Actif"},
+            {"_id": 0, "id": 1}
+        ).to_list(None)
+        return await self.broadcast_to_users(canal, [u["id"] for u in users], message)
+
+    def get_connected_count(self, canal: str = None) -> int:
+        """Retourne le nombre de connexions actives sur ce worker"""
+        if canal:
+            return sum(len(connexions) for connexions in self.active_connections.get(canal, {}).values())
+        return sum(self.get_connected_count(c) for c in list(self.active_connections))
+
+    # Nom utilisé par routes/websocket
+    get_connection_count = get_connected_count
+
+    def get_connected_users(self, canal: str) -> List[str]:
+        """Retourne la liste des user_id connectés sur ce worker"""
+        return list(self.active_connections.get(canal, {}).keys())
+
+    async def demarrer(self, db=None):
+        """Choisit le transport selon REALTIME_BUS et le démarre"""
+        if REALTIME_BUS == "mongo" and db is not None and not isinstance(self.transport, TransportMongo):
+            self.set_transport(TransportMongo(db))
+        await self.transport.demarrer()
+
+    async def arreter(self):
+        await self.transport.arreter()
+        for utilisateurs in list(self.active_connections.values()):
+            for connexions in list(utilisateurs.values()):
+                for connexion in list(connexions):
+                    await self.disconnect(connexion)
 
 
 # Instance globale
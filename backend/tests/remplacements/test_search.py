@@ -13,6 +13,7 @@ import sys
 sys.path.insert(0, '/app/backend')
 
 from routes.remplacements.search import trouver_remplacants_potentiels
+from services.hours_ledger import invalider_ledger_heures
 
 
 class TestTrouverRemplacantsPotentiels:
@@ -193,6 +194,110 @@ class TestTrouverRemplacantsPotentiels:
         assert result == []
 
 
+class TestPrechargementRemplacants:
+    """Le nombre de requêtes ne dépend pas du nombre de candidats"""
+    
+    @pytest.fixture
+    def db_prechargee(self):
+        users = [
+            {"id": f"user-{i}", "prenom": f"P{i}", "nom": f"N{i}", "statut": "Actif",
+             "grade": "pompier", "type_emploi": "temps_plein" if i == 4 else "temps_partiel",
+             "heures_max_semaine": 24,
+             "date_embauche": f"20{10 + i}-01-01"}
+            for i in range(1, 5)
+        ]
+        assignations = [
+            # user-2: garde de jour qui chevauche la garde demandée
+            {"user_id": "user-2", "date": "2026-03-20", "type_garde_id": "type-jour"},
+            # user-3: garde de nuit le même jour, sans chevauchement
+            {"user_id": "user-3", "date": "2026-03-20", "type_garde_id": "type-nuit"},
+            # user-4 (temps plein): 2 gardes de nuit dans la semaine (24h) -> dépasserait son maximum
+            {"user_id": "user-4", "date": "2026-03-16", "type_garde_id": "type-nuit"},
+            {"user_id": "user-4", "date": "2026-03-18", "type_garde_id": "type-nuit"},
+            # user-1: garde plus tôt dans le mois (équitabilité seulement)
+            {"user_id": "user-1", "date": "2026-03-02", "type_garde_id": "type-nuit"},
+        ]
+        types_garde = [
+            {"id": "type-jour", "nom": "Jour", "heure_debut": "08:00", "heure_fin": "16:00", "duree_heures": 8},
+            {"id": "type-nuit", "nom": "Nuit", "heure_debut": "18:00", "heure_fin": "06:00", "duree_heures": 12},
+            {"id": "type-externe", "nom": "Externe", "heure_debut": "00:00", "heure_fin": "23:59",
+             "duree_heures": 24, "est_garde_externe": True},
+        ]
+        assignations.append(
+            # user-1: garde externe (ne compte ni vers le max ni vers l'équité interne)
+            {"user_id": "user-1", "date": "2026-03-19", "type_garde_id": "type-externe"}
+        )
+        
+        def cursor(docs):
+            c = MagicMock()
+            c.to_list = AsyncMock(return_value=docs)
+            return c
+        
+        db = MagicMock()
+        for collection in ("parametres_remplacements", "tenants", "parametres_equipes_garde"):
+            getattr(db, collection).find_one = AsyncMock(return_value=None)
+        db.users.find_one = AsyncMock(return_value={"id": "user-99", "grade": "pompier"})
+        db.users.find.return_value = cursor(users)
+        db.types_garde.find_one = AsyncMock(return_value={
+            "id": "type-demande", "nom": "Jour", "heure_debut": "09:00", "heure_fin": "17:00",
+            "duree_heures": 8
+        })
+        db.types_garde.find.return_value = cursor(types_garde)
+        db.grades.find.return_value = cursor([])
+        # Requête du jour (date exacte) ou chargement du registre des heures (plage)
+        db.assignations.find.side_effect = lambda query, *a: cursor([
+            a for a in assignations
+            if (a["date"] == query["date"] if isinstance(query["date"], str)
+                else query["date"]["$gte"] <= a["date"] <= query["date"]["$lte"])
+        ])
+        db.disponibilites.find.return_value = cursor([])
+        invalider_ledger_heures()
+        yield db
+        invalider_ledger_heures()
+    
+    @pytest.mark.asyncio
+    async def test_requetes_bornees_et_classement(self, db_prechargee):
+        result = await trouver_remplacants_potentiels(
+            db=db_prechargee,
+            tenant_id="tenant-123",
+            demandeur_id="user-99",
+            type_garde_id="type-demande",
+            date_garde="2026-03-20",
+            exclus_ids=[]
+        )
+        
+        # Registre des heures (types de garde + assignations du mois) et assignations du jour:
+        # un nombre fixe de requêtes au lieu de plusieurs par candidat
+        assert db_prechargee.assignations.find.call_count == 2
+        assert db_prechargee.types_garde.find.call_count == 1
+        assert db_prechargee.disponibilites.find.call_count == 1
+        
+        par_user = {r["user_id"]: r for r in result}
+        assert "user-2" not in par_user  # conflit horaire
+        assert par_user["user-3"]["niveau"] == 3  # nuit sans chevauchement
+        assert par_user["user-4"]["heures_travaillees"] == 24
+        assert par_user["user-4"]["niveau"] == 5  # heures sup
+        # Heures réelles (durée du type de garde), gardes externes exclues de l'équité interne
+        assert par_user["user-1"]["heures_mois"] == 12
+        assert par_user["user-1"]["heures_travaillees"] == 0
+    
+    @pytest.mark.asyncio
+    async def test_registre_des_heures_en_cache(self, db_prechargee):
+        for _ in range(2):
+            await trouver_remplacants_potentiels(
+                db=db_prechargee,
+                tenant_id="tenant-123",
+                demandeur_id="user-99",
+                type_garde_id="type-demande",
+                date_garde="2026-03-20",
+                exclus_ids=[]
+            )
+        
+        # Deuxième recherche: seules les assignations du jour sont relues
+        assert db_prechargee.types_garde.find.call_count == 1
+        assert db_prechargee.assignations.find.call_count == 3
+
+
 # Exécution des tests
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
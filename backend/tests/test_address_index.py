@@ -0,0 +1,116 @@
+"""
+Tests unitaires pour l'index d'adresses (déduplication et rattachement)
+======================================================================
+
+Exécuter avec: pytest tests/test_address_index.py -v
+"""
+
+import random
+import pytest
+from unittest.mock import MagicMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+from utils.address_index import IndexAdresses, numero_bloc
+from utils.address_utils import find_matching_address, is_same_address
+
+
+RUES = ["Rue Principale", "rue principalle", "Boul. Saint-Joseph", "boulevard St-Joseph",
+        "Chemin du Lac", "ch. du lac", "Av. des Pins", "Rue de l'Église"]
+VILLES = ["Granby", "granby", "Shefford", "Bromont", ""]
+
+
+def batiments_aleatoires(n, graine=7):
+    rnd = random.Random(graine)
+    return [
+        {
+            "id": f"b-{i}",
+            "adresse_civique": f"{rnd.choice(['', ' '])}{rnd.randint(1, 40)}{rnd.choice(['', 'A', '-12'])} {rnd.choice(RUES)}",
+            "ville": rnd.choice(VILLES)
+        }
+        for i in range(n)
+    ] + [{"id": "sans-numero", "adresse_civique": "Rue Principale", "ville": "Granby"},
+         {"id": "vide", "adresse_civique": "", "ville": "Granby"}]
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+
+class TestIndexAdresses:
+
+    def test_numero_bloc(self):
+        assert numero_bloc("123-125 rue Principale") == "123"
+        assert numero_bloc(" 12A, ch. du Lac") == "12"
+        assert numero_bloc("Rue Principale") is None
+        assert numero_bloc("") is None
+
+    def test_equivalent_au_balayage_complet(self):
+        batiments = batiments_aleatoires(400)
+        index = IndexAdresses(batiments)
+        requetes = batiments_aleatoires(150, graine=11)
+
+        for requete in requetes:
+            attendus = [
+                b for b in batiments
+                if is_same_address(requete["adresse_civique"], requete["ville"], b["adresse_civique"], b["ville"])[0]
+            ]
+            assert index.doublons(requete["adresse_civique"], requete["ville"]) == attendus
+            assert find_matching_address(requete["adresse_civique"], requete["ville"], index) == \
+                [(b, 1.0) for b in attendus]
+
+    def test_liste_acceptee_et_champs_de_repli(self):
+        batiments = [{"id": "b-1", "adresse": "12 Rue Principale", "ville": "Granby"}]
+        assert find_matching_address("12 rue principale", "GRANBY", batiments)[0][0]["id"] == "b-1"
+        assert find_matching_address("13 rue principale", "Granby", batiments) == []
+
+
+class TestMatchInterventions:
+
+    @pytest.mark.asyncio
+    async def test_adresse_nettoyee_et_dossier_adresse(self):
+        import routes.import_interventions as import_interventions
+
+        fake = MagicMock()
+        fake.batiments.find = MagicMock(return_value=FakeCursor([
+            {"id": "b-1", "adresse_civique": "12 Rue Principale, Granby", "ville": ""},
+            {"id": "b-2", "adresse_civique": "40 Chemin du Lac", "ville": "Shefford"}
+        ]))
+        fake.import_dossier_adresses.find = MagicMock(return_value=FakeCursor([
+            {"pfm_id": "da-1", "adresse_civique": "40 ch. du lac", "ville": "Shefford"}
+        ]))
+
+        with patch.object(import_interventions, "db", fake):
+            resultat = await import_interventions.match_interventions_to_batiments([
+                {"address_full": "12 rue principale", "municipality": "Granby"},
+                {"dossier_adresse_id": "da-1"},
+                {"address_full": "99 rue Inconnue", "municipality": "Granby"}
+            ], "t-1")
+
+        assert [(i["_match"]["batiment_id"], i["_match"]["match_method"]) for i in resultat] == [
+            ("b-1", "address_match"), ("b-2", "dossier_adresse"), (None, None)
+        ]
+
+
+class TestAutoLinkSFTP:
+
+    @pytest.mark.asyncio
+    async def test_bloc_et_index_en_cache(self):
+        from services.sftp_service import SFTPService
+
+        fake = MagicMock()
+        fake.batiments.find = MagicMock(return_value=FakeCursor([
+            {"id": "b-1", "adresse_civique": "120 Rue Principale", "ville": "Granby"},
+            {"id": "b-2", "adresse_civique": "12 Rue Principale", "ville": "Granby"},
+            {"id": "b-3", "adresse_civique": "Rang Sainte-Marie", "ville": "Bromont"}
+        ]))
+        service = SFTPService(fake)
+
+        assert await service.auto_link_batiment("t-1", {"address_street": "12 rue Principale", "address_city": "GRANBY"}) == "b-2"
+        assert await service.auto_link_batiment("t-1", {"address": "Rang Sainte-Marie", "municipalite": "Bromont"}) == "b-3"
+        assert await service.auto_link_batiment("t-1", {"address": "7 rue Principale", "municipalite": "Granby"}) is None
+        fake.batiments.find.assert_called_once()
@@ -0,0 +1,305 @@
+"""
+Test de régression - Attribution automatique en mode parallèle
+==============================================================
+
+Vérifie que le mode « période chargée une fois + solveur en processus » et
+le mode séquentiel (rechargement de la base à chaque semaine, calcul sur la
+boucle asyncio) produisent exactement les assignations de l'implémentation
+d'origine (REFERENCE_SEQUENTIELLE, relevée avec traiter_semaine_attribution_auto
+avant l'extraction du solveur, sur le même scénario).
+
+Les deux modes tournent contre une base MongoDB simulée en mémoire.
+Exécuter avec: pytest tests/test_attribution_auto_parallele.py -v
+"""
+
+import copy
+import os
+import re
+import subprocess
+import sys
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+
+sys.path.insert(0, '/app/backend')
+
+import routes.planning_auto as planning_auto
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# ==================== BASE MONGODB SIMULÉE ====================
+
+def _valeur_match(valeur, condition):
+    if isinstance(condition, dict) and any(k.startswith("$") for k in condition):
+        for op, attendu in condition.items():
+            if op == "$gte" and not (valeur is not None and valeur >= attendu):
+                return False
+            if op == "$gt" and not (valeur is not None and valeur > attendu):
+                return False
+            if op == "$lte" and not (valeur is not None and valeur <= attendu):
+                return False
+            if op == "$lt" and not (valeur is not None and valeur < attendu):
+                return False
+            if op == "$in" and valeur not in attendu:
+                return False
+            if op == "$nin" and valeur in attendu:
+                return False
+            if op == "$ne" and valeur == attendu:
+                return False
+            if op == "$exists" and (valeur is not None) != attendu:
+                return False
+            if op == "$regex":
+                flags = re.IGNORECASE if "i" in condition.get("$options", "") else 0
+                if not isinstance(valeur, str) or not re.search(attendu, valeur, flags):
+                    return False
+        return True
+    return valeur == condition
+
+
+def _doc_match(doc, query):
+    for cle, condition in (query or {}).items():
+        if cle == "$or":
+            if not any(_doc_match(doc, q) for q in condition):
+                return False
+        elif not _valeur_match(doc.get(cle), condition):
+            return False
+    return True
+
+
+def _projeter(doc, projection):
+    doc = copy.deepcopy(doc)
+    doc.pop("_id", None)
+    inclus = [k for k, v in (projection or {}).items() if v and k != "_id"]
+    if inclus:
+        return {k: doc[k] for k in inclus if k in doc}
+    return doc
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return self.docs if length is None else self.docs[:length]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([_projeter(d, projection) for d in self.docs if _doc_match(d, query)])
+
+    async def find_one(self, query=None, projection=None):
+        for d in self.docs:
+            if _doc_match(d, query):
+                return _projeter(d, projection)
+        return None
+
+    async def insert_one(self, doc):
+        self.docs.append(copy.deepcopy(doc))
+
+    async def insert_many(self, docs, ordered=True):
+        self.docs.extend(copy.deepcopy(d) for d in docs)
+
+    async def update_many(self, query, update):
+        for d in self.docs:
+            if _doc_match(d, query):
+                d.update(update.get("$set", {}))
+
+    async def delete_many(self, query):
+        avant = len(self.docs)
+        self.docs = [d for d in self.docs if not _doc_match(d, query)]
+        return SimpleNamespace(deleted_count=avant - len(self.docs))
+
+    async def count_documents(self, query):
+        return sum(1 for d in self.docs if _doc_match(d, query))
+
+    async def distinct(self, field, query=None):
+        return list({d.get(field) for d in self.docs if _doc_match(d, query)})
+
+
+class FakeDB:
+    def __init__(self):
+        self._collections = {}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self._collections.setdefault(name, FakeCollection())
+
+
+# ==================== SCÉNARIO ====================
+
+TENANT_ID = "tenant-test"
+
+
+def construire_base():
+    db = FakeDB()
+    db.tenants.docs.append({"id": TENANT_ID, "slug": "test", "multi_casernes_actif": False})
+    db.parametres_remplacements.docs.append({"tenant_id": TENANT_ID, "activer_gestion_heures_sup": True})
+    db.parametres_validation_planning.docs.append({"tenant_id": TENANT_ID, "periode_equite": "mensuel"})
+    db.parametres_paie.docs.append({"tenant_id": TENANT_ID, "seuil_hebdomadaire": 40})
+    db.grades.docs.extend([
+        {"tenant_id": TENANT_ID, "nom": "Pompier", "est_officier": False, "niveau_hierarchique": 1},
+        {"tenant_id": TENANT_ID, "nom": "Lieutenant", "est_officier": True, "niveau_hierarchique": 2},
+    ])
+    db.types_garde.docs.extend([
+        {"tenant_id": TENANT_ID, "id": "tg-jour", "nom": "Garde de jour", "priorite": 1,
+         "heure_debut": "06:00", "heure_fin": "18:00", "duree_heures": 12,
+         "personnel_requis": 3, "officier_obligatoire": True},
+        {"tenant_id": TENANT_ID, "id": "tg-nuit", "nom": "Garde de nuit", "priorite": 2,
+         "heure_debut": "18:00", "heure_fin": "06:00", "duree_heures": 12, "personnel_requis": 2},
+        {"tenant_id": TENANT_ID, "id": "tg-externe", "nom": "Garde externe", "priorite": 3,
+         "heure_debut": "00:00", "heure_fin": "23:59", "duree_heures": 24,
+         "personnel_requis": 2, "est_garde_externe": True,
+         "jours_application": ["saturday", "sunday"]},
+    ])
+    for i in range(12):
+        type_emploi = "temps_plein" if i % 3 == 0 else ("temps_partiel" if i % 3 == 1 else "temporaire")
+        db.users.docs.append({
+            "tenant_id": TENANT_ID, "id": f"u{i:02d}", "prenom": f"Prenom{i}", "nom": f"Nom{i}",
+            "statut": "Actif", "type_emploi": type_emploi,
+            "grade": "Lieutenant" if i in (0, 4, 7) else "Pompier",
+            "fonction_superieur": i == 5,
+            "heures_max_semaine": 36 if type_emploi != "temps_plein" else None,
+            "date_embauche": f"20{10 + i:02d}-0{1 + i % 9}-15",
+            "accepter_gardes_externes": i != 8,
+        })
+    # Disponibilités manuelles, indisponibilités manuelles et générées
+    for jour in range(26, 32):
+        date = f"2026-01-{jour:02d}"
+        for u in ("u01", "u02", "u04", "u05"):
+            db.disponibilites.docs.append({"tenant_id": TENANT_ID, "user_id": u, "date": date,
+                                           "statut": "disponible", "origine": "manuelle"})
+        db.disponibilites.docs.append({"tenant_id": TENANT_ID, "user_id": "u07", "date": date,
+                                       "statut": "indisponible", "origine": "montreal_7_24"})
+    for jour in range(1, 15):
+        date = f"2026-02-{jour:02d}"
+        for u in ("u02", "u07", "u10"):
+            db.disponibilites.docs.append({"tenant_id": TENANT_ID, "user_id": u, "date": date,
+                                           "statut": "Disponible", "type_garde_id": "tg-nuit",
+                                           "heure_debut": "18:00", "heure_fin": "06:00"})
+        db.disponibilites.docs.append({"tenant_id": TENANT_ID, "user_id": "u01", "date": date,
+                                       "statut": "indisponible", "heure_debut": "08:00",
+                                       "heure_fin": "12:00"})
+    # Assignations manuelles existantes (à conserver) et une ancienne assignation auto
+    db.assignations.docs.extend([
+        {"tenant_id": TENANT_ID, "id": "manuelle-1", "user_id": "u03", "type_garde_id": "tg-jour",
+         "date": "2026-01-27", "assignation_type": "manuel"},
+        {"tenant_id": TENANT_ID, "id": "manuelle-2", "user_id": "u06", "type_garde_id": "tg-nuit",
+         "date": "2026-01-15", "assignation_type": "manuel"},
+        {"tenant_id": TENANT_ID, "id": "auto-ancienne", "user_id": "u09", "type_garde_id": "tg-nuit",
+         "date": "2026-02-03", "assignation_type": "auto"},
+    ])
+    return db
+
+
+REFERENCE_SEQUENTIELLE = {
+    "2026-01-26": ["tg-jour:u04", "tg-jour:u05", "tg-jour:u01", "tg-nuit:u02", "tg-nuit:u01"],
+    "2026-01-27": ["tg-jour:u04", "tg-jour:u05", "tg-nuit:u02", "tg-nuit:u01"],
+    "2026-01-28": ["tg-jour:u04", "tg-jour:u05", "tg-jour:u02", "tg-nuit:u08", "tg-nuit:u10"],
+    "2026-01-29": ["tg-jour:u11", "tg-jour:u08", "tg-jour:u10", "tg-nuit:u11", "tg-nuit:u08"],
+    "2026-01-30": ["tg-jour:u10", "tg-jour:u11", "tg-jour:u00", "tg-nuit:u09", "tg-nuit:u00"],
+    "2026-01-31": ["tg-jour:u00", "tg-jour:u03", "tg-jour:u06", "tg-nuit:u09", "tg-nuit:u03", "tg-externe:u01", "tg-externe:u02"],
+    "2026-02-01": ["tg-jour:u07", "tg-jour:u06", "tg-jour:u09", "tg-nuit:u07", "tg-nuit:u06", "tg-externe:u04", "tg-externe:u05"],
+    "2026-02-02": ["tg-jour:u04", "tg-jour:u07", "tg-jour:u05", "tg-nuit:u02", "tg-nuit:u10"],
+    "2026-02-03": ["tg-jour:u04", "tg-jour:u07", "tg-jour:u05", "tg-nuit:u02", "tg-nuit:u10"],
+    "2026-02-04": ["tg-jour:u04", "tg-jour:u07", "tg-jour:u05", "tg-nuit:u02", "tg-nuit:u10"],
+    "2026-02-05": ["tg-jour:u08", "tg-jour:u11", "tg-jour:u00", "tg-nuit:u01", "tg-nuit:u08"],
+    "2026-02-06": ["tg-jour:u11", "tg-jour:u08", "tg-jour:u00", "tg-nuit:u01", "tg-nuit:u11"],
+    "2026-02-07": ["tg-jour:u00", "tg-jour:u03", "tg-jour:u09", "tg-nuit:u01", "tg-nuit:u03", "tg-externe:u02", "tg-externe:u07"],
+    "2026-02-08": ["tg-jour:u03", "tg-jour:u06", "tg-jour:u09", "tg-nuit:u06", "tg-nuit:u09", "tg-externe:u10", "tg-externe:u11"],
+    "2026-02-09": ["tg-jour:u04", "tg-jour:u07", "tg-jour:u05", "tg-nuit:u02", "tg-nuit:u10"],
+    "2026-02-10": ["tg-jour:u04", "tg-jour:u07", "tg-jour:u05", "tg-nuit:u02", "tg-nuit:u10"],
+    "2026-02-11": ["tg-jour:u04", "tg-jour:u07", "tg-jour:u05", "tg-nuit:u02", "tg-nuit:u10"],
+    "2026-02-12": ["tg-jour:u08", "tg-jour:u11", "tg-jour:u00", "tg-nuit:u01", "tg-nuit:u08"],
+    "2026-02-13": ["tg-jour:u11", "tg-jour:u08", "tg-jour:u00", "tg-nuit:u01", "tg-nuit:u11"],
+    "2026-02-14": ["tg-jour:u00", "tg-jour:u03", "tg-jour:u06", "tg-nuit:u01", "tg-nuit:u03", "tg-externe:u02", "tg-externe:u04"],
+    "2026-02-15": ["tg-jour:u09", "tg-jour:u03", "tg-jour:u06", "tg-nuit:u09", "tg-nuit:u06", "tg-externe:u01", "tg-externe:u05"],
+}
+
+
+def tenant_test():
+    return SimpleNamespace(id=TENANT_ID, slug="test", nom="Test", parametres={"niveau_3_actif": True})
+
+
+def normaliser(assignations):
+    """Retire les champs non déterministes (uuid, horodatage)"""
+    resultat = []
+    for a in assignations:
+        a = {k: v for k, v in a.items() if k not in ("id", "_id", "created_at")}
+        resultat.append(a)
+    return resultat
+
+
+def par_jour(assignations):
+    """Assignations auto par date, dans l'ordre d'insertion ("type_garde:user")"""
+    resultat = {}
+    for a in assignations:
+        if a.get("assignation_type") == "auto":
+            resultat.setdefault(a["date"], []).append(f"{a['type_garde_id']}:{a['user_id']}")
+    return resultat
+
+
+async def executer_attribution(parallele: bool, etapes: list = None):
+    db = construire_base()
+    etape = planning_auto.AttributionProgress.etape
+
+    def suivre_etape(progress, step):
+        if etapes is not None:
+            etapes.append(step)
+        etape(progress, step)
+
+    with patch.object(planning_auto, "db", db), \
+            patch.object(planning_auto.AttributionProgress, "etape", suivre_etape):
+        await planning_auto.process_attribution_auto_async(
+            f"task-{parallele}", tenant_test(), "2026-01-26", "2026-02-15",
+            reset=True, mode_brouillon=True, mode_parallele=parallele
+        )
+    progress = planning_auto.attribution_progress_store[f"task-{parallele}"]
+    assert progress["status"] == "termine", progress
+    return normaliser(db.assignations.docs)
+
+
+class TestAttributionParallele:
+
+    @pytest.mark.asyncio
+    async def test_resultats_identiques_a_l_implementation_d_origine(self):
+        sequentiel = await executer_attribution(parallele=False)
+        parallele = await executer_attribution(parallele=True)
+
+        assert par_jour(sequentiel) == REFERENCE_SEQUENTIELLE
+        assert parallele == sequentiel
+
+    @pytest.mark.asyncio
+    async def test_progression_par_jour(self):
+        etapes = []
+        await executer_attribution(parallele=False, etapes=etapes)
+        traites = [e for e in etapes if e.startswith("📅 Traitement du ")]
+        assert len(traites) == 21
+        assert traites[0] == "📅 Traitement du 2026-01-26..."
+
+    def test_solveur_sans_fastapi_ni_motor(self):
+        """Le module chargé par les processus spawn n'importe ni FastAPI ni Motor"""
+        code = (
+            "import sys; import services.attribution_solver; "
+            "print(sorted(m for m in ('fastapi', 'motor', 'pymongo') if m in sys.modules))"
+        )
+        sortie = subprocess.run(
+            [sys.executable, "-c", code], cwd=BACKEND, capture_output=True, text=True, check=True
+        ).stdout
+        assert sortie.strip() == "[]"
+
+    @pytest.mark.asyncio
+    async def test_assignations_manuelles_conservees(self):
+        resultat = await executer_attribution(parallele=True)
+        types = {a.get("assignation_type") for a in resultat}
+        assert "manuel" in types
+        assert "auto" in types
+        # L'ancienne assignation auto de la période a été supprimée par le reset
+        assert not any(a.get("user_id") == "u09" and a.get("date") == "2026-02-03"
+                       and a.get("assignation_type") == "auto" and "justification" not in a
+                       for a in resultat)
@@ -0,0 +1,134 @@
+"""
+Tests unitaires pour le cache tenant / utilisateur et le bus d'invalidation
+==========================================================================
+
+Exécuter avec: pytest tests/test_auth_cache.py -v
+"""
+
+import asyncio
+import os
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+import routes.dependencies as dependencies
+from fastapi import HTTPException
+from services.cache_invalidation import TTLCache, BusInvalidationLocal, BusInvalidationUnix
+
+
+@pytest.fixture
+def fake_db():
+    fake = MagicMock()
+    fake.tenants.find_one = AsyncMock(return_value={"id": "t-1", "slug": "shefford", "nom": "Shefford"})
+    fake.users.find_one = AsyncMock(return_value={
+        "id": "u-1", "tenant_id": "t-1", "nom": "Tremblay", "prenom": "Marc", "role": "admin"
+    })
+    fake.super_admins.find_one = AsyncMock(return_value={"id": "sa-1", "email": "sa@test.ca", "nom": "Admin"})
+    dependencies._tenant_cache.clear()
+    dependencies._user_cache.clear()
+    with patch.object(dependencies, "db", fake):
+        yield fake
+    dependencies._tenant_cache.clear()
+    dependencies._user_cache.clear()
+
+
+class TestTTLCache:
+
+    def test_expiration(self):
+        cache = TTLCache(max_entries=10, ttl_seconds=60)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        with patch("services.cache_invalidation.time.monotonic", return_value=10 ** 9):
+            assert cache.get("a") is None
+        assert len(cache) == 0
+
+    def test_lru_borne(self):
+        cache = TTLCache(max_entries=2, ttl_seconds=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert cache.get("b") is None
+        assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+class TestBusInvalidation:
+
+    def test_bus_local_notifie_les_abonnes(self):
+        bus = BusInvalidationLocal()
+        recus = []
+        bus.abonner("tenants", recus.append)
+        bus.publier("tenants", {"slug": "shefford"})
+        bus.publier("utilisateurs", {"id": "u-1"})
+        assert recus == [{"slug": "shefford"}]
+
+    @pytest.mark.asyncio
+    async def test_bus_unix_entre_deux_workers(self, tmp_path):
+        emetteur = BusInvalidationUnix(str(tmp_path))
+        recepteur = BusInvalidationUnix(str(tmp_path))
+        recepteur.chemin = os.path.join(str(tmp_path), "worker-autre.sock")
+        recus = []
+        recepteur.abonner("utilisateurs", recus.append)
+
+        await emetteur.demarrer()
+        await recepteur.demarrer()
+        try:
+            emetteur.publier("utilisateurs", {"id": "u-1"})
+            for _ in range(50):
+                if recus:
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await emetteur.arreter()
+            await recepteur.arreter()
+
+        assert recus == [{"id": "u-1"}]
+
+
+class TestResolutionTenant:
+
+    @pytest.mark.asyncio
+    async def test_tenant_mis_en_cache(self, fake_db):
+        premier = await dependencies.get_tenant_from_slug("shefford")
+        second = await dependencies.get_tenant_from_slug("shefford")
+        assert premier.id == second.id == "t-1"
+        fake_db.tenants.find_one.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_tenant_inconnu_404(self, fake_db):
+        fake_db.tenants.find_one.return_value = None
+        with pytest.raises(HTTPException) as exc:
+            await dependencies.get_tenant_from_slug("inconnu")
+        assert exc.value.status_code == 404
+
+    @pytest.mark.asyncio
+    async def test_invalidation_par_id(self, fake_db):
+        await dependencies.get_tenant_from_slug("shefford")
+        dependencies.invalidate_tenant_cache(tenant_id="t-1")
+        await dependencies.get_tenant_from_slug("shefford")
+        assert fake_db.tenants.find_one.await_count == 2
+
+
+class TestResolutionUtilisateur:
+
+    @pytest.mark.asyncio
+    async def test_utilisateur_mis_en_cache_et_copie(self, fake_db):
+        doc = await dependencies.charger_utilisateur("u-1")
+        doc["role"] = "employe"
+        assert (await dependencies.charger_utilisateur("u-1"))["role"] == "admin"
+        fake_db.users.find_one.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_invalidation_utilisateur(self, fake_db):
+        await dependencies.charger_utilisateur("u-1")
+        dependencies.invalidate_user_cache("u-1")
+        await dependencies.charger_utilisateur("u-1")
+        assert fake_db.users.find_one.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_utilisateur_absent_non_mis_en_cache(self, fake_db):
+        fake_db.users.find_one.return_value = None
+        assert await dependencies.charger_utilisateur("u-2") is None
+        assert await dependencies.charger_utilisateur("u-2") is None
+        assert fake_db.users.find_one.await_count == 2
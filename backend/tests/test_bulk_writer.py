@@ -0,0 +1,56 @@
+"""
+Tests unitaires pour le tampon d'écritures groupées
+===================================================
+
+Exécuter avec: pytest tests/test_bulk_writer.py -v
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+import sys
+sys.path.insert(0, '/app/backend')
+
+from services.bulk_writer import BulkInsertBuffer
+
+
+@pytest.fixture
+def collection():
+    collection = MagicMock()
+    collection.insert_many = AsyncMock()
+    collection.delete_many = AsyncMock(return_value=MagicMock(deleted_count=1))
+    return collection
+
+
+class TestBulkInsertBuffer:
+
+    @pytest.mark.asyncio
+    async def test_flush_par_lots(self, collection):
+        writer = BulkInsertBuffer(collection, max_batch_size=2)
+        for i in range(5):
+            writer.add({"id": f"a-{i}"})
+
+        assert await writer.flush() == 5
+        assert collection.insert_many.await_count == 3
+        assert writer.round_trips == 3
+        assert writer.total_inserted == 5
+        assert len(writer) == 0
+
+    @pytest.mark.asyncio
+    async def test_flush_vide_sans_aller_retour(self, collection):
+        writer = BulkInsertBuffer(collection)
+        assert await writer.flush() == 0
+        collection.insert_many.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_echec_annule_le_lot_en_cours(self, collection):
+        collection.insert_many.side_effect = Exception("écriture refusée")
+        writer = BulkInsertBuffer(collection)
+        writer.add({"id": "a-1"})
+        writer.add({"id": "a-2"})
+
+        with pytest.raises(Exception):
+            await writer.flush()
+
+        collection.delete_many.assert_awaited_once_with({"id": {"$in": ["a-1", "a-2"]}})
+        assert len(writer) == 0
+        assert writer.total_inserted == 0
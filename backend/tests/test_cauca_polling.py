@@ -0,0 +1,243 @@
+"""
+Tests unitaires pour le polling de l'API CAUCA
+==============================================
+
+Client HTTP/2 partagé par tenant, contexte SSL mis en cache, traitement
+concurrent des événements et intervalle de polling adaptatif.
+Exécuter avec: pytest tests/test_cauca_polling.py -v
+"""
+
+import asyncio
+import httpx
+import pytest
+import ssl
+import time
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+import services.cauca_api_service as cauca_api_service
+from services.cauca_api_service import CAUCAAPIService, IntervalleAdaptatif
+
+
+CONFIG = {
+    "tenant_id": "t-1",
+    "api_url": "https://cad.test/api",
+    "ssi_token": "jeton",
+    "certificate_blob_name": "cert.pem",
+    "private_key_blob_name": "key.pem",
+    "updated_at": "2026-04-01",
+    "actif": True
+}
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+
+def creer_service(gestionnaire=None):
+    db = MagicMock()
+    db.interventions.find = MagicMock(return_value=FakeCursor([]))
+    db.interventions.insert_one = AsyncMock()
+    db.interventions.update_one = AsyncMock(return_value=MagicMock(modified_count=1))
+    transport = httpx.MockTransport(gestionnaire or (lambda requete: httpx.Response(200, json=[])))
+    service = CAUCAAPIService(db, MagicMock(broadcast_to_tenant=AsyncMock()), transport=transport)
+    service.get_ssl_context = AsyncMock(return_value=ssl.create_default_context())
+    return service
+
+
+class TestClientPartage:
+
+    @pytest.mark.asyncio
+    async def test_un_client_par_tenant(self):
+        requetes = []
+
+        def gestionnaire(requete):
+            requetes.append(requete)
+            return httpx.Response(200, json=[{"cardNumber": "1", "eventType": 0, "occurredOn": "t"}])
+
+        service = creer_service(gestionnaire)
+        await service.fetch_events("t-1", CONFIG)
+        await service.fetch_calling_card("1", "t-1", CONFIG)
+        client = service._clients["t-1"][1]
+
+        assert service.get_ssl_context.await_count == 1
+        assert [r.url.path for r in requetes] == ["/api/CallingCardEvents", "/api/CallingCards/1"]
+        assert all(r.headers["ssi-token"] == "jeton" for r in requetes)
+
+        # Nouveau certificat (updated_at): nouveau client, l'ancien est fermé
+        await service.fetch_events("t-1", {**CONFIG, "updated_at": "2026-04-02"})
+        assert client.is_closed and service._clients["t-1"][1] is not client
+
+        await service.stop_all_polling()
+        assert service._clients == {}
+
+    @pytest.mark.asyncio
+    async def test_sans_certificat_aucun_client_conserve(self):
+        requetes = []
+
+        def gestionnaire(requete):
+            requetes.append(requete)
+            return httpx.Response(200, json=[])
+
+        service = creer_service(gestionnaire)
+        service.get_ssl_context = AsyncMock(side_effect=[None, ssl.create_default_context()])
+
+        # Téléchargement du certificat en échec: cycle ignoré, rien en cache
+        assert await service.fetch_events("t-1", CONFIG) == []
+        assert requetes == [] and "t-1" not in service._clients
+
+        # Cycle suivant: contexte rechargé, client créé
+        await service.fetch_events("t-1", CONFIG)
+        assert len(requetes) == 1 and "t-1" in service._clients
+        await service.stop_all_polling()
+
+    @pytest.mark.asyncio
+    async def test_contexte_ssl_par_certificat(self):
+        service = CAUCAAPIService(MagicMock())
+        contexte = MagicMock()
+        with patch("services.azure_storage.get_object_async", AsyncMock(return_value=(b"pem", "application/x-pem-file"))) as lecture, \
+                patch.object(CAUCAAPIService, "_charger_certificat", return_value=contexte):
+            assert await service.get_ssl_context(CONFIG) is contexte
+            assert await service.get_ssl_context(dict(CONFIG)) is contexte
+            assert lecture.await_count == 2  # certificat + clé, une seule fois
+
+            await service.get_ssl_context({**CONFIG, "updated_at": "2026-04-02"})
+            assert lecture.await_count == 4
+            assert len(service._ssl_contexts) == 1
+
+
+class TestTraitementEvenements:
+
+    @pytest.mark.asyncio
+    async def test_cartes_en_parallele_ordre_par_carte(self, monkeypatch):
+        monkeypatch.setattr(cauca_api_service, "CAUCA_EVENT_CONCURRENCY", 2)
+        service = creer_service()
+        service.db.interventions.find = MagicMock(return_value=FakeCursor([{"external_call_id": "C"}]))
+        en_cours, maximum, traces = 0, 0, []
+
+        async def fetch(card_number, tenant_id, config):
+            nonlocal en_cours, maximum
+            en_cours += 1
+            maximum = max(maximum, en_cours)
+            await asyncio.sleep(0.02)
+            en_cours -= 1
+            traces.append(("fetch", card_number))
+            return {"numero": card_number}
+
+        async def update_one(filtre, update):
+            traces.append((update["$set"]["status"], filtre["external_call_id"]))
+            return MagicMock(modified_count=1)
+
+        service.fetch_calling_card = fetch
+        service.db.interventions.update_one = update_one
+        events = [
+            {"cardNumber": "A", "eventType": 0, "occurredOn": "1"},
+            {"cardNumber": "B", "eventType": 0, "occurredOn": "2"},
+            {"cardNumber": "C", "eventType": 0, "occurredOn": "3"},
+            {"cardNumber": "A", "eventType": 2, "occurredOn": "4"},
+            {"cardNumber": "D", "eventType": 0, "occurredOn": "5"}
+        ]
+        with patch("services.cauca_api_parser.parse_cauca_calling_card", side_effect=lambda data, t: {"id": f"i-{data['numero']}"}):
+            await service.process_events(events, "t-1", CONFIG)
+
+        assert maximum == 2
+        # Une seule requête pour les cartes existantes; C n'est pas retéléchargée
+        service.db.interventions.find.assert_called_once()
+        assert sorted(c for action, c in traces if action == "fetch") == ["A", "B", "D"]
+        assert traces.index(("fetch", "A")) < traces.index(("closed", "A"))
+        assert service.db.interventions.insert_one.await_count == 3
+        # C était déjà en base: pas considérée comme un appel en cours
+        assert set(service.cartes_actives["t-1"]) == {"B", "D"}
+
+    def test_cartes_actives_expirent(self, monkeypatch):
+        monkeypatch.setattr(cauca_api_service, "CAUCA_ACTIVE_CARD_TTL_SECONDS", 60)
+        service = creer_service()
+        service.cartes_actives["t-1"] = {"A": time.monotonic() - 120, "B": time.monotonic()}
+
+        assert service.appels_en_cours("t-1") is True
+        assert set(service.cartes_actives["t-1"]) == {"B"}
+        service.cartes_actives["t-1"]["B"] -= 120
+        assert service.appels_en_cours("t-1") is False
+        assert service.appels_en_cours("t-2") is False
+
+    @pytest.mark.asyncio
+    async def test_arret_oublie_les_cartes_actives(self):
+        service = creer_service()
+        service.cartes_actives["t-1"] = {"A": time.monotonic()}
+        await service.stop_polling("t-1")
+        assert "t-1" not in service.cartes_actives
+
+    @pytest.mark.asyncio
+    async def test_configs_lues_en_une_requete(self):
+        service = creer_service()
+        service.db.cauca_configs.find = MagicMock(return_value=FakeCursor([CONFIG, {**CONFIG, "tenant_id": "t-2"}]))
+        service.polling_tasks = {"t-1": MagicMock(), "t-2": MagicMock()}
+
+        configs = await asyncio.gather(service.get_configs_polling(), service.get_configs_polling())
+        assert set(configs[0]) == {"t-1", "t-2"}
+        service.db.cauca_configs.find.assert_called_once()
+
+        await service.invalider_config("t-1")
+        await service.get_configs_polling()
+        assert service.db.cauca_configs.find.call_count == 2
+
+
+    @pytest.mark.asyncio
+    async def test_demarrage_pendant_une_lecture_en_cours(self):
+        service = creer_service()
+        service.polling_tasks = {"t-1": MagicMock()}
+        lecture_lancee, liberer = asyncio.Event(), asyncio.Event()
+
+        class CurseurLent(FakeCursor):
+            async def to_list(self, length=None):
+                lecture_lancee.set()
+                await liberer.wait()
+                return list(self.docs)
+
+        # Première lecture (t-1 seul) en cours quand t-2 démarre
+        service.db.cauca_configs.find = MagicMock(side_effect=[
+            CurseurLent([CONFIG]),
+            FakeCursor([CONFIG, {**CONFIG, "tenant_id": "t-2"}])
+        ])
+        lecture = asyncio.create_task(service.get_configs_polling())
+        await lecture_lancee.wait()
+        service.polling_tasks["t-2"] = MagicMock()
+        service.invalider_configs_polling()
+        liberer.set()
+        await lecture
+
+        assert (await service.get_config_polling("t-2"))["tenant_id"] == "t-2"
+        assert service.db.cauca_configs.find.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_config_absente_relue_seule(self):
+        service = creer_service()
+        service.db.cauca_configs.find = MagicMock(return_value=FakeCursor([]))
+        service.db.cauca_configs.find_one = AsyncMock(return_value={**CONFIG, "tenant_id": "t-2"})
+        assert (await service.get_config_polling("t-2"))["tenant_id"] == "t-2"
+
+    @pytest.mark.asyncio
+    async def test_boucle_terminee_permet_le_redemarrage(self):
+        service = creer_service()
+        service.db.cauca_configs.find_one = AsyncMock(side_effect=[CONFIG, None])
+        service.db.cauca_configs.find = MagicMock(return_value=FakeCursor([]))
+
+        assert (await service.start_polling("t-1"))["success"] is True
+        await service.polling_tasks["t-1"]
+        # Config désactivée: la boucle s'arrête et libère sa place
+        assert "t-1" not in service.polling_tasks
+
+
+class TestIntervalleAdaptatif:
+
+    def test_rapide_pendant_les_appels_puis_ralentit(self):
+        intervalle = IntervalleAdaptatif(10, 300)
+        assert intervalle.prochain(False) == 300
+        assert intervalle.prochain(True) == 10
+        assert [intervalle.prochain(False) for _ in range(6)] == [20, 40, 80, 160, 300, 300]
+        assert IntervalleAdaptatif(10, 5).prochain(True) == 5
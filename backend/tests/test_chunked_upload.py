@@ -0,0 +1,135 @@
+"""
+Tests unitaires pour les uploads par chunks
+===========================================
+
+Exécuter avec: pytest tests/test_chunked_upload.py -v
+"""
+
+import asyncio
+import io
+import pytest
+from unittest.mock import MagicMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+from fastapi import UploadFile
+
+import utils.chunked_upload as chunked_upload
+
+
+class FakeSessions:
+    """Collection upload_sessions en mémoire (mises à jour par pipeline comprises)"""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_one(self, doc):
+        self.docs[doc["upload_id"]] = dict(doc)
+
+    async def find_one(self, filtre, projection=None):
+        doc = self.docs.get(filtre["upload_id"])
+        return dict(doc) if doc else None
+
+    async def find_one_and_update(self, filtre, pipeline, projection=None, return_document=None):
+        doc = self.docs.get(filtre["upload_id"])
+        if not doc:
+            return None
+        ajout = pipeline[0]["$set"]["chunks_recus"]["$setUnion"][1]
+        doc["chunks_recus"] = sorted(set(doc.get("chunks_recus", [])) | set(ajout))
+        doc["received_chunks"] = len(doc["chunks_recus"])
+        return dict(doc)
+
+    async def delete_one(self, filtre):
+        self.docs.pop(filtre["upload_id"], None)
+
+
+def chunk(data: bytes) -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename="chunk")
+
+
+@pytest.fixture
+def fake_db(tmp_path):
+    db = MagicMock()
+    db.upload_sessions = FakeSessions()
+
+    async def get_db():
+        return db
+
+    with patch.object(chunked_upload, "_get_db", get_db), \
+            patch.object(chunked_upload, "LOCAL_TMP", str(tmp_path)):
+        yield db
+
+
+CONTENU = b"0123456789abcdefghijKLMNO"  # 25 octets: chunks de 10, 10, 5
+
+
+class TestSpoolLocal:
+
+    @pytest.mark.asyncio
+    async def test_chunks_paralleles_desordre_et_reprise(self, fake_db):
+        upload_id = await chunked_upload.init_upload("t-1", "u-1", "histo.zip", len(CONTENU), 3, chunk_size=10)
+        assert fake_db.upload_sessions.docs[upload_id]["backend"] == "local"
+        spool = chunked_upload._chemin_spool(upload_id)
+
+        resultats = await asyncio.gather(*[
+            chunked_upload.save_chunk(upload_id, i, chunk(CONTENU[i * 10:(i + 1) * 10]))
+            for i in (2, 0)
+        ])
+        assert all(r["status"] == "received" for r in resultats)
+
+        session = await chunked_upload.get_upload_session(upload_id)
+        assert chunked_upload.chunks_manquants(session) == [1]
+
+        # Chunk renvoyé: écrasé au même offset, compté une seule fois
+        await chunked_upload.save_chunk(upload_id, 0, chunk(CONTENU[:10]))
+        dernier = await chunked_upload.save_chunk(upload_id, 1, chunk(CONTENU[10:20]))
+        assert dernier["received"] == 3
+        assert dernier["complete"] is True
+
+        chemin = await chunked_upload.assemble_chunks(upload_id)
+        assert chemin == spool  # aucune copie: le spool est le fichier final
+        assert open(chemin, "rb").read() == CONTENU
+        assert upload_id not in fake_db.upload_sessions.docs
+
+    @pytest.mark.asyncio
+    async def test_validation_et_chunks_manquants(self, fake_db):
+        upload_id = await chunked_upload.init_upload("t-1", "u-1", "histo.zip", len(CONTENU), 3, chunk_size=10)
+
+        assert "error" in await chunked_upload.save_chunk(upload_id, 0, chunk(b"court"))
+        assert "error" in await chunked_upload.save_chunk(upload_id, 3, chunk(b"x" * 10))
+        assert "error" in await chunked_upload.save_chunk(upload_id, 2, chunk(b"x" * 6))
+
+        await chunked_upload.save_chunk(upload_id, 0, chunk(CONTENU[:10]))
+        with pytest.raises(ValueError, match="Chunks manquants: 1/3"):
+            await chunked_upload.assemble_chunks(upload_id)
+
+
+class TestBlocsAzure:
+
+    @pytest.mark.asyncio
+    async def test_blocs_indexes_puis_liste_validee(self, fake_db):
+        blocs = {}
+        blob = MagicMock()
+        blob.stage_block.side_effect = lambda block_id, data, length=None: blocs.__setitem__(block_id, data)
+
+        def telecharger(max_concurrency=None):
+            valides = blob.commit_block_list.call_args.args[0]
+            telechargement = MagicMock()
+            telechargement.readinto.side_effect = lambda out: out.write(b"".join(blocs[b.id] for b in valides))
+            return telechargement
+        blob.download_blob.side_effect = telecharger
+
+        with patch.object(chunked_upload, "UPLOAD_CHUNK_BACKEND", "azure"), \
+                patch.object(chunked_upload.BlocsAzure, "_blob", staticmethod(lambda session: blob)):
+            upload_id = await chunked_upload.init_upload("t-1", "u-1", "histo.zip", len(CONTENU), 3, chunk_size=10)
+            await asyncio.gather(*[
+                chunked_upload.save_chunk(upload_id, i, chunk(CONTENU[i * 10:(i + 1) * 10]))
+                for i in (1, 2, 0)
+            ])
+            chemin = await chunked_upload.assemble_chunks(upload_id)
+
+        ids = [b.id for b in blob.commit_block_list.call_args.args[0]]
+        assert ids == [chunked_upload.BlocsAzure.id_bloc(i) for i in range(3)]
+        assert len(set(map(len, ids))) == 1
+        assert open(chemin, "rb").read() == CONTENU
+        blob.delete_blob.assert_called_once()
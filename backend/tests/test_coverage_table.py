@@ -0,0 +1,263 @@
+"""
+Tests unitaires pour la table de couverture du planning
+=======================================================
+
+La table tenue à jour de façon incrémentale doit donner la même couverture
+que le calcul complet sur toutes les assignations.
+Exécuter avec: pytest tests/test_coverage_table.py -v
+"""
+
+import asyncio
+import random
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from unittest.mock import MagicMock
+from pymongo import ReplaceOne
+import sys
+sys.path.insert(0, '/app/backend')
+
+from services.coverage_table import (
+    JOURS_MAPPING,
+    creneaux_couverture,
+    enregistrer_couverture,
+    invalider_couverture,
+    obtenir_couverture,
+    reconstruire_mois,
+    resumer_couverture,
+    retirer_couverture,
+)
+
+
+TYPES_GARDE = [
+    {"id": "jour", "personnel_requis": 3},
+    {"id": "nuit", "personnel_requis": 2, "jours_application": ["friday", "saturday", "sunday"]},
+    {"id": "admin", "jours_application": ["monday", "wednesday"]}
+]
+
+
+def correspond(doc, filtre):
+    for cle, valeur in filtre.items():
+        if isinstance(valeur, dict):
+            champ = doc.get(cle)
+            if "$in" in valeur and champ not in valeur["$in"]:
+                return False
+            if "$nin" in valeur and champ in valeur["$nin"]:
+                return False
+            if "$ne" in valeur and champ == valeur["$ne"]:
+                return False
+            for op, test in (("$gte", lambda a, b: a >= b), ("$lte", lambda a, b: a <= b),
+                             ("$lt", lambda a, b: a < b), ("$gt", lambda a, b: a > b)):
+                if op in valeur and (champ is None or not test(champ, valeur[op])):
+                    return False
+        elif doc.get(cle) != valeur:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    async def to_list(self, length=None):
+        # Point de suspension, comme un aller-retour Mongo
+        await asyncio.sleep(0)
+        return list(self.docs)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+
+    def find(self, filtre, projection=None):
+        return FakeCursor([dict(d) for d in self.docs.values() if correspond(d, filtre)])
+
+    async def insert_many(self, docs, ordered=True):
+        for doc in docs:
+            self.docs[doc.get("_id") or doc.get("id")] = dict(doc)
+
+    async def delete_many(self, filtre):
+        for cle in [c for c, d in self.docs.items() if correspond(d, filtre)]:
+            del self.docs[cle]
+
+    async def update_one(self, filtre, update, upsert=False):
+        await asyncio.sleep(0)
+        doc = self.docs.get(filtre["_id"])
+        if doc is None or not correspond(doc, filtre):
+            if not upsert:
+                return MagicMock(matched_count=0)
+            doc = self.docs[filtre["_id"]] = {"_id": filtre["_id"]}
+        doc.update(update.get("$set", {}))
+        return MagicMock(matched_count=1)
+
+    async def update_many(self, filtre, update):
+        for doc in self.docs.values():
+            if correspond(doc, filtre):
+                doc.update(update.get("$set", {}))
+
+    async def bulk_write(self, operations, ordered=True):
+        await asyncio.sleep(0)
+        for op in operations:
+            filtre, update = op._filter, op._doc
+            if isinstance(op, ReplaceOne):
+                self.docs[filtre["_id"]] = {"_id": filtre["_id"], **update}
+                continue
+            doc = self.docs.get(filtre["_id"])
+            if doc is None:
+                doc = self.docs[filtre["_id"]] = {"_id": filtre["_id"], **update.get("$setOnInsert", {})}
+            for champ, n in update.get("$inc", {}).items():
+                doc[champ] = doc.get(champ, 0) + n
+
+
+class FakeAssignations(FakeCollection):
+    """Collection d'assignations: seule l'agrégation de reconstruction est simulée"""
+
+    def __init__(self):
+        super().__init__()
+        self.aggregations = 0
+
+    def aggregate(self, pipeline):
+        self.aggregations += 1
+        groupes = {}
+        for doc in self.docs.values():
+            if correspond(doc, pipeline[0]["$match"]):
+                cle = (doc["date"][:10], doc["type_garde_id"])
+                groupes[cle] = groupes.get(cle, 0) + 1
+        return FakeCursor([
+            {"_id": {"date": d, "type_garde_id": t}, "assignes": n} for (d, t), n in groupes.items()
+        ])
+
+
+@pytest.fixture
+def fake_db():
+    db = MagicMock()
+    db.assignations = FakeAssignations()
+    db.couverture_planning = FakeCollection()
+    db.couverture_planning_mois = FakeCollection()
+    return db
+
+
+def assignation_aleatoire(rnd, i, debut):
+    jour = debut + timedelta(days=rnd.randint(0, 60))
+    return {
+        "id": f"a-{i}",
+        "tenant_id": "t-1",
+        "user_id": f"u-{rnd.randint(1, 20)}",
+        "type_garde_id": rnd.choice(["jour", "nuit", "admin", "supprime"]),
+        "date": jour.strftime("%Y-%m-%d") + rnd.choice(["", "T00:00:00"]),
+        "assignation_type": rnd.choice(["auto", "manuel", "manuel", "marqueur"])
+    }
+
+
+def couverture_naive(debut, fin, assignations):
+    """Ancien calcul du dashboard: parcours de toutes les assignations par créneau (marqueurs exclus)"""
+    requis = couverts = 0
+    jour = debut
+    while jour <= fin:
+        for tg in TYPES_GARDE:
+            jours_application = tg.get("jours_application", [])
+            if jours_application and JOURS_MAPPING[jour.weekday()] not in jours_application:
+                continue
+            personnel_requis = tg.get("personnel_requis", 1)
+            requis += personnel_requis
+            nb = sum(1 for a in assignations
+                     if a["type_garde_id"] == tg["id"] and a["date"].startswith(jour.strftime("%Y-%m-%d"))
+                     and a["assignation_type"] != "marqueur")
+            couverts += min(nb, personnel_requis)
+        jour += timedelta(days=1)
+    return requis, couverts
+
+
+class TestTableCouverture:
+
+    @pytest.mark.asyncio
+    async def test_incremental_equivalent_au_calcul_complet(self, fake_db):
+        rnd = random.Random(3)
+        debut = date(2026, 3, 1)
+        initiales = [assignation_aleatoire(rnd, i, debut) for i in range(300)]
+        await fake_db.assignations.insert_many(initiales)
+
+        # Première lecture: construction par agrégation
+        await obtenir_couverture(fake_db, "t-1", "2026-03-01", "2026-04-30")
+        assert fake_db.assignations.aggregations == 2
+
+        # Créations et suppressions suivies de façon incrémentale
+        ajoutees = [assignation_aleatoire(rnd, 1000 + i, debut) for i in range(80)]
+        await fake_db.assignations.insert_many(ajoutees)
+        await enregistrer_couverture(fake_db, "t-1", ajoutees)
+        retirees = rnd.sample(initiales, 60)
+        await fake_db.assignations.delete_many({"id": {"$in": [a["id"] for a in retirees]}})
+        await retirer_couverture(fake_db, "t-1", retirees)
+
+        assignes = await obtenir_couverture(fake_db, "t-1", "2026-03-01", "2026-04-30")
+        assert fake_db.assignations.aggregations == 2
+
+        actuelles = list(fake_db.assignations.docs.values())
+        for mois_debut, mois_fin in ((date(2026, 3, 1), date(2026, 3, 31)), (date(2026, 4, 1), date(2026, 4, 30))):
+            resume = resumer_couverture(TYPES_GARDE, mois_debut, mois_fin, assignes)
+            assert (resume["creneaux_requis"], resume["creneaux_couverts"]) == couverture_naive(mois_debut, mois_fin, actuelles)
+
+    @pytest.mark.asyncio
+    async def test_invalidation_reconstruit_le_mois(self, fake_db):
+        await fake_db.assignations.insert_many([
+            {"id": "a-1", "tenant_id": "t-1", "type_garde_id": "jour", "date": "2026-03-02", "assignation_type": "auto"},
+            {"id": "a-2", "tenant_id": "t-1", "type_garde_id": "jour", "date": "2026-04-06", "assignation_type": "auto"}
+        ])
+        assert await obtenir_couverture(fake_db, "t-1", "2026-03-01", "2026-04-30") == {
+            ("2026-03-02", "jour"): 1, ("2026-04-06", "jour"): 1
+        }
+
+        # Écriture de masse non suivie (ex: suppression des assignations d'un congé)
+        await fake_db.assignations.delete_many({"id": "a-1"})
+        await invalider_couverture(fake_db, "t-1", "2026-03-01", "2026-03-07")
+        assert await obtenir_couverture(fake_db, "t-1", "2026-03-01", "2026-04-30") == {("2026-04-06", "jour"): 1}
+        assert fake_db.assignations.aggregations == 3
+
+    @pytest.mark.asyncio
+    async def test_mois_expire_reconstruit(self, fake_db):
+        await obtenir_couverture(fake_db, "t-1", "2026-03-01", "2026-03-31")
+        fake_db.couverture_planning_mois.docs["t-1|2026-03"]["expire_at"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+        await obtenir_couverture(fake_db, "t-1", "2026-03-01", "2026-03-31")
+        assert fake_db.assignations.aggregations == 2
+
+    @pytest.mark.asyncio
+    async def test_reconstructions_concurrentes(self, fake_db):
+        """Deux reconstructions du même mois et une création en parallèle: pas de doublon ni de perte"""
+        initiales = [
+            {"id": f"a-{i}", "tenant_id": "t-1", "type_garde_id": "jour", "date": f"2026-03-{i:02d}", "assignation_type": "auto"}
+            for i in range(1, 6)
+        ]
+        await fake_db.assignations.insert_many(initiales)
+        # Créneau périmé (assignation supprimée hors suivi)
+        fake_db.couverture_planning.docs["t-1|2026-03-20|nuit"] = {
+            "_id": "t-1|2026-03-20|nuit", "tenant_id": "t-1", "date": "2026-03-20", "type_garde_id": "nuit", "assignes": 2
+        }
+
+        nouvelle = {"id": "a-99", "tenant_id": "t-1", "type_garde_id": "jour", "date": "2026-03-01", "assignation_type": "auto"}
+
+        async def creer():
+            await asyncio.sleep(0)
+            await fake_db.assignations.insert_many([nouvelle])
+            await enregistrer_couverture(fake_db, "t-1", [nouvelle])
+
+        resultats = await asyncio.gather(
+            reconstruire_mois(fake_db, "t-1", "2026-03"),
+            reconstruire_mois(fake_db, "t-1", "2026-03"),
+            creer()
+        )
+        # La création a croisé les reconstructions: le mois n'est pas marqué construit
+        assert resultats[:2] == [False, False]
+
+        attendu = {("2026-03-01", "jour"): 2, **{(f"2026-03-{i:02d}", "jour"): 1 for i in range(2, 6)}}
+        assert await obtenir_couverture(fake_db, "t-1", "2026-03-01", "2026-03-31") == attendu
+        assert "t-1|2026-03-20|nuit" not in fake_db.couverture_planning.docs
+
+        # Reconstruit sans écriture concurrente: marqué, puis servi depuis la table
+        agregations = fake_db.assignations.aggregations
+        assert await obtenir_couverture(fake_db, "t-1", "2026-03-01", "2026-03-31") == attendu
+        assert fake_db.assignations.aggregations == agregations
+
+    def test_statuts_des_creneaux(self):
+        lundi = date(2026, 3, 2)
+        creneaux = creneaux_couverture(TYPES_GARDE, lundi, lundi, {("2026-03-02", "jour"): 1, ("2026-03-02", "admin"): 1})
+        assert [(c["type_garde_id"], c["statut"]) for c in creneaux] == [("jour", "partielle"), ("admin", "complete")]
+        assert resumer_couverture([], lundi, lundi, {})["taux"] == 100.0
@@ -0,0 +1,83 @@
+"""
+Tests unitaires pour la résolution des disponibilités
+=====================================================
+
+Vérifie les règles de priorité partagées par le planning, la recherche de
+remplaçants et la génération d'indisponibilités.
+Exécuter avec: pytest tests/test_disponibilites_resolution.py -v
+"""
+
+import sys
+sys.path.insert(0, '/app/backend')
+
+from services.disponibilites_resolution import (
+    ResolutionDisponibilites,
+    est_saisie_manuelle,
+    est_statut_disponible,
+)
+
+
+def _dispo(user_id, date, statut="disponible", **extra):
+    return {"user_id": user_id, "date": date, "statut": statut, **extra}
+
+
+class TestRegles:
+
+    def test_statut_disponible_insensible_casse(self):
+        assert est_statut_disponible("disponible")
+        assert est_statut_disponible("Disponible")
+        assert est_statut_disponible("dispo")
+        assert not est_statut_disponible("indisponible")
+        assert not est_statut_disponible(None)
+
+    def test_saisie_manuelle(self):
+        assert est_saisie_manuelle({})
+        assert est_saisie_manuelle({"origine": "manuelle"})
+        assert not est_saisie_manuelle({"origine": "montreal_7_24"})
+        assert not est_saisie_manuelle({"source": "auto", "origine": "manuelle"})
+        assert est_saisie_manuelle({"source": "manuel", "origine": "import_csv"})
+
+
+class TestResolutionDisponibilites:
+
+    def test_indispo_generee_ignoree_si_dispo_manuelle(self):
+        resolution = ResolutionDisponibilites([
+            _dispo("u1", "2026-01-05"),
+            _dispo("u1", "2026-01-05", "indisponible", origine="montreal_7_24"),
+        ])
+        assert not resolution.est_indisponible("u1", "2026-01-05")
+        assert resolution.est_disponible("u1", "2026-01-05")
+        assert len(resolution.indisponibilites_ignorees) == 1
+
+    def test_indispo_manuelle_toujours_bloquante(self):
+        resolution = ResolutionDisponibilites([
+            _dispo("u1", "2026-01-05"),
+            _dispo("u1", "2026-01-05", "indisponible"),
+        ])
+        assert resolution.est_indisponible("u1", "2026-01-05")
+
+    def test_dispo_generee_ne_contredit_pas(self):
+        resolution = ResolutionDisponibilites([
+            _dispo("u1", "2026-01-05", origine="import_csv"),
+            _dispo("u1", "2026-01-05", "indisponible", origine="horaire_abc"),
+        ])
+        assert resolution.est_indisponible("u1", "2026-01-05")
+
+    def test_cle_par_utilisateur_et_date(self):
+        resolution = ResolutionDisponibilites([
+            _dispo("u1", "2026-01-05"),
+            _dispo("u1", "2026-01-06", "indisponible", origine="montreal_7_24"),
+            _dispo("u2", "2026-01-05", "indisponible", origine="montreal_7_24"),
+        ])
+        assert resolution.est_indisponible("u1", "2026-01-06")
+        assert resolution.est_indisponible("u2", "2026-01-05")
+        assert not resolution.est_disponible("u2", "2026-01-05")
+
+    def test_filtrer_indisponibilites_generees(self):
+        resolution = ResolutionDisponibilites([_dispo("u1", "2026-01-05")])
+        generees = [
+            _dispo("u1", "2026-01-05", "indisponible", origine="quebec_10_14"),
+            _dispo("u1", "2026-01-06", "indisponible", origine="quebec_10_14"),
+        ]
+        restantes = resolution.filtrer_indisponibilites_generees(generees)
+        assert [i["date"] for i in restantes] == ["2026-01-06"]
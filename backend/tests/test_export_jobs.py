@@ -0,0 +1,146 @@
+"""
+Tests unitaires pour le service de jobs d'export
+================================================
+
+Le rendu s'exécute dans le pool de processus (spawn) comme en production.
+Exécuter avec: pytest tests/test_export_jobs.py -v
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+import services.export_jobs as export_jobs
+from routes.rapports_rendu import rendre_export_personnel, MEDIA_TYPE_PDF, MEDIA_TYPE_XLSX
+
+
+def payload_personnel(export_type="pdf", nb=25):
+    return {
+        "tenant": {"id": "t-1", "slug": "shefford", "nom": "Shefford"},
+        "tenant_slug": "shefford",
+        "export_type": export_type,
+        "user_id": None,
+        "users": [
+            {"id": f"u-{i}", "nom": f"Nom{i}", "prenom": "Prénom", "statut": "Actif", "type_emploi": "temps_plein"}
+            for i in range(nb)
+        ]
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    with patch.object(export_jobs, "EXPORT_STORE_DIR", str(tmp_path)):
+        yield tmp_path
+
+
+@pytest.fixture
+def fake_db():
+    fake = MagicMock()
+    fake.export_jobs.insert_one = AsyncMock()
+    fake.export_jobs.update_one = AsyncMock()
+    return fake
+
+
+class TestStockage:
+
+    def test_adresse_par_contenu(self, store):
+        file_id = export_jobs.enregistrer_artefact(b"%PDF-test", "rapport.pdf", MEDIA_TYPE_PDF, cle="abc")
+        chemin, meta = export_jobs.lire_artefact(file_id)
+
+        assert open(chemin, "rb").read() == b"%PDF-test"
+        assert meta["filename"] == "rapport.pdf"
+        assert export_jobs.enregistrer_artefact(b"%PDF-test", "autre.pdf", MEDIA_TYPE_PDF) == file_id
+        assert export_jobs.artefact_pour_requete("abc") == file_id
+
+    def test_file_id_invalide_refuse(self, store):
+        assert export_jobs.lire_artefact("../../etc/passwd") is None
+        assert export_jobs.lire_artefact("0" * 64) is None
+
+    def test_artefact_expire(self, store):
+        file_id = export_jobs.enregistrer_artefact(b"data", "a.xlsx", MEDIA_TYPE_XLSX)
+        with patch.object(export_jobs, "EXPORT_ARTIFACT_TTL_SECONDS", -1):
+            assert export_jobs.lire_artefact(file_id) is None
+            export_jobs.nettoyer_artefacts()
+        assert list(store.iterdir()) == []
+
+
+class TestJobs:
+
+    @pytest.mark.asyncio
+    async def test_rendu_en_processus_puis_deduplication(self, store, fake_db):
+        job, termine = await export_jobs.soumettre_export(
+            fake_db, tenant_id="t-1", demandeur_id="u-1", type_export="personnel_pdf",
+            rendu=rendre_export_personnel, payload=payload_personnel()
+        )
+        assert job["status"] == "en_attente"
+        job = await termine
+
+        assert job["status"] == "termine", job.get("error")
+        assert job["filename"] == "liste_personnel.pdf"
+        chemin, meta = export_jobs.lire_artefact(job["file_id"])
+        assert open(chemin, "rb").read(4) == b"%PDF"
+
+        # Même demande, mêmes données: même fichier, sans nouveau rendu
+        doublon, termine = await export_jobs.soumettre_export(
+            fake_db, tenant_id="t-1", demandeur_id="u-2", type_export="personnel_pdf",
+            rendu=rendre_export_personnel, payload=payload_personnel()
+        )
+        assert doublon["status"] == "termine"
+        assert doublon["file_id"] == job["file_id"]
+
+        # Données modifiées: nouvelle clé, nouveau rendu
+        modifie, termine = await export_jobs.soumettre_export(
+            fake_db, tenant_id="t-1", demandeur_id="u-1", type_export="personnel_pdf",
+            rendu=rendre_export_personnel, payload=payload_personnel(nb=26)
+        )
+        assert modifie["status"] == "en_attente"
+        assert (await termine)["file_id"] != job["file_id"]
+
+    @pytest.mark.asyncio
+    async def test_erreur_de_rendu_enregistree(self, store, fake_db):
+        payload = payload_personnel("excel")
+        payload["users"] = None
+        job, termine = await export_jobs.soumettre_export(
+            fake_db, tenant_id="t-1", demandeur_id="u-1", type_export="personnel_excel",
+            rendu=rendre_export_personnel, payload=payload
+        )
+        job = await termine
+        assert job["status"] == "erreur"
+        assert job["error"]
+
+
+class TestRendusConstruitsDansLaRoute:
+
+    @pytest.mark.asyncio
+    async def test_pdf_avec_pied_de_page_construit_dans_le_pool(self):
+        from types import SimpleNamespace
+        from reportlab.lib.pagesizes import letter, landscape
+        from reportlab.lib.styles import getSampleStyleSheet
+        from reportlab.platypus import Paragraph, PageBreak, Table
+        from utils.pdf_helpers import create_branded_pdf, draw_profiremanager_footer
+
+        tenant = SimpleNamespace(id="t-1", nom="Shefford")
+        buffer, doc, elements = create_branded_pdf(tenant, pagesize=landscape(letter))
+        elements += [Paragraph("Planning", getSampleStyleSheet()["Title"]), Table([["a", "b"]]), PageBreak(), Table([["c", "d"]])]
+
+        resultat = await export_jobs.construire_pdf_hors_boucle(
+            doc, elements, onFirstPage=draw_profiremanager_footer, onLaterPages=draw_profiremanager_footer
+        )
+        contenu = resultat.read()
+        assert contenu.startswith(b"%PDF")
+        assert contenu.count(b"/Type /Page\n") == 2
+        # La mise en page a eu lieu dans un autre processus
+        assert buffer.getvalue() == b""
+
+    @pytest.mark.asyncio
+    async def test_classeur_enregistre_dans_le_pool(self):
+        from openpyxl import Workbook, load_workbook
+        from openpyxl.styles import Font
+
+        wb = Workbook()
+        wb.active["A1"] = "Rapport"
+        wb.active["A1"].font = Font(bold=True)
+
+        resultat = await export_jobs.enregistrer_classeur_hors_boucle(wb)
+        assert load_workbook(resultat).active["A1"].value == "Rapport"
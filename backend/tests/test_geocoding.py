@@ -0,0 +1,171 @@
+"""
+Tests unitaires pour le service de géocodage
+============================================
+
+Exécuter avec: pytest tests/test_geocoding.py -v
+"""
+
+import asyncio
+import time
+import pytest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+import httpx
+
+import services.geocoding as geocoding
+from services.geocoding import Geocodeur, LimiteurDebit, cle_geocodage, geocoder_lot
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self._iter = iter(docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeGeocodeur:
+    def __init__(self, reponses):
+        self.reponses = reponses
+        self.appels = []
+
+    async def geocoder(self, address, city, province="Québec", country="Canada"):
+        self.appels.append(address)
+        reponse = self.reponses.get(address, ((None, None), True))
+        if isinstance(reponse, Exception):
+            raise reponse
+        if reponse == "bloque":
+            await asyncio.Event().wait()
+        return reponse
+
+
+def fake_db(entrees):
+    db = MagicMock()
+    db.geocodage_cache.find = MagicMock(return_value=FakeCursor(entrees))
+    db.geocodage_cache.bulk_write = AsyncMock()
+    return db
+
+
+class TestCache:
+
+    def test_cle_normalisee(self):
+        assert cle_geocodage("123 Rue Principale", "Granby") == cle_geocodage("123, rue principale", "GRANBY")
+        assert cle_geocodage("123 Rue Principale", "Granby") != cle_geocodage("123 Rue Principale", "Shefford")
+
+    @pytest.mark.asyncio
+    async def test_seules_les_adresses_inconnues_sont_geocodees(self):
+        recent = datetime.now(timezone.utc).isoformat()
+        ancien = (datetime.now(timezone.utc) - timedelta(days=365)).isoformat()
+        db = fake_db([
+            {"cle": cle_geocodage("1 Rue A", "Granby"), "latitude": 45.1, "longitude": -72.1, "updated_at": ancien},
+            {"cle": cle_geocodage("2 Rue B", "Granby"), "latitude": None, "longitude": None, "updated_at": recent},
+            {"cle": cle_geocodage("3 Rue C", "Granby"), "latitude": None, "longitude": None, "updated_at": ancien},
+        ])
+        geocodeur = FakeGeocodeur({
+            "3 Rue C": ((45.3, -72.3), True),
+            "4 Rue D": ((45.4, -72.4), True),
+            "5 Rue E": ((None, None), False),
+        })
+
+        adresses = [{"address": a, "city": "Granby"} for a in
+                    ("1 Rue A", "2 Rue B", "3 Rue C", "4 Rue D", "4 rue d", "5 Rue E")] + [{"address": "", "city": "Granby"}]
+        resultats = await geocoder_lot(db, adresses, geocodeur=geocodeur)
+
+        assert resultats == [(45.1, -72.1), (None, None), (45.3, -72.3), (45.4, -72.4), (45.4, -72.4), (None, None), (None, None)]
+        # Échec négatif expiré retenté, doublon du lot géocodé une fois
+        assert sorted(geocodeur.appels) == ["3 Rue C", "4 Rue D", "5 Rue E"]
+        # Erreur réseau non mise en cache
+        operations = db.geocodage_cache.bulk_write.await_args.args[0]
+        assert sorted(op._doc["$set"]["adresse"] for op in operations) == ["3 Rue C", "4 Rue D"]
+
+    @pytest.mark.asyncio
+    async def test_tout_en_cache_aucun_appel(self):
+        db = fake_db([{"cle": cle_geocodage("1 Rue A", "Granby"), "latitude": 45.1, "longitude": -72.1}])
+        geocodeur = FakeGeocodeur({})
+        assert await geocoder_lot(db, [{"address": "1 Rue A", "city": "Granby"}], geocodeur=geocodeur) == [(45.1, -72.1)]
+        assert geocodeur.appels == []
+        db.geocodage_cache.bulk_write.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_erreur_isolee_et_cache_par_paquets(self):
+        db = fake_db([])
+        geocodeur = FakeGeocodeur({
+            "1 Rue A": ((45.1, -72.1), True),
+            "2 Rue B": ValueError("Expecting value"),
+            "3 Rue C": ((45.3, -72.3), True),
+            "4 Rue D": ((45.4, -72.4), True),
+        })
+        adresses = [{"address": a, "city": "Granby"} for a in ("1 Rue A", "2 Rue B", "3 Rue C", "4 Rue D")]
+
+        with patch.object(geocoding, "GEOCODING_CACHE_BATCH", 2):
+            resultats = await geocoder_lot(db, adresses, geocodeur=geocodeur)
+
+        assert resultats == [(45.1, -72.1), (None, None), (45.3, -72.3), (45.4, -72.4)]
+        paquets = [appel.args[0] for appel in db.geocodage_cache.bulk_write.await_args_list]
+        assert [len(p) for p in paquets] == [2, 1]
+        assert sorted(op._doc["$set"]["adresse"] for p in paquets for op in p) == ["1 Rue A", "3 Rue C", "4 Rue D"]
+
+    @pytest.mark.asyncio
+    async def test_lot_interrompu_conserve_les_adresses_resolues(self):
+        db = fake_db([])
+        geocodeur = FakeGeocodeur({"1 Rue A": ((45.1, -72.1), True), "2 Rue B": "bloque"})
+        adresses = [{"address": a, "city": "Granby"} for a in ("1 Rue A", "2 Rue B")]
+
+        with patch.object(geocoding, "GEOCODING_CACHE_BATCH", 1):
+            with pytest.raises(asyncio.TimeoutError):
+                await asyncio.wait_for(geocoder_lot(db, adresses, geocodeur=geocodeur), timeout=0.1)
+
+        operations = db.geocodage_cache.bulk_write.await_args.args[0]
+        assert [op._doc["$set"]["adresse"] for op in operations] == ["1 Rue A"]
+
+
+class TestGeocodeur:
+
+    @pytest.mark.asyncio
+    async def test_client_partage_et_concurrence(self):
+        en_cours = {"actuel": 0, "max": 0}
+
+        async def handler(request):
+            en_cours["actuel"] += 1
+            en_cours["max"] = max(en_cours["max"], en_cours["actuel"])
+            await asyncio.sleep(0.01)
+            en_cours["actuel"] -= 1
+            q = request.url.params["q"]
+            if q.startswith("erreur"):
+                return httpx.Response(503)
+            if q.startswith("inconnue"):
+                return httpx.Response(200, json=[])
+            if q.startswith("limite"):
+                return httpx.Response(200, text="<html>Too many requests</html>")
+            if q.startswith("incomplete"):
+                return httpx.Response(200, json=[{"display_name": "Granby"}])
+            return httpx.Response(200, json=[{"lat": "45.4", "lon": "-72.7"}])
+
+        geocodeur = Geocodeur(url="http://nominatim.local", concurrence=3, intervalle=0,
+                              transport=httpx.MockTransport(handler))
+        resultats = await asyncio.gather(*[geocodeur.geocoder(f"{i} Rue", "Granby") for i in range(9)])
+        assert all(r == ((45.4, -72.7), True) for r in resultats)
+        assert en_cours["max"] == 3
+
+        assert await geocodeur.geocoder("inconnue", "Granby") == ((None, None), True)
+        assert await geocodeur.geocoder("erreur", "Granby") == ((None, None), False)
+        # Réponse 200 illisible: non définitive, donc jamais mise en cache
+        assert await geocodeur.geocoder("limite", "Granby") == ((None, None), False)
+        assert await geocodeur.geocoder("incomplete", "Granby") == ((None, None), False)
+        await geocodeur.fermer()
+
+    @pytest.mark.asyncio
+    async def test_limiteur_espace_les_requetes(self):
+        limiteur = LimiteurDebit(0.05)
+        debut = time.monotonic()
+        await asyncio.gather(*[limiteur.attendre() for _ in range(3)])
+        assert time.monotonic() - debut >= 0.1
@@ -0,0 +1,112 @@
+"""
+Tests unitaires pour le registre des heures
+===========================================
+
+Exécuter avec: pytest tests/test_hours_ledger.py -v
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+import sys
+sys.path.insert(0, '/app/backend')
+
+from services.cache_invalidation import get_bus_invalidation
+from services.hours_ledger import (
+    CANAL_INVALIDATION_LEDGER,
+    HoursLedger,
+    enregistrer_assignations,
+    invalider_ledger_heures,
+    obtenir_ledger_heures,
+    plage_mois_complet,
+    reaffecter_assignation,
+)
+
+
+TYPES_GARDE = [
+    {"id": "jour", "duree_heures": 12, "est_garde_externe": False},
+    {"id": "soir", "est_garde_externe": False},  # durée par défaut: 8h
+    {"id": "externe", "duree_heures": 24, "est_garde_externe": True},
+]
+
+
+def _assignation(user_id, date, type_garde_id="jour"):
+    return {"user_id": user_id, "date": date, "type_garde_id": type_garde_id}
+
+
+class TestHoursLedger:
+
+    def test_duree_du_type_de_garde_et_separation_interne_externe(self):
+        ledger = HoursLedger(TYPES_GARDE, [
+            _assignation("u1", "2026-01-05"),
+            _assignation("u1", "2026-01-06", "soir"),
+            _assignation("u1", "2026-01-07", "externe"),
+        ])
+        assert ledger.heures_semaine("u1", "2026-01-08") == 20
+        assert ledger.heures_semaine("u1", "2026-01-08", externe=True) == 24
+        assert ledger.heures_semaine("u1", "2026-01-12") == 0
+
+    def test_type_inconnu_ignore(self):
+        ledger = HoursLedger(TYPES_GARDE, [_assignation("u1", "2026-01-05", "supprime")])
+        assert ledger.heures_semaine("u1", "2026-01-05") == 0
+
+    def test_periode_fin_exclue_ou_incluse(self):
+        ledger = HoursLedger(TYPES_GARDE, [
+            _assignation("u1", "2026-01-31"),
+            _assignation("u1", "2026-02-01"),
+            _assignation("u2", "2026-01-15", "externe"),
+        ])
+        assert ledger.heures_periode("u1", "2026-01-01", "2026-02-01") == 24
+        assert ledger.heures_periode("u1", "2026-01-01", "2026-02-01", fin_incluse=False) == 12
+        assert ledger.totaux_periode("2026-01-01", "2026-01-31") == {"u1": 12}
+        assert ledger.totaux_periode("2026-01-01", "2026-01-31", externe=True) == {"u2": 24}
+
+    def test_retrait_incremental(self):
+        assignation = _assignation("u1", "2026-01-05")
+        ledger = HoursLedger(TYPES_GARDE, [assignation])
+        ledger.retirer_assignation(assignation)
+        assert ledger.heures_semaine("u1", "2026-01-05") == 0
+
+    def test_plage_mois_complet_en_semaines_iso(self):
+        # Mars 2026: du dimanche 1er au mardi 31
+        assert plage_mois_complet("2026-03-20") == ("2026-02-23", "2026-04-05")
+
+
+class TestCacheLedger:
+
+    @pytest.fixture
+    def db(self):
+        invalider_ledger_heures()
+        db = MagicMock()
+        db.types_garde.find.return_value.to_list = AsyncMock(return_value=TYPES_GARDE)
+        db.assignations.find.return_value.to_list = AsyncMock(return_value=[_assignation("u1", "2026-03-02")])
+        yield db
+        invalider_ledger_heures()
+
+    @pytest.mark.asyncio
+    async def test_cache_et_mise_a_jour_incrementale(self, db):
+        ledger = await obtenir_ledger_heures(db, "t1", "2026-02-23", "2026-04-05")
+        assert ledger.heures_semaine("u1", "2026-03-02") == 12
+
+        enregistrer_assignations("t1", [_assignation("u1", "2026-03-03", "soir")])
+        reaffecter_assignation("t1", _assignation("u1", "2026-03-02"), "u2")
+
+        meme_ledger = await obtenir_ledger_heures(db, "t1", "2026-03-01", "2026-03-31")
+        assert meme_ledger is ledger
+        assert db.assignations.find.call_count == 1
+        assert ledger.heures_semaine("u1", "2026-03-02") == 8
+        assert ledger.heures_semaine("u2", "2026-03-02") == 12
+
+    @pytest.mark.asyncio
+    async def test_invalidation(self, db):
+        await obtenir_ledger_heures(db, "t1", "2026-02-23", "2026-04-05")
+        invalider_ledger_heures("t1")
+        await obtenir_ledger_heures(db, "t1", "2026-02-23", "2026-04-05")
+        assert db.assignations.find.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_ecriture_d_un_autre_worker_evince_le_registre(self, db):
+        await obtenir_ledger_heures(db, "t1", "2026-02-23", "2026-04-05")
+        # Message du bus publié par un autre worker après une création d'assignation
+        get_bus_invalidation()._notifier(CANAL_INVALIDATION_LEDGER, {"tenant_id": "t1", "origine": "autre-worker"})
+        await obtenir_ledger_heures(db, "t1", "2026-02-23", "2026-04-05")
+        assert db.assignations.find.call_count == 2
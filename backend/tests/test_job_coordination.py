@@ -0,0 +1,204 @@
+"""
+Tests unitaires pour la coordination des tâches entre workers
+============================================================
+
+Plusieurs coordinateurs partagent une base en mémoire, comme plusieurs
+workers uvicorn partagent MongoDB.
+Exécuter avec: pytest tests/test_job_coordination.py -v
+"""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from unittest.mock import MagicMock
+import sys
+sys.path.insert(0, '/app/backend')
+
+from pymongo.errors import DuplicateKeyError
+
+import services.job_coordination as job_coordination
+from services.job_coordination import CoordinateurTaches, attribuer
+
+
+def correspond(doc, filtre):
+    for cle, valeur in filtre.items():
+        if cle == "$or":
+            if not any(correspond(doc, f) for f in valeur):
+                return False
+        elif isinstance(valeur, dict):
+            if "$lt" in valeur and not (cle in doc and doc[cle] < valeur["$lt"]):
+                return False
+            if "$gt" in valeur and not (cle in doc and doc[cle] > valeur["$gt"]):
+                return False
+        elif doc.get(cle) != valeur:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+
+class FakeCollection:
+    """Collection en mémoire indexée par _id (sous-ensemble utilisé par le coordinateur)"""
+
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_one(self, doc):
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("E11000 duplicate key")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one_and_update(self, filtre, update, upsert=False, return_document=None):
+        doc = self.docs.get(filtre["_id"])
+        if doc is not None and correspond(doc, filtre):
+            doc.update(update["$set"])
+            return dict(doc)
+        if not upsert:
+            return None
+        if doc is not None:
+            raise DuplicateKeyError("E11000 duplicate key")
+        self.docs[filtre["_id"]] = {"_id": filtre["_id"], **update["$set"]}
+        return dict(self.docs[filtre["_id"]])
+
+    async def update_one(self, filtre, update, upsert=False):
+        doc = self.docs.get(filtre["_id"])
+        if doc is not None and correspond(doc, filtre):
+            doc.update(update["$set"])
+            return MagicMock(matched_count=1)
+        if upsert and doc is None:
+            self.docs[filtre["_id"]] = {"_id": filtre["_id"], **update["$set"]}
+        return MagicMock(matched_count=0)
+
+    async def delete_one(self, filtre):
+        doc = self.docs.get(filtre["_id"])
+        if doc is not None and correspond(doc, filtre):
+            del self.docs[filtre["_id"]]
+
+    def find(self, filtre, projection=None):
+        return FakeCursor([dict(d) for d in self.docs.values() if correspond(d, filtre)])
+
+
+@pytest.fixture
+def fake_db():
+    db = MagicMock()
+    db.job_leases = FakeCollection()
+    db.job_workers = FakeCollection()
+    db.job_executions = FakeCollection()
+    return db
+
+
+async def cluster(db, n):
+    workers = [CoordinateurTaches(db, worker_id=f"w-{i}") for i in range(n)]
+    for worker in workers:
+        await worker.battement()
+    # Second battement: chaque worker voit tous les autres
+    for worker in workers:
+        await worker.battement()
+    return workers
+
+
+class TestLeader:
+
+    @pytest.mark.asyncio
+    async def test_un_seul_leader_et_reprise(self, fake_db):
+        w0, w1, w2 = await cluster(fake_db, 3)
+        assert [w.est_leader for w in (w0, w1, w2)] == [True, False, False]
+
+        await w0.arreter()
+        await w1.battement()
+        await w2.battement()
+        assert w1.est_leader and not w2.est_leader
+        assert "w-0" not in w1.workers
+
+    @pytest.mark.asyncio
+    async def test_bail_expire_repris(self, fake_db):
+        w0, w1 = await cluster(fake_db, 2)
+        fake_db.job_leases.docs["leader"]["expires_at"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+
+        await w1.battement()
+        assert w1.est_leader
+        # L'ancien leader constate la perte au renouvellement
+        await w0.battement()
+        assert not w0.est_leader
+
+
+class TestExecutionsUniques:
+
+    @pytest.mark.asyncio
+    async def test_une_execution_par_echeance(self, fake_db):
+        workers = await cluster(fake_db, 3)
+        appels = []
+
+        async def job():
+            appels.append(1)
+            await asyncio.sleep(0)
+
+        taches = [w.tache_planifiee("check_equipment_alerts", job) for w in workers]
+        await asyncio.gather(*[t() for t in taches])
+
+        assert len(appels) == 1
+        (execution,) = fake_db.job_executions.docs.values()
+        assert execution["job"] == "check_equipment_alerts"
+        assert execution["statut"] == "termine"
+        assert execution["echeance"].second == 0
+
+    @pytest.mark.asyncio
+    async def test_erreur_enregistree(self, fake_db):
+        (w0,) = await cluster(fake_db, 1)
+
+        async def job():
+            raise RuntimeError("SMTP indisponible")
+
+        echeance = datetime(2026, 1, 5, 8, 0, tzinfo=timezone.utc)
+        assert await w0.executer_une_fois("check_overdue_payments", echeance, job) is True
+        assert await w0.executer_une_fois("check_overdue_payments", echeance, job) is False
+        execution = fake_db.job_executions.docs[f"check_overdue_payments@{echeance.isoformat()}"]
+        assert execution["statut"] == "erreur"
+        assert execution["erreur"] == "SMTP indisponible"
+
+
+class TestPollings:
+
+    @pytest.mark.asyncio
+    async def test_tenants_repartis_puis_repris(self, fake_db):
+        workers = await cluster(fake_db, 3)
+        cles = [f"sftp:t-{i}" for i in range(30)]
+
+        proprietaires = {}
+        for cle in cles:
+            possede = [w.worker_id for w in workers if await w.posseder(cle)]
+            assert len(possede) == 1
+            assert possede[0] == attribuer(cle, ["w-0", "w-1", "w-2"])
+            proprietaires[cle] = possede[0]
+        assert len(set(proprietaires.values())) == 3
+
+        # w-0 s'arrête: ses tenants passent aux autres, les autres ne bougent pas
+        await workers[0].arreter()
+        for w in workers[1:]:
+            await w.battement()
+        for cle in cles:
+            possede = [w.worker_id for w in workers[1:] if await w.posseder(cle)]
+            assert len(possede) == 1
+            if proprietaires[cle] != "w-0":
+                assert possede == [proprietaires[cle]]
+
+    @pytest.mark.asyncio
+    async def test_bail_exclusif_pendant_la_transition(self, fake_db):
+        w0, w1 = await cluster(fake_db, 2)
+        cle = next(c for c in (f"cauca:t-{i}" for i in range(50)) if attribuer(c, ["w-0", "w-1"]) == "w-0")
+        assert await w0.posseder(cle)
+
+        # w-1 ne voit pas encore w-0 (vues divergentes): le bail de w-0 le bloque
+        w1.workers = ["w-1"]
+        assert not await w1.posseder(cle)
+
+    @pytest.mark.asyncio
+    async def test_garde_sans_coordinateur(self, monkeypatch):
+        monkeypatch.setattr(job_coordination, "coordinateur", None)
+        assert await job_coordination.posseder_polling("sftp:t-1") is True
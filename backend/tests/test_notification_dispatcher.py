@@ -0,0 +1,277 @@
+"""
+Tests unitaires pour le répartiteur de notifications
+====================================================
+
+Exécuter avec: pytest tests/test_notification_dispatcher.py -v
+"""
+
+import asyncio
+import threading
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+import services.notification_dispatcher as notification_dispatcher
+from services.notification_dispatcher import (
+    NotificationDispatcher,
+    ResultatEnvoi,
+    envoyer_fcm_multicast,
+    envoyer_web_push,
+)
+
+
+class UnregisteredError(Exception):
+    pass
+
+
+class UnavailableError(Exception):
+    pass
+
+
+def reponse_fcm(succes=True, exception=None):
+    return SimpleNamespace(success=succes, exception=exception)
+
+
+class FakeMessaging:
+    """Simule firebase_admin.messaging.send_each_for_multicast_async"""
+
+    def __init__(self, jetons_morts=(), jetons_instables=()):
+        self.jetons_morts = set(jetons_morts)
+        self.jetons_instables = set(jetons_instables)
+        self.lots = []
+
+    async def send_each_for_multicast_async(self, message):
+        self.lots.append(list(message.tokens))
+        reponses = []
+        for token in message.tokens:
+            if token in self.jetons_morts:
+                reponses.append(reponse_fcm(False, UnregisteredError("unregistered")))
+            elif token in self.jetons_instables:
+                self.jetons_instables.discard(token)
+                reponses.append(reponse_fcm(False, UnavailableError("unavailable")))
+            else:
+                reponses.append(reponse_fcm())
+        return SimpleNamespace(responses=reponses)
+
+
+def construire_message(tokens):
+    return SimpleNamespace(tokens=tokens)
+
+
+class TestFCMMulticast:
+
+    @pytest.mark.asyncio
+    async def test_lots_de_500(self):
+        messaging = FakeMessaging()
+        tokens = [f"tok-{i}" for i in range(1200)]
+        resultat = await envoyer_fcm_multicast(messaging, tokens, construire_message, delai_base=0)
+
+        assert [len(lot) for lot in messaging.lots] == [500, 500, 200]
+        assert resultat.success_count == 1200
+        assert resultat.failure_count == 0
+
+    @pytest.mark.asyncio
+    async def test_jetons_morts_et_reessai_temporaire(self):
+        messaging = FakeMessaging(jetons_morts={"tok-1"}, jetons_instables={"tok-2"})
+        resultat = await envoyer_fcm_multicast(
+            messaging, ["tok-0", "tok-1", "tok-2"], construire_message, delai_base=0
+        )
+
+        assert messaging.lots == [["tok-0", "tok-1", "tok-2"], ["tok-2"]]
+        assert resultat.success_count == 2
+        assert resultat.failure_count == 1
+        assert resultat.morts == ["tok-1"]
+
+
+class TestWebPush:
+
+    @pytest.mark.asyncio
+    async def test_abonnements_expires_retournes(self):
+        class FakeWebPushException(Exception):
+            def __init__(self, statut):
+                super().__init__(f"HTTP {statut}")
+                self.response = SimpleNamespace(status_code=statut)
+
+        def fake_webpush(subscription_info, **kwargs):
+            if subscription_info == "expire":
+                raise FakeWebPushException(410)
+
+        subscriptions = [{"_id": "a", "subscription": "ok"}, {"_id": "b", "subscription": "expire"}]
+        resultat = await envoyer_web_push(
+            fake_webpush, FakeWebPushException, subscriptions, "{}", "cle", {"sub": "mailto:x"}
+        )
+
+        assert resultat.success_count == 1
+        assert resultat.failure_count == 1
+        assert resultat.morts == ["b"]
+
+
+class TestDispatcher:
+
+    @pytest.mark.asyncio
+    async def test_soumettre_retourne_immediatement_et_nettoie_en_masse(self):
+        dispatcher = NotificationDispatcher(workers=2, delai_base=0)
+        nettoyage = AsyncMock()
+        dispatcher.enregistrer_nettoyage("fcm", nettoyage)
+        debut_envoi = asyncio.Event()
+
+        async def envoi(morts):
+            debut_envoi.set()
+            return ResultatEnvoi(success_count=1, morts=morts)
+
+        futurs = [dispatcher.soumettre("fcm", envoi, [f"mort-{i}"]) for i in range(3)]
+        assert not debut_envoi.is_set()
+
+        resultats = await asyncio.gather(*futurs)
+        await dispatcher.arreter()
+
+        assert all(r.success_count == 1 for r in resultats)
+        supprimes = {t for appel in nettoyage.await_args_list for t in appel.args[0]}
+        assert supprimes == {"mort-0", "mort-1", "mort-2"}
+        assert nettoyage.await_count <= 3
+
+    @pytest.mark.asyncio
+    async def test_echec_temporaire_reessaye(self):
+        dispatcher = NotificationDispatcher(workers=1, delai_base=0, max_tentatives=3)
+        tentatives = []
+
+        async def envoi():
+            tentatives.append(1)
+            if len(tentatives) < 3:
+                raise notification_dispatcher.EchecTemporaire("429")
+            return "ok"
+
+        assert await dispatcher.soumettre("email", envoi) == "ok"
+        assert len(tentatives) == 3
+        await dispatcher.arreter()
+
+    @pytest.mark.asyncio
+    async def test_file_pleine_envoi_abandonne(self):
+        dispatcher = NotificationDispatcher(workers=1, taille_file=1, delai_base=0)
+        liberer = asyncio.Event()
+        envois = []
+
+        async def envoi(i):
+            await liberer.wait()
+            envois.append(i)
+            return i
+
+        futurs = [dispatcher.soumettre("email", envoi, i) for i in range(3)]
+
+        # Au-delà de la borne: abandonné tout de suite, aucune tâche en attente de place
+        assert [f.done() for f in futurs] == [False, True, True]
+        assert futurs[1].result() is None and futurs[2].result() is None
+        assert dispatcher._file.qsize() == 1
+
+        liberer.set()
+        assert await futurs[0] == 0
+        await dispatcher.arreter()
+        assert envois == [0]
+
+
+class ResendError(Exception):
+    def __init__(self, code):
+        super().__init__(f"code {code}")
+        self.code = code
+
+
+class TestSoumettreEmail:
+
+    @pytest.mark.asyncio
+    async def test_resend_hors_boucle_avec_reessai(self):
+        appels = []
+
+        def fake_send(params):
+            appels.append(params)
+            if len(appels) == 1:
+                raise ResendError(429)
+            return {"id": "email-1"}
+
+        apres_envoi = AsyncMock()
+        dispatcher = NotificationDispatcher(workers=1, delai_base=0)
+        with patch.object(notification_dispatcher, "_dispatcher", dispatcher), \
+                patch("resend.Emails.send", side_effect=fake_send):
+            reponse = await notification_dispatcher.soumettre_email({"to": ["a@b.ca"]}, apres_envoi=apres_envoi)
+
+        assert reponse == {"id": "email-1"}
+        assert len(appels) == 2
+        apres_envoi.assert_awaited_once_with({"id": "email-1"})
+        await dispatcher.arreter()
+
+    @pytest.mark.asyncio
+    async def test_erreur_definitive_sans_suivi(self):
+        apres_envoi = AsyncMock()
+        dispatcher = NotificationDispatcher(workers=1, delai_base=0)
+        with patch.object(notification_dispatcher, "_dispatcher", dispatcher), \
+                patch("resend.Emails.send", side_effect=ValueError("adresse invalide")):
+            assert await notification_dispatcher.soumettre_email({"to": ["x"]}, apres_envoi=apres_envoi) is None
+        apres_envoi.assert_not_awaited()
+        await dispatcher.arreter()
+
+    @pytest.mark.asyncio
+    async def test_appelant_retourne_avant_la_fin_de_l_envoi(self):
+        import resend
+        from services.email_service import EmailService
+
+        liberer = threading.Event()
+        envoye = threading.Event()
+
+        def fake_send(params):
+            liberer.wait(5)
+            envoye.set()
+            return {"id": "email-2"}
+
+        service = EmailService()
+        log_email_sent = AsyncMock()
+        dispatcher = NotificationDispatcher(workers=1, delai_base=0)
+        with patch.object(notification_dispatcher, "_dispatcher", dispatcher), \
+                patch.object(service, "api_key", "cle"), patch.object(service, "_resend", resend), \
+                patch("resend.Emails.send", side_effect=fake_send), \
+                patch("routes.emails_history.log_email_sent", log_email_sent):
+            resultat = await service.send_email(["a@b.ca", "c@d.ca"], "Sujet", "<p>corps</p>")
+
+            # L'appelant a sa réponse alors que Resend n'a pas encore répondu
+            assert resultat["success"] is True
+            assert not envoye.is_set()
+            log_email_sent.assert_not_awaited()
+
+            liberer.set()
+            await dispatcher.arreter()
+
+        assert envoye.is_set()
+        assert [appel.kwargs["destinataire_email"] for appel in log_email_sent.await_args_list] == ["a@b.ca", "c@d.ca"]
+
+    @pytest.mark.asyncio
+    async def test_email_de_planning_en_file(self, monkeypatch):
+        from routes.planning import send_planning_notification_email
+
+        liberer = threading.Event()
+        envoye = threading.Event()
+
+        def fake_send(params):
+            liberer.wait(5)
+            envoye.set()
+            return {"id": "email-3"}
+
+        monkeypatch.setenv("RESEND_API_KEY", "cle")
+        log_email_sent = AsyncMock()
+        dispatcher = NotificationDispatcher(workers=1, delai_base=0)
+        gardes = [{"date": "2025-03-03", "jour": "Lundi", "type_garde": "Jour", "horaire": "06:00 - 18:00", "collegues": []}]
+        with patch.object(notification_dispatcher, "_dispatcher", dispatcher), \
+                patch("resend.Emails.send", side_effect=fake_send), \
+                patch("routes.emails_history.log_email_sent", log_email_sent):
+            assert send_planning_notification_email(
+                "a@b.ca", "Marc Roy", gardes, "shefford", "2025-03-01 au 2025-03-31"
+            ) is True
+
+            # Retour immédiat: Resend n'a pas répondu, rien d'historisé
+            assert not envoye.is_set()
+            log_email_sent.assert_not_awaited()
+
+            liberer.set()
+            await dispatcher.arreter()
+
+        assert envoye.is_set()
+        assert log_email_sent.await_args.kwargs["type_email"] == "planning_gardes"
@@ -0,0 +1,212 @@
+"""
+Tests unitaires pour le stockage d'objets asynchrone
+====================================================
+
+Backend filesystem (développement local / tests), lectures partielles de
+/files/{id}/download, URLs locales signées, lecture Azure sans aller-retour
+de propriétés et cache des URLs SAS.
+Exécuter avec: pytest tests/test_object_storage.py -v
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+import services.object_storage as object_storage
+from services.object_storage import ObjetIntrouvable, PlageInvalide, StockageAzure, StockageFichiers
+
+
+async def lire_tout(flux):
+    return b"".join([bloc async for bloc in flux.blocs])
+
+
+async def en_blocs(data, taille=3):
+    for i in range(0, len(data), taille):
+        yield data[i:i + taille]
+
+
+@pytest.fixture
+def stockage(tmp_path, monkeypatch):
+    stockage = StockageFichiers(str(tmp_path))
+    monkeypatch.setattr(object_storage, "_stockage", stockage)
+    return stockage
+
+
+class TestStockageFichiers:
+
+    @pytest.mark.asyncio
+    async def test_envoi_lecture_suppression(self, stockage):
+        assert await stockage.envoyer("pfm/t-1/photos/a.jpg", b"jpeg", "image/jpeg") == 4
+        assert await stockage.envoyer("pfm/t-1/docs/b.pdf", en_blocs(b"%PDF-1.7 contenu"), "application/pdf") == 16
+
+        assert await stockage.lire("pfm/t-1/photos/a.jpg") == (b"jpeg", "image/jpeg")
+        assert await stockage.lire("pfm/t-1/docs/b.pdf") == (b"%PDF-1.7 contenu", "application/pdf")
+        assert await stockage.supprimer("pfm/t-1/photos/a.jpg") is True
+        assert await stockage.supprimer("pfm/t-1/photos/a.jpg") is False
+        with pytest.raises(ObjetIntrouvable):
+            await stockage.lire("pfm/t-1/photos/a.jpg")
+
+    @pytest.mark.asyncio
+    async def test_lecture_partielle(self, stockage):
+        await stockage.envoyer("f.bin", bytes(range(100)), "application/octet-stream")
+
+        flux = await stockage.ouvrir("f.bin", debut=10, longueur=5)
+        assert (flux.debut, flux.fin, flux.taille_totale, flux.longueur) == (10, 14, 100, 5)
+        assert await lire_tout(flux) == bytes(range(10, 15))
+
+        flux = await stockage.ouvrir("f.bin", debut=95, longueur=50)
+        assert await lire_tout(flux) == bytes(range(95, 100))
+        with pytest.raises(PlageInvalide):
+            await stockage.ouvrir("f.bin", debut=100)
+
+    def test_chemin_hors_racine_refuse(self, stockage):
+        with pytest.raises(ValueError):
+            stockage.ecrire("../evasion.txt", b"x", "text/plain")
+
+    @pytest.mark.asyncio
+    async def test_api_azure_storage_en_mode_filesystem(self, stockage, monkeypatch):
+        import services.azure_storage as azure_storage
+        monkeypatch.setattr(azure_storage, "STORAGE_BACKEND", "filesystem")
+
+        resultat = await azure_storage.upload_base64_to_azure_async("data:image/png;base64,aGVsbG8=", "t-1", "logos", "logo.png")
+        assert await azure_storage.get_logo_bytes_async({"logo_blob_name": resultat["blob_name"]}) == b"hello"
+        # L'API synchrone (PDFs générés hors boucle) lit le même stockage
+        assert azure_storage.get_object(resultat["blob_name"]) == (b"hello", "image/png")
+        assert await azure_storage.delete_object_async(resultat["blob_name"]) is True
+
+
+class TestStockageAzure:
+
+    @pytest.mark.asyncio
+    async def test_content_type_et_taille_de_la_reponse(self):
+        downloader = MagicMock()
+        downloader.size = 5
+        downloader.properties.content_range = "bytes 10-14/100"
+        downloader.properties.size = 5
+        downloader.properties.content_settings.content_type = "video/mp4"
+        blob = MagicMock()
+        blob.download_blob = AsyncMock(return_value=downloader)
+
+        stockage = StockageAzure()
+        with patch.object(stockage, "_blob", return_value=blob):
+            flux = await stockage.ouvrir("v.mp4", debut=10, longueur=5)
+
+        assert (flux.content_type, flux.debut, flux.fin, flux.taille_totale) == ("video/mp4", 10, 14, 100)
+        assert blob.download_blob.call_args.kwargs["offset"] == 10
+        blob.get_blob_properties.assert_not_called()
+
+
+class TestDownloadRange:
+
+    async def telecharger(self, range_header=None):
+        import routes.file_storage as file_storage
+        fake = MagicMock()
+        fake.stored_files.find_one = AsyncMock(return_value={"id": "f-1", "blob_name": "f.bin"})
+        request = MagicMock()
+        request.headers = {"range": range_header} if range_header else {}
+
+        with patch.object(file_storage, "db", fake), \
+                patch.object(file_storage, "get_tenant_from_slug", AsyncMock(return_value=MagicMock(id="t-1"))), \
+                patch.object(file_storage.jwt, "decode", return_value={}):
+            reponse = await file_storage.download_file("caserne", "f-1", request, auth="jeton", proxy=False)
+        corps = b"".join([bloc async for bloc in reponse.body_iterator])
+        return reponse, corps
+
+    @pytest.mark.asyncio
+    async def test_plages(self, stockage):
+        await stockage.envoyer("f.bin", bytes(range(100)), "application/octet-stream")
+
+        reponse, corps = await self.telecharger()
+        assert reponse.status_code == 200 and corps == bytes(range(100))
+
+        reponse, corps = await self.telecharger("bytes=20-29")
+        assert reponse.status_code == 206 and corps == bytes(range(20, 30))
+        assert reponse.headers["content-range"] == "bytes 20-29/100"
+
+        reponse, corps = await self.telecharger("bytes=-5")
+        assert corps == bytes(range(95, 100))
+        assert reponse.headers["content-range"] == "bytes 95-99/100"
+
+        from fastapi import HTTPException
+        with pytest.raises(HTTPException) as erreur:
+            await self.telecharger("bytes=200-")
+        assert erreur.value.status_code == 416
+
+    @pytest.mark.asyncio
+    async def test_url_locale_signee_en_mode_filesystem(self, stockage, monkeypatch):
+        import services.azure_storage as azure_storage
+        from urllib.parse import parse_qs, unquote, urlsplit
+        from fastapi import HTTPException
+        from routes import file_storage
+        monkeypatch.setattr(azure_storage, "STORAGE_BACKEND", "filesystem")
+        azure_storage.vider_cache_sas()
+        await stockage.envoyer("pfm/t-1/logos/l.png", b"png", "image/png")
+
+        url = urlsplit(azure_storage.generate_sas_url("pfm/t-1/logos/l.png"))
+        assert url.path == "/api/storage/local/pfm/t-1/logos/l.png"
+        params = {cle: valeurs[0] for cle, valeurs in parse_qs(url.query).items()}
+        blob_name = unquote(url.path[len("/api/storage/local/"):])
+        request = MagicMock()
+        request.headers = {}
+
+        reponse = await file_storage.download_local_object(blob_name, request, int(params["expire"]), params["signature"])
+        assert b"".join([bloc async for bloc in reponse.body_iterator]) == b"png"
+        with pytest.raises(HTTPException) as erreur:
+            await file_storage.download_local_object("pfm/t-2/logos/l.png", request, int(params["expire"]), params["signature"])
+        assert erreur.value.status_code == 403
+        azure_storage.vider_cache_sas()
+
+
+class TestCacheSAS:
+
+    @pytest.fixture(autouse=True)
+    def azure(self, monkeypatch):
+        import services.azure_storage as azure_storage
+        monkeypatch.setattr(azure_storage, "STORAGE_BACKEND", "azure")
+        monkeypatch.setattr(azure_storage, "ACCOUNT_NAME", "compte")
+        monkeypatch.setattr(azure_storage, "ACCOUNT_KEY", "Y2xlZi1kZS10ZXN0")
+        monkeypatch.setattr(azure_storage, "CONTAINER_NAME", "pfm")
+        azure_storage.vider_cache_sas()
+        yield azure_storage
+        azure_storage.vider_cache_sas()
+
+    def test_une_signature_par_blob_et_par_fenetre(self, azure, monkeypatch):
+        signatures = []
+        vraie_signature = azure._signer_sas
+        monkeypatch.setattr(azure, "_signer_sas", lambda *a: signatures.append(a) or vraie_signature(*a))
+        maintenant = 1_800_000_000.0
+        monkeypatch.setattr(azure.time, "time", lambda: maintenant)
+
+        url = azure.generate_sas_url("pfm/t-1/a.jpg")
+        assert azure.generate_sas_url("pfm/t-1/a.jpg") == url
+        assert len(signatures) == 1
+        _, debut, fin = signatures[0]
+        # Le jeton démarre au début de la fenêtre: validité restante >= 240 - 60 minutes
+        assert debut.timestamp() <= maintenant and (fin.timestamp() - maintenant) >= 180 * 60
+
+        # Fenêtre suivante: renouvellement anticipé, bien avant l'expiration
+        maintenant += 3600
+        assert azure.generate_sas_url("pfm/t-1/a.jpg") != url
+        assert len(signatures) == 2
+
+    def test_courte_validite_fenetre_reduite(self, azure):
+        duree, _ = azure._fenetre_sas(15, 0)
+        assert duree == 15 * 60 // 4
+
+    def test_resolution_par_lot(self, azure, monkeypatch):
+        appels = []
+        monkeypatch.setattr(azure, "generate_sas_url", lambda blob: appels.append(blob) or f"https://sas/{blob}")
+        users = [
+            {"id": "u-1", "photo_profil_blob_name": "p/1.jpg", "signature_blob_name": "s/1.png"},
+            {"id": "u-2", "photo_profil_blob_name": "p/1.jpg"},
+            {"id": "u-3"},
+            None
+        ]
+        resultat = azure.resolve_blob_urls_batch(users, {"photo_profil_blob_name": "photo_profil", "signature_blob_name": "signature_url"})
+
+        assert [u.get("photo_profil") for u in resultat] == ["https://sas/p/1.jpg", "https://sas/p/1.jpg", None]
+        assert resultat[0]["signature_url"] == "https://sas/s/1.png"
+        assert sorted(appels) == ["p/1.jpg", "s/1.png"]
+        # Auto-détection: champ affiché = nom du champ sans _blob_name
+        assert azure.resolve_blob_urls({"logo_blob_name": "l.png"})["logo"] == "https://sas/l.png"
@@ -0,0 +1,151 @@
+"""
+Tests unitaires pour la génération en lot des feuilles de temps
+===============================================================
+
+Le calcul s'exécute dans le pool de processus (spawn) comme en production.
+Exécuter avec: pytest tests/test_paie_lot.py -v
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+from pymongo import DeleteOne, InsertOne
+
+import routes.paie_complet as paie_complet
+from routes.paie_calcul import calculer_lot_feuilles
+
+
+PERIODE = ("2025-03-02", "2025-03-15")
+
+TYPES_GARDE = [
+    {"id": "tg-int", "nom": "Jour", "duree_heures": 12, "heure_debut": "06:00", "heure_fin": "18:00"},
+    {"id": "tg-ext", "nom": "Externe", "duree_heures": 8, "est_garde_externe": True}
+]
+
+
+def employe(user_id, **champs):
+    return {"id": user_id, "prenom": "Prénom", "nom": user_id, "type_emploi": "temps_partiel",
+            "taux_horaire": 30.0, **champs}
+
+
+def snapshot(**champs):
+    base = {
+        "tenant_id": "t-1",
+        "types_garde": TYPES_GARDE,
+        "positions": {"pos-cap": {"id": "pos-cap", "grade_requis": "capitaine"}},
+        "echelle_salariale": {"prime_fonction_superieure_pct": 20},
+        "intervention_settings": None,
+        "formations": {"f-1": {"id": "f-1", "nom": "RCR", "date_debut": "2025-03-05", "duree_heures": 4}},
+        "assignations": [
+            {"id": "a-1", "user_id": "u-1", "date": "2025-03-03", "type_garde_id": "tg-int"},
+            {"id": "a-2", "user_id": "u-1", "date": "2025-03-04", "type_garde_id": "tg-ext",
+             "position_id": "pos-cap"},
+            {"id": "a-3", "user_id": "u-2", "date": "2025-03-03", "type_garde_id": "tg-int"}
+        ],
+        "interventions": [{
+            "id": "i-1", "external_call_id": "25-001", "type_intervention": "Incendie",
+            "xml_time_call_received": "2025-03-06T10:00:00", "xml_time_terminated": "2025-03-06T11:00:00",
+            "personnel_present": [{"user_id": "u-2", "statut": "rappele"}]
+        }],
+        "inscriptions": [{"user_id": "u-2", "formation_id": "f-1", "statut": "present"}]
+    }
+    base.update(champs)
+    return base
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class TestCalculLot:
+
+    def test_calcul_depuis_instantane(self):
+        resultat = calculer_lot_feuilles(
+            snapshot(), [employe("u-1", fonction_superieur=True, grade="pompier"), employe("u-2")],
+            *PERIODE, {"minimum_heures_cauca": 3.0}, {}, "admin"
+        )
+        assert resultat["erreurs"] == []
+        u1, u2 = resultat["feuilles"]
+
+        assert u1["total_heures_gardes_internes"] == 12
+        assert u1["total_heures_gardes_externes"] == 8
+        externe = next(l for l in u1["lignes"] if l["type"] == "garde_externe")
+        assert externe["fonction_superieure"] is True
+        assert externe["montant"] == pytest.approx(8 * 30.0 * 1.2)
+
+        # Rappel de 1h payé au minimum CAUCA, formation comptée
+        assert u2["total_heures_rappels"] == 1
+        assert any(l["type"] == "rappel" and l["heures_payees"] == 3.0 for l in u2["lignes"])
+        assert u2["total_heures_formations"] == 4
+        assert u2["total_heures_payees"] == 12 + 3 + 4
+
+    def test_erreur_isolee_par_employe(self):
+        resultat = calculer_lot_feuilles(
+            snapshot(), [{"prenom": "Sans", "nom": "Id"}, employe("u-2")],
+            *PERIODE, {}, {}, "admin"
+        )
+        assert [f["user_id"] for f in resultat["feuilles"]] == ["u-2"]
+        assert resultat["erreurs"][0]["employe"] == "Sans Id"
+
+
+class TestGenerationLot:
+
+    @pytest.mark.asyncio
+    async def test_lot_en_pool_et_ecriture_groupee(self):
+        donnees = snapshot()
+        employes = [employe("u-1"), employe("u-2"), employe("u-3")]
+        fake = MagicMock()
+        fake.parametres.find_one = AsyncMock(return_value={"minimum_heures_cauca": 3.0})
+        fake.parametres_attribution.find_one = AsyncMock(return_value={})
+        fake.users.find = MagicMock(return_value=FakeCursor(employes))
+        fake.feuilles_temps.find = MagicMock(return_value=FakeCursor([
+            {"id": "f-u1", "user_id": "u-1", "statut": "brouillon"},
+            {"id": "f-u3", "user_id": "u-3", "statut": "valide"}
+        ]))
+        fake.feuilles_temps.find_one = AsyncMock()
+        fake.feuilles_temps.bulk_write = AsyncMock()
+        fake.types_garde.find = MagicMock(return_value=FakeCursor(donnees["types_garde"]))
+        fake.echelles_salariales.find_one = AsyncMock(return_value=donnees["echelle_salariale"])
+        fake.intervention_settings.find_one = AsyncMock(return_value=None)
+        fake.assignations.find = MagicMock(return_value=FakeCursor(donnees["assignations"]))
+        fake.positions.find = MagicMock(return_value=FakeCursor(donnees["positions"].values()))
+        fake.interventions.find = MagicMock(return_value=FakeCursor(donnees["interventions"]))
+        fake.inscriptions_formations.find = MagicMock(return_value=FakeCursor(donnees["inscriptions"]))
+        fake.formations.find = MagicMock(return_value=FakeCursor(donnees["formations"].values()))
+
+        tenant = MagicMock(id="t-1")
+        with patch.object(paie_complet, "db", fake), \
+                patch.object(paie_complet, "get_tenant_from_slug", AsyncMock(return_value=tenant)), \
+                patch.object(paie_complet, "require_permission", AsyncMock()):
+            reponse = await paie_complet.generer_feuilles_temps_lot(
+                "shefford", {"periode_debut": PERIODE[0], "periode_fin": PERIODE[1]},
+                current_user=MagicMock(id="admin")
+            )
+
+        assert reponse["erreurs"] == []
+        assert reponse["generees"] == 1
+        assert reponse["mises_a_jour"] == 1
+        # Feuille validée de u-3 conservée, aucune lecture par employé
+        assert fake.feuilles_temps.find_one.await_count == 0
+        assert fake.assignations.find.call_args.args[0]["user_id"] == {"$in": ["u-1", "u-2"]}
+
+        fake.feuilles_temps.bulk_write.assert_awaited_once()
+        operations = fake.feuilles_temps.bulk_write.await_args.args[0]
+        assert [type(op) for op in operations] == [DeleteOne, InsertOne, InsertOne]
+        assert sorted(op._doc["user_id"] for op in operations if isinstance(op, InsertOne)) == ["u-1", "u-2"]
@@ -0,0 +1,129 @@
+"""
+Tests unitaires pour le cache des permissions RBAC
+==================================================
+
+Vérifie que user_has_module_action applique les mêmes règles qu'avant
+(module, onglet, accès complet, rôle par défaut) à partir des permissions
+compilées, sans relire access_types à chaque vérification.
+Exécuter avec: pytest tests/test_permissions_cache.py -v
+"""
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+import routes.dependencies as dependencies
+from services.cache_invalidation import get_bus_invalidation
+from routes.dependencies import (
+    PermissionsCompilees,
+    demarrer_memo_permissions,
+    invalider_cache_permissions,
+    terminer_memo_permissions,
+    user_has_module_access,
+    user_has_module_action,
+)
+
+
+PERMISSIONS_LOGISTIQUE = {
+    "modules": {
+        "actifs": {
+            "access": True,
+            "actions": ["voir", "modifier"],
+            "tabs": {
+                "vehicules": {"access": True, "actions": ["voir"]},
+                "bornes": {"access": False},
+            }
+        },
+        "planning": {"access": False, "actions": ["voir"]},
+    }
+}
+
+USER_LOGISTIQUE = {"id": "u1", "role": "employe", "access_type_id": "logistique"}
+
+
+@pytest.fixture
+def access_types():
+    invalider_cache_permissions()
+    db = MagicMock()
+    db.access_types.find_one = AsyncMock(return_value={"permissions": PERMISSIONS_LOGISTIQUE})
+    with patch.object(dependencies, "db", db):
+        yield db.access_types.find_one
+    invalider_cache_permissions()
+
+
+class TestPermissionsCompilees:
+
+    def test_regles_module_et_onglet(self):
+        permissions = PermissionsCompilees(PERMISSIONS_LOGISTIQUE)
+        assert permissions.a_action("actifs", "modifier")
+        assert not permissions.a_action("actifs", "supprimer")
+        # Les actions de l'onglet remplacent celles du module
+        assert permissions.a_action("actifs", "voir", "vehicules")
+        assert not permissions.a_action("actifs", "modifier", "vehicules")
+        # Onglet explicitement fermé
+        assert not permissions.a_action("actifs", "voir", "bornes")
+        # Onglet non configuré: actions du module
+        assert permissions.a_action("actifs", "modifier", "inconnu")
+        assert not permissions.a_action("planning", "voir")
+        assert not permissions.a_acces("planning")
+
+    def test_acces_complet(self):
+        permissions = PermissionsCompilees({"is_full_access": True})
+        assert permissions.a_action("n_importe_quoi", "supprimer")
+
+
+class TestCachePermissions:
+
+    @pytest.mark.asyncio
+    async def test_une_seule_lecture_par_type_acces(self, access_types):
+        for _ in range(5):
+            assert await user_has_module_action("t1", USER_LOGISTIQUE, "actifs", "modifier")
+        assert await user_has_module_access("t1", USER_LOGISTIQUE, "actifs")
+        assert access_types.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_invalidation_apres_modification(self, access_types):
+        assert await user_has_module_action("t1", USER_LOGISTIQUE, "actifs", "modifier")
+        access_types.return_value = {"permissions": {"modules": {"actifs": {"access": True, "actions": ["voir"]}}}}
+        invalider_cache_permissions("t1", "logistique")
+        assert not await user_has_module_action("t1", USER_LOGISTIQUE, "actifs", "modifier")
+        assert access_types.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_invalidation_recue_d_un_autre_worker(self, access_types):
+        assert await user_has_module_action("t1", USER_LOGISTIQUE, "actifs", "modifier")
+        access_types.return_value = {"permissions": {"modules": {}}}
+        # Message du bus publié par un autre worker: seul le type d'accès visé est évincé
+        get_bus_invalidation()._notifier(
+            dependencies.CANAL_INVALIDATION_PERMISSIONS, {"tenant_id": "t1", "access_type_id": "autre"}
+        )
+        assert await user_has_module_action("t1", USER_LOGISTIQUE, "actifs", "modifier")
+        get_bus_invalidation()._notifier(
+            dependencies.CANAL_INVALIDATION_PERMISSIONS, {"tenant_id": "t1", "access_type_id": None}
+        )
+        assert not await user_has_module_action("t1", USER_LOGISTIQUE, "actifs", "modifier")
+        assert access_types.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_type_acces_supprime_retombe_sur_le_role(self, access_types):
+        access_types.return_value = None
+        attendu = dependencies._permissions_role("employe").a_action("planning", "voir")
+        assert await user_has_module_action("t1", USER_LOGISTIQUE, "planning", "voir") == attendu
+
+    @pytest.mark.asyncio
+    async def test_memo_par_requete(self, access_types):
+        jeton = demarrer_memo_permissions()
+        try:
+            await user_has_module_action("t1", USER_LOGISTIQUE, "actifs", "voir")
+            # Même si l'entrée LRU disparaît, le mémo de la requête suffit
+            dependencies._permissions_cache.clear()
+            await user_has_module_action("t1", USER_LOGISTIQUE, "actifs", "voir")
+        finally:
+            terminer_memo_permissions(jeton)
+        assert access_types.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_admin_sans_lecture(self, access_types):
+        assert await user_has_module_action("t1", {"role": "admin"}, "actifs", "supprimer")
+        access_types.assert_not_awaited()
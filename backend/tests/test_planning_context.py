@@ -0,0 +1,84 @@
+"""
+Tests unitaires pour le contexte de planification indexé
+========================================================
+
+Vérifie que les index incrémentaux de PlanningContext donnent les mêmes
+résultats que les balayages linéaires qu'ils remplacent.
+Exécuter avec: pytest tests/test_planning_context.py -v
+"""
+
+import sys
+sys.path.insert(0, '/app/backend')
+
+from services.hours_ledger import semaine_iso
+from services.planning_context import PlanningContext
+
+
+TYPES_GARDE = [
+    {"id": "jour", "nom": "Garde de jour", "duree_heures": 12, "est_garde_externe": False,
+     "heure_debut": "06:00", "heure_fin": "18:00"},
+    {"id": "nuit", "nom": "Garde de nuit", "duree_heures": 12, "est_garde_externe": False,
+     "heure_debut": "18:00", "heure_fin": "06:00"},
+    {"id": "externe", "nom": "Garde externe", "duree_heures": 24, "est_garde_externe": True,
+     "heure_debut": "00:00", "heure_fin": "23:59"},
+]
+
+
+class TestSemaineIso:
+
+    def test_lundi_et_dimanche_meme_semaine(self):
+        assert semaine_iso("2026-01-05") == semaine_iso("2026-01-11")
+
+    def test_semaines_differentes(self):
+        assert semaine_iso("2026-01-11") != semaine_iso("2026-01-12")
+
+    def test_date_invalide(self):
+        assert semaine_iso("") is None
+        assert semaine_iso(None) is None
+
+
+class TestPlanningContext:
+
+    def test_heures_semaine_separees_interne_externe(self):
+        contexte = PlanningContext(TYPES_GARDE, [
+            {"user_id": "u1", "type_garde_id": "jour", "date": "2026-01-05"},
+            {"user_id": "u1", "type_garde_id": "nuit", "date": "2026-01-06"},
+            {"user_id": "u1", "type_garde_id": "externe", "date": "2026-01-07"},
+            {"user_id": "u1", "type_garde_id": "jour", "date": "2026-01-12"},
+        ])
+        assert contexte.heures_semaine("u1", "2026-01-08") == 24
+        assert contexte.heures_semaine("u1", "2026-01-08", externe=True) == 24
+        assert contexte.heures_semaine("u1", "2026-01-12") == 12
+        assert contexte.heures_semaine("u2", "2026-01-08") == 0
+
+    def test_type_garde_inconnu_ignore_pour_les_heures(self):
+        contexte = PlanningContext(TYPES_GARDE, [
+            {"user_id": "u1", "type_garde_id": "supprime", "date": "2026-01-05"},
+        ])
+        assert contexte.heures_semaine("u1", "2026-01-05") == 0
+        assert contexte.users_assignes_garde("2026-01-05", "supprime") == {"u1"}
+
+    def test_ajout_incremental(self):
+        contexte = PlanningContext(TYPES_GARDE)
+        contexte.ajouter_assignation({"user_id": "u1", "type_garde_id": "jour", "date": "2026-01-05"})
+        contexte.ajouter_assignation({"user_id": "u2", "type_garde_id": "jour", "date": "2026-01-05",
+                                      "caserne_id": "c1"})
+
+        assert contexte.users_assignes_garde("2026-01-05", "jour") == {"u1", "u2"}
+        assert len(contexte.assignations_garde("2026-01-05", "jour")) == 2
+        assert len(contexte.assignations_garde("2026-01-05", "jour", "c1")) == 1
+        assert contexte.heures_semaine("u1", "2026-01-05") == 12
+
+    def test_occupation_retourne_une_copie(self):
+        contexte = PlanningContext(TYPES_GARDE, [
+            {"user_id": "u1", "type_garde_id": "jour", "date": "2026-01-05"},
+        ])
+        users = contexte.users_assignes_garde("2026-01-05", "jour")
+        users.add("u2")
+        assert contexte.users_assignes_garde("2026-01-05", "jour") == {"u1"}
+
+    def test_jour_sans_assignation(self):
+        contexte = PlanningContext(TYPES_GARDE)
+        assert contexte.assignations_du_jour("2026-01-05") == []
+        assert contexte.gardes_occupees_du_jour("2026-01-05") == {}
+        assert contexte.users_assignes_garde("2026-01-05", "jour") == set()
@@ -0,0 +1,79 @@
+"""
+Tests unitaires pour le comptage des inspections de GET /points-eau
+===================================================================
+
+Exécuter avec: pytest tests/test_points_eau_inspections.py -v
+"""
+
+import pytest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+import routes.points_eau as points_eau
+
+
+class FakeAggregation:
+    def __init__(self, groupes):
+        self.groupes = groupes
+
+    def __aiter__(self):
+        self._iter = iter(self.groupes)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+@pytest.fixture
+def fake_db():
+    fake = MagicMock()
+    fake.points_eau.find.return_value.to_list = AsyncMock(return_value=[
+        {"id": "p-1", "type": "borne_seche", "date_derniere_inspection": "2026-06-01", "statut_inspection": "anomalie"},
+        {"id": "p-2", "type": "borne_seche", "date_derniere_inspection": "2026-06-01"},
+        {"id": "p-3", "type": "borne_fontaine", "date_derniere_inspection": "2025-01-01"},
+    ])
+    fake.inspections_bornes_seches.aggregate = MagicMock(
+        return_value=FakeAggregation([{"_id": "p-1", "count": 3}, {"_id": "p-2", "count": 1}])
+    )
+    fake.inspections_unifiees.aggregate = MagicMock(
+        return_value=FakeAggregation([{"_id": "p-1", "count": 2}])
+    )
+    fake.inspections_bornes_seches.count_documents = AsyncMock()
+    fake.inspections_unifiees.count_documents = AsyncMock()
+    with patch.object(points_eau, "db", fake):
+        yield fake
+
+
+class TestComptageInspections:
+
+    @pytest.mark.asyncio
+    async def test_deux_agregations_pour_tous_les_points(self, fake_db):
+        tenant = SimpleNamespace(id="t-1", parametres={
+            "actifs": {"dates_tests_bornes_seches": [{"date": "2026-05-01"}]}
+        })
+        with patch.object(points_eau, "get_tenant_from_slug", AsyncMock(return_value=tenant)):
+            points = await points_eau.get_points_eau("shefford", current_user=MagicMock())
+
+        par_id = {p["id"]: p for p in points}
+        assert par_id["p-1"]["nombre_inspections"] == 5
+        assert par_id["p-2"]["nombre_inspections"] == 1
+        assert par_id["p-3"]["nombre_inspections"] == 0
+        fake_db.inspections_bornes_seches.aggregate.assert_called_once()
+        fake_db.inspections_unifiees.aggregate.assert_called_once()
+        fake_db.inspections_bornes_seches.count_documents.assert_not_awaited()
+        fake_db.inspections_unifiees.count_documents.assert_not_awaited()
+
+        # Le statut couleur est inchangé
+        assert par_id["p-1"]["statut_couleur"] == "rouge"
+        assert par_id["p-2"]["statut_couleur"] == "vert"
+        assert par_id["p-3"]["statut_couleur"] == "gris"
+
+    @pytest.mark.asyncio
+    async def test_aucun_point_aucune_requete(self, fake_db):
+        assert await points_eau.compter_inspections_par_point("t-1", []) == {}
+        fake_db.inspections_bornes_seches.aggregate.assert_not_called()
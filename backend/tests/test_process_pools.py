@@ -0,0 +1,32 @@
+"""
+Tests unitaires pour les pools de processus partagés
+====================================================
+
+Exécuter avec: pytest tests/test_process_pools.py -v
+"""
+
+import asyncio
+import sys
+sys.path.insert(0, '/app/backend')
+
+import pytest
+
+from services.process_pools import arreter_process_pools, get_process_pool
+
+
+class TestPoolsProcessus:
+
+    @pytest.mark.asyncio
+    async def test_pool_partage_puis_arrete(self):
+        pool = get_process_pool("test", 1)
+        assert get_process_pool("test", 1) is pool
+        assert get_process_pool("autre", 1) is not pool
+        assert await asyncio.get_running_loop().run_in_executor(pool, abs, -3) == 3
+
+        arreter_process_pools()
+        with pytest.raises(RuntimeError):
+            pool.submit(abs, -1)
+        # Redémarré au prochain usage
+        nouveau = get_process_pool("test", 1)
+        assert nouveau is not pool
+        arreter_process_pools()
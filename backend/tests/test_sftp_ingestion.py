@@ -0,0 +1,138 @@
+"""
+Tests unitaires pour l'ingestion des cartes d'appel 911 (SFTP)
+==============================================================
+
+Pipeline d'ingestion sur le backend répertoire local : téléchargements dans
+le pool de threads, enregistrement et notification carte par carte,
+connexion persistante par clé de polling.
+Exécuter avec: pytest tests/test_sftp_ingestion.py -v
+"""
+
+import asyncio
+import os
+import time
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+from services.sftp_service import SFTPService
+from services.sftp_sources import SourceRepertoire
+
+
+def parse_factice(files_content):
+    numero = files_content["details"].split(":")[1]
+    return {"id": f"i-{numero}", "external_call_id": numero, "address_full": f"{numero} rue Principale"}
+
+
+@pytest.fixture
+def repertoire(tmp_path):
+    for nom, contenu in {
+        "CAUCA_100_Details.xml": "details:100",
+        "CAUCA_100_Ressources.xml": "ressources",
+        "CAUCA_200_Details.xml": "details:200",
+        "CAUCA_300_Ressources.xml": "en attente du fichier Details",
+        "notes.txt": "ignoré"
+    }.items():
+        (tmp_path / nom).write_text(contenu, encoding="iso-8859-1")
+    return tmp_path
+
+
+@pytest.fixture
+def service():
+    db = MagicMock()
+    db.sftp_configs.find_one = AsyncMock()
+    db.interventions.find_one = AsyncMock(return_value=None)
+    db.interventions.insert_one = AsyncMock()
+    db.batiments.find = MagicMock(return_value=MagicMock(to_list=AsyncMock(return_value=[])))
+    websocket_manager = MagicMock()
+    websocket_manager.broadcast_to_tenant = AsyncMock()
+    return SFTPService(db, websocket_manager)
+
+
+class TestPipelineIngestion:
+
+    @pytest.mark.asyncio
+    async def test_cartes_importees_notifiees_et_supprimees(self, service, repertoire):
+        service.db.sftp_configs.find_one.return_value = {"tenant_id": "t-1", "backend": "local", "remote_path": str(repertoire)}
+
+        with patch("services.cauca_parser.parse_cauca_intervention", side_effect=parse_factice):
+            interventions = await service.check_sftp_for_tenant("t-1", "caserne")
+
+        assert sorted(i["external_call_id"] for i in interventions) == ["100", "200"]
+        assert service.db.interventions.insert_one.call_count == 2
+        # Une notification par carte, dès son enregistrement
+        assert service.websocket_manager.broadcast_to_tenant.call_count == 2
+        message = service.websocket_manager.broadcast_to_tenant.call_args.args[1]
+        assert message["type"] == "new_intervention" and message["data"]["action"] == "created"
+        # Cartes traitées supprimées; carte incomplète et fichiers non XML conservés
+        assert sorted(os.listdir(repertoire)) == ["CAUCA_300_Ressources.xml", "notes.txt"]
+
+    @pytest.mark.asyncio
+    async def test_echec_parsing_conserve_les_fichiers(self, service, repertoire):
+        config = {"backend": "local", "remote_path": str(repertoire)}
+        with patch("services.cauca_parser.parse_cauca_intervention", side_effect=ValueError("XML invalide")):
+            assert await service.check_sftp_for_tenant_with_config("t-1", config, "incendie") == []
+        assert "CAUCA_100_Details.xml" in os.listdir(repertoire)
+        service.websocket_manager.broadcast_to_tenant.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_alerte_sante_un_lot_par_fichier(self, service, tmp_path):
+        (tmp_path / "pr_1.xml").write_text("<cartes><carte/></cartes>")
+        (tmp_path / "pr_vide.xml").write_text("<cartes/>")
+        appels = []
+
+        def parse_pr(contenu):
+            appels.append(contenu)
+            return [{"external_call_id": "PR-1"}] if len(appels) == 1 else []
+
+        config = {"backend": "local", "remote_path": str(tmp_path)}
+        with patch("services.alerte_sante_parser.parse_pr_xml_file", side_effect=parse_pr):
+            interventions = await service.check_sftp_for_tenant_with_config("t-1", config, "alerte_sante")
+
+        assert [i["external_call_id"] for i in interventions] == ["PR-1"]
+        assert interventions[0]["type_carte"] == "alerte_sante"
+        # Seul le fichier dont une carte a été enregistrée est supprimé
+        assert sorted(os.listdir(tmp_path)) == ["pr_vide.xml"]
+
+    @pytest.mark.asyncio
+    async def test_telechargements_ne_bloquent_pas_la_boucle(self, service, repertoire):
+        class SourceLente(SourceRepertoire):
+            def telecharger(self, remote_path, filenames):
+                time.sleep(0.1)
+                return super().telecharger(remote_path, filenames)
+
+        tics = 0
+
+        async def horloge():
+            nonlocal tics
+            while True:
+                tics += 1
+                await asyncio.sleep(0.01)
+
+        config = {"backend": "local", "remote_path": str(repertoire)}
+        with patch("services.sftp_service.ouvrir_source", return_value=SourceLente(config)), \
+                patch("services.cauca_parser.parse_cauca_intervention", side_effect=parse_factice):
+            tache = asyncio.create_task(horloge())
+            await service.check_sftp_for_tenant_with_config("t-1", config, "incendie")
+            tache.cancel()
+
+        assert tics >= 10
+
+
+class TestConnexionsPersistantes:
+
+    @pytest.mark.asyncio
+    async def test_source_reutilisee_puis_fermee(self, service, tmp_path):
+        config = {"host": "sftp.exemple.ca", "username": "caserne", "password": "secret", "remote_path": "/"}
+        source = service._source("t-1", config)
+        assert service._source("t-1", dict(config)) is source
+
+        # Nouveaux identifiants: nouvelle connexion
+        nouvelle = service._source("t-1", {**config, "password": "autre"})
+        assert nouvelle is not source and nouvelle.host == "sftp.exemple.ca"
+
+        with patch.object(nouvelle, "fermer") as fermer:
+            await service.stop_polling("t-1")
+        fermer.assert_called_once()
+        assert service.active_connections == {}
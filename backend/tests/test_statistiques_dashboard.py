@@ -0,0 +1,83 @@
+"""
+Tests unitaires pour les statistiques du dashboard (agrégation $facet)
+=====================================================================
+
+Exécuter avec: pytest tests/test_statistiques_dashboard.py -v
+"""
+
+from datetime import date
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+import routes.statistiques as statistiques
+from routes.statistiques import calculer_couverture, pipeline_assignations
+
+
+TYPES_GARDE = [
+    {"id": "jour", "personnel_requis": 2, "duree_heures": 12},
+    {"id": "nuit", "personnel_requis": 1, "duree_heures": 12, "jours_application": ["saturday", "sunday"]},
+    {"id": "admin", "jours_application": ["monday"]}
+]
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+
+class TestCouverture:
+
+    def test_plafond_par_type_et_jours_application(self):
+        lundi = date(2026, 3, 2)
+        assignations = {
+            ("2026-03-02", "jour"): 3,   # plafonné à 2
+            ("2026-03-02", "admin"): 1,
+            ("2026-03-07", "nuit"): 1,
+            ("2026-03-03", "nuit"): 4    # mardi: la garde de nuit ne s'applique pas
+        }
+        # Requis: jour 2x7 + nuit 1x2 + admin 1 = 17, assignés: 2 + 1 + 1 = 4
+        assert calculer_couverture(TYPES_GARDE, lundi, assignations) == pytest.approx(4 / 17 * 100)
+        assert calculer_couverture([], lundi, assignations) == 0
+
+    def test_pipeline_couvre_semaine_et_mois(self):
+        pipeline = pipeline_assignations("t-1", date(2026, 3, 30), date(2026, 4, 5), date(2026, 4, 1), date(2026, 4, 30))
+        assert pipeline[0]["$match"]["date"] == {"$gte": "2026-03-30", "$lte": "2026-04-30"}
+        facettes = pipeline[1]["$facet"]
+        assert facettes["semaine"][0]["$match"]["date"] == {"$gte": "2026-03-30", "$lte": "2026-04-05"}
+        assert facettes["mois"][0]["$match"]["date"] == {"$gte": "2026-04-01", "$lte": "2026-04-30"}
+
+
+class TestGetStatistiques:
+
+    @pytest.mark.asyncio
+    async def test_nombre_fixe_de_requetes(self):
+        fake = MagicMock()
+        fake.users.count_documents = AsyncMock(return_value=25)
+        fake.sessions_formation.count_documents = AsyncMock(return_value=3)
+        fake.demandes_remplacement.count_documents = AsyncMock(return_value=7)
+        fake.types_garde.find = MagicMock(return_value=FakeCursor(TYPES_GARDE))
+        fake.assignations.count_documents = AsyncMock()
+        fake.assignations.aggregate = MagicMock(return_value=FakeCursor([{
+            "semaine": [
+                {"_id": {"date": "2026-03-02", "type_garde_id": "jour"}, "n": 2},
+                {"_id": {"date": "2026-03-03", "type_garde_id": "jour"}, "n": 1}
+            ],
+            "mois": [{"_id": "jour", "n": 10}, {"_id": "nuit", "n": 2}, {"_id": "inconnu", "n": 5}]
+        }]))
+
+        with patch.object(statistiques, "db", fake), \
+                patch.object(statistiques, "get_tenant_from_slug", AsyncMock(return_value=MagicMock(id="t-1"))):
+            resultat = await statistiques.get_statistiques("caserne", current_user=MagicMock())
+
+        assert resultat.personnel_actif == 25
+        assert resultat.formations_planifiees == 3
+        assert resultat.remplacements_effectues == 7
+        assert resultat.gardes_cette_semaine == 3
+        assert resultat.heures_travaillees == 144
+        fake.assignations.aggregate.assert_called_once()
+        fake.assignations.count_documents.assert_not_called()
@@ -0,0 +1,195 @@
+"""
+Tests unitaires pour l'écriture Excel en flux
+=============================================
+
+Les classeurs produits sont relus avec openpyxl.
+Exécuter avec: pytest tests/test_streaming_xlsx.py -v
+"""
+
+import io
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+from openpyxl import load_workbook
+
+from services.streaming_xlsx import ClasseurStreaming, StyleCellule, lettre_colonne
+
+
+ENTETE = StyleCellule(gras=True, couleur="FFFFFF", fond="366092", centre=True, bordure=True)
+
+
+class FakeCursor:
+    """Curseur Motor minimal: itération async et sort()"""
+
+    def __init__(self, docs):
+        self.docs = list(docs)
+        self.consommes = 0
+
+    def sort(self, *args, **kwargs):
+        return self
+
+    def limit(self, *args):
+        return self
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self.consommes >= len(self.docs):
+            raise StopAsyncIteration
+        self.consommes += 1
+        return self.docs[self.consommes - 1]
+
+
+async def lire_flux(flux):
+    return b"".join([bloc async for bloc in flux])
+
+
+class TestClasseurStreaming:
+
+    def test_lettre_colonne(self):
+        assert [lettre_colonne(n) for n in (1, 26, 27, 52, 703)] == ["A", "Z", "AA", "AZ", "AAA"]
+
+    @pytest.mark.asyncio
+    async def test_relu_par_openpyxl(self):
+        async def lignes():
+            yield ["Titre <&>"], StyleCellule(gras=True, taille=16)
+            yield ["Date", "Heures", "Montant", "Actif"], ENTETE
+            yield ["2025-01-01", 7, 12.5, True], [None, None, ENTETE]
+            yield ["texte\x01 nettoyé", "", None, False], None
+
+        classeur = ClasseurStreaming("Paie: janvier", largeurs=[12, 10])
+        classeur.fusionner("A1:D1")
+        wb = load_workbook(io.BytesIO(await lire_flux(classeur.diffuser(lignes()))))
+        ws = wb.active
+
+        assert ws.title == "Paie janvier"
+        assert ws["A1"].value == "Titre <&>"
+        assert ws["A1"].font.b and ws["A1"].font.sz == 16
+        assert ws["A2"].fill.fgColor.rgb == "FF366092"
+        assert ws["A2"].border.left.style == "thin"
+        assert [ws["A3"].value, ws["B3"].value, ws["C3"].value, ws["D3"].value] == ["2025-01-01", 7, 12.5, True]
+        assert ws["C3"].font.color.rgb == "FFFFFFFF"
+        assert ws["A4"].value == "texte nettoyé"
+        assert ws["B4"].value is None
+        assert "A1:D1" in [str(r) for r in ws.merged_cells.ranges]
+        assert ws.column_dimensions["A"].width == 12
+
+    @pytest.mark.asyncio
+    async def test_premier_bloc_avant_les_lignes(self):
+        curseur = FakeCursor([{"date": f"2025-01-{i % 28 + 1:02d}", "n": i} for i in range(20000)])
+
+        async def lignes():
+            async for doc in curseur:
+                yield [doc["date"], doc["n"]], None
+
+        classeur = ClasseurStreaming("Données", taille_bloc=16 * 1024)
+        flux = classeur.diffuser(lignes())
+        premier = await anext(flux)
+
+        assert premier.startswith(b"PK")
+        assert curseur.consommes == 0
+
+        blocs = [premier] + [bloc async for bloc in flux]
+        assert len(blocs) > 3
+        ws = load_workbook(io.BytesIO(b"".join(blocs))).active
+        assert ws.max_row == 20000
+        assert ws["B20000"].value == 19999
+
+
+class TestExportDisponibilites:
+
+    @pytest.mark.asyncio
+    async def test_export_excel_en_flux(self):
+        import routes.disponibilites as disponibilites
+
+        fake = MagicMock()
+        fake.users.find = MagicMock(return_value=FakeCursor([{"id": "u-1", "prenom": "Marc", "nom": "Roy"}]))
+        fake.disponibilites.find = MagicMock(return_value=FakeCursor([
+            {"user_id": "u-1", "date": "2025-03-01", "heure_debut": "08:00", "heure_fin": "16:00", "statut": "disponible"},
+            {"user_id": "u-2", "date": "2025-03-02", "heure_debut": "08:00", "heure_fin": "16:00", "statut": "conge"},
+        ]))
+        tenant = MagicMock(id="t-1")
+        # Route effectivement servie: la première enregistrée pour ce chemin
+        export_excel = next(
+            route.endpoint for route in disponibilites.router.routes
+            if route.path == "/{tenant_slug}/disponibilites/export-excel"
+        )
+
+        async def fake_tenant(slug):
+            return tenant
+
+        with patch.object(disponibilites, "db", fake), \
+                patch.object(disponibilites, "get_tenant_from_slug", fake_tenant):
+            reponse = await export_excel("shefford", user_id=None, current_user=MagicMock())
+            contenu = await lire_flux(reponse.body_iterator)
+
+        ws = load_workbook(io.BytesIO(contenu)).active
+        assert [c.value for c in ws[1]] == ['Date', 'Heure Début', 'Heure Fin', 'Statut', 'Type Garde', 'Pompier']
+        assert [c.value for c in ws[2]] == ['2025-03-01', '08:00', '16:00', 'Disponible', 'Tous', 'Marc Roy']
+        assert ws["D3"].value == "Congé"
+        assert ws["F3"].value == "N/A"
+        assert fake.disponibilites.find.call_args.args[0] == {"tenant_id": "t-1"}
+
+
+class TestExportPaie:
+
+    def fake_db(self):
+        fake = MagicMock()
+        fake.tenant_payroll_config.find_one = AsyncMock(return_value=None)
+        fake.client_pay_code_mappings.find = MagicMock(return_value=FakeCursor([
+            {"internal_event_type": "H_GARDE_INTERNE", "external_pay_code": "101"}
+        ]))
+        fake.feuilles_temps.find = MagicMock(return_value=FakeCursor([
+            {"id": "f-1", "user_id": "u-1", "lignes": [
+                {"type": "garde_interne", "heures_payees": 12, "montant": 360, "date": "2025-03-03", "description": "Garde"}
+            ]},
+            {"id": "f-2", "user_id": "u-2", "lignes": [
+                {"type": "garde_interne", "heures_payees": 0, "montant": 0, "date": "2025-03-04"}
+            ]},
+        ]))
+        fake.users.find = MagicMock(return_value=FakeCursor([
+            {"id": "u-1", "matricule_paie": "M001"}, {"id": "u-2", "numero_employe": "E002"}
+        ]))
+        fake.users.find_one = AsyncMock()
+        fake.feuilles_temps.update_many = AsyncMock()
+        return fake
+
+    async def exporter(self, fake):
+        import routes.paie_complet as paie_complet
+
+        with patch.object(paie_complet, "db", fake), \
+                patch.object(paie_complet, "get_tenant_from_slug", AsyncMock(return_value=MagicMock(id="t-1"))), \
+                patch.object(paie_complet, "require_permission", AsyncMock()):
+            return await paie_complet.export_feuilles_temps("shefford", {}, current_user=MagicMock(id="admin"))
+
+    @pytest.mark.asyncio
+    async def test_employes_en_une_requete(self):
+        fake = self.fake_db()
+        reponse = await self.exporter(fake)
+
+        ws = load_workbook(io.BytesIO(reponse.body)).active
+        assert ws["A1"].value == "Matricule"
+        assert [c.value for c in ws[2]][:5] == ["M001", "101", 12, 360, "2025-03-03"]
+        assert ws.max_row == 2
+        # Aucune lecture par feuille
+        assert fake.users.find_one.await_count == 0
+        assert sorted(fake.users.find.call_args.args[0]["id"]["$in"]) == ["u-1", "u-2"]
+        assert fake.feuilles_temps.update_many.await_args.args[0] == {"id": {"$in": ["f-1", "f-2"]}}
+
+    @pytest.mark.asyncio
+    async def test_erreur_de_generation_sans_fichier_tronque(self):
+        from fastapi import HTTPException
+
+        fake = self.fake_db()
+        with patch.object(ClasseurStreaming, "ouvrir", side_effect=RuntimeError("disque plein")):
+            with pytest.raises(HTTPException) as erreur:
+                await self.exporter(fake)
+
+        assert erreur.value.status_code == 500
+        fake.feuilles_temps.update_many.assert_not_awaited()
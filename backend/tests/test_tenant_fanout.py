@@ -0,0 +1,183 @@
+"""
+Tests unitaires pour l'exécution des jobs quotidiens par tenant
+===============================================================
+
+Fan-out borné (concurrence, délai, isolation des échecs) et sélection des
+alertes d'équipements par agrégation.
+Exécuter avec: pytest tests/test_tenant_fanout.py -v
+"""
+
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+import pytest
+from unittest.mock import MagicMock
+import sys
+sys.path.insert(0, '/app/backend')
+
+from services.job_coordination import CoordinateurTaches
+from services.tenant_fanout import executer_par_tenant
+from services.alertes_equipements import (
+    inspections_dues_par_categorie,
+    parse_frequence_inspection_to_days,
+    pipeline_compteurs_alertes,
+    selectionner_alertes_equipements,
+)
+
+
+TENANTS = [{"id": f"t-{i}", "slug": f"caserne-{i}"} for i in range(10)]
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = list(docs)
+
+    async def to_list(self, length=None):
+        return list(self.docs)
+
+    def __aiter__(self):
+        self._iter = iter(self.docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class FakeExecutions:
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_one(self, doc):
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def update_one(self, filtre, update, upsert=False):
+        self.docs[filtre["_id"]].update(update["$set"])
+
+
+class TestExecuterParTenant:
+
+    @pytest.mark.asyncio
+    async def test_concurrence_bornee(self):
+        en_cours, maximum = 0, 0
+
+        async def traiter(tenant):
+            nonlocal en_cours, maximum
+            en_cours += 1
+            maximum = max(maximum, en_cours)
+            await asyncio.sleep(0.01)
+            en_cours -= 1
+
+        bilan = await executer_par_tenant("test", TENANTS, traiter, concurrence=3)
+        assert maximum == 3
+        assert len(bilan.resultats) == 10
+        assert not bilan.echecs
+
+    @pytest.mark.asyncio
+    async def test_echecs_et_delais_isoles(self):
+        traites = []
+
+        async def traiter(tenant):
+            if tenant["id"] == "t-2":
+                raise RuntimeError("SMTP indisponible")
+            if tenant["id"] == "t-5":
+                await asyncio.sleep(1)
+            traites.append(tenant["id"])
+
+        bilan = await executer_par_tenant("test", TENANTS, traiter, concurrence=4, delai=0.05)
+        assert len(traites) == 8
+        statuts = {r.tenant_id: r.statut for r in bilan.echecs}
+        assert statuts == {"t-2": "erreur", "t-5": "delai_depasse"}
+        assert bilan.plus_lents(1)[0].tenant_id == "t-5"
+
+    @pytest.mark.asyncio
+    async def test_metriques_sur_l_execution_du_job(self):
+        db = MagicMock()
+        db.job_executions = FakeExecutions()
+        coordinateur = CoordinateurTaches(db, worker_id="w-0")
+
+        async def traiter(tenant):
+            if tenant["id"] == "t-0":
+                raise ValueError("paramètres invalides")
+
+        async def job():
+            await executer_par_tenant("check_equipment_alerts", TENANTS[:3], traiter)
+
+        echeance = datetime(2026, 1, 5, 8, 0, tzinfo=timezone.utc)
+        assert await coordinateur.executer_une_fois("check_equipment_alerts", echeance, job)
+        (execution,) = db.job_executions.docs.values()
+        assert execution["statut"] == "termine"
+        assert execution["echecs_tenants"] == 1
+        assert [t["slug"] for t in execution["tenants"]] == ["caserne-0", "caserne-1", "caserne-2"]
+
+    @pytest.mark.asyncio
+    async def test_hors_job_coordonne(self):
+        async def traiter(tenant):
+            pass
+
+        bilan = await executer_par_tenant("test", [], traiter)
+        assert bilan.resultats == []
+
+
+class TestAlertesEquipements:
+
+    def test_frequence(self):
+        assert parse_frequence_inspection_to_days("1 an") == 365
+        assert parse_frequence_inspection_to_days("6 mois") == 180
+        assert parse_frequence_inspection_to_days("") == 365
+
+    def test_pipeline_compteurs(self):
+        pipeline = pipeline_compteurs_alertes("t-1", date(2026, 3, 1), 30, 10, 90)
+        assert pipeline[0] == {"$match": {"tenant_id": "t-1"}}
+        facettes = pipeline[1]["$facet"]
+        assert set(facettes) == {"maintenance", "fin_vie", "reparation", "expiration"}
+        assert facettes["maintenance"][0]["$match"]["date_prochaine_maintenance"]["$lte"] == "2026-03-31"
+        assert facettes["fin_vie"][0]["$match"]["date_fin_vie"]["$lte"] == "2026-05-30"
+
+    @pytest.mark.asyncio
+    async def test_inspections_dues(self):
+        maintenant = datetime(2026, 3, 1, tzinfo=timezone.utc)
+        il_y_a = lambda jours: (maintenant - timedelta(days=jours)).isoformat()
+
+        db = MagicMock()
+        db.categories_equipements.find = MagicMock(return_value=FakeCursor([
+            {"id": "c-apria", "nom": "APRIA", "frequence_inspection": "1 mois"},
+            {"id": "c-sans", "nom": "Sans fréquence"}
+        ]))
+        db.equipements.find = MagicMock(return_value=FakeCursor([
+            {"id": "e-1", "nom": "APRIA 1", "categorie_id": "c-apria", "created_at": il_y_a(400)},
+            {"id": "e-2", "nom": "APRIA 2", "categorie_id": "c-apria", "created_at": il_y_a(400)},
+            {"id": "e-3", "nom": "APRIA 3", "categorie_id": "c-apria", "created_at": il_y_a(45)},
+            {"id": "e-4", "nom": "APRIA 4", "categorie_id": "c-apria", "created_at": il_y_a(5)}
+        ]))
+        db.inspections_unifiees.aggregate = MagicMock(return_value=FakeCursor([
+            {"_id": "e-1", "date_inspection": il_y_a(3)}
+        ]))
+        db.inspections_equipements.aggregate = MagicMock(return_value=FakeCursor([
+            {"_id": "e-2", "date_inspection": il_y_a(60)}
+        ]))
+
+        total, par_categorie = await inspections_dues_par_categorie(db, "t-1", maintenant)
+
+        assert total == 2
+        assert [e["nom"] for e in par_categorie["c-apria"]["equipements"]] == ["APRIA 2", "APRIA 3"]
+        assert par_categorie["c-apria"]["equipements"][0]["jours_retard"] == 60
+        # Seules les catégories avec une fréquence sont lues
+        filtre = db.equipements.find.call_args[0][0]
+        assert filtre["categorie_id"] == {"$in": ["c-apria"]}
+        # Les anciennes inspections ne sont cherchées que pour les équipements restants
+        pipeline = db.inspections_equipements.aggregate.call_args[0][0]
+        assert pipeline[0]["$match"]["equipement_id"] == {"$in": ["e-2", "e-3", "e-4"]}
+
+    @pytest.mark.asyncio
+    async def test_selection_complete(self):
+        db = MagicMock()
+        db.equipements.aggregate = MagicMock(return_value=FakeCursor([
+            {"maintenance": [{"n": 4}], "fin_vie": [], "reparation": [{"n": 2}], "expiration": [{"n": 1}]}
+        ]))
+        db.categories_equipements.find = MagicMock(return_value=FakeCursor([]))
+
+        alertes_count, par_categorie = await selectionner_alertes_equipements(db, "t-1", {}, date(2026, 3, 1))
+        assert alertes_count == {"maintenance": 4, "expiration": 1, "fin_vie": 0, "reparation": 2, "inspections_dues": 0}
+        assert par_categorie == {}
@@ -0,0 +1,134 @@
+"""
+Tests unitaires pour le hub WebSocket temps réel
+================================================
+
+Files d'envoi par connexion, encodage unique par diffusion, politique
+client lent et diffusion entre workers via le transport pub/sub.
+Exécuter avec: pytest tests/test_websocket_hub.py -v
+"""
+
+import asyncio
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+import sys
+sys.path.insert(0, '/app/backend')
+
+import services.websocket_manager as websocket_manager
+from services.websocket_manager import TransportMemoire, WebSocketManager
+
+
+class FakeWebSocket:
+    def __init__(self, delai=0, bloque=False):
+        self.delai = delai
+        self.bloque = bloque
+        self.recus = []
+        self.code_fermeture = None
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, texte):
+        if self.bloque:
+            await asyncio.Event().wait()
+        await asyncio.sleep(self.delai)
+        self.recus.append(json.loads(texte) if texte.startswith("{") else texte)
+
+    async def close(self, code=1000):
+        self.code_fermeture = code
+
+
+async def vider(hub):
+    for _ in range(20):
+        await asyncio.sleep(0)
+
+
+class TestHub:
+
+    @pytest.mark.asyncio
+    async def test_client_lent_ne_retarde_pas_les_autres(self):
+        hub = WebSocketManager(taille_file=10, delai_envoi=5)
+        rapide, lent = FakeWebSocket(), FakeWebSocket(delai=0.5)
+        await hub.connect(rapide, "caserne", "u-1")
+        await hub.connect(lent, "caserne", "u-2")
+
+        with patch.object(websocket_manager.json, "dumps", wraps=json.dumps) as dumps:
+            for i in range(3):
+                assert await hub.broadcast_to_tenant("caserne", {"type": "planning_update", "n": i}) == 2
+        assert dumps.call_count == 3  # une fois par diffusion, pas par socket
+
+        await asyncio.sleep(0.05)
+        assert [m["n"] for m in rapide.recus] == [0, 1, 2]
+        assert lent.recus == []
+
+    @pytest.mark.asyncio
+    async def test_file_pleine_ferme_la_connexion(self):
+        hub = WebSocketManager(taille_file=2, delai_envoi=5)
+        bloque = FakeWebSocket(bloque=True)
+        await hub.connect(bloque, "caserne", "u-1")
+        await hub.connect(FakeWebSocket(), "caserne", "u-2")
+
+        for i in range(5):
+            await hub.broadcast_to_tenant("caserne", {"n": i})
+            await vider(hub)
+
+        assert hub.get_connected_users("caserne") == ["u-2"]
+        assert bloque.code_fermeture == websocket_manager.CODE_CLIENT_LENT
+        assert hub.connexions_abandonnees == 1
+
+    @pytest.mark.asyncio
+    async def test_envoi_trop_lent_ferme_la_connexion(self):
+        hub = WebSocketManager(taille_file=10, delai_envoi=0.01)
+        await hub.connect(FakeWebSocket(bloque=True), "caserne", "u-1")
+        await hub.broadcast_to_tenant("caserne", {"n": 1})
+        await asyncio.sleep(0.05)
+        assert hub.get_connected_count() == 0
+
+    @pytest.mark.asyncio
+    async def test_envoi_cible_et_deconnexion(self):
+        hub = WebSocketManager()
+        a1, a2, b = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        connexion = await hub.connect(a1, "caserne", "u-1")
+        await hub.connect(a2, "caserne", "u-1")  # deuxième onglet
+        await hub.connect(b, "caserne", "u-2")
+
+        await hub.send_to_user("caserne", "u-1", {"type": "notification"})
+        await hub.broadcast_to_tenant("autre-caserne", {"type": "planning_update"})
+        await vider(hub)
+        assert (len(a1.recus), len(a2.recus), len(b.recus)) == (1, 1, 0)
+
+        await hub.disconnect(connexion)
+        assert hub.get_connected_count("caserne") == 2
+        await hub.arreter()
+        assert hub.active_connections == {}
+
+    @pytest.mark.asyncio
+    async def test_diffusion_entre_workers(self):
+        # Deux workers reliés par un même bus (stand-in du change stream Mongo)
+        bus = TransportMemoire()
+        worker_1, worker_2 = WebSocketManager(), WebSocketManager()
+        worker_1.set_transport(bus)
+        worker_2.set_transport(bus)
+        ws = FakeWebSocket()
+        await worker_2.connect(ws, "t-1", "u-1")
+
+        assert await worker_1.broadcast_to_tenant("t-1", {"type": "new_intervention"}) == 0
+        await vider(worker_2)
+        assert ws.recus == [{"type": "new_intervention"}]
+
+
+class TestTransportMongo:
+
+    @pytest.mark.asyncio
+    async def test_publication_et_reception(self):
+        db = MagicMock()
+        db.realtime_messages.insert_one = AsyncMock()
+        transport = websocket_manager.TransportMongo(db)
+        recus = []
+        transport.abonner(recus.append)
+
+        await transport.publier({"canal": "t-1", "texte": "{}", "user_ids": None})
+        document = db.realtime_messages.insert_one.call_args.args[0]
+        assert document["origine"] == transport.origine and "created_at" in document
+        # Livraison locale immédiate; le change stream ignore les messages de ce worker
+        assert recus == [{"canal": "t-1", "texte": "{}", "user_ids": None}]
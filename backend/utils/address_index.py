@@ -0,0 +1,145 @@
+"""
+Index d'adresses pour la déduplication et le rattachement aux bâtiments
+========================================================================
+
+La règle de doublon (utils/address_utils.is_same_address) exige un numéro
+civique identique. Comparer une adresse à tous les bâtiments du tenant est
+donc inutile : l'index regroupe les bâtiments par bloc (chiffres de tête du
+numéro civique, None pour les adresses sans numéro) et seuls les quelques
+candidats du bloc sont comparés.
+
+Les formes normalisées (numéro, rue, ville) sont calculées une fois par
+bâtiment à la construction de l'index, et mémorisées côté requête : les
+lignes d'un import répètent souvent les mêmes villes et rues.
+
+Usage:
+    index = IndexAdresses(batiments)
+    doublons = index.doublons("123 Rue Principale", "Granby")
+"""
+
+import re
+from difflib import SequenceMatcher
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.address_utils import extract_civic_number, extract_street_name, normalize_address
+
+# Seuils de is_same_address
+SEUIL_RUE = 0.85
+SEUIL_VILLE = 0.85
+
+_NUMERO_BLOC = re.compile(r'^[\s\-,.#]*(\d+)')
+
+
+def numero_bloc(address: str) -> Optional[str]:
+    """Clé de bloc: chiffres de tête du numéro civique (ex: "123-125 rue" → "123")"""
+    if not address:
+        return None
+    match = _NUMERO_BLOC.match(address)
+    return match.group(1) if match else None
+
+
+@lru_cache(maxsize=65536)
+def forme_adresse(address: str) -> Tuple[Optional[str], str]:
+    """(numéro civique, rue normalisée), mémorisé"""
+    return extract_civic_number(address), extract_street_name(address)
+
+
+@lru_cache(maxsize=4096)
+def forme_ville(city: str) -> str:
+    return normalize_address(city) if city else ""
+
+
+def similaires(a: str, b: str, seuil: float) -> bool:
+    """SequenceMatcher(a, b).ratio() >= seuil, avec les bornes rapides d'abord"""
+    if a == b:
+        return True
+    matcher = SequenceMatcher(None, a, b)
+    return (
+        matcher.real_quick_ratio() >= seuil
+        and matcher.quick_ratio() >= seuil
+        and matcher.ratio() >= seuil
+    )
+
+
+def adresse_batiment(batiment: Dict[str, Any]) -> str:
+    """Champ d'adresse d'un bâtiment (mêmes replis que find_matching_address)"""
+    return (
+        batiment.get('adresse_civique') or
+        batiment.get('adresse') or
+        batiment.get('adresse_complete') or
+        ""
+    )
+
+
+class _Entree:
+    __slots__ = ("element", "civic", "rue", "ville")
+
+    def __init__(self, element, civic, rue, ville):
+        self.element = element
+        self.civic = civic
+        self.rue = rue
+        self.ville = ville
+
+
+class IndexAdresses:
+    """
+    Bâtiments regroupés par bloc de numéro civique, dans leur ordre d'origine.
+
+    `adresse` et `ville` extraient les champs d'un élément (par défaut
+    adresse_civique/adresse/adresse_complete et ville).
+    """
+
+    def __init__(
+        self,
+        elements: List[Dict[str, Any]],
+        adresse: Callable[[Dict[str, Any]], str] = adresse_batiment,
+        ville: Callable[[Dict[str, Any]], str] = lambda b: b.get('ville', ''),
+    ):
+        self._blocs: Dict[Optional[str], List[_Entree]] = {}
+        self.taille = 0
+        for element in elements:
+            addr = adresse(element) or ""
+            if not addr:
+                continue
+            civic, rue = forme_adresse(addr)
+            self._blocs.setdefault(numero_bloc(addr), []).append(
+                _Entree(element, civic, rue, forme_ville(ville(element) or ""))
+            )
+            self.taille += 1
+
+    def candidats(self, address: str) -> List[Dict[str, Any]]:
+        """Éléments du même bloc que l'adresse (même numéro de tête, ou sans numéro)"""
+        return [entree.element for entree in self._blocs.get(numero_bloc(address or ""), [])]
+
+    def doublons(self, address: str, city: str, premier: bool = False) -> List[Dict[str, Any]]:
+        """
+        Éléments pour lesquels is_same_address(address, city, ...) est vrai,
+        dans l'ordre d'origine. `premier` arrête au premier trouvé.
+        """
+        if not address:
+            return []
+        civic, rue = forme_adresse(address)
+        if not civic or not rue:
+            return []
+        ville = forme_ville(city or "")
+
+        trouves = []
+        for entree in self._blocs.get(numero_bloc(address), []):
+            if entree.civic != civic or not entree.rue:
+                continue
+            if not similaires(rue, entree.rue, SEUIL_RUE):
+                continue
+            if ville and entree.ville:
+                if not similaires(ville, entree.ville, SEUIL_VILLE):
+                    continue
+            elif ville or entree.ville:
+                continue
+            trouves.append(entree.element)
+            if premier:
+                break
+        return trouves
+
+    def premier_doublon(self, address: str, city: str) -> Optional[Dict[str, Any]]:
+        trouves = self.doublons(address, city, premier=True)
+        return trouves[0] if trouves else None
@@ -270,7 +270,7 @@ def calculate_address_similarity(addr1: str, addr2: str, city1: str = "", city2:
 def find_matching_address(
     address: str,
     city: str,
-    existing_addresses: List[Dict],
+    existing_addresses,
     threshold: float = 0.92
 ) -> List[Tuple[Dict, float]]:
     """
@@ -282,37 +282,21 @@ def find_matching_address(
     Args:
         address: L'adresse à rechercher
         city: La ville de l'adresse
-        existing_addresses: Liste de dicts avec au moins 'adresse_civique' et 'ville'
+        existing_addresses: Liste de dicts avec au moins 'adresse_civique' et 'ville',
+            ou IndexAdresses (utils/address_index) construit une fois pour tout un import
         threshold: Seuil minimum de similarité (0.0 à 1.0)
     
     Returns:
         Liste de tuples (batiment, score) triés par score décroissant
     """
-    matches = []
-    
-    for existing in existing_addresses:
-        # Essayer différents champs d'adresse
-        existing_addr = (
-            existing.get('adresse_civique') or 
-            existing.get('adresse') or 
-            existing.get('adresse_complete') or
-            ""
-        )
-        existing_city = existing.get('ville', '')
-        
-        if not existing_addr:
-            continue
-        
-        # Utiliser la nouvelle fonction stricte
-        is_duplicate, details = is_same_address(address, city, existing_addr, existing_city)
-        
-        if is_duplicate:
-            matches.append((existing, 1.0))
-    
-    # Trier par score décroissant (tous les doublons ont score 1.0)
-    matches.sort(key=lambda x: x[1], reverse=True)
-    
-    return matches
+    from utils.address_index import IndexAdresses
+
+    if not isinstance(existing_addresses, IndexAdresses):
+        existing_addresses = IndexAdresses(existing_addresses)
+
+    # Seuls les bâtiments du même bloc de numéro civique sont comparés
+    # (tous les doublons ont score 1.0)
+    return [(existing, 1.0) for existing in existing_addresses.doublons(address, city)]
 
 
 def compare_building_fields(
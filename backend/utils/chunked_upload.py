@@ -1,50 +1,193 @@
 """
 Utilitaire partagé pour les uploads par chunks.
-Stockage persistant : chunks ET sessions dans MongoDB.
-Survit aux redémarrages, pas besoin d'Azure ni de disque local.
-MongoDB supporte les documents jusqu'à 16 Mo (chunks de 10 Mo OK).
+MongoDB ne conserve que les métadonnées de session (chunks reçus) ; les
+données passent par un backend de stockage enfichable (UPLOAD_CHUNK_BACKEND):
+
+- "local" (défaut): fichier spool préalloué à la taille finale, chaque chunk
+  écrit à son offset avec os.pwrite. Les chunks peuvent arriver en parallèle
+  ou dans le désordre, et l'assemblage ne copie rien : le spool EST le fichier.
+- "azure": chaque chunk est un bloc indexé (stage_block) du blob
+  uploads/{upload_id}, validé par la liste de blocs à l'assemblage (aucune
+  copie côté serveur), puis téléchargé une fois pour le traitement local.
+
+Les sessions sont reprenables : un chunk renvoyé écrase le même emplacement
+et n'est compté qu'une fois (chunks_recus).
 """
+import asyncio
+import base64
 import os
+import time
 import uuid
 import tempfile
 import shutil
 from datetime import datetime, timezone
-from typing import Optional
+from typing import List, Optional
 from fastapi import UploadFile
-from bson import Binary
+from pymongo import ReturnDocument
 
 import logging
 logger = logging.getLogger(__name__)
 
 CHUNK_SIZE = 10 * 1024 * 1024  # 10 Mo par chunk
 
-# Répertoire local temporaire (assemblage uniquement, éphémère OK)
+UPLOAD_CHUNK_BACKEND = os.environ.get("UPLOAD_CHUNK_BACKEND", "local")
+# Durée de vie d'un spool abandonné (session jamais finalisée)
+UPLOAD_SPOOL_TTL_SECONDS = int(os.environ.get("UPLOAD_SPOOL_TTL_SECONDS", str(24 * 3600)))
+
+# Répertoire local temporaire (spool des chunks et fichiers assemblés)
 LOCAL_TMP = os.path.join(tempfile.gettempdir(), "pfm_upload_tmp")
 os.makedirs(LOCAL_TMP, exist_ok=True)
 
+ASSEMBLED_NAME = "assembled_file"
+
 
 async def _get_db():
     from routes.dependencies import db
     return db
 
 
-async def init_upload(tenant_id: str, user_id: str, filename: str, total_size: int, total_chunks: int) -> str:
-    """Initialise un upload. Session dans MongoDB."""
+def _chemin_spool(upload_id: str) -> str:
+    return os.path.join(LOCAL_TMP, upload_id, ASSEMBLED_NAME)
+
+
+def _purger_spools_expires():
+    """Supprime les répertoires de sessions abandonnées"""
+    limite = time.time() - UPLOAD_SPOOL_TTL_SECONDS
+    try:
+        noms = os.listdir(LOCAL_TMP)
+    except FileNotFoundError:
+        return
+    for nom in noms:
+        chemin = os.path.join(LOCAL_TMP, nom)
+        try:
+            if os.path.isdir(chemin) and os.path.getmtime(chemin) < limite:
+                shutil.rmtree(chemin, ignore_errors=True)
+        except OSError:
+            pass
+
+
+# ======================== BACKENDS DE STOCKAGE DES CHUNKS ========================
+
+class SpoolLocal:
+    """Chunks écrits à leur offset dans un fichier préalloué"""
+
+    nom = "local"
+
+    def _preparer(self, upload_id: str, total_size: int):
+        chemin = _chemin_spool(upload_id)
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        fd = os.open(chemin, os.O_WRONLY | os.O_CREAT, 0o600)
+        try:
+            if total_size > 0:
+                try:
+                    os.posix_fallocate(fd, 0, total_size)
+                except (AttributeError, OSError):
+                    # Système de fichiers sans fallocate: fichier creux à la bonne taille
+                    os.ftruncate(fd, total_size)
+        finally:
+            os.close(fd)
+
+    def _ecrire(self, upload_id: str, offset: int, data: bytes):
+        fd = os.open(_chemin_spool(upload_id), os.O_WRONLY)
+        try:
+            vue = memoryview(data)
+            while vue:
+                ecrits = os.pwrite(fd, vue, offset)
+                vue = vue[ecrits:]
+                offset += ecrits
+        finally:
+            os.close(fd)
+
+    async def preparer(self, session: dict):
+        await asyncio.to_thread(self._preparer, session["upload_id"], session.get("total_size") or 0)
+
+    async def ecrire(self, session: dict, chunk_index: int, offset: int, data: bytes):
+        await asyncio.to_thread(self._ecrire, session["upload_id"], offset, data)
+
+    async def assembler(self, session: dict) -> str:
+        chemin = _chemin_spool(session["upload_id"])
+        if not os.path.isfile(chemin):
+            raise ValueError("Fichier d'upload introuvable sur ce serveur")
+        return chemin
+
+
+class BlocsAzure:
+    """Chunks indexés comme blocs d'un block blob, validés en une liste à l'assemblage"""
+
+    nom = "azure"
+
+    @staticmethod
+    def _blob(session: dict):
+        from services.azure_storage import _get_client, CONTAINER_NAME
+        container = _get_client().get_container_client(CONTAINER_NAME)
+        return container.get_blob_client(f"uploads/{session['upload_id']}")
+
+    @staticmethod
+    def id_bloc(chunk_index: int) -> str:
+        # Tous les identifiants d'un blob doivent avoir la même longueur
+        return base64.b64encode(f"{chunk_index:08d}".encode()).decode()
+
+    async def preparer(self, session: dict):
+        pass
+
+    async def ecrire(self, session: dict, chunk_index: int, offset: int, data: bytes):
+        blob = self._blob(session)
+        await asyncio.to_thread(blob.stage_block, self.id_bloc(chunk_index), data, length=len(data))
+
+    def _telecharger(self, session: dict) -> str:
+        from azure.storage.blob import BlobBlock
+        blob = self._blob(session)
+        blob.commit_block_list([BlobBlock(block_id=self.id_bloc(i)) for i in range(session["total_chunks"])])
+
+        chemin = _chemin_spool(session["upload_id"])
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+        with open(chemin, "wb") as out:
+            blob.download_blob(max_concurrency=4).readinto(out)
+        blob.delete_blob()
+        return chemin
+
+    async def assembler(self, session: dict) -> str:
+        return await asyncio.to_thread(self._telecharger, session)
+
+
+_BACKENDS = {backend.nom: backend for backend in (SpoolLocal(), BlocsAzure())}
+
+
+def get_chunk_backend(nom: Optional[str] = None):
+    """Backend d'une session (celui choisi à l'init) ou backend configuré"""
+    nom = nom or UPLOAD_CHUNK_BACKEND
+    if nom not in _BACKENDS:
+        raise ValueError(f"Backend de chunks inconnu: {nom}")
+    return _BACKENDS[nom]
+
+
+# ======================== SESSIONS ========================
+
+async def init_upload(tenant_id: str, user_id: str, filename: str, total_size: int, total_chunks: int,
+                      chunk_size: int = CHUNK_SIZE) -> str:
+    """Initialise un upload. Session (métadonnées seulement) dans MongoDB."""
     db = await _get_db()
     upload_id = str(uuid.uuid4())
+    backend = get_chunk_backend()
 
-    await db.upload_sessions.insert_one({
+    session = {
         "upload_id": upload_id,
         "tenant_id": tenant_id,
         "user_id": user_id,
         "filename": filename,
         "total_size": total_size,
         "total_chunks": total_chunks,
+        "chunk_size": chunk_size,
+        "backend": backend.nom,
+        "chunks_recus": [],
         "received_chunks": 0,
         "created_at": datetime.now(timezone.utc).isoformat(),
-    })
+    }
+    await asyncio.to_thread(_purger_spools_expires)
+    await backend.preparer(session)
+    await db.upload_sessions.insert_one(session)
 
-    logger.info("Upload init: %s (%s, %d chunks)", upload_id, filename, total_chunks)
+    logger.info("Upload init: %s (%s, %d chunks, backend %s)", upload_id, filename, total_chunks, backend.nom)
     return upload_id
 
 
@@ -58,8 +201,27 @@ async def get_upload_session(upload_id: str) -> Optional[dict]:
     return session
 
 
+def chunks_manquants(session: dict) -> List[int]:
+    """Index des chunks encore attendus (reprise d'un upload interrompu)"""
+    recus = set(session.get("chunks_recus", []))
+    return [i for i in range(session.get("total_chunks", 0)) if i not in recus]
+
+
+def _verifier_chunk(session: dict, chunk_index: int, taille: int) -> Optional[str]:
+    total_chunks = session["total_chunks"]
+    chunk_size = session.get("chunk_size") or CHUNK_SIZE
+    total_size = session.get("total_size") or 0
+    if not 0 <= chunk_index < total_chunks:
+        return f"Index de chunk invalide: {chunk_index}"
+    if chunk_index < total_chunks - 1 and taille != chunk_size:
+        return f"Taille du chunk {chunk_index} invalide: {taille} (attendu {chunk_size})"
+    if chunk_index == total_chunks - 1 and total_size and chunk_index * chunk_size + taille != total_size:
+        return f"Taille du dernier chunk invalide: {taille}"
+    return None
+
+
 async def save_chunk(upload_id: str, chunk_index: int, file: UploadFile) -> dict:
-    """Sauvegarde un chunk dans MongoDB (Binary)."""
+    """Écrit un chunk dans le backend de la session et le marque reçu."""
     db = await _get_db()
     session = await db.upload_sessions.find_one({"upload_id": upload_id}, {"_id": 0})
     if not session:
@@ -67,30 +229,26 @@ async def save_chunk(upload_id: str, chunk_index: int, file: UploadFile) -> dict
 
     try:
         chunk_data = await file.read()
+        erreur = _verifier_chunk(session, chunk_index, len(chunk_data))
+        if erreur:
+            return {"error": erreur}
 
-        # Stocker le chunk dans MongoDB
-        await db.upload_chunks.update_one(
-            {"upload_id": upload_id, "chunk_index": chunk_index},
-            {"$set": {
-                "upload_id": upload_id,
-                "chunk_index": chunk_index,
-                "data": Binary(chunk_data),
-                "size": len(chunk_data),
-            }},
-            upsert=True
-        )
+        offset = chunk_index * (session.get("chunk_size") or CHUNK_SIZE)
+        await get_chunk_backend(session.get("backend")).ecrire(session, chunk_index, offset, chunk_data)
     except Exception as e:
         logger.error("Erreur save_chunk %s/%d: %s", upload_id, chunk_index, e)
         return {"error": f"Erreur stockage chunk {chunk_index}: {str(e)}"}
 
-    # Incrémenter le compteur (atomique)
-    await db.upload_sessions.update_one(
+    # Marquer le chunk reçu (idempotent, atomique pour des chunks envoyés en parallèle)
+    session = await db.upload_sessions.find_one_and_update(
         {"upload_id": upload_id},
-        {"$inc": {"received_chunks": 1}}
+        [
+            {"$set": {"chunks_recus": {"$setUnion": [{"$ifNull": ["$chunks_recus", []]}, [chunk_index]]}}},
+            {"$set": {"received_chunks": {"$size": "$chunks_recus"}}}
+        ],
+        projection={"_id": 0, "received_chunks": 1, "total_chunks": 1},
+        return_document=ReturnDocument.AFTER
     )
-
-    # Relire le compteur
-    session = await db.upload_sessions.find_one({"upload_id": upload_id}, {"_id": 0})
     received = session["received_chunks"] if session else 0
     total = session["total_chunks"] if session else 0
 
@@ -105,38 +263,24 @@ async def save_chunk(upload_id: str, chunk_index: int, file: UploadFile) -> dict
 
 async def assemble_chunks(upload_id: str) -> str:
     """
-    Télécharge les chunks depuis MongoDB et assemble en fichier local temporaire.
-    Retourne le chemin du fichier assemblé.
+    Finalise l'upload et retourne le chemin du fichier local complet.
+    La session est supprimée ; le fichier se nettoie avec cleanup_file.
     """
     db = await _get_db()
     session = await db.upload_sessions.find_one({"upload_id": upload_id}, {"_id": 0})
     if not session:
         raise ValueError("Session d'upload non trouvée")
 
-    total = session["total_chunks"]
-    received = session.get("received_chunks", 0)
-    if received < total:
-        raise ValueError(f"Chunks manquants: {received}/{total}")
-
-    # Assembler dans un fichier local temporaire
-    assemble_dir = os.path.join(LOCAL_TMP, upload_id)
-    os.makedirs(assemble_dir, exist_ok=True)
-    final_path = os.path.join(assemble_dir, "assembled_file")
-
-    with open(final_path, "wb") as out:
-        for i in range(total):
-            chunk_doc = await db.upload_chunks.find_one(
-                {"upload_id": upload_id, "chunk_index": i}
-            )
-            if not chunk_doc or "data" not in chunk_doc:
-                raise ValueError(f"Chunk {i} manquant dans MongoDB")
-            out.write(chunk_doc["data"])
+    manquants = chunks_manquants(session)
+    if manquants:
+        total = session["total_chunks"]
+        raise ValueError(f"Chunks manquants: {total - len(manquants)}/{total}")
+
+    final_path = await get_chunk_backend(session.get("backend")).assembler(session)
 
     size_mb = os.path.getsize(final_path) / (1024 * 1024)
     logger.info("Upload %s assemblé: %.1f Mo", upload_id, size_mb)
 
-    # Nettoyer MongoDB (chunks + session)
-    await db.upload_chunks.delete_many({"upload_id": upload_id})
     await db.upload_sessions.delete_one({"upload_id": upload_id})
 
     return final_path
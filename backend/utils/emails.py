@@ -8,6 +8,8 @@ import resend
 from typing import List, Dict
 from datetime import datetime
 
+from services.notification_dispatcher import soumettre_email
+
 logger = logging.getLogger(__name__)
 
 # Configuration de Resend API avec la clé d'environnement
@@ -244,27 +246,21 @@ async def send_defaut_borne_email(
         
         # Envoyer l'email via Resend
         logger.info(f"Envoi d'email de notification de défaut pour la borne {borne_id} à {len(emails)} destinataire(s)")
-        response = resend.Emails.send(email_params)
-        
-        logger.info(f"Email envoyé avec succès. ID: {response.get('id')}")
-        
-        # Log email pour chaque destinataire
-        try:
-            from routes.emails_history import log_email_sent
-            for email in emails:
-                await log_email_sent(
-                    type_email="defaut_borne",
-                    destinataire_email=email,
-                    sujet=f"[Défaut] Borne #{borne_id} - {borne_adresse}",
-                    tenant_slug=tenant_slug,
-                    metadata={"borne_id": borne_id, "type_defaut": type_defaut}
-                )
-        except Exception as log_err:
-            logger.warning(f"Erreur log email: {log_err}")
+        # Historique enregistré par le worker une fois l'email envoyé
+        from routes.emails_history import historiser_apres_envoi
+        soumettre_email(email_params, apres_envoi=historiser_apres_envoi(
+            emails,
+            type_email="defaut_borne",
+            sujet=f"[Défaut] Borne #{borne_id} - {borne_adresse}",
+            tenant_slug=tenant_slug,
+            metadata={"borne_id": borne_id, "statut_inspection": statut}
+        ))
+        
+        logger.info(f"Email de défaut pour la borne {borne_id} mis en file")
         
         return {
             "success": True,
-            "email_id": response.get("id"),
+            "email_id": None,
             "recipients": emails
         }
         
@@ -410,27 +406,21 @@ async def send_inventaire_vehicule_defaut_email(
         
         # Envoyer l'email via Resend
         logger.info(f"Envoi d'email de notification inventaire véhicule pour {vehicule_nom} à {len(emails)} destinataire(s)")
-        response = resend.Emails.send(email_params)
-        
-        logger.info(f"Email inventaire véhicule envoyé avec succès. ID: {response.get('id')}")
-        
-        # Log email pour chaque destinataire
-        try:
-            from routes.emails_history import log_email_sent
-            for email in emails:
-                await log_email_sent(
-                    type_email="inventaire_vehicule_defaut",
-                    destinataire_email=email,
-                    sujet=f"[Inventaire Véhicule] Items Manquants/Défectueux - {vehicule_nom}",
-                    tenant_slug=tenant_slug,
-                    metadata={"vehicule_nom": vehicule_nom, "nb_problemes": len(items_problemes)}
-                )
-        except Exception as log_err:
-            logger.warning(f"Erreur log email: {log_err}")
+        # Historique enregistré par le worker une fois l'email envoyé
+        from routes.emails_history import historiser_apres_envoi
+        soumettre_email(email_params, apres_envoi=historiser_apres_envoi(
+            emails,
+            type_email="inventaire_vehicule_defaut",
+            sujet=f"[Inventaire Véhicule] Items Manquants/Défectueux - {vehicule_nom}",
+            tenant_slug=tenant_slug,
+            metadata={"vehicule_nom": vehicule_nom, "nb_problemes": len(items_problemes)}
+        ))
+        
+        logger.info(f"Email inventaire véhicule pour {vehicule_nom} mis en file")
         
         return {
             "success": True,
-            "email_id": response.get("id"),
+            "email_id": None,
             "recipients": emails
         }
         
@@ -643,27 +633,21 @@ async def send_inventaire_vehicule_alertes_email(
         
         # Envoyer l'email via Resend
         logger.info(f"Envoi d'email d'alertes inventaire véhicule pour {vehicule_nom} à {len(emails)} destinataire(s) ({len(alertes)} alertes)")
-        response = resend.Emails.send(email_params)
-        
-        logger.info(f"Email d'alertes inventaire véhicule envoyé avec succès. ID: {response.get('id')}")
-        
-        # Log email pour chaque destinataire
-        try:
-            from routes.emails_history import log_email_sent
-            for email in emails:
-                await log_email_sent(
-                    type_email="inventaire_vehicule_alertes",
-                    destinataire_email=email,
-                    sujet=f"[Inventaire Véhicule] {len(alertes)} Alerte(s) - {vehicule_nom}",
-                    tenant_slug=tenant_slug,
-                    metadata={"vehicule_nom": vehicule_nom, "nb_alertes": len(alertes)}
-                )
-        except Exception as log_err:
-            logger.warning(f"Erreur log email: {log_err}")
+        # Historique enregistré par le worker une fois l'email envoyé
+        from routes.emails_history import historiser_apres_envoi
+        soumettre_email(email_params, apres_envoi=historiser_apres_envoi(
+            emails,
+            type_email="inventaire_vehicule_alertes",
+            sujet=f"[Inventaire Véhicule] {len(alertes)} Alerte(s) - {vehicule_nom}",
+            tenant_slug=tenant_slug,
+            metadata={"vehicule_nom": vehicule_nom, "nb_alertes": len(alertes)}
+        ))
+        
+        logger.info(f"Email d'alertes inventaire véhicule pour {vehicule_nom} mis en file")
         
         return {
             "success": True,
-            "email_id": response.get("id"),
+            "email_id": None,
             "recipients": emails,
             "alertes_count": len(alertes)
         }
@@ -2,6 +2,7 @@
 Helpers PDF partagés pour la génération de documents PDF
 """
 import base64
+from datetime import datetime
 from io import BytesIO as IOBytesIO
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.units import inch
@@ -11,52 +12,64 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER
 
 
-def create_pdf_header_elements(tenant, styles):
+def logo_legacy_base64(tenant) -> bytes:
+    """Logo legacy stocké en base64 dans tenant.logo_url (None sinon)"""
+    logo_url = getattr(tenant, 'logo_url', None)
+    if logo_url and logo_url.startswith('data:image/'):
+        header, encoded = logo_url.split(',', 1)
+        return base64.b64decode(encoded)
+    return None
+
+
+def create_pdf_header_elements(tenant, styles, logo_data: bytes = None):
     """
     Crée les éléments de header personnalisés pour les PDFs
     Retourne une liste d'éléments à ajouter au document
+    
+    logo_data: bytes du logo, lus par le handler async
+    (services.azure_storage.get_logo_bytes_async) ; à défaut, logo legacy
+    base64. Aucune lecture réseau ici (appelé depuis la boucle asyncio ou
+    depuis un processus de rendu).
     """
     elements = []
     
     # Logo (si présent)
-    if hasattr(tenant, 'logo_url') and tenant.logo_url:
-        try:
-            if tenant.logo_url.startswith('data:image/'):
-                # Extraire les données base64
-                header, encoded = tenant.logo_url.split(',', 1)
-                logo_data = base64.b64decode(encoded)
-                logo_buffer = IOBytesIO(logo_data)
-                
-                # Utiliser PIL pour obtenir les dimensions de l'image
-                from PIL import Image as PILImage
-                pil_image = PILImage.open(logo_buffer)
-                img_width, img_height = pil_image.size
-                
-                # Calculer les dimensions avec limites max pour éviter le dépassement
-                max_width = 1.2 * inch
-                max_height = 1.0 * inch  # Limite maximale de hauteur
-                
-                aspect_ratio = img_height / img_width
-                
-                # Calculer en fonction de la largeur
-                target_width = max_width
-                target_height = target_width * aspect_ratio
-                
-                # Si la hauteur dépasse la limite, recalculer en fonction de la hauteur
-                if target_height > max_height:
-                    target_height = max_height
-                    target_width = target_height / aspect_ratio
-                
-                # Réinitialiser le buffer pour ReportLab
-                logo_buffer.seek(0)
-                
-                # Ajouter le logo avec largeur et hauteur explicites
-                logo = Image(logo_buffer, width=target_width, height=target_height)
-                logo.hAlign = 'LEFT'
-                elements.append(logo)
-                elements.append(Spacer(1, 0.1 * inch))
-        except Exception as e:
-            print(f"Erreur chargement logo PDF: {e}")
+    try:
+        if logo_data is None:
+            logo_data = logo_legacy_base64(tenant)
+        if logo_data:
+            logo_buffer = IOBytesIO(logo_data)
+            
+            # Utiliser PIL pour obtenir les dimensions de l'image
+            from PIL import Image as PILImage
+            pil_image = PILImage.open(logo_buffer)
+            img_width, img_height = pil_image.size
+            
+            # Calculer les dimensions avec limites max pour éviter le dépassement
+            max_width = 1.2 * inch
+            max_height = 1.0 * inch  # Limite maximale de hauteur
+            
+            aspect_ratio = img_height / img_width
+            
+            # Calculer en fonction de la largeur
+            target_width = max_width
+            target_height = target_width * aspect_ratio
+            
+            # Si la hauteur dépasse la limite, recalculer en fonction de la hauteur
+            if target_height > max_height:
+                target_height = max_height
+                target_width = target_height / aspect_ratio
+            
+            # Réinitialiser le buffer pour ReportLab
+            logo_buffer.seek(0)
+            
+            # Ajouter le logo avec largeur et hauteur explicites
+            logo = Image(logo_buffer, width=target_width, height=target_height)
+            logo.hAlign = 'LEFT'
+            elements.append(logo)
+            elements.append(Spacer(1, 0.1 * inch))
+    except Exception as e:
+        print(f"Erreur chargement logo PDF: {e}")
     
     # Nom du service
     nom_service = tenant.nom_service if hasattr(tenant, 'nom_service') and tenant.nom_service else tenant.nom
@@ -89,6 +102,26 @@ def create_pdf_footer_text(tenant):
     return " | ".join(footer_parts) if footer_parts else ""
 
 
+def draw_profiremanager_footer(canvas, doc):
+    """
+    Pied de page (ligne, date de génération, numéro de page) pour
+    onFirstPage / onLaterPages. Fonction de module : les documents peuvent
+    être mis en page dans le pool d'export.
+    """
+    largeur = doc.pagesize[0]
+    canvas.saveState()
+    canvas.setStrokeColor(colors.HexColor('#e2e8f0'))
+    canvas.setLineWidth(1)
+    canvas.line(0.5*inch, 0.5*inch, largeur - 0.5*inch, 0.5*inch)
+    canvas.setFont('Helvetica', 9)
+    canvas.setFillColor(colors.HexColor('#64748b'))
+    footer_text = f"ProFireManager - {datetime.now().strftime('%d/%m/%Y %H:%M')}"
+    canvas.drawCentredString(largeur / 2, 0.35*inch, footer_text)
+    canvas.setFont('Helvetica', 8)
+    canvas.drawRightString(largeur - 0.5*inch, 0.35*inch, f"Page {doc.page}")
+    canvas.restoreState()
+
+
 class BrandedDocTemplate(SimpleDocTemplate):
     """
     Template de document PDF personnalisé avec branding tenant automatique
@@ -107,13 +140,14 @@ class BrandedDocTemplate(SimpleDocTemplate):
         pass
 
 
-def create_branded_pdf(tenant, pagesize=A4, **kwargs):
+def create_branded_pdf(tenant, pagesize=A4, logo_data: bytes = None, **kwargs):
     """
     Fonction helper pour créer un PDF brandé avec logo et footer
     
     Args:
         tenant: L'objet tenant
         pagesize: Taille de la page (A4, letter, etc.)
+        logo_data: bytes du logo (get_logo_bytes_async), legacy base64 à défaut
         **kwargs: Arguments additionnels pour SimpleDocTemplate
         
     Returns:
@@ -135,7 +169,7 @@ def create_branded_pdf(tenant, pagesize=A4, **kwargs):
     styles = getSampleStyleSheet()
     
     # Créer les éléments de base avec logo et header
-    elements = create_pdf_header_elements(tenant, styles)
+    elements = create_pdf_header_elements(tenant, styles, logo_data)
     
     return buffer, doc, elements
 